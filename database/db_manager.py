@@ -9,10 +9,13 @@ try:
 except ImportError:
     QDate = None
 from utils.password_utils import hash_password, verify_password
-from utils.yandex_disk import YandexDiskManager
+from utils.lazy_import import lazy_class
 from config import YANDEX_DISK_TOKEN
 from database.migrations import DatabaseMigrations
 
+# requests + Яндекс.Диск нужны только при операциях с файлами договоров
+YandexDiskManager = lazy_class('utils.yandex_disk', 'YandexDiskManager')
+
 
 # Флаг для предотвращения повторных миграций
 _migrations_completed = False
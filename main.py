@@ -23,6 +23,22 @@ try:
     faulthandler.enable()
 except Exception:
     pass
+
+# ========== ПРОФИЛИРОВАНИЕ ЗАПУСКА ==========
+# python main.py --profile-startup[=report.json]
+# Замеряет время импорта каждого модуля и время до показа окна входа,
+# печатает отчёт (и пишет JSON, если указан путь) и завершает приложение.
+_startup_profiler = None
+_startup_profile_out = None
+for _arg in sys.argv[1:]:
+    if _arg == '--profile-startup' or _arg.startswith('--profile-startup='):
+        from utils.lazy_import import ImportProfiler
+        _startup_profiler = ImportProfiler().start()
+        _startup_profile_out = _arg.partition('=')[2] or None
+        sys.argv.remove(_arg)
+        break
+# ============================================
+
 from PyQt5.QtWidgets import QApplication, QComboBox, QMenu, QWidget
 from PyQt5.QtCore import Qt, QObject, QEvent, QSize
 from PyQt5.QtGui import QIcon, QFont, QFontDatabase
@@ -117,6 +133,24 @@ class PopupStyleFilter(QObject):
         except Exception:
             pass
 
+def _finish_startup_profile(app):
+    """Отчёт --profile-startup: топ модулей по времени импорта + время до окна входа"""
+    from PyQt5.QtCore import QTimer
+    _startup_profiler.stop()
+    _startup_profiler.print_report()
+    heavy = [m for m in ('matplotlib', 'reportlab', 'fitz', 'openpyxl', 'ui.main_window')
+             if m in sys.modules]
+    if heavy:
+        print(f"[WARN] До окна входа загружены тяжёлые модули: {', '.join(heavy)}")
+    if _startup_profile_out:
+        import json
+        data = _startup_profiler.to_dict()
+        data['heavy_modules_before_login'] = heavy
+        with open(_startup_profile_out, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    QTimer.singleShot(0, app.quit)
+
+
 def main():
     try:
         app_logger.info("="*60)
@@ -248,6 +282,11 @@ def main():
         app_logger.info("BubbleToolTip (облачко с хвостиком) установлен")
 
         app_logger.info("Единые стили (unified_styles.py) применены")
+
+        # Прогрев кэша иконок: карточки CRM и кнопки действий берут готовые QIcon
+        from utils.icon_loader import IconLoader
+        _icons_cached = IconLoader.preload()
+        app_logger.info(f"Кэш иконок прогрет: {_icons_cached} шт.")
         # ==================================================
 
         # Инициализация базы данных + окно логина
@@ -268,6 +307,11 @@ def main():
         app_logger.info("Приложение запущено успешно")
         app_logger.info("="*60)
 
+        if _startup_profiler is not None:
+            app.processEvents()
+            _startup_profiler.mark('time_to_login_window')
+            _finish_startup_profile(app)
+
         sys.exit(app.exec_())
 
     except Exception as e:
@@ -18,16 +18,17 @@ from database import Base
 # Alembic Config object
 config = context.config
 
-# Логирование
-if config.config_file_name is not None:
+# Логирование (не трогаем, если миграции запускает работающее приложение)
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # MetaData для autogenerate
 target_metadata = Base.metadata
 
 # Устанавливаем URL из config.py (переопределяет alembic.ini)
-settings = get_settings()
-config.set_main_option("sqlalchemy.url", settings.database_url)
+if config.attributes.get("connection") is None:
+    settings = get_settings()
+    config.set_main_option("sqlalchemy.url", settings.database_url)
 
 
 def run_migrations_offline() -> None:
@@ -44,8 +45,25 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+def _run_with_connection(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        compare_type=True,  # Обнаруживать изменения типов колонок
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
 def run_migrations_online() -> None:
     """Online миграции (подключение к БД и применение)"""
+    # Соединение от services/schema_manager.py — уже под блокировкой схемы
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -53,14 +71,7 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            compare_type=True,  # Обнаруживать изменения типов колонок
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        _run_with_connection(connection)
 
 
 if context.is_offline_mode():
@@ -0,0 +1,63 @@
+"""add hot path indexes
+
+Составные и частичные индексы для горячих фильтров платежей, зарплат,
+исполнителей стадий, файлов проекта и истории действий. Набор получен
+services/index_advisor.py по записанной нагрузке payments/CRM эндпоинтов.
+
+На PostgreSQL индексы строятся CONCURRENTLY (без блокировки записи),
+поэтому миграция выполняется вне транзакции. IF NOT EXISTS — на свежей
+базе индексы уже созданы init_db() по моделям.
+
+Revision ID: g7h8i9j0k1l2
+Revises: f6g7h8i9j0k1
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'g7h8i9j0k1l2'
+down_revision: Union[str, None] = 'f6g7h8i9j0k1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+ZERO_SUPERVISION_WHERE = 'final_amount = 0 AND supervision_card_id IS NOT NULL'
+
+# (имя, таблица, колонки, условие частичного индекса)
+INDEXES = [
+    ('ix_payments_contract_stage_role', 'payments', ['contract_id', 'stage_name', 'role'], None),
+    ('ix_payments_crm_card_id', 'payments', ['crm_card_id'], None),
+    ('ix_payments_supervision_card_id', 'payments', ['supervision_card_id'], None),
+    ('ix_payments_employee_month', 'payments', ['employee_id', 'report_month'], None),
+    ('ix_payments_report_month', 'payments', ['report_month'], None),
+    ('ix_payments_zero_supervision', 'payments', ['role', 'stage_name'], ZERO_SUPERVISION_WHERE),
+    ('ix_salaries_employee_month', 'salaries', ['employee_id', 'report_month'], None),
+    ('ix_salaries_contract_id', 'salaries', ['contract_id'], None),
+    ('ix_stage_executors_card_stage', 'stage_executors', ['crm_card_id', 'stage_name'], None),
+    ('ix_stage_executors_executor_completed', 'stage_executors', ['executor_id', 'completed'], None),
+    ('ix_project_files_contract_stage', 'project_files', ['contract_id', 'stage'], None),
+    ('ix_action_history_entity', 'action_history', ['entity_type', 'entity_id', 'action_date'], None),
+    ('ix_approval_stage_deadlines_card', 'approval_stage_deadlines', ['crm_card_id', 'stage_name'], None),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            kwargs = {}
+            if where:
+                kwargs['postgresql_where'] = sa.text(where)
+                kwargs['sqlite_where'] = sa.text(where)
+            op.create_index(name, table, columns, unique=False, if_not_exists=True,
+                            postgresql_concurrently=True, **kwargs)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
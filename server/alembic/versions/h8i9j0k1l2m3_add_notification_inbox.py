@@ -0,0 +1,65 @@
+"""add notification inbox
+
+Счётчики непрочитанных (notification_counters), архив прочитанных
+уведомлений (notifications_archive) и индекс ленты
+ix_notifications_inbox (employee_id, created_at, id) для keyset-пагинации.
+Счётчики заполняются по текущим непрочитанным уведомлениям.
+
+Revision ID: h8i9j0k1l2m3
+Revises: g7h8i9j0k1l2
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'h8i9j0k1l2m3'
+down_revision: Union[str, None] = 'g7h8i9j0k1l2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_counters',
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('employee_id'),
+    )
+    op.create_table(
+        'notifications_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=False),
+        sa.Column('notification_type', sa.String(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('related_entity_type', sa.String(), nullable=True),
+        sa.Column('related_entity_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('read_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_notifications_archive_employee_id'), 'notifications_archive',
+                    ['employee_id'], unique=False)
+    op.create_index('ix_notifications_inbox', 'notifications',
+                    ['employee_id', 'created_at', 'id'], unique=False, if_not_exists=True)
+
+    op.execute(
+        "INSERT INTO notification_counters (employee_id, unread_count, updated_at) "
+        "SELECT employee_id, COUNT(*), CURRENT_TIMESTAMP FROM notifications "
+        "WHERE is_read = false GROUP BY employee_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_inbox', table_name='notifications', if_exists=True)
+    op.drop_index(op.f('ix_notifications_archive_employee_id'), table_name='notifications_archive')
+    op.drop_table('notifications_archive')
+    op.drop_table('notification_counters')
@@ -0,0 +1,39 @@
+"""partition logs
+
+Журналы activity_log, action_history и messenger_message_log на
+PostgreSQL переводятся на помесячные секции (PARTITION BY RANGE по времени
+записи, секции <таблица>_pYYYYMM и <таблица>_default) с переносом данных —
+services/log_retention.py. На SQLite секции эмулируются, DDL не нужен.
+Индекс ix_action_history_date (action_date, id) — keyset-лента истории.
+
+Revision ID: i9j0k1l2m3n4
+Revises: h8i9j0k1l2m3
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i9j0k1l2m3n4'
+down_revision: Union[str, None] = 'h8i9j0k1l2m3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_action_history_date', 'action_history',
+                    ['action_date', 'id'], unique=False, if_not_exists=True)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        from services.log_retention import partition_log_tables
+        partition_log_tables(bind)
+
+
+def downgrade() -> None:
+    # Секционирование не разворачивается: данные остаются в секциях,
+    # схема таблиц для приложения не меняется
+    op.drop_index('ix_action_history_date', table_name='action_history', if_exists=True)
@@ -0,0 +1,45 @@
+"""add edit leases
+
+Аренды блокировок редактирования (services/lease_manager.py) вместо
+concurrent_edits: ключ (entity_type, entity_id), владелец и срок аренды.
+На PostgreSQL таблица UNLOGGED — аренды эфемерны и не пишутся в WAL.
+
+Revision ID: j0k1l2m3n4o5
+Revises: i9j0k1l2m3n4
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'j0k1l2m3n4o5'
+down_revision: Union[str, None] = 'i9j0k1l2m3n4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'edit_leases',
+        sa.Column('entity_type', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('owner_name', sa.String(), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('entity_type', 'entity_id'),
+    )
+    op.create_index(op.f('ix_edit_leases_owner_id'), 'edit_leases', ['owner_id'], unique=False)
+    op.create_index(op.f('ix_edit_leases_expires_at'), 'edit_leases', ['expires_at'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE edit_leases SET UNLOGGED")
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_edit_leases_expires_at'), table_name='edit_leases')
+    op.drop_index(op.f('ix_edit_leases_owner_id'), table_name='edit_leases')
+    op.drop_table('edit_leases')
@@ -0,0 +1,61 @@
+"""add analytics cube
+
+Факты куба аналитики отчётов (services/analytics_cube.py): строка на
+договор с разобранной датой, измерениями и мерами сроков. Таблица
+заполняется при старте (schema_manager -> ensure_cube) или командой
+python -m services.analytics_cube rebuild.
+
+Revision ID: k1l2m3n4o5p6
+Revises: j0k1l2m3n4o5
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k1l2m3n4o5p6'
+down_revision: Union[str, None] = 'j0k1l2m3n4o5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'analytics_contract_facts',
+        sa.Column('contract_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('client_kind', sa.String(), nullable=True),
+        sa.Column('date_key', sa.Integer(), nullable=True),
+        sa.Column('year', sa.Integer(), nullable=True),
+        sa.Column('quarter', sa.Integer(), nullable=True),
+        sa.Column('month', sa.Integer(), nullable=True),
+        sa.Column('agent_type', sa.String(), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('project_type', sa.String(), nullable=True),
+        sa.Column('project_subtype', sa.String(), nullable=True),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('area', sa.Float(), nullable=False),
+        sa.Column('crm_completed', sa.Integer(), nullable=False),
+        sa.Column('crm_on_time', sa.Integer(), nullable=False),
+        sa.Column('crm_overdue', sa.Integer(), nullable=False),
+        sa.Column('crm_deviation_days', sa.Integer(), nullable=False),
+        sa.Column('stages_completed', sa.Integer(), nullable=False),
+        sa.Column('stages_on_time', sa.Integer(), nullable=False),
+        sa.Column('stages_overdue', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['contract_id'], ['contracts.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('contract_id'),
+    )
+    op.create_index(op.f('ix_analytics_contract_facts_client_id'), 'analytics_contract_facts',
+                    ['client_id'], unique=False)
+    op.create_index('ix_analytics_contract_facts_period', 'analytics_contract_facts',
+                    ['year', 'month'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_analytics_contract_facts_period', table_name='analytics_contract_facts')
+    op.drop_index(op.f('ix_analytics_contract_facts_client_id'), table_name='analytics_contract_facts')
+    op.drop_table('analytics_contract_facts')
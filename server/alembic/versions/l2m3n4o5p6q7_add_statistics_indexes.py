@@ -0,0 +1,41 @@
+"""add statistics indexes
+
+Индексы диапазонов дат для services/statistics_queries.py: периоды
+статистики фильтруются полуинтервалом по created_at и по строковой
+contract_date (вместо extract('year', ...) == year).
+
+Revision ID: l2m3n4o5p6q7
+Revises: k1l2m3n4o5p6
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l2m3n4o5p6q7'
+down_revision: Union[str, None] = 'k1l2m3n4o5p6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя, таблица, столбцы)
+INDEXES = [
+    ('ix_contracts_created_at', 'contracts', ['created_at']),
+    ('ix_contracts_type_date', 'contracts', ['project_type', 'contract_date']),
+    ('ix_crm_cards_created_at', 'crm_cards', ['created_at']),
+    ('ix_supervision_cards_created_at', 'supervision_cards', ['created_at']),
+    ('ix_payments_created_at', 'payments', ['created_at']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,77 @@
+"""add payment ledger
+
+Лента выплат (services/payment_ledger.py): строка на платёж или оклад с
+реквизитами договора, сотрудника и карточки и разобранным отчётным
+месяцем. Таблица заполняется при старте (schema_manager -> ensure_ledger)
+или командой python -m services.payment_ledger rebuild.
+
+Revision ID: m3n4o5p6q7r8
+Revises: l2m3n4o5p6q7
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm3n4o5p6q7r8'
+down_revision: Union[str, None] = 'l2m3n4o5p6q7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Индексы по одному столбцу (имена — как у index=True модели)
+INDEXED = ['contract_id', 'crm_card_id', 'supervision_card_id', 'details_contract_id',
+           'employee_id', 'created_at']
+
+
+def upgrade() -> None:
+    op.create_table(
+        'payment_ledger',
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('contract_id', sa.Integer(), nullable=True),
+        sa.Column('crm_card_id', sa.Integer(), nullable=True),
+        sa.Column('supervision_card_id', sa.Integer(), nullable=True),
+        sa.Column('details_contract_id', sa.Integer(), nullable=True),
+        sa.Column('employee_id', sa.Integer(), nullable=True),
+        sa.Column('employee_name', sa.String(), nullable=True),
+        sa.Column('position', sa.String(), nullable=True),
+        sa.Column('role', sa.String(), nullable=True),
+        sa.Column('stage_name', sa.String(), nullable=True),
+        sa.Column('calculated_amount', sa.Float(), nullable=True),
+        sa.Column('final_amount', sa.Float(), nullable=True),
+        sa.Column('payment_type', sa.String(), nullable=True),
+        sa.Column('report_month', sa.String(), nullable=True),
+        sa.Column('report_year', sa.Integer(), nullable=True),
+        sa.Column('report_month_num', sa.Integer(), nullable=True),
+        sa.Column('payment_status', sa.String(), nullable=True),
+        sa.Column('is_paid', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('project_type', sa.String(), nullable=True),
+        sa.Column('contract_project_type', sa.String(), nullable=True),
+        sa.Column('contract_number', sa.String(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('area', sa.Float(), nullable=True),
+        sa.Column('city', sa.String(), nullable=True),
+        sa.Column('agent_type', sa.String(), nullable=True),
+        sa.Column('card_stage', sa.String(), nullable=True),
+        sa.Column('reassigned', sa.Boolean(), nullable=True),
+        sa.Column('old_employee_id', sa.Integer(), nullable=True),
+        sa.Column('comments', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('kind', 'source_id'),
+    )
+    for column in INDEXED:
+        op.create_index(op.f(f'ix_payment_ledger_{column}'), 'payment_ledger', [column], unique=False)
+    op.create_index('ix_payment_ledger_period', 'payment_ledger',
+                    ['report_year', 'report_month_num'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payment_ledger_period', table_name='payment_ledger')
+    for column in reversed(INDEXED):
+        op.drop_index(op.f(f'ix_payment_ledger_{column}'), table_name='payment_ledger')
+    op.drop_table('payment_ledger')
@@ -0,0 +1,58 @@
+"""add due items
+
+Индекс сроков (services/deadline_evaluator.py): дедлайны карточек,
+исполнителей и стадий согласования с рабочими днями до срока и последним
+отправленным порогом уведомления. На БД, где таблицу уже создал
+schema_manager (create_all при старте), ревизия ничего не делает.
+
+Revision ID: n4o5p6q7r8s9
+Revises: m3n4o5p6q7r8
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n4o5p6q7r8s9'
+down_revision: Union[str, None] = 'm3n4o5p6q7r8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('due_items'):
+        return
+    op.create_table(
+        'due_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source_type', sa.String(length=20), nullable=False),
+        sa.Column('source_id', sa.Integer(), nullable=False),
+        sa.Column('crm_card_id', sa.Integer(), nullable=False),
+        sa.Column('contract_id', sa.Integer(), nullable=True),
+        sa.Column('employee_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(length=10), nullable=False),
+        sa.Column('days_left', sa.Integer(), nullable=True),
+        sa.Column('notified_threshold', sa.Integer(), nullable=True),
+        sa.Column('notified_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source_type', 'source_id', name='uq_due_item_source'),
+    )
+    op.create_index(op.f('ix_due_items_id'), 'due_items', ['id'], unique=False)
+    op.create_index(op.f('ix_due_items_crm_card_id'), 'due_items', ['crm_card_id'], unique=False)
+    op.create_index(op.f('ix_due_items_employee_id'), 'due_items', ['employee_id'], unique=False)
+    op.create_index('ix_due_items_status_due', 'due_items', ['status', 'due_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_due_items_status_due', table_name='due_items')
+    op.drop_index(op.f('ix_due_items_employee_id'), table_name='due_items')
+    op.drop_index(op.f('ix_due_items_crm_card_id'), table_name='due_items')
+    op.drop_index(op.f('ix_due_items_id'), table_name='due_items')
+    op.drop_table('due_items')
@@ -2,7 +2,7 @@
 База данных - SQLAlchemy модели
 Многопользовательская структура
 """
-from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Boolean, DateTime, Float, Text, ForeignKey, JSON, UniqueConstraint
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Boolean, Date, DateTime, Float, Text, ForeignKey, JSON, UniqueConstraint, Index, text, DDL, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
@@ -228,6 +228,25 @@ class ConcurrentEdit(Base):
     expires_at = Column(DateTime)  # Автоматическая разблокировка через 30 минут
 
 
+class EditLease(Base):
+    """Аренда блокировки редактирования (services/lease_manager.py)"""
+    __tablename__ = "edit_leases"
+
+    entity_type = Column(String, primary_key=True)
+    entity_id = Column(Integer, primary_key=True)
+
+    owner_id = Column(Integer, nullable=False, index=True)
+    owner_name = Column(String)
+
+    locked_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+# Аренды живут минуты: на PostgreSQL таблица без WAL, после сбоя очищается
+event.listen(EditLease.__table__, 'after_create',
+             DDL('ALTER TABLE edit_leases SET UNLOGGED').execute_if(dialect='postgresql'))
+
+
 class Notification(Base):
     """Уведомления для пользователей"""
     __tablename__ = "notifications"
@@ -249,6 +268,44 @@ class Notification(Base):
     # Связи
     employee = relationship("Employee", back_populates="notifications")
 
+    __table_args__ = (
+        # Лента уведомлений: keyset-пагинация по (created_at, id)
+        Index('ix_notifications_inbox', 'employee_id', 'created_at', 'id'),
+    )
+
+
+class NotificationCounter(Base):
+    """Счётчик непрочитанных уведомлений сотрудника (services/notification_inbox.py).
+
+    Меняется в той же транзакции, что и уведомления: создание (+1),
+    отметка прочитанными (-N), «прочитать все» (0).
+    """
+    __tablename__ = "notification_counters"
+
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    unread_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class NotificationArchive(Base):
+    """Прочитанные уведомления старше NOTIFICATION_ARCHIVE_DAYS (переносит NotificationArchiver)"""
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # id из notifications
+    employee_id = Column(Integer, nullable=False, index=True)
+
+    notification_type = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+
+    related_entity_type = Column(String)
+    related_entity_id = Column(Integer)
+
+    created_at = Column(DateTime)
+    read_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
 class NotificationSettings(Base):
     """Настройки уведомлений для сотрудника"""
     __tablename__ = "notification_settings"
@@ -344,6 +401,10 @@ class Client(Base):
 class Contract(Base):
     """Договоры"""
     __tablename__ = "contracts"
+    __table_args__ = (
+        # Статистика проектов: тип проекта и диапазон дат договора (YYYY-MM-DD)
+        Index('ix_contracts_type_date', 'project_type', 'contract_date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_id = Column(Integer, ForeignKey("clients.id"), nullable=False, index=True)
@@ -436,7 +497,7 @@ class Contract(Base):
     third_receipt_yandex_path = Column(String)
     third_receipt_file_name = Column(String)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Связи
@@ -480,7 +541,7 @@ class CRMCard(Base):
 
     order_position = Column(Integer, default=0)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Связи
@@ -496,6 +557,10 @@ class CRMCard(Base):
 class StageExecutor(Base):
     """Исполнители по стадиям"""
     __tablename__ = "stage_executors"
+    __table_args__ = (
+        Index('ix_stage_executors_card_stage', 'crm_card_id', 'stage_name'),
+        Index('ix_stage_executors_executor_completed', 'executor_id', 'completed'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     crm_card_id = Column(Integer, ForeignKey("crm_cards.id"), nullable=False)
@@ -545,7 +610,7 @@ class SupervisionCard(Base):
     paused_at = Column(DateTime)
     total_pause_days = Column(Integer, default=0)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Связи
@@ -634,6 +699,47 @@ class SupervisionTimelineEntry(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class AnalyticsContractFact(Base):
+    """
+    Куб аналитики отчётов (services/analytics_cube.py): договор с разобранной
+    датой, измерениями и мерами сроков CRM. Обновляется при записи договоров,
+    клиентов, CRM-карточек и исполнителей стадий.
+    """
+    __tablename__ = "analytics_contract_facts"
+    __table_args__ = (
+        Index('ix_analytics_contract_facts_period', 'year', 'month'),
+    )
+
+    contract_id = Column(Integer, ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    client_id = Column(Integer, nullable=False, index=True)
+    client_kind = Column(String)  # individual / legal
+
+    # Дата договора: YYYYMMDD и её части (NULL — дата не разобрана)
+    date_key = Column(Integer)
+    year = Column(Integer)
+    quarter = Column(Integer)
+    month = Column(Integer)
+
+    agent_type = Column(String)
+    city = Column(String)
+    project_type = Column(String)
+    project_subtype = Column(String)
+
+    amount = Column(Float, nullable=False, default=0)
+    area = Column(Float, nullable=False, default=0)
+
+    # Выполненные CRM-карточки: всего, в срок / с опозданием, сумма отклонений (дни)
+    crm_completed = Column(Integer, nullable=False, default=0)
+    crm_on_time = Column(Integer, nullable=False, default=0)
+    crm_overdue = Column(Integer, nullable=False, default=0)
+    crm_deviation_days = Column(Integer, nullable=False, default=0)
+
+    # Выполненные стадии (StageExecutor): всего, в срок / с опозданием
+    stages_completed = Column(Integer, nullable=False, default=0)
+    stages_on_time = Column(Integer, nullable=False, default=0)
+    stages_overdue = Column(Integer, nullable=False, default=0)
+
+
 class SupervisionVisit(Base):
     """Записи выездов на объект авторского надзора"""
     __tablename__ = "supervision_visits"
@@ -680,6 +786,17 @@ class StageWorkflowState(Base):
 class Payment(Base):
     """Платежи/выплаты"""
     __tablename__ = "payments"
+    __table_args__ = (
+        Index('ix_payments_contract_stage_role', 'contract_id', 'stage_name', 'role'),
+        Index('ix_payments_crm_card_id', 'crm_card_id'),
+        Index('ix_payments_supervision_card_id', 'supervision_card_id'),
+        Index('ix_payments_employee_month', 'employee_id', 'report_month'),
+        Index('ix_payments_report_month', 'report_month'),
+        # Пересчёт нулевых платежей надзора после смены тарифа (rates_router)
+        Index('ix_payments_zero_supervision', 'role', 'stage_name',
+              postgresql_where=text('final_amount = 0 AND supervision_card_id IS NOT NULL'),
+              sqlite_where=text('final_amount = 0 AND supervision_card_id IS NOT NULL')),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False)
@@ -709,7 +826,7 @@ class Payment(Base):
     reassigned = Column(Boolean, default=False)
     old_employee_id = Column(Integer)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Связи
@@ -745,6 +862,10 @@ class Rate(Base):
 class Salary(Base):
     """Зарплаты/оклады"""
     __tablename__ = "salaries"
+    __table_args__ = (
+        Index('ix_salaries_employee_month', 'employee_id', 'report_month'),
+        Index('ix_salaries_contract_id', 'contract_id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.id"))
@@ -770,6 +891,59 @@ class Salary(Base):
     employee = relationship("Employee", foreign_keys=[employee_id])
 
 
+class PaymentLedgerEntry(Base):
+    """
+    Лента выплат (services/payment_ledger.py): платёж или оклад с реквизитами
+    договора, сотрудника и карточки и разобранным отчётным месяцем.
+    Обновляется при записи платежей, окладов, договоров, карточек и сотрудников.
+    """
+    __tablename__ = "payment_ledger"
+    __table_args__ = (
+        Index('ix_payment_ledger_period', 'report_year', 'report_month_num'),
+    )
+
+    kind = Column(String, primary_key=True)  # payment / salary
+    source_id = Column(Integer, primary_key=True)  # payments.id / salaries.id
+
+    contract_id = Column(Integer, index=True)  # как в источнике
+    crm_card_id = Column(Integer, index=True)
+    supervision_card_id = Column(Integer, index=True)
+    # Договор, с которого взяты реквизиты (через карточку CRM / надзора)
+    details_contract_id = Column(Integer, index=True)
+
+    employee_id = Column(Integer, index=True)
+    employee_name = Column(String)
+    position = Column(String)
+
+    role = Column(String)
+    stage_name = Column(String)
+    calculated_amount = Column(Float)
+    final_amount = Column(Float)
+    payment_type = Column(String)
+
+    # Отчётный месяц строкой (как в источнике) и его год / номер месяца
+    report_month = Column(String)
+    report_year = Column(Integer)
+    report_month_num = Column(Integer)
+
+    payment_status = Column(String)
+    is_paid = Column(Boolean)
+    created_at = Column(DateTime, index=True)
+
+    project_type = Column(String)  # тип проекта оклада
+    contract_project_type = Column(String)
+    contract_number = Column(String)
+    address = Column(String)
+    area = Column(Float)
+    city = Column(String)
+    agent_type = Column(String)
+    card_stage = Column(String)  # колонка карточки CRM / надзора
+
+    reassigned = Column(Boolean)
+    old_employee_id = Column(Integer)
+    comments = Column(Text)
+
+
 # =========================
 # ФАЙЛЫ ПРОЕКТА
 # =========================
@@ -777,6 +951,9 @@ class Salary(Base):
 class ProjectFile(Base):
     """Файлы проекта"""
     __tablename__ = "project_files"
+    __table_args__ = (
+        Index('ix_project_files_contract_stage', 'contract_id', 'stage'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False)
@@ -801,6 +978,10 @@ class ProjectFile(Base):
 class ActionHistory(Base):
     """История действий (для локальной совместимости)"""
     __tablename__ = "action_history"
+    __table_args__ = (
+        Index('ix_action_history_entity', 'entity_type', 'entity_id', 'action_date'),
+        Index('ix_action_history_date', 'action_date', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
@@ -816,6 +997,9 @@ class ActionHistory(Base):
 class ApprovalStageDeadline(Base):
     """Дедлайны стадий согласования"""
     __tablename__ = "approval_stage_deadlines"
+    __table_args__ = (
+        Index('ix_approval_stage_deadlines_card', 'crm_card_id', 'stage_name'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     crm_card_id = Column(Integer, ForeignKey("crm_cards.id"), nullable=False)
@@ -922,48 +1106,106 @@ class MessengerMessageLog(Base):
     delivery_status = Column(String, default="sent")  # sent/failed/pending
 
 
-def _auto_migrate_columns():
+class NotificationOutbox(Base):
+    """Очередь исходящих уведомлений (Telegram/email), доставляет фоновый воркер"""
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    kind = Column(String, nullable=False)  # messenger_script/supervision_script/chat_invites/employee_telegram
+    payload = Column(JSON, nullable=False)
+
+    status = Column(String, nullable=False, default="pending")  # pending/processing/sent/failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    locked_at = Column(DateTime, nullable=True)
+    locked_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+
+class DueItem(Base):
+    """Индекс сроков: дедлайны карточек, исполнителей и стадий согласования.
+
+    Строки поддерживает services/deadline_evaluator.py по строковым
+    дедлайнам CRMCard / StageExecutor / ApprovalStageDeadline.
+    """
+    __tablename__ = "due_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    source_type = Column(String(20), nullable=False)  # crm_card/stage_executor/approval_stage
+    source_id = Column(Integer, nullable=False)
+    crm_card_id = Column(Integer, nullable=False, index=True)
+    contract_id = Column(Integer, nullable=True)
+    employee_id = Column(Integer, nullable=True, index=True)  # Ответственный
+    title = Column(String, nullable=True)
+
+    due_date = Column(Date, nullable=False)
+    status = Column(String(10), nullable=False, default="open")  # open/paused/closed
+    days_left = Column(Integer, nullable=True)  # Рабочих дней до срока (< 0 — просрочен)
+
+    # Наименьший порог, о котором уже отправлено уведомление
+    notified_threshold = Column(Integer, nullable=True)
+    notified_at = Column(DateTime, nullable=True)
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('source_type', 'source_id', name='uq_due_item_source'),
+        Index('ix_due_items_status_due', 'status', 'due_date'),
+    )
+
+
+class SchemaState(Base):
+    """Отпечаток схемы, с которой сверена БД (services/schema_manager.py)"""
+    __tablename__ = "schema_state"
+
+    id = Column(Integer, primary_key=True)  # Всегда 1
+    fingerprint = Column(String(64), nullable=False)
+    alembic_revision = Column(String(32), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+def _auto_migrate_columns(connection):
     """Автоматически добавляет недостающие столбцы в существующие таблицы.
 
     create_all() НЕ добавляет новые столбцы к уже существующим таблицам.
     Эта функция сравнивает модель с БД и выполняет ALTER TABLE ADD COLUMN.
+    Вызывается services/schema_manager.py под блокировкой схемы — для
+    столбцов, добавленных в модели без ревизии Alembic.
     """
     import logging
-    from sqlalchemy import inspect, text
+    from sqlalchemy import inspect
     logger = logging.getLogger(__name__)
-    try:
-        inspector = inspect(engine)
-        existing_tables = inspector.get_table_names()
-
-        for table in Base.metadata.sorted_tables:
-            if table.name not in existing_tables:
-                continue  # create_all() создаст таблицу целиком
-
-            db_columns = {col['name'] for col in inspector.get_columns(table.name)}
-            for col in table.columns:
-                if col.name not in db_columns:
-                    col_type = col.type.compile(engine.dialect)
-                    nullable = "NULL" if col.nullable else "NOT NULL"
-                    default = ""
-                    if col.default is not None:
-                        default = f" DEFAULT {col.default.arg!r}"
-                    sql = f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type} {nullable}{default}'
-                    with engine.begin() as conn:
-                        conn.execute(text(sql))
-                    logger.info(f"auto-migrate: добавлен столбец {table.name}.{col.name} ({col_type})")
-    except Exception as e:
-        logger.warning(f"auto-migrate warning: {e}")
+    inspector = inspect(connection)
+    existing_tables = inspector.get_table_names()
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue  # create_all() создаст таблицу целиком
+
+        db_columns = {col['name'] for col in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name not in db_columns:
+                col_type = col.type.compile(connection.dialect)
+                nullable = "NULL" if col.nullable else "NOT NULL"
+                default = ""
+                if col.default is not None:
+                    default = f" DEFAULT {col.default.arg!r}"
+                sql = f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type} {nullable}{default}'
+                connection.execute(text(sql))
+                logger.info(f"auto-migrate: добавлен столбец {table.name}.{col.name} ({col_type})")
 
 
 def init_db():
-    """Инициализация базы данных"""
-    try:
-        Base.metadata.create_all(bind=engine)
-        _auto_migrate_columns()
-    except Exception as e:
-        # Race condition при 2+ workers: один уже создал таблицы
-        import logging
-        logging.getLogger(__name__).warning(f"init_db warning (likely race condition): {e}")
+    """Инициализация базы данных: сверка схемы один раз на все workers"""
+    from services.schema_manager import ensure_schema
+    return ensure_schema(engine)
 
 
 def get_db():
@@ -1,10 +1,18 @@
 """
 Email-сервис для отправки invite-ссылок на чат.
 Поддерживает SMTP с SSL/TLS (Mail.ru, Yandex, Gmail и др.)
+
+Письма уходят через пул SMTP-соединений: TCP+TLS+AUTH выполняется один
+раз на соединение, соединение переиспользуется между письмами, а
+оборванное сервером — переоткрывается автоматически. send_bulk()
+отправляет пачку писем за одну SMTP-сессию.
 """
+import asyncio
 import logging
 import ssl
-from typing import Optional, Dict
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -19,6 +27,154 @@ except ImportError:
     logger.info("aiosmtplib не установлен — email-рассылка недоступна")
 
 
+# Пул SMTP-соединений
+SMTP_POOL_SIZE = 2          # одновременных SMTP-сессий
+SMTP_IDLE_TIMEOUT = 120     # сек: простоявшее дольше соединение закрывается (серверы рвут idle)
+SMTP_NOOP_AFTER = 15        # сек простоя, после которых соединение проверяется NOOP
+SMTP_MAX_MESSAGES = 100     # писем на соединение, затем переподключение (лимиты провайдеров)
+SMTP_TIMEOUT = 30
+
+
+class _PooledConnection:
+    """SMTP-соединение пула и его статистика"""
+
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Пул keep-alive SMTP-соединений (aiosmtplib.SMTP).
+
+    Соединения привязаны к event loop: при первом использовании в другом
+    loop пул сбрасывается. Разрыв соединения при отправке — переподключение
+    и повтор письма (один раз).
+    """
+
+    def __init__(self, connect_kwargs: dict, size: int = SMTP_POOL_SIZE,
+                 idle_timeout: float = SMTP_IDLE_TIMEOUT,
+                 max_messages: int = SMTP_MAX_MESSAGES):
+        self._connect_kwargs = connect_kwargs
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.connections_opened = 0
+        self._idle: List[_PooledConnection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self.close_nowait()
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.size)
+
+    async def _open(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(**self._connect_kwargs)
+        await smtp.connect()  # connect + STARTTLS + AUTH (username/password)
+        self.connections_opened += 1
+        return _PooledConnection(smtp)
+
+    async def _reconnect(self, conn: _PooledConnection):
+        conn.smtp.close()
+        fresh = await self._open()
+        conn.smtp, conn.sent = fresh.smtp, 0
+
+    async def _checkout(self) -> _PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            idle_for = time.monotonic() - conn.last_used
+            if (not conn.smtp.is_connected or idle_for > self.idle_timeout
+                    or conn.sent >= self.max_messages):
+                conn.smtp.close()
+                continue
+            if idle_for > SMTP_NOOP_AFTER:
+                try:
+                    await conn.smtp.noop()
+                except Exception:
+                    conn.smtp.close()
+                    continue
+            return conn
+        return await self._open()
+
+    @asynccontextmanager
+    async def connection(self):
+        """Взять соединение из пула (вернётся в пул, если осталось живым)"""
+        self._ensure_loop()
+        async with self._semaphore:
+            conn = await self._checkout()
+            try:
+                yield conn
+            finally:
+                conn.last_used = time.monotonic()
+                if conn.smtp.is_connected and len(self._idle) < self.size:
+                    self._idle.append(conn)
+                else:
+                    conn.smtp.close()
+
+    async def send_many(self, messages: list,
+                        throttle: Optional[Callable[[], Awaitable[None]]] = None) -> list:
+        """
+        Отправить письма за одну SMTP-сессию.
+
+        Returns:
+            список той же длины: None — отправлено, иначе исключение
+        """
+        disconnect_errors = (ConnectionError, asyncio.TimeoutError, aiosmtplib.SMTPTimeoutError)
+        results = []
+        async with self.connection() as conn:
+            for message in messages:
+                if throttle:
+                    await throttle()
+                error = None
+                for attempt in (1, 2):
+                    try:
+                        if not conn.smtp.is_connected or conn.sent >= self.max_messages:
+                            await self._reconnect(conn)
+                        await conn.smtp.send_message(message)
+                        conn.sent += 1
+                        error = None
+                        break
+                    except disconnect_errors as e:
+                        # Сервер закрыл соединение — переподключаемся и повторяем письмо
+                        conn.smtp.close()
+                        error = e
+                        logger.info(f"SMTP: соединение разорвано ({e}), переподключение")
+                    except Exception as e:
+                        error = e
+                        break
+                results.append(error)
+        return results
+
+    async def send(self, message):
+        """Отправить одно письмо; ошибка пробрасывается"""
+        error = (await self.send_many([message]))[0]
+        if error is not None:
+            raise error
+
+    def close_nowait(self):
+        """Закрыть простаивающие соединения"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.smtp.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        """Корректно завершить простаивающие сессии (QUIT)"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                await conn.smtp.quit()
+            except Exception:
+                conn.smtp.close()
+
+
+
 class EmailService:
     """SMTP-сервис для отправки email"""
 
@@ -30,6 +186,7 @@ class EmailService:
         self._use_tls: bool = True
         self._from_name: str = "Festival Color CRM"
         self._configured = False
+        self._pool: Optional[SMTPConnectionPool] = None
 
     def configure(self, settings: Dict[str, str]):
         """Конфигурация из настроек БД"""
@@ -41,6 +198,10 @@ class EmailService:
         self._use_tls = settings.get("smtp_use_tls", "true").lower() == "true"
         self._from_name = settings.get("smtp_from_name", "Festival Color CRM")
         self._configured = bool(self._host and self._username and self._password)
+        # Настройки могли смениться — соединения старого пула больше не нужны
+        if self._pool is not None:
+            self._pool.close_nowait()
+            self._pool = None
 
         if self._configured:
             logger.info(f"Email сервис настроен: {self._host}:{self._port}")
@@ -65,6 +226,18 @@ class EmailService:
             logger.warning("Email-сервис недоступен")
             return False
 
+        subject, html_body = self.render_chat_invite(
+            recipient_name, chat_title, invite_link, project_info)
+        return await self._send_email(to_email, subject, html_body)
+
+    def render_chat_invite(
+        self,
+        recipient_name: str,
+        chat_title: str,
+        invite_link: str,
+        project_info: str = "",
+    ) -> Tuple[str, str]:
+        """Тема и HTML письма с invite-ссылкой на чат"""
         subject = f"Приглашение в проектный чат: {chat_title}"
 
         html_body = f"""
@@ -100,8 +273,7 @@ class EmailService:
         </body>
         </html>
         """
-
-        return await self._send_email(to_email, subject, html_body)
+        return subject, html_body
 
     async def send_welcome_email(
         self,
@@ -147,50 +319,45 @@ class EmailService:
 
         return await self._send_email(to_email, subject, html_body)
 
-    async def _send_email(
-        self, to_email: str, subject: str, html_body: str
-    ) -> bool:
-        """Отправить email через SMTP"""
-        try:
-            msg = MIMEMultipart("alternative")
-            msg["From"] = f"{self._from_name} <{self._username}>"
-            msg["To"] = to_email
-            msg["Subject"] = subject
-
-            text_part = MIMEText(
-                f"Вас пригласили. Присоединяйтесь: {subject}",
-                "plain", "utf-8"
-            )
-            html_part = MIMEText(html_body, "html", "utf-8")
+    def _get_pool(self) -> SMTPConnectionPool:
+        if self._pool is None:
+            tls_context = ssl.create_default_context()
+            implicit_tls = self._use_tls and self._port == 465
+            self._pool = SMTPConnectionPool({
+                'hostname': self._host,
+                'port': self._port,
+                'username': self._username,
+                'password': self._password,
+                'use_tls': implicit_tls,
+                # 587: STARTTLS обязателен; без TLS — если сервер его предлагает
+                'start_tls': True if self._use_tls and not implicit_tls else None,
+                'tls_context': tls_context,
+                'timeout': SMTP_TIMEOUT,
+            })
+        return self._pool
 
-            msg.attach(text_part)
-            msg.attach(html_part)
+    def _build_message(self, to_email: str, subject: str, html_body: str) -> MIMEMultipart:
+        msg = MIMEMultipart("alternative")
+        msg["From"] = f"{self._from_name} <{self._username}>"
+        msg["To"] = to_email
+        msg["Subject"] = subject
 
-            tls_context = ssl.create_default_context()
+        text_part = MIMEText(
+            f"Вас пригласили. Присоединяйтесь: {subject}",
+            "plain", "utf-8"
+        )
+        html_part = MIMEText(html_body, "html", "utf-8")
 
-            if self._use_tls and self._port == 465:
-                # SSL/TLS (порт 465)
-                await aiosmtplib.send(
-                    msg,
-                    hostname=self._host,
-                    port=self._port,
-                    username=self._username,
-                    password=self._password,
-                    use_tls=True,
-                    tls_context=tls_context,
-                )
-            else:
-                # STARTTLS (порт 587)
-                await aiosmtplib.send(
-                    msg,
-                    hostname=self._host,
-                    port=self._port,
-                    username=self._username,
-                    password=self._password,
-                    start_tls=True,
-                    tls_context=tls_context,
-                )
+        msg.attach(text_part)
+        msg.attach(html_part)
+        return msg
 
+    async def _send_email(
+        self, to_email: str, subject: str, html_body: str
+    ) -> bool:
+        """Отправить email через SMTP (соединение из пула)"""
+        try:
+            await self._get_pool().send(self._build_message(to_email, subject, html_body))
             logger.info(f"Email отправлен на {to_email}")
             return True
 
@@ -198,6 +365,47 @@ class EmailService:
             logger.error(f"Ошибка отправки email на {to_email}: {e}")
             raise
 
+    async def send_bulk(
+        self,
+        messages: List[Tuple[str, str, str]],
+        throttle: Optional[Callable[[], Awaitable[None]]] = None,
+    ) -> List[bool]:
+        """
+        Отправить пачку писем за одну SMTP-сессию.
+
+        Args:
+            messages: список (to_email, subject, html_body)
+            throttle: корутина-ограничитель, ожидается перед каждым письмом
+
+        Returns:
+            список успехов в порядке messages
+        """
+        if not messages:
+            return []
+        if not self.available:
+            logger.warning("Email-сервис недоступен")
+            return [False] * len(messages)
+
+        built = [self._build_message(*m) for m in messages]
+        try:
+            errors = await self._get_pool().send_many(built, throttle=throttle)
+        except Exception as e:
+            # Не удалось даже открыть соединение
+            logger.error(f"Ошибка пакетной отправки email ({len(messages)} писем): {e}")
+            return [False] * len(messages)
+
+        for (to_email, _, _), error in zip(messages, errors):
+            if error is not None:
+                logger.error(f"Ошибка отправки email на {to_email}: {error}")
+        sent = sum(1 for e in errors if e is None)
+        logger.info(f"Email: пакет отправлен {sent}/{len(messages)}")
+        return [e is None for e in errors]
+
+    async def close(self):
+        """Закрыть SMTP-соединения (при остановке приложения)"""
+        if self._pool is not None:
+            await self._pool.close()
+
 
 # Синглтон
 _email_service: Optional[EmailService] = None
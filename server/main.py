@@ -118,36 +118,41 @@ def seed_cities(db):
 async def startup_event():
     """Инициализация при запуске"""
     logger.info(f"Запуск {settings.app_name} v{settings.app_version}")
-    init_db()
-    logger.info("База данных инициализирована")
+    schema_action = init_db()
+    logger.info(f"База данных инициализирована (схема: {schema_action})")
 
-    # Миграция таблицы user_permissions: переименование колонок
-    from database import engine, UserPermission
-    from sqlalchemy import inspect, text
+    # Инкрементальное обновление куба отчётов при записи договоров
     try:
-        insp = inspect(engine)
-        if insp.has_table("user_permissions"):
-            columns = [c["name"] for c in insp.get_columns("user_permissions")]
-            if "permission_type" in columns and "permission_name" not in columns:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE user_permissions RENAME COLUMN permission_type TO permission_name"))
-                    logger.info("Migrated user_permissions: permission_type -> permission_name")
-            if "target" in columns:
-                with engine.begin() as conn:
-                    conn.execute(text("ALTER TABLE user_permissions DROP COLUMN target"))
-                    logger.info("Migrated user_permissions: dropped column target")
+        from services import analytics_cube
+        analytics_cube.install()
     except Exception as e:
-        logger.warning(f"user_permissions migration note: {e}")
+        logger.warning(f"Analytics cube: {e}")
 
-    # Миграция activity_log: employee_id должен быть nullable (для login_failed без сотрудника)
+    # Лента выплат: пересчёт строк при записи платежей, окладов и реквизитов
     try:
-        from sqlalchemy import text as _text
-        with engine.begin() as conn:
-            conn.execute(_text("ALTER TABLE activity_log ALTER COLUMN employee_id DROP NOT NULL"))
-            logger.info("Migrated activity_log: employee_id is now nullable")
+        from services import payment_ledger
+        payment_ledger.install()
     except Exception as e:
-        if "already" not in str(e).lower() and "no such" not in str(e).lower():
-            logger.debug(f"activity_log migration note: {e}")
+        logger.warning(f"Payment ledger: {e}")
+
+    # Кэш ответов дашбордов: версии таблиц растут после commit
+    try:
+        from services.response_cache import get_response_cache
+        response_cache = get_response_cache()
+        response_cache.install()
+        response_cache.store.clear()
+    except Exception as e:
+        logger.warning(f"Response cache: {e}")
+
+    # Запись нагрузки для services/index_advisor.py
+    workload_file = os.environ.get("QUERY_WORKLOAD_FILE")
+    if workload_file:
+        from database import engine as _engine
+        from services.index_advisor import record_workload
+        try:
+            app.state.workload_recorder = record_workload(_engine, workload_file)
+        except Exception as e:
+            logger.warning(f"Запись нагрузки БД не запущена: {e}")
 
     # Seed дефолтных прав и admin-пользователя
     from database import SessionLocal, Employee
@@ -233,6 +238,60 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Telegram Bot polling: {e}")
 
+    # Фоновая доставка уведомлений из outbox (Telegram/email)
+    try:
+        from services.notification_outbox import get_notification_worker
+        get_notification_worker().start()
+    except Exception as e:
+        logger.warning(f"Notification worker: {e}")
+
+    # Периодический пересчёт сроков (due_items) и уведомления о дедлайнах
+    try:
+        from services.deadline_evaluator import get_deadline_evaluator
+        get_deadline_evaluator().start()
+    except Exception as e:
+        logger.warning(f"Deadline evaluator: {e}")
+
+    # Перенос старых прочитанных уведомлений в архив
+    try:
+        from services.notification_inbox import get_notification_archiver
+        get_notification_archiver().start()
+    except Exception as e:
+        logger.warning(f"Notification archiver: {e}")
+
+    # Секции журналов и архивирование месяцев старше срока хранения
+    try:
+        from services.log_retention import get_log_retention_job
+        get_log_retention_job().start()
+    except Exception as e:
+        logger.warning(f"Log retention job: {e}")
+
+    # Сверка аренд блокировок с соседними workers (события для long-poll)
+    try:
+        from services.lease_manager import get_lease_watcher
+        get_lease_watcher().start()
+    except Exception as e:
+        logger.warning(f"Lease watcher: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка фоновых задач"""
+    from services.notification_outbox import get_notification_worker
+    from services.deadline_evaluator import get_deadline_evaluator
+    from services.notification_inbox import get_notification_archiver
+    from services.log_retention import get_log_retention_job
+    from services.lease_manager import get_lease_watcher
+    await get_lease_watcher().stop()
+    await get_log_retention_job().stop()
+    await get_notification_archiver().stop()
+    await get_deadline_evaluator().stop()
+    await get_notification_worker().stop()
+    await get_email_service().close()
+    recorder = getattr(app.state, 'workload_recorder', None)
+    if recorder is not None:
+        recorder.close()
+
 
 
 
@@ -252,6 +311,13 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/api/v1/cache/stats")
+async def get_cache_stats(current_user: Employee = Depends(get_current_user)):
+    """Попадания и промахи кэша ответов дашбордов по маршрутам"""
+    from services.response_cache import get_response_cache
+    return get_response_cache().stats()
+
+
 @app.get("/api/v1/version")
 async def get_app_version():
     """Получить текущую версию серверного приложения для сверки клиентами"""
@@ -429,6 +495,9 @@ app.include_router(sync_messenger_router, prefix="/api/v1/sync")
 from routers.notifications_router import router as notifications_router
 app.include_router(notifications_router, prefix="/api/v1")
 
+from routers.deadlines_router import router as deadlines_router
+app.include_router(deadlines_router, prefix="/api/v1")
+
 
 # =========================
 # СИНХРОНИЗАЦИЯ
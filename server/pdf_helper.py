@@ -257,7 +257,8 @@ def build_timeline_pdf(
     rows: list[list],
     col_widths: list[int],
     row_styles: list[dict] | None = None,
-) -> bytes:
+    output=None,
+) -> bytes | None:
     """
     Генерирует PDF для таблицы сроков (timeline / supervision).
 
@@ -268,9 +269,10 @@ def build_timeline_pdf(
         rows: Список строк (каждая строка — список Paragraph)
         col_widths: Ширины столбцов (пропорциональные, будут масштабированы)
         row_styles: Доп. стили для строк [{row_idx, bg, fg, bold}, ...]
+        output: Файловый объект для записи (без него PDF собирается в памяти)
 
     Returns:
-        bytes — содержимое PDF
+        bytes — содержимое PDF; None, если передан output
     """
     _register_fonts()
     fn = _font()
@@ -280,9 +282,9 @@ def build_timeline_pdf(
     page = landscape(A4)
     available_w = page[0] - 2 * MARGIN_LR
 
-    output = io.BytesIO()
+    target = output if output is not None else io.BytesIO()
     doc = SimpleDocTemplate(
-        output,
+        target,
         pagesize=page,
         leftMargin=MARGIN_LR, rightMargin=MARGIN_LR,
         topMargin=15 * mm, bottomMargin=18 * mm,
@@ -335,5 +337,6 @@ def build_timeline_pdf(
     elements.append(table)
 
     doc.build(elements, onFirstPage=_draw_footer, onLaterPages=_draw_footer)
-    output.seek(0)
-    return output.read()
+    if output is not None:
+        return None
+    return target.getvalue()
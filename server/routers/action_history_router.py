@@ -3,13 +3,14 @@
 Подключается в main.py через app.include_router(action_history_router, prefix="/api/action-history").
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from database import get_db, Employee, ActionHistory
 from auth import get_current_user
 from schemas import ActionHistoryCreate, ActionHistoryResponse
+from services.keyset import paginate
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["action-history"])
@@ -19,50 +20,79 @@ router = APIRouter(tags=["action-history"])
 
 @router.get("/", response_model=List[ActionHistoryResponse])
 async def get_all_action_history(
+    response: Response,
     entity_type: Optional[str] = None,
     user_id: Optional[int] = None,
     skip: int = 0,
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: Employee = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получить всю историю действий"""
+    """
+    Получить всю историю действий (новые сверху).
+    Курсор следующей страницы — в заголовке X-Next-Cursor; skip оставлен для старых клиентов.
+    """
     query = db.query(ActionHistory)
     if entity_type:
         query = query.filter(ActionHistory.entity_type == entity_type)
     if user_id:
         query = query.filter(ActionHistory.user_id == user_id)
-    return query.order_by(ActionHistory.action_date.desc()).offset(skip).limit(limit).all()
+    if skip and not cursor:
+        return query.order_by(ActionHistory.action_date.desc(), ActionHistory.id.desc()) \
+            .offset(skip).limit(limit).all()
+    try:
+        items, next_cursor = paginate(query, ActionHistory.action_date, ActionHistory.id,
+                                      limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.get("/{entity_type}/{entity_id}")
 async def get_action_history(
+    response: Response,
     entity_type: str,
     entity_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: Employee = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получить историю действий по сущности"""
-    history = db.query(ActionHistory).filter(
+    """
+    Получить историю действий по сущности.
+    Без limit — вся история; с limit — страница и X-Next-Cursor.
+    """
+    query = db.query(ActionHistory, Employee.full_name).outerjoin(
+        Employee, Employee.id == ActionHistory.user_id
+    ).filter(
         ActionHistory.entity_type == entity_type,
         ActionHistory.entity_id == entity_id
-    ).order_by(ActionHistory.action_date.desc()).all()
+    )
+    if limit is None:
+        history = query.order_by(ActionHistory.action_date.desc(), ActionHistory.id.desc()).all()
+    else:
+        try:
+            history, next_cursor = paginate(query, ActionHistory.action_date, ActionHistory.id,
+                                            limit, cursor,
+                                            key=lambda row: (row[0].action_date, row[0].id))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
 
-    # Добавляем user_name к каждой записи
-    result = []
-    for item in history:
-        employee = db.query(Employee).filter(Employee.id == item.user_id).first()
-        result.append({
-            'id': item.id,
-            'user_id': item.user_id,
-            'user_name': employee.full_name if employee else 'Неизвестно',
-            'action_type': item.action_type,
-            'entity_type': item.entity_type,
-            'entity_id': item.entity_id,
-            'description': item.description,
-            'action_date': item.action_date.strftime('%Y-%m-%d %H:%M:%S') if item.action_date else None
-        })
-    return result
+    return [{
+        'id': item.id,
+        'user_id': item.user_id,
+        'user_name': full_name or 'Неизвестно',
+        'action_type': item.action_type,
+        'entity_type': item.entity_type,
+        'entity_id': item.entity_id,
+        'description': item.description,
+        'action_date': item.action_date.strftime('%Y-%m-%d %H:%M:%S') if item.action_date else None
+    } for item, full_name in history]
 
 
 @router.post("/", response_model=ActionHistoryResponse)
@@ -2,10 +2,9 @@
 Роутер CRM-карточек и Workflow.
 Подключается в main.py через app.include_router(crm_router, prefix="/api/crm").
 """
-import asyncio
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
@@ -27,46 +26,20 @@ from schemas import (
     CompleteApprovalStageRequest, StageExecutorDeadlineRequest,
     CompleteStageExecutorRequest, ManagerAcceptanceRequest,
 )
-from services.notification_service import trigger_messenger_notification
+from services.notification_service import enqueue_messenger_notification
+from services.business_calendar import get_calendar
 
 
 def _add_business_days(start_date, days: int):
     """Добавить рабочие дни (пн-пт + праздники РФ) к дате."""
     if isinstance(start_date, str):
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
-    current = start_date
-    added = 0
-    while added < days:
-        current += timedelta(days=1)
-        if _is_working_day(current):
-            added += 1
-    return current
-
-
-RUSSIAN_HOLIDAYS = [
-    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
-    (2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4),
-]
-
-
-def _is_working_day(d):
-    """Рабочий ли день (учитывает выходные + праздники)"""
-    if d.weekday() in [5, 6]:
-        return False
-    if (d.month, d.day) in RUSSIAN_HOLIDAYS:
-        return False
-    return True
+    return get_calendar().add_working_days(start_date, days)
 
 
 def _count_business_days(start_date, end_date):
     """Подсчёт рабочих дней между двумя датами (с учётом праздников)"""
-    days = 0
-    current = start_date
-    while current < end_date:
-        if _is_working_day(current):
-            days += 1
-        current += timedelta(days=1)
-    return days
+    return get_calendar().working_days_elapsed(start_date, end_date)
 
 
 def _add_working_days_to_date(start_date_str, working_days):
@@ -75,12 +48,7 @@ def _add_working_days_to_date(start_date_str, working_days):
         current = datetime.strptime(start_date_str, '%Y-%m-%d')
     except (ValueError, TypeError):
         return start_date_str
-    added = 0
-    while added < working_days:
-        current += timedelta(days=1)
-        if _is_working_day(current):
-            added += 1
-    return current.strftime('%Y-%m-%d')
+    return get_calendar().add_working_days(current, working_days).strftime('%Y-%m-%d')
 
 
 logger = logging.getLogger(__name__)
@@ -687,19 +655,19 @@ async def move_crm_card_to_column(
             )
             db.add(history)
 
-        db.commit()
-        db.refresh(card)
-
-        # Хук: автоуведомление в чат при перемещении карточки
+        # Хук: автоуведомление в чат при перемещении карточки (outbox, в той же транзакции)
         if old_column != new_column:
             if new_column == 'Выполненный проект':
-                asyncio.create_task(trigger_messenger_notification(
+                enqueue_messenger_notification(
                     db, card.id, 'project_end', stage_name=new_column
-                ))
+                )
             elif 'Стадия' in new_column:
-                asyncio.create_task(trigger_messenger_notification(
+                enqueue_messenger_notification(
                     db, card.id, 'stage_complete', stage_name=old_column
-                ))
+                )
+
+        db.commit()
+        db.refresh(card)
 
         return {
             'id': card.id,
@@ -1450,12 +1418,12 @@ async def workflow_submit_work(
         # Обновляем дедлайн исполнителя по norm_days следующего подэтапа
         _update_executor_deadline_for_next_substep(db, card_id, stage_name, contract_id)
 
-        db.commit()
-
         # Хук: уведомление в чат о сдаче работы
-        asyncio.create_task(trigger_messenger_notification(
+        enqueue_messenger_notification(
             db, card_id, 'stage_complete', stage_name=stage_name
-        ))
+        )
+
+        db.commit()
 
         return {"status": "submitted", "substep": entry.stage_code if entry else None}
 
@@ -1732,13 +1700,13 @@ async def workflow_client_send(
         description=f'Отправлено клиенту: {stage_name}'
     ))
 
-    db.commit()
-
     # Хук: уведомление в чат об отправке клиенту (с дедлайном)
-    asyncio.create_task(trigger_messenger_notification(
+    enqueue_messenger_notification(
         db, card_id, 'stage_complete', stage_name=f"{stage_name} (отправлено клиенту)",
         extra_context={'deadline': deadline_str} if deadline_str else None
-    ))
+    )
+
+    db.commit()
 
     return {"status": "sent_to_client"}
 
@@ -1815,15 +1783,12 @@ async def workflow_client_approved(
         # Обновляем дедлайн исполнителя по norm_days следующего подэтапа
         _update_executor_deadline_for_next_substep(db, card_id, stage_name, contract_id)
 
-        db.commit()
-
         # Хук: уведомление в чат о согласовании клиентом
-        try:
-            asyncio.create_task(trigger_messenger_notification(
-                db, card_id, 'stage_complete', stage_name=f"{stage_name} (клиент согласовал)"
-            ))
-        except Exception:
-            logger.warning(f"Не удалось отправить уведомление для карточки {card_id}")
+        enqueue_messenger_notification(
+            db, card_id, 'stage_complete', stage_name=f"{stage_name} (клиент согласовал)"
+        )
+
+        db.commit()
 
         return {"status": "client_approved"}
 
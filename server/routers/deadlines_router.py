@@ -0,0 +1,79 @@
+"""
+Роутер сроков — чтение индекса due_items (services/deadline_evaluator.py).
+Endpoints:
+  GET /deadlines/upcoming  → ближайшие и просроченные сроки
+"""
+import logging
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from database import get_db, Employee, DueItem
+from auth import get_current_user
+from permissions import check_permission, SUPERUSER_ROLES
+from schemas import DueItemResponse
+from services.business_calendar import get_calendar
+from services.deadline_evaluator import working_days_left
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["deadlines"])
+
+
+@router.get("/deadlines/upcoming", response_model=List[DueItemResponse])
+async def get_upcoming_deadlines(
+    days: int = Query(7, ge=0, le=365, description="Горизонт в рабочих днях"),
+    employee_id: Optional[int] = None,
+    source_type: Optional[str] = None,
+    include_overdue: bool = True,
+    include_paused: bool = False,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Открытые сроки со сроком не позже чем через days рабочих дней.
+
+    Сотрудник без права crm_cards.deadlines видит только свои сроки.
+    days_left пересчитывается на момент запроса (рабочие дни, < 0 — просрочка).
+    """
+    can_view_all = current_user.role in SUPERUSER_ROLES or check_permission(
+        current_user, 'crm_cards.deadlines', db)
+    if employee_id is None:
+        if not can_view_all:
+            employee_id = current_user.id
+    elif employee_id != current_user.id and not can_view_all:
+        raise HTTPException(status_code=403, detail="Нет доступа к срокам другого сотрудника")
+
+    today = date.today()
+    horizon = get_calendar().add_working_days(today, days) if days else today
+    statuses = ['open', 'paused'] if include_paused else ['open']
+
+    query = db.query(DueItem).filter(DueItem.status.in_(statuses), DueItem.due_date <= horizon)
+    if not include_overdue:
+        query = query.filter(DueItem.due_date >= today)
+    if employee_id is not None:
+        query = query.filter(DueItem.employee_id == employee_id)
+    if source_type:
+        query = query.filter(DueItem.source_type == source_type)
+
+    items = query.order_by(DueItem.due_date, DueItem.id).limit(limit).all()
+    result = []
+    for item in items:
+        days_left = working_days_left(today, item.due_date)
+        result.append(DueItemResponse(
+            id=item.id,
+            source_type=item.source_type,
+            source_id=item.source_id,
+            crm_card_id=item.crm_card_id,
+            contract_id=item.contract_id,
+            employee_id=item.employee_id,
+            title=item.title,
+            due_date=item.due_date,
+            status=item.status,
+            days_left=days_left,
+            overdue=item.due_date < today,
+        ))
+    return result
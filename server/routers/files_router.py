@@ -5,16 +5,22 @@
 ВАЖНО: Статические пути ПЕРЕД динамическими (правило проекта).
 """
 import os
+import time
 import logging
 import threading
 from datetime import datetime
 from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from database import get_db, Employee, Contract, ProjectFile
 from auth import get_current_user
 from schemas import ProjectFileCreate, ProjectFileResponse
+from services.yandex_scanner import (
+    normalize_path, path_variants, publish_files, scan_project_tree,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +28,17 @@ logger = logging.getLogger(__name__)
 _scanning_contracts_lock = threading.Lock()
 _scanning_contracts = set()
 
+# Прогресс потоковых загрузок на ЯД: (employee_id, upload_id) -> {sent, total, phase, updated}.
+# Ключ включает загрузившего: чужой upload_id даёт 404
+_upload_progress = {}
+_upload_progress_lock = threading.Lock()
+UPLOAD_PROGRESS_TTL = 600  # секунд хранения записи после последнего обновления
+# Путей в одном IN (...) при сверке результатов скана с БД
+SCAN_DIFF_BATCH = 500
+
 # Подключение сервиса Яндекс.Диска
 try:
-    from yandex_disk_service import get_yandex_disk_service
+    from yandex_disk_service import get_yandex_disk_service, UploadTooLarge
     yandex_disk_available = True
 except ImportError:
     yandex_disk_available = False
@@ -33,6 +47,37 @@ except ImportError:
 router = APIRouter()
 
 
+def _set_upload_progress(progress_key: tuple, **fields):
+    """Обновить прогресс загрузки (и вычистить устаревшие записи)"""
+    now = time.monotonic()
+    with _upload_progress_lock:
+        entry = _upload_progress.setdefault(progress_key, {'sent': 0, 'total': 0, 'phase': 'receiving'})
+        entry.update(fields)
+        entry['updated'] = now
+        for key in [k for k, v in _upload_progress.items()
+                    if now - v['updated'] > UPLOAD_PROGRESS_TTL]:
+            del _upload_progress[key]
+
+
+def _stream_upload_to_yandex(yd_service, fileobj, yandex_path: str, max_size: int,
+                             progress_key: Optional[tuple] = None) -> str:
+    """Потоковая загрузка на ЯД + публикация. Выполняется в пуле потоков.
+
+    Returns: публичная ссылка
+    """
+    progress = None
+    if progress_key:
+        def progress(sent, total):
+            _set_upload_progress(progress_key, sent=sent, total=total, phase='uploading')
+
+    yd_service.upload_stream(fileobj, yandex_path, max_size=max_size, progress=progress)
+    if progress_key:
+        _set_upload_progress(progress_key, phase='publishing')
+    public_link = yd_service.get_public_link(yandex_path)
+    if progress_key:
+        _set_upload_progress(progress_key, phase='done')
+    return public_link
+
 # =========================
 # СТАТИЧЕСКИЕ ПУТИ (ПЕРЕД ДИНАМИЧЕСКИМИ)
 # =========================
@@ -207,9 +252,16 @@ async def create_file_record(
 async def upload_file_to_yandex(
     file: UploadFile = File(...),
     yandex_path: str = None,
+    upload_id: Optional[str] = None,
     current_user: Employee = Depends(get_current_user),
 ):
-    """Загрузить файл на Яндекс.Диск"""
+    """Загрузить файл на Яндекс.Диск.
+
+    Файл не читается в память целиком: загруженный FastAPI (spooled) файл
+    отправляется на ЯД блоками в пуле потоков, event loop не блокируется.
+    Если передан upload_id — прогресс доступен загрузившему через
+    GET /upload/progress/{upload_id}.
+    """
     if not yandex_disk_available:
         raise HTTPException(status_code=503, detail="Yandex Disk service not available")
 
@@ -229,19 +281,22 @@ async def upload_file_to_yandex(
                 detail=f"Тип файла '{ext}' не разрешён для загрузки"
             )
 
+    progress_key = (current_user.id, upload_id) if upload_id else None
+
+    # Проверка размера файла (до отправки и по ходу потока)
+    max_size = int(os.environ.get("MAX_FILE_SIZE_MB", 50)) * 1024 * 1024
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Размер файла превышает максимально допустимый ({os.environ.get('MAX_FILE_SIZE_MB', 50)} МБ)"
+    )
+
     try:
         yd_service = get_yandex_disk_service()
         if not yd_service.token:
             raise HTTPException(status_code=503, detail="Yandex Disk token not configured")
-        file_bytes = await file.read()
 
-        # Проверка размера файла
-        max_size = int(os.environ.get("MAX_FILE_SIZE_MB", 50)) * 1024 * 1024
-        if len(file_bytes) > max_size:
-            raise HTTPException(
-                status_code=413,
-                detail=f"Размер файла превышает максимально допустимый ({os.environ.get('MAX_FILE_SIZE_MB', 50)} МБ)"
-            )
+        if file.size is not None and file.size > max_size:
+            raise too_large
 
         if not yandex_path:
             # Защита от path traversal в имени файла
@@ -252,27 +307,49 @@ async def upload_file_to_yandex(
             if ".." in yandex_path:
                 raise HTTPException(status_code=400, detail="Недопустимый путь файла")
 
-        result = yd_service.upload_file_from_bytes(file_bytes, yandex_path)
+        if progress_key:
+            _set_upload_progress(progress_key, sent=0, total=file.size or 0, phase='uploading')
 
-        if result:
-            public_link = yd_service.get_public_link(yandex_path)
-            return {
-                "status": "success",
-                "yandex_path": yandex_path,
-                "public_link": public_link,
-                "file_name": file.filename
-            }
-        else:
-            raise HTTPException(status_code=500, detail="Failed to upload file")
+        public_link = await run_in_threadpool(
+            _stream_upload_to_yandex, yd_service, file.file, yandex_path, max_size, progress_key)
+
+        return {
+            "status": "success",
+            "yandex_path": yandex_path,
+            "public_link": public_link,
+            "file_name": file.filename
+        }
 
+    except UploadTooLarge:
+        if progress_key:
+            _set_upload_progress(progress_key, phase='error')
+        raise too_large
     except HTTPException:
         raise
     except Exception as e:
+        if progress_key:
+            _set_upload_progress(progress_key, phase='error')
         error_msg = str(e).lower()
         if "unauthorized" in error_msg or "token" in error_msg or "401" in error_msg:
             raise HTTPException(status_code=503, detail="Yandex Disk not configured or token expired")
         logger.exception(f"Ошибка при загрузке файла: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    finally:
+        await file.close()
+
+
+@router.get("/upload/progress/{upload_id}")
+async def get_upload_progress(
+    upload_id: str,
+    current_user: Employee = Depends(get_current_user),
+):
+    """Прогресс загрузки на Яндекс.Диск: sent/total байт и фаза
+    (uploading → publishing → done | error)"""
+    with _upload_progress_lock:
+        entry = _upload_progress.get((current_user.id, upload_id))
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Загрузка не найдена")
+        return {k: v for k, v in entry.items() if k != 'updated'}
 
 
 @router.post("/folder")
@@ -452,199 +529,64 @@ async def scan_contract_files_on_yandex(
     try:
         yd_service = get_yandex_disk_service()
 
-        # Точный маппинг папок → стадий
-        folder_to_stage_exact = {
-            'Замер': 'measurement',
-            'Замеры': 'measurement',
-            '1 стадия - Планировочное решение': 'stage1',
-            'Планировочное решение': 'stage1',
-            'Концепция-коллажи': 'stage2_concept',
-            'Коллажи': 'stage2_concept',
-            '3D визуализация': 'stage2_3d',
-            '3D': 'stage2_3d',
-            '3 стадия - Чертежный проект': 'stage3',
-            'Чертежный проект': 'stage3',
-            'Чертежи': 'stage3',
-            'Референсы': 'references',
-            'Фотофиксация': 'photo_documentation',
-            'Фото': 'photo_documentation',
-            'Анкета': 'questionnaire',
-            'Анкеты': 'questionnaire',
-            'Документы': 'documents',
-            'Техническое задание': 'tech_task',
-            'ТЗ': 'tech_task',
-            'Авторский надзор': 'supervision',
-        }
-
-        # Нечёткий маппинг: ключевые слова → стадия (для папок с нестандартными именами)
-        folder_keywords_to_stage = [
-            ('замер', 'measurement'),
-            ('1 стадия', 'stage1'),
-            ('1стадия', 'stage1'),
-            ('планировочн', 'stage1'),
-            ('концепция', 'stage2_concept'),
-            ('коллаж', 'stage2_concept'),
-            ('3d', 'stage2_3d'),
-            ('визуализ', 'stage2_3d'),
-            ('2 стадия', 'stage2_concept'),
-            ('2стадия', 'stage2_concept'),
-            ('3 стадия', 'stage3'),
-            ('3стадия', 'stage3'),
-            ('чертеж', 'stage3'),
-            ('рабочи', 'stage3'),
-            ('референ', 'references'),
-            ('фотофикс', 'photo_documentation'),
-            ('фото', 'photo_documentation'),
-            ('анкет', 'questionnaire'),
-            ('документ', 'documents'),
-            ('техническ', 'tech_task'),
-            ('надзор', 'supervision'),
-        ]
-
-        def match_folder_to_stage(folder_name):
-            """Определить стадию по имени папки: сначала точное, потом нечёткое"""
-            # Точное совпадение
-            if folder_name in folder_to_stage_exact:
-                return folder_to_stage_exact[folder_name]
-            # Нечёткое: ищем ключевое слово в нижнем регистре
-            name_lower = folder_name.lower()
-            for keyword, stage_id in folder_keywords_to_stage:
-                if keyword in name_lower:
-                    return stage_id
-            return None
-
-        def detect_file_type(name):
-            ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
-            if ext in ('png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'svg'):
-                return 'image'
-            elif ext == 'pdf':
-                return 'pdf'
-            elif ext in ('xls', 'xlsx', 'csv'):
-                return 'excel'
-            elif ext in ('doc', 'docx'):
-                return 'word'
-            elif ext in ('dwg', 'dxf'):
-                return 'cad'
-            return 'other'
-
-        def normalize_path(p):
-            """Нормализация пути: убираем 'disk:' префикс для сравнения"""
-            if p and p.startswith('disk:'):
-                return p[5:]
-            return p or ''
-
-        found_files = []
-
-        def scan_folder(path, stage=None):
-            try:
-                items = yd_service.list_files(path)
-                for item in items:
-                    item_name = item.get('name', '')
-                    item_path = item.get('path', '')
-                    item_type = item.get('type', '')
-
-                    if item_type == 'dir':
-                        # Пропускаем папку "правки" — файлы правок отображаются отдельно
-                        if item_name.lower() == 'правки':
-                            continue
-                        child_stage = match_folder_to_stage(item_name)
-                        if child_stage is None:
-                            child_stage = stage  # наследуем стадию от родителя
-                        # Внутри Авторского надзора подпапки "Стадия ..." остаются supervision
-                        if stage == 'supervision' and item_name.startswith('Стадия'):
-                            child_stage = 'supervision'
-                        # Подпапки "Вариация N" наследуют стадию от родителя
-                        if item_name.startswith('Вариация') or item_name.startswith('вариация'):
-                            child_stage = stage
-                        scan_folder(item_path, child_stage)
-                    elif item_type == 'file':
-                        # Файлы с определённой стадией добавляем
-                        # Файлы в корне (stage=None) — пропускаем
-                        if stage:
-                            found_files.append({
-                                'yandex_path': item_path,
-                                'file_name': item_name,
-                                'stage': stage,
-                                'file_type': detect_file_type(item_name),
-                            })
-            except Exception as e:
-                logger.warning(f"Ошибка сканирования {path}: {e}")
-
+        # Обход дерева — блокирующие HTTP-запросы, выполняем в пуле потоков
         if scope == 'supervision':
             # Для надзора сканируем только подпапку "Авторский надзор"
             supervision_path = folder_path.rstrip('/') + '/Авторский надзор'
             logger.info(f"Scan scope=supervision: сканируем только {supervision_path}")
-            scan_folder(supervision_path, stage='supervision')
+            found_files = await run_in_threadpool(
+                scan_project_tree, yd_service, supervision_path, 'supervision')
         else:
-            scan_folder(folder_path)
+            found_files = await run_in_threadpool(scan_project_tree, yd_service, folder_path)
 
-        # Получаем существующие записи — нормализуем пути для сравнения
-        existing_paths_normalized = set()
-        existing_records = db.query(ProjectFile).filter(ProjectFile.contract_id == contract_id).all()
-        for rec in existing_records:
-            if rec.yandex_path:
-                # Добавляем оба варианта пути (с disk: и без) для надёжного сравнения
-                norm = normalize_path(rec.yandex_path)
-                existing_paths_normalized.add(norm)
-                if not norm.startswith('/'):
-                    existing_paths_normalized.add('/' + norm)
-                else:
-                    existing_paths_normalized.add(norm.lstrip('/'))
-
-        # Создаём записи для новых файлов (сравнение по нормализованному пути)
-        new_files = []
+        # Дубликаты внутри одного скана (один путь в разной записи)
+        unique_files = {}
         for f in found_files:
-            yp = f['yandex_path']
-            yp_normalized = normalize_path(yp)
+            unique_files.setdefault(normalize_path(f['yandex_path']), f)
 
-            if yp_normalized in existing_paths_normalized:
-                continue
+        # Один запрос к БД: какие из найденных путей уже есть (в любой записи пути)
+        existing_paths_normalized = set()
+        candidates = set()
+        for f in unique_files.values():
+            candidates |= path_variants(f['yandex_path'])
+        candidates = list(candidates)
+        for i in range(0, len(candidates), SCAN_DIFF_BATCH):
+            rows = db.query(ProjectFile.yandex_path).filter(
+                ProjectFile.contract_id == contract_id,
+                ProjectFile.yandex_path.in_(candidates[i:i + SCAN_DIFF_BATCH])
+            ).all()
+            existing_paths_normalized.update(normalize_path(r[0]).lstrip('/') for r in rows)
+        already_in_db = db.query(func.count(ProjectFile.id)).filter(
+            ProjectFile.contract_id == contract_id).scalar() or 0
 
-            # Добавляем в множество чтобы не дублировать внутри одного скана
-            existing_paths_normalized.add(yp_normalized)
+        missing = [f for norm, f in unique_files.items()
+                   if norm.lstrip('/') not in existing_paths_normalized]
 
-            # Получаем публичную ссылку
-            try:
-                public_link = yd_service.get_public_link(yp)
-            except Exception:
-                public_link = ''
+        # Публичные ссылки новых файлов — параллельно, в пуле потоков
+        public_links = await run_in_threadpool(
+            publish_files, yd_service, [f['yandex_path'] for f in missing])
 
+        new_files = []
+        new_records = []
+        for f in missing:
+            yp = f['yandex_path']
             # Для файлов надзора file_type хранит название стадии
             file_type_val = f['file_type']
             if f['stage'] == 'supervision':
                 # Определяем стадию надзора из пути
-                parts = yp.split('/')
-                for part in parts:
+                for part in yp.split('/'):
                     if part.startswith('Стадия'):
                         file_type_val = part
                         break
-
-            # Дополнительная проверка: прямой запрос в БД (защита от дубликатов)
-            existing_exact = db.query(ProjectFile).filter(
-                ProjectFile.contract_id == contract_id,
-                ProjectFile.yandex_path == yp
-            ).first()
-            if existing_exact:
-                logger.info(f"Scan: файл уже есть в БД (exact match), пропускаем: {f['file_name']}")
-                continue
-
-            new_record = ProjectFile(
+            public_link = public_links.get(yp, '')
+            new_records.append(ProjectFile(
                 contract_id=contract_id,
                 stage=f['stage'],
                 file_type=file_type_val,
                 yandex_path=yp,
                 public_link=public_link,
                 file_name=f['file_name']
-            )
-            try:
-                # Используем savepoint чтобы rollback не затронул предыдущие записи
-                savepoint = db.begin_nested()
-                db.add(new_record)
-                db.flush()
-            except Exception as insert_err:
-                savepoint.rollback()
-                logger.warning(f"Scan: не удалось добавить файл (дубликат?): {f['file_name']}: {insert_err}")
-                continue
+            ))
             new_files.append({
                 'yandex_path': yp,
                 'file_name': f['file_name'],
@@ -653,6 +595,28 @@ async def scan_contract_files_on_yandex(
                 'public_link': public_link,
             })
 
+        if new_records:
+            # Одной пачкой; при конфликте — по одной записи через savepoint
+            savepoint = db.begin_nested()
+            try:
+                db.add_all(new_records)
+                db.flush()
+            except Exception as insert_err:
+                savepoint.rollback()
+                logger.warning(f"Scan: пакетная вставка не удалась, добавляем по одному: {insert_err}")
+                inserted = []
+                for record, info in zip(new_records, new_files):
+                    savepoint = db.begin_nested()
+                    try:
+                        db.add(record)
+                        db.flush()
+                    except Exception as e:
+                        savepoint.rollback()
+                        logger.warning(f"Scan: не удалось добавить файл (дубликат?): {info['file_name']}: {e}")
+                        continue
+                    inserted.append(info)
+                new_files = inserted
+
         # Для файлов из "Анкета" (questionnaire/tech_task): обновляем contract.tech_task_link
         tech_task_files = [f for f in new_files if f['stage'] in ('questionnaire', 'tech_task')]
         if tech_task_files and not contract.tech_task_link:
@@ -709,7 +673,7 @@ async def scan_contract_files_on_yandex(
         return {
             "status": "success",
             "total_on_disk": len(found_files),
-            "already_in_db": len(existing_records),
+            "already_in_db": already_in_db,
             "new_files_added": len(new_files),
             "new_files": new_files,
             "contract_updated": contract_updated
@@ -1,16 +1,21 @@
 import logging
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
-from database import get_db, Employee, ConcurrentEdit, UserSession
+from database import get_db, Employee
 from auth import get_current_user
-from schemas import LockRequest
+from schemas import LockRequest, LockRenewRequest
+from services.lease_manager import LeaseConflict, get_lease_manager, WAIT_MAX
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["locks"])
 
+# Кто может снимать чужие блокировки
+LOCK_ADMIN_POSITIONS = ['Руководитель студии', 'Старший менеджер проектов']
+
 
 # =========================
 # CONCURRENT EDITING LOCKS
@@ -23,86 +28,76 @@ async def create_lock(
     db: Session = Depends(get_db)
 ):
     """
-    Создать блокировку записи для редактирования.
+    Создать (или продлить свою) блокировку записи для редактирования.
     Принимает JSON body: {entity_type, entity_id, employee_id (опционально)}.
     Возвращает 409 если запись уже заблокирована другим пользователем.
     """
-    entity_type = lock_data.entity_type
-    entity_id = lock_data.entity_id
     employee_id = lock_data.employee_id or current_user.id
+    if employee_id == current_user.id:
+        owner_name = current_user.full_name
+    else:
+        owner = db.query(Employee.full_name).filter(Employee.id == employee_id).first()
+        owner_name = owner[0] if owner else None
     try:
-        # Проверяем существующую блокировку
-        existing_lock = db.query(ConcurrentEdit).filter(
-            ConcurrentEdit.entity_type == entity_type,
-            ConcurrentEdit.entity_id == entity_id
-        ).first()
-
-        if existing_lock:
-            # Проверяем, не истекла ли блокировка (2 минуты)
-            if existing_lock.expires_at and existing_lock.expires_at < datetime.utcnow():
-                # Блокировка истекла, удаляем её
-                db.delete(existing_lock)
-                db.commit()
-            elif existing_lock.employee_id != employee_id:
-                # Запись заблокирована другим пользователем
-                locked_by = db.query(Employee).filter(
-                    Employee.id == existing_lock.employee_id
-                ).first()
-
-                locked_by_name = locked_by.full_name if locked_by else 'другим пользователем'
-
-                raise HTTPException(
-                    status_code=409,
-                    detail={
-                        'message': 'Запись заблокирована',
-                        'locked_by': locked_by_name,
-                        'locked_at': existing_lock.locked_at.isoformat()
-                    }
-                )
-            else:
-                # Обновляем время блокировки
-                existing_lock.locked_at = datetime.utcnow()
-                existing_lock.expires_at = datetime.utcnow() + timedelta(minutes=2)
-                db.commit()
-                return {'status': 'renewed', 'entity_type': entity_type, 'entity_id': entity_id}
-
-        # Получаем реальную сессию текущего пользователя
-        user_session = db.query(UserSession).filter(
-            UserSession.employee_id == current_user.id
-        ).order_by(UserSession.last_activity.desc()).first()
-
-        if not user_session:
-            # Создаём сессию если нет
-            user_session = UserSession(
-                employee_id=current_user.id,
-                session_token="lock-session",
-                ip_address="0.0.0.0",
-                last_activity=datetime.utcnow(),
-                is_active=True
-            )
-            db.add(user_session)
-            db.flush()
-
-        # Создаём новую блокировку
-        new_lock = ConcurrentEdit(
-            entity_type=entity_type,
-            entity_id=entity_id,
-            employee_id=employee_id,
-            session_id=user_session.id,
-            locked_at=datetime.utcnow(),
-            expires_at=datetime.utcnow() + timedelta(minutes=2)
+        status, _ = get_lease_manager().acquire(
+            db, lock_data.entity_type, lock_data.entity_id, employee_id, owner_name)
+        return {'status': status, 'entity_type': lock_data.entity_type, 'entity_id': lock_data.entity_id}
+
+    except LeaseConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                'message': 'Запись заблокирована',
+                'locked_by': e.lease.owner_name or 'другим пользователем',
+                'locked_at': e.lease.locked_at.isoformat()
+            }
         )
-        db.add(new_lock)
-        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Ошибка при создании блокировки: {e}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
-        return {'status': 'created', 'entity_type': entity_type, 'entity_id': entity_id}
 
-    except HTTPException:
-        raise
+@router.post("/renew")
+async def renew_locks(
+    renew_data: LockRenewRequest,
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Продлить блокировки текущего пользователя одним запросом.
+    lost — запрошенные блокировки, которые уже истекли или сняты.
+    """
+    manager = get_lease_manager()
+    keys = None
+    if renew_data.keys is not None:
+        keys = [(k.entity_type, k.entity_id) for k in renew_data.keys]
+    try:
+        renewed, lost = manager.renew(db, current_user.id, keys)
     except Exception as e:
         db.rollback()
-        logger.exception(f"Ошибка при создании блокировки: {e}")
+        logger.exception(f"Ошибка при продлении блокировок: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    return {
+        'renewed': [{'entity_type': t, 'entity_id': i} for t, i in renewed],
+        'lost': [{'entity_type': t, 'entity_id': i} for t, i in lost],
+        'expires_in': int(manager.ttl.total_seconds()),
+    }
+
+
+@router.get("/events")
+async def lock_events(
+    since: Optional[float] = None,
+    timeout: float = Query(WAIT_MAX, ge=0, le=WAIT_MAX),
+    current_user: Employee = Depends(get_current_user),
+):
+    """
+    Long-poll событий блокировок: ответ приходит, как только запись
+    заблокирована или освобождена (или по timeout с пустым списком).
+    since — значение 'since' из предыдущего ответа.
+    """
+    events, next_since = await get_lease_manager().wait_events(since, timeout)
+    return {'events': events, 'since': next_since}
 
 
 @router.get("/{entity_type}/{entity_id}")
@@ -114,36 +109,13 @@ async def check_lock(
 ):
     """Проверить блокировку записи"""
     try:
-        lock = db.query(ConcurrentEdit).filter(
-            ConcurrentEdit.entity_type == entity_type,
-            ConcurrentEdit.entity_id == entity_id
-        ).first()
-
-        if not lock:
-            return {'is_locked': False, 'locked_by': None}
-
-        # Проверяем, не истекла ли блокировка
-        if lock.expires_at and lock.expires_at < datetime.utcnow():
-            db.delete(lock)
-            db.commit()
-            return {'is_locked': False, 'locked_by': None}
-
-        # Получаем имя пользователя, заблокировавшего запись
-        locked_by = db.query(Employee).filter(
-            Employee.id == lock.employee_id
-        ).first()
-
-        return {
-            'is_locked': True,
-            'locked_by': locked_by.full_name if locked_by else 'неизвестный пользователь',
-            'locked_at': lock.locked_at.isoformat(),
-            'expires_at': lock.expires_at.isoformat() if lock.expires_at else None,
-            'is_own_lock': lock.employee_id == current_user.id
-        }
-
+        lease = get_lease_manager().get(db, entity_type, entity_id)
     except Exception as e:
         logger.exception(f"Ошибка при проверке блокировки: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+    if lease is None:
+        return {'is_locked': False, 'locked_by': None}
+    return lease.to_dict(current_user.id)
 
 
 # ВАЖНО: статический маршрут /user/{employee_id} ПЕРЕД динамическим /{entity_type}/{entity_id}
@@ -154,25 +126,12 @@ async def release_user_locks(
     db: Session = Depends(get_db)
 ):
     """Снять все блокировки пользователя"""
+    # Только сам пользователь или админ может снять блокировки
+    if employee_id != current_user.id and current_user.position not in LOCK_ADMIN_POSITIONS:
+        raise HTTPException(status_code=403, detail="Нет прав")
     try:
-        # Только сам пользователь или админ может снять блокировки
-        if employee_id != current_user.id and current_user.position not in ['Руководитель студии', 'Старший менеджер проектов']:
-            raise HTTPException(status_code=403, detail="Нет прав")
-
-        locks = db.query(ConcurrentEdit).filter(
-            ConcurrentEdit.employee_id == employee_id
-        ).all()
-
-        count = len(locks)
-        for lock in locks:
-            db.delete(lock)
-
-        db.commit()
-
+        count = get_lease_manager().release_owner(db, employee_id)
         return {'status': 'released', 'count': count}
-
-    except HTTPException:
-        raise
     except Exception as e:
         db.rollback()
         logger.exception(f"Ошибка при снятии блокировок пользователя: {e}")
@@ -187,25 +146,13 @@ async def release_lock(
     db: Session = Depends(get_db)
 ):
     """Снять блокировку записи"""
+    # Только владелец или админ может снять блокировку
+    force = current_user.position in LOCK_ADMIN_POSITIONS
     try:
-        lock = db.query(ConcurrentEdit).filter(
-            ConcurrentEdit.entity_type == entity_type,
-            ConcurrentEdit.entity_id == entity_id
-        ).first()
-
-        if lock:
-            # Только владелец или админ может снять блокировку
-            if lock.employee_id == current_user.id or current_user.position in ['Руководитель студии', 'Старший менеджер проектов']:
-                db.delete(lock)
-                db.commit()
-                return {'status': 'released'}
-            else:
-                raise HTTPException(status_code=403, detail="Нельзя снять чужую блокировку")
-
-        return {'status': 'not_found'}
-
-    except HTTPException:
-        raise
+        released = get_lease_manager().release(db, entity_type, entity_id, current_user.id, force=force)
+        return {'status': 'released' if released else 'not_found'}
+    except PermissionError:
+        raise HTTPException(status_code=403, detail="Нельзя снять чужую блокировку")
     except Exception as e:
         db.rollback()
         logger.exception(f"Ошибка при снятии блокировки: {e}")
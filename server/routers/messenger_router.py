@@ -6,8 +6,6 @@
 """
 import logging
 import os
-import asyncio
-import tempfile
 import time
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
@@ -32,10 +30,13 @@ from messenger_schemas import (
     SendInvitesRequest
 )
 from telegram_service import get_telegram_service, PYROGRAM_AVAILABLE
+from services.telegram_relay import (
+    get_file_id_cache, remember_sent, resolve_relay_files, yandex_api,
+)
 from email_service import get_email_service
 from services.notification_service import (
-    send_invites_to_members, build_script_context, decline_name_dative,
-    trigger_messenger_notification, trigger_supervision_notification,
+    build_script_context, decline_name_dative,
+    enqueue_chat_invites, enqueue_messenger_notification, enqueue_supervision_notification,
 )
 
 logger = logging.getLogger(__name__)
@@ -207,9 +208,9 @@ async def trigger_script_endpoint(
 ):
     """Ручная отправка скрипта мессенджера"""
     if request.entity_type == 'supervision':
-        await trigger_supervision_notification(db, request.card_id, request.script_type)
+        enqueue_supervision_notification(db, request.card_id, request.script_type, commit=True)
     else:
-        await trigger_messenger_notification(db, request.card_id, request.script_type)
+        enqueue_messenger_notification(db, request.card_id, request.script_type, commit=True)
 
     return {"status": "success"}
 
@@ -302,19 +303,12 @@ async def create_messenger_chat(
     # Добавляем участников
     members_resp = _add_chat_members(db, chat, data.members, contract, card)
 
-    db.commit()
-
-    # Рассылаем invite-ссылки асинхронно
-    asyncio.create_task(send_invites_to_members(chat.id, db))
+    # Рассылка invite-ссылок и начальный скрипт project_start — через outbox
+    enqueue_chat_invites(db, chat.id)
+    if data.crm_card_id:
+        enqueue_messenger_notification(db, data.crm_card_id, 'project_start')
 
-    # Авто-триггер начального скрипта project_start
-    try:
-        if data.crm_card_id:
-            asyncio.create_task(
-                trigger_messenger_notification(db, data.crm_card_id, 'project_start')
-            )
-    except Exception as e:
-        logger.warning(f"Не удалось отправить project_start: {e}")
+    db.commit()
 
     return MessengerChatDetailResponse(
         chat=MessengerChatResponse.model_validate(chat),
@@ -380,10 +374,10 @@ async def bind_messenger_chat(
     # Участники
     members_resp = _add_chat_members(db, chat, data.members, contract, card)
 
-    db.commit()
+    # Рассылаем invite-ссылки (outbox)
+    enqueue_chat_invites(db, chat.id)
 
-    # Рассылаем invite-ссылки
-    asyncio.create_task(send_invites_to_members(chat.id, db))
+    db.commit()
 
     return MessengerChatDetailResponse(
         chat=MessengerChatResponse.model_validate(chat),
@@ -484,10 +478,10 @@ async def create_supervision_chat(
     # Добавляем участников (переиспользуем _add_chat_members)
     members_resp = _add_chat_members(db, chat, data.members, contract)
 
-    db.commit()
+    # Рассылаем invite-ссылки (outbox)
+    enqueue_chat_invites(db, chat.id)
 
-    # Рассылаем invite-ссылки
-    asyncio.create_task(send_invites_to_members(chat.id, db))
+    db.commit()
 
     return MessengerChatDetailResponse(
         chat=MessengerChatResponse.model_validate(chat),
@@ -614,7 +608,7 @@ async def send_chat_invites(
     if not chat:
         raise HTTPException(status_code=404, detail="Чат не найден")
 
-    await send_invites_to_members(chat.id, db)
+    enqueue_chat_invites(db, chat.id, commit=True)
     return {"status": "invites_sent"}
 
 
@@ -674,42 +668,35 @@ async def send_files_to_chat(
             else:
                 docs_to_send.append(yf)
 
-        # Скачиваем и отправляем изображения галереей
-        if images_for_gallery:
-            photo_bytes_list = []
-            for img in images_for_gallery[:10]:  # Telegram ограничение: 10 фото в галерее
-                try:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(img["file_name"])[1]) as tmp:
-                        yd.download_file(img["yandex_path"], tmp.name)
-                        with open(tmp.name, 'rb') as f:
-                            photo_bytes_list.append({
-                                "bytes": f.read(),
-                                "filename": img["file_name"],
-                            })
-                    os.unlink(tmp.name)
-                except Exception as e:
-                    logger.warning(f"Ошибка скачивания {img['yandex_path']}: {e}")
-
-            if photo_bytes_list:
-                msg_ids = await tg.send_media_group_from_bytes(
-                    chat.telegram_chat_id, photo_bytes_list, caption=data.caption
-                )
-                if msg_ids:
-                    sent_ids.extend(msg_ids)
+        # Ссылки на скачивание (или file_id из кэша) — параллельно; сами файлы
+        # идут с ЯД в Telegram потоком, без временных файлов
+        to_relay = [dict(img, kind="photo") for img in images_for_gallery[:10]]  # Telegram: 10 фото в галерее
+        to_relay += [dict(doc, kind="document") for doc in docs_to_send]
+        file_cache = get_file_id_cache()
+        try:
+            async with yandex_api(yd) as get_json:
+                resolved = await resolve_relay_files(to_relay, get_json, cache=file_cache)
+        except Exception as e:
+            logger.warning(f"Ошибка подготовки файлов к отправке: {e}")
+            resolved = []
+
+        photos = [f for f in resolved if f["kind"] == "photo"]
+        if photos:
+            sent = await tg.send_media_group_relay(
+                chat.telegram_chat_id, photos, caption=data.caption
+            )
+            remember_sent(photos, sent, file_cache)
+            if sent:
+                sent_ids.extend(s["message_id"] for s in sent)
 
         # Документы отправляем отдельно
-        for doc in docs_to_send:
-            try:
-                with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(doc["file_name"])[1]) as tmp:
-                    yd.download_file(doc["yandex_path"], tmp.name)
-                    msg_id = await tg.send_document(
-                        chat.telegram_chat_id, tmp.name, caption=doc["file_name"]
-                    )
-                    if msg_id:
-                        sent_ids.append(msg_id)
-                os.unlink(tmp.name)
-            except Exception as e:
-                logger.warning(f"Ошибка отправки документа {doc['file_name']}: {e}")
+        for doc in (f for f in resolved if f["kind"] == "document"):
+            sent = await tg.send_document_relay(
+                chat.telegram_chat_id, doc, caption=doc["file_name"]
+            )
+            remember_sent([doc], [sent] if sent else None, file_cache)
+            if sent:
+                sent_ids.append(sent["message_id"])
     else:
         # Все файлы как документы (со ссылками)
         links = []
@@ -10,10 +10,12 @@ from sqlalchemy.orm import Session
 from database import get_db, Employee, NormDaysTemplate
 from auth import get_current_user
 from permissions import require_permission
-from schemas import NormDaysTemplateRequest, NormDaysPreviewRequest
+from schemas import NormDaysTemplateRequest, NormDaysPreviewRequest, NormDaysReapplyRequest
 from services.timeline_service import (
     build_project_timeline_template,
     build_template_project_timeline,
+    invalidate_timeline_templates,
+    reapply_timeline_template,
 )
 
 logger = logging.getLogger(__name__)
@@ -141,6 +143,7 @@ async def save_norm_days_template(
             db.add(record)
 
         db.commit()
+        invalidate_timeline_templates(request.project_type, request.project_subtype)
         logger.info(f"Шаблон нормо-дней сохранен: {request.project_type}/{request.project_subtype}"
                      f"/{request.agent_type}, {len(request.entries)} записей (user={current_user.id})")
         return {"status": "saved", "count": len(request.entries)}
@@ -222,6 +225,7 @@ async def reset_norm_days_template(
             NormDaysTemplate.agent_type == agent_type,
         ).delete()
         db.commit()
+        invalidate_timeline_templates(project_type, project_subtype)
         logger.info(f"Шаблон нормо-дней сброшен: {project_type}/{project_subtype}/{agent_type}, "
                      f"удалено {deleted} записей (user={current_user.id})")
         return {"status": "reset", "deleted": deleted}
@@ -229,3 +233,25 @@ async def reset_norm_days_template(
         db.rollback()
         logger.exception(f"Ошибка сброса шаблона нормо-дней: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+
+@router.post("/templates/reapply")
+async def reapply_norm_days_template(
+    request: NormDaysReapplyRequest,
+    current_user: Employee = Depends(require_permission("employees.update")),
+    db: Session = Depends(get_db)
+):
+    """Пересчитать нормы в таблицах сроков всех договоров по текущему шаблону.
+    Фактические даты и кастомные нормы не меняются.
+    """
+    try:
+        result = reapply_timeline_template(
+            db, request.project_type, request.project_subtype, request.agent_type)
+        db.commit()
+        logger.info(f"Шаблон нормо-дней применён к договорам: {request.project_type}/"
+                    f"{request.project_subtype}/{request.agent_type}, {result} (user={current_user.id})")
+        return {"status": "reapplied", **result}
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Ошибка пересчёта таблиц сроков: {e}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
@@ -1,7 +1,10 @@
 """
 Роутер для уведомлений и настроек уведомлений.
 Endpoints:
-  GET    /notifications                         → список уведомлений текущего пользователя
+  GET    /notifications                         → страница уведомлений текущего пользователя
+  GET    /notifications/unread-count            → число непрочитанных (бейдж)
+  POST   /notifications/read                    → отметить прочитанными по списку id
+  POST   /notifications/read-all                → отметить прочитанными все
   PUT    /notifications/{id}/read               → отметить прочитанным
   GET    /notifications/settings/{employee_id}  → настройки канала
   PUT    /notifications/settings/{employee_id}  → обновить настройки
@@ -13,13 +16,17 @@ import secrets
 from datetime import datetime, timedelta
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from database import get_db, Employee, Notification, NotificationSettings
 from auth import get_current_user
 from permissions import require_permission, SUPERUSER_ROLES
-from schemas import NotificationResponse, NotificationSettingsResponse, NotificationSettingsUpdate
+from schemas import (
+    NotificationResponse, NotificationSettingsResponse, NotificationSettingsUpdate,
+    NotificationMarkReadRequest, NotificationReadResponse,
+)
+from services import notification_inbox as inbox
 
 logger = logging.getLogger(__name__)
 
@@ -140,19 +147,61 @@ async def send_test_notification(
     return {"ok": True, "message": "Тестовое уведомление отправлено"}
 
 
+@router.get("/notifications/unread-count")
+async def get_unread_count(
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Число непрочитанных уведомлений текущего пользователя"""
+    return {"unread_count": inbox.unread_count(db, current_user.id)}
+
+
+@router.post("/notifications/read", response_model=NotificationReadResponse)
+async def mark_notifications_read(
+    data: NotificationMarkReadRequest,
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Отметить прочитанными уведомления по списку id (одной транзакцией)"""
+    updated = inbox.mark_read(db, current_user.id, data.ids)
+    db.commit()
+    return {"updated": updated, "unread_count": inbox.unread_count(db, current_user.id)}
+
+
+@router.post("/notifications/read-all", response_model=NotificationReadResponse)
+async def mark_all_notifications_read(
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Отметить прочитанными все уведомления текущего пользователя"""
+    updated = inbox.mark_read(db, current_user.id)
+    db.commit()
+    return {"updated": updated, "unread_count": inbox.unread_count(db, current_user.id)}
+
+
 # ── ДИНАМИЧЕСКИЕ ПУТИ ──
 
 @router.get("/notifications", response_model=List[NotificationResponse])
 async def get_notifications(
+    response: Response,
     unread_only: bool = False,
+    limit: int = Query(inbox.INBOX_PAGE_SIZE, ge=1, le=inbox.INBOX_PAGE_MAX),
+    cursor: Optional[str] = None,
     current_user: Employee = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
-    """Получить уведомления текущего пользователя"""
-    query = db.query(Notification).filter(Notification.employee_id == current_user.id)
-    if unread_only:
-        query = query.filter(Notification.is_read == False)
-    return query.order_by(Notification.created_at.desc()).all()
+    """
+    Страница уведомлений текущего пользователя (новые сверху).
+    Курсор следующей страницы — в заголовке X-Next-Cursor (нет заголовка — страница последняя).
+    """
+    try:
+        items, next_cursor = inbox.list_page(db, current_user.id, limit=limit, cursor=cursor,
+                                             unread_only=unread_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.put("/notifications/{notification_id}/read")
@@ -162,16 +211,15 @@ async def mark_notification_read(
     db: Session = Depends(get_db),
 ):
     """Отметить уведомление как прочитанное"""
-    notification = db.query(Notification).filter(
+    exists = db.query(Notification.id).filter(
         Notification.id == notification_id,
         Notification.employee_id == current_user.id,
     ).first()
 
-    if not notification:
+    if not exists:
         raise HTTPException(status_code=404, detail="Уведомление не найдено")
 
-    notification.is_read = True
-    notification.read_at = datetime.utcnow()
+    inbox.mark_read(db, current_user.id, [notification_id])
     db.commit()
     return {"message": "Уведомление прочитано"}
 
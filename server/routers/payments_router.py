@@ -1,17 +1,20 @@
 import logging
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, extract
 from typing import List, Optional
 
 from database import (
-    get_db, Employee, Contract, Payment, Rate, Salary,
-    CRMCard, SupervisionCard, ActivityLog, ActionHistory
+    get_db, SessionLocal, Employee, Contract, Payment, Rate,
+    SupervisionCard, ActivityLog, ActionHistory
 )
 from auth import get_current_user
 from permissions import require_permission
 from schemas import PaymentCreate, PaymentUpdate, PaymentResponse, PaymentManualUpdateRequest
+from services import payment_ledger
+from services.repricing_service import reprice
 
 logger = logging.getLogger(__name__)
 
@@ -37,197 +40,37 @@ async def get_all_payments(
 ):
     """Получить все платежи с фильтрами (включая оклады из таблицы salaries)"""
     try:
-        result = []
-
-        # 1. Платежи из таблицы payments (CRM и Надзор)
-        payments_query = db.query(Payment)
-
-        if year:
-            if include_null_month:
-                # ИСПРАВЛЕНИЕ 06.02.2026: Включаем платежи с NULL/пустым report_month (В работе)
-                payments_query = payments_query.filter(
-                    or_(
-                        Payment.report_month.like(f'{year}%'),
-                        Payment.report_month.is_(None),
-                        Payment.report_month == ''
-                    )
-                )
-            else:
-                payments_query = payments_query.filter(Payment.report_month.like(f'{year}%'))
-        if month:
-            payments_query = payments_query.filter(Payment.report_month.like(f'{year}-{month:02d}%' if year else f'%-{month:02d}%'))
-        if payment_type and payment_type != 'Оклад':
-            payments_query = payments_query.filter(Payment.payment_type == payment_type)
-        if contract_id is not None:
-            payments_query = payments_query.filter(Payment.contract_id == contract_id)
-        if employee_id is not None:
-            payments_query = payments_query.filter(Payment.employee_id == employee_id)
-        if is_paid is not None:
-            payments_query = payments_query.filter(Payment.is_paid == is_paid)
-
-        payments = payments_query.all()
-
-        # Batch-load all related entities to avoid N+1 queries
-        employee_ids = list(set(p.employee_id for p in payments if p.employee_id))
-        contract_ids = list(set(p.contract_id for p in payments if p.contract_id))
-        crm_card_ids = list(set(p.crm_card_id for p in payments if p.crm_card_id))
-        supervision_card_ids = list(set(p.supervision_card_id for p in payments if p.supervision_card_id))
-
-        employees_map = {e.id: e for e in db.query(Employee).filter(Employee.id.in_(employee_ids)).all()} if employee_ids else {}
-        contracts_map = {c.id: c for c in db.query(Contract).filter(Contract.id.in_(contract_ids)).all()} if contract_ids else {}
-        crm_cards_map = {c.id: c for c in db.query(CRMCard).filter(CRMCard.id.in_(crm_card_ids)).all()} if crm_card_ids else {}
-        supervision_cards_map = {c.id: c for c in db.query(SupervisionCard).filter(SupervisionCard.id.in_(supervision_card_ids)).all()} if supervision_card_ids else {}
-
-        # Also load contracts referenced by CRM cards and supervision cards
-        crm_contract_ids = list(set(c.contract_id for c in crm_cards_map.values() if c.contract_id))
-        sup_contract_ids = list(set(c.contract_id for c in supervision_cards_map.values() if c.contract_id))
-        extra_contract_ids = [cid for cid in crm_contract_ids + sup_contract_ids if cid not in contracts_map]
-        if extra_contract_ids:
-            extra_contracts = {c.id: c for c in db.query(Contract).filter(Contract.id.in_(extra_contract_ids)).all()}
-            contracts_map.update(extra_contracts)
-
-        for p in payments:
-            employee = employees_map.get(p.employee_id)
-
-            # Получаем данные контракта через CRM карточку или напрямую
-            contract = None
-            if p.crm_card_id:
-                crm_card = crm_cards_map.get(p.crm_card_id)
-                if crm_card:
-                    contract = contracts_map.get(crm_card.contract_id)
-            elif p.supervision_card_id:
-                supervision_card = supervision_cards_map.get(p.supervision_card_id)
-                if supervision_card:
-                    contract = contracts_map.get(supervision_card.contract_id)
-            elif p.contract_id:
-                contract = contracts_map.get(p.contract_id)
-
-            # Определяем source
-            if p.crm_card_id:
-                source = 'CRM'
-            elif p.supervision_card_id:
-                source = 'CRM Надзор'
-            else:
-                source = 'CRM'  # Если нет ни crm_card_id ни supervision_card_id, но есть contract_id
-
-            # ИСПРАВЛЕНИЕ 06.02.2026: Для платежей надзора project_type = 'Авторский надзор'
-            if p.supervision_card_id:
-                payment_project_type = 'Авторский надзор'
-            else:
-                payment_project_type = contract.project_type if contract else None
-
-            result.append({
-                'id': p.id,
-                'contract_id': p.contract_id,
-                'crm_card_id': p.crm_card_id,
-                'supervision_card_id': p.supervision_card_id,
-                'employee_id': p.employee_id,
-                'employee_name': p.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                'position': employee.position if employee else '',
-                'role': p.role,
-                'stage_name': p.stage_name,
-                'calculated_amount': float(p.calculated_amount) if p.calculated_amount else 0,
-                'final_amount': float(p.final_amount) if p.final_amount else 0,
-                'amount': float(p.final_amount) if p.final_amount else 0,
-                'payment_type': p.payment_type,
-                'payment_subtype': p.payment_type,  # Тип выплаты: Аванс, Доплата, Полная оплата
-                'source': source,
-                'report_month': p.report_month,
-                'payment_status': p.payment_status if p.payment_status else 'pending',
-                'is_paid': p.is_paid,
-                'created_at': p.created_at.isoformat() if p.created_at else None,
-                # Данные из контракта
-                'project_type': payment_project_type,
-                'agent_type': contract.agent_type if contract else None,
-                'address': contract.address if contract else None,
-                'contract_number': contract.contract_number if contract else None,
-                'area': float(contract.area) if contract and contract.area else None,
-                'city': contract.city if contract else None,
-                'reassigned': p.reassigned if hasattr(p, 'reassigned') else False,
-            })
-
-        # 2. Оклады из таблицы salaries (если не фильтруем по payment_type отличному от Оклад)
-        if not payment_type or payment_type == 'Оклад':
-            salaries_query = db.query(Salary)
-
-            if year:
-                if include_null_month:
-                    # ИСПРАВЛЕНИЕ 06.02.2026: Включаем оклады с NULL report_month
-                    salaries_query = salaries_query.filter(
-                        or_(
-                            Salary.report_month.like(f'{year}%'),
-                            Salary.report_month.is_(None)
-                        )
-                    )
-                else:
-                    salaries_query = salaries_query.filter(Salary.report_month.like(f'{year}%'))
-            if month:
-                salaries_query = salaries_query.filter(Salary.report_month.like(f'{year}-{month:02d}%' if year else f'%-{month:02d}%'))
-            if employee_id is not None:
-                salaries_query = salaries_query.filter(Salary.employee_id == employee_id)
-            if contract_id is not None:
-                salaries_query = salaries_query.filter(Salary.contract_id == contract_id)
-            if is_paid is not None:
-                # В таблице salaries статус хранится как payment_status ('paid'/'pending')
-                if is_paid:
-                    salaries_query = salaries_query.filter(Salary.payment_status == 'paid')
-                else:
-                    salaries_query = salaries_query.filter(Salary.payment_status != 'paid')
-
-            salaries = salaries_query.all()
-
-            # Batch-load employees and contracts for salaries to avoid N+1 queries
-            sal_employee_ids = list(set(s.employee_id for s in salaries if s.employee_id))
-            sal_contract_ids = list(set(s.contract_id for s in salaries if s.contract_id))
-            sal_employees_map = {e.id: e for e in db.query(Employee).filter(Employee.id.in_(sal_employee_ids)).all()} if sal_employee_ids else {}
-            # Reuse already loaded contracts and load any missing ones
-            missing_contract_ids = [cid for cid in sal_contract_ids if cid not in contracts_map]
-            if missing_contract_ids:
-                extra = {c.id: c for c in db.query(Contract).filter(Contract.id.in_(missing_contract_ids)).all()}
-                contracts_map.update(extra)
-
-            for s in salaries:
-                employee = sal_employees_map.get(s.employee_id)
-                contract = contracts_map.get(s.contract_id) if s.contract_id else None
-
-                result.append({
-                    'id': s.id,
-                    'contract_id': s.contract_id,
-                    'crm_card_id': None,
-                    'supervision_card_id': None,
-                    'employee_id': s.employee_id,
-                    'employee_name': s.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': s.payment_type,  # payment_type в salaries = роль
-                    'stage_name': s.stage_name,
-                    'calculated_amount': float(s.amount) if s.amount else 0,
-                    'final_amount': float(s.amount) if s.amount else 0,
-                    'amount': float(s.amount) if s.amount else 0,
-                    'payment_type': s.payment_type,
-                    'payment_subtype': 'Оклад',  # Всегда Оклад для salaries
-                    'source': 'Оклад',
-                    'report_month': s.report_month,
-                    'payment_status': s.payment_status if s.payment_status else 'pending',
-                    'is_paid': s.payment_status == 'paid' if s.payment_status else False,
-                    'created_at': s.created_at.isoformat() if s.created_at else None,
-                    # Данные из контракта
-                    'project_type': s.project_type if s.project_type else (contract.project_type if contract else None),
-                    'agent_type': contract.agent_type if contract else None,
-                    'address': contract.address if contract else None,
-                    'contract_number': contract.contract_number if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'reassigned': False,  # Оклады не переназначаются
-                    'comments': s.comments,  # Комментарий из оклада
-                })
-
-        return result
+        return payment_ledger.listing(
+            db, year=year, payment_type=payment_type, month=month,
+            include_null_month=include_null_month, contract_id=contract_id,
+            employee_id=employee_id, is_paid=is_paid)
 
     except Exception as e:
         logger.exception(f"Ошибка при получении платежей: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
+@router.get("/export")
+async def export_payments(
+    year: int,
+    payment_type: Optional[str] = None,
+    month: Optional[int] = None,
+    include_null_month: Optional[bool] = False,
+    contract_id: Optional[int] = None,
+    employee_id: Optional[int] = None,
+    is_paid: Optional[bool] = None,
+    current_user: Employee = Depends(get_current_user),
+):
+    """Выгрузка платежей и окладов за год (формат GET /) потоком JSON"""
+    return StreamingResponse(
+        payment_ledger.iter_listing_json(
+            SessionLocal, year=year, payment_type=payment_type, month=month,
+            include_null_month=include_null_month, contract_id=contract_id,
+            employee_id=employee_id, is_paid=is_paid),
+        media_type="application/json",
+    )
+
+
 # ИСПРАВЛЕНИЕ 30.01.2026: Endpoint перемещен ПЕРЕД /{payment_id}
 # чтобы FastAPI не перехватывал 'calculate' как payment_id
 @router.get("/calculate")
@@ -352,45 +195,7 @@ async def get_payments_summary(
 ):
     """Получить сводку по платежам"""
     try:
-        from sqlalchemy import extract
-
-        query = db.query(Payment).filter(extract('year', Payment.created_at) == year)
-
-        if month:
-            query = query.filter(extract('month', Payment.created_at) == month)
-        if quarter:
-            start_month = (quarter - 1) * 3 + 1
-            end_month = quarter * 3
-            query = query.filter(extract('month', Payment.created_at).between(start_month, end_month))
-
-        payments = query.all()
-
-        # Суммы по статусам
-        paid_amount = sum(p.final_amount or 0 for p in payments if p.is_paid)
-        pending_amount = sum(p.final_amount or 0 for p in payments if not p.is_paid)
-
-        # По ролям
-        by_role = {}
-        for p in payments:
-            role = p.role or 'Не указано'
-            if role not in by_role:
-                by_role[role] = {'paid': 0, 'pending': 0, 'count': 0}
-            by_role[role]['count'] += 1
-            if p.is_paid:
-                by_role[role]['paid'] += p.final_amount or 0
-            else:
-                by_role[role]['pending'] += p.final_amount or 0
-
-        return {
-            'year': year,
-            'month': month,
-            'quarter': quarter,
-            'total_paid': paid_amount,
-            'total_pending': pending_amount,
-            'total': paid_amount + pending_amount,
-            'by_role': by_role,
-            'payments_count': len(payments)
-        }
+        return payment_ledger.summary(db, year, month=month, quarter=quarter)
 
     except Exception as e:
         logger.exception(f"Ошибка при получении сводки платежей: {e}")
@@ -423,180 +228,7 @@ async def get_payments_by_type(
             - card_stage (для CRM)
     """
     try:
-        result = []
-
-        # Оклады - только из таблицы salaries
-        if payment_type == 'Оклады':
-            salaries = db.query(Salary).all()
-            for s in salaries:
-                employee = db.query(Employee).filter(Employee.id == s.employee_id).first()
-                contract = db.query(Contract).filter(Contract.id == s.contract_id).first() if s.contract_id else None
-
-                result.append({
-                    'id': s.id,
-                    'contract_id': s.contract_id,
-                    'employee_id': s.employee_id,
-                    'employee_name': s.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': s.payment_type,
-                    'stage_name': s.stage_name,
-                    'final_amount': float(s.amount) if s.amount else 0,
-                    'amount': float(s.amount) if s.amount else 0,
-                    'payment_type': s.payment_type,
-                    'report_month': s.report_month,
-                    'payment_status': s.payment_status,
-                    'project_type': s.project_type,
-                    'contract_number': contract.contract_number if contract else None,
-                    'address': contract.address if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'agent_type': contract.agent_type if contract else None,
-                    'source': 'Оклад',
-                    'card_stage': None,
-                    'comments': s.comments  # Добавлено поле комментария
-                })
-
-        # Авторский надзор - из payments с supervision_card + salaries
-        elif project_type_filter == 'Авторский надзор':
-            # Платежи из CRM надзора - ИСПРАВЛЕНО 06.02.2026
-            payments = db.query(Payment).filter(
-                Payment.supervision_card_id.isnot(None)
-            ).all()
-
-            for p in payments:
-                employee = db.query(Employee).filter(Employee.id == p.employee_id).first()
-                supervision_card = db.query(SupervisionCard).filter(SupervisionCard.id == p.supervision_card_id).first()
-                contract = db.query(Contract).filter(Contract.id == supervision_card.contract_id).first() if supervision_card else None
-
-                result.append({
-                    'id': p.id,
-                    'contract_id': p.contract_id,
-                    'crm_card_id': p.crm_card_id,
-                    'supervision_card_id': p.supervision_card_id,
-                    'employee_id': p.employee_id,
-                    'employee_name': p.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': p.role,
-                    'stage_name': p.stage_name,
-                    'calculated_amount': float(p.calculated_amount) if p.calculated_amount else 0,
-                    'final_amount': float(p.final_amount) if p.final_amount else 0,
-                    'amount': float(p.final_amount) if p.final_amount else 0,
-                    'payment_type': p.payment_type,
-                    'payment_subtype': p.payment_type,
-                    'report_month': p.report_month,
-                    'payment_status': p.payment_status,
-                    'contract_number': contract.contract_number if contract else None,
-                    'address': contract.address if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'agent_type': contract.agent_type if contract else None,
-                    'project_type': contract.project_type if contract else 'Авторский надзор',
-                    'source': 'CRM Надзор',
-                    'card_stage': supervision_card.column_name if supervision_card else None,
-                    'reassigned': p.reassigned if hasattr(p, 'reassigned') else False
-                })
-
-            # Добавляем оклады с типом "Авторский надзор"
-            salaries = db.query(Salary).filter(Salary.project_type == project_type_filter).all()
-            for s in salaries:
-                employee = db.query(Employee).filter(Employee.id == s.employee_id).first()
-                contract = db.query(Contract).filter(Contract.id == s.contract_id).first() if s.contract_id else None
-
-                result.append({
-                    'id': s.id,
-                    'contract_id': s.contract_id,
-                    'employee_id': s.employee_id,
-                    'employee_name': s.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': s.payment_type,
-                    'stage_name': s.stage_name,
-                    'final_amount': float(s.amount) if s.amount else 0,
-                    'amount': float(s.amount) if s.amount else 0,
-                    'payment_type': 'Оклад',
-                    'report_month': s.report_month,
-                    'payment_status': s.payment_status,
-                    'contract_number': contract.contract_number if contract else None,
-                    'address': contract.address if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'agent_type': contract.agent_type if contract else None,
-                    'source': 'Оклад',
-                    'card_stage': None,
-                    'comments': s.comments  # Добавлено поле комментария
-                })
-
-        # Индивидуальные и шаблонные проекты - из payments с crm_card + salaries
-        elif project_type_filter:
-            # Платежи из CRM
-            payments_query = db.query(Payment).join(
-                CRMCard, Payment.crm_card_id == CRMCard.id
-            ).join(
-                Contract, CRMCard.contract_id == Contract.id
-            ).filter(
-                Contract.project_type == project_type_filter
-            )
-
-            for p in payments_query.all():
-                employee = db.query(Employee).filter(Employee.id == p.employee_id).first()
-                crm_card = db.query(CRMCard).filter(CRMCard.id == p.crm_card_id).first()
-                contract = db.query(Contract).filter(Contract.id == crm_card.contract_id).first() if crm_card else None
-
-                result.append({
-                    'id': p.id,
-                    'contract_id': p.contract_id,
-                    'employee_id': p.employee_id,
-                    'employee_name': p.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': p.role,
-                    'stage_name': p.stage_name,
-                    'final_amount': float(p.final_amount) if p.final_amount else 0,
-                    'amount': float(p.final_amount) if p.final_amount else 0,
-                    'payment_type': p.payment_type,
-                    'report_month': p.report_month,
-                    'payment_status': p.payment_status,
-                    'contract_number': contract.contract_number if contract else None,
-                    'address': contract.address if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'agent_type': contract.agent_type if contract else None,
-                    'source': 'CRM',
-                    'card_stage': crm_card.column_name if crm_card else None,
-                    'reassigned': p.reassigned if hasattr(p, 'reassigned') else False,
-                    'old_employee_id': p.old_employee_id if hasattr(p, 'old_employee_id') else None
-                })
-
-            # Добавляем оклады с этим типом проекта
-            salaries = db.query(Salary).filter(Salary.project_type == project_type_filter).all()
-            for s in salaries:
-                employee = db.query(Employee).filter(Employee.id == s.employee_id).first()
-                contract = db.query(Contract).filter(Contract.id == s.contract_id).first() if s.contract_id else None
-
-                result.append({
-                    'id': s.id,
-                    'contract_id': s.contract_id,
-                    'employee_id': s.employee_id,
-                    'employee_name': s.employee_name or (employee.full_name if employee else 'Неизвестный'),
-                    'position': employee.position if employee else '',
-                    'role': s.payment_type,
-                    'stage_name': s.stage_name,
-                    'final_amount': float(s.amount) if s.amount else 0,
-                    'amount': float(s.amount) if s.amount else 0,
-                    'payment_type': 'Оклад',
-                    'report_month': s.report_month,
-                    'payment_status': s.payment_status,
-                    'contract_number': contract.contract_number if contract else None,
-                    'address': contract.address if contract else None,
-                    'area': float(contract.area) if contract and contract.area else None,
-                    'city': contract.city if contract else None,
-                    'agent_type': contract.agent_type if contract else None,
-                    'source': 'Оклад',
-                    'card_stage': None,
-                    'comments': s.comments  # Добавлено поле комментария
-                })
-
-        # Сортируем по id в обратном порядке
-        result.sort(key=lambda x: x['id'], reverse=True)
-        return result
+        return payment_ledger.by_type(db, payment_type, project_type_filter)
 
     except Exception as e:
         logger.exception(f"Ошибка при получении платежей по типу: {e}")
@@ -669,104 +301,16 @@ async def get_all_payments_optimized(
 async def recalculate_payments(
     contract_id: Optional[int] = None,
     role: Optional[str] = None,
+    dry_run: bool = False,
     current_user: Employee = Depends(require_permission("payments.update")),
     db: Session = Depends(get_db)
 ):
-    """Пересчет выплат по текущим тарифам"""
+    """Пересчет выплат по текущим тарифам (dry_run — только отчёт об изменениях)"""
     try:
-        # Получаем выплаты для пересчета
-        query = db.query(Payment)
-
-        if contract_id:
-            query = query.filter(Payment.contract_id == contract_id)
-        if role:
-            query = query.filter(Payment.role == role)
-
-        payments = query.all()
-        updated = 0
-        errors = []
-
-        for payment in payments:
-            try:
-                # Получаем договор
-                contract = db.query(Contract).filter(Contract.id == payment.contract_id).first()
-                if not contract:
-                    continue
-
-                area = float(contract.area) if contract.area else 0
-                project_type = contract.project_type
-                city = contract.city
-
-                new_amount = 0
-
-                # Замерщик
-                if payment.role == 'Замерщик':
-                    rate = db.query(Rate).filter(
-                        Rate.role == 'Замерщик',
-                        Rate.city == city
-                    ).first()
-                    if rate and rate.surveyor_price:
-                        new_amount = float(rate.surveyor_price)
-
-                # Индивидуальный
-                elif project_type == 'Индивидуальный':
-                    query_rate = db.query(Rate).filter(
-                        Rate.project_type == 'Индивидуальный',
-                        Rate.role == payment.role
-                    )
-                    if payment.stage_name:
-                        rate = query_rate.filter(Rate.stage_name == payment.stage_name).first()
-                        if not rate:
-                            rate = query_rate.filter(Rate.stage_name.is_(None)).first()
-                    else:
-                        rate = query_rate.filter(Rate.stage_name.is_(None)).first()
-
-                    if rate and rate.rate_per_m2:
-                        new_amount = area * float(rate.rate_per_m2)
-
-                # Шаблонный
-                elif project_type == 'Шаблонный':
-                    rate = db.query(Rate).filter(
-                        Rate.project_type == 'Шаблонный',
-                        Rate.role == payment.role,
-                        Rate.area_from <= area,
-                        or_(Rate.area_to >= area, Rate.area_to.is_(None))
-                    ).order_by(Rate.area_from.asc()).first()
-
-                    if rate and rate.fixed_price:
-                        new_amount = float(rate.fixed_price)
-
-                # Авторский надзор
-                elif project_type == 'Авторский надзор' or payment.supervision_card_id:
-                    rate = db.query(Rate).filter(
-                        Rate.project_type == 'Авторский надзор',
-                        Rate.role == payment.role
-                    ).first()
-
-                    if rate and rate.rate_per_m2:
-                        new_amount = area * float(rate.rate_per_m2)
-
-                # Обновляем если сумма изменилась
-                if new_amount != payment.calculated_amount:
-                    old_amount = payment.calculated_amount
-                    payment.calculated_amount = new_amount
-                    # S-08: Не перезаписывать final_amount для ручных платежей
-                    if not payment.is_manual:
-                        payment.final_amount = new_amount
-                    updated += 1
-                    logger.debug(f"RECALC Payment ID={payment.id}: {old_amount} -> {new_amount}, manual={payment.is_manual}")
-
-            except Exception as e:
-                errors.append({'payment_id': payment.id, 'error': str(e)})
-
-        db.commit()
-
-        return {
-            'status': 'success',
-            'updated': updated,
-            'total': len(payments),
-            'errors': errors
-        }
+        result = reprice(db, dry_run=dry_run, contract_id=contract_id, role=role)
+        if not dry_run:
+            db.commit()
+        return result.to_dict()
 
     except Exception as e:
         db.rollback()
@@ -9,7 +9,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from database import get_db, Employee, Rate, Payment, Contract
+from database import get_db, Employee, Rate
 from auth import get_current_user
 from permissions import require_permission
 from schemas import (
@@ -18,32 +18,17 @@ from schemas import (
     SupervisionRateRequest, SurveyorRateRequest,
     StatusResponse, DeleteCountResponse,
 )
+from services.repricing_service import reprice_zero_payments_for_rate
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["rates"])
 
 
-def _recalc_zero_supervision_payments(db: Session, role: str, stage_name: str, rate_per_m2: float):
-    """Пересчитать нулевые платежи надзора после создания/обновления тарифа."""
-    zero_payments = db.query(Payment).filter(
-        Payment.role == role,
-        Payment.stage_name == stage_name,
-        Payment.supervision_card_id.isnot(None),
-        Payment.final_amount == 0,
-    ).all()
-    if not zero_payments:
-        return 0
-    count = 0
-    for p in zero_payments:
-        contract = db.query(Contract).filter(Contract.id == p.contract_id).first()
-        area = float(contract.area) if contract and contract.area else 0
-        if area > 0 and rate_per_m2 > 0:
-            new_amount = area * rate_per_m2
-            p.calculated_amount = new_amount
-            p.final_amount = new_amount
-            p.updated_at = datetime.utcnow()
-            count += 1
-            logger.info(f"Пересчитан платёж id={p.id}: 0 → {new_amount} (area={area}, rate={rate_per_m2})")
+def _reprice_after_save(db: Session, rate: Rate) -> int:
+    """Дозаполнить нулевые платежи по сохранённому тарифу (один UPDATE)."""
+    count = reprice_zero_payments_for_rate(db, rate)
+    if count:
+        logger.info(f"Пересчитано {count} нулевых платежей после обновления тарифа {rate.role}")
     return count
 
 
@@ -98,6 +83,7 @@ async def save_template_rate(
         if existing:
             existing.fixed_price = data.price
             existing.updated_at = datetime.utcnow()
+            _reprice_after_save(db, existing)
             db.commit()
             db.refresh(existing)
             return existing
@@ -110,6 +96,7 @@ async def save_template_rate(
                 fixed_price=data.price
             )
             db.add(rate)
+            _reprice_after_save(db, rate)
             db.commit()
             db.refresh(rate)
             return rate
@@ -142,6 +129,7 @@ async def save_individual_rate(
         if existing:
             existing.rate_per_m2 = data.rate_per_m2
             existing.updated_at = datetime.utcnow()
+            _reprice_after_save(db, existing)
             db.commit()
             db.refresh(existing)
             return existing
@@ -153,6 +141,7 @@ async def save_individual_rate(
                 stage_name=data.stage_name
             )
             db.add(rate)
+            _reprice_after_save(db, rate)
             db.commit()
             db.refresh(rate)
             return rate
@@ -199,6 +188,7 @@ async def save_supervision_rate(
     """Сохранить тариф надзора"""
     try:
         results = []
+        saved = []
 
         # Тариф для ДАН (исполнитель)
         if data.executor_rate is not None:
@@ -211,6 +201,7 @@ async def save_supervision_rate(
             if existing_dan:
                 existing_dan.rate_per_m2 = data.executor_rate
                 existing_dan.updated_at = datetime.utcnow()
+                saved.append(existing_dan)
             else:
                 rate_dan = Rate(
                     project_type='Авторский надзор',
@@ -219,6 +210,7 @@ async def save_supervision_rate(
                     rate_per_m2=data.executor_rate
                 )
                 db.add(rate_dan)
+                saved.append(rate_dan)
             results.append({'role': 'ДАН', 'rate': data.executor_rate})
 
         # Тариф для Старшего менеджера
@@ -232,6 +224,7 @@ async def save_supervision_rate(
             if existing_manager:
                 existing_manager.rate_per_m2 = data.manager_rate
                 existing_manager.updated_at = datetime.utcnow()
+                saved.append(existing_manager)
             else:
                 rate_manager = Rate(
                     project_type='Авторский надзор',
@@ -240,21 +233,13 @@ async def save_supervision_rate(
                     rate_per_m2=data.manager_rate
                 )
                 db.add(rate_manager)
+                saved.append(rate_manager)
             results.append({'role': 'Старший менеджер проектов', 'rate': data.manager_rate})
 
-        db.commit()
-
         # Пересчитать нулевые платежи для обновлённых тарифов
-        recalc_count = 0
-        if data.executor_rate is not None:
-            recalc_count += _recalc_zero_supervision_payments(
-                db, 'ДАН', data.stage_name, data.executor_rate)
-        if data.manager_rate is not None:
-            recalc_count += _recalc_zero_supervision_payments(
-                db, 'Старший менеджер проектов', data.stage_name, data.manager_rate)
-        if recalc_count > 0:
-            db.commit()
-            logger.info(f"Пересчитано {recalc_count} нулевых платежей после обновления тарифа")
+        for rate in saved:
+            _reprice_after_save(db, rate)
+        db.commit()
 
         return {'status': 'success', 'stage_name': data.stage_name, 'rates': results}
 
@@ -280,6 +265,7 @@ async def save_surveyor_rate(
         if existing:
             existing.surveyor_price = data.price
             existing.updated_at = datetime.utcnow()
+            _reprice_after_save(db, existing)
             db.commit()
             db.refresh(existing)
             return existing
@@ -290,6 +276,7 @@ async def save_surveyor_rate(
                 surveyor_price=data.price
             )
             db.add(rate)
+            _reprice_after_save(db, rate)
             db.commit()
             db.refresh(rate)
             return rate
@@ -325,6 +312,7 @@ async def create_rate(
     try:
         rate = Rate(**rate_data.model_dump())
         db.add(rate)
+        _reprice_after_save(db, rate)
         db.commit()
         db.refresh(rate)
         return rate
@@ -352,6 +340,7 @@ async def update_rate(
         setattr(rate, field, value)
 
     rate.updated_at = datetime.utcnow()
+    _reprice_after_save(db, rate)
     db.commit()
     db.refresh(rate)
 
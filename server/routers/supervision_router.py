@@ -2,9 +2,8 @@
 Роутер авторского надзора (supervision).
 Подключается в main.py через app.include_router(supervision_router, prefix="/api/supervision").
 """
-import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List, Optional
@@ -23,7 +22,8 @@ from schemas import (
     SupervisionColumnMoveRequest, SupervisionPauseRequest,
     SupervisionHistoryCreate, SupervisionHistoryResponse,
 )
-from services.notification_service import trigger_supervision_notification
+from services.notification_service import enqueue_supervision_notification
+from services.business_calendar import get_calendar
 
 # Маппинг column_name → stage_code для таблицы сроков надзора
 _SUPERVISION_COLUMN_TO_STAGE = {
@@ -111,43 +111,16 @@ def _auto_create_supervision_payments(db: "Session", card: "SupervisionCard", st
         logger.info(f"Авто-оплата: card={card.id}, role={role}, stage={stage_name}, amount={amount}")
 
 
-RUSSIAN_HOLIDAYS = [
-    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
-    (2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4),
-]
-
-
-def _is_working_day(d):
-    """Рабочий ли день (учитывает выходные + праздники РФ)"""
-    if d.weekday() in [5, 6]:
-        return False
-    if (d.month, d.day) in RUSSIAN_HOLIDAYS:
-        return False
-    return True
-
-
 def _count_business_days(start_date, end_date):
     """Подсчёт рабочих дней между двумя датами (с учётом праздников РФ)"""
-    days = 0
-    current = start_date
-    while current < end_date:
-        if _is_working_day(current):
-            days += 1
-        current += timedelta(days=1)
-    return days
+    return get_calendar().working_days_elapsed(start_date, end_date)
 
 
 def _add_business_days(start_date, days: int):
     """Добавить рабочие дни (пн-пт + праздники РФ) к дате."""
     if isinstance(start_date, str):
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
-    current = start_date
-    added = 0
-    while added < days:
-        current += timedelta(days=1)
-        if _is_working_day(current):
-            added += 1
-    return current
+    return get_calendar().add_working_days(start_date, days)
 
 
 router = APIRouter(tags=["supervision"])
@@ -564,14 +537,14 @@ async def move_supervision_card_to_column(
             # Авто-создание оплат при уходе из стадии
             _auto_create_supervision_payments(db, card, old_column, current_user.id)
 
-        db.commit()
-        db.refresh(card)
-
-        # Хук: уведомление в чат надзора при перемещении
+        # Хук: уведомление в чат надзора при перемещении (outbox, в той же транзакции)
         if old_column != new_column:
-            asyncio.create_task(trigger_supervision_notification(
+            enqueue_supervision_notification(
                 db, card_id, 'supervision_move', stage_name=new_column
-            ))
+            )
+
+        db.commit()
+        db.refresh(card)
 
         return {
             'id': card.id,
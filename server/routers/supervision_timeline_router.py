@@ -2,18 +2,19 @@
 Роутер таблицы сроков надзора (supervision-timeline).
 Подключается в main.py через app.include_router(supervision_timeline_router, prefix="/api/supervision-timeline").
 """
-import io
-import asyncio
 import logging
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from database import get_db, Employee, Contract, SupervisionCard, SupervisionTimelineEntry
 from auth import get_current_user
 from schemas import SupervisionTimelineUpdate
-from services.notification_service import trigger_supervision_notification
+from services.notification_service import enqueue_supervision_notification
+from services.export_service import (
+    XLSX_MEDIA_TYPE, contract_snapshot, supervision_export_rows, render_response,
+    render_supervision_xlsx, render_supervision_pdf, report_date,
+)
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["supervision-timeline"])
@@ -157,14 +158,15 @@ async def update_supervision_timeline_entry(
         entry.budget_savings = entry.budget_planned - entry.budget_actual
 
     entry.updated_at = datetime.utcnow()
-    db.commit()
 
-    # Хук: уведомление в чат при завершении стадии
+    # Хук: уведомление в чат при завершении стадии (outbox, в той же транзакции)
     new_status = entry.status
     if new_status and new_status != old_status and new_status.lower() in ('выполнено', 'завершено'):
-        asyncio.create_task(trigger_supervision_notification(
+        enqueue_supervision_notification(
             db, card_id, 'supervision_stage_complete', stage_name=entry.stage_name
-        ))
+        )
+
+    db.commit()
 
     return {c.name: getattr(entry, c.name) for c in entry.__table__.columns}
 
@@ -211,147 +213,11 @@ async def export_supervision_timeline_excel(
     db: Session = Depends(get_db)
 ):
     """Экспорт таблицы сроков надзора в Excel (с/без комиссии)."""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-    card = db.query(SupervisionCard).filter(SupervisionCard.id == card_id).first()
-    if not card:
-        raise HTTPException(status_code=404, detail="Карточка надзора не найдена")
-
-    contract = db.query(Contract).filter(Contract.id == card.contract_id).first()
-    entries = db.query(SupervisionTimelineEntry).filter(
-        SupervisionTimelineEntry.supervision_card_id == card_id
-    ).order_by(SupervisionTimelineEntry.sort_order).all()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Таблица сроков надзора"
-
-    # Шапка
-    ws.append(["Адрес:", contract.address if contract else ""])
-    ws.append([])
-
-    # Заголовки (с/без комиссии)
-    if include_commission:
-        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
-                   "Бюджет план", "Бюджет факт", "Экономия", "Поставщик",
-                   "Комиссия", "Статус", "Примечания"]
-        widths = [30, 14, 14, 10, 18, 14, 14, 14, 18, 14, 14, 25]
-    else:
-        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
-                   "Бюджет план", "Бюджет факт", "Экономия", "Поставщик",
-                   "Статус", "Примечания"]
-        widths = [30, 14, 14, 10, 18, 14, 14, 14, 18, 14, 25]
-    ws.append(headers)
-
-    header_fill = PatternFill(start_color="444444", end_color="444444", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=10)
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-
-    for col_idx in range(1, len(headers) + 1):
-        cell = ws.cell(row=3, column=col_idx)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', wrap_text=True)
-        cell.border = thin_border
-
-    # Цвета статусов
-    status_colors = {
-        'В работе': 'FFF8E1',
-        'Закуплено': 'E3F2FD',
-        'Доставлено': 'E8F5E9',
-        'Просрочено': 'FFEBEE',
-    }
-
-    def _fmt_date(d):
-        """Конвертировать дату YYYY-MM-DD → DD.MM.YYYY для экспорта"""
-        if not d:
-            return ""
-        try:
-            from datetime import datetime as dt
-            return dt.strptime(d, "%Y-%m-%d").strftime("%d.%m.%Y")
-        except (ValueError, TypeError):
-            return d
-
-    for entry in entries:
-        if include_commission:
-            row_data = [
-                entry.stage_name,
-                _fmt_date(entry.plan_date),
-                _fmt_date(entry.actual_date),
-                entry.actual_days or 0,
-                entry.executor or "",
-                entry.budget_planned or 0,
-                entry.budget_actual or 0,
-                entry.budget_savings or 0,
-                entry.supplier or "",
-                entry.commission or 0,
-                entry.status or "",
-                entry.notes or "",
-            ]
-        else:
-            row_data = [
-                entry.stage_name,
-                _fmt_date(entry.plan_date),
-                _fmt_date(entry.actual_date),
-                entry.actual_days or 0,
-                entry.executor or "",
-                entry.budget_planned or 0,
-                entry.budget_actual or 0,
-                entry.budget_savings or 0,
-                entry.supplier or "",
-                entry.status or "",
-                entry.notes or "",
-            ]
-        ws.append(row_data)
-        row_idx = ws.max_row
-
-        for col_idx in range(1, len(headers) + 1):
-            ws.cell(row=row_idx, column=col_idx).border = thin_border
-
-        # Цвет по статусу
-        color_hex = status_colors.get(entry.status)
-        if color_hex:
-            fill = PatternFill(start_color=color_hex, end_color=color_hex, fill_type="solid")
-            for col_idx in range(1, len(headers) + 1):
-                ws.cell(row=row_idx, column=col_idx).fill = fill
-
-    # Сводка ИТОГО
-    ws.append([])
-    total_planned = sum(e.budget_planned or 0 for e in entries)
-    total_actual = sum(e.budget_actual or 0 for e in entries)
-    total_savings = sum(e.budget_savings or 0 for e in entries)
-    total_commission = sum(e.commission or 0 for e in entries)
-
-    if include_commission:
-        total_row_data = ["ИТОГО:", "", "", "", "", total_planned, total_actual,
-                          total_savings, "", total_commission, "", ""]
-    else:
-        total_row_data = ["ИТОГО:", "", "", "", "", total_planned, total_actual,
-                          total_savings, "", "", ""]
-    ws.append(total_row_data)
-    total_row = ws.max_row
-    for col_idx in range(1, len(headers) + 1):
-        cell = ws.cell(row=total_row, column=col_idx)
-        cell.font = Font(bold=True)
-        cell.border = thin_border
-
-    # Ширина колонок
-    for i, w in enumerate(widths):
-        ws.column_dimensions[chr(65 + i)].width = w
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    filename = f"supervision_timeline_{card_id}.xlsx"
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    contract, rows = _load_supervision_export(db, card_id)
+    return await render_response(
+        render_supervision_xlsx, contract, rows, include_commission,
+        media_type=XLSX_MEDIA_TYPE,
+        filename=f"supervision_timeline_{card_id}.xlsx",
     )
 
 
@@ -363,10 +229,19 @@ async def export_supervision_timeline_pdf(
     db: Session = Depends(get_db)
 ):
     """Экспорт таблицы сроков надзора в PDF (с/без комиссии, с ИТОГО)."""
-    from reportlab.platypus import Paragraph
-    from reportlab.lib.styles import ParagraphStyle
-    from pdf_helper import build_timeline_pdf, _font, _font_bold, COLOR_GRANDTOTAL
+    contract, rows = _load_supervision_export(db, card_id)
+    addr = contract.address or f"надзор_{card_id}"
+    suffix = " с комиссией" if include_commission else ""
+    return await render_response(
+        render_supervision_pdf, contract, rows, include_commission,
+        media_type="application/pdf",
+        filename=f"supervision_timeline_{card_id}.pdf",
+        ru_name=f'Отчет Авторский надзор{suffix} {addr} от {report_date()}.pdf',
+    )
+
 
+def _load_supervision_export(db: Session, card_id: int):
+    """Снимок договора и строк надзора для экспорта (рендер идёт вне сессии)"""
     card = db.query(SupervisionCard).filter(SupervisionCard.id == card_id).first()
     if not card:
         raise HTTPException(status_code=404, detail="Карточка надзора не найдена")
@@ -375,113 +250,4 @@ async def export_supervision_timeline_pdf(
     entries = db.query(SupervisionTimelineEntry).filter(
         SupervisionTimelineEntry.supervision_card_id == card_id
     ).order_by(SupervisionTimelineEntry.sort_order).all()
-
-    fn = _font()
-    fb = _font_bold()
-    cell_style = ParagraphStyle('Cell', fontName=fn, fontSize=8, leading=10)
-    bold_style = ParagraphStyle('CellB', fontName=fb, fontSize=8, leading=10)
-
-    STATUS_COLORS = {
-        'В работе': '#FFF8E1',
-        'Закуплено': '#E3F2FD',
-        'Доставлено': '#E8F5E9',
-        'Просрочено': '#FFEBEE',
-    }
-
-    if include_commission:
-        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
-                   "Бюджет план", "Бюджет факт", "Поставщик", "Комиссия",
-                   "Статус", "Примечания"]
-        col_widths = [120, 55, 55, 35, 80, 55, 55, 80, 50, 55, 80]
-    else:
-        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
-                   "Бюджет план", "Бюджет факт", "Поставщик",
-                   "Статус", "Примечания"]
-        col_widths = [130, 60, 60, 40, 85, 60, 60, 90, 60, 90]
-
-    rows = []
-    row_styles = []
-
-    total_planned = 0
-    total_actual = 0
-    total_commission = 0
-
-    def _fmt_date_pdf(d):
-        """Конвертировать дату YYYY-MM-DD → DD.MM.YYYY для экспорта"""
-        if not d:
-            return ""
-        try:
-            from datetime import datetime as dt
-            return dt.strptime(d, "%Y-%m-%d").strftime("%d.%m.%Y")
-        except (ValueError, TypeError):
-            return d
-
-    for entry in entries:
-        bp = entry.budget_planned or 0
-        ba = entry.budget_actual or 0
-        cm = entry.commission or 0
-        total_planned += bp
-        total_actual += ba
-        total_commission += cm
-
-        base_cells = [
-            Paragraph(entry.stage_name or "", cell_style),
-            Paragraph(_fmt_date_pdf(entry.plan_date), cell_style),
-            Paragraph(_fmt_date_pdf(entry.actual_date), cell_style),
-            Paragraph(str(entry.actual_days or ""), cell_style),
-            Paragraph(entry.executor or "", cell_style),
-            Paragraph(f"{bp:,.0f}" if bp else "", cell_style),
-            Paragraph(f"{ba:,.0f}" if ba else "", cell_style),
-            Paragraph(entry.supplier or "", cell_style),
-        ]
-        if include_commission:
-            base_cells.append(Paragraph(f"{cm:,.0f}" if cm else "", cell_style))
-        base_cells.extend([
-            Paragraph(entry.status or "", cell_style),
-            Paragraph(entry.notes or "", cell_style),
-        ])
-        rows.append(base_cells)
-
-        color_hex = STATUS_COLORS.get(entry.status)
-        if color_hex:
-            row_styles.append({'row_idx': len(rows), 'bg': color_hex})
-
-    # Строка ИТОГО
-    grand_idx = len(rows) + 1
-    num_cols = len(headers)
-    total_cells = [Paragraph('<b>ИТОГО:</b>', bold_style)]
-    total_cells.extend([Paragraph('', cell_style)] * 4)  # даты, дней, исполнитель
-    total_cells.append(Paragraph(f'<b>{total_planned:,.0f}</b>', bold_style))
-    total_cells.append(Paragraph(f'<b>{total_actual:,.0f}</b>', bold_style))
-    total_cells.append(Paragraph('', cell_style))  # поставщик
-    if include_commission:
-        total_cells.append(Paragraph(f'<b>{total_commission:,.0f}</b>', bold_style))
-    total_cells.extend([Paragraph('', cell_style)] * 2)  # статус, примечания
-    rows.append(total_cells)
-    row_styles.append({'row_idx': grand_idx, 'bg': COLOR_GRANDTOTAL, 'bold': True})
-
-    pdf_bytes = build_timeline_pdf(
-        title="Таблица сроков авторского надзора",
-        contract=contract,
-        headers=headers,
-        rows=rows,
-        col_widths=col_widths,
-        row_styles=row_styles,
-    )
-
-    from datetime import date
-    from urllib.parse import quote
-    today = date.today().strftime("%d.%m.%Y")
-    addr = contract.address if contract else f"надзор_{card_id}"
-    suffix = " с комиссией" if include_commission else ""
-    ru_name = f'Отчет Авторский надзор{suffix} {addr} от {today}.pdf'
-    encoded = quote(ru_name)
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition":
-                f"attachment; filename*=UTF-8''{encoded}; "
-                f"filename=supervision_timeline_{card_id}.pdf"
-        },
-    )
+    return contract_snapshot(contract), supervision_export_rows(entries)
@@ -2,19 +2,25 @@
 Роутер таблицы сроков CRM проектов (timeline).
 Подключается в main.py через app.include_router(timeline_router, prefix="/api/timeline").
 """
-import io
+import functools
 import logging
-from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from database import get_db, Employee, Contract, ProjectTimelineEntry
+from database import get_db, SessionLocal, Employee, Contract, ProjectTimelineEntry
 from auth import get_current_user
 from schemas import TimelineEntryUpdate, TimelineInitRequest
 from services.timeline_service import (
     build_project_timeline_template,
     build_template_project_timeline,
+    insert_timeline_entries,
+)
+from services.export_service import (
+    XLSX_MEDIA_TYPE, contract_snapshot, timeline_export_rows, render_response,
+    render_timeline_xlsx, render_timeline_pdf, report_date, safe_filename, zip_stream,
 )
 
 logger = logging.getLogger(__name__)
@@ -37,6 +43,67 @@ async def get_all_timelines(
     ]
 
 
+# Договоров на один запрос при пакетной выгрузке
+ARCHIVE_BATCH = 50
+
+
+@router.get("/export/archive")
+async def export_timelines_archive(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    fmt: str = Query("xlsx", pattern="^(xlsx|pdf)$"),
+    current_user: Employee = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """ZIP с таблицами сроков всех договоров за период (по дате договора).
+
+    Архив собирается по мере отдачи: файлы рендерятся по одному, договоры
+    читаются пачками по ARCHIVE_BATCH.
+    """
+    with_timeline = db.query(ProjectTimelineEntry.contract_id).distinct()
+    query = db.query(Contract.id).filter(Contract.id.in_(with_timeline))
+    if date_from:
+        query = query.filter(Contract.contract_date >= date_from.isoformat())
+    if date_to:
+        query = query.filter(Contract.contract_date <= date_to.isoformat())
+    contract_ids = [cid for (cid,) in query.order_by(Contract.id)]
+    if not contract_ids:
+        raise HTTPException(status_code=404, detail="Нет таблиц сроков за период")
+
+    period = f"{date_from or ''}_{date_to or ''}".strip('_') or 'all'
+    return StreamingResponse(
+        zip_stream(_archive_members(contract_ids, fmt)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename=timelines_{period}.zip"},
+    )
+
+
+def _archive_members(contract_ids, fmt):
+    """(имя в архиве, рендер) по договорам; своя сессия — генератор живёт дольше запроса"""
+    render = render_timeline_xlsx if fmt == 'xlsx' else render_timeline_pdf
+    db = SessionLocal()
+    try:
+        for start in range(0, len(contract_ids), ARCHIVE_BATCH):
+            batch = contract_ids[start:start + ARCHIVE_BATCH]
+            contracts = {c.id: c for c in db.query(Contract).filter(Contract.id.in_(batch))}
+            entries = {}
+            for entry in db.query(ProjectTimelineEntry).filter(
+                ProjectTimelineEntry.contract_id.in_(batch)
+            ).order_by(ProjectTimelineEntry.contract_id, ProjectTimelineEntry.sort_order):
+                entries.setdefault(entry.contract_id, []).append(entry)
+            for contract_id in batch:
+                contract = contracts.get(contract_id)
+                if contract is None:
+                    continue
+                name = safe_filename(f"{contract.contract_number or contract_id} {contract.address or ''}")
+                yield f"{name}.{fmt}", functools.partial(
+                    render, contract=contract_snapshot(contract),
+                    rows=timeline_export_rows(entries.get(contract_id, [])))
+            db.expunge_all()
+    finally:
+        db.close()
+
+
 @router.get("/{contract_id}")
 async def get_project_timeline(
     contract_id: int,
@@ -113,21 +180,7 @@ async def init_project_timeline(
             request.project_type, request.area, request.project_subtype, agent_type=contract_agent
         )
 
-    for e in entries:
-        record = ProjectTimelineEntry(
-            contract_id=contract_id,
-            stage_code=e['stage_code'],
-            stage_name=e['stage_name'],
-            stage_group=e['stage_group'],
-            substage_group=e.get('substage_group', ''),
-            executor_role=e['executor_role'],
-            is_in_contract_scope=e['is_in_contract_scope'],
-            sort_order=e['sort_order'],
-            raw_norm_days=e.get('raw_norm_days', 0),
-            cumulative_days=e.get('cumulative_days', 0),
-            norm_days=e.get('norm_days', 0)
-        )
-        db.add(record)
+    insert_timeline_entries(db, contract_id, entries)
 
     db.commit()
     return {
@@ -182,21 +235,7 @@ async def reinit_project_timeline(
             request.project_type, request.area, request.project_subtype, agent_type=contract_agent
         )
 
-    for e in entries:
-        record = ProjectTimelineEntry(
-            contract_id=contract_id,
-            stage_code=e['stage_code'],
-            stage_name=e['stage_name'],
-            stage_group=e['stage_group'],
-            substage_group=e.get('substage_group', ''),
-            executor_role=e['executor_role'],
-            is_in_contract_scope=e['is_in_contract_scope'],
-            sort_order=e['sort_order'],
-            raw_norm_days=e.get('raw_norm_days', 0),
-            cumulative_days=e.get('cumulative_days', 0),
-            norm_days=e.get('norm_days', 0)
-        )
-        db.add(record)
+    insert_timeline_entries(db, contract_id, entries)
 
     db.commit()
     return {
@@ -263,103 +302,10 @@ async def export_timeline_excel(
     db: Session = Depends(get_db)
 ):
     """Экспорт таблицы сроков CRM в Excel"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-    contract = db.query(Contract).filter(Contract.id == contract_id).first()
-    if not contract:
-        raise HTTPException(status_code=404, detail="Договор не найден")
-
-    entries = db.query(ProjectTimelineEntry).filter(
-        ProjectTimelineEntry.contract_id == contract_id
-    ).order_by(ProjectTimelineEntry.sort_order).all()
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Таблица сроков"
-
-    # Шапка
-    ws.append(["Адрес:", contract.address or ""])
-    ws.append(["Тип проекта:", contract.project_type or ""])
-    ws.append(["Площадь:", f"{contract.area or 0} м²"])
-    ws.append([])
-
-    # Заголовки таблицы
-    headers = ["Действия по этапам", "Дата", "Кол-во дней", "Норма дней", "Статус", "Исполнитель"]
-    ws.append(headers)
-
-    header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=5, column=col_idx)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center')
-        cell.border = thin_border
-
-    # Данные
-    stage_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
-    stage_font = Font(bold=True, color="FFFFFF")
-    substage_fill = PatternFill(start_color="D6E4F0", end_color="D6E4F0", fill_type="solid")
-    substage_font = Font(bold=True)
-    overdue_fill = PatternFill(start_color="F2DCDB", end_color="F2DCDB", fill_type="solid")
-
-    for entry in entries:
-        row_data = [
-            entry.stage_name,
-            entry.actual_date or "",
-            entry.actual_days or 0,
-            entry.norm_days or 0,
-            entry.status or "",
-            entry.executor_role or ""
-        ]
-        ws.append(row_data)
-        row_idx = ws.max_row
-
-        # Стили для заголовков этапов
-        if entry.executor_role == 'header':
-            for col_idx in range(1, 7):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.fill = stage_fill
-                cell.font = stage_font
-                cell.border = thin_border
-        elif entry.executor_role == 'subheader':
-            for col_idx in range(1, 7):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.fill = substage_fill
-                cell.font = substage_font
-                cell.border = thin_border
-        else:
-            for col_idx in range(1, 7):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                cell.border = thin_border
-            # Подсветка просроченных
-            if entry.actual_days and entry.norm_days and entry.actual_days > entry.norm_days:
-                for col_idx in range(1, 7):
-                    ws.cell(row=row_idx, column=col_idx).fill = overdue_fill
-
-    # Ширина колонок
-    ws.column_dimensions['A'].width = 45
-    ws.column_dimensions['B'].width = 14
-    ws.column_dimensions['C'].width = 14
-    ws.column_dimensions['D'].width = 14
-    ws.column_dimensions['E'].width = 12
-    ws.column_dimensions['F'].width = 18
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    filename = f"timeline_{contract_id}.xlsx"
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    contract, rows = _load_timeline_export(db, contract_id)
+    return await render_response(
+        render_timeline_xlsx, contract, rows,
+        media_type=XLSX_MEDIA_TYPE, filename=f"timeline_{contract_id}.xlsx",
     )
 
 
@@ -370,15 +316,17 @@ async def export_timeline_pdf(
     db: Session = Depends(get_db)
 ):
     """Экспорт таблицы сроков CRM в PDF (фирменный стиль)."""
-    from reportlab.platypus import Paragraph
-    from reportlab.lib.styles import ParagraphStyle
-    from pdf_helper import (
-        build_timeline_pdf, _font, _font_bold,
-        COLOR_HEADER_ROW, COLOR_SUBHEADER_ROW,
-        COLOR_OK, COLOR_OVERDUE, COLOR_SKIPPED,
-        COLOR_OUT_SCOPE, COLOR_SUBTOTAL, COLOR_GRANDTOTAL,
+    contract, rows = _load_timeline_export(db, contract_id)
+    address = contract.address or f"договор_{contract_id}"
+    return await render_response(
+        render_timeline_pdf, contract, rows,
+        media_type="application/pdf", filename=f"timeline_{contract_id}.pdf",
+        ru_name=f'Отчет Таблица сроков {address} от {report_date()}.pdf',
     )
 
+
+def _load_timeline_export(db: Session, contract_id: int):
+    """Снимок договора и строк таблицы сроков для рендера"""
     contract = db.query(Contract).filter(Contract.id == contract_id).first()
     if not contract:
         raise HTTPException(status_code=404, detail="Договор не найден")
@@ -386,138 +334,4 @@ async def export_timeline_pdf(
     entries = db.query(ProjectTimelineEntry).filter(
         ProjectTimelineEntry.contract_id == contract_id
     ).order_by(ProjectTimelineEntry.sort_order).all()
-
-    fn = _font()
-    fb = _font_bold()
-    cell_style = ParagraphStyle('Cell', fontName=fn, fontSize=8, leading=10)
-    bold_style = ParagraphStyle('CellB', fontName=fb, fontSize=8, leading=10)
-
-    headers = ["Этап", "Дата", "Дней", "Норма", "Статус", "Исполнитель"]
-    rows = []
-    row_styles = []
-
-    # Для подсчёта итогов
-    current_stage_group = None
-    stage_actual_sum = 0
-    stage_norm_sum = 0
-    total_actual = 0
-    total_norm = 0
-
-    def _add_subtotal(label):
-        """Вставить строку «Итого этапа»."""
-        row_idx = len(rows) + 1
-        rows.append([
-            Paragraph(f'<b>Итого {label}:</b>', bold_style),
-            Paragraph('', cell_style),
-            Paragraph(f'<b>{stage_actual_sum}</b>', bold_style),
-            Paragraph(f'<b>{stage_norm_sum}</b>', bold_style),
-            Paragraph('', cell_style),
-            Paragraph('', cell_style),
-        ])
-        row_styles.append({'row_idx': row_idx, 'bg': COLOR_SUBTOTAL, 'bold': True})
-
-    for entry in entries:
-        role = entry.executor_role or ''
-        is_header = role == 'header' and not entry.substage_group
-        is_subheader = role == 'header' and bool(entry.substage_group)
-        stage_group = entry.stage_group or ''
-        is_in_scope = entry.is_in_contract_scope if entry.is_in_contract_scope is not None else True
-
-        # Итого предыдущего этапа при смене stage_group
-        if is_header and stage_group != current_stage_group and current_stage_group and current_stage_group != 'START':
-            _add_subtotal(current_stage_group.replace('STAGE', 'Этап '))
-            stage_actual_sum = 0
-            stage_norm_sum = 0
-
-        if is_header and stage_group != current_stage_group:
-            current_stage_group = stage_group
-            stage_actual_sum = 0
-            stage_norm_sum = 0
-
-        # Вычисление статуса как в программе
-        actual_days = entry.actual_days or 0
-        norm_days_val = entry.norm_days or 0
-        status_text = entry.status or ''
-        row_bg = None
-
-        if not is_header and not is_subheader:
-            if not is_in_scope:
-                row_bg = COLOR_OUT_SCOPE
-            elif status_text == 'skipped':
-                status_text = 'Пропущен'
-                row_bg = COLOR_SKIPPED
-            elif actual_days > 0 and norm_days_val > 0:
-                if actual_days <= norm_days_val:
-                    status_text = 'В срок'
-                    row_bg = COLOR_OK
-                else:
-                    status_text = 'Просрочен'
-                    row_bg = COLOR_OVERDUE
-
-            # Накопление сумм
-            stage_actual_sum += actual_days
-            total_actual += actual_days
-            if is_in_scope:
-                stage_norm_sum += norm_days_val
-                total_norm += norm_days_val
-
-        # Строка данных
-        row_idx = len(rows) + 1  # +1 т.к. row 0 — заголовок таблицы
-        rows.append([
-            Paragraph(entry.stage_name or "", cell_style),
-            Paragraph(entry.actual_date or "", cell_style),
-            Paragraph(str(actual_days) if actual_days else "", cell_style),
-            Paragraph(str(norm_days_val) if norm_days_val else "", cell_style),
-            Paragraph(status_text, cell_style),
-            Paragraph(role if role not in ('header',) else "", cell_style),
-        ])
-
-        if is_header:
-            row_styles.append({'row_idx': row_idx, 'bg': COLOR_HEADER_ROW, 'fg': '#FFFFFF', 'bold': True})
-        elif is_subheader:
-            row_styles.append({'row_idx': row_idx, 'bg': COLOR_SUBHEADER_ROW, 'bold': True})
-        elif row_bg:
-            row_styles.append({'row_idx': row_idx, 'bg': row_bg})
-
-    # Итого последнего этапа
-    if current_stage_group and current_stage_group != 'START':
-        _add_subtotal(current_stage_group.replace('STAGE', 'Этап '))
-
-    # Общий итог
-    contract_term = getattr(contract, 'contract_term', None)
-    grand_norm = contract_term if contract_term else total_norm
-    grand_idx = len(rows) + 1
-    rows.append([
-        Paragraph('<b>ИТОГО ВСЕХ ЭТАПОВ:</b>', bold_style),
-        Paragraph('', cell_style),
-        Paragraph(f'<b>{total_actual}</b>', bold_style),
-        Paragraph(f'<b>{grand_norm}</b>', bold_style),
-        Paragraph('', cell_style),
-        Paragraph('', cell_style),
-    ])
-    row_styles.append({'row_idx': grand_idx, 'bg': COLOR_GRANDTOTAL, 'bold': True})
-
-    pdf_bytes = build_timeline_pdf(
-        title="Таблица сроков проекта",
-        contract=contract,
-        headers=headers,
-        rows=rows,
-        col_widths=[180, 60, 50, 50, 50, 80],
-        row_styles=row_styles,
-    )
-
-    from datetime import date
-    from urllib.parse import quote
-    today = date.today().strftime("%d.%m.%Y")
-    address = contract.address or f"договор_{contract_id}"
-    ru_name = f'Отчет Таблица сроков {address} от {today}.pdf'
-    encoded = quote(ru_name)
-    return StreamingResponse(
-        io.BytesIO(pdf_bytes),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition":
-                f"attachment; filename*=UTF-8''{encoded}; "
-                f"filename=timeline_{contract_id}.pdf"
-        },
-    )
+    return contract_snapshot(contract), timeline_export_rows(entries)
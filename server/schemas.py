@@ -418,6 +418,32 @@ class NotificationResponse(BaseModel):
         from_attributes = True
 
 
+class NotificationMarkReadRequest(BaseModel):
+    """Отметить прочитанными уведомления по списку id"""
+    ids: List[int] = Field(..., max_length=500)
+
+
+class NotificationReadResponse(BaseModel):
+    """Итог отметки прочитанными и новое значение счётчика"""
+    updated: int
+    unread_count: int
+
+
+class DueItemResponse(BaseModel):
+    """Срок из индекса due_items (карточка, исполнитель стадии, стадия согласования)"""
+    id: int
+    source_type: str
+    source_id: int
+    crm_card_id: int
+    contract_id: Optional[int] = None
+    employee_id: Optional[int] = None
+    title: Optional[str] = None
+    due_date: date
+    status: str
+    days_left: int
+    overdue: bool
+
+
 # =========================
 # СИНХРОНИЗАЦИЯ
 # =========================
@@ -1285,6 +1311,13 @@ class NormDaysPreviewRequest(BaseModel):
     floors: Optional[int] = 1
 
 
+class NormDaysReapplyRequest(BaseModel):
+    """Запрос на пересчёт таблиц сроков договоров по шаблону нормо-дней"""
+    project_type: str = Field(..., min_length=1, max_length=50)
+    project_subtype: str = Field(..., min_length=1, max_length=100)
+    agent_type: str = Field(default='Все агенты', max_length=100)
+
+
 # =========================
 # БЛОКИРОВКИ
 # =========================
@@ -1296,6 +1329,17 @@ class LockRequest(BaseModel):
     employee_id: Optional[int] = None
 
 
+class LockKey(BaseModel):
+    """Запись под блокировкой"""
+    entity_type: str
+    entity_id: int
+
+
+class LockRenewRequest(BaseModel):
+    """Продление блокировок клиента (keys не задан — все блокировки пользователя)"""
+    keys: Optional[List[LockKey]] = Field(None, max_length=500)
+
+
 # =========================
 # УВЕДОМЛЕНИЯ
 # =========================
@@ -0,0 +1,737 @@
+"""
+Куб аналитики для страницы «Отчёты» (dashboard_router /reports/*).
+
+Раньше каждый отчёт загружал все договоры (часто ещё все карточки надзора
+и записи сроков), разбирал строковые даты договоров в Python, раскладывал
+их по периодам и заново считал сравнение с прошлым периодом.
+
+Факты — таблица analytics_contract_facts, строка на договор:
+- измерения: период (год, квартал, месяц из разобранной contract_date),
+  agent_type, city, project_type, project_subtype, клиент и его вид;
+- меры: сумма, площадь, выполненные CRM-карточки и стадии (всего, в срок,
+  с опозданием, отклонение в днях) — сроки хранятся строками, поэтому
+  считаются при записи, а не при чтении.
+Гранулярность — договор: число уникальных клиентов (всего, новые,
+повторные) не складывается между ячейками куба, а срезы по периодам и
+измерениям — один GROUP BY по узкой таблице с индексом (year, month).
+Воронка, длительности стадий и надзор соединяют факты с карточками и
+записями сроков в SQL.
+
+Актуальность:
+- install() подписывает фабрику сессий: после flush договоров, клиентов,
+  CRM-карточек и исполнителей стадий факты затронутых договоров
+  пересчитываются в той же транзакции (upsert); массовые query.update()/
+  delete() по этим таблицам — через do_orm_execute;
+- ensure_cube() при старте заполняет пустой куб, rebuild() — полная
+  пересборка: python -m services.analytics_cube rebuild.
+"""
+import argparse
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, case, event, func, literal, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import (
+    AnalyticsContractFact, Agent, Client, Contract, CRMCard, ProjectTimelineEntry,
+    StageExecutor, SupervisionCard, SupervisionTimelineEntry,
+)
+
+logger = logging.getLogger(__name__)
+
+F = AnalyticsContractFact
+
+SUPERVISION_TYPE = 'Авторский надзор'
+COMPLETED_COLUMN = 'Выполненный проект'
+PAUSED_COLUMN = 'В ожидании'
+ARCHIVED_COLUMNS = ('Выполненный проект', 'СДАН', 'РАСТОРГНУТ')
+TIMELINE_DONE_STATUSES = ('Завершено', 'Выполнено', 'completed')
+NOT_SET = 'Не указан'
+
+# Договоров за один проход пересборки
+REBUILD_CHUNK = 1000
+
+CRM_STAGE_ORDER = {
+    'Шаблонный': [
+        'Новый заказ', 'В ожидании',
+        'Стадия 1: планировочные решения',
+        'Стадия 2: чертежи',
+        'Стадия 3: 3D визуализация',
+        'Выполненный проект',
+    ],
+    'Индивидуальный': [
+        'Новый заказ', 'В ожидании',
+        'Стадия 1: планировочные решения',
+        'Стадия 2: концепция',
+        'Стадия 3: чертежи',
+        'Выполненный проект',
+    ],
+}
+
+SUPERVISION_STAGE_NAMES = [
+    'Стадия 1: Закупка керамогранита',
+    'Стадия 2: Закупка плитки',
+    'Стадия 3: Закупка паркета',
+    'Стадия 4: Закупка сантехники',
+    'Стадия 5: Закупка мебели кухни',
+    'Стадия 6: Закупка дверей',
+    'Стадия 7: Закупка электрики',
+    'Стадия 8: Закупка освещения',
+    'Стадия 9: Закупка сантехники и аксессуаров',
+    'Стадия 10: Закупка мебели',
+    'Стадия 11: Закупка текстиля',
+    'Стадия 12: Закупка декора',
+]
+
+DISTRIBUTION_COLUMNS = {
+    'city': F.city,
+    'agent': F.agent_type,
+    'project_type': F.project_type,
+    'subtype': F.project_subtype,
+}
+
+
+# =============================================================================
+# ФАКТЫ
+# =============================================================================
+
+def parse_contract_date(value: Optional[str]) -> Optional[datetime]:
+    """Дата договора из форматов ДД.ММ.ГГГГ или YYYY-MM-DD (None — не разобрана)"""
+    if not value:
+        return None
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def _parse_deadline(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.strptime(value.strip(), '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _client_kind(client_type: Optional[str]) -> Optional[str]:
+    client_type = client_type or ''
+    if 'Физическое' in client_type:
+        return 'individual'
+    if 'Юридическое' in client_type:
+        return 'legal'
+    return None
+
+
+def compute_facts(conn, contract_ids: Iterable[int]) -> Dict[int, dict]:
+    """Строки фактов для договоров (отсутствующих договоров в ответе нет)"""
+    ids = list(contract_ids)
+    facts: Dict[int, dict] = {}
+    if not ids:
+        return facts
+
+    contracts = conn.execute(
+        select(Contract.id, Contract.client_id, Contract.contract_date, Contract.agent_type,
+               Contract.city, Contract.project_type, Contract.project_subtype,
+               Contract.total_amount, Contract.area, Client.client_type)
+        .outerjoin(Client, Client.id == Contract.client_id)
+        .where(Contract.id.in_(ids))
+    )
+    for (contract_id, client_id, contract_date, agent_type, city, project_type,
+         project_subtype, total_amount, area, client_type) in contracts:
+        dt = parse_contract_date(contract_date)
+        facts[contract_id] = {
+            'contract_id': contract_id, 'client_id': client_id,
+            'client_kind': _client_kind(client_type),
+            'date_key': dt.year * 10000 + dt.month * 100 + dt.day if dt else None,
+            'year': dt.year if dt else None,
+            'quarter': (dt.month - 1) // 3 + 1 if dt else None,
+            'month': dt.month if dt else None,
+            'agent_type': agent_type, 'city': city,
+            'project_type': project_type, 'project_subtype': project_subtype,
+            'amount': total_amount or 0.0, 'area': area or 0.0,
+            'crm_completed': 0, 'crm_on_time': 0, 'crm_overdue': 0, 'crm_deviation_days': 0,
+            'stages_completed': 0, 'stages_on_time': 0, 'stages_overdue': 0,
+        }
+
+    cards = conn.execute(
+        select(CRMCard.contract_id, CRMCard.deadline, CRMCard.updated_at)
+        .where(CRMCard.contract_id.in_(ids), CRMCard.column_name == COMPLETED_COLUMN)
+    )
+    for contract_id, deadline, updated_at in cards:
+        fact = facts.get(contract_id)
+        if fact is None:
+            continue
+        fact['crm_completed'] += 1
+        deadline_dt = _parse_deadline(deadline) if deadline and updated_at else None
+        if deadline_dt is None:
+            continue
+        fact['crm_deviation_days'] += (updated_at - deadline_dt).days
+        if updated_at <= deadline_dt:
+            fact['crm_on_time'] += 1
+        else:
+            fact['crm_overdue'] += 1
+
+    stages = conn.execute(
+        select(CRMCard.contract_id, StageExecutor.deadline, StageExecutor.completed_date)
+        .join(CRMCard, CRMCard.id == StageExecutor.crm_card_id)
+        .where(CRMCard.contract_id.in_(ids), StageExecutor.completed == True)
+    )
+    for contract_id, deadline, completed_date in stages:
+        fact = facts.get(contract_id)
+        if fact is None:
+            continue
+        fact['stages_completed'] += 1
+        deadline_dt = _parse_deadline(deadline) if deadline and completed_date else None
+        if deadline_dt is None:
+            continue
+        if completed_date <= deadline_dt:
+            fact['stages_on_time'] += 1
+        else:
+            fact['stages_overdue'] += 1
+    return facts
+
+
+def _upsert(conn, rows: List[dict]):
+    insert = pg_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+    stmt = insert(F)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[F.contract_id],
+        set_={column.name: stmt.excluded[column.name]
+              for column in F.__table__.columns if column.name != 'contract_id'},
+    )
+    conn.execute(stmt, rows)
+
+
+def refresh_contracts(conn, contract_ids: Iterable[int]) -> int:
+    """Пересчитать факты договоров; удалённые договоры убираются из куба"""
+    ids = sorted({i for i in contract_ids if i is not None})
+    for start in range(0, len(ids), REBUILD_CHUNK):
+        chunk = ids[start:start + REBUILD_CHUNK]
+        facts = compute_facts(conn, chunk)
+        gone = [i for i in chunk if i not in facts]
+        if gone:
+            conn.execute(F.__table__.delete().where(F.contract_id.in_(gone)))
+        if facts:
+            _upsert(conn, list(facts.values()))
+    return len(ids)
+
+
+def rebuild(conn) -> int:
+    """Полная пересборка куба; число договоров"""
+    conn.execute(F.__table__.delete())
+    ids = [row[0] for row in conn.execute(select(Contract.id).order_by(Contract.id))]
+    return refresh_contracts(conn, ids)
+
+
+def ensure_cube(conn) -> bool:
+    """Заполнить пустой куб при наличии договоров (новая таблица на старой БД)"""
+    if conn.execute(select(F.contract_id).limit(1)).first() is not None:
+        return False
+    if conn.execute(select(Contract.id).limit(1)).first() is None:
+        return False
+    count = rebuild(conn)
+    logger.info(f"Куб аналитики заполнен: {count} договоров")
+    return True
+
+
+# =============================================================================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =============================================================================
+
+_PENDING = 'analytics_cube_pending'
+
+
+def _after_flush(session, flush_context):
+    contracts, clients, cards = set(), set(), set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Contract):
+            contracts.add(obj.id)
+        elif isinstance(obj, CRMCard):
+            contracts.add(obj.contract_id)
+        elif isinstance(obj, StageExecutor):
+            cards.add(obj.crm_card_id)
+        elif isinstance(obj, Client) and obj not in session.new:
+            clients.add(obj.id)
+    if contracts or clients or cards:
+        pending = session.info.setdefault(_PENDING, [set(), set(), set()])
+        pending[0] |= contracts
+        pending[1] |= clients
+        pending[2] |= cards
+
+
+def _after_flush_postexec(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    contracts, clients, cards = pending
+    conn = session.connection()
+    if clients:
+        contracts |= {row[0] for row in conn.execute(
+            select(Contract.id).where(Contract.client_id.in_(clients)))}
+    if cards:
+        contracts |= {row[0] for row in conn.execute(
+            select(CRMCard.contract_id).where(CRMCard.id.in_(cards)))}
+    refresh_contracts(conn, contracts)
+
+
+# Таблицы, массовые UPDATE/DELETE которых меняют факты
+_BULK_MODELS = {model.__tablename__: model for model in (Contract, Client, CRMCard, StageExecutor)}
+
+
+def _contracts_of(conn, model, ids: List[int]) -> set:
+    """Договоры, к которым относятся строки model с данными id"""
+    if not ids:
+        return set()
+    if model is Contract:
+        return set(ids)
+    if model is Client:
+        query = select(Contract.id).where(Contract.client_id.in_(ids))
+    elif model is CRMCard:
+        query = select(CRMCard.contract_id).where(CRMCard.id.in_(ids))
+    else:
+        query = select(CRMCard.contract_id).where(
+            CRMCard.id.in_(select(StageExecutor.crm_card_id).where(StageExecutor.id.in_(ids))))
+    return {row[0] for row in conn.execute(query) if row[0] is not None}
+
+
+def _do_orm_execute(orm_execute_state):
+    """Массовые UPDATE/DELETE договоров, клиентов, карточек и исполнителей"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    table = getattr(orm_execute_state.statement, 'table', None)
+    model = _BULK_MODELS.get(getattr(table, 'name', None))
+    if model is None:
+        return None
+    conn = orm_execute_state.session.connection()
+    params = orm_execute_state.parameters
+    if isinstance(params, (list, tuple)):
+        # UPDATE по первичному ключу со списком параметров: id берём из параметров
+        ids = [row.get('id') for row in params if isinstance(row, dict)]
+        if not ids or None in ids:
+            logger.warning("Куб аналитики: массовый %s %s без id в параметрах не отслежен",
+                           'UPDATE' if orm_execute_state.is_update else 'DELETE', table.name)
+            return None
+    else:
+        ids_query = select(model.id)
+        whereclause = orm_execute_state.statement.whereclause
+        if whereclause is not None:
+            ids_query = ids_query.where(whereclause)
+        ids = [row[0] for row in conn.execute(ids_query)]
+    contracts = _contracts_of(conn, model, ids)
+    result = orm_execute_state.invoke_statement()
+    if orm_execute_state.is_update:
+        # UPDATE мог перенести строки к другим договорам (contract_id, crm_card_id)
+        contracts |= _contracts_of(conn, model, ids)
+    refresh_contracts(conn, contracts)
+    return result
+
+
+def install(session_factory=None):
+    """Пересчитывать факты при flush сессий фабрики (по умолчанию SessionLocal)"""
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
+        event.listen(session_factory, 'after_flush_postexec', _after_flush_postexec)
+        event.listen(session_factory, 'do_orm_execute', _do_orm_execute)
+
+
+# =============================================================================
+# ОТЧЁТЫ
+# =============================================================================
+
+def _period(year: Optional[int], quarter: Optional[int], month: Optional[int]) -> list:
+    conditions = []
+    if year:
+        conditions.append(F.year == year)
+    if quarter:
+        conditions.append(F.quarter == quarter)
+    if month:
+        conditions.append(F.month == month)
+    return conditions
+
+
+def _key_period(key, year: Optional[int], quarter: Optional[int], month: Optional[int]):
+    """Условие «дата YYYYMMDD попадает в период»"""
+    key_month = key // 100 % 100
+    conditions = [key.isnot(None)]
+    if year:
+        conditions.append(key // 10000 == year)
+    if quarter:
+        conditions.append((key_month + 2) // 3 == quarter)
+    if month:
+        conditions.append(key_month == month)
+    return and_(*conditions)
+
+
+def _dimensions(agent_type=None, city=None, project_type=None) -> list:
+    conditions = []
+    if agent_type:
+        conditions.append(F.agent_type == agent_type)
+    if city:
+        conditions.append(F.city == city)
+    if project_type:
+        conditions.append(F.project_type == project_type)
+    return conditions
+
+
+def _pct(part, whole) -> float:
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+def _trend(current, previous) -> float:
+    return round((current - previous) / previous * 100, 1) if previous > 0 else 0.0
+
+
+def _client_stats(base: list):
+    """Первая дата и число договоров каждого клиента в пределах base"""
+    return (select(F.client_id, func.min(F.date_key).label('first_key'), func.count().label('contracts'))
+            .where(*base).group_by(F.client_id).subquery())
+
+
+def _active_agents(db):
+    return db.query(Agent).filter(Agent.status == 'активный').order_by(Agent.name).all()
+
+
+def summary(db, year=None, quarter=None, month=None, agent_type=None, city=None,
+            project_type=None) -> dict:
+    """KPI-метрики с разбивкой по агентам"""
+    base = [F.project_type != SUPERVISION_TYPE, *_dimensions(agent_type, city, project_type)]
+    period = _period(year, quarter, month)
+
+    totals = db.execute(select(
+        func.count(), func.coalesce(func.sum(F.amount), 0.0), func.coalesce(func.sum(F.area), 0.0),
+        func.coalesce(func.sum(F.crm_completed), 0), func.coalesce(func.sum(F.crm_on_time), 0),
+        func.coalesce(func.sum(F.stages_completed), 0), func.coalesce(func.sum(F.stages_on_time), 0),
+    ).where(*base, *period)).one()
+    total_contracts, total_amount, total_area, crm_completed, crm_on_time, stages_completed, stages_on_time = totals
+
+    # Клиенты — один проход: первая дата, число договоров, есть ли договор в периоде
+    in_period = and_(*period) if period else true()
+    clients = (select(func.min(F.date_key).label('first_key'), func.count().label('contracts'),
+                      func.max(case((in_period, 1), else_=0)).label('in_period'))
+               .where(*base).group_by(F.client_id).subquery())
+    listed = clients.c.in_period == 1
+    total_clients, new_clients, returning_clients = db.execute(select(
+        func.coalesce(func.sum(case((listed, 1), else_=0)), 0),
+        func.coalesce(func.sum(case(
+            (and_(listed, _key_period(clients.c.first_key, year, quarter, month)), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((and_(listed, clients.c.contracts > 1), 1), else_=0)), 0),
+    )).one()
+
+    trend_clients = trend_contracts = trend_amount = 0.0
+    if year:
+        prev_clients, prev_contracts, prev_amount = db.execute(select(
+            func.count(func.distinct(F.client_id)), func.count(), func.coalesce(func.sum(F.amount), 0.0),
+        ).where(*base, *_period(year - 1, quarter, month))).one()
+        trend_clients = _trend(total_clients, prev_clients)
+        trend_contracts = _trend(total_contracts, prev_contracts)
+        trend_amount = _trend(total_amount, prev_amount)
+
+    agent_key = func.coalesce(F.agent_type, NOT_SET)
+    agent_data = {row[0]: row[1:] for row in db.execute(
+        select(agent_key, func.count(func.distinct(F.client_id)), func.count(),
+               func.sum(F.amount), func.sum(F.area))
+        .where(*base, *period).group_by(agent_key)
+    )}
+    by_agent = []
+    for agent in _active_agents(db):
+        clients, contracts, amount, area = agent_data.get(agent.name, (0, 0, 0.0, 0.0))
+        by_agent.append({
+            'agent_name': agent.name,
+            'agent_color': agent.color,
+            'clients': clients,
+            'contracts': contracts,
+            'amount': round(amount, 2),
+            'area': round(area, 2),
+        })
+
+    return {
+        'total_clients': total_clients,
+        'new_clients': new_clients,
+        'returning_clients': returning_clients,
+        'total_contracts': total_contracts,
+        'total_amount': round(total_amount, 2),
+        'avg_amount': round(total_amount / total_contracts if total_contracts else 0.0, 2),
+        'total_area': round(total_area, 2),
+        'avg_area': round(total_area / total_contracts if total_contracts else 0.0, 2),
+        'contracts_on_time_pct': _pct(crm_on_time, crm_completed),
+        'stages_on_time_pct': _pct(stages_on_time, stages_completed),
+        'trend_clients': trend_clients,
+        'trend_contracts': trend_contracts,
+        'trend_amount': trend_amount,
+        'by_agent': by_agent,
+    }
+
+
+def _periods(year: int, granularity: str):
+    """[(номер, ключ периода)] года: месяцы или кварталы"""
+    if granularity == 'quarter':
+        return F.quarter, [(q, f"{year}-Q{q}") for q in range(1, 5)]
+    return F.month, [(m, f"{year}-{m:02d}") for m in range(1, 13)]
+
+
+def clients_dynamics(db, year: int, granularity: str = 'month') -> List[dict]:
+    """Динамика клиентов по месяцам/кварталам года"""
+    base = [F.project_type != SUPERVISION_TYPE]
+    period_column, periods = _periods(year, granularity)
+    stats = _client_stats(base)
+    first_month = stats.c.first_key // 100 % 100
+    first_period = (first_month + 2) // 3 if granularity == 'quarter' else first_month
+    is_new = and_(stats.c.first_key // 10000 == year, first_period == period_column)
+
+    def distinct_clients(condition):
+        return func.count(func.distinct(case((condition, F.client_id))))
+
+    rows = {row[0]: row[1:] for row in db.execute(
+        select(period_column, func.count(func.distinct(F.client_id)), distinct_clients(is_new),
+               distinct_clients(stats.c.contracts > 1),
+               distinct_clients(F.client_kind == 'individual'), distinct_clients(F.client_kind == 'legal'))
+        .join(stats, stats.c.client_id == F.client_id)
+        .where(*base, F.year == year)
+        .group_by(period_column)
+    )}
+    result = []
+    for number, key in periods:
+        total, new, returning, individual, legal = rows.get(number, (0, 0, 0, 0, 0))
+        result.append({
+            'period': key,
+            'new_clients': new,
+            'returning_clients': returning,
+            'individual': individual,
+            'legal': legal,
+            'total': total,
+        })
+    return result
+
+
+def contracts_dynamics(db, year: int, granularity: str = 'month', agent_type=None,
+                       city=None) -> List[dict]:
+    """Динамика договоров по месяцам/кварталам: Индивидуальные (и прочие) и Шаблонные"""
+    period_column, periods = _periods(year, granularity)
+    template = F.project_type == 'Шаблонный'
+    rows = {row[0]: row[1:] for row in db.execute(
+        select(period_column,
+               func.sum(case((template, 0), else_=1)), func.sum(case((template, 1), else_=0)),
+               func.sum(case((template, 0.0), else_=F.amount)), func.sum(case((template, F.amount), else_=0.0)))
+        .where(F.project_type != SUPERVISION_TYPE, *_dimensions(agent_type, city), F.year == year)
+        .group_by(period_column)
+    )}
+    result = []
+    for number, key in periods:
+        individual_count, template_count, individual_amount, template_amount = rows.get(number, (0, 0, 0.0, 0.0))
+        result.append({
+            'period': key,
+            'individual_count': individual_count,
+            'template_count': template_count,
+            'supervision_count': 0,
+            'total_count': individual_count + template_count,
+            'individual_amount': round(individual_amount, 2),
+            'template_amount': round(template_amount, 2),
+            'supervision_amount': 0.0,
+            'total_amount': round(individual_amount + template_amount, 2),
+        })
+    return result
+
+
+def crm_analytics(db, project_type: str, year=None, quarter=None, month=None) -> dict:
+    """Воронка стадий CRM, соблюдение сроков и длительность стадий"""
+    scope = [F.project_type == project_type, *_period(year, quarter, month)]
+    (contracts, projects_on_time, projects_overdue, deviation_days,
+     stages_on_time, stages_overdue) = db.execute(select(
+        func.count(), func.coalesce(func.sum(F.crm_on_time), 0), func.coalesce(func.sum(F.crm_overdue), 0),
+        func.coalesce(func.sum(F.crm_deviation_days), 0),
+        func.coalesce(func.sum(F.stages_on_time), 0), func.coalesce(func.sum(F.stages_overdue), 0),
+    ).where(*scope)).one()
+
+    if not contracts:
+        return {
+            'funnel': [],
+            'on_time_stats': {
+                'projects_on_time': 0, 'projects_overdue': 0, 'projects_total': 0,
+                'projects_pct': 0.0, 'stages_on_time': 0, 'stages_overdue': 0,
+                'stages_total': 0, 'stages_pct': 0.0, 'avg_deviation_days': 0.0,
+            },
+            'stage_durations': [],
+            'paused_count': 0,
+            'active_count': 0,
+            'archived_count': 0,
+        }
+
+    columns = db.execute(
+        select(CRMCard.column_name, func.count())
+        .join(F, F.contract_id == CRMCard.contract_id)
+        .where(*scope)
+        .group_by(CRMCard.column_name)
+        .order_by(func.min(CRMCard.id))
+    ).all()
+    column_counts = dict(columns)
+
+    actual = func.coalesce(ProjectTimelineEntry.actual_days, 0)
+    norm = func.coalesce(ProjectTimelineEntry.norm_days, 0)
+    timeline = db.execute(
+        select(ProjectTimelineEntry.stage_name, func.count(), func.sum(actual), func.max(norm),
+               func.sum(case((actual <= norm, 1), else_=0)),
+               func.sum(case((actual > 0, actual), else_=0)), func.sum(case((actual > 0, 1), else_=0)))
+        .join(F, F.contract_id == ProjectTimelineEntry.contract_id)
+        .where(*scope)
+        .group_by(ProjectTimelineEntry.stage_name)
+        .order_by(func.min(ProjectTimelineEntry.id))
+    ).all()
+    positive_days = {name: (days, count) for name, _, _, _, _, days, count in timeline}
+
+    stage_order = CRM_STAGE_ORDER.get(project_type, CRM_STAGE_ORDER['Индивидуальный'])
+    funnel_names = stage_order + [name for name, _ in columns if name not in stage_order]
+    funnel = []
+    for name in funnel_names:
+        days, count = positive_days.get(name, (0, 0))
+        funnel.append({
+            'stage': name,
+            'count': column_counts.get(name, 0),
+            'avg_days': round(days / count, 1) if count else 0.0,
+        })
+
+    stage_durations = [{
+        'stage': name,
+        'avg_actual_days': round(total_days / entries, 1),
+        'norm_days': float(stage_norm),
+        'on_time_pct': _pct(on_time, entries) if stage_norm > 0 else 0.0,
+    } for name, entries, total_days, stage_norm, on_time, _, _ in timeline]
+
+    projects_total = projects_on_time + projects_overdue
+    stages_total = stages_on_time + stages_overdue
+    archived_count = sum(column_counts.get(name, 0) for name in ARCHIVED_COLUMNS)
+    paused_count = column_counts.get(PAUSED_COLUMN, 0)
+    return {
+        'funnel': funnel,
+        'on_time_stats': {
+            'projects_on_time': projects_on_time,
+            'projects_overdue': projects_overdue,
+            'projects_total': projects_total,
+            'projects_pct': _pct(projects_on_time, projects_total),
+            'stages_on_time': stages_on_time,
+            'stages_overdue': stages_overdue,
+            'stages_total': stages_total,
+            'stages_pct': _pct(stages_on_time, stages_total),
+            'avg_deviation_days': round(deviation_days / projects_total, 1) if projects_total else 0.0,
+        },
+        'stage_durations': stage_durations,
+        'paused_count': paused_count,
+        'active_count': sum(n for _, n in columns) - archived_count - paused_count,
+        'archived_count': archived_count,
+    }
+
+
+def supervision_analytics(db, year=None, quarter=None, month=None) -> dict:
+    """Авторский надзор: карточки по типам, агентам, городам; стадии, бюджет, дефекты"""
+    period = _period(year, quarter, month)
+
+    def cards(*columns):
+        return select(*columns).select_from(SupervisionCard).join(
+            F, F.contract_id == SupervisionCard.contract_id).where(*period)
+
+    total, active, individual, template = db.execute(cards(
+        func.count(),
+        func.coalesce(func.sum(case((SupervisionCard.column_name.in_(ARCHIVED_COLUMNS), 0), else_=1)), 0),
+        func.coalesce(func.sum(case((F.project_type == 'Индивидуальный', 1), else_=0)), 0),
+        func.coalesce(func.sum(case((F.project_type == 'Шаблонный', 1), else_=0)), 0),
+    )).one()
+
+    agent_key = func.coalesce(F.agent_type, NOT_SET)
+    agent_counter = dict(db.execute(cards(agent_key, func.count()).group_by(agent_key)).all())
+    by_agent = [{
+        'agent_name': agent.name,
+        'agent_color': agent.color,
+        'count': agent_counter.get(agent.name, 0),
+    } for agent in _active_agents(db)]
+
+    city_key = func.coalesce(F.city, NOT_SET)
+    by_city = [{'city': city, 'count': count} for city, count in db.execute(
+        cards(city_key, func.count()).group_by(city_key)
+        .order_by(func.count().desc(), func.min(SupervisionCard.id))
+    )]
+
+    done = SupervisionTimelineEntry.status.in_(TIMELINE_DONE_STATUSES)
+    entries = cards().join(SupervisionTimelineEntry,
+                           SupervisionTimelineEntry.supervision_card_id == SupervisionCard.id)
+    stage_counts = {name: (active_n, completed_n) for name, active_n, completed_n in db.execute(
+        entries.with_only_columns(
+            SupervisionTimelineEntry.stage_name,
+            func.sum(case((done, 0), else_=1)), func.sum(case((done, 1), else_=0)),
+        ).group_by(SupervisionTimelineEntry.stage_name)
+    )}
+    stages = [{'stage': name, 'active': stage_counts.get(name, (0, 0))[0],
+               'completed': stage_counts.get(name, (0, 0))[1]} for name in SUPERVISION_STAGE_NAMES]
+
+    planned, actual, savings, defects_found, defects_resolved, site_visits = db.execute(
+        entries.with_only_columns(*(
+            func.coalesce(func.sum(func.coalesce(column, 0)), 0) for column in (
+                SupervisionTimelineEntry.budget_planned, SupervisionTimelineEntry.budget_actual,
+                SupervisionTimelineEntry.budget_savings, SupervisionTimelineEntry.defects_found,
+                SupervisionTimelineEntry.defects_resolved, SupervisionTimelineEntry.site_visits,
+            )
+        ))
+    ).one()
+
+    return {
+        'total': total,
+        'active': active,
+        'by_project_type': {
+            'individual': individual,
+            'template': template,
+        },
+        'by_agent': by_agent,
+        'by_city': by_city,
+        'stages': stages,
+        'budget': {
+            'total_planned': round(planned, 2),
+            'total_actual': round(actual, 2),
+            'total_savings': round(savings, 2),
+            'savings_pct': _pct(savings, planned) if planned > 0 else 0.0,
+        },
+        'defects': {
+            'found': defects_found,
+            'resolved': defects_resolved,
+            'resolution_pct': _pct(defects_resolved, defects_found) if defects_found > 0 else 0.0,
+        },
+        'site_visits': site_visits,
+    }
+
+
+def distribution(db, dimension: str, year=None, quarter=None, month=None) -> List[dict]:
+    """Распределение договоров по измерению (city|agent|project_type|subtype)"""
+    column = DISTRIBUTION_COLUMNS.get(dimension)
+    key = func.coalesce(column, NOT_SET) if column is not None else literal('Неизвестно')
+    rows = db.execute(
+        select(key, func.count(), func.sum(F.amount), func.sum(F.area))
+        .where(F.project_type != SUPERVISION_TYPE, *_period(year, quarter, month))
+        .group_by(key)
+        .order_by(func.count().desc(), func.min(F.contract_id))
+    )
+    return [{'name': name, 'count': count, 'amount': round(amount, 2), 'area': round(area, 2)}
+            for name, count, amount, area in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Куб аналитики отчётов")
+    parser.add_argument('command', choices=['rebuild'], help="rebuild — полная пересборка фактов")
+    parser.add_argument('--database-url', help="БД (по умолчанию DATABASE_URL сервера)")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+
+    with engine.begin() as conn:
+        count = rebuild(conn)
+    print(f"Куб аналитики пересобран: {count} договоров")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Фоновый расчёт сроков и просрочек — индекс due_items.
+
+Дедлайны хранятся строками в CRMCard, StageExecutor и
+ApprovalStageDeadline; раньше просрочку каждый раз заново вычисляли UI
+(на отрисовке карточки) и аналитика (на каждый запрос). DeadlineEvaluator,
+запущенный при старте приложения, раз в EVALUATE_INTERVAL секунд:
+
+1. сверяет due_items с источниками (refresh_due_items): новые сроки
+   добавляются, изменённые обновляются, выполненные и архивные
+   закрываются (status='closed'), карточки на паузе — status='paused';
+2. пересчитывает days_left — рабочих дней до срока (business_calendar);
+3. ставит уведомления 'deadline' при достижении порога DEADLINE_THRESHOLDS
+   (notify_due_items) — ровно один раз на порог: порог фиксируется
+   условным UPDATE в одной транзакции с уведомлением, поэтому два
+   uvicorn-воркера не отправят одно уведомление дважды. Перенос срока
+   сбрасывает отправленные пороги.
+
+Клиенты и аналитика читают готовое состояние через GET /deadlines/upcoming.
+"""
+import asyncio
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import (
+    SessionLocal, DueItem, CRMCard, Contract, StageExecutor, ApprovalStageDeadline,
+)
+from services.business_calendar import get_calendar
+
+logger = logging.getLogger(__name__)
+
+SOURCE_CRM_CARD = 'crm_card'
+SOURCE_STAGE_EXECUTOR = 'stage_executor'
+SOURCE_APPROVAL_STAGE = 'approval_stage'
+
+# Период пересчёта (секунды)
+EVALUATE_INTERVAL = 300.0
+# Пороги уведомлений — рабочих дней до срока; -1 — срок прошёл
+DEADLINE_THRESHOLDS = (3, 1, 0, -1)
+
+ARCHIVED_CONTRACT_STATUSES = ('СДАН', 'РАСТОРГНУТ', 'АВТОРСКИЙ НАДЗОР')
+DONE_COLUMN = 'Выполненный проект'
+PAUSED_COLUMN = 'В ожидании'
+
+_SYNCED_FIELDS = ('crm_card_id', 'contract_id', 'employee_id', 'title', 'due_date', 'status', 'days_left')
+
+
+def parse_deadline(value) -> Optional[date]:
+    """Строковый дедлайн 'YYYY-MM-DD[...]' -> date; пусто или мусор -> None"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def working_days_left(today: date, due: date) -> int:
+    """Рабочих дней от today до due (today не считается, due считается); < 0 — просрочка"""
+    calendar = get_calendar()
+    if due >= today:
+        return calendar.working_days_between(today, due)
+    return -max(calendar.working_days_between(due, today), 1)
+
+
+def threshold_for(days_left: Optional[int]) -> Optional[int]:
+    """Наименьший достигнутый порог; None — до срока дальше первого порога"""
+    if days_left is None:
+        return None
+    for threshold in sorted(DEADLINE_THRESHOLDS):
+        if days_left <= threshold:
+            return threshold
+    return None
+
+
+def collect_due_sources(db: Session) -> Dict[Tuple[str, int], dict]:
+    """Сроки из CRMCard, StageExecutor и ApprovalStageDeadline: (тип, id) -> поля DueItem"""
+    sources = {}
+    cards = {}
+    rows = db.query(
+        CRMCard.id, CRMCard.contract_id, CRMCard.deadline, CRMCard.column_name, CRMCard.paused_at,
+        CRMCard.senior_manager_id, CRMCard.manager_id, Contract.status, Contract.contract_number,
+    ).outerjoin(Contract, Contract.id == CRMCard.contract_id).all()
+    for row in rows:
+        if row.status in ARCHIVED_CONTRACT_STATUSES or row.column_name == DONE_COLUMN:
+            state = 'closed'
+        elif row.paused_at is not None or row.column_name == PAUSED_COLUMN:
+            state = 'paused'
+        else:
+            state = 'open'
+        responsible = row.senior_manager_id or row.manager_id
+        label = f"Договор {row.contract_number}" if row.contract_number else f"Карточка #{row.id}"
+        cards[row.id] = (state, row.contract_id, responsible, label)
+        due = parse_deadline(row.deadline)
+        if due:
+            sources[(SOURCE_CRM_CARD, row.id)] = {
+                'crm_card_id': row.id, 'contract_id': row.contract_id, 'employee_id': responsible,
+                'title': label, 'due_date': due, 'status': state,
+            }
+
+    rows = db.query(
+        StageExecutor.id, StageExecutor.crm_card_id, StageExecutor.stage_name,
+        StageExecutor.executor_id, StageExecutor.deadline, StageExecutor.completed,
+    ).all()
+    for row in rows:
+        card = cards.get(row.crm_card_id)
+        due = parse_deadline(row.deadline)
+        if card is None or due is None:
+            continue
+        state, contract_id, _, label = card
+        sources[(SOURCE_STAGE_EXECUTOR, row.id)] = {
+            'crm_card_id': row.crm_card_id, 'contract_id': contract_id, 'employee_id': row.executor_id,
+            'title': f"{label}: {row.stage_name}", 'due_date': due,
+            'status': 'closed' if row.completed else state,
+        }
+
+    rows = db.query(
+        ApprovalStageDeadline.id, ApprovalStageDeadline.crm_card_id, ApprovalStageDeadline.stage_name,
+        ApprovalStageDeadline.deadline, ApprovalStageDeadline.is_completed,
+    ).all()
+    for row in rows:
+        card = cards.get(row.crm_card_id)
+        due = parse_deadline(row.deadline)
+        if card is None or due is None:
+            continue
+        state, contract_id, responsible, label = card
+        sources[(SOURCE_APPROVAL_STAGE, row.id)] = {
+            'crm_card_id': row.crm_card_id, 'contract_id': contract_id, 'employee_id': responsible,
+            'title': f"{label}: согласование «{row.stage_name}»", 'due_date': due,
+            'status': 'closed' if row.is_completed else state,
+        }
+    return sources
+
+
+def refresh_due_items(db: Session, today: Optional[date] = None) -> dict:
+    """Сверить due_items с источниками и пересчитать days_left. Коммитит"""
+    today = today or date.today()
+    now = datetime.utcnow()
+    sources = collect_due_sources(db)
+    existing = {(item.source_type, item.source_id): item for item in db.query(DueItem)}
+    stats = {'created': 0, 'updated': 0, 'closed': 0}
+
+    for (source_type, source_id), fields in sources.items():
+        fields['days_left'] = working_days_left(today, fields['due_date'])
+        item = existing.pop((source_type, source_id), None)
+        if item is None:
+            if fields['status'] == 'closed':
+                continue
+            db.add(DueItem(source_type=source_type, source_id=source_id, updated_at=now, **fields))
+            stats['created'] += 1
+            continue
+        if item.due_date != fields['due_date']:
+            # Новый срок — пороги уведомлений заново
+            item.notified_threshold = None
+            item.notified_at = None
+        changed = False
+        for name in _SYNCED_FIELDS:
+            if getattr(item, name) != fields[name]:
+                setattr(item, name, fields[name])
+                changed = True
+        if changed:
+            item.updated_at = now
+            stats['updated'] += 1
+
+    # Источник удалён или дедлайн стёрт
+    for item in existing.values():
+        if item.status != 'closed':
+            item.status = 'closed'
+            item.updated_at = now
+            stats['closed'] += 1
+
+    db.commit()
+    return stats
+
+
+def deadline_message(title: str, due: date, days_left: int) -> Tuple[str, str]:
+    """Заголовок и текст уведомления о сроке"""
+    due_str = due.strftime('%d.%m.%Y')
+    if days_left < 0:
+        return 'Срок просрочен', f"{title}: срок {due_str} прошёл ({-days_left} раб. дн. назад)"
+    if days_left == 0:
+        return 'Срок сегодня', f"{title}: срок сегодня ({due_str})"
+    return 'Приближается срок', f"{title}: осталось {days_left} раб. дн. (до {due_str})"
+
+
+def _notify_candidates(db: Session) -> list:
+    """Открытые сроки с исполнителем в пределах старшего порога"""
+    candidates = [
+        (item.id, item.employee_id, item.crm_card_id, item.title, item.due_date,
+         item.days_left, item.notified_threshold)
+        for item in db.query(DueItem).filter(
+            DueItem.status == 'open',
+            DueItem.employee_id.isnot(None),
+            DueItem.days_left <= max(DEADLINE_THRESHOLDS),
+        ).order_by(DueItem.due_date, DueItem.id)
+    ]
+    db.rollback()
+    return candidates
+
+
+def _claim_threshold(db: Session, item_id: int, due: date, threshold: int) -> bool:
+    """
+    Отметить порог у срока. Фиксируется в транзакции уведомления: коммитит
+    dispatch_notification, при ошибке откатываются оба — попытка повторится
+    на следующем проходе.
+    """
+    claimed = db.query(DueItem).filter(
+        DueItem.id == item_id,
+        DueItem.due_date == due,
+        or_(DueItem.notified_threshold.is_(None), DueItem.notified_threshold > threshold),
+    ).update({'notified_threshold': threshold, 'notified_at': datetime.utcnow()},
+             synchronize_session=False)
+    if not claimed:
+        db.rollback()
+    return bool(claimed)
+
+
+async def notify_due_items(db: Session, dispatch=None) -> int:
+    """
+    Уведомить ответственных о достигнутых порогах. Возвращает число уведомлений.
+    dispatch — корутина с сигнатурой dispatch_notification (по умолчанию она).
+    """
+    if dispatch is None:
+        from services.notification_dispatcher import dispatch_notification as dispatch
+
+    candidates = await asyncio.to_thread(_notify_candidates, db)
+
+    sent = 0
+    for item_id, employee_id, card_id, title, due, days_left, notified in candidates:
+        threshold = threshold_for(days_left)
+        if threshold is None or (notified is not None and notified <= threshold):
+            continue
+        if not await asyncio.to_thread(_claim_threshold, db, item_id, due, threshold):
+            continue
+        title_text, message = deadline_message(title or '', due, days_left)
+        await dispatch(
+            db, employee_id, 'deadline', title_text, message,
+            related_entity_type='crm_card', related_entity_id=card_id,
+        )
+        sent += 1
+    return sent
+
+
+class DeadlineEvaluator:
+    """Периодический пересчёт due_items и уведомления о сроках"""
+
+    def __init__(self, session_factory=SessionLocal, interval: float = EVALUATE_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить периодический пересчёт в текущем event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Deadline evaluator запущен")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Deadline evaluator: ошибка прохода: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, today: Optional[date] = None) -> dict:
+        """Один проход: сверка due_items и уведомления"""
+        db = self.session_factory()
+        try:
+            try:
+                # Запросы синхронные — в пуле потоков, event loop не блокируется
+                stats = await asyncio.to_thread(refresh_due_items, db, today)
+            except IntegrityError:
+                # Второй воркер успел вставить те же сроки — досверим в следующий раз
+                db.rollback()
+                logger.info("Deadline evaluator: due_items обновлены параллельным воркером")
+                stats = {'created': 0, 'updated': 0, 'closed': 0}
+            stats['notified'] = await notify_due_items(db)
+            return stats
+        finally:
+            db.close()
+
+
+_evaluator: Optional[DeadlineEvaluator] = None
+
+
+def get_deadline_evaluator() -> DeadlineEvaluator:
+    """Получить экземпляр DeadlineEvaluator"""
+    global _evaluator
+    if _evaluator is None:
+        _evaluator = DeadlineEvaluator()
+    return _evaluator
@@ -0,0 +1,585 @@
+"""
+Экспорт таблиц сроков в XLSX/PDF с потоковой отдачей.
+
+- XLSX собирается openpyxl в режиме write_only: строки сразу уходят в
+  поток, а оформление зарегистрировано один раз на книгу как именованные
+  стили (NamedStyle) — ячейка ссылается на стиль по имени, объекты
+  Font/Fill/Border не создаются на каждую ячейку.
+- Рендер (openpyxl/reportlab) выполняется в пуле потоков run_export(),
+  event loop не блокируется.
+- Результат пишется во временный файл (в памяти до SPOOL_MAX_SIZE, дальше
+  на диске) и отдаётся кусками через StreamingResponse.
+- zip_stream() собирает архив из многих файлов на лету: в памяти только
+  текущий файл, готовые куски архива сразу уходят клиенту.
+
+Рендеры принимают снимки данных (contract_snapshot, *_export_rows), а не
+ORM-объекты: сессия БД остаётся в потоке обработчика.
+"""
+import asyncio
+import functools
+import re
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+
+# Потоков рендера на процесс uvicorn
+EXPORT_WORKERS = 2
+# Размер файла, после которого временный файл уходит на диск
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+_CONTRACT_FIELDS = ('id', 'contract_number', 'address', 'area', 'project_type', 'project_subtype',
+                    'agent_type', 'city', 'contract_term', 'contract_date')
+_TIMELINE_FIELDS = ('stage_code', 'stage_name', 'stage_group', 'substage_group', 'actual_date',
+                    'actual_days', 'norm_days', 'status', 'executor_role', 'is_in_contract_scope')
+_SUPERVISION_FIELDS = ('stage_name', 'plan_date', 'actual_date', 'actual_days', 'executor',
+                       'budget_planned', 'budget_actual', 'budget_savings', 'supplier',
+                       'commission', 'status', 'notes')
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_export_executor() -> ThreadPoolExecutor:
+    """Пул потоков рендера экспорта"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export")
+    return _executor
+
+
+async def run_export(func: Callable, *args, **kwargs):
+    """Выполнить рендер в пуле экспорта"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_export_executor(), functools.partial(func, *args, **kwargs))
+
+
+# ── Снимки данных ─────────────────────────────────────────
+
+def contract_snapshot(contract) -> SimpleNamespace:
+    """Поля договора для шапки экспорта (None — договора нет)"""
+    return SimpleNamespace(**{name: getattr(contract, name, None) for name in _CONTRACT_FIELDS})
+
+
+def timeline_export_rows(entries) -> list:
+    """Строки ProjectTimelineEntry как словари"""
+    return [{name: getattr(e, name) for name in _TIMELINE_FIELDS} for e in entries]
+
+
+def supervision_export_rows(entries) -> list:
+    """Строки SupervisionTimelineEntry как словари"""
+    return [{name: getattr(e, name) for name in _SUPERVISION_FIELDS} for e in entries]
+
+
+# ── Потоковая отдача ──────────────────────────────────────
+
+def spooled_file():
+    """Временный файл результата: в памяти до SPOOL_MAX_SIZE, дальше на диске"""
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+
+def iter_file(f, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Отдать файл кусками с начала и закрыть"""
+    try:
+        f.seek(0)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+
+def _disposition(filename: str, ru_name: Optional[str] = None) -> str:
+    if not ru_name:
+        return f"attachment; filename={filename}"
+    return f"attachment; filename*=UTF-8''{quote(ru_name)}; filename={filename}"
+
+
+def file_response(f, media_type: str, filename: str, ru_name: Optional[str] = None) -> StreamingResponse:
+    """StreamingResponse из готового временного файла"""
+    f.seek(0, 2)
+    size = f.tell()
+    return StreamingResponse(
+        iter_file(f),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": _disposition(filename, ru_name),
+            "Content-Length": str(size),
+        },
+    )
+
+
+async def render_response(render: Callable, *args, media_type: str, filename: str,
+                          ru_name: Optional[str] = None) -> StreamingResponse:
+    """render(out, *args) в пуле экспорта → StreamingResponse"""
+    out = spooled_file()
+    try:
+        await run_export(render, out, *args)
+    except Exception:
+        out.close()
+        raise
+    return file_response(out, media_type, filename, ru_name)
+
+
+class _ZipSink:
+    """Несмещаемый приёмник ZIP: копит записанное до забора генератором"""
+
+    def __init__(self):
+        self._parts = []
+        self._offset = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+def zip_stream(members: Iterable[Tuple[str, Callable]]) -> Iterator[bytes]:
+    """
+    ZIP на лету: members — пары (имя в архиве, render(out)).
+    Каждый файл рендерится во временный файл и сразу дописывается в архив.
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, render in members:
+            with spooled_file() as tmp:
+                render(tmp)
+                tmp.seek(0)
+                with archive.open(arcname, 'w', force_zip64=True) as dest:
+                    while True:
+                        chunk = tmp.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+_UNSAFE_NAME = re.compile(r'[\\/:*?"<>|\r\n\t]+')
+
+
+def safe_filename(name: str, max_length: int = 120) -> str:
+    """Имя файла без недопустимых символов"""
+    return _UNSAFE_NAME.sub('_', name).strip(' .')[:max_length] or 'file'
+
+
+def format_date(value) -> str:
+    """YYYY-MM-DD → DD.MM.YYYY (иначе как есть)"""
+    if not value:
+        return ""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%d.%m.%Y")
+    except (ValueError, TypeError):
+        return value
+
+
+# ── XLSX ──────────────────────────────────────────────────
+
+def _thin_border():
+    from openpyxl.styles import Border, Side
+    side = Side(style='thin')
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def _fill(color):
+    from openpyxl.styles import PatternFill
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+# Именованные стили: имя → (font, fill, alignment)
+_XLSX_STYLES = {
+    'tl_header': ({'bold': True, 'color': 'FFFFFF', 'size': 11}, '2F5496', {'horizontal': 'center'}),
+    'tl_stage': ({'bold': True, 'color': 'FFFFFF'}, '2F5496', None),
+    'tl_substage': ({'bold': True}, 'D6E4F0', None),
+    'tl_cell': (None, None, None),
+    'tl_overdue': (None, 'F2DCDB', None),
+    'sv_header': ({'bold': True, 'color': 'FFFFFF', 'size': 10}, '444444',
+                  {'horizontal': 'center', 'wrap_text': True}),
+    'sv_cell': (None, None, None),
+    'sv_total': ({'bold': True}, None, None),
+    'sv_in_work': (None, 'FFF8E1', None),
+    'sv_purchased': (None, 'E3F2FD', None),
+    'sv_delivered': (None, 'E8F5E9', None),
+    'sv_overdue': (None, 'FFEBEE', None),
+}
+
+_SUPERVISION_STATUS_STYLES = {
+    'В работе': 'sv_in_work',
+    'Закуплено': 'sv_purchased',
+    'Доставлено': 'sv_delivered',
+    'Просрочено': 'sv_overdue',
+}
+
+
+def _styled_workbook(prefix: str):
+    """write_only-книга с зарегистрированными стилями prefix_*"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font, NamedStyle
+
+    wb = Workbook(write_only=True)
+    border = _thin_border()
+    for name, (font, fill, alignment) in _XLSX_STYLES.items():
+        if not name.startswith(prefix):
+            continue
+        style = NamedStyle(name=name, border=border)
+        if font:
+            style.font = Font(**font)
+        if fill:
+            style.fill = _fill(fill)
+        if alignment:
+            style.alignment = Alignment(**alignment)
+        wb.add_named_style(style)
+    return wb
+
+
+def _styled_row(ws, values, style: str):
+    from openpyxl.cell import WriteOnlyCell
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value)
+        cell.style = style
+        row.append(cell)
+    return row
+
+
+def _set_widths(ws, widths):
+    from openpyxl.utils import get_column_letter
+    for idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+
+
+def render_timeline_xlsx(out, contract, rows: list):
+    """Таблица сроков CRM → XLSX в out"""
+    wb = _styled_workbook('tl_')
+    ws = wb.create_sheet("Таблица сроков")
+    _set_widths(ws, [45, 14, 14, 14, 12, 18])
+
+    ws.append(["Адрес:", contract.address or ""])
+    ws.append(["Тип проекта:", contract.project_type or ""])
+    ws.append(["Площадь:", f"{contract.area or 0} м²"])
+    ws.append([])
+    ws.append(_styled_row(ws, ["Действия по этапам", "Дата", "Кол-во дней", "Норма дней",
+                               "Статус", "Исполнитель"], 'tl_header'))
+
+    for entry in rows:
+        role = entry['executor_role']
+        if role == 'header':
+            style = 'tl_stage'
+        elif role == 'subheader':
+            style = 'tl_substage'
+        elif entry['actual_days'] and entry['norm_days'] and entry['actual_days'] > entry['norm_days']:
+            style = 'tl_overdue'
+        else:
+            style = 'tl_cell'
+        ws.append(_styled_row(ws, [
+            entry['stage_name'],
+            entry['actual_date'] or "",
+            entry['actual_days'] or 0,
+            entry['norm_days'] or 0,
+            entry['status'] or "",
+            role or "",
+        ], style))
+    wb.save(out)
+
+
+def render_supervision_xlsx(out, contract, rows: list, include_commission: bool = True):
+    """Таблица сроков надзора → XLSX в out (с/без комиссии)"""
+    wb = _styled_workbook('sv_')
+    ws = wb.create_sheet("Таблица сроков надзора")
+    if include_commission:
+        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
+                   "Бюджет план", "Бюджет факт", "Экономия", "Поставщик",
+                   "Комиссия", "Статус", "Примечания"]
+        widths = [30, 14, 14, 10, 18, 14, 14, 14, 18, 14, 14, 25]
+    else:
+        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
+                   "Бюджет план", "Бюджет факт", "Экономия", "Поставщик",
+                   "Статус", "Примечания"]
+        widths = [30, 14, 14, 10, 18, 14, 14, 14, 18, 14, 25]
+    _set_widths(ws, widths)
+
+    ws.append(["Адрес:", contract.address or ""])
+    ws.append([])
+    ws.append(_styled_row(ws, headers, 'sv_header'))
+
+    totals = {'budget_planned': 0, 'budget_actual': 0, 'budget_savings': 0, 'commission': 0}
+    for entry in rows:
+        for name in totals:
+            totals[name] += entry[name] or 0
+        values = [
+            entry['stage_name'],
+            format_date(entry['plan_date']),
+            format_date(entry['actual_date']),
+            entry['actual_days'] or 0,
+            entry['executor'] or "",
+            entry['budget_planned'] or 0,
+            entry['budget_actual'] or 0,
+            entry['budget_savings'] or 0,
+            entry['supplier'] or "",
+        ]
+        if include_commission:
+            values.append(entry['commission'] or 0)
+        values.extend([entry['status'] or "", entry['notes'] or ""])
+        ws.append(_styled_row(ws, values, _SUPERVISION_STATUS_STYLES.get(entry['status'], 'sv_cell')))
+
+    ws.append([])
+    total_values = ["ИТОГО:", "", "", "", "", totals['budget_planned'], totals['budget_actual'],
+                    totals['budget_savings'], ""]
+    if include_commission:
+        total_values.append(totals['commission'])
+    total_values.extend(["", ""])
+    ws.append(_styled_row(ws, total_values, 'sv_total'))
+    wb.save(out)
+
+
+# ── PDF ───────────────────────────────────────────────────
+
+def render_timeline_pdf(out, contract, rows: list):
+    """Таблица сроков CRM → PDF в out (фирменный стиль, итоги по этапам)"""
+    from reportlab.platypus import Paragraph
+    from reportlab.lib.styles import ParagraphStyle
+    from pdf_helper import (
+        build_timeline_pdf, _font, _font_bold,
+        COLOR_HEADER_ROW, COLOR_SUBHEADER_ROW,
+        COLOR_OK, COLOR_OVERDUE, COLOR_SKIPPED,
+        COLOR_OUT_SCOPE, COLOR_SUBTOTAL, COLOR_GRANDTOTAL,
+    )
+
+    fn = _font()
+    fb = _font_bold()
+    cell_style = ParagraphStyle('Cell', fontName=fn, fontSize=8, leading=10)
+    bold_style = ParagraphStyle('CellB', fontName=fb, fontSize=8, leading=10)
+
+    headers = ["Этап", "Дата", "Дней", "Норма", "Статус", "Исполнитель"]
+    table_rows = []
+    row_styles = []
+
+    # Для подсчёта итогов
+    current_stage_group = None
+    stage_actual_sum = 0
+    stage_norm_sum = 0
+    total_actual = 0
+    total_norm = 0
+
+    def _add_subtotal(label):
+        """Вставить строку «Итого этапа»."""
+        row_idx = len(table_rows) + 1
+        table_rows.append([
+            Paragraph(f'<b>Итого {label}:</b>', bold_style),
+            Paragraph('', cell_style),
+            Paragraph(f'<b>{stage_actual_sum}</b>', bold_style),
+            Paragraph(f'<b>{stage_norm_sum}</b>', bold_style),
+            Paragraph('', cell_style),
+            Paragraph('', cell_style),
+        ])
+        row_styles.append({'row_idx': row_idx, 'bg': COLOR_SUBTOTAL, 'bold': True})
+
+    for entry in rows:
+        role = entry['executor_role'] or ''
+        is_header = role == 'header' and not entry['substage_group']
+        is_subheader = role == 'header' and bool(entry['substage_group'])
+        stage_group = entry['stage_group'] or ''
+        is_in_scope = entry['is_in_contract_scope'] if entry['is_in_contract_scope'] is not None else True
+
+        # Итого предыдущего этапа при смене stage_group
+        if is_header and stage_group != current_stage_group and current_stage_group and current_stage_group != 'START':
+            _add_subtotal(current_stage_group.replace('STAGE', 'Этап '))
+            stage_actual_sum = 0
+            stage_norm_sum = 0
+
+        if is_header and stage_group != current_stage_group:
+            current_stage_group = stage_group
+            stage_actual_sum = 0
+            stage_norm_sum = 0
+
+        # Вычисление статуса как в программе
+        actual_days = entry['actual_days'] or 0
+        norm_days_val = entry['norm_days'] or 0
+        status_text = entry['status'] or ''
+        row_bg = None
+
+        if not is_header and not is_subheader:
+            if not is_in_scope:
+                row_bg = COLOR_OUT_SCOPE
+            elif status_text == 'skipped':
+                status_text = 'Пропущен'
+                row_bg = COLOR_SKIPPED
+            elif actual_days > 0 and norm_days_val > 0:
+                if actual_days <= norm_days_val:
+                    status_text = 'В срок'
+                    row_bg = COLOR_OK
+                else:
+                    status_text = 'Просрочен'
+                    row_bg = COLOR_OVERDUE
+
+            # Накопление сумм
+            stage_actual_sum += actual_days
+            total_actual += actual_days
+            if is_in_scope:
+                stage_norm_sum += norm_days_val
+                total_norm += norm_days_val
+
+        # Строка данных
+        row_idx = len(table_rows) + 1  # +1 т.к. row 0 — заголовок таблицы
+        table_rows.append([
+            Paragraph(entry['stage_name'] or "", cell_style),
+            Paragraph(entry['actual_date'] or "", cell_style),
+            Paragraph(str(actual_days) if actual_days else "", cell_style),
+            Paragraph(str(norm_days_val) if norm_days_val else "", cell_style),
+            Paragraph(status_text, cell_style),
+            Paragraph(role if role not in ('header',) else "", cell_style),
+        ])
+
+        if is_header:
+            row_styles.append({'row_idx': row_idx, 'bg': COLOR_HEADER_ROW, 'fg': '#FFFFFF', 'bold': True})
+        elif is_subheader:
+            row_styles.append({'row_idx': row_idx, 'bg': COLOR_SUBHEADER_ROW, 'bold': True})
+        elif row_bg:
+            row_styles.append({'row_idx': row_idx, 'bg': row_bg})
+
+    # Итого последнего этапа
+    if current_stage_group and current_stage_group != 'START':
+        _add_subtotal(current_stage_group.replace('STAGE', 'Этап '))
+
+    # Общий итог
+    grand_norm = contract.contract_term if contract.contract_term else total_norm
+    grand_idx = len(table_rows) + 1
+    table_rows.append([
+        Paragraph('<b>ИТОГО ВСЕХ ЭТАПОВ:</b>', bold_style),
+        Paragraph('', cell_style),
+        Paragraph(f'<b>{total_actual}</b>', bold_style),
+        Paragraph(f'<b>{grand_norm}</b>', bold_style),
+        Paragraph('', cell_style),
+        Paragraph('', cell_style),
+    ])
+    row_styles.append({'row_idx': grand_idx, 'bg': COLOR_GRANDTOTAL, 'bold': True})
+
+    build_timeline_pdf(
+        title="Таблица сроков проекта",
+        contract=contract,
+        headers=headers,
+        rows=table_rows,
+        col_widths=[180, 60, 50, 50, 50, 80],
+        row_styles=row_styles,
+        output=out,
+    )
+
+
+def render_supervision_pdf(out, contract, rows: list, include_commission: bool = False):
+    """Таблица сроков надзора → PDF в out (с/без комиссии, с ИТОГО)"""
+    from reportlab.platypus import Paragraph
+    from reportlab.lib.styles import ParagraphStyle
+    from pdf_helper import build_timeline_pdf, _font, _font_bold, COLOR_GRANDTOTAL
+
+    fn = _font()
+    fb = _font_bold()
+    cell_style = ParagraphStyle('Cell', fontName=fn, fontSize=8, leading=10)
+    bold_style = ParagraphStyle('CellB', fontName=fb, fontSize=8, leading=10)
+
+    status_colors = {
+        'В работе': '#FFF8E1',
+        'Закуплено': '#E3F2FD',
+        'Доставлено': '#E8F5E9',
+        'Просрочено': '#FFEBEE',
+    }
+
+    if include_commission:
+        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
+                   "Бюджет план", "Бюджет факт", "Поставщик", "Комиссия",
+                   "Статус", "Примечания"]
+        col_widths = [120, 55, 55, 35, 80, 55, 55, 80, 50, 55, 80]
+    else:
+        headers = ["Стадия", "План. дата", "Факт. дата", "Дней", "Исполнитель",
+                   "Бюджет план", "Бюджет факт", "Поставщик",
+                   "Статус", "Примечания"]
+        col_widths = [130, 60, 60, 40, 85, 60, 60, 90, 60, 90]
+
+    table_rows = []
+    row_styles = []
+    total_planned = 0
+    total_actual = 0
+    total_commission = 0
+
+    for entry in rows:
+        bp = entry['budget_planned'] or 0
+        ba = entry['budget_actual'] or 0
+        cm = entry['commission'] or 0
+        total_planned += bp
+        total_actual += ba
+        total_commission += cm
+
+        cells = [
+            Paragraph(entry['stage_name'] or "", cell_style),
+            Paragraph(format_date(entry['plan_date']), cell_style),
+            Paragraph(format_date(entry['actual_date']), cell_style),
+            Paragraph(str(entry['actual_days'] or ""), cell_style),
+            Paragraph(entry['executor'] or "", cell_style),
+            Paragraph(f"{bp:,.0f}" if bp else "", cell_style),
+            Paragraph(f"{ba:,.0f}" if ba else "", cell_style),
+            Paragraph(entry['supplier'] or "", cell_style),
+        ]
+        if include_commission:
+            cells.append(Paragraph(f"{cm:,.0f}" if cm else "", cell_style))
+        cells.extend([
+            Paragraph(entry['status'] or "", cell_style),
+            Paragraph(entry['notes'] or "", cell_style),
+        ])
+        table_rows.append(cells)
+
+        color_hex = status_colors.get(entry['status'])
+        if color_hex:
+            row_styles.append({'row_idx': len(table_rows), 'bg': color_hex})
+
+    # Строка ИТОГО
+    grand_idx = len(table_rows) + 1
+    total_cells = [Paragraph('<b>ИТОГО:</b>', bold_style)]
+    total_cells.extend([Paragraph('', cell_style)] * 4)  # даты, дней, исполнитель
+    total_cells.append(Paragraph(f'<b>{total_planned:,.0f}</b>', bold_style))
+    total_cells.append(Paragraph(f'<b>{total_actual:,.0f}</b>', bold_style))
+    total_cells.append(Paragraph('', cell_style))  # поставщик
+    if include_commission:
+        total_cells.append(Paragraph(f'<b>{total_commission:,.0f}</b>', bold_style))
+    total_cells.extend([Paragraph('', cell_style)] * 2)  # статус, примечания
+    table_rows.append(total_cells)
+    row_styles.append({'row_idx': grand_idx, 'bg': COLOR_GRANDTOTAL, 'bold': True})
+
+    build_timeline_pdf(
+        title="Таблица сроков авторского надзора",
+        contract=contract,
+        headers=headers,
+        rows=table_rows,
+        col_widths=col_widths,
+        row_styles=row_styles,
+        output=out,
+    )
+
+
+def report_date() -> str:
+    """Дата для имени файла отчёта"""
+    return date.today().strftime("%d.%m.%Y")
@@ -0,0 +1,364 @@
+"""
+Советник индексов по записанной нагрузке.
+
+Запись: record_workload(engine, path) вешает before/after_cursor_execute и
+пишет каждый SELECT/UPDATE/DELETE (SQL, параметры, время) строкой JSONL.
+На сервере включается переменной окружения QUERY_WORKLOAD_FILE.
+
+Анализ:
+    python -m services.index_advisor workload.jsonl [--database-url URL] [--apply] [--repeat N]
+
+1. Запросы группируются по тексту SQL (параметры уже вынесены драйвером).
+2. EXPLAIN каждого запроса (SQLite: EXPLAIN QUERY PLAN, PostgreSQL:
+   EXPLAIN (FORMAT JSON)) — ищутся полные сканы таблиц.
+3. Для просканированной таблицы из WHERE/JOIN/ORDER BY строится составной
+   индекс: сначала колонки равенства, затем одна колонка диапазона (или
+   сортировки); IS [NOT] NULL уходит в условие частичного индекса.
+4. Предложения, покрытые существующим индексом или более длинным
+   предложением с тем же префиксом (без условия или с тем же условием),
+   отбрасываются.
+5. --apply создаёт индексы и печатает время нагрузки до/после.
+
+Воспроизводить нагрузку нужно на базе того же диалекта (стиль параметров
+драйвера), PostgreSQL — с реалистичным объёмом данных: на маленьких
+таблицах планировщик выбирает Seq Scan и при наличии индекса.
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Колонок в одном предлагаемом индексе
+MAX_INDEX_COLUMNS = 4
+# Длина имени индекса в PostgreSQL
+MAX_INDEX_NAME = 63
+
+_RECORDED_VERBS = ('SELECT', 'UPDATE', 'DELETE')
+
+_TABLE_REF = re.compile(
+    r'\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|SET|JOIN|LEFT|RIGHT|FULL|INNER|OUTER|CROSS|'
+    r'ORDER|GROUP|HAVING|LIMIT|OFFSET|FOR|UNION)\b)(\w+))?', re.IGNORECASE)
+_JOIN_PAIR = re.compile(r'(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)')
+_PREDICATE = re.compile(
+    r'(\w+)\.(\w+)\s*(IS\s+NOT\s+NULL|IS\s+NULL|NOT\s+IN\b|NOT\s+LIKE\b|IN\b|LIKE\b|BETWEEN\b|'
+    r'!=|<>|<=|>=|=|<|>)', re.IGNORECASE)
+_ORDER_BY = re.compile(r'\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|\bFOR\s+UPDATE\b|$)',
+                       re.IGNORECASE | re.DOTALL)
+_ORDER_ITEM = re.compile(r'(\w+)\.(\w+)')
+_SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+_EQUALITY_OPS = ('=', 'IN')
+_RANGE_OPS = ('<', '>', '<=', '>=', 'BETWEEN', 'LIKE')
+
+
+# ── Запись нагрузки ───────────────────────────────────────
+
+class WorkloadRecorder:
+    """Пишет выполняемые запросы engine в JSONL-файл"""
+
+    def __init__(self, engine, path: str):
+        self.engine = engine
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_workload_started', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('_workload_started')
+        elapsed = time.perf_counter() - started.pop() if started else 0.0
+        if executemany or not statement.lstrip().upper().startswith(_RECORDED_VERBS):
+            return
+        line = json.dumps({'sql': statement, 'params': parameters, 'ms': round(elapsed * 1000, 3)},
+                          ensure_ascii=False, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + '\n')
+                self._file.flush()
+
+    def close(self):
+        event.remove(self.engine, 'before_cursor_execute', self._before)
+        event.remove(self.engine, 'after_cursor_execute', self._after)
+        with self._lock:
+            self._file.close()
+
+
+def record_workload(engine, path: str) -> WorkloadRecorder:
+    """Начать запись нагрузки engine в path (дописывается)"""
+    logger.info(f"Запись нагрузки БД в {path}")
+    return WorkloadRecorder(engine, path)
+
+
+def load_workload(path: str) -> List[dict]:
+    """Прочитать JSONL-нагрузку"""
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ── Разбор SQL ────────────────────────────────────────────
+
+def _normalize_sql(sql: str) -> str:
+    return ' '.join(sql.replace('"', '').split())
+
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """Имя или алиас в запросе → таблица"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def parse_predicates(sql: str) -> Dict[str, dict]:
+    """
+    Колонки предикатов по таблицам:
+    {table: {'eq': [...], 'range': [...], 'null': [(col, 'IS NULL'), ...], 'order': [...]}}
+    """
+    sql = _normalize_sql(sql)
+    aliases = table_aliases(sql)
+    from_pos = re.search(r'\b(FROM|UPDATE)\b', sql, re.IGNORECASE)
+    body = sql[from_pos.start():] if from_pos else sql
+    result: Dict[str, dict] = {}
+
+    def _add(ref, column, kind, value=None):
+        table = aliases.get(ref)
+        if table is None:
+            return
+        slot = result.setdefault(table, {'eq': [], 'range': [], 'null': [], 'order': []})
+        item = (column, value) if kind == 'null' else column
+        if item not in slot[kind]:
+            slot[kind].append(item)
+
+    for left_ref, left_col, right_ref, right_col in _JOIN_PAIR.findall(body):
+        _add(left_ref, left_col, 'eq')
+        _add(right_ref, right_col, 'eq')
+    body_without_joins = _JOIN_PAIR.sub(' ', body)
+
+    for ref, column, op in _PREDICATE.findall(body_without_joins):
+        op = ' '.join(op.upper().split())
+        if op in _EQUALITY_OPS:
+            _add(ref, column, 'eq')
+        elif op in _RANGE_OPS:
+            _add(ref, column, 'range')
+        elif op in ('IS NULL', 'IS NOT NULL'):
+            _add(ref, column, 'null', op)
+
+    order = _ORDER_BY.search(body)
+    if order:
+        for ref, column in _ORDER_ITEM.findall(order.group(1)):
+            _add(ref, column, 'order')
+    return result
+
+
+# ── EXPLAIN ───────────────────────────────────────────────
+
+def _replay_params(params):
+    if isinstance(params, list):
+        return tuple(params)
+    return params or ()
+
+
+def scanned_tables(conn, sql: str, params) -> List[str]:
+    """Таблицы, которые план запроса читает полным сканом"""
+    dialect = conn.dialect.name
+    aliases = table_aliases(_normalize_sql(sql))
+    if dialect == 'sqlite':
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}', _replay_params(params)).fetchall()
+        found = []
+        for row in rows:
+            match = _SQLITE_SCAN.match(row[-1])
+            if match and match.group(1) != 'CONSTANT':
+                table = aliases.get(match.group(1), match.group(1))
+                if table not in found:
+                    found.append(table)
+        return found
+    if dialect == 'postgresql':
+        plan = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}', _replay_params(params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        found = []
+        stack = [plan[0]['Plan']]
+        while stack:
+            node = stack.pop()
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') not in found:
+                found.append(node['Relation Name'])
+            stack.extend(node.get('Plans', []))
+        return found
+    raise ValueError(f"EXPLAIN для диалекта {dialect} не поддерживается")
+
+
+# ── Предложения ───────────────────────────────────────────
+
+class IndexProposal:
+    """Предлагаемый индекс: таблица, колонки, условие частичного индекса"""
+
+    def __init__(self, table: str, columns: Iterable[str], where: Optional[str] = None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.where = where
+        self.hits = 0
+        self.statements = set()
+
+    @property
+    def key(self):
+        return self.table, self.columns, self.where
+
+    @property
+    def name(self) -> str:
+        name = f"ix_{self.table}_{'_'.join(self.columns)}"
+        suffix = '_partial' if self.where else ''
+        return name[:MAX_INDEX_NAME - len(suffix)] + suffix
+
+    def to_sql(self) -> str:
+        sql = f"CREATE INDEX {self.name} ON {self.table} ({', '.join(self.columns)})"
+        return f"{sql} WHERE {self.where}" if self.where else sql
+
+    def to_alembic(self) -> str:
+        where = ''
+        if self.where:
+            where = (f", postgresql_where=sa.text({self.where!r}),"
+                     f" sqlite_where=sa.text({self.where!r})")
+        return f"op.create_index({self.name!r}, {self.table!r}, {list(self.columns)!r}{where})"
+
+    def __repr__(self):
+        return f"IndexProposal({self.table!r}, {self.columns!r}, where={self.where!r}, hits={self.hits})"
+
+
+def propose_for_table(predicates: dict) -> Optional[IndexProposal]:
+    """Индекс для предикатов одной таблицы (None — индексировать нечего)"""
+    columns = list(predicates['eq'])
+    tail = [c for c in predicates['range'] if c not in columns][:1]
+    if not tail:
+        tail = [c for c in predicates['order'] if c not in columns][:1]
+    columns = (columns + tail)[:MAX_INDEX_COLUMNS]
+    if not columns:
+        return None
+    conditions = [f"{column} {op}" for column, op in predicates['null'] if column not in columns]
+    return IndexProposal(None, columns, ' AND '.join(conditions) or None)
+
+
+def existing_indexes(conn, table: str) -> List[tuple]:
+    """Колонки существующих индексов таблицы (включая PK и UNIQUE)"""
+    insp = inspect(conn)
+    indexes = [tuple(ix['column_names']) for ix in insp.get_indexes(table)]
+    pk = insp.get_pk_constraint(table).get('constrained_columns')
+    if pk:
+        indexes.append(tuple(pk))
+    indexes.extend(tuple(uc['column_names']) for uc in insp.get_unique_constraints(table))
+    return indexes
+
+
+def _covered(columns: tuple, indexes: Iterable[tuple]) -> bool:
+    return any(ix[:len(columns)] == columns for ix in indexes)
+
+
+def advise(conn, workload: List[dict]) -> List[IndexProposal]:
+    """Предложения индексов по нагрузке, по убыванию числа запросов"""
+    statements = Counter()
+    params_by_sql = {}
+    for item in workload:
+        statements[item['sql']] += 1
+        params_by_sql.setdefault(item['sql'], item.get('params'))
+
+    proposals: Dict[tuple, IndexProposal] = {}
+    index_cache: Dict[str, List[tuple]] = {}
+    for sql, count in statements.items():
+        try:
+            scanned = scanned_tables(conn, sql, params_by_sql[sql])
+        except Exception as e:
+            logger.warning(f"EXPLAIN не выполнен: {e}")
+            conn.rollback()
+            continue
+        predicates = parse_predicates(sql)
+        for table in scanned:
+            if table not in predicates:
+                continue
+            candidate = propose_for_table(predicates[table])
+            if candidate is None:
+                continue
+            if table not in index_cache:
+                index_cache[table] = existing_indexes(conn, table)
+            if _covered(candidate.columns, index_cache[table]):
+                continue
+            candidate.table = table
+            proposal = proposals.setdefault(candidate.key, candidate)
+            proposal.hits += count
+            proposal.statements.add(sql)
+
+    # Индекс (a) не нужен рядом с (a, b, c) при том же условии или полным (a, b, c)
+    result = []
+    for proposal in sorted(proposals.values(), key=lambda p: (-len(p.columns), p.where is not None)):
+        wider = next((p for p in result if p.table == proposal.table
+                      and p.where in (None, proposal.where)
+                      and p.columns[:len(proposal.columns)] == proposal.columns), None)
+        if wider is not None:
+            wider.hits += proposal.hits
+            wider.statements |= proposal.statements
+            continue
+        result.append(proposal)
+    return sorted(result, key=lambda p: (-p.hits, p.table, p.columns))
+
+
+# ── Замеры ────────────────────────────────────────────────
+
+def replay(conn, workload: List[dict], repeat: int = 1) -> float:
+    """Время (с) выполнения SELECT-запросов нагрузки; изменяющие запросы не повторяются"""
+    selects = [item for item in workload if item['sql'].lstrip().upper().startswith('SELECT')]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for item in selects:
+            conn.exec_driver_sql(item['sql'], _replay_params(item.get('params'))).fetchall()
+    return time.perf_counter() - started
+
+
+def apply_proposals(conn, proposals: Iterable[IndexProposal]):
+    """Создать предложенные индексы"""
+    for proposal in proposals:
+        conn.execute(text(proposal.to_sql()))
+    conn.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Советник индексов по записанной нагрузке")
+    parser.add_argument('workload', help="JSONL-файл нагрузки (QUERY_WORKLOAD_FILE)")
+    parser.add_argument('--database-url', help="БД для EXPLAIN (по умолчанию DATABASE_URL сервера)")
+    parser.add_argument('--apply', action='store_true', help="создать индексы и замерить до/после")
+    parser.add_argument('--repeat', type=int, default=3, help="повторов нагрузки при замере")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+
+    workload = load_workload(args.workload)
+    with engine.connect() as conn:
+        proposals = advise(conn, workload)
+        print(f"Запросов: {len(workload)}, уникальных: {len({item['sql'] for item in workload})}")
+        for proposal in proposals:
+            print(f"-- {proposal.hits} запрос(ов), {len(proposal.statements)} уникальных")
+            print(proposal.to_sql() + ';')
+            print('#', proposal.to_alembic())
+        if args.apply and proposals:
+            before = replay(conn, workload, args.repeat)
+            apply_proposals(conn, proposals)
+            after = replay(conn, workload, args.repeat)
+            print(f"Нагрузка x{args.repeat}: до {before * 1000:.1f} мс, после {after * 1000:.1f} мс")
+
+
+if __name__ == '__main__':
+    main()
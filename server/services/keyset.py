@@ -0,0 +1,49 @@
+"""
+Keyset-пагинация лент «новые сверху» по (время, id).
+
+В отличие от OFFSET стоимость страницы не зависит от её номера (индекс
+ведёт сразу к позиции курсора), а новые записи не сдвигают уже
+полученные страницы. Курсор — непрозрачная строка с позицией последней
+отданной записи; клиент передаёт её обратно без разбора.
+"""
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(moment: datetime, row_id: int) -> str:
+    """Курсор страницы — позиция последней отданной записи"""
+    raw = f"{moment.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разобрать курсор; ValueError — курсор испорчен"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        moment, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|')
+        return datetime.fromisoformat(moment), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Некорректный курсор: {cursor!r}") from e
+
+
+def paginate(query, time_column, id_column, limit: int, cursor: Optional[str] = None,
+             key=None) -> Tuple[List, Optional[str]]:
+    """
+    Страница query (новые сверху) и курсор следующей (None — страница последняя).
+    key(row) -> (время, id) — для запросов, возвращающих не объекты модели.
+    """
+    if cursor:
+        moment, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            time_column < moment,
+            and_(time_column == moment, id_column < row_id),
+        ))
+    rows = query.order_by(time_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    moment, row_id = key(rows[-1]) if key else (getattr(rows[-1], time_column.key), rows[-1].id)
+    return rows, encode_cursor(moment, row_id)
@@ -0,0 +1,398 @@
+"""
+Аренды блокировок редактирования (concurrent editing).
+
+Раньше каждая операция locks_router — 2-3 запроса и commit к
+concurrent_edits, поиск последней UserSession и даже вставка фиктивной
+сессии «lock-session»; клиенты опрашивали блокировку, пока открыт диалог.
+
+Теперь блокировка — аренда с TTL в таблице edit_leases (на PostgreSQL
+UNLOGGED: аренды эфемерны и не нагружают WAL):
+- захват и продление своей аренды — один атомарный INSERT ... ON CONFLICT
+  DO UPDATE ... WHERE (владелец тот же или аренда истекла) RETURNING;
+  нет строки в ответе — запись держит другой;
+- продление всех аренд клиента — один UPDATE (POST /locks/renew с heartbeat);
+- истёкшие аренды не видны сразу, удаляются наблюдателем раз в PURGE_INTERVAL;
+- локальный кэш процесса отвечает на проверки блокировки без БД
+  CACHE_SECONDS секунд и обновляется собственными операциями;
+- события захвата и снятия публикуются в журнал процесса, клиенты ждут их
+  long-poll'ом (GET /locks/events) вместо опроса. Снятия в соседних
+  workers и истечения TTL находит LeaseWatcher — один SELECT активных
+  аренд в WATCH_INTERVAL на процесс, пока есть ожидающие.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, case, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import EditLease, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Время жизни аренды без продления (секунды)
+LEASE_TTL = int(os.getenv("LOCK_LEASE_TTL", "120"))
+# Сколько секунд проверка блокировки отвечает из кэша процесса
+CACHE_SECONDS = 2.0
+# Период наблюдателя за арендами соседних workers (секунды)
+WATCH_INTERVAL = 1.0
+# Наблюдатель засыпает, если никто не ждал событий столько секунд
+WATCH_IDLE = 60.0
+# Период удаления истёкших аренд (секунды)
+PURGE_INTERVAL = 60.0
+# Размер журнала событий процесса
+EVENTS_KEEP = 1000
+# Максимальное ожидание long-poll (секунды)
+WAIT_MAX = 30.0
+# Попыток захвата, если чужую аренду сняли между INSERT и выборкой владельца
+ACQUIRE_ATTEMPTS = 2
+
+Key = Tuple[str, int]
+
+
+@dataclass
+class Lease:
+    entity_type: str
+    entity_id: int
+    owner_id: int
+    owner_name: Optional[str]
+    locked_at: datetime
+    expires_at: datetime
+
+    @property
+    def key(self) -> Key:
+        return self.entity_type, self.entity_id
+
+    def to_dict(self, viewer_id: int) -> dict:
+        """Ответ проверки блокировки"""
+        return {
+            'is_locked': True,
+            'locked_by': self.owner_name or 'неизвестный пользователь',
+            'locked_at': self.locked_at.isoformat(),
+            'expires_at': self.expires_at.isoformat(),
+            'is_own_lock': self.owner_id == viewer_id,
+        }
+
+
+class LeaseConflict(Exception):
+    """Запись держит другой владелец"""
+
+    def __init__(self, lease: Lease):
+        super().__init__(f"{lease.entity_type}/{lease.entity_id} заблокирована")
+        self.lease = lease
+
+
+_COLUMNS = (EditLease.entity_type, EditLease.entity_id, EditLease.owner_id,
+            EditLease.owner_name, EditLease.locked_at, EditLease.expires_at)
+
+
+def _insert(db: Session):
+    return pg_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+
+class LeaseManager:
+    """Аренды блокировок: общая таблица + кэш и журнал событий процесса"""
+
+    def __init__(self, ttl: int = LEASE_TTL, clock=datetime.utcnow):
+        self.ttl = timedelta(seconds=ttl)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._cache: Dict[Key, Tuple[Optional[Lease], float]] = {}
+        self._events: deque = deque(maxlen=EVENTS_KEEP)
+        self._snapshot: Optional[Dict[Key, int]] = None
+        self._last_wait = 0.0
+        self._last_purge = 0.0
+
+    # --- кэш процесса ---
+
+    def _cached(self, key: Key):
+        """(найдено, аренда) — аренда None, если в кэше отмечено «свободно»"""
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None or time.monotonic() - entry[1] > CACHE_SECONDS:
+            return False, None
+        lease = entry[0]
+        if lease is not None and lease.expires_at < self.clock():
+            return True, None
+        return True, lease
+
+    def _remember(self, key: Key, lease: Optional[Lease]):
+        with self._lock:
+            self._cache[key] = (lease, time.monotonic())
+
+    def _forget(self, key: Key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    # --- журнал событий ---
+
+    def _publish(self, kind: str, key: Key, owner_id: Optional[int]):
+        with self._lock:
+            self._events.append({
+                'event': kind, 'entity_type': key[0], 'entity_id': key[1],
+                'owner_id': owner_id, 'at': time.time(),
+            })
+            if self._snapshot is not None:
+                if kind == 'released':
+                    self._snapshot.pop(key, None)
+                else:
+                    self._snapshot[key] = owner_id
+
+    def events_since(self, since: float) -> List[dict]:
+        with self._lock:
+            return [e for e in self._events if e['at'] > since]
+
+    async def wait_events(self, since: Optional[float], timeout: float = WAIT_MAX) -> Tuple[List[dict], float]:
+        """
+        События после since (long-poll до timeout секунд).
+        Возвращает (события, since для следующего вызова).
+        """
+        since = time.time() if since is None else since
+        deadline = time.monotonic() + min(timeout, WAIT_MAX)
+        while True:
+            self._last_wait = time.monotonic()
+            events = self.events_since(since)
+            if events:
+                return events, events[-1]['at']
+            if time.monotonic() >= deadline:
+                return [], since
+            await asyncio.sleep(0.25)
+
+    # --- операции ---
+
+    def _load(self, db: Session, key: Key) -> Optional[Lease]:
+        """Действующая аренда из таблицы (мимо кэша процесса)"""
+        row = db.query(*_COLUMNS).filter(
+            EditLease.entity_type == key[0],
+            EditLease.entity_id == key[1],
+            EditLease.expires_at >= self.clock(),
+        ).first()
+        lease = Lease(*row) if row else None
+        self._remember(key, lease)
+        return lease
+
+    def get(self, db: Session, entity_type: str, entity_id: int) -> Optional[Lease]:
+        """Действующая аренда записи (None — свободна)"""
+        key = (entity_type, entity_id)
+        found, lease = self._cached(key)
+        if found:
+            return lease
+        return self._load(db, key)
+
+    def acquire(self, db: Session, entity_type: str, entity_id: int, owner_id: int,
+                owner_name: Optional[str]) -> Tuple[str, Lease]:
+        """
+        Захватить или продлить аренду: ('created' | 'renewed', аренда).
+        LeaseConflict — запись держит другой.
+        """
+        key = (entity_type, entity_id)
+        for _ in range(ACQUIRE_ATTEMPTS):
+            now = self.clock()
+            stmt = _insert(db)(EditLease).values(
+                entity_type=entity_type, entity_id=entity_id, owner_id=owner_id,
+                owner_name=owner_name, locked_at=now, expires_at=now + self.ttl,
+            )
+            own = and_(EditLease.owner_id == stmt.excluded.owner_id, EditLease.expires_at >= now)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[EditLease.entity_type, EditLease.entity_id],
+                set_={
+                    'owner_id': stmt.excluded.owner_id,
+                    'owner_name': stmt.excluded.owner_name,
+                    'locked_at': case((own, EditLease.locked_at), else_=stmt.excluded.locked_at),
+                    'expires_at': stmt.excluded.expires_at,
+                },
+                where=or_(EditLease.owner_id == stmt.excluded.owner_id, EditLease.expires_at < now),
+            ).returning(*_COLUMNS)
+            row = db.execute(stmt).first()
+            db.commit()
+            if row is not None:
+                break
+
+            # Кэш мог запомнить «свободно» до захвата соседним worker — владелец из таблицы
+            self._forget(key)
+            holder = self._load(db, key)
+            if holder is not None:
+                raise LeaseConflict(holder)
+            # Аренду сняли между INSERT и SELECT — повторяем
+        else:
+            raise LeaseConflict(Lease(entity_type, entity_id, 0, None, now, now))
+
+        lease = Lease(*row)
+        self._remember(key, lease)
+        if lease.locked_at == now:
+            self._publish('acquired', key, owner_id)
+            return 'created', lease
+        return 'renewed', lease
+
+    def renew(self, db: Session, owner_id: int,
+              keys: Optional[Iterable[Key]] = None) -> Tuple[List[Key], List[Key]]:
+        """
+        Продлить действующие аренды владельца одним UPDATE (все или только keys).
+        Возвращает (продлённые, потерянные из keys).
+        """
+        now = self.clock()
+        stmt = EditLease.__table__.update().where(EditLease.owner_id == owner_id,
+                                                  EditLease.expires_at >= now)
+        wanted = None
+        if keys is not None:
+            wanted = [(entity_type, int(entity_id)) for entity_type, entity_id in keys]
+            if not wanted:
+                return [], []
+            stmt = stmt.where(tuple_(EditLease.entity_type, EditLease.entity_id).in_(wanted))
+        expires_at = now + self.ttl
+        renewed = [tuple(row) for row in db.execute(
+            stmt.values(expires_at=expires_at).returning(EditLease.entity_type, EditLease.entity_id)
+        )]
+        db.commit()
+        with self._lock:
+            for key in renewed:
+                entry = self._cache.get(key)
+                if entry and entry[0] is not None:
+                    entry[0].expires_at = expires_at
+        lost = [key for key in wanted if key not in set(renewed)] if wanted is not None else []
+        return renewed, lost
+
+    def release(self, db: Session, entity_type: str, entity_id: int, user_id: int,
+                force: bool = False) -> bool:
+        """
+        Снять аренду (force — чужую). False — аренды нет.
+        PermissionError — аренду держит другой.
+        """
+        key = (entity_type, entity_id)
+        stmt = EditLease.__table__.delete().where(
+            EditLease.entity_type == entity_type, EditLease.entity_id == entity_id)
+        if not force:
+            stmt = stmt.where(EditLease.owner_id == user_id)
+        row = db.execute(stmt.returning(EditLease.owner_id)).first()
+        db.commit()
+        if row is not None:
+            self._remember(key, None)
+            self._publish('released', key, row[0])
+            return True
+        if self.get(db, entity_type, entity_id) is not None:
+            raise PermissionError(f"{entity_type}/{entity_id} заблокирована другим пользователем")
+        return False
+
+    def release_owner(self, db: Session, owner_id: int) -> int:
+        """Снять все аренды владельца"""
+        rows = db.execute(EditLease.__table__.delete().where(EditLease.owner_id == owner_id)
+                          .returning(EditLease.entity_type, EditLease.entity_id)).all()
+        db.commit()
+        for entity_type, entity_id in rows:
+            key = (entity_type, entity_id)
+            self._remember(key, None)
+            self._publish('released', key, owner_id)
+        return len(rows)
+
+    # --- наблюдатель ---
+
+    def watch(self, db: Session):
+        """
+        Сверка с общей таблицей: события снятия и захвата в соседних workers
+        и истечения TTL. Пока никто не ждёт событий — только чистка.
+        """
+        now = self.clock()
+        if time.monotonic() - self._last_purge >= PURGE_INTERVAL:
+            db.query(EditLease).filter(EditLease.expires_at < now).delete(synchronize_session=False)
+            db.commit()
+            self._last_purge = time.monotonic()
+
+        if time.monotonic() - self._last_wait > WATCH_IDLE:
+            with self._lock:
+                self._snapshot = None
+            return
+
+        current = dict(((t, i), owner) for t, i, owner in db.query(
+            EditLease.entity_type, EditLease.entity_id, EditLease.owner_id
+        ).filter(EditLease.expires_at >= now))
+        with self._lock:
+            previous, self._snapshot = self._snapshot, dict(current)
+        if previous is None:
+            return
+        for key, owner_id in previous.items():
+            if current.get(key) != owner_id:
+                self._remember(key, None)
+                self._publish('released', key, owner_id)
+        for key, owner_id in current.items():
+            if previous.get(key) != owner_id:
+                self._forget(key)
+                self._publish('acquired', key, owner_id)
+
+
+class LeaseWatcher:
+    """Фоновая сверка аренд с общей таблицей"""
+
+    def __init__(self, manager: LeaseManager, session_factory=SessionLocal,
+                 interval: float = WATCH_INTERVAL):
+        self.manager = manager
+        self.session_factory = session_factory
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить наблюдатель в текущем event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Lease watcher запущен")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lease watcher: ошибка прохода: {e}")
+            await asyncio.sleep(self.interval)
+
+    def run_once(self):
+        db = self.session_factory()
+        try:
+            self.manager.watch(db)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+_manager: Optional[LeaseManager] = None
+_watcher: Optional[LeaseWatcher] = None
+
+
+def get_lease_manager() -> LeaseManager:
+    """Получить экземпляр LeaseManager"""
+    global _manager
+    if _manager is None:
+        _manager = LeaseManager()
+    return _manager
+
+
+def get_lease_watcher() -> LeaseWatcher:
+    """Получить экземпляр LeaseWatcher"""
+    global _watcher
+    if _watcher is None:
+        _watcher = LeaseWatcher(get_lease_manager())
+    return _watcher
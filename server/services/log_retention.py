@@ -0,0 +1,345 @@
+"""
+Помесячное хранение и архивирование журналов.
+
+activity_log, action_history и messenger_message_log только растут.
+Здесь они хранятся помесячно, а старые месяцы уходят в файлы:
+
+- PostgreSQL — декларативное секционирование RANGE по времени записи:
+  секции <таблица>_pYYYYMM на каждый месяц и <таблица>_default для
+  записей вне созданных секций. partition_log_tables() переводит обычную
+  таблицу в секционированную (миграция i9j0k1l2m3n4, schema_manager для
+  новой БД) и заранее создаёт секции на PARTITION_MONTHS_AHEAD месяцев;
+- SQLite (тесты, локальная разработка) — секции эмулируются диапазонами
+  месяцев в той же таблице: тот же интерфейс, удаление месяца — DELETE.
+
+LogRetentionJob раз в RETENTION_INTERVAL секунд для каждого журнала
+выгружает месяцы старше срока хранения в LOG_ARCHIVE_DIR/<таблица>/
+YYYY-MM.jsonl.gz (файл пишется во временный и переименовывается, повторный
+проход перезаписывает его целиком) и затем удаляет месяц из БД: на
+PostgreSQL — DETACH + DROP секции без построчного DELETE.
+Сроки хранения — LOG_RETENTION_<ТАБЛИЦА>_MONTHS (месяцев).
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, text
+from sqlalchemy.schema import AddConstraint
+
+from database import Base, engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+# Сколько месяцев вперёд держать готовые секции
+PARTITION_MONTHS_AHEAD = 2
+# Период прохода хранения (секунды)
+RETENTION_INTERVAL = 6 * 3600.0
+# Каталог архивов журналов
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "./log_archive")
+# Ключ pg_advisory_lock прохода хранения (один worker за раз)
+RETENTION_LOCK_KEY = 7302
+# Строк за одну выборку при выгрузке месяца
+EXPORT_CHUNK = 1000
+
+
+@dataclass(frozen=True)
+class LogTable:
+    """Журнал: таблица, колонка времени (ключ секционирования), срок хранения по умолчанию"""
+    name: str
+    time_column: str
+    default_retention_months: int
+
+    @property
+    def retention_months(self) -> int:
+        env = os.getenv(f"LOG_RETENTION_{self.name.upper()}_MONTHS")
+        return int(env) if env else self.default_retention_months
+
+    @property
+    def table(self):
+        return Base.metadata.tables[self.name]
+
+
+LOG_TABLES = (
+    LogTable('activity_log', 'action_date', 12),
+    LogTable('action_history', 'action_date', 36),
+    LogTable('messenger_message_log', 'sent_at', 6),
+)
+
+
+def month_floor(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(log: LogTable, month: date) -> str:
+    return f"{log.name}_p{month:%Y%m}"
+
+
+class PostgresPartitions:
+    """Нативные секции PostgreSQL (PARTITION BY RANGE)"""
+
+    _NAME = re.compile(r'_p(\d{4})(\d{2})$')
+
+    def is_partitioned(self, conn, log: LogTable) -> bool:
+        return conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name"
+        ), {'name': log.name}).first() is not None
+
+    def partitions(self, conn, log: LogTable) -> List[date]:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ), {'name': log.name}).scalars()
+        months = []
+        for name in names:
+            match = self._NAME.search(name)
+            if match:
+                months.append(date(int(match.group(1)), int(match.group(2)), 1))
+        return sorted(months)
+
+    def _create_partition(self, conn, log: LogTable, month: date):
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(log, month)} PARTITION OF {log.name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+
+    def ensure(self, conn, log: LogTable, today: date):
+        """Секции текущего и следующих PARTITION_MONTHS_AHEAD месяцев"""
+        existing = set(self.partitions(conn, log))
+        month = month_floor(today)
+        for _ in range(PARTITION_MONTHS_AHEAD + 1):
+            if month not in existing:
+                try:
+                    with conn.begin_nested():
+                        self._create_partition(conn, log, month)
+                except Exception as e:
+                    # В default-секции уже есть строки этого месяца
+                    logger.warning(f"Секция {partition_name(log, month)} не создана: {e}")
+            month = add_months(month, 1)
+
+    def convert(self, conn, log: LogTable, today: date):
+        """Перевести обычную таблицу в секционированную с переносом данных"""
+        name, column, legacy = log.name, log.time_column, f"{log.name}_legacy"
+        table = log.table
+        conn.execute(text(f"ALTER TABLE {name} RENAME TO {legacy}"))
+        conn.execute(text(f"ALTER INDEX IF EXISTS {name}_pkey RENAME TO {legacy}_pkey"))
+        for index in table.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        # Ключ секционирования входит в первичный ключ и не может быть NULL
+        conn.execute(text(f"UPDATE {legacy} SET {column} = CURRENT_TIMESTAMP WHERE {column} IS NULL"))
+        conn.execute(text(
+            f"CREATE TABLE {name} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"))
+        conn.execute(text(f"ALTER TABLE {name} ALTER COLUMN {column} SET NOT NULL"))
+        conn.execute(text(f"ALTER TABLE {name} ADD PRIMARY KEY (id, {column})"))
+
+        oldest = conn.execute(text(f"SELECT MIN({column}) FROM {legacy}")).scalar()
+        month = month_floor(oldest or today)
+        while month <= add_months(month_floor(today), PARTITION_MONTHS_AHEAD):
+            self._create_partition(conn, log, month)
+            month = add_months(month, 1)
+        conn.execute(text(f"CREATE TABLE {name}_default PARTITION OF {name} DEFAULT"))
+
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {legacy}"))
+        sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{legacy}', 'id')")).scalar()
+        if sequence:
+            conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+
+        for index in table.indexes:
+            index.create(conn)
+        for constraint in table.foreign_key_constraints:
+            conn.execute(AddConstraint(constraint))
+        logger.info(f"Журнал {name} переведён на помесячные секции")
+
+    def drop_month(self, conn, log: LogTable, month: date):
+        """Удалить месяц: отсоединить и удалить секцию, дочистить default"""
+        if month in self.partitions(conn, log):
+            name = partition_name(log, month)
+            conn.execute(text(f"ALTER TABLE {log.name} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        _delete_range(conn, log, month)
+
+
+class EmulatedPartitions:
+    """Эмуляция секций для SQLite: месяц — диапазон строк одной таблицы"""
+
+    def is_partitioned(self, conn, log: LogTable) -> bool:
+        return True
+
+    def partitions(self, conn, log: LogTable) -> List[date]:
+        column = log.table.c[log.time_column]
+        months = conn.execute(
+            select(func.strftime('%Y-%m-01', column)).where(column.isnot(None)).distinct()
+        ).scalars()
+        return sorted(date.fromisoformat(m) for m in months)
+
+    def ensure(self, conn, log: LogTable, today: date):
+        pass
+
+    def convert(self, conn, log: LogTable, today: date):
+        pass
+
+    def drop_month(self, conn, log: LogTable, month: date):
+        _delete_range(conn, log, month)
+
+
+def _month_range(log: LogTable, month: date):
+    column = log.table.c[log.time_column]
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(add_months(month, 1), datetime.min.time())
+    return column >= start, column < end
+
+
+def _delete_range(conn, log: LogTable, month: date):
+    conn.execute(log.table.delete().where(*_month_range(log, month)))
+
+
+def partitions_for(conn):
+    """Реализация секций для диалекта соединения"""
+    if conn.dialect.name == 'postgresql':
+        return PostgresPartitions()
+    return EmulatedPartitions()
+
+
+def partition_log_tables(conn, today: Optional[date] = None):
+    """Секционировать журналы (если ещё нет) и подготовить секции вперёд"""
+    today = today or date.today()
+    backend = partitions_for(conn)
+    for log in LOG_TABLES:
+        if not backend.is_partitioned(conn, log):
+            backend.convert(conn, log, today)
+        backend.ensure(conn, log, today)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_month(conn, log: LogTable, month: date, archive_dir: str) -> Tuple[Path, int]:
+    """Выгрузить строки месяца в <archive_dir>/<таблица>/YYYY-MM.jsonl.gz"""
+    table = log.table
+    target = Path(archive_dir) / log.name / f"{month:%Y-%m}.jsonl.gz"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + '.part')
+    count = 0
+    rows = conn.execute(
+        select(table).where(*_month_range(log, month)).order_by(table.c.id),
+        execution_options={'yield_per': EXPORT_CHUNK},
+    ).mappings()
+    with gzip.open(partial, 'wt', encoding='utf-8') as out:
+        for row in rows:
+            out.write(json.dumps(dict(row), ensure_ascii=False, default=_json_default))
+            out.write('\n')
+            count += 1
+    os.replace(partial, target)
+    return target, count
+
+
+def apply_retention(conn, log: LogTable, today: date, archive_dir: str) -> int:
+    """Архивировать и удалить месяцы журнала старше срока хранения; строк выгружено"""
+    cutoff = add_months(month_floor(today), -log.retention_months)
+    backend = partitions_for(conn)
+    column = log.table.c[log.time_column]
+    oldest = conn.execute(select(func.min(column))).scalar()
+    conn.commit()
+    if oldest is None:
+        return 0
+    total = 0
+    month = month_floor(oldest)
+    while month < cutoff:
+        path, count = archive_month(conn, log, month, archive_dir)
+        backend.drop_month(conn, log, month)
+        conn.commit()
+        total += count
+        logger.info(f"Журнал {log.name}: {month:%Y-%m} — {count} строк в {path}")
+        month = add_months(month, 1)
+    return total
+
+
+class LogRetentionJob:
+    """Периодическое архивирование старых месяцев журналов"""
+
+    def __init__(self, engine=None, interval: float = RETENTION_INTERVAL,
+                 archive_dir: str = LOG_ARCHIVE_DIR):
+        self.engine = engine or default_engine
+        self.interval = interval
+        self.archive_dir = archive_dir
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить периодическое архивирование в текущем event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Log retention job запущен")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Log retention: ошибка прохода: {e}")
+            await asyncio.sleep(self.interval)
+
+    def run_once(self, today: Optional[date] = None) -> Dict[str, int]:
+        """Один проход: секции вперёд и архивирование; {таблица: строк выгружено}"""
+        today = today or date.today()
+        with self.engine.connect() as conn:
+            postgres = conn.dialect.name == 'postgresql'
+            if postgres and not conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {'key': RETENTION_LOCK_KEY}).scalar():
+                conn.rollback()
+                return {}
+            try:
+                backend = partitions_for(conn)
+                for log in LOG_TABLES:
+                    backend.ensure(conn, log, today)
+                conn.commit()
+                return {log.name: apply_retention(conn, log, today, self.archive_dir)
+                        for log in LOG_TABLES}
+            finally:
+                conn.rollback()
+                if postgres:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': RETENTION_LOCK_KEY})
+                    conn.commit()
+
+
+_job: Optional[LogRetentionJob] = None
+
+
+def get_log_retention_job() -> LogRetentionJob:
+    """Получить экземпляр LogRetentionJob"""
+    global _job
+    if _job is None:
+        _job = LogRetentionJob()
+    return _job
@@ -1,13 +1,18 @@
 """
 Notification Dispatcher — центральный диспетчер уведомлений.
-Создаёт запись Notification в БД и отправляет через активные каналы
-(Telegram) в зависимости от настроек сотрудника.
+Создаёт запись Notification в БД и ставит отправку через активные каналы
+(Telegram) в outbox в зависимости от настроек сотрудника — в той же
+транзакции; доставляет фоновый воркер (services/notification_outbox.py).
 """
 import logging
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
 
+from services.notification_outbox import (
+    DeliveryError, DeliveryLimits, enqueue_notification, outbox_handler,
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +38,7 @@ async def dispatch_notification(
         related_entity_id: ID связанной сущности
     """
     from database import Notification, NotificationSettings, Employee
+    from services.notification_inbox import record_created
 
     try:
         # 1. Создать запись Notification в БД
@@ -48,6 +54,7 @@ async def dispatch_notification(
         )
         db.add(notification)
         db.flush()
+        record_created(db, notification)
 
         # 2. Загрузить настройки уведомлений сотрудника
         settings = db.query(NotificationSettings).filter_by(
@@ -96,13 +103,17 @@ async def dispatch_notification(
                 db.commit()
                 return
 
-        db.commit()
-
-        # 4. Отправить через Telegram если включён
+        # 4. Поставить отправку в Telegram в outbox (атомарно с уведомлением)
         if settings.telegram_enabled:
             employee = db.query(Employee).filter_by(id=employee_id).first()
             if employee and employee.telegram_user_id:
-                await _send_telegram(employee.telegram_user_id, title, message)
+                enqueue_notification(db, 'employee_telegram', {
+                    'telegram_user_id': employee.telegram_user_id,
+                    'title': title,
+                    'message': message,
+                })
+
+        db.commit()
 
     except Exception as e:
         logger.error(f"Ошибка dispatch_notification для employee_id={employee_id}: {e}")
@@ -112,13 +123,15 @@ async def dispatch_notification(
             pass
 
 
-async def _send_telegram(telegram_user_id: int, title: str, message: str) -> None:
-    """Отправить уведомление через Telegram Bot"""
-    try:
-        from telegram_service import get_telegram_service
-        tg = get_telegram_service()
-        if tg.bot_available:
-            text = f"<b>{title}</b>\n{message}"
-            await tg.send_message(telegram_user_id, text)
-    except Exception as e:
-        logger.warning(f"Не удалось отправить Telegram уведомление: {e}")
+@outbox_handler('employee_telegram')
+async def _send_telegram(payload: dict, limits: DeliveryLimits) -> None:
+    """Отправить уведомление через Telegram Bot (задание outbox)"""
+    from telegram_service import get_telegram_service
+    tg = get_telegram_service()
+    if not tg.bot_available:
+        raise DeliveryError("Telegram Bot недоступен")
+    telegram_user_id = payload['telegram_user_id']
+    await limits.telegram(telegram_user_id)
+    text = f"<b>{payload['title']}</b>\n{payload['message']}"
+    if not await tg.send_message(telegram_user_id, text):
+        raise DeliveryError(f"Не удалось отправить Telegram уведомление {telegram_user_id}")
@@ -0,0 +1,237 @@
+"""
+Лента уведомлений сотрудника: страницы, счётчик непрочитанных, архив.
+
+Раньше GET /notifications отдавал все уведомления сотрудника на каждый
+опрос клиента, бейдж «непрочитанные» требовал ещё одной полной выборки,
+а каждое прочтение было отдельным коммитом.
+
+- list_page — keyset-пагинация по (created_at, id) (индекс
+  ix_notifications_inbox): стоимость страницы не зависит от её номера,
+  новые уведомления не сдвигают уже полученные страницы (services/keyset.py);
+- счётчик непрочитанных хранится в notification_counters и меняется в
+  транзакции уведомления (record_created / mark_read). Нет строки
+  счётчика — её создаёт по COUNT(*) ближайшая запись, а чтение до тех пор
+  отвечает COUNT(*) без записи в БД;
+- mark_read — одна UPDATE-операция для списка id или для всех;
+- NotificationArchiver раз в ARCHIVE_INTERVAL секунд переносит прочитанные
+  уведомления старше NOTIFICATION_ARCHIVE_DAYS в notifications_archive
+  пачками по ARCHIVE_BATCH.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import DateTime, case, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, Notification, NotificationArchive, NotificationCounter
+from services.keyset import paginate
+
+logger = logging.getLogger(__name__)
+
+# Размер страницы по умолчанию и максимальный
+INBOX_PAGE_SIZE = 50
+INBOX_PAGE_MAX = 200
+# Через сколько дней прочитанные уведомления уходят в архив
+NOTIFICATION_ARCHIVE_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_DAYS", "90"))
+# Уведомлений за одну транзакцию архивации
+ARCHIVE_BATCH = 1000
+# Период архивации (секунды)
+ARCHIVE_INTERVAL = 3600.0
+
+_ARCHIVED_COLUMNS = ('id', 'employee_id', 'notification_type', 'title', 'message',
+                     'related_entity_type', 'related_entity_id', 'created_at', 'read_at')
+
+
+def _unread():
+    return Notification.is_read == False  # noqa: E712
+
+
+def list_page(db: Session, employee_id: int, limit: int = INBOX_PAGE_SIZE,
+              cursor: Optional[str] = None, unread_only: bool = False
+              ) -> Tuple[List[Notification], Optional[str]]:
+    """Страница ленты (новые сверху) и курсор следующей (None — страница последняя)"""
+    limit = max(1, min(limit, INBOX_PAGE_MAX))
+    query = db.query(Notification).filter(Notification.employee_id == employee_id)
+    if unread_only:
+        query = query.filter(_unread())
+    return paginate(query, Notification.created_at, Notification.id, limit, cursor)
+
+
+def _count_unread(db: Session, employee_id: int) -> int:
+    return db.execute(
+        select(func.count(Notification.id)).where(Notification.employee_id == employee_id, _unread())
+    ).scalar()
+
+
+def _create_counter(db: Session, employee_id: int) -> bool:
+    """Создать строку счётчика по фактическому числу непрочитанных (False — уже есть)"""
+    try:
+        with db.begin_nested():
+            db.add(NotificationCounter(employee_id=employee_id,
+                                       unread_count=_count_unread(db, employee_id),
+                                       updated_at=datetime.utcnow()))
+        return True
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        return False
+
+
+def _adjust(db: Session, employee_id: int, delta: int):
+    """Сдвинуть счётчик на delta в текущей транзакции"""
+    shifted = NotificationCounter.unread_count + delta
+    stmt = (
+        update(NotificationCounter)
+        .where(NotificationCounter.employee_id == employee_id)
+        .values(unread_count=case((shifted < 0, 0), else_=shifted), updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    # Новая строка считается по COUNT(*), который уже видит изменения этой транзакции
+    if not db.execute(stmt).rowcount and not _create_counter(db, employee_id):
+        db.execute(stmt)
+
+
+def unread_count(db: Session, employee_id: int) -> int:
+    """
+    Непрочитанных уведомлений сотрудника (одно чтение по первичному ключу).
+    Строки счётчика ещё нет — COUNT(*) по уведомлениям; только чтение.
+    """
+    value = db.execute(
+        select(NotificationCounter.unread_count).where(NotificationCounter.employee_id == employee_id)
+    ).scalar()
+    if value is None:
+        return _count_unread(db, employee_id)
+    return value
+
+
+def record_created(db: Session, notification: Notification):
+    """Учесть новое (непрочитанное) уведомление в счётчике; вызывать после flush"""
+    if not notification.is_read:
+        _adjust(db, notification.employee_id, 1)
+
+
+def mark_read(db: Session, employee_id: int, ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Отметить прочитанными уведомления сотрудника (ids=None — все).
+    Возвращает число изменённых; коммит — на вызывающей стороне.
+    """
+    criteria = [Notification.employee_id == employee_id, _unread()]
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        criteria.append(Notification.id.in_(ids))
+    changed = db.execute(
+        update(Notification).where(*criteria)
+        .values(is_read=True, read_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if ids is None:
+        reset = db.execute(
+            update(NotificationCounter).where(NotificationCounter.employee_id == employee_id)
+            .values(unread_count=0, updated_at=datetime.utcnow())
+        )
+        if not reset.rowcount:
+            _create_counter(db, employee_id)
+    elif changed:
+        _adjust(db, employee_id, -changed)
+    if changed:
+        db.expire_all()
+    return changed
+
+
+def archive_read(db: Session, older_than_days: int = NOTIFICATION_ARCHIVE_DAYS,
+                 batch_size: int = ARCHIVE_BATCH, now: Optional[datetime] = None) -> int:
+    """Перенести прочитанные уведомления старше older_than_days в архив"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    archived_at = now or datetime.utcnow()
+    columns = [getattr(Notification, name) for name in _ARCHIVED_COLUMNS]
+    total = 0
+    while True:
+        ids = db.execute(
+            select(Notification.id)
+            .where(Notification.is_read == True,  # noqa: E712
+                   func.coalesce(Notification.read_at, Notification.created_at) < cutoff)
+            .order_by(Notification.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return total
+        db.execute(
+            insert(NotificationArchive).from_select(
+                list(_ARCHIVED_COLUMNS) + ['archived_at'],
+                select(*columns, literal(archived_at, DateTime()))
+                .where(Notification.id.in_(ids)),
+            )
+        )
+        db.execute(delete(Notification).where(Notification.id.in_(ids))
+                   .execution_options(synchronize_session=False))
+        db.commit()
+        total += len(ids)
+        logger.info(f"Архивировано уведомлений: {len(ids)} (всего {total})")
+
+
+class NotificationArchiver:
+    """Периодический перенос старых прочитанных уведомлений в архив"""
+
+    def __init__(self, session_factory=SessionLocal, interval: float = ARCHIVE_INTERVAL,
+                 older_than_days: int = NOTIFICATION_ARCHIVE_DAYS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.older_than_days = older_than_days
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить периодическую архивацию в текущем event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Notification archiver запущен")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification archiver: ошибка прохода: {e}")
+            await asyncio.sleep(self.interval)
+
+    def run_once(self) -> int:
+        """Один проход архивации"""
+        db = self.session_factory()
+        try:
+            return archive_read(db, self.older_than_days)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+_archiver: Optional[NotificationArchiver] = None
+
+
+def get_notification_archiver() -> NotificationArchiver:
+    """Получить экземпляр NotificationArchiver"""
+    global _archiver
+    if _archiver is None:
+        _archiver = NotificationArchiver()
+    return _archiver
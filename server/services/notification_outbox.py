@@ -0,0 +1,346 @@
+"""
+Outbox исходящих уведомлений (Telegram/email) и фоновый воркер доставки.
+
+Обработчики запросов не отправляют сообщения сами: enqueue_notification()
+пишет задание в таблицу notification_outbox (в той же транзакции, что и
+изменение данных), а NotificationWorker, запущенный при старте
+приложения, забирает пачки готовых заданий, доставляет их с учётом
+лимитов Telegram/SMTP (token bucket) и повторяет неудачные попытки с
+экспоненциальной задержкой. Задания переживают рестарт; зависшие в
+processing (воркер упал посреди доставки) через LEASE_SECONDS снова
+становятся доступны.
+
+Обработчики видов заданий регистрируются декоратором outbox_handler:
+
+    @outbox_handler('messenger_script')
+    async def deliver(payload: dict, limits: DeliveryLimits) -> None: ...
+
+Обработчик открывает собственную сессию БД, перед каждой отправкой
+вызывает limits.telegram(chat_id) / limits.smtp() и бросает исключение,
+если доставка не удалась (задание будет повторено).
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, NotificationOutbox, MessengerMessageLog
+
+logger = logging.getLogger(__name__)
+
+# Заданий за один проход воркера
+BATCH_SIZE = 20
+# Пауза между проходами, если очередь пуста (enqueue будит воркер раньше)
+POLL_INTERVAL = 5.0
+# Через сколько секунд задание в processing считается брошенным
+LEASE_SECONDS = 300
+# Повторы: 10 с, 20 с, 40 с ... не дольше часа
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Лимиты Bot API: ~30 сообщений/с на бота, 1/с в личный чат, 20/мин в группу
+TELEGRAM_GLOBAL_RATE = 25.0
+TELEGRAM_PRIVATE_RATE = 1.0
+TELEGRAM_GROUP_RATE = 20 / 60
+# SMTP-провайдеры (Mail.ru, Yandex) режут частые отправки с одного ящика
+SMTP_RATE = 1.0
+SMTP_BURST = 5
+
+
+class DeliveryError(Exception):
+    """Доставка не удалась; при исчерпании попыток пишется в MessengerMessageLog"""
+
+    def __init__(self, message: str, messenger_chat_id: Optional[int] = None,
+                 message_type: Optional[str] = None, message_text: Optional[str] = None):
+        super().__init__(message)
+        self.messenger_chat_id = messenger_chat_id
+        self.message_type = message_type
+        self.message_text = message_text
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity впрок"""
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = None
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> float:
+        """Взять токен; 0 — взят, иначе сколько секунд ждать до следующего"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    @property
+    def idle(self) -> bool:
+        """Бакет полон — его можно выбросить без потери ограничения"""
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                wait = self.try_acquire()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+
+class DeliveryLimits:
+    """Лимиты отправки воркера: общий Telegram, по чатам Telegram и SMTP"""
+
+    MAX_CHAT_BUCKETS = 1000
+
+    def __init__(self):
+        self.telegram_global = TokenBucket(TELEGRAM_GLOBAL_RATE, TELEGRAM_GLOBAL_RATE)
+        self.smtp_bucket = TokenBucket(SMTP_RATE, SMTP_BURST)
+        self._chats: Dict[int, TokenBucket] = {}
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.MAX_CHAT_BUCKETS:
+                self._chats = {k: b for k, b in self._chats.items() if not b.idle}
+            # Отрицательный id — группа/супергруппа
+            rate = TELEGRAM_GROUP_RATE if int(chat_id) < 0 else TELEGRAM_PRIVATE_RATE
+            bucket = self._chats[chat_id] = TokenBucket(rate, 1.0)
+        return bucket
+
+    async def telegram(self, chat_id: int):
+        """Дождаться права отправить сообщение в chat_id"""
+        await self._chat_bucket(chat_id).acquire()
+        await self.telegram_global.acquire()
+
+    async def smtp(self):
+        """Дождаться права отправить письмо"""
+        await self.smtp_bucket.acquire()
+
+
+Handler = Callable[[dict, DeliveryLimits], Awaitable[None]]
+_handlers: Dict[str, Handler] = {}
+
+
+def outbox_handler(kind: str):
+    """Регистрация обработчика вида заданий"""
+    def decorator(func: Handler) -> Handler:
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def _load_handlers():
+    """Импорт модулей, регистрирующих обработчики"""
+    import services.notification_service  # noqa: F401
+    import services.notification_dispatcher  # noqa: F401
+
+
+def enqueue_notification(db: Session, kind: str, payload: dict, commit: bool = False,
+                         delay: float = 0, max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> NotificationOutbox:
+    """
+    Поставить уведомление в очередь.
+
+    По умолчанию только добавляет запись в сессию — вызывать до db.commit()
+    обработчика, чтобы задание и изменение данных фиксировались атомарно.
+    commit=True — закоммитить сразу (если транзакция уже завершена).
+    """
+    job = NotificationOutbox(
+        kind=kind,
+        payload=payload,
+        status='pending',
+        attempts=0,
+        max_attempts=max_attempts,
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.add(job)
+    if commit:
+        db.commit()
+    get_notification_worker().wake()
+    return job
+
+
+def backoff_delay(attempts: int) -> float:
+    """Задержка перед повтором после attempts неудачных попыток (с джиттером)"""
+    delay = min(BACKOFF_BASE * (2 ** max(attempts - 1, 0)), BACKOFF_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class NotificationWorker:
+    """Фоновая доставка заданий из notification_outbox"""
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = BATCH_SIZE,
+                 poll_interval: float = POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.limits = DeliveryLimits()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Запустить цикл доставки в текущем event loop"""
+        if self.running:
+            return
+        _load_handlers()
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+        logger.info(f"Notification worker запущен ({self.worker_id})")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def wake(self):
+        """Разбудить воркер (потокобезопасно; без запущенного воркера — no-op)"""
+        if self._loop is None or self._wake is None or self._loop.is_closed():
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification worker: ошибка прохода: {e}")
+                processed = 0
+            if processed >= self.batch_size:
+                continue  # очередь не разобрана — сразу следующая пачка
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def claim_batch(self) -> list:
+        """Забрать пачку готовых заданий: pending по сроку и брошенные processing"""
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            query = db.query(NotificationOutbox).filter(
+                or_(
+                    (NotificationOutbox.status == 'pending') &
+                    (NotificationOutbox.next_attempt_at <= now),
+                    (NotificationOutbox.status == 'processing') &
+                    (NotificationOutbox.locked_at < now - timedelta(seconds=LEASE_SECONDS)),
+                )
+            ).order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+            # PostgreSQL: несколько воркеров (uvicorn workers) не заберут одно задание
+            jobs = query.with_for_update(skip_locked=True).limit(self.batch_size).all()
+            claimed = []
+            for job in jobs:
+                job.status = 'processing'
+                job.locked_at = now
+                job.locked_by = self.worker_id
+                job.attempts = (job.attempts or 0) + 1
+                claimed.append((job.id, job.kind, dict(job.payload or {}),
+                                job.attempts, job.max_attempts or DEFAULT_MAX_ATTEMPTS))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    async def run_once(self) -> int:
+        """Один проход: забрать пачку и доставить. Возвращает число заданий"""
+        # Синхронная работа с БД — в пуле потоков, чтобы не блокировать цикл событий
+        batch = await asyncio.to_thread(self.claim_batch)
+        if not batch:
+            return 0
+        results = await asyncio.gather(*(self._deliver(*job) for job in batch))
+        await asyncio.to_thread(self._record_results, results)
+        return len(batch)
+
+    async def _deliver(self, job_id, kind, payload, attempts, max_attempts):
+        handler = _handlers.get(kind)
+        if handler is None:
+            return job_id, attempts, max_attempts, DeliveryError(f"Неизвестный вид задания: {kind}")
+        try:
+            await handler(payload, self.limits)
+            return job_id, attempts, max_attempts, None
+        except Exception as e:
+            return job_id, attempts, max_attempts, e
+
+    def _record_results(self, results):
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            for job_id, attempts, max_attempts, error in results:
+                job = db.query(NotificationOutbox).filter(NotificationOutbox.id == job_id).first()
+                if job is None:
+                    continue
+                job.locked_at = None
+                job.locked_by = None
+                if error is None:
+                    job.status = 'sent'
+                    job.sent_at = now
+                    job.last_error = None
+                    continue
+                job.last_error = str(error)[:2000]
+                if attempts >= max_attempts:
+                    job.status = 'failed'
+                    logger.error(f"Outbox #{job_id} ({job.kind}): доставка не удалась "
+                                 f"после {attempts} попыток: {error}")
+                    chat_id = getattr(error, 'messenger_chat_id', None)
+                    if chat_id:
+                        db.add(MessengerMessageLog(
+                            messenger_chat_id=chat_id,
+                            message_type=getattr(error, 'message_type', None) or job.kind,
+                            message_text=getattr(error, 'message_text', None),
+                            sent_by=None,
+                            delivery_status='failed',
+                        ))
+                else:
+                    job.status = 'pending'
+                    job.next_attempt_at = now + timedelta(seconds=backoff_delay(attempts))
+                    logger.warning(f"Outbox #{job_id} ({job.kind}): попытка {attempts} "
+                                   f"не удалась, повтор позже: {error}")
+            db.commit()
+        finally:
+            db.close()
+
+
+_worker: Optional[NotificationWorker] = None
+
+
+def get_notification_worker() -> NotificationWorker:
+    """Получить экземпляр NotificationWorker"""
+    global _worker
+    if _worker is None:
+        _worker = NotificationWorker()
+    return _worker
@@ -14,6 +14,9 @@ from database import (
 )
 from telegram_service import get_telegram_service
 from email_service import get_email_service
+from services.notification_outbox import (
+    DeliveryError, DeliveryLimits, enqueue_notification, outbox_handler,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -102,8 +105,39 @@ def build_script_context(db: Session, card, contract) -> dict:
     return ctx
 
 
-async def send_invites_to_members(chat_id: int, db: Session):
-    """Разослать invite-ссылки участникам чата"""
+def enqueue_chat_invites(db: Session, chat_id: int, commit: bool = False):
+    """Поставить рассылку invite-ссылок участникам чата в outbox"""
+    return enqueue_notification(db, 'chat_invites', {'chat_id': chat_id}, commit=commit)
+
+
+def enqueue_messenger_notification(db: Session, crm_card_id: int, script_type: str,
+                                   stage_name: str = "", extra_context: dict = None,
+                                   commit: bool = False):
+    """Поставить автоуведомление CRM-карточки в outbox (см. trigger_messenger_notification)"""
+    return enqueue_notification(db, 'messenger_script', {
+        'crm_card_id': crm_card_id,
+        'script_type': script_type,
+        'stage_name': stage_name,
+        'extra_context': extra_context,
+    }, commit=commit)
+
+
+def enqueue_supervision_notification(db: Session, supervision_card_id: int, script_type: str,
+                                     stage_name: str = "", commit: bool = False):
+    """Поставить автоуведомление карточки надзора в outbox"""
+    return enqueue_notification(db, 'supervision_script', {
+        'supervision_card_id': supervision_card_id,
+        'script_type': script_type,
+        'stage_name': stage_name,
+    }, commit=commit)
+
+
+async def send_invites_to_members(chat_id: int, db: Session, limits: DeliveryLimits = None):
+    """Разослать invite-ссылки участникам чата
+
+    Участники, которым отправить не удалось, остаются pending; если были
+    неудачные попытки — DeliveryError (воркер повторит только для них).
+    """
     chat = db.query(MessengerChat).filter(MessengerChat.id == chat_id).first()
     if not chat or not chat.invite_link:
         return
@@ -115,6 +149,8 @@ async def send_invites_to_members(chat_id: int, db: Session):
 
     tg = get_telegram_service()
     email_svc = get_email_service()
+    failed = 0
+    email_members = []
 
     for member in members:
         sent = False
@@ -122,40 +158,72 @@ async def send_invites_to_members(chat_id: int, db: Session):
         # Пробуем через Telegram бота (личное сообщение)
         if member.telegram_user_id and tg.bot_available:
             try:
-                await tg.send_message(
+                if limits:
+                    await limits.telegram(member.telegram_user_id)
+                msg_id = await tg.send_message(
                     member.telegram_user_id,
                     f"Вас пригласили в проектный чат: {chat.chat_title}\n"
                     f"Присоединяйтесь: {chat.invite_link}"
                 )
-                member.invite_status = 'sent'
-                sent = True
+                if msg_id:
+                    member.invite_status = 'sent'
+                    sent = True
             except Exception:
                 pass
 
-        # Если не получилось через Telegram — отправляем email
-        if not sent and member.email and email_svc.available:
-            # Получаем имя участника
-            name = ""
-            if member.member_type == 'employee':
-                emp = db.query(Employee).filter(Employee.id == member.member_id).first()
-                name = emp.full_name if emp else ""
-            elif member.member_type == 'client':
-                cl = db.query(Client).filter(Client.id == member.member_id).first()
-                name = cl.full_name if cl else ""
-
-            success = await email_svc.send_chat_invite(
-                to_email=member.email,
-                recipient_name=name,
+        if sent:
+            member.invited_at = datetime.utcnow()
+        elif member.email and email_svc.available:
+            # Не получилось через Telegram — письмо (отправляются пачкой ниже)
+            email_members.append(member)
+        else:
+            member.invited_at = None
+            if member.telegram_user_id and tg.bot_available:
+                failed += 1
+
+    if email_members:
+        # Имена участников одним запросом на тип
+        employee_ids = [m.member_id for m in email_members if m.member_type == 'employee']
+        client_ids = [m.member_id for m in email_members if m.member_type == 'client']
+        names = {}
+        if employee_ids:
+            for emp in db.query(Employee).filter(Employee.id.in_(employee_ids)).all():
+                names[('employee', emp.id)] = emp.full_name or ""
+        if client_ids:
+            for cl in db.query(Client).filter(Client.id.in_(client_ids)).all():
+                names[('client', cl.id)] = cl.full_name or ""
+
+        messages = []
+        for member in email_members:
+            subject, html_body = email_svc.render_chat_invite(
+                recipient_name=names.get((member.member_type, member.member_id), ""),
                 chat_title=chat.chat_title or "",
                 invite_link=chat.invite_link,
             )
+            messages.append((member.email, subject, html_body))
+
+        # Все письма — за одну SMTP-сессию
+        results = await email_svc.send_bulk(messages, throttle=limits.smtp if limits else None)
+        for member, success in zip(email_members, results):
             if success:
                 member.invite_status = 'email_sent'
-                sent = True
-
-        member.invited_at = datetime.utcnow() if sent else None
+                member.invited_at = datetime.utcnow()
+            else:
+                member.invited_at = None
+                failed += 1
 
     db.commit()
+    if failed:
+        raise DeliveryError(f"Не удалось отправить приглашения: {failed} из {len(members)}")
+
+
+@outbox_handler('chat_invites')
+async def _deliver_chat_invites(payload: dict, limits: DeliveryLimits):
+    own_db = SessionLocal()
+    try:
+        await send_invites_to_members(payload['chat_id'], own_db, limits)
+    finally:
+        own_db.close()
 
 
 async def trigger_messenger_notification(
@@ -164,10 +232,12 @@ async def trigger_messenger_notification(
     script_type: str,
     stage_name: str = "",
     extra_context: dict = None,
+    limits: DeliveryLimits = None,
 ):
     """
-    Хук автоуведомлений: найти чат карточки -> найти подходящий скрипт -> отправить.
-    Вызывается из workflow-эндпоинтов через asyncio.create_task().
+    Автоуведомление: найти чат карточки -> найти подходящий скрипт -> отправить.
+    Вызывается воркером outbox (эндпоинты ставят задание через
+    enqueue_messenger_notification). Неудачная отправка — DeliveryError.
     script_type: 'project_start' | 'stage_complete' | 'project_end'
     """
     # С7: Создаём собственную сессию — переданная db может быть закрыта
@@ -218,11 +288,20 @@ async def trigger_messenger_notification(
 
         # Отправить через Telegram
         tg = get_telegram_service()
+        if limits:
+            await limits.telegram(chat.telegram_chat_id)
         msg_id = await tg.send_script_message(
             chat_id=chat.telegram_chat_id,
             template=script.message_template,
             context=ctx,
         )
+        if not msg_id:
+            raise DeliveryError(
+                f"Telegram не принял сообщение в чат {chat.telegram_chat_id}",
+                messenger_chat_id=chat.id,
+                message_type=f'auto_{script_type}',
+                message_text=tg.render_template(script.message_template, ctx),
+            )
 
         # Записать в лог
         if msg_id:
@@ -240,20 +319,35 @@ async def trigger_messenger_notification(
                 f"Автоуведомление отправлено: card={crm_card_id}, "
                 f"type={script_type}, stage={stage_name}"
             )
+    except DeliveryError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка автоуведомления (card={crm_card_id}): {e}")
+        raise
     finally:
         own_db.close()
 
 
+@outbox_handler('messenger_script')
+async def _deliver_messenger_script(payload: dict, limits: DeliveryLimits):
+    await trigger_messenger_notification(
+        None, payload['crm_card_id'], payload['script_type'],
+        stage_name=payload.get('stage_name') or "",
+        extra_context=payload.get('extra_context'),
+        limits=limits,
+    )
+
+
 async def trigger_supervision_notification(
     db: Session,
     supervision_card_id: int,
     script_type: str,
     stage_name: str = "",
+    limits: DeliveryLimits = None,
 ):
     """
-    Хук автоуведомлений для надзора: найти чат -> скрипт -> отправить.
+    Автоуведомление надзора: найти чат -> скрипт -> отправить.
+    Вызывается воркером outbox (см. enqueue_supervision_notification).
     script_type: 'supervision_stage_complete' | 'supervision_move'
     """
     # С7: Создаём собственную сессию — переданная db может быть закрыта
@@ -328,11 +422,20 @@ async def trigger_supervision_notification(
 
         # Отправить через Telegram
         tg = get_telegram_service()
+        if limits:
+            await limits.telegram(chat.telegram_chat_id)
         msg_id = await tg.send_script_message(
             chat_id=chat.telegram_chat_id,
             template=script.message_template,
             context=ctx,
         )
+        if not msg_id:
+            raise DeliveryError(
+                f"Telegram не принял сообщение в чат {chat.telegram_chat_id}",
+                messenger_chat_id=chat.id,
+                message_type=f'auto_{script_type}',
+                message_text=tg.render_template(script.message_template, ctx),
+            )
 
         if msg_id:
             log_entry = MessengerMessageLog(
@@ -349,7 +452,19 @@ async def trigger_supervision_notification(
                 f"Автоуведомление надзора: sv_card={supervision_card_id}, "
                 f"type={script_type}, stage={stage_name}"
             )
+    except DeliveryError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка автоуведомления надзора (sv_card={supervision_card_id}): {e}")
+        raise
     finally:
         own_db.close()
+
+
+@outbox_handler('supervision_script')
+async def _deliver_supervision_script(payload: dict, limits: DeliveryLimits):
+    await trigger_supervision_notification(
+        None, payload['supervision_card_id'], payload['script_type'],
+        stage_name=payload.get('stage_name') or "",
+        limits=limits,
+    )
@@ -0,0 +1,591 @@
+"""
+Лента выплат (read model) для payments_router: GET /, /summary, /by-type, /export.
+
+Раньше список выплат загружал все платежи периода, затем отдельными
+IN (...) — сотрудников, договоры, CRM-карточки, карточки надзора и ещё раз
+договоры карточек, и то же для окладов; /by-type делал запросы на каждую
+строку (db.query(Salary).all() без фильтра), /summary суммировал в Python.
+
+Лента — таблица payment_ledger, строка на платёж или оклад:
+- реквизиты договора (номер, адрес, площадь, город, агент, тип проекта)
+  берутся с договора карточки CRM / надзора, иначе с contract_id;
+- имя и должность сотрудника, колонка карточки (card_stage);
+- отчётный месяц — исходная строка и её год / номер месяца (report_year,
+  report_month_num): фильтры периода идут по индексу, а не LIKE 'YYYY%'.
+Список, сводка и выплаты по типу — один запрос к ленте; годовая выгрузка
+(/export) отдаётся потоком JSON порциями по EXPORT_CHUNK строк.
+
+Актуальность:
+- install() подписывает фабрику сессий: после flush платежей, окладов и
+  изменения реквизитов договоров, карточек и сотрудников затронутые строки
+  пересчитываются в той же транзакции (upsert); массовые UPDATE/DELETE
+  платежей и окладов через сессию (query.update()/delete(), repricing)
+  пересчитывают строки, выбранные их условием;
+- ensure_ledger() при старте заполняет пустую ленту, rebuild() — полная
+  пересборка: python -m services.payment_ledger rebuild.
+Массовые UPDATE договоров, карточек и сотрудников мимо ORM-объектов
+событий не порождают — после них нужен rebuild.
+"""
+import argparse
+import json
+import logging
+import re
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, case, event, func, inspect as sa_inspect, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import (
+    Contract, CRMCard, Employee, Payment, PaymentLedgerEntry, Salary, SupervisionCard,
+)
+from services.statistics_queries import period_conditions
+
+logger = logging.getLogger(__name__)
+
+L = PaymentLedgerEntry
+
+KIND_PAYMENT = 'payment'
+KIND_SALARY = 'salary'
+SALARY_TYPE = 'Оклад'
+SALARIES_PAYMENT_TYPE = 'Оклады'
+SUPERVISION_TYPE = 'Авторский надзор'
+SUPERVISION_SOURCE = 'CRM Надзор'
+UNKNOWN_EMPLOYEE = 'Неизвестный'
+NO_ROLE = 'Не указано'
+
+# Строк за один проход пересборки
+REBUILD_CHUNK = 1000
+# Строк в порции потоковой выгрузки
+EXPORT_CHUNK = 1000
+
+_REPORT_MONTH = re.compile(r'(\d{4})(?:-(\d{2}))?', re.ASCII)
+
+# Источники строк ленты: таблица → (вид, модель)
+_SOURCES = {
+    'payments': (KIND_PAYMENT, Payment),
+    'salaries': (KIND_SALARY, Salary),
+}
+
+# Реквизиты из связанных таблиц: модель → (столбец ленты, отслеживаемые атрибуты)
+_DETAILS = {
+    Contract: (L.details_contract_id,
+               {'contract_number', 'address', 'area', 'city', 'agent_type', 'project_type'}),
+    CRMCard: (L.crm_card_id, {'contract_id', 'column_name'}),
+    SupervisionCard: (L.supervision_card_id, {'contract_id', 'column_name'}),
+    Employee: (L.employee_id, {'full_name', 'position'}),
+}
+
+
+# =============================================================================
+# СТРОКИ ЛЕНТЫ
+# =============================================================================
+
+def parse_report_month(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Год и номер месяца из 'YYYY-MM' (год без месяца — для 'YYYY...')"""
+    match = _REPORT_MONTH.match(value or '')
+    if not match:
+        return None, None
+    return int(match.group(1)), int(match.group(2)) if match.group(2) else None
+
+
+# Реквизиты договора в строке выборки (имена — столбцы ленты)
+_CONTRACT_COLUMNS = (
+    Contract.id.label('details_contract_id'), Contract.contract_number, Contract.address,
+    Contract.area, Contract.city, Contract.agent_type,
+    Contract.project_type.label('contract_project_type'),
+)
+_DETAIL_KEYS = tuple(column.key for column in _CONTRACT_COLUMNS)
+
+
+def compute_payments(conn, payment_ids: Iterable[int]) -> Dict[int, dict]:
+    """Строки ленты для платежей (отсутствующих платежей в ответе нет)"""
+    ids = list(payment_ids)
+    if not ids:
+        return {}
+    details_contract = case(
+        (Payment.crm_card_id.isnot(None), CRMCard.contract_id),
+        (Payment.supervision_card_id.isnot(None), SupervisionCard.contract_id),
+        else_=Payment.contract_id,
+    )
+    rows = conn.execute(
+        select(*Payment.__table__.columns, CRMCard.column_name.label('crm_column'),
+               SupervisionCard.column_name.label('supervision_column'),
+               Employee.full_name, Employee.position, *_CONTRACT_COLUMNS)
+        .outerjoin(CRMCard, CRMCard.id == Payment.crm_card_id)
+        .outerjoin(SupervisionCard, SupervisionCard.id == Payment.supervision_card_id)
+        .outerjoin(Employee, Employee.id == Payment.employee_id)
+        .outerjoin(Contract, Contract.id == details_contract)
+        .where(Payment.id.in_(ids))
+    )
+    result = {}
+    for row in rows:
+        year, month = parse_report_month(row.report_month)
+        result[row.id] = {
+            'kind': KIND_PAYMENT, 'source_id': row.id,
+            'contract_id': row.contract_id, 'crm_card_id': row.crm_card_id,
+            'supervision_card_id': row.supervision_card_id,
+            'employee_id': row.employee_id,
+            'employee_name': row.employee_name or row.full_name or UNKNOWN_EMPLOYEE,
+            'position': row.position or '',
+            'role': row.role, 'stage_name': row.stage_name,
+            'calculated_amount': row.calculated_amount, 'final_amount': row.final_amount,
+            'payment_type': row.payment_type,
+            'report_month': row.report_month, 'report_year': year, 'report_month_num': month,
+            'payment_status': row.payment_status, 'is_paid': row.is_paid,
+            'created_at': row.created_at, 'project_type': None,
+            'card_stage': row.crm_column if row.crm_card_id else row.supervision_column,
+            'reassigned': row.reassigned, 'old_employee_id': row.old_employee_id,
+            'comments': None,
+            **{key: getattr(row, key) for key in _DETAIL_KEYS},
+        }
+    return result
+
+
+def compute_salaries(conn, salary_ids: Iterable[int]) -> Dict[int, dict]:
+    """Строки ленты для окладов (отсутствующих окладов в ответе нет)"""
+    ids = list(salary_ids)
+    if not ids:
+        return {}
+    rows = conn.execute(
+        select(*Salary.__table__.columns, Employee.full_name, Employee.position, *_CONTRACT_COLUMNS)
+        .outerjoin(Employee, Employee.id == Salary.employee_id)
+        .outerjoin(Contract, Contract.id == Salary.contract_id)
+        .where(Salary.id.in_(ids))
+    )
+    result = {}
+    for row in rows:
+        year, month = parse_report_month(row.report_month)
+        result[row.id] = {
+            'kind': KIND_SALARY, 'source_id': row.id,
+            'contract_id': row.contract_id, 'crm_card_id': None, 'supervision_card_id': None,
+            'employee_id': row.employee_id,
+            'employee_name': row.employee_name or row.full_name or UNKNOWN_EMPLOYEE,
+            'position': row.position or '',
+            'role': row.payment_type, 'stage_name': row.stage_name,
+            'calculated_amount': row.amount, 'final_amount': row.amount,
+            'payment_type': row.payment_type,
+            'report_month': row.report_month, 'report_year': year, 'report_month_num': month,
+            'payment_status': row.payment_status, 'is_paid': row.payment_status == 'paid',
+            'created_at': row.created_at, 'project_type': row.project_type,
+            'card_stage': None, 'reassigned': False, 'old_employee_id': None,
+            'comments': row.comments,
+            **{key: getattr(row, key) for key in _DETAIL_KEYS},
+        }
+    return result
+
+
+_COMPUTE = {KIND_PAYMENT: compute_payments, KIND_SALARY: compute_salaries}
+
+
+def _upsert(conn, rows: List[dict]):
+    insert = pg_insert if conn.dialect.name == 'postgresql' else sqlite_insert
+    stmt = insert(L)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[L.kind, L.source_id],
+        set_={column.name: stmt.excluded[column.name]
+              for column in L.__table__.columns if column.name not in ('kind', 'source_id')},
+    )
+    conn.execute(stmt, rows)
+
+
+def refresh(conn, kind: str, source_ids: Iterable[int]) -> int:
+    """Пересчитать строки ленты; удалённые платежи / оклады убираются"""
+    ids = sorted({i for i in source_ids if i is not None})
+    for start in range(0, len(ids), REBUILD_CHUNK):
+        chunk = ids[start:start + REBUILD_CHUNK]
+        rows = _COMPUTE[kind](conn, chunk)
+        gone = [i for i in chunk if i not in rows]
+        if gone:
+            conn.execute(L.__table__.delete().where(L.kind == kind, L.source_id.in_(gone)))
+        if rows:
+            _upsert(conn, list(rows.values()))
+    return len(ids)
+
+
+def rebuild(conn) -> int:
+    """Полная пересборка ленты; число строк"""
+    conn.execute(L.__table__.delete())
+    count = 0
+    for kind, model in _SOURCES.values():
+        ids = [row[0] for row in conn.execute(select(model.id).order_by(model.id))]
+        count += refresh(conn, kind, ids)
+    return count
+
+
+def ensure_ledger(conn) -> bool:
+    """Заполнить пустую ленту при наличии платежей или окладов (новая таблица на старой БД)"""
+    if conn.execute(select(L.source_id).limit(1)).first() is not None:
+        return False
+    if all(conn.execute(select(model.id).limit(1)).first() is None
+           for _, model in _SOURCES.values()):
+        return False
+    count = rebuild(conn)
+    logger.info(f"Лента выплат заполнена: {count} строк")
+    return True
+
+
+# =============================================================================
+# ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ
+# =============================================================================
+
+_PENDING = 'payment_ledger_pending'
+
+
+def _changed(obj) -> set:
+    return {attr.key for attr in sa_inspect(obj).attrs if attr.history.has_changes()}
+
+
+def _after_flush(session, flush_context):
+    sources, details = {}, {}
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Payment):
+            sources.setdefault(KIND_PAYMENT, set()).add(obj.id)
+        elif isinstance(obj, Salary):
+            sources.setdefault(KIND_SALARY, set()).add(obj.id)
+        elif type(obj) in _DETAILS and obj not in session.new:
+            column, watched = _DETAILS[type(obj)]
+            if obj in session.deleted or _changed(obj) & watched:
+                details.setdefault(column.key, set()).add(obj.id)
+    if sources or details:
+        pending = session.info.setdefault(_PENDING, ({}, {}))
+        for kind, ids in sources.items():
+            pending[0].setdefault(kind, set()).update(ids)
+        for key, ids in details.items():
+            pending[1].setdefault(key, set()).update(ids)
+
+
+def _after_flush_postexec(session, flush_context):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    sources, details = pending
+    conn = session.connection()
+    if details:
+        rows = conn.execute(select(L.kind, L.source_id).where(
+            or_(*(getattr(L, key).in_(ids) for key, ids in details.items()))))
+        for kind, source_id in rows:
+            sources.setdefault(kind, set()).add(source_id)
+    for kind, ids in sources.items():
+        refresh(conn, kind, ids)
+
+
+def _do_orm_execute(orm_execute_state):
+    """Массовые UPDATE/DELETE платежей и окладов: пересчитать выбранные строки"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    table = getattr(orm_execute_state.statement, 'table', None)
+    source = _SOURCES.get(getattr(table, 'name', None))
+    if source is None:
+        return None
+    kind, model = source
+    conn = orm_execute_state.session.connection()
+    params = orm_execute_state.parameters
+    if isinstance(params, (list, tuple)):
+        # UPDATE по первичному ключу со списком параметров: id берём из параметров
+        ids = [row.get('id') for row in params if isinstance(row, dict)]
+        if not ids or None in ids:
+            logger.warning("Лента выплат: массовый %s %s без id в параметрах не отслежен",
+                           'UPDATE' if orm_execute_state.is_update else 'DELETE', table.name)
+            return None
+    else:
+        ids_query = select(model.id)
+        whereclause = orm_execute_state.statement.whereclause
+        if whereclause is not None:
+            ids_query = ids_query.where(whereclause)
+        # Без условия изменяются все строки таблицы — пересчитываются все
+        ids = [row[0] for row in conn.execute(ids_query)]
+    result = orm_execute_state.invoke_statement()
+    refresh(conn, kind, ids)
+    return result
+
+
+def install(session_factory=None):
+    """Пересчитывать ленту при flush сессий фабрики (по умолчанию SessionLocal)"""
+    if session_factory is None:
+        from database import SessionLocal
+        session_factory = SessionLocal
+    if not event.contains(session_factory, 'after_flush', _after_flush):
+        event.listen(session_factory, 'after_flush', _after_flush)
+        event.listen(session_factory, 'after_flush_postexec', _after_flush_postexec)
+        event.listen(session_factory, 'do_orm_execute', _do_orm_execute)
+
+
+# =============================================================================
+# ЧТЕНИЕ
+# =============================================================================
+
+def _amount(value) -> float:
+    return float(value) if value else 0
+
+
+def _area(value) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _period(year, month, include_null_month: bool, allow_empty: bool) -> list:
+    """Отчётный месяц: год (с NULL — «В работе»), месяц"""
+    conditions = []
+    if year:
+        if include_null_month:
+            blank = [L.report_month.is_(None)] + ([L.report_month == ''] if allow_empty else [])
+            conditions.append(or_(L.report_year == year, *blank))
+        else:
+            conditions.append(L.report_year == year)
+    if month:
+        if year:
+            conditions.append(L.report_year == year)
+        conditions.append(L.report_month_num == month)
+    return conditions
+
+
+def _listing_query(year=None, payment_type=None, month=None, include_null_month=False,
+                   contract_id=None, employee_id=None, is_paid=None):
+    payments = [L.kind == KIND_PAYMENT, *_period(year, month, include_null_month, True)]
+    if payment_type and payment_type != SALARY_TYPE:
+        payments.append(L.payment_type == payment_type)
+    if contract_id is not None:
+        payments.append(L.contract_id == contract_id)
+    if employee_id is not None:
+        payments.append(L.employee_id == employee_id)
+    if is_paid is not None:
+        payments.append(L.is_paid == is_paid)
+    parts = [and_(*payments)]
+
+    if not payment_type or payment_type == SALARY_TYPE:
+        salaries = [L.kind == KIND_SALARY, *_period(year, month, include_null_month, False)]
+        if employee_id is not None:
+            salaries.append(L.employee_id == employee_id)
+        if contract_id is not None:
+            salaries.append(L.contract_id == contract_id)
+        if is_paid is not None:
+            # Статус оклада — payment_status ('paid'/'pending')
+            salaries.append(L.payment_status == 'paid' if is_paid else L.payment_status != 'paid')
+        parts.append(and_(*salaries))
+
+    return select(*L.__table__.columns).where(or_(*parts)).order_by(L.kind, L.source_id)
+
+
+def listing_row(row) -> dict:
+    """Строка ленты в формате GET /payments"""
+    if row.kind == KIND_SALARY:
+        return {
+            'id': row.source_id,
+            'contract_id': row.contract_id,
+            'crm_card_id': None,
+            'supervision_card_id': None,
+            'employee_id': row.employee_id,
+            'employee_name': row.employee_name,
+            'position': row.position,
+            'role': row.role,
+            'stage_name': row.stage_name,
+            'calculated_amount': _amount(row.final_amount),
+            'final_amount': _amount(row.final_amount),
+            'amount': _amount(row.final_amount),
+            'payment_type': row.payment_type,
+            'payment_subtype': SALARY_TYPE,
+            'source': SALARY_TYPE,
+            'report_month': row.report_month,
+            'payment_status': row.payment_status or 'pending',
+            'is_paid': bool(row.is_paid),
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+            'project_type': row.project_type or row.contract_project_type,
+            'agent_type': row.agent_type,
+            'address': row.address,
+            'contract_number': row.contract_number,
+            'area': _area(row.area),
+            'city': row.city,
+            'reassigned': False,
+            'comments': row.comments,
+        }
+    supervision = row.supervision_card_id is not None
+    return {
+        'id': row.source_id,
+        'contract_id': row.contract_id,
+        'crm_card_id': row.crm_card_id,
+        'supervision_card_id': row.supervision_card_id,
+        'employee_id': row.employee_id,
+        'employee_name': row.employee_name,
+        'position': row.position,
+        'role': row.role,
+        'stage_name': row.stage_name,
+        'calculated_amount': _amount(row.calculated_amount),
+        'final_amount': _amount(row.final_amount),
+        'amount': _amount(row.final_amount),
+        'payment_type': row.payment_type,
+        'payment_subtype': row.payment_type,
+        'source': SUPERVISION_SOURCE if supervision and row.crm_card_id is None else 'CRM',
+        'report_month': row.report_month,
+        'payment_status': row.payment_status or 'pending',
+        'is_paid': row.is_paid,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'project_type': SUPERVISION_TYPE if supervision else row.contract_project_type,
+        'agent_type': row.agent_type,
+        'address': row.address,
+        'contract_number': row.contract_number,
+        'area': _area(row.area),
+        'city': row.city,
+        'reassigned': row.reassigned,
+    }
+
+
+def listing(db, **filters) -> List[dict]:
+    """Платежи и оклады с фильтрами GET /payments"""
+    return [listing_row(row) for row in db.execute(_listing_query(**filters))]
+
+
+def iter_listing_json(session_factory: Callable, **filters) -> Iterator[bytes]:
+    """
+    Список GET /payments массивом JSON по порциям EXPORT_CHUNK строк.
+    Своя сессия: сессия запроса закрывается до отдачи тела ответа.
+    """
+    with session_factory() as session:
+        result = session.execute(_listing_query(**filters),
+                                 execution_options={'yield_per': EXPORT_CHUNK})
+        yield b'['
+        separator = b''
+        for rows in result.partitions():
+            chunk = ','.join(json.dumps(listing_row(row), ensure_ascii=False) for row in rows)
+            yield separator + chunk.encode('utf-8')
+            separator = b','
+        yield b']'
+
+
+def summary(db, year: int, month: Optional[int] = None, quarter: Optional[int] = None) -> dict:
+    """Сводка платежей по дате создания: оплачено / к оплате, по ролям"""
+    role = func.coalesce(L.role, NO_ROLE).label('role')
+    amount = func.coalesce(L.final_amount, 0)
+    paid = L.is_paid == True  # noqa: E712
+    rows = db.execute(
+        select(role, func.count(),
+               func.sum(case((paid, amount), else_=0)),
+               func.sum(case((paid, 0), else_=amount)))
+        .where(L.kind == KIND_PAYMENT, *period_conditions(L.created_at, year, quarter, month))
+        .group_by(role)
+        .order_by(func.min(L.source_id))
+    ).all()
+    by_role = {name: {'paid': paid_sum, 'pending': pending_sum, 'count': count}
+               for name, count, paid_sum, pending_sum in rows}
+    total_paid = sum(r['paid'] for r in by_role.values())
+    total_pending = sum(r['pending'] for r in by_role.values())
+    return {
+        'year': year,
+        'month': month,
+        'quarter': quarter,
+        'total_paid': total_paid,
+        'total_pending': total_pending,
+        'total': total_paid + total_pending,
+        'by_role': by_role,
+        'payments_count': sum(r['count'] for r in by_role.values()),
+    }
+
+
+def _by_type_salary(row, own_type: bool) -> dict:
+    result = {
+        'id': row.source_id,
+        'contract_id': row.contract_id,
+        'employee_id': row.employee_id,
+        'employee_name': row.employee_name,
+        'position': row.position,
+        'role': row.role,
+        'stage_name': row.stage_name,
+        'final_amount': _amount(row.final_amount),
+        'amount': _amount(row.final_amount),
+        'payment_type': row.payment_type if own_type else SALARY_TYPE,
+        'report_month': row.report_month,
+        'payment_status': row.payment_status,
+        'contract_number': row.contract_number,
+        'address': row.address,
+        'area': _area(row.area),
+        'city': row.city,
+        'agent_type': row.agent_type,
+        'source': SALARY_TYPE,
+        'card_stage': None,
+        'comments': row.comments,
+    }
+    if own_type:
+        result['project_type'] = row.project_type
+    return result
+
+
+def _by_type_payment(row, supervision: bool) -> dict:
+    result = {
+        'id': row.source_id,
+        'contract_id': row.contract_id,
+        'employee_id': row.employee_id,
+        'employee_name': row.employee_name,
+        'position': row.position,
+        'role': row.role,
+        'stage_name': row.stage_name,
+        'final_amount': _amount(row.final_amount),
+        'amount': _amount(row.final_amount),
+        'payment_type': row.payment_type,
+        'report_month': row.report_month,
+        'payment_status': row.payment_status,
+        'contract_number': row.contract_number,
+        'address': row.address,
+        'area': _area(row.area),
+        'city': row.city,
+        'agent_type': row.agent_type,
+        'source': SUPERVISION_SOURCE if supervision else 'CRM',
+        'card_stage': row.card_stage,
+        'reassigned': row.reassigned,
+    }
+    if supervision:
+        result.update({
+            'crm_card_id': row.crm_card_id,
+            'supervision_card_id': row.supervision_card_id,
+            'calculated_amount': _amount(row.calculated_amount),
+            'payment_subtype': row.payment_type,
+            'project_type': row.contract_project_type or SUPERVISION_TYPE,
+        })
+    else:
+        result['old_employee_id'] = row.old_employee_id
+    return result
+
+
+def by_type(db, payment_type: str, project_type_filter: Optional[str] = None) -> List[dict]:
+    """
+    Выплаты по типу ('Оклады' — все оклады) или по типу проекта: платежи
+    карточек надзора / CRM-карточек договоров этого типа и оклады этого типа.
+    По убыванию id.
+    """
+    if payment_type == SALARIES_PAYMENT_TYPE:
+        condition = L.kind == KIND_SALARY
+    elif project_type_filter == SUPERVISION_TYPE:
+        condition = or_(and_(L.kind == KIND_PAYMENT, L.supervision_card_id.isnot(None)),
+                        and_(L.kind == KIND_SALARY, L.project_type == project_type_filter))
+    elif project_type_filter:
+        condition = or_(and_(L.kind == KIND_PAYMENT, L.crm_card_id.isnot(None),
+                             L.contract_project_type == project_type_filter),
+                        and_(L.kind == KIND_SALARY, L.project_type == project_type_filter))
+    else:
+        return []
+
+    own_type = payment_type == SALARIES_PAYMENT_TYPE
+    supervision = project_type_filter == SUPERVISION_TYPE
+    rows = db.execute(select(*L.__table__.columns).where(condition)
+                      .order_by(L.source_id.desc(), L.kind))
+    return [_by_type_salary(row, own_type) if row.kind == KIND_SALARY
+            else _by_type_payment(row, supervision) for row in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Лента выплат")
+    parser.add_argument('command', choices=['rebuild'], help="rebuild — полная пересборка ленты")
+    parser.add_argument('--database-url', help="БД (по умолчанию DATABASE_URL сервера)")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(args.database_url)
+    else:
+        from database import engine
+
+    with engine.begin() as conn:
+        count = rebuild(conn)
+    print(f"Лента выплат пересобрана: {count} строк")
+
+
+if __name__ == '__main__':
+    main()
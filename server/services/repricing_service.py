@@ -0,0 +1,212 @@
+"""
+Пересчёт сумм платежей по текущим тарифам одним SQL-запросом.
+
+Раньше пересчёт шёл построчно: на каждый платёж — запрос договора и
+запрос тарифа (N+1), а после сохранения тарифа надзора — ещё и внутри
+POST /rates/supervision. Здесь новая сумма — одно SQL-выражение над
+payments JOIN contracts с коррелированными подзапросами к rates (таблица
+тарифов маленькая), поэтому:
+- пересчёт — один UPDATE payments ... FROM contracts (PostgreSQL и
+  SQLite >= 3.33);
+- dry-run — SELECT с тем же выражением, отчёт «было → станет» без записи.
+
+Правила выбора тарифа совпадают с GET /payments/calculate:
+1. платёж надзора (supervision_card_id) — тариф «Авторский надзор» роли,
+   сначала для стадии платежа, затем без стадии: площадь × ставка за м²;
+2. Замерщик — тариф города договора (surveyor_price);
+3. Индивидуальный — тариф роли для стадии, затем без стадии: площадь × ставка;
+4. Шаблонный — фиксированная цена диапазона площади (меньший area_from);
+5. договор «Авторский надзор» — как п.1.
+Нет тарифа — сумма 0. Для ручных платежей (is_manual) final_amount
+не перезаписывается (S-08).
+"""
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, case, false, func, or_, select, update
+
+from database import Contract, Payment, Rate
+
+logger = logging.getLogger(__name__)
+
+SUPERVISION = 'Авторский надзор'
+INDIVIDUAL = 'Индивидуальный'
+TEMPLATE = 'Шаблонный'
+SURVEYOR = 'Замерщик'
+
+# Сколько изменений dry-run возвращает построчно (счётчики — полные)
+PREVIEW_LIMIT = 1000
+
+
+@dataclass
+class RepriceResult:
+    """Итог пересчёта: платежей в выборке, изменённых и (dry-run) сами изменения"""
+    total: int = 0
+    updated: int = 0
+    dry_run: bool = False
+    changes: List[dict] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        result = {'status': 'success', 'updated': self.updated, 'total': self.total,
+                  'errors': [], 'dry_run': self.dry_run}
+        if self.dry_run:
+            result['changes'] = self.changes
+        return result
+
+
+def _first_rate(column, *criteria, order_by=()):
+    """Значение первого подходящего тарифа для строки платежа"""
+    return (
+        select(column)
+        .where(*criteria)
+        .order_by(*order_by, Rate.id)
+        .limit(1)
+        .correlate_except(Rate)
+        .scalar_subquery()
+    )
+
+
+def _per_stage_rate(project_type: str):
+    """Ставка за м² роли: сначала для стадии платежа, затем без стадии"""
+    return _first_rate(
+        Rate.rate_per_m2,
+        Rate.project_type == project_type,
+        Rate.role == Payment.role,
+        or_(Rate.stage_name == Payment.stage_name, Rate.stage_name.is_(None)),
+        order_by=(Rate.stage_name.is_(None),),
+    )
+
+
+def repriced_amount():
+    """SQL-выражение суммы платежа по текущим тарифам (payments JOIN contracts)"""
+    area = func.coalesce(Contract.area, 0)
+    supervision_rate = _per_stage_rate(SUPERVISION)
+    surveyor_price = _first_rate(
+        Rate.surveyor_price, Rate.role == SURVEYOR, Rate.city == Contract.city)
+    template_price = _first_rate(
+        Rate.fixed_price,
+        Rate.project_type == TEMPLATE,
+        Rate.role == Payment.role,
+        Rate.area_from <= area,
+        or_(Rate.area_to >= area, Rate.area_to.is_(None)),
+        order_by=(Rate.area_from.asc(),),
+    )
+    return case(
+        (Payment.supervision_card_id.isnot(None), area * func.coalesce(supervision_rate, 0)),
+        (Payment.role == SURVEYOR, func.coalesce(surveyor_price, 0)),
+        (Contract.project_type == INDIVIDUAL, area * func.coalesce(_per_stage_rate(INDIVIDUAL), 0)),
+        (Contract.project_type == TEMPLATE, func.coalesce(template_price, 0)),
+        (Contract.project_type == SUPERVISION, area * func.coalesce(supervision_rate, 0)),
+        else_=0,
+    )
+
+
+def _scope(contract_id=None, role=None, stage_name=None, project_type=None, city=None,
+           supervision: Optional[bool] = None) -> list:
+    """Фильтры выборки платежей (контракт присоединён по contract_id)"""
+    criteria = [Payment.contract_id == Contract.id]
+    if contract_id:
+        criteria.append(Payment.contract_id == contract_id)
+    if role:
+        criteria.append(Payment.role == role)
+    if stage_name:
+        criteria.append(Payment.stage_name == stage_name)
+    if project_type:
+        criteria.append(Contract.project_type == project_type)
+    if city:
+        criteria.append(Contract.city == city)
+    if supervision is True:
+        criteria.append(Payment.supervision_card_id.isnot(None))
+    elif supervision is False:
+        criteria.append(Payment.supervision_card_id.is_(None))
+    return criteria
+
+
+def reprice(db, *, dry_run: bool = False, zero_only: bool = False, **scope) -> RepriceResult:
+    """
+    Пересчитать платежи выборки по текущим тарифам.
+
+    zero_only — только платежи с нулевой суммой, для которых тариф даёт
+    ненулевую (дозаполнение после появления тарифа). dry_run — ничего не
+    менять, вернуть изменения. Коммит — на вызывающей стороне.
+    """
+    db.flush()
+    criteria = _scope(**scope)
+    new_amount = repriced_amount()
+    changed = [Payment.calculated_amount.is_distinct_from(new_amount)]
+    if zero_only:
+        changed += [Payment.final_amount == 0, new_amount > 0]
+
+    total = db.execute(
+        select(func.count(Payment.id)).select_from(Payment).where(*criteria)).scalar()
+    result = RepriceResult(total=total, dry_run=dry_run)
+
+    if dry_run:
+        result.updated = db.execute(
+            select(func.count(Payment.id)).select_from(Payment).where(*criteria, *changed)).scalar()
+        rows = db.execute(
+            select(Payment.id, Payment.contract_id, Payment.role, Payment.stage_name,
+                   Payment.calculated_amount, Payment.final_amount, Payment.is_manual,
+                   new_amount.label('new_amount'))
+            .where(*criteria, *changed)
+            .order_by(Payment.id)
+            .limit(PREVIEW_LIMIT)
+        ).all()
+        result.changes = [
+            {
+                'payment_id': row.id,
+                'contract_id': row.contract_id,
+                'role': row.role,
+                'stage_name': row.stage_name,
+                'old_amount': row.calculated_amount,
+                'new_amount': row.new_amount,
+                'final_amount': row.final_amount if row.is_manual else row.new_amount,
+            }
+            for row in rows
+        ]
+        return result
+
+    is_manual = func.coalesce(Payment.is_manual, false())
+    stmt = (
+        update(Payment)
+        .where(and_(*criteria, *changed))
+        .values(
+            calculated_amount=new_amount,
+            # S-08: Не перезаписывать final_amount для ручных платежей
+            final_amount=case((is_manual, Payment.final_amount), else_=new_amount),
+            updated_at=datetime.utcnow(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result.updated = db.execute(stmt).rowcount
+    if result.updated:
+        # Объекты Payment в сессии устарели после UPDATE мимо ORM
+        db.expire_all()
+        logger.info(f"Пересчитано платежей: {result.updated} из {total} ({scope})")
+    return result
+
+
+def scope_for_rate(rate: Rate) -> Optional[dict]:
+    """Выборка платежей, на которые влияет тариф (None — тариф не применяется)"""
+    if rate.role == SURVEYOR and rate.city:
+        return {'role': SURVEYOR, 'city': rate.city}
+    if not rate.role:
+        return None
+    if rate.project_type == SUPERVISION:
+        return {'role': rate.role, 'stage_name': rate.stage_name, 'supervision': True}
+    if rate.project_type == INDIVIDUAL:
+        return {'role': rate.role, 'stage_name': rate.stage_name,
+                'project_type': INDIVIDUAL, 'supervision': False}
+    if rate.project_type == TEMPLATE:
+        return {'role': rate.role, 'project_type': TEMPLATE, 'supervision': False}
+    return None
+
+
+def reprice_zero_payments_for_rate(db, rate: Rate) -> int:
+    """Дозаполнить нулевые платежи, которые начал покрывать сохранённый тариф"""
+    scope = scope_for_rate(rate)
+    if scope is None:
+        return 0
+    return reprice(db, zero_only=True, **scope).updated
@@ -0,0 +1,354 @@
+"""
+Кэш ответов дашбордов и статистики.
+
+Каждый настольный клиент при переключении вкладки запрашивает
+/dashboard/* и /statistics/* с одними и теми же фильтрами, а таблицы
+под ними меняются несколько раз в минуту.
+
+@cached('contracts', 'crm_cards', ...) над endpoint'ом (под @router.get):
+- ключ — маршрут, нормализованные query-параметры (None отброшены,
+  порядок не важен), область прав пользователя (хэш набора прав —
+  сотрудники с одинаковыми правами делят записи) и версии таблиц,
+  от которых зависит ответ;
+- хранилище — файл SQLite (WAL) RESPONSE_CACHE_PATH, общий для всех
+  uvicorn-workers, без внешнего Redis; хранится готовый JSON ответа;
+- версии таблиц — счётчики в том же файле. install() подписывает
+  фабрику сессий: after_flush и массовые UPDATE/DELETE через сессию
+  собирают затронутые таблицы, после commit их версии увеличиваются —
+  записи со старыми версиями больше не находятся. Увеличение после
+  commit, а не во flush: иначе соседний запрос успел бы закэшировать
+  ещё не зафиксированное состояние под новой версией;
+- RESPONSE_CACHE_TTL — страховка для записей мимо сессии (сырой SQL,
+  другие процессы) и ответов, зависящих от текущей даты;
+- счётчики попаданий и промахов по маршрутам копятся в процессе и раз в
+  STATS_FLUSH_SECONDS добавляются в общее хранилище (GET /api/v1/cache/stats).
+Ошибка хранилища не ломает ответ — endpoint выполняется без кэша.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from sqlalchemy import event, inspect as sa_inspect
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "./cache/responses.sqlite3")
+# Срок жизни записи (секунды)
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+# Предел записей в хранилище; сверх него удаляются самые старые
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# Период сброса счётчиков процесса в общее хранилище (секунды)
+STATS_FLUSH_SECONDS = 5.0
+# Очистка истёкших записей — раз в столько сохранений
+PURGE_EVERY = 100
+
+# Столбцы присутствия (get_current_user обновляет их каждым запросом) —
+# их изменение не делает ответы устаревшими
+VOLATILE_COLUMNS = {
+    'employees': {'last_activity', 'last_login', 'is_online'},
+}
+
+# Аргументы endpoint'а, не входящие в ключ
+_SERVICE_ARGS = ('db', 'current_user')
+# Таблицы, изменённые в транзакции сессии (до commit)
+_PENDING = 'response_cache_tables'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    route TEXT NOT NULL,
+    body BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    route TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL
+);
+"""
+
+
+class ResponseStore:
+    """Файл SQLite, общий для workers: ответы, версии таблиц, счётчики"""
+
+    def __init__(self, path: str = RESPONSE_CACHE_PATH, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3-соединение не переносится между потоками — своё на поток
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def versions(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        names = list(tables)
+        if not names:
+            return ()
+        rows = dict(self._conn().execute(
+            f"SELECT name, version FROM versions WHERE name IN ({','.join('?' * len(names))})", names))
+        return tuple(rows.get(name, 0) for name in names)
+
+    def bump(self, tables: Iterable[str]):
+        names = sorted(set(tables))
+        if not names:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                [(name,) for name in names])
+
+    def get(self, key: str, now: float) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT body FROM entries WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, route: str, body: bytes, now: float, expires_at: float):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, route, body, created_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)", (key, route, body, now, expires_at))
+
+    def purge(self, now: float) -> int:
+        """Удалить истёкшие записи и самые старые сверх max_entries"""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            removed += conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)).rowcount
+        return removed
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM entries")
+
+    def add_stats(self, deltas: Dict[str, list]):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT INTO stats (route, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT (route) DO UPDATE SET hits = hits + excluded.hits, "
+                "misses = misses + excluded.misses",
+                [(route, hits, misses) for route, (hits, misses) in deltas.items()])
+
+    def read_stats(self) -> Tuple[Dict[str, list], int]:
+        conn = self._conn()
+        routes = {route: [hits, misses] for route, hits, misses in conn.execute(
+            "SELECT route, hits, misses FROM stats")}
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return routes, entries
+
+
+def normalize_params(params: dict) -> list:
+    """Параметры запроса для ключа: без None, по имени, значения строками"""
+    return [[name, str(value)] for name, value in sorted(params.items()) if value is not None]
+
+
+def permission_scope(current_user, db) -> str:
+    """Область прав: хэш набора прав сотрудника (кэш прав — permissions.py)"""
+    if current_user is None:
+        return 'anonymous'
+    from permissions import load_permissions
+    permissions = sorted(load_permissions(current_user.id, db))
+    return hashlib.sha1('\n'.join(permissions).encode('utf-8')).hexdigest()[:16]
+
+
+def render(result) -> bytes:
+    """JSON ответа так же, как его сериализует FastAPI (JSONResponse)"""
+    return json.dumps(jsonable_encoder(result), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(',', ':')).encode('utf-8')
+
+
+class ResponseCache:
+    """Ключи, версии таблиц, счётчики процесса поверх ResponseStore"""
+
+    def __init__(self, store: ResponseStore, ttl: int = RESPONSE_CACHE_TTL,
+                 clock: Callable[[], float] = time.time):
+        self.store = store
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._pending_stats: Dict[str, list] = defaultdict(lambda: [0, 0])
+        self._flushed_at = clock()
+        self._puts = 0
+
+    def key(self, route: str, params: dict, scope: str, tables: Tuple[str, ...]) -> str:
+        versions = self.store.versions(tables)
+        raw = json.dumps([route, normalize_params(params), scope, list(zip(tables, versions))],
+                         ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.store.get(key, self.clock())
+
+    def put(self, key: str, route: str, body: bytes, ttl: Optional[int] = None):
+        now = self.clock()
+        self.store.put(key, route, body, now, now + (ttl or self.ttl))
+        self._puts += 1
+        if self._puts % PURGE_EVERY == 0:
+            self.store.purge(now)
+
+    def invalidate(self, *tables: str):
+        """Увеличить версии таблиц (записи, зависящие от них, устаревают)"""
+        self.store.bump(tables)
+
+    def record(self, route: str, hit: bool):
+        with self._lock:
+            self._pending_stats[route][0 if hit else 1] += 1
+            if self.clock() - self._flushed_at < STATS_FLUSH_SECONDS:
+                return
+            deltas, self._pending_stats = dict(self._pending_stats), defaultdict(lambda: [0, 0])
+            self._flushed_at = self.clock()
+        try:
+            self.store.add_stats(deltas)
+        except sqlite3.Error as e:
+            logger.warning(f"Кэш ответов: счётчики не сохранены: {e}")
+
+    def stats(self) -> dict:
+        """Попадания и промахи всех workers (плюс ещё не сброшенные этого процесса)"""
+        routes, entries = self.store.read_stats()
+        with self._lock:
+            for route, (hits, misses) in self._pending_stats.items():
+                total = routes.setdefault(route, [0, 0])
+                total[0] += hits
+                total[1] += misses
+        hits = sum(h for h, _ in routes.values())
+        misses = sum(m for _, m in routes.values())
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0.0,
+            'entries': entries,
+            'routes': {route: {'hits': h, 'misses': m} for route, (h, m) in sorted(routes.items())},
+        }
+
+    # ------------------------------------------------------------------
+    # Инвалидация по записи через сессии
+    # ------------------------------------------------------------------
+
+    def _after_flush(self, session, flush_context):
+        tables = session.info.setdefault(_PENDING, set())
+        for obj in (*session.new, *session.deleted):
+            tables.update(table.name for table in type(obj).__mapper__.tables)
+        for obj in session.dirty:
+            names = [table.name for table in type(obj).__mapper__.tables]
+            volatile = set().union(*(VOLATILE_COLUMNS.get(name, ()) for name in names))
+            changed = {attr.key for attr in sa_inspect(obj).attrs if attr.history.has_changes()}
+            if changed - volatile:
+                tables.update(names)
+
+    def _do_orm_execute(self, orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            orm_execute_state.session.info.setdefault(_PENDING, set()).add(table.name)
+
+    def _after_commit(self, session):
+        tables = session.info.pop(_PENDING, None)
+        if not tables:
+            return
+        try:
+            self.invalidate(*tables)
+        except sqlite3.Error as e:
+            logger.warning(f"Кэш ответов: версии {sorted(tables)} не обновлены: {e}")
+
+    def _after_rollback(self, session):
+        session.info.pop(_PENDING, None)
+
+    def install(self, session_factory=None):
+        """Увеличивать версии таблиц после commit сессий фабрики (по умолчанию SessionLocal)"""
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        if event.contains(session_factory, 'after_commit', self._after_commit):
+            return
+        event.listen(session_factory, 'after_flush', self._after_flush)
+        event.listen(session_factory, 'do_orm_execute', self._do_orm_execute)
+        event.listen(session_factory, 'after_commit', self._after_commit)
+        event.listen(session_factory, 'after_rollback', self._after_rollback)
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(ResponseStore())
+    return _cache
+
+
+def cached(*tables: str, ttl: Optional[int] = None, scope: Callable = permission_scope):
+    """
+    Кэшировать JSON-ответ async endpoint'а, зависящего от таблиц tables.
+    Ставится под @router.get; endpoint получает db и current_user через Depends.
+    """
+    tables = tuple(tables)
+
+    def decorate(endpoint):
+        signature = inspect.signature(endpoint)
+        route = f"{endpoint.__module__.rsplit('.', 1)[-1]}.{endpoint.__name__}"
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            arguments = signature.bind(*args, **kwargs).arguments
+            params = {name: value for name, value in arguments.items() if name not in _SERVICE_ARGS}
+            cache = get_response_cache()
+            try:
+                key = cache.key(route, params, scope(arguments.get('current_user'), arguments.get('db')), tables)
+                body = cache.get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Кэш ответов недоступен ({route}): {e}")
+                return await endpoint(*args, **kwargs)
+
+            if body is not None:
+                cache.record(route, hit=True)
+                return Response(content=body, media_type='application/json', headers={'X-Cache': 'HIT'})
+
+            result = await endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            body = render(result)
+            try:
+                cache.put(key, route, body, ttl)
+            except sqlite3.Error as e:
+                logger.warning(f"Кэш ответов: ответ {route} не сохранён: {e}")
+            cache.record(route, hit=False)
+            return Response(content=body, media_type='application/json', headers={'X-Cache': 'MISS'})
+
+        return wrapper
+
+    return decorate
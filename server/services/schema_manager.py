@@ -0,0 +1,238 @@
+"""
+Версионируемая инициализация схемы БД при старте.
+
+Раньше каждый uvicorn-worker на старте выполнял create_all() и
+_auto_migrate_columns() (inspector.get_columns по всем таблицам) и гонялся
+с соседями — ошибки гасились как «likely race condition».
+
+ensure_schema():
+1. Считает отпечаток схемы — SHA-256 описания моделей (таблицы, колонки,
+   индексы, уникальные ограничения) и head-ревизии Alembic.
+2. Быстрый путь: отпечаток совпадает с сохранённым в schema_state —
+   ничего не делает (один SELECT).
+3. Иначе берёт блокировку схемы (PostgreSQL — pg_advisory_lock, SQLite —
+   файловая блокировка рядом с файлом БД), перепроверяет отпечаток (его мог
+   записать соседний worker) и один раз за все workers:
+   - пустая БД — create_all() + alembic stamp head;
+   - БД под Alembic — alembic upgrade head;
+   - БД без alembic_version (создана create_all) — сверка и stamp head;
+   затем досоздаёт таблицы, столбцы и индексы моделей без ревизий,
+   заполняет пустой куб аналитики и сохраняет отпечаток.
+"""
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import UniqueConstraint, inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Ключ pg_advisory_lock (42 занят seed_permissions)
+SCHEMA_LOCK_KEY = 7301
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+STATE_TABLE = 'schema_state'
+_SERVICE_TABLES = {'alembic_version', STATE_TABLE}
+
+_memory_lock = threading.Lock()
+
+
+def schema_fingerprint(metadata, head: Optional[str]) -> str:
+    """SHA-256 описания моделей и head-ревизии Alembic"""
+    parts = [f"alembic:{head}"]
+    for table in sorted(metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table:{table.name}")
+        for col in table.columns:
+            parts.append(f"col:{col.name}:{col.type!r}:{col.nullable}:{col.primary_key}")
+        for ix in sorted(table.indexes, key=lambda i: i.name or ''):
+            parts.append(f"ix:{ix.name}:{','.join(c.name for c in ix.columns)}:{ix.unique}")
+        for uc in sorted((c for c in table.constraints if isinstance(c, UniqueConstraint)),
+                         key=lambda c: c.name or ''):
+            parts.append(f"uq:{uc.name}:{','.join(c.name for c in uc.columns)}")
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def alembic_config(connection=None):
+    """Config Alembic для server/alembic; connection — выполнить на нём"""
+    from alembic.config import Config
+
+    cfg = Config(str(SERVER_DIR / 'alembic.ini'))
+    cfg.set_main_option('script_location', str(SERVER_DIR / 'alembic'))
+    cfg.attributes['configure_logger'] = False
+    if connection is not None:
+        cfg.attributes['connection'] = connection
+    return cfg
+
+
+def alembic_head() -> Optional[str]:
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def read_fingerprint(conn) -> Optional[str]:
+    """Сохранённый отпечаток (None — схема ещё не сверялась)"""
+    if not inspect(conn).has_table(STATE_TABLE):
+        return None
+    return conn.execute(text(f"SELECT fingerprint FROM {STATE_TABLE} WHERE id = 1")).scalar()
+
+
+def _write_fingerprint(conn, fingerprint: str, revision: Optional[str]):
+    conn.execute(text(f"DELETE FROM {STATE_TABLE}"))
+    conn.execute(
+        text(f"INSERT INTO {STATE_TABLE} (id, fingerprint, alembic_revision, updated_at) "
+             f"VALUES (1, :fingerprint, :revision, :now)"),
+        {'fingerprint': fingerprint, 'revision': revision, 'now': datetime.utcnow()},
+    )
+
+
+@contextmanager
+def _file_lock(path: Optional[str]):
+    """Межпроцессная блокировка SQLite; для :memory: — в пределах процесса"""
+    if not path or path == ':memory:':
+        with _memory_lock:
+            yield
+        return
+    try:
+        import fcntl
+    except ImportError:
+        # Windows (локальная разработка, один процесс)
+        with _memory_lock:
+            yield
+        return
+    with open(f"{path}.schema.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def schema_lock(engine):
+    """Соединение под блокировкой схемы, общей для всех workers"""
+    with engine.connect() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': SCHEMA_LOCK_KEY})
+            conn.commit()
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': SCHEMA_LOCK_KEY})
+                conn.commit()
+        else:
+            with _file_lock(engine.url.database):
+                yield conn
+
+
+def _create_missing_indexes(conn, metadata):
+    """Индексы моделей на уже существующих таблицах (create_all их не создаёт)"""
+    insp = inspect(conn)
+    existing_tables = set(insp.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix['name'] for ix in insp.get_indexes(table.name)}
+        for ix in table.indexes:
+            if ix.name and ix.name not in existing:
+                ix.create(conn)
+                logger.info(f"schema: создан индекс {ix.name}")
+
+
+def _legacy_fixups(conn):
+    """Точечные переделки старых схем, созданных до Alembic"""
+    insp = inspect(conn)
+    if insp.has_table('user_permissions'):
+        columns = [c['name'] for c in insp.get_columns('user_permissions')]
+        if 'permission_type' in columns and 'permission_name' not in columns:
+            conn.execute(text("ALTER TABLE user_permissions RENAME COLUMN permission_type TO permission_name"))
+            logger.info("Migrated user_permissions: permission_type -> permission_name")
+        if 'target' in columns:
+            conn.execute(text("ALTER TABLE user_permissions DROP COLUMN target"))
+            logger.info("Migrated user_permissions: dropped column target")
+
+    # activity_log.employee_id nullable (для login_failed без сотрудника)
+    if conn.dialect.name == 'postgresql' and insp.has_table('activity_log'):
+        employee_id = next((c for c in insp.get_columns('activity_log') if c['name'] == 'employee_id'), None)
+        if employee_id is not None and not employee_id['nullable']:
+            conn.execute(text("ALTER TABLE activity_log ALTER COLUMN employee_id DROP NOT NULL"))
+            logger.info("Migrated activity_log: employee_id is now nullable")
+
+
+def _current_revision(conn) -> Optional[str]:
+    if not inspect(conn).has_table('alembic_version'):
+        return None
+    return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def ensure_schema(engine, metadata=None) -> str:
+    """
+    Привести схему БД к моделям один раз за все workers.
+    Возвращает 'current' (ничего не делали), 'created' или 'migrated'.
+    """
+    from alembic import command
+    from database import Base, _auto_migrate_columns
+
+    metadata = metadata if metadata is not None else Base.metadata
+    head = alembic_head()
+    fingerprint = schema_fingerprint(metadata, head)
+
+    with engine.connect() as conn:
+        if read_fingerprint(conn) == fingerprint:
+            return 'current'
+
+    with schema_lock(engine) as conn:
+        # Соседний worker мог закончить, пока мы ждали блокировку
+        if read_fingerprint(conn) == fingerprint:
+            conn.rollback()
+            return 'current'
+
+        tables = set(inspect(conn).get_table_names()) - _SERVICE_TABLES
+        revision = _current_revision(conn)
+        conn.commit()
+
+        if not tables:
+            metadata.create_all(conn)
+            conn.commit()
+            command.stamp(alembic_config(conn), 'head')
+            action = 'created'
+            logger.info(f"schema: создана с нуля (ревизия {head})")
+        else:
+            if revision is not None and revision != head:
+                command.upgrade(alembic_config(conn), 'head')
+                logger.info(f"schema: миграции {revision} -> {head}")
+            # Таблицы, столбцы и индексы моделей без ревизий
+            metadata.create_all(conn)
+            _auto_migrate_columns(conn)
+            _create_missing_indexes(conn, metadata)
+            _legacy_fixups(conn)
+            conn.commit()
+            if revision is None:
+                command.stamp(alembic_config(conn), 'head')
+                logger.info(f"schema: БД без Alembic сверена с моделями, stamp {head}")
+            action = 'migrated'
+
+        if conn.dialect.name == 'postgresql':
+            # Журналы — помесячные секции (новая БД и БД, сверенная без миграций)
+            from services.log_retention import partition_log_tables
+            partition_log_tables(conn)
+            conn.commit()
+
+        # Куб отчётов на БД, где таблица фактов только что появилась
+        from services.analytics_cube import ensure_cube
+        ensure_cube(conn)
+        conn.commit()
+
+        # Лента выплат на БД, где таблица только что появилась
+        from services.payment_ledger import ensure_ledger
+        ensure_ledger(conn)
+        conn.commit()
+
+        _write_fingerprint(conn, fingerprint, head)
+        conn.commit()
+        return action
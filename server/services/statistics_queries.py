@@ -0,0 +1,476 @@
+"""
+Агрегаты статистики (statistics_router /api/statistics/*) одним SQL на срез.
+
+Раньше endpoint'ы загружали все договоры / карточки и считали в Python:
+- статусы, города, типы проектов — отдельными проходами по списку;
+- просрочки надзора — _is_overdue(card) на каждую карточку (с ленивой
+  загрузкой договора);
+- фильтр CRM по исполнителю / стадии — выборка всех исполнителей карточек;
+- период — extract('year', ...) == year, что исключает индекс по дате.
+
+Теперь:
+- счётчики по статусам — агрегаты COUNT(...) FILTER (WHERE ...) в одном
+  SELECT, разбивки — GROUP BY;
+- период с известным годом — полуинтервал [начало, конец) по самому
+  столбцу (contract_date хранится строкой YYYY-MM-DD и сравнивается как
+  строка); без года — сравнение месяца;
+- просрочки — сравнение строки срока с сегодняшней датой в SQL;
+- фильтр CRM по исполнителю / стадии — EXISTS.
+Формат ответов прежний.
+"""
+import json
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import exists, extract, false, func, or_
+
+from database import (
+    Contract, CRMCard, Employee, Payment, Salary, StageExecutor, SupervisionCard,
+)
+
+ALL = 'Все'
+DEFAULT_STATUS = 'Новый заказ'
+SUPERVISION_STATUS = 'АВТОРСКИЙ НАДЗОР'
+DONE_STATUS = 'СДАН'
+CANCELLED_STATUS = 'РАСТОРГНУТ'
+
+ISO_DATE = '____-__-__'
+
+
+# =============================================================================
+# ФИЛЬТРЫ
+# =============================================================================
+
+def period_conditions(column, year: Optional[int] = None, quarter: Optional[int] = None,
+                      month: Optional[int] = None, iso_string: bool = False) -> list:
+    """
+    Условия периода для столбца даты (пересечение года, квартала и месяца).
+    С годом — column >= начало AND column < конец, без года — номер месяца.
+    iso_string — дата хранится строкой YYYY-MM-DD.
+    """
+    if (quarter and not 1 <= quarter <= 4) or (month and not 1 <= month <= 12):
+        return [false()]
+    months = set(range(1, 13))
+    if quarter:
+        months &= set(range((quarter - 1) * 3 + 1, quarter * 3 + 1))
+    if month:
+        months &= {month}
+    if not months:
+        return [false()]
+
+    if year:
+        first, last = min(months), max(months)
+        start = datetime(year, first, 1)
+        end = datetime(year + last // 12, last % 12 + 1, 1)
+        if iso_string:
+            return [column >= start.strftime('%Y-%m-%d'), column < end.strftime('%Y-%m-%d')]
+        return [column >= start, column < end]
+
+    if len(months) == 12:
+        return []
+    if iso_string:
+        return [column.like(f'{ISO_DATE}%'),
+                func.substr(column, 6, 2).in_([f'{m:02d}' for m in sorted(months)])]
+    return [extract('month', column).in_(sorted(months))]
+
+
+def card_period_conditions(column, period: str, year: int, quarter: Optional[int] = None,
+                           month: Optional[int] = None) -> list:
+    """Период CRM-статистики: 'За год', 'За квартал', 'За месяц' (иначе — без фильтра)"""
+    if period == 'За год':
+        return period_conditions(column, year)
+    if period == 'За квартал' and quarter:
+        return period_conditions(column, year, quarter=quarter)
+    if period == 'За месяц' and month:
+        return period_conditions(column, year, month=month)
+    return []
+
+
+def _dimension_conditions(agent_type: Optional[str], city: Optional[str]) -> list:
+    conditions = []
+    if agent_type and agent_type != ALL:
+        conditions.append(Contract.agent_type == agent_type)
+    if city and city != ALL:
+        conditions.append(Contract.city == city)
+    return conditions
+
+
+def _or_default(column, default: str):
+    """NULL и пустая строка — значение по умолчанию (как `value or default`)"""
+    return func.coalesce(func.nullif(column, ''), default)
+
+
+def _count_by(db, key, *conditions, join=None) -> dict:
+    """{значение key: число строк}; join — (исходная сущность, сущность, условие)"""
+    query = db.query(key, func.count())
+    if join is not None:
+        source, target, onclause = join
+        query = query.select_from(source).join(target, onclause)
+    return {name: count for name, count in query.filter(*conditions).group_by(key)}
+
+
+# =============================================================================
+# ОТЧЁТЫ
+# =============================================================================
+
+def dashboard(db, year=None, month=None, quarter=None, agent_type=None, city=None) -> dict:
+    """Статистика для дашборда (договоры по дате создания)"""
+    conditions = [*period_conditions(Contract.created_at, year, quarter, month),
+                  *_dimension_conditions(agent_type, city)]
+
+    total_contracts, total_amount, total_area, individual_count, template_count = db.query(
+        func.count(Contract.id),
+        func.coalesce(func.sum(Contract.total_amount), 0),
+        func.coalesce(func.sum(Contract.area), 0),
+        func.count(Contract.id).filter(Contract.project_type == 'Индивидуальный'),
+        func.count(Contract.id).filter(Contract.project_type == 'Шаблонный'),
+    ).filter(*conditions).one()
+
+    status_counts = _count_by(db, _or_default(Contract.status, DEFAULT_STATUS), *conditions)
+    city_counts = _count_by(db, _or_default(Contract.city, 'Не указан'), *conditions)
+
+    created_year = extract('year', Contract.created_at)
+    created_month = extract('month', Contract.created_at)
+    monthly_data = {}
+    for created_y, created_m, count, amount in (
+        db.query(created_year, created_month, func.count(Contract.id),
+                 func.coalesce(func.sum(Contract.total_amount), 0))
+        .filter(*conditions, Contract.created_at.isnot(None))
+        .group_by(created_year, created_month)
+    ):
+        monthly_data[f"{int(created_y):04d}-{int(created_m):02d}"] = {'count': count, 'amount': amount}
+
+    active_cards = db.query(func.count(CRMCard.id)).join(Contract).filter(
+        ~Contract.status.in_([DONE_STATUS, CANCELLED_STATUS, SUPERVISION_STATUS])
+    ).scalar()
+    supervision_cards = db.query(func.count(SupervisionCard.id)).join(Contract).filter(
+        Contract.status == SUPERVISION_STATUS
+    ).scalar()
+
+    return {
+        'total_contracts': total_contracts,
+        'total_amount': total_amount,
+        'total_area': total_area,
+        'individual_count': individual_count,
+        'template_count': template_count,
+        'status_counts': status_counts,
+        'city_counts': city_counts,
+        'monthly_data': monthly_data,
+        'active_crm_cards': active_cards,
+        'supervision_cards': supervision_cards,
+    }
+
+
+def employees(db, year=None, month=None) -> List[dict]:
+    """Стадии и зарплаты активных сотрудников"""
+    staff = db.query(Employee.id, Employee.full_name, Employee.position).filter(
+        Employee.status == 'активный').all()
+    if not staff:
+        return []
+    staff_ids = [employee_id for employee_id, _, _ in staff]
+
+    stage_map = {executor_id: (total, completed) for executor_id, total, completed in (
+        db.query(StageExecutor.executor_id, func.count(StageExecutor.id),
+                 func.count(StageExecutor.id).filter(StageExecutor.completed == True))
+        .filter(StageExecutor.executor_id.in_(staff_ids),
+                *period_conditions(StageExecutor.assigned_date, year, month=month))
+        .group_by(StageExecutor.executor_id)
+    )}
+
+    salary_query = db.query(Salary.employee_id, func.sum(Salary.amount)).filter(
+        Salary.employee_id.in_(staff_ids))
+    if year and month:
+        salary_query = salary_query.filter(Salary.report_month == f"{year}-{month:02d}")
+    salary_map = {employee_id: float(total) if total else 0
+                  for employee_id, total in salary_query.group_by(Salary.employee_id)}
+
+    result = []
+    for employee_id, full_name, position in staff:
+        total_stages, completed_stages = stage_map.get(employee_id, (0, 0))
+        result.append({
+            'id': employee_id,
+            'full_name': full_name,
+            'position': position,
+            'total_stages': total_stages,
+            'completed_stages': completed_stages,
+            'completion_rate': (completed_stages / total_stages * 100) if total_stages > 0 else 0,
+            'total_salary': salary_map.get(employee_id, 0),
+        })
+    return result
+
+
+def contracts_by_period(db, year: int, group_by: str = 'month', project_type=None) -> dict:
+    """Договоры года по месяцам, кварталам или статусам"""
+    conditions = period_conditions(Contract.created_at, year)
+    if project_type and project_type != ALL:
+        conditions.append(Contract.project_type == project_type)
+    totals = (func.count(Contract.id), func.coalesce(func.sum(Contract.total_amount), 0))
+
+    if group_by in ('month', 'quarter'):
+        size = 12 if group_by == 'month' else 4
+        result = {i: {'count': 0, 'amount': 0} for i in range(1, size + 1)}
+        created_month = extract('month', Contract.created_at)
+        for number, count, amount in (db.query(created_month, *totals)
+                                      .filter(*conditions).group_by(created_month)):
+            key = int(number) if group_by == 'month' else (int(number) - 1) // 3 + 1
+            result[key]['count'] += count
+            result[key]['amount'] += amount
+        return result
+
+    if group_by == 'status':
+        status = _or_default(Contract.status, DEFAULT_STATUS)
+        return {name: {'count': count, 'amount': amount} for name, count, amount in (
+            db.query(status, *totals).filter(*conditions).group_by(status))}
+
+    return {}
+
+
+def projects(db, project_type: str = 'Индивидуальный', year=None, quarter=None, month=None,
+             agent_type=None, city=None, today: Optional[date] = None) -> dict:
+    """Статистика проектов по дате договора (формат db_manager)"""
+    today = today or date.today()
+    conditions = [Contract.project_type == project_type,
+                  *period_conditions(Contract.contract_date, year, quarter, month, iso_string=True),
+                  *_dimension_conditions(agent_type, city)]
+
+    total_orders, total_area, active, completed, cancelled = db.query(
+        func.count(Contract.id),
+        func.coalesce(func.sum(Contract.area), 0),
+        func.count(Contract.id).filter(or_(
+            Contract.status.is_(None),
+            Contract.status.notin_([DONE_STATUS, SUPERVISION_STATUS, CANCELLED_STATUS]))),
+        func.count(Contract.id).filter(Contract.status.in_([DONE_STATUS, SUPERVISION_STATUS])),
+        func.count(Contract.id).filter(Contract.status == CANCELLED_STATUS),
+    ).filter(*conditions).one()
+
+    # Договоры с незавершёнными стадиями, срок которых прошёл
+    overdue = db.query(func.count(func.distinct(Contract.id))).join(
+        CRMCard, CRMCard.contract_id == Contract.id
+    ).join(
+        StageExecutor, StageExecutor.crm_card_id == CRMCard.id
+    ).filter(
+        *conditions,
+        StageExecutor.completed == False,
+        StageExecutor.deadline.like(f'{ISO_DATE}%'),
+        func.substr(StageExecutor.deadline, 1, 10) < today.isoformat(),
+    ).scalar() or 0
+
+    return {
+        'total_orders': total_orders,
+        'total_area': float(total_area),
+        'active': active,
+        'completed': completed,
+        'cancelled': cancelled,
+        'overdue': overdue,
+        'by_cities': _count_by(db, Contract.city, *conditions, Contract.city != ''),
+        'by_agents': _count_by(db, Contract.agent_type, *conditions, Contract.agent_type != ''),
+        'by_stages': _count_by(db, CRMCard.column_name, *conditions,
+                               join=(CRMCard, Contract, CRMCard.contract_id == Contract.id)),
+    }
+
+
+def supervision_filtered(db, year=None, quarter=None, month=None, agent_type=None, city=None,
+                         address=None, executor_id=None, manager_id=None, status=None) -> dict:
+    """Карточки надзора по дате создания и фильтрам"""
+    conditions = [*period_conditions(SupervisionCard.created_at, year, quarter, month),
+                  *_dimension_conditions(agent_type, city)]
+    if address:
+        conditions.append(Contract.address.ilike(f'%{address}%'))
+    if executor_id:
+        conditions.append(SupervisionCard.dan_id == executor_id)
+    if manager_id:
+        conditions.append(SupervisionCard.senior_manager_id == manager_id)
+    if status == 'Приостановлено':
+        conditions.append(SupervisionCard.is_paused == True)
+    elif status == 'Работа сдана':
+        conditions.append(SupervisionCard.dan_completed == True)
+    elif status == 'В работе':
+        conditions.extend([SupervisionCard.is_paused == False, SupervisionCard.dan_completed == False])
+
+    rows = db.query(
+        SupervisionCard.id, Contract.contract_number, Contract.address, Contract.area, Contract.status,
+    ).join(Contract, SupervisionCard.contract_id == Contract.id).filter(
+        *conditions).order_by(SupervisionCard.id).all()
+
+    return {
+        'total_count': len(rows),
+        'total_area': sum(row.area or 0 for row in rows),
+        'cards': [{
+            'id': row.id,
+            'contract_number': row.contract_number,
+            'address': row.address,
+            'area': row.area,
+            'status': row.status,
+        } for row in rows],
+    }
+
+
+def supervision(db, year=None, quarter=None, month=None, agent_type=None, city=None,
+                today: Optional[date] = None) -> dict:
+    """Статистика авторского надзора по дате договора (формат db_manager)"""
+    today = today or date.today()
+    conditions = [*period_conditions(Contract.contract_date, year, quarter, month, iso_string=True),
+                  *_dimension_conditions(agent_type, city)]
+    join = (SupervisionCard, Contract, SupervisionCard.contract_id == Contract.id)
+
+    total_orders, total_area, active, completed, cancelled, overdue = db.query(
+        func.count(SupervisionCard.id),
+        func.coalesce(func.sum(Contract.area), 0),
+        func.count(SupervisionCard.id).filter(Contract.status == SUPERVISION_STATUS),
+        func.count(SupervisionCard.id).filter(Contract.status == DONE_STATUS),
+        func.count(SupervisionCard.id).filter(Contract.status == CANCELLED_STATUS),
+        # Просрочка: срок (YYYY-MM-DD) прошёл, договор ещё на надзоре
+        func.count(SupervisionCard.id).filter(
+            Contract.status == SUPERVISION_STATUS,
+            SupervisionCard.deadline.like(ISO_DATE),
+            SupervisionCard.deadline < today.isoformat()),
+    ).select_from(SupervisionCard).join(*join[1:]).filter(*conditions).one()
+
+    return {
+        'total_orders': total_orders,
+        'total_area': float(total_area),
+        'active': active,
+        'completed': completed,
+        'cancelled': cancelled,
+        'overdue': overdue,
+        'by_cities': _count_by(db, Contract.city, *conditions, Contract.city != '', join=join),
+        'by_agents': _count_by(db, Contract.agent_type, *conditions, Contract.agent_type != '',
+                               join=join),
+        'by_stages': _count_by(db, _or_default(SupervisionCard.column_name, 'Не указана'),
+                               *conditions, join=join),
+    }
+
+
+def _card_rows(db, project_type: str, *conditions, columns=()):
+    return db.query(
+        CRMCard.id, CRMCard.contract_id, Contract.contract_number, Contract.address, *columns,
+    ).join(Contract, CRMCard.contract_id == Contract.id).filter(
+        Contract.project_type == project_type, *conditions).order_by(CRMCard.id).all()
+
+
+def crm_filtered(db, project_type: str, period: str, year: int, quarter=None, month=None,
+                 project_id=None, executor_id=None, stage_name=None, status_filter=None) -> List[dict]:
+    """CRM-карточки с фильтрами периода, проекта, исполнителя / стадии и колонки"""
+    conditions = card_period_conditions(CRMCard.created_at, period, year, quarter, month)
+    if project_id:
+        conditions.append(CRMCard.contract_id == project_id)
+    if status_filter:
+        conditions.append(CRMCard.column_name == status_filter)
+    if executor_id:
+        conditions.append(exists().where(StageExecutor.crm_card_id == CRMCard.id,
+                                         StageExecutor.executor_id == executor_id))
+    elif stage_name:
+        conditions.append(exists().where(StageExecutor.crm_card_id == CRMCard.id,
+                                         StageExecutor.stage_name.contains(stage_name, autoescape=True)))
+
+    rows = _card_rows(db, project_type, *conditions,
+                      columns=(CRMCard.column_name, Contract.area, CRMCard.is_approved))
+    return [{
+        'id': row.id,
+        'contract_id': row.contract_id,
+        'column_name': row.column_name,
+        'contract_number': row.contract_number,
+        'address': row.address,
+        'area': float(row.area) if row.area else 0,
+        'is_approved': row.is_approved,
+    } for row in rows]
+
+
+def crm(db, project_type: str = 'Индивидуальный', period: str = 'all', year=None, month=None) -> List[dict]:
+    """CRM-карточки типа проекта за период"""
+    if year is None:
+        year = datetime.utcnow().year
+    rows = _card_rows(db, project_type, *card_period_conditions(CRMCard.created_at, period, year, month=month),
+                      columns=(CRMCard.column_name, Contract.area))
+    return [{
+        'id': row.id,
+        'contract_id': row.contract_id,
+        'column_name': row.column_name,
+        'contract_number': row.contract_number,
+        'address': row.address,
+        'area': float(row.area) if row.area else 0,
+    } for row in rows]
+
+
+def approvals(db, project_type: str, period: str, year: int, quarter=None, month=None,
+              project_id=None) -> List[dict]:
+    """Согласованные CRM-карточки за период"""
+    conditions = [CRMCard.is_approved == True,
+                  *card_period_conditions(CRMCard.created_at, period, year, quarter, month)]
+    if project_id:
+        conditions.append(CRMCard.contract_id == project_id)
+    rows = _card_rows(db, project_type, *conditions,
+                      columns=(CRMCard.is_approved, CRMCard.approval_deadline, CRMCard.approval_stages))
+    return [{
+        'id': row.id,
+        'contract_id': row.contract_id,
+        'contract_number': row.contract_number,
+        'address': row.address,
+        'is_approved': row.is_approved,
+        'approval_deadline': str(row.approval_deadline) if row.approval_deadline else None,
+        'approval_stages': json.loads(row.approval_stages) if row.approval_stages else None,
+    } for row in rows]
+
+
+def general(db, year: int, quarter=None, month=None) -> dict:
+    """Общая статистика договоров и платежей по дате создания"""
+    total_orders, total_area, total_amount, individual_count, template_count, active, completed, cancelled = db.query(
+        func.count(Contract.id),
+        func.coalesce(func.sum(Contract.area), 0),
+        func.coalesce(func.sum(Contract.total_amount), 0),
+        func.count(Contract.id).filter(Contract.project_type == 'Индивидуальный'),
+        func.count(Contract.id).filter(Contract.project_type == 'Шаблонный'),
+        func.count(Contract.id).filter(or_(Contract.status.is_(None),
+                                           Contract.status.notin_([DONE_STATUS, CANCELLED_STATUS]))),
+        func.count(Contract.id).filter(Contract.status == DONE_STATUS),
+        func.count(Contract.id).filter(Contract.status == CANCELLED_STATUS),
+    ).filter(*period_conditions(Contract.created_at, year, quarter, month)).one()
+
+    active_employees = db.query(func.count(Employee.id)).filter(Employee.status == 'активный').scalar()
+
+    total_payments, paid_payments = db.query(
+        func.coalesce(func.sum(Payment.final_amount), 0),
+        func.coalesce(func.sum(Payment.final_amount).filter(Payment.is_paid == True), 0),
+    ).filter(*period_conditions(Payment.created_at, year, quarter, month)).one()
+
+    return {
+        'total_orders': total_orders,
+        'active': active,
+        'completed': completed,
+        'cancelled': cancelled,
+        'individual_count': individual_count,
+        'template_count': template_count,
+        'total_area': total_area,
+        'total_amount': total_amount,
+        'active_employees': active_employees,
+        'total_payments': total_payments,
+        'paid_payments': paid_payments,
+        'pending_payments': total_payments - paid_payments,
+    }
+
+
+def funnel(db, year=None, project_type=None) -> dict:
+    """Количество CRM-карточек по колонкам Kanban"""
+    conditions = period_conditions(Contract.created_at, year)
+    if project_type:
+        conditions.append(Contract.project_type == project_type)
+    counts = _count_by(db, CRMCard.column_name, *conditions,
+                       join=(CRMCard, Contract, CRMCard.contract_id == Contract.id))
+    return {'funnel': counts, 'total': sum(counts.values())}
+
+
+def executor_load(db, year=None, month=None, limit: int = 15) -> List[dict]:
+    """Исполнители с наибольшим числом стадий в незакрытых карточках"""
+    active_stages = func.count(StageExecutor.id)
+    query = db.query(Employee.full_name, active_stages).join(
+        StageExecutor, StageExecutor.executor_id == Employee.id
+    ).join(
+        CRMCard, CRMCard.id == StageExecutor.crm_card_id
+    ).filter(
+        CRMCard.column_name.notin_([DONE_STATUS, CANCELLED_STATUS])
+    )
+    if year or month:
+        query = query.join(Contract, CRMCard.contract_id == Contract.id).filter(
+            *period_conditions(Contract.created_at, year, month=month))
+    rows = query.group_by(Employee.full_name).order_by(active_stages.desc()).limit(limit)
+    return [{'name': name, 'active_stages': count} for name, count in rows]
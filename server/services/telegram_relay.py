@@ -0,0 +1,157 @@
+"""
+Пересылка файлов с Яндекс.Диска в Telegram (POST /messenger/chats/{id}/files).
+
+Файлы не скачиваются на сервер целиком:
+
+1. resolve_relay_files() параллельно (не больше RELAY_CONCURRENCY запросов,
+   aiohttp) получает md5 каждого файла и одноразовую ссылку на скачивание;
+2. TelegramService.send_media_group_relay() / send_document_relay() передают
+   ссылку в aiogram URLInputFile — файл читается с ЯД блоками прямо в
+   multipart-запрос к Bot API, не попадая ни в память целиком, ни на диск;
+3. file_id отправленных файлов запоминается в TelegramFileIdCache по
+   (путь, md5, вид отправки): повторная отправка того же рендера в другой
+   чат идёт по file_id — ссылку на скачивание тогда даже не запрашиваем.
+"""
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# Одновременных запросов к API Яндекс.Диска на одну отправку
+RELAY_CONCURRENCY = 6
+# Записей в кэше file_id (LRU)
+FILE_ID_CACHE_SIZE = 5000
+# Таймаут запроса метаданных/ссылки, секунд
+RESOLVE_TIMEOUT = 30
+RESOURCE_FIELDS = "md5,modified,size"
+
+
+class TelegramFileIdCache:
+    """LRU-кэш file_id Telegram: (путь, версия файла, вид отправки) -> file_id"""
+
+    def __init__(self, max_entries=FILE_ID_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, version, kind):
+        if not version:
+            return None
+        key = (path, version, kind)
+        with self._lock:
+            file_id = self._entries.get(key)
+            if file_id is not None:
+                self._entries.move_to_end(key)
+            return file_id
+
+    def put(self, path, version, kind, file_id):
+        if not version or not file_id:
+            return
+        key = (path, version, kind)
+        with self._lock:
+            self._entries[key] = file_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, path, version, kind):
+        with self._lock:
+            self._entries.pop((path, version, kind), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_file_id_cache = TelegramFileIdCache()
+
+
+def get_file_id_cache():
+    """Общий на процесс кэш file_id"""
+    return _file_id_cache
+
+
+def file_version(meta):
+    """Версия содержимого файла: md5, если ЯД его отдал, иначе modified"""
+    return meta.get('md5') or meta.get('modified')
+
+
+@asynccontextmanager
+async def yandex_api(yd_service, timeout=RESOLVE_TIMEOUT):
+    """
+    Асинхронный клиент REST API Яндекс.Диска на время одной отправки.
+
+    Отдаёт get_json(path, params) -> dict; статус не 200 — исключение.
+    """
+    import aiohttp
+
+    headers = {"Authorization": yd_service.headers["Authorization"]}
+    async with aiohttp.ClientSession(
+        headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        async def get_json(path, params):
+            async with session.get(f"{yd_service.base_url}{path}", params=params) as resp:
+                if resp.status != 200:
+                    raise Exception(f"Яндекс.Диск {path}: {resp.status} {await resp.text()}")
+                return await resp.json()
+
+        yield get_json
+
+
+async def resolve_relay_files(files, get_json, cache=None, concurrency=RELAY_CONCURRENCY):
+    """
+    Подготовить файлы к отправке в Telegram.
+
+    files — [{'yandex_path', 'file_name', 'kind': 'photo'|'document', ...}].
+    Возвращает копии в том же порядке с 'version' и либо 'file_id' (из кэша),
+    либо 'href' (ссылка на скачивание). Файлы, для которых ЯД вернул ошибку,
+    пропускаются.
+    """
+    cache = cache if cache is not None else _file_id_cache
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(item):
+        path = item["yandex_path"]
+        try:
+            async with semaphore:
+                meta = await get_json("/resources", {"path": path, "fields": RESOURCE_FIELDS})
+            version = file_version(meta)
+            file_id = cache.get(path, version, item["kind"])
+            if file_id:
+                return dict(item, version=version, file_id=file_id)
+            async with semaphore:
+                link = await get_json("/resources/download", {"path": path})
+            return dict(item, version=version, href=link["href"])
+        except Exception as e:
+            logger.warning(f"Ошибка получения ссылки {path}: {e}")
+            return None
+
+    resolved = await asyncio.gather(*(resolve(item) for item in files))
+    hits = sum(1 for r in resolved if r and r.get("file_id"))
+    if hits:
+        logger.info(f"Relay: {hits} из {len(files)} файлов отправляются по file_id")
+    return [r for r in resolved if r is not None]
+
+
+def remember_sent(items, sent, cache=None):
+    """
+    Запомнить file_id отправленных файлов.
+
+    sent — ответ send_*_relay в порядке items ([{'message_id', 'file_id'}]);
+    None — отправка не удалась: file_id, взятые из кэша, выбрасываются
+    (Telegram мог их не принять), чтобы следующая попытка шла загрузкой.
+    """
+    cache = cache if cache is not None else _file_id_cache
+    if not sent:
+        for item in items:
+            if item.get("file_id"):
+                cache.discard(item["yandex_path"], item["version"], item["kind"])
+        return
+    for item, result in zip(items, sent):
+        cache.put(item["yandex_path"], item.get("version"), item["kind"], result.get("file_id"))
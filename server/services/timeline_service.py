@@ -1,12 +1,32 @@
 """
 Сервис расчёта таблиц сроков (Timeline).
 Чистые функции для генерации шаблонов и расчёта нормо-дней.
+
+Шаблон подэтапов с применённым кастомным шаблоном нормо-дней из БД
+компилируется один раз на (project_type, project_subtype, agent_type)
+в неизменяемый CompiledTimelineTemplate и кэшируется в процессе:
+построение таблицы сроков для конкретной площади (build) не обращается
+к БД. norm_days_router сбрасывает кэш при сохранении/сбросе шаблона;
+другие uvicorn-воркеры подхватывают изменения через TEMPLATE_CACHE_TTL.
 """
 import logging
-from database import SessionLocal, NormDaysTemplate
+import threading
+import time
+
+from sqlalchemy import insert, or_, update
+
+from database import SessionLocal, NormDaysTemplate, Contract, ProjectTimelineEntry
 
 logger = logging.getLogger(__name__)
 
+ALL_AGENTS = 'Все агенты'
+DEFAULT_INDIVIDUAL_SUBTYPE = 'Полный (с 3д визуализацией)'
+DEFAULT_TEMPLATE_SUBTYPE = 'Стандарт'
+# Сколько секунд скомпилированный шаблон живёт без сброса (для других воркеров)
+TEMPLATE_CACHE_TTL = 60
+# Договоров за один запрос при массовом пересчёте
+REAPPLY_BATCH = 500
+
 
 def calc_contract_term(project_type_code: int, area: float):
     """Расчёт срока договора. 1=Полный, 2=Эскизный, 3=Планировочный"""
@@ -29,304 +49,190 @@ def calc_area_coefficient(area: float) -> int:
     return max(0, int((area - 1) // 100))
 
 
-def build_project_timeline_template(project_type: str, area: float, project_subtype: str = None, agent_type: str = 'Все агенты'):
-    """Генерация полного шаблона подэтапов с формулами.
-    project_subtype: 'Полный (с 3д визуализацией)', 'Эскизный (с коллажами)', 'Планировочный'
-    agent_type: имя агента или 'Все агенты' — для приоритетного выбора кастомных шаблонов
-    """
-    K = calc_area_coefficient(area)
-    # Определяем pt_code из project_subtype (если задан)
-    if project_subtype:
-        if 'Полный' in project_subtype:
-            pt_code = 1
-        elif 'Планировочный' in project_subtype:
-            pt_code = 3
-        else:
-            pt_code = 2
+def calc_template_contract_term(template_subtype: str, area: float, floors: int = 1) -> int:
+    """Расчёт срока для шаблонных проектов (рабочие дни)"""
+    sub = template_subtype.lower()
+    if 'ванной' in sub:
+        if 'визуализац' in sub:
+            return 20
+        return 10
+
+    # Стандарт / Стандарт с визуализацией
+    if area <= 90:
+        base_days = 20
     else:
-        pt_code = 1 if project_type == 'Индивидуальный' else 2
-    contract_term = calc_contract_term(pt_code, area)
+        extra = int((area - 90 - 1) // 50) + 1
+        base_days = 20 + extra * 10
 
-    # Все подэтапы: (stage_code, stage_name, stage_group, substage_group, raw_G, executor, in_scope)
-    entries = []
-    order = 0
+    # Доп. этажи
+    if floors > 1:
+        for _ in range(1, floors):
+            if area <= 90:
+                base_days += 10
+            else:
+                extra = int((area - 90 - 1) // 50) + 1
+                base_days += 10 + extra * 10
 
-    def add(code, name, group, subgroup, g, executor, in_scope=True):
-        nonlocal order
-        order += 1
-        entries.append({
-            'stage_code': code, 'stage_name': name, 'stage_group': group,
-            'substage_group': subgroup, 'raw_norm_days': g, 'executor_role': executor,
-            'is_in_contract_scope': in_scope, 'sort_order': order
-        })
+    # Визуализация
+    if 'визуализац' in sub:
+        if area <= 90:
+            base_days += 25
+        else:
+            extra = int((area - 90 - 1) // 50) + 1
+            base_days += 25 + extra * 15
+
+    return int(base_days)
+
+
+def _individual_stages(project_subtype: str = None):
+    """Подэтапы индивидуального проекта по формулам: норма = base + K * k.
+    Кортежи (stage_code, stage_name, stage_group, substage_group, base, k,
+    executor_role, is_in_contract_scope) в порядке таблицы.
+    """
+    stages = []
+
+    def add(code, name, group, subgroup, base, k, executor, in_scope=True):
+        stages.append((code, name, group, subgroup, base, k, executor, in_scope))
 
     def add_header(code, name, group, subgroup=''):
-        nonlocal order
-        order += 1
-        entries.append({
-            'stage_code': code, 'stage_name': name, 'stage_group': group,
-            'substage_group': subgroup, 'raw_norm_days': 0, 'executor_role': 'header',
-            'is_in_contract_scope': False, 'sort_order': order
-        })
+        stages.append((code, name, group, subgroup, 0, 0, 'header', False))
 
     # --- ДАТА НАЧАЛА ---
-    add('START', 'ДАТА НАЧАЛА РАЗРАБОТКИ', 'START', '', 0, 'Менеджер', True)
+    add('START', 'ДАТА НАЧАЛА РАЗРАБОТКИ', 'START', '', 0, 0, 'Менеджер', True)
 
     # --- ЭТАП 1: ПЛАНИРОВОЧНОЕ РЕШЕНИЕ ---
     add_header('S1_HDR', 'ЭТАП 1: ПЛАНИРОВОЧНОЕ РЕШЕНИЕ', 'STAGE1')
 
     # Подэтап 1.1 — входит
     add_header('S1_1_HDR', 'Подэтап 1.1', 'STAGE1', 'Подэтап 1.1')
-    add('S1_1_01', 'Разработка 3 вар. планировок', 'STAGE1', 'Подэтап 1.1', 4 + K*2, 'Чертежник', True)
-    add('S1_1_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.1', 1 + K*0.5, 'СДП', True)
-    add('S1_1_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.1', 1.5 + K*1, 'Чертежник', True)
-    add('S1_1_04', 'Проверка повторная СДП', 'STAGE1', 'Подэтап 1.1', 0.5 + K*0.5, 'СДП', True)
-    add('S1_1_05', 'Отправка клиенту', 'STAGE1', 'Подэтап 1.1', 3, 'Клиент', False)
-    add('S1_1_06', 'Сбор правок от клиента СДП', 'STAGE1', 'Подэтап 1.1', 1 + K*0.5, 'СДП', False)
+    add('S1_1_01', 'Разработка 3 вар. планировок', 'STAGE1', 'Подэтап 1.1', 4, 2, 'Чертежник', True)
+    add('S1_1_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.1', 1, 0.5, 'СДП', True)
+    add('S1_1_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.1', 1.5, 1, 'Чертежник', True)
+    add('S1_1_04', 'Проверка повторная СДП', 'STAGE1', 'Подэтап 1.1', 0.5, 0.5, 'СДП', True)
+    add('S1_1_05', 'Отправка клиенту', 'STAGE1', 'Подэтап 1.1', 3, 0, 'Клиент', False)
+    add('S1_1_06', 'Сбор правок от клиента СДП', 'STAGE1', 'Подэтап 1.1', 1, 0.5, 'СДП', False)
 
     # Подэтап 1.2 — не входит
     add_header('S1_2_HDR', 'Подэтап 1.2 — Фин. план 1 круг', 'STAGE1', 'Подэтап 1.2')
-    add('S1_2_01', 'Фин. план. решение (1 круг)', 'STAGE1', 'Подэтап 1.2', 1 + K*1, 'Чертежник', True)
-    add('S1_2_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.2', 1 + K*0.5, 'СДП', False)
-    add('S1_2_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.2', 1 + K*0.5, 'Чертежник', False)
-    add('S1_2_04', 'Проверка повторная СДП', 'STAGE1', 'Подэтап 1.2', 1 + K*0.5, 'СДП', False)
-    add('S1_2_05', 'Отправка клиенту', 'STAGE1', 'Подэтап 1.2', 3, 'Клиент', False)
-    add('S1_2_06', 'Сбор правок от клиента СДП', 'STAGE1', 'Подэтап 1.2', 1 + K*0.5, 'СДП', False)
+    add('S1_2_01', 'Фин. план. решение (1 круг)', 'STAGE1', 'Подэтап 1.2', 1, 1, 'Чертежник', True)
+    add('S1_2_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.2', 1, 0.5, 'СДП', False)
+    add('S1_2_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.2', 1, 0.5, 'Чертежник', False)
+    add('S1_2_04', 'Проверка повторная СДП', 'STAGE1', 'Подэтап 1.2', 1, 0.5, 'СДП', False)
+    add('S1_2_05', 'Отправка клиенту', 'STAGE1', 'Подэтап 1.2', 3, 0, 'Клиент', False)
+    add('S1_2_06', 'Сбор правок от клиента СДП', 'STAGE1', 'Подэтап 1.2', 1, 0.5, 'СДП', False)
 
     # Подэтап 1.3 — не входит
     add_header('S1_3_HDR', 'Подэтап 1.3 — Фин. план 2 круг', 'STAGE1', 'Подэтап 1.3')
-    add('S1_3_01', 'Фин. план. решение (2 круг)', 'STAGE1', 'Подэтап 1.3', 1 + K*1, 'Чертежник', False)
-    add('S1_3_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.3', 1 + K*0.5, 'СДП', False)
-    add('S1_3_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.3', 1 + K*0.5, 'Чертежник', False)
-    add('S1_3_04', 'Проверка СДП', 'STAGE1', 'Подэтап 1.3', 1 + K*0.5, 'СДП', False)
-    add('S1_3_05', 'Согласование планировки. Акт', 'STAGE1', 'Подэтап 1.3', 0, 'Клиент', False)
+    add('S1_3_01', 'Фин. план. решение (2 круг)', 'STAGE1', 'Подэтап 1.3', 1, 1, 'Чертежник', False)
+    add('S1_3_02', 'Проверка СДП', 'STAGE1', 'Подэтап 1.3', 1, 0.5, 'СДП', False)
+    add('S1_3_03', 'Правка чертежником', 'STAGE1', 'Подэтап 1.3', 1, 0.5, 'Чертежник', False)
+    add('S1_3_04', 'Проверка СДП', 'STAGE1', 'Подэтап 1.3', 1, 0.5, 'СДП', False)
+    add('S1_3_05', 'Согласование планировки. Акт', 'STAGE1', 'Подэтап 1.3', 0, 0, 'Клиент', False)
 
     # --- ЭТАП 2: КОНЦЕПЦИЯ ДИЗАЙНА ---
     add_header('S2_HDR', 'ЭТАП 2: КОНЦЕПЦИЯ ДИЗАЙНА', 'STAGE2')
 
     # 2.1 Мудборды
     add_header('S2_1_HDR', 'Подэтап 2.1 — Мудборды', 'STAGE2', 'Подэтап 2.1')
-    add('S2_1_01', 'Разработка мудбордов', 'STAGE2', 'Подэтап 2.1', 3 + K*2, 'Дизайнер', True)
-    add('S2_1_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.1', 1 + K*1, 'СДП', True)
-    add('S2_1_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.1', 2 + K*1, 'Дизайнер', True)
-    add('S2_1_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.1', 1 + K*0.5, 'СДП', True)
-    add('S2_1_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.1', 3, 'Клиент', False)
-    add('S2_1_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.1', 1 + K*0.5, 'СДП', False)
-    add('S2_1_07', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.1', 1 + K*1, 'Дизайнер', False)
-    add('S2_1_08', 'Проверка СДП', 'STAGE2', 'Подэтап 2.1', 1, 'СДП', False)
-    add('S2_1_09', 'Согласование мудборда', 'STAGE2', 'Подэтап 2.1', 0, 'Клиент', False)
+    add('S2_1_01', 'Разработка мудбордов', 'STAGE2', 'Подэтап 2.1', 3, 2, 'Дизайнер', True)
+    add('S2_1_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.1', 1, 1, 'СДП', True)
+    add('S2_1_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.1', 2, 1, 'Дизайнер', True)
+    add('S2_1_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.1', 1, 0.5, 'СДП', True)
+    add('S2_1_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.1', 3, 0, 'Клиент', False)
+    add('S2_1_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.1', 1, 0.5, 'СДП', False)
+    add('S2_1_07', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.1', 1, 1, 'Дизайнер', False)
+    add('S2_1_08', 'Проверка СДП', 'STAGE2', 'Подэтап 2.1', 1, 0, 'СДП', False)
+    add('S2_1_09', 'Согласование мудборда', 'STAGE2', 'Подэтап 2.1', 0, 0, 'Клиент', False)
 
     # 2.2 Виз 1 пом.
     add_header('S2_2_HDR', 'Подэтап 2.2 — Виз 1 пом.', 'STAGE2', 'Подэтап 2.2')
-    add('S2_2_01', 'Разработка визуализации 1 пом.', 'STAGE2', 'Подэтап 2.2', 3 + K*0.5, 'Дизайнер', True)
-    add('S2_2_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.2', 1, 'СДП', True)
-    add('S2_2_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.2', 2, 'Дизайнер', True)
-    add('S2_2_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.2', 1, 'СДП', True)
-    add('S2_2_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.2', 3, 'Клиент', False)
-    add('S2_2_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.2', 1, 'СДП', False)
+    add('S2_2_01', 'Разработка визуализации 1 пом.', 'STAGE2', 'Подэтап 2.2', 3, 0.5, 'Дизайнер', True)
+    add('S2_2_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.2', 1, 0, 'СДП', True)
+    add('S2_2_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.2', 2, 0, 'Дизайнер', True)
+    add('S2_2_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.2', 1, 0, 'СДП', True)
+    add('S2_2_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.2', 3, 0, 'Клиент', False)
+    add('S2_2_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.2', 1, 0, 'СДП', False)
 
     # 2.3 Виз 1 пом. 1 круг — не входит
     add_header('S2_3_HDR', 'Подэтап 2.3 — Виз 1 пом. 1 круг', 'STAGE2', 'Подэтап 2.3')
-    add('S2_3_01', 'Правка визуализации (1 круг)', 'STAGE2', 'Подэтап 2.3', 2 + K*0.5, 'Дизайнер', False)
-    add('S2_3_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.3', 1, 'СДП', False)
-    add('S2_3_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.3', 1, 'Дизайнер', False)
-    add('S2_3_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.3', 1, 'СДП', False)
-    add('S2_3_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.3', 3, 'Клиент', False)
-    add('S2_3_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.3', 1, 'СДП', False)
+    add('S2_3_01', 'Правка визуализации (1 круг)', 'STAGE2', 'Подэтап 2.3', 2, 0.5, 'Дизайнер', False)
+    add('S2_3_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.3', 1, 0, 'СДП', False)
+    add('S2_3_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.3', 1, 0, 'Дизайнер', False)
+    add('S2_3_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.3', 1, 0, 'СДП', False)
+    add('S2_3_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.3', 3, 0, 'Клиент', False)
+    add('S2_3_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.3', 1, 0, 'СДП', False)
 
     # 2.4 Виз 1 пом. 2 круг — не входит
     add_header('S2_4_HDR', 'Подэтап 2.4 — Виз 1 пом. 2 круг', 'STAGE2', 'Подэтап 2.4')
-    add('S2_4_01', 'Правка визуализации (2 круг)', 'STAGE2', 'Подэтап 2.4', 1 + K*1, 'Дизайнер', False)
-    add('S2_4_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.4', 1, 'СДП', False)
-    add('S2_4_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.4', 1, 'Дизайнер', False)
-    add('S2_4_04', 'Проверка СДП', 'STAGE2', 'Подэтап 2.4', 1, 'СДП', False)
-    add('S2_4_05', 'Согласование 1 пом.', 'STAGE2', 'Подэтап 2.4', 0, 'Клиент', False)
+    add('S2_4_01', 'Правка визуализации (2 круг)', 'STAGE2', 'Подэтап 2.4', 1, 1, 'Дизайнер', False)
+    add('S2_4_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.4', 1, 0, 'СДП', False)
+    add('S2_4_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.4', 1, 0, 'Дизайнер', False)
+    add('S2_4_04', 'Проверка СДП', 'STAGE2', 'Подэтап 2.4', 1, 0, 'СДП', False)
+    add('S2_4_05', 'Согласование 1 пом.', 'STAGE2', 'Подэтап 2.4', 0, 0, 'Клиент', False)
 
     # 2.5 Виз остальных — входит
     add_header('S2_5_HDR', 'Подэтап 2.5 — Виз остальных', 'STAGE2', 'Подэтап 2.5')
-    add('S2_5_01', 'Разработка визуализаций всех', 'STAGE2', 'Подэтап 2.5', 10 + K*10, 'Дизайнер', True)
-    add('S2_5_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.5', 3 + K*2.5, 'СДП', True)
-    add('S2_5_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.5', 5 + K*5, 'Дизайнер', True)
-    add('S2_5_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.5', 2 + K*1.5, 'СДП', True)
-    add('S2_5_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.5', 3, 'Клиент', False)
-    add('S2_5_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.5', 2 + K*1.5, 'СДП', False)
+    add('S2_5_01', 'Разработка визуализаций всех', 'STAGE2', 'Подэтап 2.5', 10, 10, 'Дизайнер', True)
+    add('S2_5_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.5', 3, 2.5, 'СДП', True)
+    add('S2_5_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.5', 5, 5, 'Дизайнер', True)
+    add('S2_5_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.5', 2, 1.5, 'СДП', True)
+    add('S2_5_05', 'Отправка клиенту', 'STAGE2', 'Подэтап 2.5', 3, 0, 'Клиент', False)
+    add('S2_5_06', 'Сбор правок СДП', 'STAGE2', 'Подэтап 2.5', 2, 1.5, 'СДП', False)
 
     # 2.6 Виз все 1 круг — не входит
     add_header('S2_6_HDR', 'Подэтап 2.6 — Виз все 1 круг', 'STAGE2', 'Подэтап 2.6')
-    add('S2_6_01', 'Правка визуализаций (1 круг)', 'STAGE2', 'Подэтап 2.6', 5 + K*5, 'Дизайнер', False)
-    add('S2_6_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.6', 2 + K*1.5, 'СДП', False)
-    add('S2_6_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.6', 2 + K*1.5, 'Дизайнер', False)
-    add('S2_6_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.6', 2 + K*1.5, 'СДП', False)
-    add('S2_6_05', 'Согласование визуализаций', 'STAGE2', 'Подэтап 2.6', 0, 'Клиент', False)
+    add('S2_6_01', 'Правка визуализаций (1 круг)', 'STAGE2', 'Подэтап 2.6', 5, 5, 'Дизайнер', False)
+    add('S2_6_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.6', 2, 1.5, 'СДП', False)
+    add('S2_6_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.6', 2, 1.5, 'Дизайнер', False)
+    add('S2_6_04', 'Проверка повторная СДП', 'STAGE2', 'Подэтап 2.6', 2, 1.5, 'СДП', False)
+    add('S2_6_05', 'Согласование визуализаций', 'STAGE2', 'Подэтап 2.6', 0, 0, 'Клиент', False)
 
     # 2.7 Виз все 2 круг — не входит
     add_header('S2_7_HDR', 'Подэтап 2.7 — Виз все 2 круг', 'STAGE2', 'Подэтап 2.7')
-    add('S2_7_01', 'Правка визуализаций (2 круг)', 'STAGE2', 'Подэтап 2.7', 3 + K*3, 'Дизайнер', False)
-    add('S2_7_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.7', 1 + K*1, 'СДП', False)
-    add('S2_7_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.7', 1 + K*1, 'Дизайнер', False)
-    add('S2_7_04', 'Проверка СДП', 'STAGE2', 'Подэтап 2.7', 1 + K*1, 'СДП', False)
-    add('S2_7_05', 'Согласование дизайна. Акт', 'STAGE2', 'Подэтап 2.7', 0, 'Клиент', False)
+    add('S2_7_01', 'Правка визуализаций (2 круг)', 'STAGE2', 'Подэтап 2.7', 3, 3, 'Дизайнер', False)
+    add('S2_7_02', 'Проверка СДП', 'STAGE2', 'Подэтап 2.7', 1, 1, 'СДП', False)
+    add('S2_7_03', 'Правка дизайнером', 'STAGE2', 'Подэтап 2.7', 1, 1, 'Дизайнер', False)
+    add('S2_7_04', 'Проверка СДП', 'STAGE2', 'Подэтап 2.7', 1, 1, 'СДП', False)
+    add('S2_7_05', 'Согласование дизайна. Акт', 'STAGE2', 'Подэтап 2.7', 0, 0, 'Клиент', False)
 
     # --- ЭТАП 3: РАБОЧАЯ ДОКУМЕНТАЦИЯ ---
     add_header('S3_HDR', 'ЭТАП 3: РАБОЧАЯ ДОКУМЕНТАЦИЯ', 'STAGE3')
 
-    add('S3_01', 'Подготовка файлов, выдача', 'STAGE3', '', 1, 'СДП', True)
-    add('S3_02', 'Разработка комплекта РД', 'STAGE3', '', 10 + K*2, 'Чертежник', True)
-    add('S3_03', 'Проверка ГАП (1 круг)', 'STAGE3', '', 3 + K*0.5, 'ГАП', True)
-    add('S3_04', 'Правка чертежником', 'STAGE3', '', 2 + K*1, 'Чертежник', True)
-    add('S3_05', 'Проверка ГАП (2 круг)', 'STAGE3', '', 1 + K*0.5, 'ГАП', True)
-    add('S3_06', 'Правка чертежником (при необх.)', 'STAGE3', '', 1, 'Чертежник', True)
-    add('S3_07', 'Проверка ГАП (3 круг)', 'STAGE3', '', 1, 'ГАП', True)
-    add('S3_08', 'Отправка клиенту', 'STAGE3', '', 3, 'Клиент', False)
-    add('S3_09', 'Сбор правок от клиента', 'STAGE3', '', 1 + K*0.5, 'Менеджер', False)
-    add('S3_10', 'Внесение правок чертежником', 'STAGE3', '', 1 + K*1, 'Чертежник', False)
-    add('S3_11', 'Проверка ГАП (4 круг)', 'STAGE3', '', 1 + K*0.5, 'ГАП', False)
-    add('S3_12', 'Принятие проекта. Акт финальный', 'STAGE3', '', 0, 'Клиент', False)
+    add('S3_01', 'Подготовка файлов, выдача', 'STAGE3', '', 1, 0, 'СДП', True)
+    add('S3_02', 'Разработка комплекта РД', 'STAGE3', '', 10, 2, 'Чертежник', True)
+    add('S3_03', 'Проверка ГАП (1 круг)', 'STAGE3', '', 3, 0.5, 'ГАП', True)
+    add('S3_04', 'Правка чертежником', 'STAGE3', '', 2, 1, 'Чертежник', True)
+    add('S3_05', 'Проверка ГАП (2 круг)', 'STAGE3', '', 1, 0.5, 'ГАП', True)
+    add('S3_06', 'Правка чертежником (при необх.)', 'STAGE3', '', 1, 0, 'Чертежник', True)
+    add('S3_07', 'Проверка ГАП (3 круг)', 'STAGE3', '', 1, 0, 'ГАП', True)
+    add('S3_08', 'Отправка клиенту', 'STAGE3', '', 3, 0, 'Клиент', False)
+    add('S3_09', 'Сбор правок от клиента', 'STAGE3', '', 1, 0.5, 'Менеджер', False)
+    add('S3_10', 'Внесение правок чертежником', 'STAGE3', '', 1, 1, 'Чертежник', False)
+    add('S3_11', 'Проверка ГАП (4 круг)', 'STAGE3', '', 1, 0.5, 'ГАП', False)
+    add('S3_12', 'Принятие проекта. Акт финальный', 'STAGE3', '', 0, 0, 'Клиент', False)
 
     # --- Фильтрация по подтипу проекта ---
     if project_subtype and 'Планировочный' in project_subtype:
         # Только START + STAGE1
-        entries = [e for e in entries if e['stage_group'] in ('START', 'STAGE1')]
+        stages = [s for s in stages if s[2] in ('START', 'STAGE1')]
     elif project_subtype and 'Эскизный' in project_subtype:
         # START + STAGE1 + мудборды (Подэтап 2.1) + STAGE3
-        entries = [e for e in entries if e['stage_group'] in ('START', 'STAGE1', 'STAGE3')
-                   or (e['stage_group'] == 'STAGE2' and e['substage_group'] == 'Подэтап 2.1')
-                   or e['stage_code'] == 'S2_HDR']
+        stages = [s for s in stages if s[2] in ('START', 'STAGE1', 'STAGE3')
+                  or (s[2] == 'STAGE2' and s[3] == 'Подэтап 2.1')
+                  or s[0] == 'S2_HDR']
     # Полный / None — все этапы
-
-    # Перенумерация sort_order после фильтрации
-    for i, e in enumerate(entries, 1):
-        e['sort_order'] = i
-
-    # Проверяем кастомный шаблон нормо-дней в БД (приоритет: конкретный агент > "Все агенты")
-    db_session = None
-    try:
-        db_session = SessionLocal()
-        sub = project_subtype or 'Полный (с 3д визуализацией)'
-        custom = None
-        if agent_type and agent_type != 'Все агенты':
-            custom = db_session.query(NormDaysTemplate).filter(
-                NormDaysTemplate.project_type == project_type,
-                NormDaysTemplate.project_subtype == sub,
-                NormDaysTemplate.agent_type == agent_type,
-            ).all()
-        if not custom:
-            custom = db_session.query(NormDaysTemplate).filter(
-                NormDaysTemplate.project_type == project_type,
-                NormDaysTemplate.project_subtype == sub,
-                NormDaysTemplate.agent_type.in_(['Все агенты', None]),
-            ).all()
-        if custom:
-            custom_map = {c.stage_code: c for c in custom}
-            for e in entries:
-                if e['stage_code'] in custom_map:
-                    c = custom_map[e['stage_code']]
-                    e['raw_norm_days'] = c.base_norm_days + K * c.k_multiplier
-    except Exception:
-        pass  # Fallback на хардкод-формулы
-    finally:
-        if db_session:
-            db_session.close()
-
-    # Пропорциональный расчёт норм
-    in_scope = [e for e in entries if e['is_in_contract_scope'] and e['executor_role'] != 'header' and e['raw_norm_days'] > 0]
-    total_raw = sum(e['raw_norm_days'] for e in in_scope)
-
-    if total_raw > 0 and contract_term > 0:
-        cumulative = 0
-        prev_rounded = 0
-        for e in in_scope:
-            cumulative += e['raw_norm_days']
-            e['cumulative_days'] = cumulative
-            current_rounded = round(cumulative / total_raw * contract_term)
-            e['norm_days'] = max(1, current_rounded - prev_rounded) if prev_rounded > 0 else max(1, current_rounded)
-            prev_rounded = current_rounded
-
-        # Корректировка: сумма in-scope = contract_term
-        total_assigned = sum(e['norm_days'] for e in in_scope)
-        if total_assigned != contract_term and in_scope:
-            in_scope[-1]['norm_days'] += (contract_term - total_assigned)
-            if in_scope[-1]['norm_days'] < 1:
-                in_scope[-1]['norm_days'] = 1
-
-    # Инициализация norm_days для ВСЕХ записей
-    for e in entries:
-        if e['executor_role'] == 'header':
-            e['norm_days'] = 0
-            continue
-        if 'norm_days' in e and e['norm_days'] and e['norm_days'] > 0:
-            continue  # Уже рассчитано (in-scope пропорциональный расчёт)
-        if not e['is_in_contract_scope'] and e['raw_norm_days'] > 0:
-            e['norm_days'] = max(1, round(e['raw_norm_days']))
-        elif e.get('raw_norm_days', 0) > 0:
-            e['norm_days'] = max(1, round(e['raw_norm_days']))
-        else:
-            e.setdefault('norm_days', 0)
-
-    return entries, contract_term, K
+    return stages
 
 
-def calc_template_contract_term(template_subtype: str, area: float, floors: int = 1) -> int:
-    """Расчёт срока для шаблонных проектов (рабочие дни)"""
-    sub = template_subtype.lower()
-    if 'ванной' in sub:
-        if 'визуализац' in sub:
-            return 20
-        return 10
-
-    # Стандарт / Стандарт с визуализацией
-    if area <= 90:
-        base_days = 20
-    else:
-        extra = int((area - 90 - 1) // 50) + 1
-        base_days = 20 + extra * 10
-
-    # Доп. этажи
-    if floors > 1:
-        for _ in range(1, floors):
-            if area <= 90:
-                base_days += 10
-            else:
-                extra = int((area - 90 - 1) // 50) + 1
-                base_days += 10 + extra * 10
-
-    # Визуализация
-    if 'визуализац' in sub:
-        if area <= 90:
-            base_days += 25
-        else:
-            extra = int((area - 90 - 1) // 50) + 1
-            base_days += 25 + extra * 15
-
-    return int(base_days)
-
-
-def build_template_project_timeline(template_subtype: str, area: float, floors: int = 1, agent_type: str = 'Все агенты'):
-    """Генерация шаблона таблицы сроков для шаблонных проектов.
-    template_subtype: 'Стандарт', 'Стандарт с визуализацией',
-                      'Проект ванной комнаты', 'Проект ванной комнаты с визуализацией'
-    """
-    contract_term = calc_template_contract_term(template_subtype, area, floors)
-    entries = []
-    order = 0
+def _template_project_stages(template_subtype: str):
+    """Подэтапы шаблонного проекта (коэффициента площади нет, k = 0)"""
+    stages = []
 
     def add(code, name, group, subgroup, g, executor, in_scope=True):
-        nonlocal order
-        order += 1
-        entries.append({
-            'stage_code': code, 'stage_name': name, 'stage_group': group,
-            'substage_group': subgroup, 'raw_norm_days': g, 'executor_role': executor,
-            'is_in_contract_scope': in_scope, 'sort_order': order
-        })
+        stages.append((code, name, group, subgroup, g, 0, executor, in_scope))
 
     def add_header(code, name, group, subgroup=''):
-        nonlocal order
-        order += 1
-        entries.append({
-            'stage_code': code, 'stage_name': name, 'stage_group': group,
-            'substage_group': subgroup, 'raw_norm_days': 0, 'executor_role': 'header',
-            'is_in_contract_scope': False, 'sort_order': order
-        })
+        stages.append((code, name, group, subgroup, 0, 0, 'header', False))
 
     # --- ДАТА НАЧАЛА ---
     add('START', 'ДАТА НАЧАЛА РАЗРАБОТКИ', 'START', '', 0, 'Менеджер', True)
@@ -379,41 +285,11 @@ def build_template_project_timeline(template_subtype: str, area: float, floors:
         add('T3_05', 'Отправка клиенту / Согласование', 'STAGE3', '', 3, 'Клиент', False)
         add('T3_06', 'Принятие проекта. Закрытие.', 'STAGE3', '', 0, 'Клиент', False)
 
-    # Перенумерация sort_order
-    for i, e in enumerate(entries, 1):
-        e['sort_order'] = i
+    return stages
 
-    # Проверяем кастомный шаблон нормо-дней в БД (приоритет: конкретный агент > "Все агенты")
-    db_session = None
-    try:
-        db_session = SessionLocal()
-        custom = None
-        if agent_type and agent_type != 'Все агенты':
-            custom = db_session.query(NormDaysTemplate).filter(
-                NormDaysTemplate.project_type == 'Шаблонный',
-                NormDaysTemplate.project_subtype == template_subtype,
-                NormDaysTemplate.agent_type == agent_type,
-            ).all()
-        if not custom:
-            custom = db_session.query(NormDaysTemplate).filter(
-                NormDaysTemplate.project_type == 'Шаблонный',
-                NormDaysTemplate.project_subtype == template_subtype,
-                NormDaysTemplate.agent_type.in_(['Все агенты', None]),
-            ).all()
-        if custom:
-            custom_map = {c.stage_code: c for c in custom}
-            for e in entries:
-                if e['stage_code'] in custom_map:
-                    c = custom_map[e['stage_code']]
-                    # Для шаблонных проектов K=0 (нет коэффициента площади)
-                    e['raw_norm_days'] = c.base_norm_days + 0 * c.k_multiplier
-    except Exception:
-        pass  # Fallback на хардкод-формулы
-    finally:
-        if db_session:
-            db_session.close()
 
-    # Пропорциональный расчёт норм
+def _distribute_norm_days(entries, contract_term, fill_out_of_scope_only=False):
+    """Пропорциональный расчёт norm_days: сумма in-scope = contract_term"""
     in_scope = [e for e in entries if e['is_in_contract_scope'] and e['executor_role'] != 'header' and e['raw_norm_days'] > 0]
     total_raw = sum(e['raw_norm_days'] for e in in_scope)
 
@@ -434,12 +310,300 @@ def build_template_project_timeline(template_subtype: str, area: float, floors:
             if in_scope[-1]['norm_days'] < 1:
                 in_scope[-1]['norm_days'] = 1
 
-    # Не в сроке: norm = max(1, round(raw))
+    if fill_out_of_scope_only:
+        # Шаблонные проекты — не в сроке: norm = max(1, round(raw))
+        for e in entries:
+            if e['executor_role'] == 'header':
+                e['norm_days'] = 0
+                continue
+            if not e['is_in_contract_scope'] and e['raw_norm_days'] > 0:
+                e['norm_days'] = max(1, round(e['raw_norm_days']))
+        return
+
+    # Инициализация norm_days для ВСЕХ записей
     for e in entries:
         if e['executor_role'] == 'header':
             e['norm_days'] = 0
             continue
+        if 'norm_days' in e and e['norm_days'] and e['norm_days'] > 0:
+            continue  # Уже рассчитано (in-scope пропорциональный расчёт)
         if not e['is_in_contract_scope'] and e['raw_norm_days'] > 0:
             e['norm_days'] = max(1, round(e['raw_norm_days']))
+        elif e.get('raw_norm_days', 0) > 0:
+            e['norm_days'] = max(1, round(e['raw_norm_days']))
+        else:
+            e.setdefault('norm_days', 0)
+
+
+class CompiledTimelineTemplate:
+    """
+    Шаблон таблицы сроков с применённым кастомным шаблоном нормо-дней.
+
+    Неизменяемый: stages — кортеж кортежей, один объект разделяется между
+    запросами; build() каждый раз отдаёт новые dict-записи.
+    """
+
+    __slots__ = ('project_type', 'project_subtype', 'agent_type', 'stages', 'is_custom')
+
+    def __init__(self, project_type, project_subtype, agent_type, stages, is_custom=False):
+        self.project_type = project_type
+        self.project_subtype = project_subtype
+        self.agent_type = agent_type
+        self.stages = tuple(tuple(s) for s in stages)
+        self.is_custom = is_custom
+
+    @property
+    def is_template_project(self) -> bool:
+        return self.project_type == 'Шаблонный'
+
+    def contract_term(self, area: float, floors: int = 1):
+        """Срок договора и коэффициент площади K"""
+        if self.is_template_project:
+            return calc_template_contract_term(self.project_subtype, area, floors), 0
+        if self.project_subtype:
+            if 'Полный' in self.project_subtype:
+                pt_code = 1
+            elif 'Планировочный' in self.project_subtype:
+                pt_code = 3
+            else:
+                pt_code = 2
+        else:
+            pt_code = 1 if self.project_type == 'Индивидуальный' else 2
+        return calc_contract_term(pt_code, area), calc_area_coefficient(area)
+
+    def build(self, area: float, floors: int = 1):
+        """Записи таблицы сроков для площади: (entries, contract_term, K)"""
+        contract_term, K = self.contract_term(area, floors)
+        entries = []
+        for order, (code, name, group, subgroup, base, k, executor, in_scope) in enumerate(self.stages, 1):
+            entries.append({
+                'stage_code': code, 'stage_name': name, 'stage_group': group,
+                'substage_group': subgroup, 'raw_norm_days': base + K * k,
+                'executor_role': executor, 'is_in_contract_scope': in_scope,
+                'sort_order': order,
+            })
+        _distribute_norm_days(entries, contract_term, fill_out_of_scope_only=self.is_template_project)
+        return entries, contract_term, K
+
+
+def _db_subtype(project_type, project_subtype):
+    """Подтип, под которым кастомный шаблон хранится в norm_days_templates"""
+    if project_subtype:
+        return project_subtype
+    return DEFAULT_TEMPLATE_SUBTYPE if project_type == 'Шаблонный' else DEFAULT_INDIVIDUAL_SUBTYPE
+
+
+def _compile_template(project_type: str, project_subtype: str = None,
+                      agent_type: str = ALL_AGENTS, db=None):
+    """Собрать шаблон: подэтапы по формулам + кастомные нормы из БД
+    (приоритет: конкретный агент > "Все агенты").
+    Возвращает (шаблон, можно_кэшировать); ошибка БД — только формулы, без кэша.
+    """
+    if project_type == 'Шаблонный':
+        project_subtype = project_subtype or DEFAULT_TEMPLATE_SUBTYPE
+        stages = _template_project_stages(project_subtype)
+    else:
+        stages = _individual_stages(project_subtype)
+
+    db_session = None
+    try:
+        db_session = db if db is not None else SessionLocal()
+        agents = [ALL_AGENTS]
+        if agent_type and agent_type != ALL_AGENTS:
+            agents.append(agent_type)
+        rows = db_session.query(NormDaysTemplate).filter(
+            NormDaysTemplate.project_type == project_type,
+            NormDaysTemplate.project_subtype == _db_subtype(project_type, project_subtype),
+            NormDaysTemplate.agent_type.in_(agents),
+        ).all()
+    except Exception as e:
+        logger.warning(f"Шаблон нормо-дней {project_type}/{project_subtype}: "
+                       f"БД недоступна, используются формулы: {e}")
+        # Не кэшируем: при следующем обращении шаблон перечитается
+        return CompiledTimelineTemplate(project_type, project_subtype, agent_type, stages), False
+    finally:
+        if db_session is not None and db is None:
+            db_session.close()
+
+    custom = [r for r in rows if r.agent_type == agent_type and agent_type != ALL_AGENTS]
+    if not custom:
+        custom = [r for r in rows if r.agent_type == ALL_AGENTS]
+    custom_map = {c.stage_code: c for c in custom}
+    if custom_map:
+        stages = [
+            (code, name, group, subgroup,
+             custom_map[code].base_norm_days, custom_map[code].k_multiplier or 0,
+             executor, in_scope)
+            if code in custom_map else (code, name, group, subgroup, base, k, executor, in_scope)
+            for code, name, group, subgroup, base, k, executor, in_scope in stages
+        ]
+    return CompiledTimelineTemplate(project_type, project_subtype, agent_type, stages,
+                                    is_custom=bool(custom_map)), True
+
+
+class TimelineTemplateCache:
+    """Кэш скомпилированных шаблонов: (project_type, project_subtype, agent_type) -> шаблон"""
+
+    def __init__(self, ttl=TEMPLATE_CACHE_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, template):
+        with self._lock:
+            self._entries[key] = (self._clock(), template)
+
+    def invalidate(self, project_type=None, project_subtype=None):
+        """Сбросить шаблоны типа/подтипа (для всех агентов); без аргументов — все"""
+        with self._lock:
+            if project_type is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if key[0] != project_type:
+                    continue
+                if project_subtype is None or _db_subtype(key[0], key[1]) == project_subtype:
+                    del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_template_cache = TimelineTemplateCache()
+
+
+def get_compiled_template(project_type: str, project_subtype: str = None,
+                          agent_type: str = ALL_AGENTS, db=None) -> CompiledTimelineTemplate:
+    """Скомпилированный шаблон из кэша процесса (компилируется при промахе)"""
+    key = (project_type, project_subtype, agent_type or ALL_AGENTS)
+    template = _template_cache.get(key)
+    if template is None:
+        template, cacheable = _compile_template(project_type, project_subtype, key[2], db=db)
+        if cacheable:
+            _template_cache.put(key, template)
+    return template
+
+
+def invalidate_timeline_templates(project_type: str = None, project_subtype: str = None):
+    """Сбросить кэш шаблонов после изменения norm_days_templates"""
+    _template_cache.invalidate(project_type, project_subtype)
+
+
+def build_project_timeline_template(project_type: str, area: float, project_subtype: str = None, agent_type: str = 'Все агенты'):
+    """Генерация полного шаблона подэтапов с формулами.
+    project_subtype: 'Полный (с 3д визуализацией)', 'Эскизный (с коллажами)', 'Планировочный'
+    agent_type: имя агента или 'Все агенты' — для приоритетного выбора кастомных шаблонов
+    """
+    return get_compiled_template(project_type, project_subtype, agent_type).build(area)
+
 
-    return entries, contract_term, 0
+def build_template_project_timeline(template_subtype: str, area: float, floors: int = 1, agent_type: str = 'Все агенты'):
+    """Генерация шаблона таблицы сроков для шаблонных проектов.
+    template_subtype: 'Стандарт', 'Стандарт с визуализацией',
+                      'Проект ванной комнаты', 'Проект ванной комнаты с визуализацией'
+    """
+    return get_compiled_template('Шаблонный', template_subtype, agent_type).build(area, floors)
+
+
+def build_contract_timeline(project_type: str, project_subtype: str, area: float,
+                            floors: int = 1, agent_type: str = ALL_AGENTS, db=None):
+    """Таблица сроков договора: (entries, contract_term, K)"""
+    if project_type == 'Шаблонный':
+        project_subtype = project_subtype or DEFAULT_TEMPLATE_SUBTYPE
+    return get_compiled_template(project_type, project_subtype, agent_type, db=db).build(area, floors or 1)
+
+
+def timeline_rows(contract_id: int, entries):
+    """Записи шаблона -> строки project_timeline_entries для пакетной вставки"""
+    return [{
+        'contract_id': contract_id,
+        'stage_code': e['stage_code'],
+        'stage_name': e['stage_name'],
+        'stage_group': e['stage_group'],
+        'substage_group': e.get('substage_group', ''),
+        'executor_role': e['executor_role'],
+        'is_in_contract_scope': e['is_in_contract_scope'],
+        'sort_order': e['sort_order'],
+        'raw_norm_days': e.get('raw_norm_days', 0),
+        'cumulative_days': e.get('cumulative_days', 0),
+        'norm_days': e.get('norm_days', 0),
+    } for e in entries]
+
+
+def insert_timeline_entries(db, contract_id: int, entries) -> int:
+    """Вставить таблицу сроков договора одним executemany (без коммита)"""
+    rows = timeline_rows(contract_id, entries)
+    if rows:
+        db.execute(insert(ProjectTimelineEntry), rows)
+    return len(rows)
+
+
+def reapply_timeline_template(db, project_type: str, project_subtype: str,
+                              agent_type: str = ALL_AGENTS) -> dict:
+    """
+    Пересчитать нормы в таблицах сроков всех договоров, которых касается
+    шаблон (тип/подтип; для конкретного агента — только его договоры).
+
+    Обновляются raw_norm_days, norm_days и cumulative_days существующих
+    подэтапов; фактические даты и кастомные нормы СДП не трогаются.
+    Без коммита — вызывающий фиксирует транзакцию.
+    """
+    invalidate_timeline_templates(project_type, project_subtype)
+
+    query = db.query(
+        Contract.id, Contract.project_subtype, Contract.area, Contract.floors, Contract.agent_type
+    ).filter(
+        Contract.project_type == project_type,
+        Contract.id.in_(db.query(ProjectTimelineEntry.contract_id).distinct()),
+    )
+    if project_subtype == _db_subtype(project_type, None):
+        query = query.filter(or_(Contract.project_subtype == project_subtype,
+                                 Contract.project_subtype.is_(None)))
+    else:
+        query = query.filter(Contract.project_subtype == project_subtype)
+    if agent_type and agent_type != ALL_AGENTS:
+        query = query.filter(Contract.agent_type == agent_type)
+    contracts = [c for c in query.all() if c.area]
+
+    updated_contracts = 0
+    updated_entries = 0
+    for start in range(0, len(contracts), REAPPLY_BATCH):
+        batch = contracts[start:start + REAPPLY_BATCH]
+        existing = {}
+        for entry_id, contract_id, stage_code in db.query(
+            ProjectTimelineEntry.id, ProjectTimelineEntry.contract_id, ProjectTimelineEntry.stage_code
+        ).filter(ProjectTimelineEntry.contract_id.in_([c.id for c in batch])):
+            existing[(contract_id, stage_code)] = entry_id
+
+        updates = []
+        for contract in batch:
+            entries, _, _ = build_contract_timeline(
+                project_type, contract.project_subtype, contract.area,
+                contract.floors, contract.agent_type or ALL_AGENTS, db=db)
+            rows = [{
+                'id': existing[(contract.id, e['stage_code'])],
+                'raw_norm_days': e.get('raw_norm_days', 0),
+                'cumulative_days': e.get('cumulative_days', 0),
+                'norm_days': e.get('norm_days', 0),
+            } for e in entries if (contract.id, e['stage_code']) in existing]
+            if rows:
+                updates.extend(rows)
+                updated_contracts += 1
+        if updates:
+            db.execute(update(ProjectTimelineEntry), updates)
+            updated_entries += len(updates)
+
+    logger.info(f"Шаблон {project_type}/{project_subtype}/{agent_type} применён: "
+                f"договоров={updated_contracts}, записей={updated_entries}")
+    return {"contracts": updated_contracts, "entries": updated_entries}
@@ -0,0 +1,272 @@
+"""
+Сканер папки проекта на Яндекс.Диске (POST /api/files/scan/{contract_id}).
+
+Обход в ширину: папки одного уровня листаются параллельно (не больше
+SCAN_WORKERS запросов одновременно), каждая — со всеми страницами
+(YandexDiskService.list_folder), поэтому папки с сотнями рендеров не
+усекаются. Листинги кэшируются по пути вместе с modified папки: если в
+свежем листинге родителя modified подпапки не изменился, её содержимое
+берётся из кэша без запроса к API.
+
+modified папки на ЯД меняется только при изменении её непосредственного
+содержимого, поэтому подпапки из кэшированного листинга «свежими» не
+считаются и листаются заново — пропускается каждый неизменившийся
+уровень, но не поддерево целиком.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Одновременных запросов листинга на один скан
+SCAN_WORKERS = 4
+# Одновременных запросов публикации новых файлов
+PUBLISH_WORKERS = 4
+# Папок в кэше листингов (LRU)
+LISTING_CACHE_SIZE = 5000
+
+# Только нужные сканеру поля — без превью, sizes и т.п.
+LISTING_FIELDS = ",".join([
+    "path", "modified", "_embedded.total",
+    "_embedded.items.name", "_embedded.items.path", "_embedded.items.type",
+    "_embedded.items.modified", "_embedded.items.md5", "_embedded.items.size",
+])
+
+# Точный маппинг папок → стадий
+FOLDER_TO_STAGE_EXACT = {
+    'Замер': 'measurement',
+    'Замеры': 'measurement',
+    '1 стадия - Планировочное решение': 'stage1',
+    'Планировочное решение': 'stage1',
+    'Концепция-коллажи': 'stage2_concept',
+    'Коллажи': 'stage2_concept',
+    '3D визуализация': 'stage2_3d',
+    '3D': 'stage2_3d',
+    '3 стадия - Чертежный проект': 'stage3',
+    'Чертежный проект': 'stage3',
+    'Чертежи': 'stage3',
+    'Референсы': 'references',
+    'Фотофиксация': 'photo_documentation',
+    'Фото': 'photo_documentation',
+    'Анкета': 'questionnaire',
+    'Анкеты': 'questionnaire',
+    'Документы': 'documents',
+    'Техническое задание': 'tech_task',
+    'ТЗ': 'tech_task',
+    'Авторский надзор': 'supervision',
+}
+
+# Нечёткий маппинг: ключевые слова → стадия (для папок с нестандартными именами)
+FOLDER_KEYWORDS_TO_STAGE = [
+    ('замер', 'measurement'),
+    ('1 стадия', 'stage1'),
+    ('1стадия', 'stage1'),
+    ('планировочн', 'stage1'),
+    ('концепция', 'stage2_concept'),
+    ('коллаж', 'stage2_concept'),
+    ('3d', 'stage2_3d'),
+    ('визуализ', 'stage2_3d'),
+    ('2 стадия', 'stage2_concept'),
+    ('2стадия', 'stage2_concept'),
+    ('3 стадия', 'stage3'),
+    ('3стадия', 'stage3'),
+    ('чертеж', 'stage3'),
+    ('рабочи', 'stage3'),
+    ('референ', 'references'),
+    ('фотофикс', 'photo_documentation'),
+    ('фото', 'photo_documentation'),
+    ('анкет', 'questionnaire'),
+    ('документ', 'documents'),
+    ('техническ', 'tech_task'),
+    ('надзор', 'supervision'),
+]
+
+
+def match_folder_to_stage(folder_name):
+    """Определить стадию по имени папки: сначала точное, потом нечёткое"""
+    if folder_name in FOLDER_TO_STAGE_EXACT:
+        return FOLDER_TO_STAGE_EXACT[folder_name]
+    name_lower = folder_name.lower()
+    for keyword, stage_id in FOLDER_KEYWORDS_TO_STAGE:
+        if keyword in name_lower:
+            return stage_id
+    return None
+
+
+def child_folder_stage(folder_name, parent_stage):
+    """Стадия подпапки с учётом наследования от родителя"""
+    child_stage = match_folder_to_stage(folder_name)
+    if child_stage is None:
+        child_stage = parent_stage  # наследуем стадию от родителя
+    # Внутри Авторского надзора подпапки "Стадия ..." остаются supervision
+    if parent_stage == 'supervision' and folder_name.startswith('Стадия'):
+        child_stage = 'supervision'
+    # Подпапки "Вариация N" наследуют стадию от родителя
+    if folder_name.startswith('Вариация') or folder_name.startswith('вариация'):
+        child_stage = parent_stage
+    return child_stage
+
+
+def detect_file_type(name):
+    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if ext in ('png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'svg'):
+        return 'image'
+    elif ext == 'pdf':
+        return 'pdf'
+    elif ext in ('xls', 'xlsx', 'csv'):
+        return 'excel'
+    elif ext in ('doc', 'docx'):
+        return 'word'
+    elif ext in ('dwg', 'dxf'):
+        return 'cad'
+    return 'other'
+
+
+def normalize_path(p):
+    """Нормализация пути: убираем 'disk:' префикс для сравнения"""
+    if p and p.startswith('disk:'):
+        return p[5:]
+    return p or ''
+
+
+def path_variants(p):
+    """Варианты записи пути в БД: с 'disk:', с ведущим '/' и без"""
+    norm = normalize_path(p)
+    bare = norm.lstrip('/')
+    return {p, norm, bare, '/' + bare, 'disk:/' + bare}
+
+
+class FolderListingCache:
+    """LRU-кэш листингов папок: path -> (modified, items)"""
+
+    def __init__(self, max_entries=LISTING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, modified):
+        """Листинг, если закэширован с тем же modified, иначе None"""
+        if not modified:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != modified:
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def put(self, path, modified, items):
+        if not modified:
+            return
+        with self._lock:
+            self._entries[path] = (modified, items)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_listing_cache = FolderListingCache()
+
+
+def get_listing_cache():
+    """Общий на процесс кэш листингов"""
+    return _listing_cache
+
+
+def scan_project_tree(yd_service, root_path, root_stage=None, workers=SCAN_WORKERS,
+                      cache=None):
+    """
+    Обойти папку проекта и собрать файлы, лежащие в папках стадий.
+
+    Блокирующая функция — из async-обработчика вызывать через run_in_threadpool.
+    Папка "правки" пропускается; файлы без стадии (корень) не возвращаются.
+    Ошибка листинга одной папки не прерывает скан (папка пропускается).
+
+    Returns:
+        list[dict]: yandex_path, file_name, stage, file_type, md5, modified, size
+    """
+    cache = cache if cache is not None else _listing_cache
+    stats = {'listed': 0, 'cached': 0, 'errors': 0}
+    stats_lock = threading.Lock()
+
+    def list_folder(folder):
+        path, stage, modified, trusted = folder
+        if trusted:
+            items = cache.get(path, modified)
+            if items is not None:
+                with stats_lock:
+                    stats['cached'] += 1
+                return items, False
+        try:
+            listing = yd_service.list_folder(path, fields=LISTING_FIELDS)
+        except Exception as e:
+            logger.warning(f"Ошибка сканирования {path}: {e}")
+            with stats_lock:
+                stats['errors'] += 1
+            return None, False
+        items = listing.get('items', [])
+        cache.put(path, listing.get('modified') or modified, items)
+        with stats_lock:
+            stats['listed'] += 1
+        return items, True
+
+    found_files = []
+    # (path, stage, modified из листинга родителя, листинг родителя свежий)
+    frontier = [(root_path, root_stage, None, False)]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yd-scan') as pool:
+        while frontier:
+            next_frontier = []
+            for folder, (items, fresh) in zip(frontier, pool.map(list_folder, frontier)):
+                if items is None:
+                    continue
+                stage = folder[1]
+                for item in items:
+                    item_name = item.get('name', '')
+                    item_type = item.get('type', '')
+                    if item_type == 'dir':
+                        # Пропускаем папку "правки" — файлы правок отображаются отдельно
+                        if item_name.lower() == 'правки':
+                            continue
+                        next_frontier.append((item.get('path', ''),
+                                              child_folder_stage(item_name, stage),
+                                              item.get('modified'), fresh))
+                    elif item_type == 'file' and stage:
+                        found_files.append({
+                            'yandex_path': item.get('path', ''),
+                            'file_name': item_name,
+                            'stage': stage,
+                            'file_type': detect_file_type(item_name),
+                            'md5': item.get('md5'),
+                            'modified': item.get('modified'),
+                            'size': item.get('size'),
+                        })
+            frontier = next_frontier
+
+    logger.info(f"Scan {root_path}: файлов={len(found_files)}, листингов={stats['listed']}, "
+                f"из кэша={stats['cached']}, ошибок={stats['errors']}")
+    return found_files
+
+
+def publish_files(yd_service, paths, workers=PUBLISH_WORKERS):
+    """Публичные ссылки для списка путей (параллельно); ошибка → ''"""
+    def publish(path):
+        try:
+            return yd_service.get_public_link(path) or ''
+        except Exception:
+            return ''
+
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths)),
+                            thread_name_prefix='yd-publish') as pool:
+        return dict(zip(paths, pool.map(publish, paths)))
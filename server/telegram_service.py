@@ -12,6 +12,11 @@ from typing import Optional, List, Dict, Any
 
 logger = logging.getLogger(__name__)
 
+# Потоковая отправка файлов по ссылке (URLInputFile): размер блока и таймаут
+# скачивания, секунд (файл читается во время загрузки в Telegram)
+RELAY_CHUNK_SIZE = 256 * 1024
+RELAY_DOWNLOAD_TIMEOUT = 300
+
 # Флаг доступности Pyrogram (MTProto)
 PYROGRAM_AVAILABLE = False
 try:
@@ -31,7 +36,7 @@ try:
     from aiogram import Bot
     from aiogram.types import (
         InputMediaPhoto, InputMediaDocument,
-        FSInputFile, BufferedInputFile
+        FSInputFile, BufferedInputFile, URLInputFile
     )
     from aiogram.enums import ParseMode
     AIOGRAM_AVAILABLE = True
@@ -595,6 +600,82 @@ class TelegramService:
             logger.error(f"Ошибка отправки галереи из байтов: {e}")
             return None
 
+    def _relay_media(self, item: Dict[str, Any]) -> Any:
+        """file_id из кэша или потоковая загрузка по ссылке на скачивание"""
+        if item.get("file_id"):
+            return item["file_id"]
+        return URLInputFile(
+            item["href"],
+            filename=item["file_name"],
+            chunk_size=RELAY_CHUNK_SIZE,
+            timeout=RELAY_DOWNLOAD_TIMEOUT,
+        )
+
+    async def send_media_group_relay(
+        self,
+        chat_id: int,
+        items: List[Dict[str, Any]],
+        caption: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Отправить галерею (до 10 фото) с Яндекс.Диска без буферизации.
+        items — результат services.telegram_relay.resolve_relay_files.
+        Возвращает [{'message_id', 'file_id'}] в порядке items.
+        """
+        if not self.bot_available:
+            return None
+        if not items:
+            return None
+
+        try:
+            media = []
+            for i, item in enumerate(items[:10]):
+                media.append(
+                    InputMediaPhoto(
+                        media=self._relay_media(item),
+                        caption=caption if i == 0 else None,
+                        parse_mode=ParseMode.HTML if caption else None,
+                    )
+                )
+
+            messages = await self._bot.send_media_group(
+                chat_id=chat_id, media=media
+            )
+            return [
+                {
+                    "message_id": m.message_id,
+                    "file_id": m.photo[-1].file_id if m.photo else None,
+                }
+                for m in messages
+            ]
+        except Exception as e:
+            logger.error(f"Ошибка отправки галереи с Яндекс.Диска: {e}")
+            return None
+
+    async def send_document_relay(
+        self,
+        chat_id: int,
+        item: Dict[str, Any],
+        caption: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Отправить документ с Яндекс.Диска без буферизации.
+        Возвращает {'message_id', 'file_id'}.
+        """
+        if not self.bot_available:
+            return None
+        try:
+            msg = await self._bot.send_document(
+                chat_id=chat_id, document=self._relay_media(item), caption=caption
+            )
+            return {
+                "message_id": msg.message_id,
+                "file_id": msg.document.file_id if msg.document else None,
+            }
+        except Exception as e:
+            logger.error(f"Ошибка отправки документа с Яндекс.Диска: {e}")
+            return None
+
     # ========================================
     # Скрипт-сообщения
     # ========================================
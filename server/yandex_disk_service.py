@@ -1,18 +1,81 @@
 """
 Интеграция с Яндекс.Диском
 Загрузка, скачивание и управление файлами
+
+Загрузка идёт потоком: тело PUT читается из файлового объекта блоками
+по UPLOAD_CHUNK_SIZE (ChunkedUploadReader), поэтому в памяти воркера
+одновременно находится не больше блока, независимо от размера файла.
+Загрузки используют общий requests.Session с пулом соединений.
 """
+import io
 import requests
 import os
-from typing import Optional, BinaryIO
+import threading
+from typing import Optional, BinaryIO, Callable
+from requests.adapters import HTTPAdapter
 from config import get_settings
 
 settings = get_settings()
 
+# Размер блока потоковой загрузки (и шаг отчёта о прогрессе)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Соединений в пуле на хост (cloud-api.yandex.net и uploader*.disk.yandex.net)
+HTTP_POOL_SIZE = 10
+# Размер страницы при листинге папок (API отдаёт не больше, чем limit)
+LIST_PAGE_SIZE = 200
+
+_session_lock = threading.Lock()
+
+
+class UploadTooLarge(Exception):
+    """Загружаемый поток превысил допустимый размер"""
+
+
+class ChunkedUploadReader:
+    """
+    Файловый объект-обёртка для потоковой отправки тела запроса.
+
+    requests/http.client читают тело через read() блоками, а __len__
+    даёт Content-Length. Обёртка считает отправленные байты, прерывает
+    загрузку при превышении max_size и вызывает progress(sent, total)
+    не чаще одного раза на chunk_size байт.
+    """
+
+    def __init__(self, fileobj: BinaryIO, size: int, max_size: Optional[int] = None,
+                 progress: Optional[Callable[[int, int], None]] = None,
+                 chunk_size: int = UPLOAD_CHUNK_SIZE):
+        self._fileobj = fileobj
+        self.size = size
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self._progress = progress
+        self.sent = 0
+        self._reported = 0
+
+    def __len__(self):
+        return self.size
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0 or n > self.chunk_size:
+            n = self.chunk_size
+        chunk = self._fileobj.read(n)
+        self.sent += len(chunk)
+        if self.max_size is not None and self.sent > self.max_size:
+            raise UploadTooLarge(f"Размер файла превышает {self.max_size} байт")
+        if self._progress and (self.sent - self._reported >= self.chunk_size
+                               or (not chunk or self.sent >= self.size)):
+            if self.sent != self._reported:
+                self._reported = self.sent
+                self._progress(self.sent, self.size)
+        return chunk
+
 
 class YandexDiskService:
     """Сервис для работы с Яндекс.Диском"""
 
+    # Общий на процесс Session с пулом соединений (создаётся лениво)
+    _http_session = None
+
     def __init__(self):
         self.token = settings.yandex_disk_token
         self.base_url = "https://cloud-api.yandex.net/v1/disk"
@@ -21,39 +84,93 @@ class YandexDiskService:
             "Content-Type": "application/json"
         }
 
-    def upload_file(self, local_path: str, yandex_path: str) -> dict:
+    @property
+    def session(self) -> requests.Session:
+        """Пул HTTP-соединений для загрузок (keep-alive между запросами)"""
+        session = YandexDiskService._http_session
+        if session is None:
+            with _session_lock:
+                session = YandexDiskService._http_session
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                          pool_maxsize=HTTP_POOL_SIZE)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    YandexDiskService._http_session = session
+        return session
+
+    def get_upload_href(self, yandex_path: str) -> str:
+        """Получить одноразовую ссылку для загрузки файла (с перезаписью)"""
+        upload_url_response = self.session.get(
+            f"{self.base_url}/resources/upload",
+            headers=self.headers,
+            params={"path": yandex_path, "overwrite": "true"},
+            timeout=15
+        )
+
+        if upload_url_response.status_code != 200:
+            raise Exception(f"Ошибка получения ссылки: {upload_url_response.json()}")
+
+        return upload_url_response.json().get("href")
+
+    def upload_stream(self, fileobj: BinaryIO, yandex_path: str, size: Optional[int] = None,
+                      max_size: Optional[int] = None,
+                      progress: Optional[Callable[[int, int], None]] = None,
+                      create_parent: bool = True) -> dict:
         """
-        Загрузка файла на Яндекс.Диск
+        Потоковая загрузка файлового объекта на Яндекс.Диск
 
         Args:
-            local_path: Путь к локальному файлу
-            yandex_path: Путь на Яндекс.Диске (например: "/CRM/contracts/file.pdf")
+            fileobj: Файловый объект (открытый на чтение в бинарном режиме)
+            yandex_path: Путь на Яндекс.Диске
+            size: Размер в байтах (None = определить через seek)
+            max_size: Ограничение размера; при превышении — UploadTooLarge
+            progress: Callback progress(sent_bytes, total_bytes)
+            create_parent: Создать родительскую папку перед загрузкой
 
         Returns:
             dict с информацией о загруженном файле
         """
-        # Получаем ссылку для загрузки
-        upload_url_response = requests.get(
-            f"{self.base_url}/resources/upload",
-            headers=self.headers,
-            params={"path": yandex_path, "overwrite": "true"}
-        )
+        if size is None:
+            fileobj.seek(0, os.SEEK_END)
+            size = fileobj.tell()
+            fileobj.seek(0)
+        if max_size is not None and size > max_size:
+            raise UploadTooLarge(f"Размер файла превышает {max_size} байт")
 
-        if upload_url_response.status_code != 200:
-            raise Exception(f"Ошибка получения ссылки: {upload_url_response.json()}")
+        # Автоматически создаём родительскую папку если не существует
+        parent_dir = "/".join(yandex_path.split("/")[:-1])
+        if create_parent and parent_dir and parent_dir != "/":
+            self.create_folder(parent_dir)
 
-        upload_url = upload_url_response.json().get("href")
+        upload_url = self.get_upload_href(yandex_path)
 
-        # Загружаем файл
-        with open(local_path, 'rb') as f:
-            upload_response = requests.put(upload_url, files={'file': f})
+        # Таймаут чтения растёт с размером: минимум 60 с, +2 с на МБ
+        read_timeout = max(60, int(size / (1024 * 1024)) * 2 + 60)
+        reader = ChunkedUploadReader(fileobj, size, max_size=max_size, progress=progress)
+        upload_response = self.session.put(upload_url, data=reader, timeout=(15, read_timeout))
 
-        if upload_response.status_code not in [200, 201]:
+        if upload_response.status_code not in [200, 201, 202]:
             raise Exception(f"Ошибка загрузки файла: {upload_response.text}")
 
-        # Получаем информацию о файле
         return self.get_file_info(yandex_path)
 
+    def upload_file(self, local_path: str, yandex_path: str) -> dict:
+        """
+        Загрузка файла на Яндекс.Диск
+
+        Args:
+            local_path: Путь к локальному файлу
+            yandex_path: Путь на Яндекс.Диске (например: "/CRM/contracts/file.pdf")
+
+        Returns:
+            dict с информацией о загруженном файле
+        """
+        with open(local_path, 'rb') as f:
+            return self.upload_stream(f, yandex_path, size=os.path.getsize(local_path),
+                                      create_parent=False)
+
     def upload_file_from_bytes(self, file_bytes: bytes, yandex_path: str) -> dict:
         """
         Загрузка файла из байтов на Яндекс.Диск
@@ -65,30 +182,7 @@ class YandexDiskService:
         Returns:
             dict с информацией о загруженном файле
         """
-        # Автоматически создаём родительскую папку если не существует
-        parent_dir = "/".join(yandex_path.split("/")[:-1])
-        if parent_dir and parent_dir != "/":
-            self.create_folder(parent_dir)
-
-        # Получаем ссылку для загрузки
-        upload_url_response = requests.get(
-            f"{self.base_url}/resources/upload",
-            headers=self.headers,
-            params={"path": yandex_path, "overwrite": "true"}
-        )
-
-        if upload_url_response.status_code != 200:
-            raise Exception(f"Ошибка получения ссылки: {upload_url_response.json()}")
-
-        upload_url = upload_url_response.json().get("href")
-
-        # Загружаем файл
-        upload_response = requests.put(upload_url, data=file_bytes)
-
-        if upload_response.status_code not in [200, 201]:
-            raise Exception(f"Ошибка загрузки файла: {upload_response.text}")
-
-        return self.get_file_info(yandex_path)
+        return self.upload_stream(io.BytesIO(file_bytes), yandex_path, size=len(file_bytes))
 
     def download_file(self, yandex_path: str, local_path: str) -> str:
         """
@@ -256,29 +350,63 @@ class YandexDiskService:
 
         return public_url or ""
 
-    def list_files(self, yandex_path: str = "/", limit: int = 100) -> list:
+    def list_folder(self, yandex_path: str, page_size: int = LIST_PAGE_SIZE,
+                    fields: Optional[str] = None) -> dict:
         """
-        Список файлов в папке
+        Полный список содержимого папки с постраничной выборкой (offset)
 
         Args:
             yandex_path: Путь к папке
-            limit: Максимальное количество файлов
+            page_size: Размер страницы запроса
+            fields: Ограничение полей ответа (параметр fields API), None = все
 
         Returns:
-            Список файлов
+            dict: {'path', 'modified', 'items'} — modified самой папки и
+            все элементы (без усечения по limit)
         """
-        response = requests.get(
-            f"{self.base_url}/resources",
-            headers=self.headers,
-            params={"path": yandex_path, "limit": limit}
-        )
+        items = []
+        folder = {}
+        offset = 0
+        while True:
+            params = {"path": yandex_path, "limit": page_size, "offset": offset}
+            if fields:
+                params["fields"] = fields
+            response = self.session.get(
+                f"{self.base_url}/resources",
+                headers=self.headers,
+                params=params,
+                timeout=(15, 60)
+            )
+
+            if response.status_code != 200:
+                raise Exception(f"Ошибка получения списка: {response.json()}")
+
+            data = response.json()
+            if not folder:
+                folder = {"path": data.get("path", yandex_path), "modified": data.get("modified")}
+            embedded = data.get("_embedded", {})
+            page = embedded.get("items", [])
+            items.extend(page)
+            offset += len(page)
+            total = embedded.get("total")
+            if not page or len(page) < page_size or (total is not None and offset >= total):
+                break
+
+        folder["items"] = items
+        return folder
+
+    def list_files(self, yandex_path: str = "/", limit: int = LIST_PAGE_SIZE) -> list:
+        """
+        Список файлов в папке
 
-        if response.status_code != 200:
-            raise Exception(f"Ошибка получения списка: {response.json()}")
+        Args:
+            yandex_path: Путь к папке
+            limit: Размер страницы (выбираются все страницы)
 
-        data = response.json()
-        items = data.get("_embedded", {}).get("items", [])
-        return items
+        Returns:
+            Список файлов
+        """
+        return self.list_folder(yandex_path, page_size=limit)["items"]
 
     def get_disk_info(self) -> dict:
         """
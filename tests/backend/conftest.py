@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Общее для серверных тестов: загрузка модулей из server/ и БД в памяти.
+
+Клиент и сервер содержат одноимённые модули (config, database, services),
+поэтому серверные модули подменяют клиентские в sys.modules только на
+время импорта, с DATABASE_URL='sqlite://'.
+
+Фикстуры engine / session_factory / db создают схему по server_db.Base
+модуля теста: каждый модуль загружает свою копию серверного database.
+"""
+import importlib.util
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _server_path(name):
+    """'services' -> services/__init__.py, 'services.x' -> services/x.py"""
+    path = ROOT / 'server' / Path(*name.split('.'))
+    if path.is_dir():
+        return path / '__init__.py'
+    return path.with_suffix('.py')
+
+
+def _load_server_module(name):
+    spec = importlib.util.spec_from_file_location(name, _server_path(name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def server_modules(*names):
+    """
+    Загрузить серверные config, database и модули names (по порядку);
+    отдаёт словарь имя -> модуль. Внутри блока можно импортировать
+    server.services.*, которым нужны серверные config/database. На выходе
+    прежние модули и DATABASE_URL восстанавливаются.
+    """
+    names = ('config', 'database') + tuple(n for n in names if n not in ('config', 'database'))
+    saved = {name: sys.modules.get(name) for name in names}
+    saved_env = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    try:
+        yield {name: _load_server_module(name) for name in names}
+    finally:
+        for name, module in saved.items():
+            if module is not None:
+                sys.modules[name] = module
+            else:
+                sys.modules.pop(name, None)
+        if saved_env is None:
+            os.environ.pop('DATABASE_URL', None)
+        else:
+            os.environ['DATABASE_URL'] = saved_env
+
+
+def load_server_modules(*names):
+    """server_modules без блока: словарь имя -> модуль"""
+    with server_modules(*names) as modules:
+        return modules
+
+
+def memory_engine(metadata):
+    """SQLite в памяти со схемой metadata: одно соединение на все сессии и потоки"""
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False},
+                           poolclass=StaticPool)
+    metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def engine(request):
+    engine = memory_engine(request.module.server_db.Base.metadata)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
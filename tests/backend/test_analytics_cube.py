@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Куб аналитики отчётов (server/services/analytics_cube.py):
+- факты договора: разбор даты, вид клиента, сроки CRM-карточек и стадий
+- KPI и динамика клиентов по фактам (новые / повторные, сравнение с прошлым годом)
+- инкрементальное обновление при flush совпадает с полной пересборкой
+- распределение по измерениям и заполнение пустого куба
+"""
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.analytics_cube')
+server_db = _modules['database']
+cube = _modules['services.analytics_cube']
+
+Client = server_db.Client
+Contract = server_db.Contract
+CRMCard = server_db.CRMCard
+StageExecutor = server_db.StageExecutor
+Agent = server_db.Agent
+F = server_db.AnalyticsContractFact
+
+
+def _contract(db, client, date, amount=100.0, area=10.0, **kwargs):
+    kwargs.setdefault('project_type', 'Индивидуальный')
+    contract = Contract(client_id=client.id, contract_number=f'N{date}-{amount}', contract_date=date,
+                        total_amount=amount, area=area, **kwargs)
+    db.add(contract)
+    db.flush()
+    return contract
+
+
+def _seed(db):
+    """Два клиента: первый заключает договоры в 2025 и 2026, второй — только в 2026"""
+    db.add_all([Agent(name='ПЕТРОВИЧ', color='#111111', status='активный'),
+                Agent(name='ФЕСТИВАЛЬ', color='#222222', status='активный')])
+    first = Client(client_type='Физическое лицо', phone='1')
+    second = Client(client_type='Юридическое лицо', phone='2')
+    db.add_all([first, second])
+    db.flush()
+    _contract(db, first, '10.03.2025', amount=50.0, agent_type='ПЕТРОВИЧ', city='СПБ')
+    _contract(db, first, '2026-03-05', amount=200.0, agent_type='ПЕТРОВИЧ', city='СПБ')
+    _contract(db, second, '2026-03-20', amount=300.0, area=30.0, agent_type='ФЕСТИВАЛЬ', city='МСК')
+    _contract(db, second, '2026-07-01', amount=400.0, agent_type='ФЕСТИВАЛЬ', city='МСК')
+    _contract(db, second, 'мусор', amount=1000.0, city='МСК')
+    _contract(db, second, '2026-03-25', amount=5000.0, project_type='Авторский надзор')
+    db.commit()
+    return first, second
+
+
+def _facts(conn):
+    return {row.contract_id: dict(row._mapping) for row in conn.execute(select(F))}
+
+
+@pytest.mark.backend
+def test_facts_parse_date_client_kind_and_deadlines(db):
+    client = Client(client_type='Физическое лицо', phone='1')
+    db.add(client)
+    db.flush()
+    contract = _contract(db, client, ' 15.05.2026 ')
+    on_time = CRMCard(contract_id=contract.id, column_name='Выполненный проект',
+                      deadline='2026-06-10', updated_at=datetime(2026, 6, 8))
+    late = CRMCard(contract_id=contract.id, column_name='Выполненный проект',
+                   deadline='2026-06-10', updated_at=datetime(2026, 6, 15))
+    open_card = CRMCard(contract_id=contract.id, column_name='Новый заказ',
+                        deadline='2026-06-10', updated_at=datetime(2026, 6, 15))
+    db.add_all([on_time, late, open_card])
+    db.flush()
+    db.add_all([
+        StageExecutor(crm_card_id=on_time.id, stage_name='s1', completed=True,
+                      deadline='2026-05-20', completed_date=datetime(2026, 5, 19)),
+        StageExecutor(crm_card_id=on_time.id, stage_name='s2', completed=True,
+                      deadline='bad', completed_date=datetime(2026, 5, 19)),
+        StageExecutor(crm_card_id=late.id, stage_name='s3', completed=False,
+                      deadline='2026-05-20', completed_date=datetime(2026, 5, 25)),
+    ])
+    db.commit()
+
+    fact = cube.compute_facts(db.connection(), [contract.id, 999])
+    assert list(fact) == [contract.id]
+    fact = fact[contract.id]
+    assert (fact['date_key'], fact['year'], fact['quarter'], fact['month']) == (20260515, 2026, 2, 5)
+    assert fact['client_kind'] == 'individual'
+    assert (fact['crm_completed'], fact['crm_on_time'], fact['crm_overdue']) == (2, 1, 1)
+    assert fact['crm_deviation_days'] == -2 + 5
+    assert (fact['stages_completed'], fact['stages_on_time'], fact['stages_overdue']) == (2, 1, 0)
+
+    assert cube.parse_contract_date('2026-13-01') is None
+    assert cube.parse_contract_date(None) is None
+
+
+@pytest.mark.backend
+def test_summary_and_clients_dynamics(db):
+    _seed(db)
+    cube.rebuild(db.connection())
+
+    result = cube.summary(db, year=2026)
+    assert result['total_contracts'] == 3
+    assert result['total_amount'] == 900.0
+    assert (result['total_clients'], result['new_clients'], result['returning_clients']) == (2, 1, 2)
+    # 2025: один клиент, один договор на 50
+    assert result['trend_clients'] == 100.0
+    assert result['trend_amount'] == 1700.0
+    assert [(a['agent_name'], a['contracts'], a['amount']) for a in result['by_agent']] == [
+        ('ПЕТРОВИЧ', 1, 200.0), ('ФЕСТИВАЛЬ', 2, 700.0)]
+
+    # Договор без разобранной даты учитывается без фильтра периода
+    assert cube.summary(db)['total_contracts'] == 5
+    assert cube.summary(db, year=2026, month=3, city='МСК')['total_amount'] == 300.0
+
+    quarters = cube.clients_dynamics(db, 2026, 'quarter')
+    assert [q['period'] for q in quarters] == ['2026-Q1', '2026-Q2', '2026-Q3', '2026-Q4']
+    assert quarters[0] == {'period': '2026-Q1', 'new_clients': 1, 'returning_clients': 2,
+                           'individual': 1, 'legal': 1, 'total': 2}
+    assert quarters[2]['total'] == 1 and quarters[2]['new_clients'] == 0
+    assert quarters[1]['total'] == 0
+
+
+@pytest.mark.backend
+def test_flush_keeps_cube_equal_to_rebuild(engine):
+    factory = sessionmaker(bind=engine)
+    cube.install(factory)
+    cube.install(factory)  # повторная подписка не дублирует обработчики
+    db = factory()
+    try:
+        first, second = _seed(db)
+        contracts = db.query(Contract).order_by(Contract.id).all()
+
+        # Дата договора, новая выполненная карточка, исполнитель стадии, вид клиента
+        contracts[1].contract_date = '01.12.2026'
+        card = CRMCard(contract_id=contracts[2].id, column_name='Выполненный проект',
+                       deadline='2026-04-01', updated_at=datetime(2026, 4, 3))
+        db.add(card)
+        db.commit()
+        db.add(StageExecutor(crm_card_id=card.id, stage_name='s1', completed=True,
+                             deadline='2026-04-01', completed_date=datetime(2026, 3, 30)))
+        first.client_type = 'Юридическое лицо'
+        db.delete(contracts[3])
+        db.commit()
+
+        with engine.connect() as conn:
+            incremental = _facts(conn)
+            cube.rebuild(conn)
+            assert _facts(conn) == incremental
+        assert contracts[3].id not in incremental
+        assert incremental[contracts[1].id]['month'] == 12
+        assert incremental[contracts[1].id]['client_kind'] == 'legal'
+        assert incremental[contracts[2].id]['crm_overdue'] == 1
+        assert incremental[contracts[2].id]['stages_on_time'] == 1
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_bulk_updates_keep_cube_equal_to_rebuild(engine):
+    factory = sessionmaker(bind=engine)
+    cube.install(factory)
+    db = factory()
+    try:
+        first, second = _seed(db)
+        contracts = db.query(Contract).order_by(Contract.id).all()
+        ids = [c.id for c in contracts]
+        card = CRMCard(contract_id=contracts[2].id, column_name='Выполненный проект',
+                       deadline='2026-04-01', updated_at=datetime(2026, 4, 3))
+        db.add(card)
+        db.flush()
+        db.add(StageExecutor(crm_card_id=card.id, stage_name='s1', completed=True,
+                             deadline='2026-04-01', completed_date=datetime(2026, 3, 30)))
+        db.commit()
+
+        db.query(StageExecutor).filter(StageExecutor.crm_card_id == card.id).update(
+            {'completed_date': datetime(2026, 4, 5)}, synchronize_session=False)
+        db.query(CRMCard).filter(CRMCard.id == card.id).update(
+            {'contract_id': ids[1]}, synchronize_session=False)
+        db.query(Client).filter(Client.id == first.id).update(
+            {'client_type': 'Юридическое лицо'}, synchronize_session=False)
+        db.execute(update(Contract), [{'id': ids[0], 'total_amount': 75.0}])
+        db.query(Contract).filter(Contract.id == ids[3]).delete(synchronize_session=False)
+        db.commit()
+
+        with engine.connect() as conn:
+            incremental = _facts(conn)
+            cube.rebuild(conn)
+            assert _facts(conn) == incremental
+        assert ids[3] not in incremental
+        assert incremental[ids[0]]['amount'] == 75.0
+        assert incremental[ids[0]]['client_kind'] == 'legal'
+        assert incremental[ids[1]]['stages_overdue'] == 1
+        assert incremental[ids[2]]['crm_completed'] == 0
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_distribution_and_ensure_cube(db):
+    _seed(db)
+    conn = db.connection()
+    assert cube.ensure_cube(conn) is True
+    assert cube.ensure_cube(conn) is False
+
+    cities = cube.distribution(db, 'city')
+    assert [(c['name'], c['count'], c['amount']) for c in cities] == [
+        ('МСК', 3, 1700.0), ('СПБ', 2, 250.0)]
+    agents = cube.distribution(db, 'agent', year=2026)
+    assert [(a['name'], a['count']) for a in agents] == [('ФЕСТИВАЛЬ', 2), ('ПЕТРОВИЧ', 1)]
+    assert cube.distribution(db, 'subtype', year=2025) == [
+        {'name': 'Не указан', 'count': 1, 'amount': 50.0, 'area': 10.0}]
+    assert cube.distribution(db, 'unknown') == [
+        {'name': 'Неизвестно', 'count': 5, 'amount': 1950.0, 'area': 70.0}]
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс сроков due_items (server/services/deadline_evaluator.py):
+- сверка с дедлайнами карточек, исполнителей и стадий согласования
+- уведомления 'deadline' ровно один раз на порог, перенос срока сбрасывает пороги
+- закрытие выполненных, архивных и удалённых сроков
+"""
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import server_modules  # noqa: E402
+
+with server_modules('services', 'services.business_calendar') as _modules:
+    server_db = _modules['database']
+    from server.services import deadline_evaluator as de
+sys.modules.pop('server.services.deadline_evaluator', None)
+
+DueItem = server_db.DueItem
+Contract = server_db.Contract
+CRMCard = server_db.CRMCard
+StageExecutor = server_db.StageExecutor
+ApprovalStageDeadline = server_db.ApprovalStageDeadline
+
+# Пн 6 июля 2026 — неделя без праздников
+TODAY = date(2026, 7, 6)
+
+
+class _Dispatch:
+    """Подмена dispatch_notification: запоминает уведомления и коммитит"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, db, employee_id, event_type, title, message, **kwargs):
+        self.sent.append((employee_id, event_type, title, message, kwargs.get('related_entity_id')))
+        db.commit()
+
+
+def _card(db, deadline, number='Д-1', status='Новый заказ', column='Стадия 1', manager=10):
+    contract = Contract(client_id=1, project_type='Индивидуальный', contract_number=number,
+                        status=status)
+    db.add(contract)
+    db.flush()
+    card = CRMCard(contract_id=contract.id, column_name=column, deadline=deadline,
+                   senior_manager_id=manager)
+    db.add(card)
+    db.commit()
+    return card
+
+
+def _items(db):
+    return {(i.source_type, i.source_id): i for i in db.query(DueItem)}
+
+
+def _notify(db, dispatch):
+    return asyncio.run(de.notify_due_items(db, dispatch=dispatch))
+
+
+@pytest.mark.backend
+def test_working_days_left_and_thresholds():
+    assert de.working_days_left(TODAY, date(2026, 7, 9)) == 3
+    assert de.working_days_left(TODAY, TODAY) == 0
+    # Срок в воскресенье, сегодня понедельник — всё равно просрочен
+    assert de.working_days_left(TODAY, date(2026, 7, 5)) == -1
+    assert de.working_days_left(TODAY, date(2026, 6, 29)) == -5
+    assert [de.threshold_for(d) for d in (5, 3, 2, 1, 0, -4)] == [None, 3, 3, 1, 0, -1]
+
+
+@pytest.mark.backend
+def test_refresh_indexes_all_sources(db):
+    card = _card(db, '2026-07-09')
+    db.add_all([
+        StageExecutor(crm_card_id=card.id, stage_name='Планировка', executor_id=21, deadline='2026-07-07'),
+        StageExecutor(crm_card_id=card.id, stage_name='Визуализация', executor_id=22,
+                      deadline='2026-07-01', completed=True),
+        StageExecutor(crm_card_id=card.id, stage_name='Без срока', executor_id=23, deadline=''),
+        ApprovalStageDeadline(crm_card_id=card.id, stage_name='Концепция', deadline='2026-07-03'),
+    ])
+    db.commit()
+
+    stats = de.refresh_due_items(db, TODAY)
+
+    items = _items(db)
+    assert stats['created'] == 3
+    assert {key[0] for key in items} == {'crm_card', 'stage_executor', 'approval_stage'}
+    card_item = items[('crm_card', card.id)]
+    assert (card_item.days_left, card_item.employee_id, card_item.title) == (3, 10, 'Договор Д-1')
+    executor = next(i for k, i in items.items() if k[0] == 'stage_executor')
+    assert (executor.employee_id, executor.days_left) == (21, 1)
+    approval = next(i for k, i in items.items() if k[0] == 'approval_stage')
+    assert approval.days_left == -1 and approval.employee_id == 10
+
+    # Повторная сверка без изменений ничего не пишет
+    assert de.refresh_due_items(db, TODAY) == {'created': 0, 'updated': 0, 'closed': 0}
+
+
+@pytest.mark.backend
+def test_notifications_once_per_threshold(db):
+    card = _card(db, '2026-07-09')
+    dispatch = _Dispatch()
+
+    de.refresh_due_items(db, TODAY)
+    assert _notify(db, dispatch) == 1
+    assert dispatch.sent[0][:3] == (10, 'deadline', 'Приближается срок')
+    # Тот же порог — повторно не уведомляем
+    de.refresh_due_items(db, TODAY)
+    assert _notify(db, dispatch) == 0
+
+    # Через два рабочих дня — порог 1, затем просрочка
+    de.refresh_due_items(db, date(2026, 7, 8))
+    assert _notify(db, dispatch) == 1
+    de.refresh_due_items(db, date(2026, 7, 13))
+    assert _notify(db, dispatch) == 1
+    assert dispatch.sent[-1][2] == 'Срок просрочен'
+    assert _notify(db, dispatch) == 0
+
+    # Перенос срока — пороги заново
+    card.deadline = '2026-07-15'
+    db.commit()
+    de.refresh_due_items(db, date(2026, 7, 13))
+    assert _items(db)[('crm_card', card.id)].notified_threshold is None
+    assert _notify(db, dispatch) == 1
+    assert len(dispatch.sent) == 4
+
+
+@pytest.mark.backend
+def test_first_seen_overdue_sends_single_notification(db):
+    _card(db, '2026-06-01')
+    dispatch = _Dispatch()
+    de.refresh_due_items(db, TODAY)
+    assert _notify(db, dispatch) == 1
+    assert dispatch.sent[0][2] == 'Срок просрочен'
+
+
+@pytest.mark.backend
+def test_failed_dispatch_is_retried(db):
+    _card(db, '2026-07-07')
+    de.refresh_due_items(db, TODAY)
+
+    async def failing(db, *args, **kwargs):
+        db.rollback()
+
+    assert _notify(db, failing) == 1
+    assert db.query(DueItem).one().notified_threshold is None
+    dispatch = _Dispatch()
+    assert _notify(db, dispatch) == 1
+
+
+@pytest.mark.backend
+def test_closed_paused_and_removed_items(db):
+    done = _card(db, '2026-07-07', number='Д-1')
+    paused = _card(db, '2026-07-07', number='Д-2', column='В ожидании')
+    archived = _card(db, '2026-07-07', number='Д-3')
+    de.refresh_due_items(db, TODAY)
+    assert _items(db)[('crm_card', paused.id)].status == 'paused'
+
+    done.column_name = 'Выполненный проект'
+    archived.contract.status = 'СДАН'
+    paused.deadline = None
+    db.commit()
+    stats = de.refresh_due_items(db, TODAY)
+
+    assert stats['closed'] == 1 and stats['updated'] == 2
+    assert {i.status for i in db.query(DueItem)} == {'closed'}
+    dispatch = _Dispatch()
+    assert _notify(db, dispatch) == 0
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Пул SMTP-соединений EmailService (server/email_service.py) против локального
+SMTP-сервера aiosmtpd: переиспользование сессии, переподключение после
+разрыва, пакетная отправка и её пропускная способность (писем/с).
+"""
+import asyncio
+import socket
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+aiosmtplib = pytest.importorskip("aiosmtplib")
+from aiosmtpd.smtp import AuthResult  # noqa: E402
+
+from server.email_service import EmailService  # noqa: E402
+
+N_MESSAGES = 40
+
+
+class _Recorder:
+    """Обработчик aiosmtpd: запоминает письма и SMTP-сессии, в которых они пришли"""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('blocked'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope.rcpt_tos[0])
+        self.sessions.add(session.peer)  # (host, port) клиента — своё на соединение
+        return '250 OK'
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    recorder = _Recorder()
+    controller = aiosmtpd_controller.Controller(
+        recorder, hostname='127.0.0.1', port=_free_port(),
+        authenticator=lambda *args: AuthResult(success=True),
+        auth_require_tls=False,
+    )
+    controller.start()
+    yield controller, recorder
+    controller.stop()
+
+
+@pytest.fixture
+def email_svc(smtp_server):
+    controller, _ = smtp_server
+    svc = EmailService()
+    svc.configure({
+        'smtp_host': controller.hostname,
+        'smtp_port': str(controller.port),
+        'smtp_username': 'crm@example.com',
+        'smtp_password': 'secret',
+        'smtp_use_tls': 'false',
+    })
+    return svc
+
+
+def _batch(n):
+    return [(f'user{i}@example.com', f'Приглашение {i}', f'<p>{i}</p>') for i in range(n)]
+
+
+@pytest.mark.backend
+def test_messages_reuse_one_session(email_svc, smtp_server):
+    _, recorder = smtp_server
+
+    async def run():
+        for to, subject, body in _batch(5):
+            assert await email_svc._send_email(to, subject, body)
+        await email_svc.close()
+
+    asyncio.run(run())
+
+    assert len(recorder.messages) == 5
+    assert len(recorder.sessions) == 1
+    assert email_svc._pool.connections_opened == 1
+
+
+@pytest.mark.backend
+def test_reconnects_after_server_drops_connection(email_svc, smtp_server):
+    _, recorder = smtp_server
+
+    async def run():
+        await email_svc._send_email('a@example.com', 'A', '<p>A</p>')
+        # Сервер закрыл простаивающее соединение
+        email_svc._pool._idle[0].smtp.close()
+        await email_svc._send_email('b@example.com', 'B', '<p>B</p>')
+
+    asyncio.run(run())
+
+    assert recorder.messages == ['a@example.com', 'b@example.com']
+    assert email_svc._pool.connections_opened == 2
+
+
+@pytest.mark.backend
+def test_bulk_reports_per_message_results(email_svc, smtp_server):
+    _, recorder = smtp_server
+    batch = _batch(3)
+    batch[1] = ('blocked@example.com', 'X', '<p>X</p>')
+    throttled = []
+
+    async def throttle():
+        throttled.append(1)
+
+    results = asyncio.run(email_svc.send_bulk(batch, throttle=throttle))
+
+    assert results == [True, False, True]
+    assert recorder.messages == ['user0@example.com', 'user2@example.com']
+    assert len(throttled) == 3
+
+
+@pytest.mark.backend
+def test_bulk_throughput_vs_connection_per_message(email_svc, smtp_server):
+    controller, recorder = smtp_server
+    batch = _batch(N_MESSAGES)
+
+    async def per_message():
+        # Прежнее поведение: aiosmtplib.send() — новое соединение и AUTH на каждое письмо
+        for to, subject, body in batch:
+            await aiosmtplib.send(
+                email_svc._build_message(to, subject, body),
+                hostname=controller.hostname, port=controller.port,
+                username='crm@example.com', password='secret', start_tls=False)
+
+    started = time.perf_counter()
+    asyncio.run(per_message())
+    per_message_rate = N_MESSAGES / (time.perf_counter() - started)
+    sessions_before = len(recorder.sessions)
+
+    started = time.perf_counter()
+    results = asyncio.run(email_svc.send_bulk(batch))
+    bulk_rate = N_MESSAGES / (time.perf_counter() - started)
+
+    print(f"\nSMTP: {per_message_rate:.0f} писем/с по соединению на письмо, "
+          f"{bulk_rate:.0f} писем/с пакетом через пул")
+    assert all(results)
+    assert len(recorder.messages) == 2 * N_MESSAGES
+    assert sessions_before == N_MESSAGES
+    assert len(recorder.sessions) == N_MESSAGES + 1
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковый экспорт таблиц сроков (server/services/export_service.py):
+- XLSX в режиме write_only с именованными стилями
+- итоги надзора с/без комиссии
+- ZIP-архив на лету из нескольких файлов
+- PDF-рендер во временный файл
+"""
+import asyncio
+import importlib.util
+import io
+import sys
+import zipfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from openpyxl import load_workbook
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from server.services import export_service as es
+
+
+CONTRACT = SimpleNamespace(id=1, contract_number='Д-7', address='ул. Ленина, 1', area=85,
+                           project_type='Индивидуальный', project_subtype=None, agent_type=None,
+                           city='СПБ', contract_term=None, contract_date='2026-03-02')
+
+
+def _timeline_rows():
+    return [
+        {'stage_code': 'START', 'stage_name': 'Старт', 'stage_group': 'START', 'substage_group': None,
+         'actual_date': None, 'actual_days': 0, 'norm_days': 0, 'status': '',
+         'executor_role': 'header', 'is_in_contract_scope': True},
+        {'stage_code': 'S1', 'stage_name': 'Замер', 'stage_group': 'START', 'substage_group': None,
+         'actual_date': '2026-03-04', 'actual_days': 2, 'norm_days': 2, 'status': 'Выполнено',
+         'executor_role': 'Замерщик', 'is_in_contract_scope': True},
+        {'stage_code': 'S2', 'stage_name': 'Планировка', 'stage_group': 'START', 'substage_group': None,
+         'actual_date': '2026-03-12', 'actual_days': 6, 'norm_days': 3, 'status': 'Выполнено',
+         'executor_role': 'Чертёжник', 'is_in_contract_scope': True},
+    ]
+
+
+def _supervision_rows():
+    return [
+        {'stage_name': f'Стадия {i}', 'plan_date': '2026-04-01', 'actual_date': None,
+         'actual_days': i, 'executor': 'ДАН', 'budget_planned': 1000 * i, 'budget_actual': 900 * i,
+         'budget_savings': 100 * i, 'supplier': 'Поставщик', 'commission': 50 * i,
+         'status': status, 'notes': ''}
+        for i, status in enumerate(['В работе', 'Доставлено', 'Не начато'], 1)
+    ]
+
+
+def _rows(out):
+    out.seek(0)
+    wb = load_workbook(out)
+    return wb, wb.active
+
+
+@pytest.mark.backend
+def test_timeline_xlsx_named_styles():
+    out = io.BytesIO()
+    es.render_timeline_xlsx(out, CONTRACT, _timeline_rows())
+
+    wb, ws = _rows(out)
+    assert {'tl_header', 'tl_stage', 'tl_overdue'} <= set(wb.named_styles)
+    assert not any(name.startswith('sv_') for name in wb.named_styles)
+    assert ws['B1'].value == 'ул. Ленина, 1'
+    assert [c.value for c in ws[5]] == ["Действия по этапам", "Дата", "Кол-во дней", "Норма дней",
+                                        "Статус", "Исполнитель"]
+    assert ws['A5'].style == 'tl_header'
+    assert ws['A6'].style == 'tl_stage'
+    assert ws['A7'].style == 'tl_cell'
+    # Фактических дней больше нормы
+    assert ws['A8'].style == 'tl_overdue' and ws['C8'].value == 6
+    assert ws.column_dimensions['A'].width == 45
+
+
+@pytest.mark.backend
+@pytest.mark.parametrize('include_commission, total_cells', [
+    (True, ['ИТОГО:', 6000, 5400, 600, 300]),
+    (False, ['ИТОГО:', 6000, 5400, 600]),
+])
+def test_supervision_xlsx_totals(include_commission, total_cells):
+    out = io.BytesIO()
+    es.render_supervision_xlsx(out, CONTRACT, _supervision_rows(), include_commission)
+
+    _, ws = _rows(out)
+    headers = [c.value for c in ws[3]]
+    assert ('Комиссия' in headers) is include_commission
+    assert ws['B4'].value == '01.04.2026'
+    assert ws['A4'].style == 'sv_in_work'
+    assert ws['A5'].style == 'sv_delivered'
+    assert ws['A6'].style == 'sv_cell'
+    total = [c.value for c in ws[ws.max_row] if c.value not in (None, '')]
+    assert total == total_cells
+    assert ws.cell(row=ws.max_row, column=1).style == 'sv_total'
+
+
+@pytest.mark.backend
+def test_zip_stream_builds_archive_lazily():
+    rendered = []
+
+    def render(name):
+        def _render(out):
+            rendered.append(name)
+            es.render_timeline_xlsx(out, CONTRACT, _timeline_rows())
+        return _render
+
+    members = ((f"{es.safe_filename(f'Д/{i} адрес: {i}')}.xlsx", render(i)) for i in range(3))
+    stream = es.zip_stream(members)
+    first = next(stream)
+    # Архив отдаётся по мере рендера, а не после всех файлов
+    assert first.startswith(b'PK') and rendered == [0]
+    data = first + b''.join(stream)
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ['Д_0 адрес_ 0.xlsx', 'Д_1 адрес_ 1.xlsx', 'Д_2 адрес_ 2.xlsx']
+    ws = load_workbook(io.BytesIO(archive.read('Д_2 адрес_ 2.xlsx'))).active
+    assert ws['B1'].value == 'ул. Ленина, 1'
+
+
+@pytest.mark.backend
+def test_render_response_streams_spooled_file():
+    async def _run():
+        response = await es.render_response(
+            es.render_supervision_xlsx, CONTRACT, _supervision_rows(), False,
+            media_type=es.XLSX_MEDIA_TYPE, filename='supervision_timeline_1.xlsx',
+            ru_name='Отчет надзор.xlsx')
+        chunks = [chunk async for chunk in response.body_iterator]
+        return response, b''.join(chunks)
+
+    response, body = asyncio.run(_run())
+    assert response.headers['content-length'] == str(len(body))
+    assert "filename*=UTF-8''" in response.headers['content-disposition']
+    assert "filename=supervision_timeline_1.xlsx" in response.headers['content-disposition']
+    _, ws = _rows(io.BytesIO(body))
+    assert ws['A4'].value == 'Стадия 1'
+
+
+@pytest.mark.backend
+def test_pdf_renderers_write_to_file(monkeypatch):
+    spec = importlib.util.spec_from_file_location('pdf_helper', ROOT / 'server' / 'pdf_helper.py')
+    pdf_helper = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(pdf_helper)
+    monkeypatch.setitem(sys.modules, 'pdf_helper', pdf_helper)
+
+    with es.spooled_file() as out:
+        es.render_timeline_pdf(out, CONTRACT, _timeline_rows())
+        out.seek(0)
+        assert out.read(5) == b'%PDF-'
+    out = io.BytesIO()
+    es.render_supervision_pdf(out, es.contract_snapshot(None), _supervision_rows(), True)
+    assert out.getvalue().startswith(b'%PDF-')
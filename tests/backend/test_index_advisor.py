@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Советник индексов (server/services/index_advisor.py) и набор индексов
+горячих таблиц (модели database.py + миграция g7h8i9j0k1l2):
+- разбор предикатов SQL, EXPLAIN QUERY PLAN SQLite
+- запись нагрузки и предложения составных/частичных индексов
+- индексы моделей покрывают записанную нагрузку, миграция совпадает с моделями
+"""
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules, memory_engine  # noqa: E402
+
+server_db = load_server_modules()['database']
+
+from server.services import index_advisor as ia
+
+Payment = server_db.Payment
+ActionHistory = server_db.ActionHistory
+StageExecutor = server_db.StageExecutor
+
+HOT_TABLES = ('payments', 'salaries', 'stage_executors', 'project_files', 'action_history',
+              'approval_stage_deadlines')
+
+
+def _hot_indexes():
+    return [ix for name in HOT_TABLES for ix in server_db.Base.metadata.tables[name].indexes
+            if ix.name != f'ix_{name}_id']
+
+
+@pytest.fixture
+def engine():
+    """Схема до миграции: горячие таблицы без новых индексов"""
+    engine = memory_engine(server_db.Base.metadata)
+    with engine.begin() as conn:
+        for ix in _hot_indexes():
+            ix.drop(conn)
+    yield engine
+    engine.dispose()
+
+
+def _record(engine, tmp_path):
+    """Нагрузка экранов платежей и карточки CRM"""
+    path = tmp_path / 'workload.jsonl'
+    recorder = ia.record_workload(engine, str(path))
+    session = sessionmaker(bind=engine)()
+    try:
+        for contract_id in (1, 2, 3):
+            session.query(Payment).filter(Payment.contract_id == contract_id).all()
+            session.query(Payment).filter(Payment.contract_id == contract_id,
+                                          Payment.supervision_card_id.is_(None)).all()
+        session.query(Payment).filter(Payment.employee_id == 5,
+                                      Payment.report_month.like('2026-03%')).all()
+        session.query(Payment).filter(
+            Payment.role == 'ДАН', Payment.stage_name == 'Стадия 1',
+            Payment.supervision_card_id.isnot(None), Payment.final_amount == 0,
+        ).all()
+        session.query(ActionHistory).filter(
+            ActionHistory.entity_type == 'crm_card', ActionHistory.entity_id == 7,
+        ).order_by(ActionHistory.action_date.desc()).all()
+        session.query(StageExecutor).filter(StageExecutor.crm_card_id == 7).all()
+        session.add(ActionHistory(user_id=1, action_type='x', entity_type='crm_card', entity_id=7))
+        session.commit()
+    finally:
+        session.close()
+        recorder.close()
+    return ia.load_workload(str(path))
+
+
+@pytest.mark.backend
+def test_parse_predicates_with_alias_join_and_order():
+    sql = ('SELECT p.id FROM payments AS p JOIN crm_cards ON p.crm_card_id = crm_cards.id '
+           'WHERE p.employee_id = ? AND p.report_month LIKE ? AND p.supervision_card_id IS NOT NULL '
+           'AND crm_cards.column_name IN (?, ?) ORDER BY p.created_at DESC LIMIT ? OFFSET ?')
+    predicates = ia.parse_predicates(sql)
+
+    assert predicates['payments'] == {
+        'eq': ['crm_card_id', 'employee_id'], 'range': ['report_month'],
+        'null': [('supervision_card_id', 'IS NOT NULL')], 'order': ['created_at'],
+    }
+    assert predicates['crm_cards']['eq'] == ['id', 'column_name']
+
+    proposal = ia.propose_for_table(predicates['payments'])
+    assert proposal.columns == ('crm_card_id', 'employee_id', 'report_month')
+    assert proposal.where == 'supervision_card_id IS NOT NULL'
+
+
+@pytest.mark.backend
+def test_recorder_skips_inserts_and_keeps_params(engine, tmp_path):
+    workload = _record(engine, tmp_path)
+
+    assert len(workload) == 10
+    assert not any(item['sql'].lstrip().upper().startswith('INSERT') for item in workload)
+    assert workload[0]['params'] == [1]
+    assert all(item['ms'] >= 0 for item in workload)
+
+
+@pytest.mark.backend
+def test_advise_proposes_composite_and_partial_indexes(engine, tmp_path):
+    workload = _record(engine, tmp_path)
+    with engine.connect() as conn:
+        proposals = {p.key: p for p in ia.advise(conn, workload)}
+
+    # Частичный (contract_id) WHERE ... IS NULL поглощён полным (contract_id)
+    assert proposals[('payments', ('contract_id',), None)].hits == 6
+    assert ('payments', ('employee_id', 'report_month'), None) in proposals
+    zero = proposals[('payments', ('role', 'stage_name', 'final_amount'), 'supervision_card_id IS NOT NULL')]
+    assert zero.name == 'ix_payments_role_stage_name_final_amount_partial'
+    assert "sqlite_where=sa.text('supervision_card_id IS NOT NULL')" in zero.to_alembic()
+    assert ('action_history', ('entity_type', 'entity_id', 'action_date'), None) in proposals
+    assert ('stage_executors', ('crm_card_id',), None) in proposals
+    assert len(proposals) == 5
+
+
+@pytest.mark.backend
+def test_model_indexes_cover_workload(engine, tmp_path):
+    workload = _record(engine, tmp_path)
+    with engine.begin() as conn:
+        for ix in _hot_indexes():
+            ix.create(conn)
+    with engine.connect() as conn:
+        assert ia.advise(conn, workload) == []
+        assert ia.replay(conn, workload) >= 0
+
+
+@pytest.mark.backend
+def test_apply_proposals_creates_indexes(engine, tmp_path):
+    workload = _record(engine, tmp_path)
+    with engine.connect() as conn:
+        ia.apply_proposals(conn, ia.advise(conn, workload))
+        assert ia.advise(conn, workload) == []
+        assert ia.scanned_tables(conn, 'SELECT * FROM payments WHERE payments.contract_id = ?', [1]) == []
+
+
+@pytest.mark.backend
+def test_migration_matches_model_indexes():
+    spec = importlib.util.spec_from_file_location(
+        'hot_path_indexes', ROOT / 'server' / 'alembic' / 'versions' / 'g7h8i9j0k1l2_add_hot_path_indexes.py')
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    # Индексы последующих ревизий (i9j0k1l2m3n4, l2m3n4o5p6q7)
+    later = {'ix_action_history_date', 'ix_payments_created_at'}
+    expected = {}
+    for ix in _hot_indexes():
+        if ix.name in later:
+            continue
+        where = ix.dialect_options['sqlite'].get('where')
+        expected[ix.name] = (ix.table.name, [c.name for c in ix.columns], str(where) if where is not None else None)
+    assert {name: (table, columns, where) for name, table, columns, where in migration.INDEXES} == expected
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Аренды блокировок редактирования (server/services/lease_manager.py):
+- захват, продление своей аренды, конфликт и перехват истёкшей
+- проверка из кэша процесса без запросов к БД
+- пакетное продление и снятие (своей, чужой, всех аренд владельца)
+- события снятия для long-poll, в том числе из соседнего процесса
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.lease_manager')
+server_db = _modules['database']
+lm = _modules['services.lease_manager']
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 7, 6, 12, 0)
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def manager(clock):
+    return lm.LeaseManager(ttl=120, clock=clock)
+
+
+@pytest.mark.backend
+def test_acquire_renew_conflict_and_takeover(db, manager, clock):
+    status, lease = manager.acquire(db, 'crm_card', 7, 1, 'Иванов')
+    assert status == 'created' and lease.expires_at == clock.now + timedelta(seconds=120)
+
+    clock.now += timedelta(seconds=60)
+    status, renewed = manager.acquire(db, 'crm_card', 7, 1, 'Иванов')
+    assert status == 'renewed'
+    assert renewed.locked_at == lease.locked_at
+    assert renewed.expires_at == clock.now + timedelta(seconds=120)
+
+    with pytest.raises(lm.LeaseConflict) as conflict:
+        manager.acquire(db, 'crm_card', 7, 2, 'Петров')
+    assert conflict.value.lease.owner_name == 'Иванов'
+
+    # Истёкшую аренду забирает другой одним upsert
+    clock.now += timedelta(seconds=121)
+    status, taken = manager.acquire(db, 'crm_card', 7, 2, 'Петров')
+    assert status == 'created' and taken.owner_id == 2
+    assert db.query(server_db.EditLease).count() == 1
+
+
+@pytest.mark.backend
+def test_conflict_reads_holder_past_stale_cache(engine, clock):
+    """Соседний worker захватил запись, которую кэш этого процесса помнит свободной"""
+    factory = sessionmaker(bind=engine)
+    first, second = lm.LeaseManager(ttl=120, clock=clock), lm.LeaseManager(ttl=120, clock=clock)
+    db_first, db_second = factory(), factory()
+    try:
+        assert first.get(db_first, 'crm_card', 7) is None
+        second.acquire(db_second, 'crm_card', 7, 2, 'Петров')
+
+        inserts = []
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: inserts.append(statement)
+                     if statement.lstrip().upper().startswith('INSERT') else None)
+        with pytest.raises(lm.LeaseConflict) as conflict:
+            first.acquire(db_first, 'crm_card', 7, 1, 'Иванов')
+        assert conflict.value.lease.owner_id == 2
+        assert len(inserts) == 1
+        assert first.get(db_first, 'crm_card', 7).owner_name == 'Петров'
+    finally:
+        db_first.close()
+        db_second.close()
+
+
+@pytest.mark.backend
+def test_check_served_from_process_cache(engine, db, manager, clock):
+    manager.acquire(db, 'client', 1, 1, 'Иванов')
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    for _ in range(5):
+        lease = manager.get(db, 'client', 1)
+        assert lease.to_dict(2)['locked_by'] == 'Иванов'
+        assert manager.get(db, 'client', 2) is None
+    # Одна выборка свободной записи, аренда client/1 — из кэша
+    assert len(statements) == 1
+
+    # Аренда истекла — кэш не отдаёт её
+    clock.now += timedelta(seconds=121)
+    assert manager.get(db, 'client', 1) is None
+
+
+@pytest.mark.backend
+def test_batch_renew_and_release(db, manager, clock):
+    manager.acquire(db, 'client', 1, 1, 'Иванов')
+    clock.now += timedelta(seconds=100)
+    manager.acquire(db, 'client', 2, 1, 'Иванов')
+    manager.acquire(db, 'client', 3, 2, 'Петров')
+
+    # client/1 истекла, client/3 чужая
+    clock.now += timedelta(seconds=30)
+    renewed, lost = manager.renew(db, 1, [('client', 1), ('client', 2), ('client', 3)])
+    assert renewed == [('client', 2)]
+    assert lost == [('client', 1), ('client', 3)]
+    assert manager.renew(db, 1)[0] == [('client', 2)]
+
+    with pytest.raises(PermissionError):
+        manager.release(db, 'client', 3, 1)
+    assert manager.release(db, 'client', 3, 1, force=True) is True
+    assert manager.release(db, 'client', 3, 1) is False
+
+    manager.acquire(db, 'contract', 5, 1, 'Иванов')
+    assert manager.release_owner(db, 1) == 3
+    assert manager.get(db, 'contract', 5) is None
+
+
+@pytest.mark.backend
+def test_release_events_pushed_to_waiters(engine, db, manager, clock):
+    # Второй worker со своим журналом событий на той же таблице
+    neighbour = lm.LeaseManager(ttl=120, clock=clock)
+    other_db = sessionmaker(bind=engine)()
+    neighbour.acquire(other_db, 'crm_card', 9, 2, 'Петров')
+
+    async def scenario():
+        waiter = asyncio.create_task(manager.wait_events(None, timeout=5))
+        await asyncio.sleep(0.05)
+        manager.watch(db)                       # снимок аренд соседнего worker
+        neighbour.release(other_db, 'crm_card', 9, 2)
+        manager.watch(db)                       # снятие найдено сверкой
+        return await waiter
+
+    events, since = asyncio.run(scenario())
+    assert [(e['event'], e['entity_type'], e['entity_id'], e['owner_id']) for e in events] == [
+        ('released', 'crm_card', 9, 2)]
+    assert since == events[-1]['at']
+
+    # Собственное снятие публикуется сразу
+    manager.acquire(db, 'client', 1, 1, 'Иванов')
+    manager.release(db, 'client', 1, 1)
+    assert [e['event'] for e in manager.events_since(since)] == ['acquired', 'released']
+
+    # Истёкшие аренды чистятся наблюдателем
+    manager.acquire(db, 'client', 2, 1, 'Иванов')
+    clock.now += timedelta(seconds=121)
+    manager._last_purge = 0.0
+    manager.watch(db)
+    assert db.query(server_db.EditLease).count() == 0
+    other_db.close()
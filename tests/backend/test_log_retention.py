@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Помесячное хранение журналов (server/services/log_retention.py):
+- эмуляция секций на SQLite
+- архивирование месяцев старше срока хранения в jsonl.gz и удаление из БД
+- повторный проход и переопределение срока хранения через окружение
+"""
+import gzip
+import json
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.log_retention')
+server_db = _modules['database']
+retention = _modules['services.log_retention']
+
+TODAY = date(2026, 7, 15)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'crm.db'}")
+    server_db.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _log_activity(engine, moments):
+    table = server_db.ActivityLog.__table__
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [
+            {'employee_id': 1, 'action_type': 'update', 'entity_type': 'contract',
+             'entity_id': i, 'new_values': {'status': 'Новый'}, 'action_date': moment}
+            for i, moment in enumerate(moments)
+        ])
+
+
+def _dates(engine):
+    column = server_db.ActivityLog.__table__.c.action_date
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(column)).scalars())
+
+
+@pytest.mark.backend
+def test_month_helpers():
+    assert retention.month_floor(datetime(2026, 3, 31, 23, 59)) == date(2026, 3, 1)
+    assert retention.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert retention.add_months(date(2026, 1, 1), -13) == date(2024, 12, 1)
+    log = retention.LOG_TABLES[0]
+    assert retention.partition_name(log, date(2026, 2, 1)) == 'activity_log_p202602'
+
+
+@pytest.mark.backend
+def test_emulated_partitions_list_and_drop_month(engine):
+    _log_activity(engine, [datetime(2026, 1, 31, 23, 59), datetime(2026, 2, 1),
+                           datetime(2026, 2, 28, 12), datetime(2026, 3, 1)])
+    log = retention.LOG_TABLES[0]
+    with engine.connect() as conn:
+        backend = retention.partitions_for(conn)
+        assert isinstance(backend, retention.EmulatedPartitions)
+        retention.partition_log_tables(conn, TODAY)
+        assert backend.partitions(conn, log) == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+        backend.drop_month(conn, log, date(2026, 2, 1))
+        conn.commit()
+    assert _dates(engine) == [datetime(2026, 1, 31, 23, 59), datetime(2026, 3, 1)]
+
+
+@pytest.mark.backend
+def test_retention_archives_and_drops_old_months(engine, tmp_path, monkeypatch):
+    monkeypatch.delenv('LOG_RETENTION_ACTIVITY_LOG_MONTHS', raising=False)
+    old = [datetime(2025, 5, 3), datetime(2025, 5, 20, 8, 30), datetime(2025, 6, 30, 23)]
+    kept = [datetime(2025, 7, 1), datetime(2026, 7, 10)]
+    _log_activity(engine, old + kept)
+    archive_dir = tmp_path / 'archive'
+
+    job = retention.LogRetentionJob(engine=engine, archive_dir=str(archive_dir))
+    result = job.run_once(today=TODAY)
+
+    # Срок хранения activity_log — 12 месяцев: граница 2025-07-01
+    assert result == {'activity_log': 3, 'action_history': 0, 'messenger_message_log': 0}
+    assert _dates(engine) == kept
+
+    may = archive_dir / 'activity_log' / '2025-05.jsonl.gz'
+    with gzip.open(may, 'rt', encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [r['action_date'] for r in rows] == ['2025-05-03T00:00:00', '2025-05-20T08:30:00']
+    assert rows[0]['new_values'] == {'status': 'Новый'}
+    assert (archive_dir / 'activity_log' / '2025-06.jsonl.gz').exists()
+    assert not list(archive_dir.rglob('*.part'))
+
+    # Повторный проход ничего не трогает
+    assert job.run_once(today=TODAY)['activity_log'] == 0
+    assert _dates(engine) == kept
+
+
+@pytest.mark.backend
+def test_retention_months_from_environment(engine, tmp_path, monkeypatch):
+    monkeypatch.setenv('LOG_RETENTION_ACTIVITY_LOG_MONTHS', '1')
+    _log_activity(engine, [datetime(2026, 5, 31), datetime(2026, 6, 1), datetime(2026, 7, 1)])
+
+    with engine.connect() as conn:
+        archived = retention.apply_retention(conn, retention.LOG_TABLES[0], TODAY, str(tmp_path))
+    assert archived == 1
+    assert _dates(engine) == [datetime(2026, 6, 1), datetime(2026, 7, 1)]
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(
+            server_db.ActivityLog.__table__)).scalar() == 2
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Лента уведомлений (server/services/notification_inbox.py):
+- keyset-пагинация по (created_at, id) и курсор (server/services/keyset.py)
+- счётчик непрочитанных: создание, отметка по списку и всех, самовосстановление
+- архивация старых прочитанных уведомлений пачками
+"""
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.keyset', 'services.notification_inbox')
+server_db = _modules['database']
+keyset = _modules['services.keyset']
+inbox = _modules['services.notification_inbox']
+
+Notification = server_db.Notification
+NotificationArchive = server_db.NotificationArchive
+NotificationCounter = server_db.NotificationCounter
+
+NOW = datetime(2026, 7, 6, 12, 0)
+
+
+def _notify(db, employee_id, created_at, is_read=False, read_at=None):
+    notification = Notification(employee_id=employee_id, notification_type='assigned',
+                                title='Назначение', message='Вы назначены на стадию',
+                                is_read=is_read, read_at=read_at, created_at=created_at)
+    db.add(notification)
+    db.flush()
+    inbox.record_created(db, notification)
+    return notification
+
+
+@pytest.mark.backend
+def test_keyset_pages_cover_inbox_without_duplicates(db):
+    # Две пары с одинаковым created_at — порядок внутри пары по id
+    times = [NOW - timedelta(minutes=m) for m in (0, 1, 1, 2, 3, 3, 4)]
+    created = [_notify(db, 1, t) for t in times]
+    _notify(db, 2, NOW)
+    db.commit()
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        items, cursor = inbox.list_page(db, 1, limit=3, cursor=cursor)
+        seen += [n.id for n in items]
+        pages += 1
+        if cursor is None:
+            break
+
+    expected = [n.id for n in sorted(created, key=lambda n: (n.created_at, n.id), reverse=True)]
+    assert seen == expected
+    assert pages == 3
+
+    # Новое уведомление не сдвигает следующую страницу
+    first, cursor = inbox.list_page(db, 1, limit=3)
+    _notify(db, 1, NOW + timedelta(minutes=5))
+    db.commit()
+    second, _ = inbox.list_page(db, 1, limit=3, cursor=cursor)
+    assert [n.id for n in first + second] == expected[:6]
+
+    with pytest.raises(ValueError):
+        inbox.list_page(db, 1, cursor='не-курсор')
+
+
+@pytest.mark.backend
+def test_unread_counter_follows_reads(db):
+    items = [_notify(db, 1, NOW - timedelta(minutes=m)) for m in range(5)]
+    _notify(db, 1, NOW, is_read=True)
+    db.commit()
+    assert inbox.unread_count(db, 1) == 5
+
+    assert inbox.mark_read(db, 1, [items[0].id, items[1].id, 999]) == 2
+    # Повторная отметка не уменьшает счётчик
+    assert inbox.mark_read(db, 1, [items[0].id]) == 0
+    db.commit()
+    assert inbox.unread_count(db, 1) == 3
+    assert db.get(Notification, items[0].id).read_at is not None
+
+    # Чужие уведомления не отмечаются
+    assert inbox.mark_read(db, 2, [items[2].id]) == 0
+
+    assert inbox.mark_read(db, 1) == 3
+    db.commit()
+    assert inbox.unread_count(db, 1) == 0
+    _notify(db, 1, NOW)
+    db.commit()
+    assert inbox.unread_count(db, 1) == 1
+
+
+@pytest.mark.backend
+def test_counter_rebuilt_from_notifications(db):
+    for m in range(4):
+        _notify(db, 1, NOW - timedelta(minutes=m))
+    db.commit()
+    db.query(NotificationCounter).delete()
+    db.commit()
+
+    # Чтение без строки счётчика отвечает по COUNT(*) и ничего не пишет
+    assert inbox.unread_count(db, 1) == 4
+    assert db.get(NotificationCounter, 1) is None
+
+    # Нет строки счётчика при отметке — пересчёт по фактическим данным
+    db.query(NotificationCounter).delete()
+    inbox.mark_read(db, 1, [db.query(Notification.id).first()[0]])
+    db.commit()
+    assert db.get(NotificationCounter, 1).unread_count == 3
+
+    db.query(NotificationCounter).delete()
+    inbox.mark_read(db, 1)
+    db.commit()
+    assert db.get(NotificationCounter, 1).unread_count == 0
+
+
+@pytest.mark.backend
+def test_archive_moves_old_read_notifications(db):
+    old_read = [_notify(db, 1, NOW - timedelta(days=200), is_read=True,
+                        read_at=NOW - timedelta(days=100 + i)) for i in range(5)]
+    recent_read = _notify(db, 1, NOW - timedelta(days=200), is_read=True, read_at=NOW - timedelta(days=10))
+    old_unread = _notify(db, 1, NOW - timedelta(days=200))
+    db.commit()
+    old_ids = sorted(n.id for n in old_read)
+
+    assert inbox.archive_read(db, older_than_days=90, batch_size=2, now=NOW) == 5
+
+    remaining = {n.id for n in db.query(Notification).all()}
+    assert remaining == {recent_read.id, old_unread.id}
+    archived = db.query(NotificationArchive).order_by(NotificationArchive.id).all()
+    assert [a.id for a in archived] == old_ids
+    assert archived[0].title == 'Назначение' and archived[0].archived_at == NOW
+    assert inbox.unread_count(db, 1) == 1
+
+
+@pytest.mark.backend
+def test_cursor_roundtrip():
+    cursor = keyset.encode_cursor(NOW, 42)
+    assert '|' not in cursor
+    assert keyset.decode_cursor(cursor) == (NOW, 42)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Outbox уведомлений (server/services/notification_outbox.py):
+- token bucket и лимиты Telegram/SMTP
+- воркер: забор пачки, доставка, повтор с задержкой, failed + MessengerMessageLog
+- брошенные в processing задания забираются повторно
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import server_modules  # noqa: E402
+
+with server_modules() as _modules:
+    server_db = _modules['database']
+    from server.services import notification_outbox as outbox
+sys.modules.pop('server.services.notification_outbox', None)
+
+NotificationOutbox = server_db.NotificationOutbox
+MessengerMessageLog = server_db.MessengerMessageLog
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def handlers():
+    registry = {}
+    with patch.object(outbox, '_handlers', registry):
+        yield registry
+
+
+def _enqueue(session_factory, kind, payload, **kwargs):
+    db = session_factory()
+    try:
+        job = outbox.enqueue_notification(db, kind, payload, commit=True, **kwargs)
+        return job.id
+    finally:
+        db.close()
+
+
+def _job(session_factory, job_id):
+    db = session_factory()
+    try:
+        return db.query(NotificationOutbox).filter(NotificationOutbox.id == job_id).one()
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+class TestTokenBucket:
+
+    def test_burst_then_rate(self):
+        clock = _Clock()
+        bucket = outbox.TokenBucket(rate=2.0, capacity=2, clock=clock)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == pytest.approx(0.5)
+        clock.now = 0.5
+        assert bucket.try_acquire() == 0
+        assert not bucket.idle
+        clock.now = 10
+        assert bucket.idle
+
+    def test_group_chats_limited_harder_than_private(self):
+        limits = outbox.DeliveryLimits()
+        assert limits._chat_bucket(-100123).rate == outbox.TELEGRAM_GROUP_RATE
+        assert limits._chat_bucket(555).rate == outbox.TELEGRAM_PRIVATE_RATE
+        assert limits._chat_bucket(555) is limits._chat_bucket(555)
+
+    def test_acquire_waits_for_token(self):
+        bucket = outbox.TokenBucket(rate=50.0, capacity=1)
+
+        async def take_three():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            for _ in range(3):
+                await bucket.acquire()
+            return loop.time() - started
+
+        assert asyncio.run(take_three()) >= 2 / 50 * 0.9
+
+
+@pytest.mark.backend
+class TestNotificationWorker:
+
+    def test_delivers_pending_jobs(self, session_factory, handlers):
+        delivered = []
+
+        async def handler(payload, limits):
+            assert isinstance(limits, outbox.DeliveryLimits)
+            delivered.append(payload['n'])
+
+        handlers['test'] = handler
+        ids = [_enqueue(session_factory, 'test', {'n': i}) for i in range(3)]
+        later = _enqueue(session_factory, 'test', {'n': 99}, delay=3600)
+
+        worker = outbox.NotificationWorker(session_factory=session_factory)
+        assert asyncio.run(worker.run_once()) == 3
+
+        assert delivered == [0, 1, 2]
+        for job_id in ids:
+            job = _job(session_factory, job_id)
+            assert job.status == 'sent' and job.attempts == 1 and job.sent_at
+            assert job.locked_by is None
+        assert _job(session_factory, later).status == 'pending'
+        assert asyncio.run(worker.run_once()) == 0
+
+    def test_failure_is_retried_with_backoff(self, session_factory, handlers):
+        async def handler(payload, limits):
+            raise outbox.DeliveryError('Telegram 502')
+
+        handlers['test'] = handler
+        job_id = _enqueue(session_factory, 'test', {})
+        worker = outbox.NotificationWorker(session_factory=session_factory)
+
+        before = datetime.utcnow()
+        asyncio.run(worker.run_once())
+
+        job = _job(session_factory, job_id)
+        assert job.status == 'pending'
+        assert job.attempts == 1
+        assert job.last_error == 'Telegram 502'
+        assert job.next_attempt_at >= before + timedelta(seconds=outbox.BACKOFF_BASE * 0.8)
+        # Задержка ещё не прошла — повторно не берётся
+        assert asyncio.run(worker.run_once()) == 0
+
+    def test_exhausted_attempts_logged_as_failed(self, session_factory, handlers):
+        async def handler(payload, limits):
+            raise outbox.DeliveryError('chat not found', messenger_chat_id=7,
+                                       message_type='auto_project_start', message_text='Привет')
+
+        handlers['test'] = handler
+        job_id = _enqueue(session_factory, 'test', {}, max_attempts=2)
+        worker = outbox.NotificationWorker(session_factory=session_factory)
+
+        with patch.object(outbox, 'backoff_delay', return_value=-1):
+            asyncio.run(worker.run_once())
+            asyncio.run(worker.run_once())
+
+        assert _job(session_factory, job_id).status == 'failed'
+        db = session_factory()
+        logs = db.query(MessengerMessageLog).all()
+        db.close()
+        assert [(l.messenger_chat_id, l.message_type, l.delivery_status) for l in logs] == \
+            [(7, 'auto_project_start', 'failed')]
+
+    def test_unknown_kind_fails_without_crash(self, session_factory, handlers):
+        job_id = _enqueue(session_factory, 'nope', {}, max_attempts=1)
+        worker = outbox.NotificationWorker(session_factory=session_factory)
+        asyncio.run(worker.run_once())
+        assert _job(session_factory, job_id).status == 'failed'
+
+    def test_abandoned_processing_job_is_reclaimed(self, session_factory, handlers):
+        delivered = []
+
+        async def handler(payload, limits):
+            delivered.append(payload)
+
+        handlers['test'] = handler
+        job_id = _enqueue(session_factory, 'test', {'n': 1})
+        db = session_factory()
+        job = db.query(NotificationOutbox).filter(NotificationOutbox.id == job_id).one()
+        job.status = 'processing'
+        job.attempts = 1
+        job.locked_by = 'dead-worker'
+        job.locked_at = datetime.utcnow() - timedelta(seconds=outbox.LEASE_SECONDS + 5)
+        db.commit()
+        db.close()
+
+        worker = outbox.NotificationWorker(session_factory=session_factory)
+        asyncio.run(worker.run_once())
+
+        assert delivered == [{'n': 1}]
+        job = _job(session_factory, job_id)
+        assert job.status == 'sent' and job.attempts == 2
+
+    def test_enqueue_without_commit_joins_caller_transaction(self, session_factory):
+        db = session_factory()
+        outbox.enqueue_notification(db, 'test', {'n': 1})
+        db.rollback()
+        assert db.query(NotificationOutbox).count() == 0
+        db.close()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+Лента выплат (server/services/payment_ledger.py):
+- разбор отчётного месяца в год и номер месяца
+- сверка с прежней реализацией payments_router (GET /, /summary, /by-type)
+  на случайно заполненной БД: JSON ответов совпадает для сочетаний фильтров
+- инкрементальное обновление (flush, массовые UPDATE/DELETE) совпадает
+  с полной пересборкой
+- потоковая выгрузка совпадает со списком
+"""
+import itertools
+import json
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import extract, or_, select, update
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.statistics_queries', 'services.payment_ledger')
+server_db = _modules['database']
+ledger = _modules['services.payment_ledger']
+
+Employee = server_db.Employee
+Client = server_db.Client
+Contract = server_db.Contract
+CRMCard = server_db.CRMCard
+SupervisionCard = server_db.SupervisionCard
+Payment = server_db.Payment
+Salary = server_db.Salary
+L = server_db.PaymentLedgerEntry
+
+PROJECT_TYPES = ['Индивидуальный', 'Шаблонный', 'Авторский надзор']
+REPORT_MONTHS = ['2026-03', '2026-11', '2025-03', '2026', 'март', '', None]
+
+
+def _moment(rnd):
+    return datetime(rnd.choice([2025, 2026]), rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23))
+
+
+def _seed(db, rnd, contracts=40):
+    """Суммы и площади кратны 0.5 — суммы в Python и SQL совпадают точно"""
+    staff = []
+    for i in range(4):
+        employee = Employee(full_name=f'Сотрудник {i}', phone=str(i), login=f'user{i}', password_hash='x',
+                            position=rnd.choice(['Дизайнер', 'Чертёжник']), department='Проектный')
+        db.add(employee)
+        staff.append(employee)
+    client = Client(client_type='Физическое лицо', phone='1')
+    db.add(client)
+    db.flush()
+
+    rows = []
+    for i in range(contracts):
+        contract = Contract(
+            client_id=client.id, contract_number=f'N{i}', project_type=rnd.choice(PROJECT_TYPES),
+            agent_type=rnd.choice(['ПЕТРОВИЧ', None]), city=rnd.choice(['СПБ', 'МСК', None]),
+            address=rnd.choice(['Невский 1', None]), area=rnd.choice([None, rnd.randint(20, 400) / 2]),
+        )
+        db.add(contract)
+        db.flush()
+        card = CRMCard(contract_id=contract.id, column_name=rnd.choice(['Новый заказ', 'Стадия 1']))
+        supervision = SupervisionCard(contract_id=contract.id, column_name=rnd.choice(['Новый заказ', 'Стадия 2']))
+        db.add_all([card, supervision])
+        db.flush()
+        rows.append((contract, card, supervision))
+
+    for _ in range(contracts * 3):
+        contract, card, supervision = rnd.choice(rows)
+        link = rnd.choice(['crm', 'supervision', 'contract'])
+        db.add(Payment(
+            # Договор платежа может отличаться от договора карточки
+            contract_id=rnd.choice(rows)[0].id if rnd.random() < 0.2 else contract.id,
+            crm_card_id=card.id if link == 'crm' else None,
+            supervision_card_id=supervision.id if link == 'supervision' else None,
+            employee_id=rnd.choice([None, *[e.id for e in staff]]),
+            employee_name=rnd.choice([None, None, 'Бывший сотрудник']),
+            role=rnd.choice(['Дизайнер', 'Замерщик', 'ДАН']), stage_name=rnd.choice([None, 'Стадия 1']),
+            calculated_amount=rnd.randint(0, 100) * 250.0, final_amount=rnd.randint(0, 100) * 250.0,
+            payment_type=rnd.choice(['Аванс', 'Доплата', 'Полная оплата', None]),
+            report_month=rnd.choice(REPORT_MONTHS),
+            payment_status=rnd.choice([None, 'paid', 'pending']),
+            is_paid=rnd.choice([True, False, None]),
+            reassigned=rnd.random() < 0.2, old_employee_id=rnd.choice([None, staff[0].id]),
+            created_at=_moment(rnd),
+        ))
+    for _ in range(contracts):
+        contract = rnd.choice(rows)[0]
+        db.add(Salary(
+            contract_id=rnd.choice([None, contract.id]), employee_id=rnd.choice([e.id for e in staff]),
+            employee_name=rnd.choice([None, 'Оклад сотрудника']),
+            payment_type=rnd.choice(['Оклад', 'Менеджер']), stage_name=rnd.choice([None, 'Стадия 1']),
+            amount=rnd.randint(1, 50) * 1000.0, report_month=rnd.choice(['2026-03', '2025-11', '2026', '']),
+            project_type=rnd.choice([None, *PROJECT_TYPES]),
+            payment_status=rnd.choice([None, 'paid', 'pending']), comments=rnd.choice([None, 'премия']),
+            created_at=_moment(rnd),
+        ))
+    db.commit()
+    return staff, rows
+
+
+# =============================================================================
+# Прежняя реализация payments_router (догрузка связей и сборка в Python)
+# =============================================================================
+
+def _contract_of_payment(db, p):
+    if p.crm_card_id:
+        card = db.get(CRMCard, p.crm_card_id)
+        return db.get(Contract, card.contract_id) if card else None
+    if p.supervision_card_id:
+        card = db.get(SupervisionCard, p.supervision_card_id)
+        return db.get(Contract, card.contract_id) if card else None
+    return db.get(Contract, p.contract_id) if p.contract_id else None
+
+
+def _name(db, row):
+    employee = db.get(Employee, row.employee_id) if row.employee_id else None
+    return row.employee_name or (employee.full_name if employee else 'Неизвестный'), \
+        employee.position if employee else ''
+
+
+def _contract_fields(contract):
+    return {
+        'agent_type': contract.agent_type if contract else None,
+        'address': contract.address if contract else None,
+        'contract_number': contract.contract_number if contract else None,
+        'area': float(contract.area) if contract and contract.area else None,
+        'city': contract.city if contract else None,
+    }
+
+
+def old_listing(db, year=None, payment_type=None, month=None, include_null_month=False,
+                contract_id=None, employee_id=None, is_paid=None):
+    result = []
+    query = db.query(Payment)
+    if year:
+        if include_null_month:
+            query = query.filter(or_(Payment.report_month.like(f'{year}%'), Payment.report_month.is_(None),
+                                     Payment.report_month == ''))
+        else:
+            query = query.filter(Payment.report_month.like(f'{year}%'))
+    if month:
+        query = query.filter(Payment.report_month.like(f'{year}-{month:02d}%' if year else f'%-{month:02d}%'))
+    if payment_type and payment_type != 'Оклад':
+        query = query.filter(Payment.payment_type == payment_type)
+    if contract_id is not None:
+        query = query.filter(Payment.contract_id == contract_id)
+    if employee_id is not None:
+        query = query.filter(Payment.employee_id == employee_id)
+    if is_paid is not None:
+        query = query.filter(Payment.is_paid == is_paid)
+    for p in query.all():
+        contract = _contract_of_payment(db, p)
+        name, position = _name(db, p)
+        result.append({
+            'id': p.id, 'contract_id': p.contract_id, 'crm_card_id': p.crm_card_id,
+            'supervision_card_id': p.supervision_card_id, 'employee_id': p.employee_id,
+            'employee_name': name, 'position': position, 'role': p.role, 'stage_name': p.stage_name,
+            'calculated_amount': float(p.calculated_amount) if p.calculated_amount else 0,
+            'final_amount': float(p.final_amount) if p.final_amount else 0,
+            'amount': float(p.final_amount) if p.final_amount else 0,
+            'payment_type': p.payment_type, 'payment_subtype': p.payment_type,
+            'source': 'CRM' if p.crm_card_id or not p.supervision_card_id else 'CRM Надзор',
+            'report_month': p.report_month, 'payment_status': p.payment_status or 'pending',
+            'is_paid': p.is_paid, 'created_at': p.created_at.isoformat() if p.created_at else None,
+            'project_type': 'Авторский надзор' if p.supervision_card_id else (
+                contract.project_type if contract else None),
+            'reassigned': p.reassigned, **_contract_fields(contract),
+        })
+
+    if not payment_type or payment_type == 'Оклад':
+        query = db.query(Salary)
+        if year:
+            if include_null_month:
+                query = query.filter(or_(Salary.report_month.like(f'{year}%'), Salary.report_month.is_(None)))
+            else:
+                query = query.filter(Salary.report_month.like(f'{year}%'))
+        if month:
+            query = query.filter(Salary.report_month.like(f'{year}-{month:02d}%' if year else f'%-{month:02d}%'))
+        if employee_id is not None:
+            query = query.filter(Salary.employee_id == employee_id)
+        if contract_id is not None:
+            query = query.filter(Salary.contract_id == contract_id)
+        if is_paid is not None:
+            query = query.filter(Salary.payment_status == 'paid' if is_paid else Salary.payment_status != 'paid')
+        for s in query.all():
+            contract = db.get(Contract, s.contract_id) if s.contract_id else None
+            name, position = _name(db, s)
+            result.append({
+                'id': s.id, 'contract_id': s.contract_id, 'crm_card_id': None, 'supervision_card_id': None,
+                'employee_id': s.employee_id, 'employee_name': name, 'position': position,
+                'role': s.payment_type, 'stage_name': s.stage_name,
+                'calculated_amount': float(s.amount) if s.amount else 0,
+                'final_amount': float(s.amount) if s.amount else 0,
+                'amount': float(s.amount) if s.amount else 0,
+                'payment_type': s.payment_type, 'payment_subtype': 'Оклад', 'source': 'Оклад',
+                'report_month': s.report_month, 'payment_status': s.payment_status or 'pending',
+                'is_paid': s.payment_status == 'paid' if s.payment_status else False,
+                'created_at': s.created_at.isoformat() if s.created_at else None,
+                'project_type': s.project_type or (contract.project_type if contract else None),
+                'reassigned': False, 'comments': s.comments, **_contract_fields(contract),
+            })
+    return result
+
+
+def old_summary(db, year, month=None, quarter=None):
+    query = db.query(Payment).filter(extract('year', Payment.created_at) == year)
+    if month:
+        query = query.filter(extract('month', Payment.created_at) == month)
+    if quarter:
+        query = query.filter(extract('month', Payment.created_at).between((quarter - 1) * 3 + 1, quarter * 3))
+    payments = query.all()
+    paid = sum(p.final_amount or 0 for p in payments if p.is_paid)
+    pending = sum(p.final_amount or 0 for p in payments if not p.is_paid)
+    by_role = {}
+    for p in payments:
+        role = by_role.setdefault(p.role or 'Не указано', {'paid': 0, 'pending': 0, 'count': 0})
+        role['count'] += 1
+        role['paid' if p.is_paid else 'pending'] += p.final_amount or 0
+    return {'year': year, 'month': month, 'quarter': quarter, 'total_paid': paid, 'total_pending': pending,
+            'total': paid + pending, 'by_role': by_role, 'payments_count': len(payments)}
+
+
+def _old_salary_by_type(db, s, own_type):
+    contract = db.get(Contract, s.contract_id) if s.contract_id else None
+    name, position = _name(db, s)
+    row = {
+        'id': s.id, 'contract_id': s.contract_id, 'employee_id': s.employee_id, 'employee_name': name,
+        'position': position, 'role': s.payment_type, 'stage_name': s.stage_name,
+        'final_amount': float(s.amount) if s.amount else 0, 'amount': float(s.amount) if s.amount else 0,
+        'payment_type': s.payment_type if own_type else 'Оклад', 'report_month': s.report_month,
+        'payment_status': s.payment_status, 'source': 'Оклад', 'card_stage': None,
+        'comments': s.comments, **_contract_fields(contract),
+    }
+    if own_type:
+        row['project_type'] = s.project_type
+    return row
+
+
+def old_by_type(db, payment_type, project_type_filter=None):
+    result = []
+    if payment_type == 'Оклады':
+        result = [_old_salary_by_type(db, s, True) for s in db.query(Salary).all()]
+    elif project_type_filter == 'Авторский надзор':
+        for p in db.query(Payment).filter(Payment.supervision_card_id.isnot(None)).all():
+            card = db.get(SupervisionCard, p.supervision_card_id)
+            contract = db.get(Contract, card.contract_id) if card else None
+            name, position = _name(db, p)
+            result.append({
+                'id': p.id, 'contract_id': p.contract_id, 'crm_card_id': p.crm_card_id,
+                'supervision_card_id': p.supervision_card_id, 'employee_id': p.employee_id,
+                'employee_name': name, 'position': position, 'role': p.role, 'stage_name': p.stage_name,
+                'calculated_amount': float(p.calculated_amount) if p.calculated_amount else 0,
+                'final_amount': float(p.final_amount) if p.final_amount else 0,
+                'amount': float(p.final_amount) if p.final_amount else 0,
+                'payment_type': p.payment_type, 'payment_subtype': p.payment_type,
+                'report_month': p.report_month, 'payment_status': p.payment_status,
+                'project_type': contract.project_type if contract else 'Авторский надзор',
+                'source': 'CRM Надзор', 'card_stage': card.column_name if card else None,
+                'reassigned': p.reassigned, **_contract_fields(contract),
+            })
+        result += [_old_salary_by_type(db, s, False)
+                   for s in db.query(Salary).filter(Salary.project_type == project_type_filter).all()]
+    elif project_type_filter:
+        query = db.query(Payment).join(CRMCard, Payment.crm_card_id == CRMCard.id).join(
+            Contract, CRMCard.contract_id == Contract.id).filter(Contract.project_type == project_type_filter)
+        for p in query.all():
+            card = db.get(CRMCard, p.crm_card_id)
+            contract = db.get(Contract, card.contract_id) if card else None
+            name, position = _name(db, p)
+            result.append({
+                'id': p.id, 'contract_id': p.contract_id, 'employee_id': p.employee_id,
+                'employee_name': name, 'position': position, 'role': p.role, 'stage_name': p.stage_name,
+                'final_amount': float(p.final_amount) if p.final_amount else 0,
+                'amount': float(p.final_amount) if p.final_amount else 0,
+                'payment_type': p.payment_type, 'report_month': p.report_month,
+                'payment_status': p.payment_status, 'source': 'CRM',
+                'card_stage': card.column_name if card else None, 'reassigned': p.reassigned,
+                'old_employee_id': p.old_employee_id, **_contract_fields(contract),
+            })
+        result += [_old_salary_by_type(db, s, False)
+                   for s in db.query(Salary).filter(Salary.project_type == project_type_filter).all()]
+    result.sort(key=lambda x: x['id'], reverse=True)
+    return result
+
+
+def _as_json(value):
+    return json.loads(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def _listing_order(rows):
+    return sorted(_as_json(rows), key=lambda r: (r['source'] == 'Оклад', r['id']))
+
+
+def _snapshot(conn):
+    return {(row.kind, row.source_id): dict(row._mapping) for row in conn.execute(select(L))}
+
+
+# =============================================================================
+# Тесты
+# =============================================================================
+
+@pytest.mark.backend
+def test_parse_report_month():
+    assert ledger.parse_report_month('2026-03') == (2026, 3)
+    assert ledger.parse_report_month('2026-11-05') == (2026, 11)
+    assert ledger.parse_report_month('2026') == (2026, None)
+    assert ledger.parse_report_month('2026-3') == (2026, None)
+    assert ledger.parse_report_month('март') == (None, None)
+    assert ledger.parse_report_month('') == (None, None)
+    assert ledger.parse_report_month(None) == (None, None)
+
+
+@pytest.mark.backend
+@pytest.mark.parametrize('seed', [0, 1])
+def test_ledger_matches_old_implementation(session_factory, seed):
+    db = session_factory()
+    try:
+        staff, rows = _seed(db, random.Random(seed))
+        ledger.rebuild(db.connection())
+
+        for year, month, include_null, payment_type, is_paid in itertools.product(
+                [None, 2026, 2025], [None, 3, 11], [False, True], [None, 'Аванс', 'Оклад'], [None, True, False]):
+            filters = dict(year=year, month=month, include_null_month=include_null,
+                           payment_type=payment_type, is_paid=is_paid)
+            assert _listing_order(ledger.listing(db, **filters)) == _listing_order(old_listing(db, **filters))
+        for filters in ({'contract_id': rows[0][0].id}, {'employee_id': staff[1].id, 'year': 2026}):
+            assert _listing_order(ledger.listing(db, **filters)) == _listing_order(old_listing(db, **filters))
+
+        for year, month, quarter in itertools.product([2025, 2026], [None, 2, 7], [None, 1, 3, 5]):
+            assert _as_json(ledger.summary(db, year, month=month, quarter=quarter)) == \
+                _as_json(old_summary(db, year, month=month, quarter=quarter))
+
+        for payment_type, project_type in [('Оклады', None), ('Оклады', 'Шаблонный'), ('x', None),
+                                           *[('Авторский надзор', t) for t in PROJECT_TYPES]]:
+            assert _as_json(ledger.by_type(db, payment_type, project_type)) == \
+                _as_json(old_by_type(db, payment_type, project_type))
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_incremental_updates_match_rebuild(engine, session_factory, monkeypatch):
+    ledger.install(session_factory)
+    ledger.install(session_factory)  # повторная подписка не дублирует обработчики
+    db = session_factory()
+    try:
+        staff, rows = _seed(db, random.Random(5), contracts=15)
+        with engine.connect() as conn:
+            assert len(_snapshot(conn)) == db.query(Payment).count() + db.query(Salary).count()
+
+        # Реквизиты договора, карточек и сотрудника
+        contract, card, supervision = rows[0]
+        db.add(Payment(contract_id=contract.id, supervision_card_id=supervision.id, role='ДАН',
+                       calculated_amount=1.0, final_amount=1.0))
+        db.commit()
+        contract.address = 'Литейный 10'
+        contract.status = 'СДАН'
+        card.contract_id = rows[1][0].id
+        supervision.column_name = 'Стадия 5'
+        staff[0].full_name = 'Переименован'
+        staff[1].last_activity = datetime(2026, 10, 19)
+        db.commit()
+
+        # Новые и удалённые платежи, массовые UPDATE/DELETE через сессию
+        db.add(Payment(contract_id=contract.id, crm_card_id=rows[2][1].id, role='Дизайнер',
+                       calculated_amount=1.0, final_amount=1.0, report_month='2026-05'))
+        db.delete(db.query(Salary).first())
+        db.query(Payment).filter(Payment.role == 'Замерщик').update(
+            {'report_month': '2026-12'}, synchronize_session=False)
+        db.query(Payment).filter(Payment.crm_card_id == rows[3][1].id).delete()
+        db.execute(update(Payment).where(Payment.contract_id == Contract.id, Contract.city == 'СПБ')
+                   .values(final_amount=500.0).execution_options(synchronize_session=False))
+        db.query(Salary).filter(Salary.employee_id == staff[2].id).update(
+            {'employee_id': None}, synchronize_session=False)
+        db.commit()
+
+        # UPDATE по первичному ключу списком параметров пересчитывает только эти строки
+        bulk_ids = [p.id for p in db.query(Payment).order_by(Payment.id).limit(2)]
+        refreshed = []
+        original_refresh = ledger.refresh
+        monkeypatch.setattr(ledger, 'refresh',
+                            lambda conn, kind, ids: (refreshed.append(list(ids)),
+                                                     original_refresh(conn, kind, ids)))
+        db.execute(update(Payment), [{'id': bulk_ids[0], 'final_amount': 7.0},
+                                     {'id': bulk_ids[1], 'final_amount': 8.0}])
+        db.commit()
+        monkeypatch.undo()
+        assert refreshed == [bulk_ids]
+
+        # Откат не оставляет строк в ленте
+        db.add(Payment(contract_id=contract.id, role='Дизайнер', calculated_amount=1.0, final_amount=1.0))
+        db.flush()
+        db.rollback()
+
+        with engine.connect() as conn:
+            incremental = _snapshot(conn)
+            ledger.rebuild(conn)
+            assert _snapshot(conn) == incremental
+        assert any(r['address'] == 'Литейный 10' for r in incremental.values())
+        assert any(r['card_stage'] == 'Стадия 5' for r in incremental.values())
+        assert all(r['report_month_num'] == 12 for r in incremental.values()
+                   if r['kind'] == 'payment' and r['role'] == 'Замерщик')
+        assert incremental[('payment', bulk_ids[0])]['final_amount'] == 7.0
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_export_stream_matches_listing_and_ensure(engine, session_factory):
+    db = session_factory()
+    try:
+        _seed(db, random.Random(3), contracts=10)
+        conn = db.connection()
+        assert ledger.ensure_ledger(conn) is True
+        assert ledger.ensure_ledger(conn) is False
+        db.commit()
+
+        chunks = list(ledger.iter_listing_json(session_factory, year=2026, include_null_month=True))
+        assert chunks[0] == b'[' and chunks[-1] == b']'
+        assert json.loads(b''.join(chunks)) == _as_json(ledger.listing(db, year=2026, include_null_month=True))
+        assert json.loads(b''.join(ledger.iter_listing_json(session_factory, year=1990))) == []
+    finally:
+        db.close()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Пересчёт платежей по тарифам (server/services/repricing_service.py):
+- SQL-выражение суммы совпадает с правилами GET /payments/calculate
+- UPDATE ... FROM contracts, ручные платежи, dry-run без записи
+- дозаполнение нулевых платежей после сохранения тарифа
+"""
+import random
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services.repricing_service')
+server_db = _modules['database']
+rs = _modules['services.repricing_service']
+
+Contract = server_db.Contract
+Payment = server_db.Payment
+Rate = server_db.Rate
+
+STAGES = ['Стадия 1', 'Стадия 2', 'Стадия 3']
+ROLES = ['Дизайнер', 'Чертёжник', 'ДАН', 'Старший менеджер проектов', 'Замерщик']
+
+
+def _contract(db, project_type, area, city='СПБ'):
+    contract = Contract(client_id=1, contract_number=f'N-{random.random()}', project_type=project_type,
+                        area=area, city=city, address='адрес', agent_type='Фестиваль')
+    db.add(contract)
+    db.flush()
+    return contract
+
+
+def _payment(db, contract, role, stage_name=None, amount=0.0, supervision=False, manual=False):
+    payment = Payment(contract_id=contract.id, role=role, stage_name=stage_name,
+                      supervision_card_id=1 if supervision else None,
+                      calculated_amount=amount, final_amount=amount, is_manual=manual)
+    db.add(payment)
+    db.flush()
+    return payment
+
+
+def _rates(db):
+    db.add_all([
+        Rate(project_type='Индивидуальный', role='Дизайнер', rate_per_m2=100),
+        Rate(project_type='Индивидуальный', role='Дизайнер', stage_name='Стадия 2', rate_per_m2=150),
+        Rate(project_type='Индивидуальный', role='Чертёжник', stage_name='Стадия 1', rate_per_m2=40),
+        Rate(project_type='Шаблонный', role='Дизайнер', area_from=0, area_to=90, fixed_price=30000),
+        Rate(project_type='Шаблонный', role='Дизайнер', area_from=90, area_to=None, fixed_price=45000),
+        Rate(project_type='Авторский надзор', role='ДАН', stage_name='Стадия 1', rate_per_m2=20),
+        Rate(project_type='Авторский надзор', role='ДАН', rate_per_m2=10),
+        Rate(project_type='Авторский надзор', role='Старший менеджер проектов',
+             stage_name='Стадия 2', rate_per_m2=5),
+        Rate(role='Замерщик', city='СПБ', surveyor_price=3000),
+        Rate(role='Замерщик', city='МСК', surveyor_price=4500),
+    ])
+    db.flush()
+
+
+def _reference(db, payment):
+    """Построчный расчёт по правилам GET /payments/calculate"""
+    contract = db.get(Contract, payment.contract_id)
+    area = float(contract.area) if contract.area else 0
+    rates = db.query(Rate).order_by(Rate.id).all()
+
+    def per_stage(project_type):
+        candidates = [r for r in rates if r.project_type == project_type and r.role == payment.role]
+        staged = [r for r in candidates if payment.stage_name and r.stage_name == payment.stage_name]
+        rate = (staged or [r for r in candidates if r.stage_name is None] or [None])[0]
+        return area * rate.rate_per_m2 if rate and rate.rate_per_m2 else 0
+
+    if payment.supervision_card_id:
+        return per_stage('Авторский надзор')
+    if payment.role == 'Замерщик':
+        rate = next((r for r in rates if r.role == 'Замерщик' and r.city == contract.city), None)
+        return rate.surveyor_price if rate and rate.surveyor_price else 0
+    if contract.project_type == 'Индивидуальный':
+        return per_stage('Индивидуальный')
+    if contract.project_type == 'Шаблонный':
+        matching = sorted(
+            (r for r in rates if r.project_type == 'Шаблонный' and r.role == payment.role
+             and r.area_from <= area and (r.area_to is None or r.area_to >= area)),
+            key=lambda r: (r.area_from, r.id))
+        return matching[0].fixed_price if matching and matching[0].fixed_price else 0
+    if contract.project_type == 'Авторский надзор':
+        return per_stage('Авторский надзор')
+    return 0
+
+
+@pytest.mark.backend
+def test_sql_amount_matches_calculate_rules(db):
+    _rates(db)
+    rnd = random.Random(7)
+    payments = []
+    for _ in range(40):
+        contract = _contract(db, rnd.choice(['Индивидуальный', 'Шаблонный', 'Авторский надзор']),
+                             rnd.choice([None, 45.5, 90, 120.25]), rnd.choice(['СПБ', 'МСК', 'Казань']))
+        for _ in range(5):
+            payments.append(_payment(db, contract, rnd.choice(ROLES), rnd.choice(STAGES + [None]),
+                                     amount=-1.0, supervision=rnd.random() < 0.3))
+
+    result = rs.reprice(db, dry_run=True)
+    new_amounts = {change['payment_id']: change['new_amount'] for change in result.changes}
+
+    assert result.total == result.updated == len(payments)
+    for payment in payments:
+        assert new_amounts[payment.id] == pytest.approx(_reference(db, payment)), payment.role
+
+
+@pytest.mark.backend
+def test_reprice_single_update_keeps_manual_final(db):
+    _rates(db)
+    contract = _contract(db, 'Индивидуальный', 80)
+    auto = _payment(db, contract, 'Дизайнер', 'Стадия 2', amount=1)
+    manual = _payment(db, contract, 'Дизайнер', 'Стадия 1', amount=1, manual=True)
+    unchanged = _payment(db, contract, 'Чертёжник', 'Стадия 1', amount=3200)
+    other = _payment(db, _contract(db, 'Индивидуальный', 50), 'Дизайнер', 'Стадия 2', amount=1)
+    db.commit()
+
+    statements = []
+    event.listen(db.get_bind(), 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    result = rs.reprice(db, contract_id=contract.id)
+    db.commit()
+
+    assert (result.total, result.updated) == (3, 2)
+    assert sum(s.lstrip().upper().startswith('UPDATE') for s in statements) == 1
+    assert (auto.calculated_amount, auto.final_amount) == (12000, 12000)
+    assert (manual.calculated_amount, manual.final_amount) == (8000, 1)
+    assert unchanged.final_amount == 3200
+    assert other.final_amount == 1
+
+
+@pytest.mark.backend
+def test_dry_run_reports_without_writing(db):
+    _rates(db)
+    contract = _contract(db, 'Шаблонный', 100)
+    payment = _payment(db, contract, 'Дизайнер', amount=30000)
+    manual = _payment(db, contract, 'Дизайнер', amount=10, manual=True)
+    db.commit()
+
+    result = rs.reprice(db, dry_run=True, role='Дизайнер')
+    report = result.to_dict()
+
+    assert report['dry_run'] is True and report['updated'] == 2
+    assert report['changes'][0] == {
+        'payment_id': payment.id, 'contract_id': contract.id, 'role': 'Дизайнер',
+        'stage_name': None, 'old_amount': 30000, 'new_amount': 45000, 'final_amount': 45000,
+    }
+    # Ручная сумма сохраняется: в отчёте и в БД
+    assert report['changes'][1]['payment_id'] == manual.id
+    assert report['changes'][1]['final_amount'] == 10
+    db.expire_all()
+    assert db.get(Payment, payment.id).final_amount == 30000
+    assert db.get(Payment, manual.id).final_amount == 10
+
+
+@pytest.mark.backend
+def test_zero_payments_filled_for_saved_rate(db):
+    contract = _contract(db, 'Индивидуальный', 60)
+    zero = _payment(db, contract, 'ДАН', 'Стадия 1', supervision=True)
+    other_stage = _payment(db, contract, 'ДАН', 'Стадия 2', supervision=True)
+    paid = _payment(db, contract, 'ДАН', 'Стадия 1', amount=500, supervision=True)
+    rate = Rate(project_type='Авторский надзор', role='ДАН', stage_name='Стадия 1', rate_per_m2=25)
+    db.add(rate)
+
+    assert rs.reprice_zero_payments_for_rate(db, rate) == 1
+    db.commit()
+    assert zero.final_amount == 1500
+    assert other_stage.final_amount == 0
+    assert paid.final_amount == 500
+
+
+@pytest.mark.backend
+def test_scope_for_rate_covers_all_rate_types():
+    assert rs.scope_for_rate(Rate(role='Замерщик', city='МСК', surveyor_price=1)) == \
+        {'role': 'Замерщик', 'city': 'МСК'}
+    assert rs.scope_for_rate(Rate(project_type='Шаблонный', role='Дизайнер')) == \
+        {'role': 'Дизайнер', 'project_type': 'Шаблонный', 'supervision': False}
+    assert rs.scope_for_rate(Rate(project_type='Индивидуальный', role='Дизайнер', stage_name='С1')) == \
+        {'role': 'Дизайнер', 'stage_name': 'С1', 'project_type': 'Индивидуальный', 'supervision': False}
+    assert rs.scope_for_rate(Rate(project_type='Авторский надзор', role='ДАН')) == \
+        {'role': 'ДАН', 'stage_name': None, 'supervision': True}
+    assert rs.scope_for_rate(Rate(project_type='Прочее', role='Дизайнер')) is None
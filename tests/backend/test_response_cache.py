@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш ответов дашбордов (server/services/response_cache.py):
+- попадание / промах и заголовок X-Cache, ответ совпадает с сериализацией FastAPI
+- нормализация параметров: порядок и None не влияют на ключ
+- версии таблиц растут только после commit (не после rollback и не во flush)
+- обновление last_activity (присутствие) не сбрасывает кэш сотрудников
+- массовый UPDATE через сессию сбрасывает кэш
+- счётчики попаданий и промахов
+"""
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.response_cache')
+server_db = _modules['database']
+rc = _modules['services.response_cache']
+
+Client = server_db.Client
+Contract = server_db.Contract
+Employee = server_db.Employee
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path, session_factory, monkeypatch):
+    clock = _Clock()
+    cache = rc.ResponseCache(rc.ResponseStore(str(tmp_path / 'responses.sqlite3')), ttl=60, clock=clock)
+    cache.install(session_factory)
+    cache.install(session_factory)  # повторная подписка не дублирует обработчики
+    monkeypatch.setattr(rc, '_cache', cache)
+    return cache
+
+
+def _scope(current_user, db):
+    return 'all'
+
+
+def _endpoint(calls):
+    @rc.cached('contracts', scope=_scope)
+    async def count_contracts(year: int = None, status: str = None, current_user=None, db=None):
+        calls.append((year, status))
+        return {'year': year, 'count': db.query(Contract).count(), 'at': datetime(2026, 1, 2)}
+    return count_contracts
+
+
+def _call(endpoint, **kwargs):
+    response = asyncio.run(endpoint(**kwargs))
+    return response.headers['X-Cache'], json.loads(response.body)
+
+
+def _contract(db, number):
+    client = Client(client_type='Физическое лицо', phone=number)
+    db.add(client)
+    db.flush()
+    db.add(Contract(client_id=client.id, contract_number=number, project_type='Индивидуальный'))
+
+
+@pytest.mark.backend
+def test_hit_miss_and_param_normalization(cache, session_factory):
+    calls = []
+    endpoint = _endpoint(calls)
+    db = session_factory()
+    try:
+        state, body = _call(endpoint, year=2026, current_user=None, db=db)
+        assert state == 'MISS'
+        assert body == {'year': 2026, 'count': 0, 'at': '2026-01-02T00:00:00'}
+        # status=None отброшен, порядок аргументов не важен
+        assert _call(endpoint, db=db, status=None, year=2026)[0] == 'HIT'
+        assert _call(endpoint, year=2025, db=db)[0] == 'MISS'
+        assert calls == [(2026, None), (2025, None)]
+
+        # Истечение TTL
+        cache.clock.now += 61
+        assert _call(endpoint, year=2026, db=db)[0] == 'MISS'
+    finally:
+        db.close()
+
+    assert rc.normalize_params({'b': 1, 'a': None, 'c': 'x'}) == [['b', '1'], ['c', 'x']]
+
+
+@pytest.mark.backend
+def test_versions_bump_after_commit_only(cache, session_factory):
+    endpoint = _endpoint([])
+    db = session_factory()
+    reader = session_factory()
+    try:
+        assert _call(endpoint, db=reader)[0] == 'MISS'
+
+        _contract(db, 'N1')
+        db.flush()
+        # Во flush версия не меняется: незафиксированное состояние не кэшируется под новой
+        assert cache.store.versions(['contracts']) == (0,)
+        db.rollback()
+        assert cache.store.versions(['contracts']) == (0,)
+        assert _call(endpoint, db=reader)[0] == 'HIT'
+
+        _contract(db, 'N2')
+        db.commit()
+        assert cache.store.versions(['contracts', 'clients']) == (1, 1)
+        state, body = _call(endpoint, db=reader)
+        assert (state, body['count']) == ('MISS', 1)
+
+        # Изменение чужой таблицы не трогает ответ
+        db.add(server_db.City(name='Казань'))
+        db.commit()
+        assert _call(endpoint, db=reader)[0] == 'HIT'
+    finally:
+        db.close()
+        reader.close()
+
+
+@pytest.mark.backend
+def test_presence_columns_do_not_invalidate(cache, session_factory):
+    db = session_factory()
+    try:
+        employee = Employee(full_name='Иванов', phone='1', login='ivanov', password_hash='x',
+                            position='Дизайнер', department='Проектный', status='активный')
+        db.add(employee)
+        db.commit()
+        version = cache.store.versions(['employees'])
+
+        employee.last_activity = datetime(2026, 10, 19, 12, 0)
+        db.commit()
+        assert cache.store.versions(['employees']) == version
+
+        employee.position = 'Менеджер'
+        employee.last_activity = datetime(2026, 10, 19, 12, 5)
+        db.commit()
+        assert cache.store.versions(['employees'])[0] == version[0] + 1
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_bulk_update_invalidates(cache, session_factory):
+    db = session_factory()
+    try:
+        _contract(db, 'N1')
+        db.commit()
+        version = cache.store.versions(['contracts'])[0]
+        db.query(Contract).filter(Contract.contract_number == 'N1').update({'status': 'СДАН'})
+        db.commit()
+        assert cache.store.versions(['contracts'])[0] == version + 1
+    finally:
+        db.close()
+
+
+@pytest.mark.backend
+def test_stats_count_hits_and_misses(cache, session_factory):
+    endpoint = _endpoint([])
+    db = session_factory()
+    try:
+        for year in (2024, 2024, 2024, 2025):
+            _call(endpoint, year=year, db=db)
+    finally:
+        db.close()
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate'], stats['entries']) == (2, 2, 50.0, 2)
+    assert stats['routes'] == {'test_response_cache.count_contracts': {'hits': 2, 'misses': 2}}
+
+    # После сброса в хранилище счётчики видны другим процессам
+    cache.clock.now += rc.STATS_FLUSH_SECONDS
+    cache.record('x.y', hit=True)
+    other = rc.ResponseCache(cache.store)
+    assert other.stats()['hits'] == 3
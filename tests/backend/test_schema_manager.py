@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Инициализация схемы при старте (server/services/schema_manager.py):
+- отпечаток схемы и быстрый путь без DDL
+- пустая БД, БД под Alembic за head, БД без Alembic (create_all)
+- один проход на все workers под блокировкой схемы
+"""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, create_engine, event, inspect, text
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules()
+server_config = _modules['config']
+server_db = _modules['database']
+
+from server.services import schema_manager as sm
+
+HEAD = sm.alembic_head()
+
+
+@pytest.fixture(autouse=True)
+def server_modules(monkeypatch):
+    """ensure_schema и alembic/env.py импортируют серверные config и database"""
+    monkeypatch.setitem(sys.modules, 'config', server_config)
+    monkeypatch.setitem(sys.modules, 'database', server_db)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'crm.db'
+
+
+def _engine(path):
+    return create_engine(f'sqlite:///{path}')
+
+
+def _revision(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def _index_names(engine, table):
+    return {ix['name'] for ix in inspect(engine).get_indexes(table)}
+
+
+@pytest.mark.backend
+def test_fingerprint_tracks_models_and_head():
+    base = sm.schema_fingerprint(server_db.Base.metadata, HEAD)
+    assert base == sm.schema_fingerprint(server_db.Base.metadata, HEAD)
+    assert base != sm.schema_fingerprint(server_db.Base.metadata, 'other')
+
+    extra = MetaData()
+    for table in server_db.Base.metadata.sorted_tables:
+        table.to_metadata(extra)
+    extra.tables['payments'].append_column(Column('new_column', Integer))
+    assert base != sm.schema_fingerprint(extra, HEAD)
+
+
+@pytest.mark.backend
+def test_fresh_database_created_then_current_without_ddl(db_path):
+    engine = _engine(db_path)
+    assert sm.ensure_schema(engine) == 'created'
+    assert _revision(engine) == HEAD
+    assert 'ix_payments_employee_month' in _index_names(engine, 'payments')
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute',
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    assert sm.ensure_schema(engine) == 'current'
+    assert not any(s.lstrip().upper().startswith(('CREATE', 'ALTER', 'INSERT', 'DELETE'))
+                   for s in statements)
+    assert len(statements) <= 3
+
+
+@pytest.mark.backend
+def test_versioned_database_upgraded_to_head(db_path):
+    from alembic import command
+
+    engine = _engine(db_path)
+    sm.ensure_schema(engine)
+    with engine.connect() as conn:
+        command.downgrade(sm.alembic_config(conn), 'f6g7h8i9j0k1')
+        conn.execute(text("DELETE FROM schema_state"))
+        conn.commit()
+    assert 'ix_payments_contract_stage_role' not in _index_names(engine, 'payments')
+
+    assert sm.ensure_schema(engine) == 'migrated'
+    assert _revision(engine) == HEAD
+    assert 'ix_payments_contract_stage_role' in _index_names(engine, 'payments')
+    assert sm.ensure_schema(engine) == 'current'
+
+
+@pytest.mark.backend
+def test_due_items_revision(db_path):
+    from alembic import command
+
+    engine = _engine(db_path)
+    sm.ensure_schema(engine)
+    with engine.connect() as conn:
+        command.downgrade(sm.alembic_config(conn), 'm3n4o5p6q7r8')
+    assert not inspect(engine).has_table('due_items')
+
+    with engine.connect() as conn:
+        command.upgrade(sm.alembic_config(conn), 'head')
+    assert 'ix_due_items_status_due' in _index_names(engine, 'due_items')
+
+    # Таблица, уже созданная create_all при старте, ревизии не мешает
+    with engine.connect() as conn:
+        command.stamp(sm.alembic_config(conn), 'm3n4o5p6q7r8')
+        command.upgrade(sm.alembic_config(conn), 'head')
+    assert _revision(engine) == HEAD
+
+
+@pytest.mark.backend
+def test_legacy_database_reconciled_and_stamped(db_path):
+    engine = _engine(db_path)
+    server_db.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE schema_state"))
+        conn.execute(text("DROP TABLE due_items"))
+        conn.execute(text("DROP INDEX ix_action_history_entity"))
+        conn.execute(text("ALTER TABLE payments DROP COLUMN employee_name"))
+
+    assert sm.ensure_schema(engine) == 'migrated'
+    insp = inspect(engine)
+    assert insp.has_table('due_items')
+    assert 'employee_name' in {c['name'] for c in insp.get_columns('payments')}
+    assert 'ix_action_history_entity' in _index_names(engine, 'action_history')
+    assert _revision(engine) == HEAD
+    assert sm.ensure_schema(engine) == 'current'
+
+
+@pytest.mark.backend
+def test_concurrent_workers_migrate_once(db_path):
+    results = []
+    barrier = threading.Barrier(4)
+
+    def worker():
+        engine = _engine(db_path)
+        barrier.wait()
+        results.append(sm.ensure_schema(engine))
+        engine.dispose()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+
+    assert sorted(results) == ['created', 'current', 'current', 'current']
+    engine = _engine(db_path)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM alembic_version")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM schema_state")).scalar() == 1
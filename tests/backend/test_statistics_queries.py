@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+Агрегаты статистики (server/services/statistics_queries.py):
+- полуинтервалы периодов вместо extract('year', ...) == year
+- сверка с прежней построчной реализацией statistics_router на случайно
+  заполненной БД: JSON ответов совпадает для всех сочетаний фильтров
+"""
+import json
+import random
+import sys
+from datetime import date, datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import extract
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import load_server_modules  # noqa: E402
+
+_modules = load_server_modules('services', 'services.statistics_queries')
+server_db = _modules['database']
+sq = _modules['services.statistics_queries']
+
+Employee = server_db.Employee
+Client = server_db.Client
+Contract = server_db.Contract
+CRMCard = server_db.CRMCard
+StageExecutor = server_db.StageExecutor
+SupervisionCard = server_db.SupervisionCard
+Payment = server_db.Payment
+Salary = server_db.Salary
+
+TODAY = date(2026, 6, 15)
+
+
+def _moment(rnd):
+    return datetime(rnd.choice([2025, 2026]), rnd.randint(1, 12), rnd.randint(1, 28), rnd.randint(0, 23))
+
+
+def _seed(db, rnd, contracts=120):
+    """Суммы и площади кратны 0.5 — суммы в Python и SQL совпадают точно"""
+    staff = []
+    for i in range(6):
+        employee = Employee(full_name=f'Сотрудник {i % 5}', phone=str(i), login=f'user{i}',
+                            password_hash='x', position='Дизайнер', department='Проектный',
+                            status='активный' if i < 5 else 'уволен')
+        db.add(employee)
+        staff.append(employee)
+    client = Client(client_type='Физическое лицо', phone='1')
+    db.add(client)
+    db.flush()
+
+    for i in range(contracts):
+        created = _moment(rnd)
+        contract = Contract(
+            client_id=client.id, contract_number=f'N{i}', created_at=created,
+            project_type=rnd.choice(['Индивидуальный', 'Шаблонный', 'Авторский надзор']),
+            agent_type=rnd.choice(['ПЕТРОВИЧ', 'ФЕСТИВАЛЬ', '', None]),
+            city=rnd.choice(['СПБ', 'МСК', '', None]),
+            address=rnd.choice(['Невский 1', 'Тверская 5', None]),
+            status=rnd.choice(['Новый заказ', 'СДАН', 'РАСТОРГНУТ', 'АВТОРСКИЙ НАДЗОР', 'В работе', '', None]),
+            contract_date=rnd.choice([created.strftime('%Y-%m-%d'), created.strftime('%d.%m.%Y'), '', None]),
+            total_amount=rnd.choice([None, rnd.randint(1, 2000) * 500.0]),
+            area=rnd.choice([None, rnd.randint(20, 400) / 2]),
+        )
+        db.add(contract)
+        db.flush()
+        for _ in range(rnd.randint(0, 2)):
+            card = CRMCard(
+                contract_id=contract.id, created_at=_moment(rnd),
+                column_name=rnd.choice(['Новый заказ', 'Стадия 1', 'СДАН', 'РАСТОРГНУТ', 'Выполненный проект']),
+                is_approved=rnd.random() < 0.4,
+                approval_deadline=rnd.choice([None, '2026-05-01']),
+                approval_stages=rnd.choice([None, '["Стадия 1", "Стадия 2"]']),
+            )
+            db.add(card)
+            db.flush()
+            for k in range(rnd.randint(0, 3)):
+                db.add(StageExecutor(
+                    crm_card_id=card.id, stage_name=rnd.choice(['Стадия 1: планировка', 'Стадия 2: концепция']),
+                    executor_id=rnd.choice(staff).id, assigned_date=_moment(rnd),
+                    completed=rnd.random() < 0.5,
+                    deadline=rnd.choice([None, '', 'скоро', '2026-06-01', '2026-07-01', '2026-06-10 18:00']),
+                ))
+        if rnd.random() < 0.5:
+            db.add(SupervisionCard(
+                contract_id=contract.id, created_at=_moment(rnd),
+                column_name=rnd.choice(['Новый заказ', 'Стадия 1: Закупка', '']),
+                deadline=rnd.choice([None, '', 'bad', '2026-06-01', '2026-07-01']),
+                dan_id=rnd.choice([None, staff[0].id, staff[1].id]),
+                senior_manager_id=rnd.choice([None, staff[2].id]),
+                is_paused=rnd.random() < 0.3, dan_completed=rnd.random() < 0.3,
+            ))
+        for _ in range(rnd.randint(0, 2)):
+            db.add(Payment(contract_id=contract.id, role='Дизайнер', calculated_amount=0,
+                           final_amount=rnd.randint(0, 100) * 250.0, is_paid=rnd.random() < 0.5,
+                           created_at=_moment(rnd)))
+    for employee in staff:
+        for month in ('2026-03', '2026-04'):
+            db.add(Salary(employee_id=employee.id, payment_type='Оклад', amount=rnd.randint(1, 50) * 1000.0,
+                          report_month=month))
+    db.commit()
+
+
+# =============================================================================
+# Прежняя реализация statistics_router (перебор строк в Python).
+# cast(contract_date AS DATE) в SQLite не вычисляется — дата договора
+# разбирается в Python по формату YYYY-MM-DD.
+# =============================================================================
+
+def _old_quarter(query, column, quarter, year=None):
+    query = query.filter(extract('month', column).between((quarter - 1) * 3 + 1, quarter * 3))
+    if year:
+        query = query.filter(extract('year', column) == year)
+    return query
+
+
+def _old_created(query, column, year=None, quarter=None, month=None):
+    if year:
+        query = query.filter(extract('year', column) == year)
+    if month:
+        query = query.filter(extract('month', column) == month)
+    if quarter:
+        query = _old_quarter(query, column, quarter)
+    return query
+
+
+def _iso_date(value):
+    try:
+        return date.fromisoformat(value) if value and len(value) == 10 else None
+    except ValueError:
+        return None
+
+
+def _old_contract_date_match(value, year, quarter, month):
+    if not (year or quarter or month):
+        return True
+    parsed = _iso_date(value)
+    if parsed is None:
+        return False
+    return ((not year or parsed.year == year) and (not month or parsed.month == month)
+            and (not quarter or (quarter - 1) * 3 < parsed.month <= quarter * 3))
+
+
+def _old_dimensions(query, agent_type, city):
+    if agent_type and agent_type != 'Все':
+        query = query.filter(Contract.agent_type == agent_type)
+    if city and city != 'Все':
+        query = query.filter(Contract.city == city)
+    return query
+
+
+def _count(items, key):
+    counts = {}
+    for item in items:
+        value = key(item)
+        if value is not None:
+            counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def old_dashboard(db, year=None, month=None, quarter=None, agent_type=None, city=None):
+    contracts = _old_dimensions(_old_created(db.query(Contract), Contract.created_at, year, quarter, month),
+                                agent_type, city).all()
+    monthly = {}
+    for c in contracts:
+        item = monthly.setdefault(c.created_at.strftime('%Y-%m'), {'count': 0, 'amount': 0})
+        item['count'] += 1
+        item['amount'] += c.total_amount or 0
+    return {
+        'total_contracts': len(contracts),
+        'total_amount': sum(c.total_amount or 0 for c in contracts),
+        'total_area': sum(c.area or 0 for c in contracts),
+        'individual_count': len([c for c in contracts if c.project_type == 'Индивидуальный']),
+        'template_count': len([c for c in contracts if c.project_type == 'Шаблонный']),
+        'status_counts': _count(contracts, lambda c: c.status or 'Новый заказ'),
+        'city_counts': _count(contracts, lambda c: c.city or 'Не указан'),
+        'monthly_data': monthly,
+        'active_crm_cards': db.query(CRMCard).join(Contract).filter(
+            ~Contract.status.in_(['СДАН', 'РАСТОРГНУТ', 'АВТОРСКИЙ НАДЗОР'])).count(),
+        'supervision_cards': db.query(SupervisionCard).join(Contract).filter(
+            Contract.status == 'АВТОРСКИЙ НАДЗОР').count(),
+    }
+
+
+def old_employees(db, year=None, month=None):
+    result = []
+    for emp in db.query(Employee).filter(Employee.status == 'активный').all():
+        stages = _old_created(db.query(StageExecutor).filter(StageExecutor.executor_id == emp.id),
+                              StageExecutor.assigned_date, year, None, month).all()
+        salaries = db.query(Salary).filter(Salary.employee_id == emp.id)
+        if year and month:
+            salaries = salaries.filter(Salary.report_month == f"{year}-{month:02d}")
+        total, completed = len(stages), len([s for s in stages if s.completed])
+        result.append({
+            'id': emp.id, 'full_name': emp.full_name, 'position': emp.position,
+            'total_stages': total, 'completed_stages': completed,
+            'completion_rate': (completed / total * 100) if total > 0 else 0,
+            'total_salary': sum(s.amount for s in salaries),
+        })
+    return result
+
+
+def old_contracts_by_period(db, year, group_by='month', project_type=None):
+    query = db.query(Contract).filter(extract('year', Contract.created_at) == year)
+    if project_type and project_type != 'Все':
+        query = query.filter(Contract.project_type == project_type)
+    if group_by == 'month':
+        key, result = (lambda c: c.created_at.month), {i: {'count': 0, 'amount': 0} for i in range(1, 13)}
+    elif group_by == 'quarter':
+        key, result = (lambda c: (c.created_at.month - 1) // 3 + 1), {i: {'count': 0, 'amount': 0} for i in range(1, 5)}
+    elif group_by == 'status':
+        key, result = (lambda c: c.status or 'Новый заказ'), {}
+    else:
+        return {}
+    for c in query.all():
+        item = result.setdefault(key(c), {'count': 0, 'amount': 0})
+        item['count'] += 1
+        item['amount'] += c.total_amount or 0
+    return result
+
+
+def old_projects(db, project_type='Индивидуальный', year=None, quarter=None, month=None,
+                 agent_type=None, city=None, today=TODAY):
+    contracts = [c for c in _old_dimensions(db.query(Contract).filter(Contract.project_type == project_type),
+                                            agent_type, city)
+                 if _old_contract_date_match(c.contract_date, year, quarter, month)]
+    ids = [c.id for c in contracts]
+    overdue = set()
+    stage_rows = db.query(CRMCard.contract_id, StageExecutor).join(
+        StageExecutor, StageExecutor.crm_card_id == CRMCard.id).filter(CRMCard.contract_id.in_(ids))
+    for contract_id, stage in stage_rows:
+        deadline = _iso_date((stage.deadline or '')[:10]) if len(stage.deadline or '') >= 10 else None
+        if not stage.completed and deadline and deadline < today:
+            overdue.add(contract_id)
+    cards = db.query(CRMCard).filter(CRMCard.contract_id.in_(ids)).all()
+    return {
+        'total_orders': len(contracts),
+        'total_area': float(sum(c.area or 0 for c in contracts)),
+        'active': len([c for c in contracts if not c.status or c.status not in {'СДАН', 'АВТОРСКИЙ НАДЗОР', 'РАСТОРГНУТ'}]),
+        'completed': len([c for c in contracts if c.status in ['СДАН', 'АВТОРСКИЙ НАДЗОР']]),
+        'cancelled': len([c for c in contracts if c.status == 'РАСТОРГНУТ']),
+        'overdue': len(overdue),
+        'by_cities': _count(contracts, lambda c: c.city or None),
+        'by_agents': _count(contracts, lambda c: c.agent_type or None),
+        'by_stages': _count(cards, lambda c: c.column_name),
+    }
+
+
+def old_supervision_filtered(db, year=None, quarter=None, month=None, agent_type=None, city=None,
+                             address=None, executor_id=None, manager_id=None, status=None):
+    query = _old_dimensions(_old_created(db.query(SupervisionCard).join(Contract), SupervisionCard.created_at,
+                                         year, quarter, month), agent_type, city)
+    if address:
+        query = query.filter(Contract.address.ilike(f'%{address}%'))
+    if executor_id:
+        query = query.filter(SupervisionCard.dan_id == executor_id)
+    if manager_id:
+        query = query.filter(SupervisionCard.senior_manager_id == manager_id)
+    if status == 'Приостановлено':
+        query = query.filter(SupervisionCard.is_paused == True)
+    elif status == 'Работа сдана':
+        query = query.filter(SupervisionCard.dan_completed == True)
+    elif status == 'В работе':
+        query = query.filter(SupervisionCard.is_paused == False, SupervisionCard.dan_completed == False)
+    cards = query.order_by(SupervisionCard.id).all()
+    return {
+        'total_count': len(cards),
+        'total_area': sum(c.contract.area or 0 for c in cards),
+        'cards': [{'id': c.id, 'contract_number': c.contract.contract_number, 'address': c.contract.address,
+                   'area': c.contract.area, 'status': c.contract.status} for c in cards],
+    }
+
+
+def old_supervision(db, year=None, quarter=None, month=None, agent_type=None, city=None, today=TODAY):
+    cards = [c for c in _old_dimensions(db.query(SupervisionCard).join(Contract), agent_type, city)
+             if _old_contract_date_match(c.contract.contract_date, year, quarter, month)]
+
+    def _is_overdue(card):
+        if not card.deadline or card.contract.status != 'АВТОРСКИЙ НАДЗОР':
+            return False
+        deadline = _iso_date(card.deadline)
+        return deadline is not None and deadline < today
+
+    return {
+        'total_orders': len(cards),
+        'total_area': float(sum(c.contract.area or 0 for c in cards)),
+        'active': len([c for c in cards if c.contract.status == 'АВТОРСКИЙ НАДЗОР']),
+        'completed': len([c for c in cards if c.contract.status == 'СДАН']),
+        'cancelled': len([c for c in cards if c.contract.status == 'РАСТОРГНУТ']),
+        'overdue': len([c for c in cards if _is_overdue(c)]),
+        'by_cities': _count(cards, lambda c: c.contract.city or None),
+        'by_agents': _count(cards, lambda c: c.contract.agent_type or None),
+        'by_stages': _count(cards, lambda c: c.column_name or 'Не указана'),
+    }
+
+
+def _old_card_period(query, period, year, quarter=None, month=None):
+    if period == 'За год':
+        return query.filter(extract('year', CRMCard.created_at) == year)
+    if period == 'За квартал' and quarter:
+        return _old_quarter(query, CRMCard.created_at, quarter, year)
+    if period == 'За месяц' and month:
+        return query.filter(extract('year', CRMCard.created_at) == year,
+                            extract('month', CRMCard.created_at) == month)
+    return query
+
+
+def old_crm_filtered(db, project_type, period, year, quarter=None, month=None, project_id=None,
+                     executor_id=None, stage_name=None, status_filter=None):
+    query = _old_card_period(db.query(CRMCard).join(Contract).filter(Contract.project_type == project_type),
+                             period, year, quarter, month)
+    if project_id:
+        query = query.filter(CRMCard.contract_id == project_id)
+    if status_filter:
+        query = query.filter(CRMCard.column_name == status_filter)
+    cards = query.order_by(CRMCard.id).all()
+    if executor_id:
+        cards = [c for c in cards if any(e.executor_id == executor_id for e in c.stage_executors)]
+    elif stage_name:
+        cards = [c for c in cards if any(stage_name in (e.stage_name or '') for e in c.stage_executors)]
+    return [{'id': c.id, 'contract_id': c.contract_id, 'column_name': c.column_name,
+             'contract_number': c.contract.contract_number, 'address': c.contract.address,
+             'area': float(c.contract.area) if c.contract.area else 0, 'is_approved': c.is_approved}
+            for c in cards]
+
+
+def old_approvals(db, project_type, period, year, quarter=None, month=None, project_id=None):
+    query = _old_card_period(db.query(CRMCard).join(Contract).filter(
+        Contract.project_type == project_type, CRMCard.is_approved == True), period, year, quarter, month)
+    if project_id:
+        query = query.filter(CRMCard.contract_id == project_id)
+    return [{'id': c.id, 'contract_id': c.contract_id, 'contract_number': c.contract.contract_number,
+             'address': c.contract.address, 'is_approved': c.is_approved,
+             'approval_deadline': str(c.approval_deadline) if c.approval_deadline else None,
+             'approval_stages': json.loads(c.approval_stages) if c.approval_stages else None}
+            for c in query.order_by(CRMCard.id).all()]
+
+
+def old_general(db, year, quarter=None, month=None):
+    contracts = _old_created(db.query(Contract), Contract.created_at, year, quarter, month).all()
+    payments = _old_created(db.query(Payment), Payment.created_at, year, quarter, month).all()
+    total_payments = sum(p.final_amount or 0 for p in payments)
+    paid_payments = sum(p.final_amount or 0 for p in payments if p.is_paid)
+    return {
+        'total_orders': len(contracts),
+        'active': len([c for c in contracts if c.status not in ['СДАН', 'РАСТОРГНУТ']]),
+        'completed': len([c for c in contracts if c.status == 'СДАН']),
+        'cancelled': len([c for c in contracts if c.status == 'РАСТОРГНУТ']),
+        'individual_count': len([c for c in contracts if c.project_type == 'Индивидуальный']),
+        'template_count': len([c for c in contracts if c.project_type == 'Шаблонный']),
+        'total_area': sum(c.area or 0 for c in contracts),
+        'total_amount': sum(c.total_amount or 0 for c in contracts),
+        'active_employees': db.query(Employee).filter(Employee.status == 'активный').count(),
+        'total_payments': total_payments,
+        'paid_payments': paid_payments,
+        'pending_payments': total_payments - paid_payments,
+    }
+
+
+def old_funnel(db, year=None, project_type=None):
+    query = db.query(CRMCard).join(Contract)
+    if year:
+        query = query.filter(extract('year', Contract.created_at) == year)
+    if project_type:
+        query = query.filter(Contract.project_type == project_type)
+    counts = _count(query.all(), lambda c: c.column_name)
+    return {'funnel': counts, 'total': sum(counts.values())}
+
+
+def _as_json(value):
+    return json.loads(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def _same(old, new):
+    assert _as_json(new) == _as_json(old)
+
+
+# =============================================================================
+# Тесты
+# =============================================================================
+
+@pytest.mark.backend
+def test_period_conditions_are_ranges():
+    start, end = sq.period_conditions(Contract.created_at, 2026, quarter=4)
+    assert (start.right.value, end.right.value) == (datetime(2026, 10, 1), datetime(2027, 1, 1))
+
+    start, end = sq.period_conditions(Contract.contract_date, 2026, quarter=1, month=2, iso_string=True)
+    assert (start.right.value, end.right.value) == ('2026-02-01', '2026-03-01')
+    assert str(start.left) == 'contracts.contract_date'
+
+    # Месяц вне квартала и некорректные значения — пустой период
+    assert str(sq.period_conditions(Contract.created_at, 2026, quarter=1, month=5)[0]) == 'false'
+    assert str(sq.period_conditions(Contract.created_at, None, month=13)[0]) == 'false'
+    assert sq.period_conditions(Contract.created_at) == []
+
+
+@pytest.mark.backend
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_new_queries_match_old_implementation(db, seed):
+    _seed(db, random.Random(seed))
+    periods = [(None, None, None), (2026, None, None), (2026, 2, None), (2025, None, 7),
+               (2026, 2, 5), (2026, 1, 5), (None, 3, None), (None, None, 11)]
+
+    for year, quarter, month in periods:
+        for agent_type, city in ((None, None), ('ПЕТРОВИЧ', 'Все'), ('Все', 'МСК')):
+            _same(old_dashboard(db, year, month, quarter, agent_type, city),
+                  sq.dashboard(db, year, month, quarter, agent_type, city))
+            for project_type in ('Индивидуальный', 'Шаблонный'):
+                _same(old_projects(db, project_type, year, quarter, month, agent_type, city),
+                      sq.projects(db, project_type, year, quarter, month, agent_type, city, today=TODAY))
+            _same(old_supervision(db, year, quarter, month, agent_type, city),
+                  sq.supervision(db, year, quarter, month, agent_type, city, today=TODAY))
+        for extra in ({}, {'address': 'невский'}, {'executor_id': 1, 'status': 'В работе'},
+                      {'manager_id': 3, 'status': 'Приостановлено'}, {'status': 'Работа сдана'}):
+            _same(old_supervision_filtered(db, year, quarter, month, **extra),
+                  sq.supervision_filtered(db, year, quarter, month, **extra))
+        _same(old_employees(db, year, month), sq.employees(db, year, month))
+        if year:
+            _same(old_general(db, year, quarter, month), sq.general(db, year, quarter, month))
+
+    for year in (2025, 2026):
+        for group_by in ('month', 'quarter', 'status', 'unknown'):
+            for project_type in (None, 'Все', 'Шаблонный'):
+                _same(old_contracts_by_period(db, year, group_by, project_type),
+                      sq.contracts_by_period(db, year, group_by, project_type))
+        _same(old_funnel(db, year, 'Индивидуальный'), sq.funnel(db, year, 'Индивидуальный'))
+    _same(old_funnel(db), sq.funnel(db))
+
+    for period, quarter, month in (('За год', None, None), ('За квартал', 3, None), ('За квартал', None, None),
+                                   ('За месяц', None, 4), ('all', None, None)):
+        for extra in ({}, {'executor_id': 2}, {'stage_name': 'концепция'}, {'stage_name': 'Стадия 1',
+                      'status_filter': 'Новый заказ'}, {'project_id': 5}):
+            _same(old_crm_filtered(db, 'Индивидуальный', period, 2026, quarter, month, **extra),
+                  sq.crm_filtered(db, 'Индивидуальный', period, 2026, quarter, month, **extra))
+        _same(old_approvals(db, 'Шаблонный', period, 2025, quarter, month),
+              sq.approvals(db, 'Шаблонный', period, 2025, quarter, month))
+
+
+@pytest.mark.backend
+def test_executor_load_counts_stages_of_open_cards(db):
+    _seed(db, random.Random(7))
+    for year, month in ((None, None), (2026, None), (2025, 3)):
+        expected = {}
+        query = db.query(StageExecutor, Employee.full_name).join(
+            Employee, StageExecutor.executor_id == Employee.id).join(
+            CRMCard, StageExecutor.crm_card_id == CRMCard.id).join(
+            Contract, CRMCard.contract_id == Contract.id).filter(
+            CRMCard.column_name.notin_(['СДАН', 'РАСТОРГНУТ']))
+        for stage, name in query:
+            created = stage.crm_card.contract.created_at
+            if (not year or created.year == year) and (not month or created.month == month):
+                expected[name] = expected.get(name, 0) + 1
+        rows = sq.executor_load(db, year, month)
+        assert {row['name']: row['active_stages'] for row in rows} == expected
+        assert [row['active_stages'] for row in rows] == sorted(expected.values(), reverse=True)
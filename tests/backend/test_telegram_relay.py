@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Пересылка файлов Яндекс.Диск → Telegram (server/services/telegram_relay.py):
+- параллельное получение ссылок с ограничением числа запросов
+- кэш file_id: повторная отправка без запроса ссылки на скачивание
+- сброс file_id из кэша после неудачной отправки
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from server.services.telegram_relay import (  # noqa: E402
+    TelegramFileIdCache, remember_sent, resolve_relay_files,
+)
+
+
+class _FakeYandexApi:
+    """get_json REST API ЯД: метаданные и ссылки на скачивание"""
+
+    def __init__(self, files, delay=0.01):
+        self.files = files  # path -> md5
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, path, params):
+        self.calls.append((path, params['path']))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if params['path'] not in self.files:
+                raise Exception('404 DiskNotFoundError')
+            if path == '/resources':
+                return {'md5': self.files[params['path']], 'modified': 'm'}
+            return {'href': f"https://downloader.disk.yandex.ru{params['path']}"}
+        finally:
+            self.active -= 1
+
+    def downloads(self):
+        return [p for api, p in self.calls if api == '/resources/download']
+
+
+def _items(paths, kind='photo'):
+    return [{'yandex_path': p, 'file_name': p.rsplit('/', 1)[-1], 'kind': kind} for p in paths]
+
+
+@pytest.mark.backend
+def test_resolves_links_concurrently_with_bound():
+    paths = [f'/CRM/render{i}.jpg' for i in range(10)]
+    api = _FakeYandexApi({p: f'md5-{p}' for p in paths})
+
+    resolved = asyncio.run(resolve_relay_files(
+        _items(paths), api, cache=TelegramFileIdCache(), concurrency=4))
+
+    assert [r['yandex_path'] for r in resolved] == paths
+    assert all(r['href'].endswith(r['yandex_path']) for r in resolved)
+    assert resolved[0]['version'] == 'md5-/CRM/render0.jpg'
+    assert api.max_active == 4
+
+
+@pytest.mark.backend
+def test_sent_files_reused_by_file_id():
+    paths = ['/CRM/a.jpg', '/CRM/b.jpg']
+    api = _FakeYandexApi({p: 'v1' for p in paths})
+    cache = TelegramFileIdCache()
+
+    first = asyncio.run(resolve_relay_files(_items(paths), api, cache=cache))
+    remember_sent(first, [{'message_id': 1, 'file_id': 'AgA-a'},
+                          {'message_id': 2, 'file_id': 'AgA-b'}], cache)
+
+    api.calls.clear()
+    again = asyncio.run(resolve_relay_files(_items(paths), api, cache=cache))
+    assert [r['file_id'] for r in again] == ['AgA-a', 'AgA-b']
+    assert 'href' not in again[0]
+    assert api.downloads() == []
+
+    # Другой вид отправки и изменённый файл — снова загрузка
+    api.files['/CRM/b.jpg'] = 'v2'
+    mixed = asyncio.run(resolve_relay_files(
+        _items(['/CRM/a.jpg'], kind='document') + _items(['/CRM/b.jpg']), api, cache=cache))
+    assert all('href' in r for r in mixed)
+
+
+@pytest.mark.backend
+def test_missing_file_skipped():
+    api = _FakeYandexApi({'/CRM/a.pdf': 'v1'})
+    resolved = asyncio.run(resolve_relay_files(
+        _items(['/CRM/a.pdf', '/CRM/gone.pdf'], kind='document'), api,
+        cache=TelegramFileIdCache()))
+    assert [r['file_name'] for r in resolved] == ['a.pdf']
+
+
+@pytest.mark.backend
+def test_failed_send_drops_cached_file_ids():
+    cache = TelegramFileIdCache()
+    cache.put('/CRM/a.jpg', 'v1', 'photo', 'stale')
+    items = [{'yandex_path': '/CRM/a.jpg', 'version': 'v1', 'kind': 'photo', 'file_id': 'stale'},
+             {'yandex_path': '/CRM/b.jpg', 'version': 'v1', 'kind': 'photo', 'href': 'h'}]
+
+    remember_sent(items, None, cache)
+
+    assert cache.get('/CRM/a.jpg', 'v1', 'photo') is None
+    assert len(cache) == 0
+
+
+@pytest.mark.backend
+def test_file_id_cache_is_bounded():
+    cache = TelegramFileIdCache(max_entries=2)
+    for i in range(3):
+        cache.put(f'/p{i}', 'v', 'photo', f'id{i}')
+    assert len(cache) == 2
+    assert cache.get('/p0', 'v', 'photo') is None
+    assert cache.get('/p2', 'v', 'photo') == 'id2'
+    assert cache.get('/p2', None, 'photo') is None
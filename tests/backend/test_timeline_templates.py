@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Скомпилированные шаблоны таблицы сроков (server/services/timeline_service.py):
+- шаблон компилируется один раз, построение таблицы не обращается к БД
+- сброс кэша после изменения norm_days_templates, приоритет шаблона агента
+- пакетная вставка записей и пересчёт таблиц всех договоров по шаблону
+"""
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from tests.backend.conftest import memory_engine, server_modules  # noqa: E402
+
+with server_modules() as _modules:
+    server_db = _modules['database']
+    from server.services import timeline_service as ts
+sys.modules.pop('server.services.timeline_service', None)
+
+NormDaysTemplate = server_db.NormDaysTemplate
+ProjectTimelineEntry = server_db.ProjectTimelineEntry
+Contract = server_db.Contract
+
+FULL = 'Полный (с 3д визуализацией)'
+
+
+@pytest.fixture
+def engine():
+    engine = memory_engine(server_db.Base.metadata)
+    # StaticPool: PRAGMA действует на единственное соединение всех сессий
+    with engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA foreign_keys=OFF')
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    factory = sessionmaker(bind=engine)
+    cache = ts.TimelineTemplateCache()
+    with patch.object(ts, 'SessionLocal', factory), patch.object(ts, '_template_cache', cache):
+        yield factory
+
+
+def _count_selects(engine):
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _track(conn, cursor, statement, *args):
+        if 'norm_days_templates' in statement:
+            statements.append(statement)
+
+    return statements
+
+
+def _custom(db, stage_code, base, k=0, agent='Все агенты', subtype=FULL):
+    db.add(NormDaysTemplate(
+        project_type='Индивидуальный', project_subtype=subtype, stage_code=stage_code,
+        stage_name=stage_code, stage_group='STAGE1', base_norm_days=base, k_multiplier=k,
+        executor_role='Чертежник', is_in_contract_scope=True, sort_order=1, agent_type=agent,
+    ))
+    db.commit()
+
+
+def _raw(entries, code):
+    return next(e['raw_norm_days'] for e in entries if e['stage_code'] == code)
+
+
+@pytest.mark.backend
+def test_template_compiled_once_for_many_builds(engine, session_factory):
+    selects = _count_selects(engine)
+    for area in (60, 120, 250, 400):
+        entries, term, K = ts.build_project_timeline_template('Индивидуальный', area, FULL)
+        assert term > 0 and _raw(entries, 'S1_1_01') == 4 + K * 2
+    assert len(selects) == 1
+
+
+@pytest.mark.backend
+def test_invalidation_picks_up_custom_template(session_factory):
+    entries, _, K = ts.build_project_timeline_template('Индивидуальный', 250, FULL)
+    assert _raw(entries, 'S1_1_01') == 4 + K * 2
+
+    db = session_factory()
+    _custom(db, 'S1_1_01', 10, 1)
+    db.close()
+    # Без сброса — прежний шаблон из кэша
+    assert _raw(ts.build_project_timeline_template('Индивидуальный', 250, FULL)[0], 'S1_1_01') == 4 + K * 2
+
+    ts.invalidate_timeline_templates('Индивидуальный', FULL)
+    entries, _, _ = ts.build_project_timeline_template('Индивидуальный', 250, FULL)
+    assert _raw(entries, 'S1_1_01') == 10 + K
+    # Подтип None хранится в БД как «Полный» — сбрасывается тем же вызовом
+    assert _raw(ts.build_project_timeline_template('Индивидуальный', 250)[0], 'S1_1_01') == 10 + K
+
+
+@pytest.mark.backend
+def test_agent_template_has_priority(session_factory):
+    db = session_factory()
+    _custom(db, 'S1_1_01', 10)
+    _custom(db, 'S1_1_01', 20, agent='Петрович')
+    db.close()
+
+    assert _raw(ts.build_project_timeline_template('Индивидуальный', 50, FULL, 'Петрович')[0], 'S1_1_01') == 20
+    assert _raw(ts.build_project_timeline_template('Индивидуальный', 50, FULL, 'Иваныч')[0], 'S1_1_01') == 10
+    assert _raw(ts.build_project_timeline_template('Индивидуальный', 50, FULL)[0], 'S1_1_01') == 10
+
+
+@pytest.mark.backend
+def test_cache_entries_expire():
+    clock = [0.0]
+    cache = ts.TimelineTemplateCache(ttl=60, clock=lambda: clock[0])
+    cache.put(('Индивидуальный', None, 'Все агенты'), 'tpl')
+    clock[0] = 30
+    assert cache.get(('Индивидуальный', None, 'Все агенты')) == 'tpl'
+    clock[0] = 61
+    assert cache.get(('Индивидуальный', None, 'Все агенты')) is None
+
+
+@pytest.mark.backend
+def test_reapply_updates_all_affected_contracts(session_factory):
+    db = session_factory()
+    contracts = []
+    for i, (subtype, area) in enumerate([(FULL, 100), (None, 300), ('Планировочный', 100)]):
+        contract = Contract(client_id=1, project_type='Индивидуальный', project_subtype=subtype,
+                            contract_number=f'Д-{i}', area=area, agent_type=None)
+        db.add(contract)
+        db.flush()
+        entries, _, _ = ts.build_contract_timeline('Индивидуальный', subtype, area, db=db)
+        assert ts.insert_timeline_entries(db, contract.id, entries) == len(entries)
+        contracts.append(contract.id)
+    db.commit()
+
+    entry = db.query(ProjectTimelineEntry).filter(
+        ProjectTimelineEntry.contract_id == contracts[0],
+        ProjectTimelineEntry.stage_code == 'S1_1_01').one()
+    entry.actual_date = '2026-03-02'
+    db.commit()
+
+    _custom(db, 'S1_1_01', 30, 1)
+    result = ts.reapply_timeline_template(db, 'Индивидуальный', FULL)
+    db.commit()
+
+    assert result['contracts'] == 2
+    rows = {(r.contract_id, r.stage_code): r for r in db.query(ProjectTimelineEntry)}
+    assert rows[(contracts[0], 'S1_1_01')].raw_norm_days == 30
+    assert rows[(contracts[0], 'S1_1_01')].actual_date == '2026-03-02'
+    assert rows[(contracts[1], 'S1_1_01')].raw_norm_days == 32
+    # Другой подтип не затронут
+    assert rows[(contracts[2], 'S1_1_01')].raw_norm_days == 4
+    db.close()
@@ -786,6 +786,20 @@ class TestMiscMixin:
         assert result is False
         assert api._is_online is False
 
+    def test_get_notifications_follows_cursor(self, api):
+        """get_notifications — проходит страницы по X-Next-Cursor до последней."""
+        pages = [
+            _make_response(200, [{'id': 3}, {'id': 2}], headers={'X-Next-Cursor': 'c1'}),
+            _make_response(200, [{'id': 1}]),
+        ]
+        with patch.object(api, '_request', side_effect=pages) as req:
+            result = api.get_notifications(unread_only=True)
+
+        assert result == [{'id': 3}, {'id': 2}, {'id': 1}]
+        params = [c.kwargs['params'] for c in req.call_args_list]
+        assert params == [{'unread_only': True, 'limit': 200},
+                          {'unread_only': True, 'limit': 200, 'cursor': 'c1'}]
+
     def test_search(self, api):
         """search — GET /api/search с q, limit, entity_types."""
         results = {'clients': [{'id': 1}], 'contracts': []}
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Календарь рабочих дней (utils/business_calendar.py):
+- совпадение с прежними расчётами циклом по дням
+- серверная копия модуля совпадает с клиентской
+- своя таблица праздников, расширение диапазона лет
+- скорость calc_planned_dates на 1000 договорах
+"""
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from utils.business_calendar import RUSSIAN_HOLIDAYS, BusinessCalendar  # noqa: E402
+from utils.timeline_calc import calc_planned_dates  # noqa: E402
+
+
+# ============================================================================
+# Прежние реализации (цикл по дням) — эталон
+# ============================================================================
+
+def _old_is_working(d):
+    return d.weekday() not in (5, 6) and (d.month, d.day) not in RUSSIAN_HOLIDAYS
+
+
+def _old_networkdays(start, end):
+    count = 0
+    while start < end:
+        count += _old_is_working(start)
+        start += timedelta(days=1)
+    return count
+
+
+def _old_add(start, days):
+    added = 0
+    while added < days:
+        start += timedelta(days=1)
+        if _old_is_working(start):
+            added += 1
+    return start
+
+
+def _old_count_business_days(start, end):
+    days = 0
+    current = start
+    while current < end:
+        if _old_is_working(current):
+            days += 1
+        current += timedelta(days=1)
+    return days
+
+
+@pytest.fixture(scope='module')
+def calendar():
+    return BusinessCalendar()
+
+
+class TestParity:
+    """Совпадение с циклом по дням на случайных датах"""
+
+    def test_networkdays_and_add(self, calendar):
+        rnd = random.Random(38)
+        for _ in range(500):
+            start = date(2020, 1, 1) + timedelta(days=rnd.randrange(3000))
+            span = rnd.randrange(-5, 120)
+            days = rnd.randrange(0, 90)
+            end = start + timedelta(days=span)
+            assert calendar.networkdays(start, end) == (_old_networkdays(start, end) if span >= 0 else 0)
+            assert calendar.add_working_days(start, days) == _old_add(start, days)
+            assert calendar.working_days_between(start, end) == (
+                _old_networkdays(start + timedelta(days=1), end + timedelta(days=1)) if span > 0 else 0)
+
+    def test_elapsed_keeps_datetime_semantics(self, calendar):
+        rnd = random.Random(1)
+        for _ in range(300):
+            start = datetime(2024, 12, 20, 17, 30) + timedelta(hours=rnd.randrange(2000))
+            end = start + timedelta(minutes=rnd.randrange(0, 60 * 24 * 40))
+            assert calendar.working_days_elapsed(start, end) == _old_count_business_days(start, end)
+
+    def test_result_type_follows_input(self, calendar):
+        assert calendar.add_working_days('2026-01-09', 1) == '2026-01-12'
+        assert calendar.add_working_days(datetime(2026, 1, 9, 15, 45), 1) == datetime(2026, 1, 12, 15, 45)
+        assert calendar.add_working_days(date(2025, 12, 31), 1) == date(2026, 1, 9)
+        assert calendar.add_working_days('2026-01-09', 0) == '2026-01-09'
+        assert calendar.add_working_days('2026-01-09', 1.5) == '2026-01-13'
+        assert calendar.add_working_days('bad', 3) == 'bad'
+
+
+class TestConfiguration:
+
+    def test_custom_holiday_table(self):
+        calendar = BusinessCalendar.from_table({
+            'annual': [[12, 25]],
+            'holidays': ['2026-07-07'],
+            'workdays': ['2026-07-11'],
+        })
+        assert not calendar.is_working_day('2026-12-25')
+        assert calendar.is_working_day('2026-01-05')
+        assert not calendar.is_working_day('2026-07-07')
+        assert calendar.is_working_day('2026-07-11')
+        assert calendar.networkdays('2026-07-06', '2026-07-13') == 5
+
+    def test_range_extends_on_demand(self):
+        calendar = BusinessCalendar(first_year=2025, last_year=2025)
+        assert calendar.add_working_days('2025-12-30', 3) == '2026-01-12'
+        assert calendar.networkdays('1999-12-27', '2000-01-10') == _old_networkdays(
+            date(1999, 12, 27), date(2000, 1, 10))
+        assert calendar.first_year <= 1998 and calendar.last_year >= 2026
+
+    def test_server_copy_is_identical(self):
+        client = (PROJECT_ROOT / 'utils' / 'business_calendar.py').read_bytes()
+        server = (PROJECT_ROOT / 'server' / 'services' / 'business_calendar.py').read_bytes()
+        assert client == server, 'server/services/business_calendar.py разошёлся с utils/'
+
+
+def test_calc_planned_dates_benchmark():
+    """1000 договоров по 60 подэтапов — пересчёт всех планируемых дат"""
+    contracts = []
+    for i in range(1000):
+        entries = [{'stage_code': 'START', 'actual_date': (date(2025, 1, 1) + timedelta(days=i % 365)).isoformat(),
+                    'executor_role': ''}]
+        entries += [{'stage_code': f'S{j}', 'norm_days': 1 + (i + j) % 15, 'actual_date': '',
+                     'executor_role': 'designer'} for j in range(60)]
+        contracts.append(entries)
+
+    started = time.perf_counter()
+    for entries in contracts:
+        calc_planned_dates(entries)
+    elapsed = time.perf_counter() - started
+
+    sample = contracts[7]
+    expected = _old_add(date.fromisoformat(sample[0]['actual_date']), sample[1]['norm_days'])
+    assert sample[1]['_planned_date'] == expected.isoformat()
+    print(f"\ncalc_planned_dates: {len(contracts)} договоров за {elapsed:.3f} с "
+          f"({len(contracts) * 60 / elapsed:.0f} дат/с)")
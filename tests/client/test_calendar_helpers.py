@@ -23,8 +23,8 @@ class TestWorkingDaysBetween:
 
     def test_monday_to_friday_five_days(self):
         """Пн → Пт = 5 рабочих дней (не считая старт, считая конец)."""
-        # 2024-01-01 Пн, 2024-01-05 Пт
-        result = working_days_between('2024-01-01', '2024-01-05')
+        # 2024-03-11 Пн, 2024-03-15 Пт (без праздников РФ)
+        result = working_days_between('2024-03-11', '2024-03-15')
         assert result == 4, f"Пн→Пт ожидается 4, получено {result}"
 
     def test_same_date_returns_zero(self):
@@ -59,8 +59,8 @@ class TestWorkingDaysBetween:
 
     def test_week_excludes_weekend(self):
         """Пн → следующий Пн = 5 рабочих дней (сб и вс не считаются)."""
-        # 2024-01-01 (Пн) → 2024-01-08 (Пн) = 5 рабочих дней
-        result = working_days_between('2024-01-01', '2024-01-08')
+        # 2024-03-11 (Пн) → 2024-03-18 (Пн) = 5 рабочих дней
+        result = working_days_between('2024-03-11', '2024-03-18')
         assert result == 5, f"Пн→след.Пн ожидается 5, получено {result}"
 
     def test_invalid_date_format_returns_zero(self):
@@ -70,8 +70,8 @@ class TestWorkingDaysBetween:
 
     def test_two_weeks_ten_working_days(self):
         """Две рабочие недели = 10 рабочих дней."""
-        # 2024-01-01 Пн → 2024-01-15 Пн = 10 рабочих дней
-        result = working_days_between('2024-01-01', '2024-01-15')
+        # 2024-03-11 Пн → 2024-03-25 Пн = 10 рабочих дней
+        result = working_days_between('2024-03-11', '2024-03-25')
         assert result == 10, f"Две недели ожидается 10, получено {result}"
 
 
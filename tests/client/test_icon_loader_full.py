@@ -23,6 +23,15 @@ def _make_mock_qicon(is_null=False):
     return icon
 
 
+@pytest.fixture(autouse=True)
+def _clear_icon_cache():
+    """Кэш иконок общий для процесса — очищаем, чтобы моки не попадали в другие тесты"""
+    from utils.icon_loader import IconLoader
+    IconLoader.clear_cache()
+    yield
+    IconLoader.clear_cache()
+
+
 # ==================== load() — загрузка SVG иконки ====================
 
 class TestIconLoaderLoad:
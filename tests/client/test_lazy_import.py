@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Unit-тесты для utils/lazy_import.py
+Отложенный импорт вкладок и профилировщик времени импорта.
+"""
+import sys
+import os
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+import pytest
+
+from utils.lazy_import import lazy_class, LazyAttr, ImportProfiler
+
+
+def test_lazy_class_does_not_import_until_call():
+    """Модуль импортируется только при первом вызове прокси."""
+    sys.modules.pop('colorsys', None)
+    proxy = lazy_class('colorsys', 'rgb_to_hsv')
+    assert isinstance(proxy, LazyAttr)
+    assert 'colorsys' not in sys.modules
+    assert proxy(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert 'colorsys' in sys.modules
+
+
+def test_lazy_class_proxies_attributes_and_isinstance():
+    """Атрибуты класса и isinstance работают через прокси."""
+    proxy = lazy_class('collections', 'OrderedDict')
+    obj = proxy(a=1)
+    assert isinstance(obj, proxy)
+    assert proxy.fromkeys(['x'])['x'] is None
+    assert proxy.resolve() is __import__('collections').OrderedDict
+    assert 'loaded' in repr(proxy)
+
+
+def test_lazy_class_missing_attr_raises_on_resolve():
+    """Ошибка имени проявляется при первом использовании, а не при объявлении."""
+    proxy = lazy_class('collections', 'NoSuchClass')
+    with pytest.raises(AttributeError):
+        proxy()
+
+
+def test_import_profiler_records_new_modules():
+    """Профилировщик фиксирует впервые загружаемые модули и метки."""
+    sys.modules.pop('this_module_does_not_exist_xyz', None)
+    sys.modules.pop('netrc', None)
+    with ImportProfiler() as profiler:
+        __import__('netrc')
+        profiler.mark('after_netrc')
+    assert 'netrc' in profiler.records
+    rec = profiler.records['netrc']
+    assert rec['total_ms'] >= rec['self_ms'] >= 0
+    assert 'after_netrc' in profiler.marks
+    data = profiler.to_dict()
+    assert 'netrc' in data['modules']
+    assert 'STARTUP IMPORT PROFILE' in profiler.format_report()
+
+
+def test_import_profiler_restores_builtin_import():
+    import builtins
+    orig = builtins.__import__
+    profiler = ImportProfiler().start()
+    assert builtins.__import__ is not orig
+    profiler.stop()
+    assert builtins.__import__ is orig
+
+
+def test_login_window_import_does_not_load_heavy_modules():
+    """Окно входа не тянет главное окно, вкладки и тяжёлые библиотеки."""
+    pytest.importorskip('PyQt5')
+    code = (
+        "import sys, ui.login_window\n"
+        "heavy = [m for m in ('ui.main_window', 'ui.crm_tab', 'ui.reports_tab',"
+        " 'matplotlib', 'reportlab', 'fitz', 'openpyxl') if m in sys.modules]\n"
+        "print(','.join(heavy))\n"
+    )
+    env = dict(os.environ, QT_QPA_PLATFORM='offscreen')
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1:] in ([], ['']), result.stdout
@@ -11,6 +11,7 @@
 - fit_image (масштабирование, пропорции)
 - chart_to_png (None-safety, matplotlib)
 - build_table_pdf (генерация файла, landscape/portrait, status_colors)
+- build_table_pdf_async (фоновая сборка, ошибка в GUI-поток)
 - open_file (платформы)
 """
 import pytest
@@ -339,6 +340,43 @@ class TestBuildTablePdf:
         assert os.path.exists(output)
 
 
+# ==================== build_table_pdf_async ====================
+
+class TestBuildTablePdfAsync:
+    """build_table_pdf_async — сборка PDF в фоновом потоке."""
+
+    def test_builds_in_background(self, qapp, tmp_path):
+        from utils.pdf_utils import build_table_pdf_async
+        output = str(tmp_path / 'async.pdf')
+        future = build_table_pdf_async(
+            None,
+            output_path=output,
+            title='Фоновый отчёт',
+            headers=['A'],
+            rows=[[str(i)] for i in range(200)],
+            auto_open=False,
+        )
+        assert future.result(timeout=30) is None
+        assert os.path.getsize(output) > 0
+
+    def test_error_reported_in_gui_thread(self, qapp, tmp_path):
+        """Ошибка сборки доходит до CustomMessageBox через сигнал."""
+        from utils.pdf_utils import build_table_pdf_async
+        with patch('ui.custom_message_box.CustomMessageBox') as mock_box:
+            future = build_table_pdf_async(
+                None,
+                output_path=str(tmp_path / 'missing' / 'dir' / 'x.pdf'),
+                title='Ошибка',
+                headers=['A'],
+                rows=[['1']],
+                auto_open=False,
+            )
+            assert future.exception(timeout=30) is not None
+            qapp.processEvents()
+        mock_box.assert_called_once()
+        assert mock_box.call_args[0][3] == 'error'
+
+
 # ==================== open_file ====================
 
 class TestOpenFile:
@@ -464,6 +464,22 @@ class TestSendHeartbeat:
         sync_manager._send_heartbeat()
         mock_api._request.assert_not_called()
 
+    def test_heartbeat_renews_locks_in_one_request(self, sync_manager, mock_api):
+        """_send_heartbeat — продлевает свои блокировки одним запросом, потерянные убирает."""
+        mock_api.is_online = True
+        sync_manager._locked_records = {'client': {1: '1'}, 'contract': {7: '1'}}
+        mock_api._request.side_effect = [
+            _make_response(200, {"online_users": []}),
+            _make_response(200, {"renewed": [{"entity_type": "client", "entity_id": 1}],
+                                 "lost": [{"entity_type": "contract", "entity_id": 7}]}),
+        ]
+        sync_manager._send_heartbeat()
+
+        renew_call = mock_api._request.call_args_list[1]
+        assert renew_call.args[1].endswith('/api/v1/locks/renew')
+        assert len(renew_call.kwargs['json']['keys']) == 2
+        assert sync_manager._locked_records == {'client': {1: '1'}, 'contract': {}}
+
 
 # ============================================================================
 # EditLockContext
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Сканирование папки проекта на Яндекс.Диске:
+- server/yandex_disk_service.py: list_folder с offset-пагинацией
+- server/services/yandex_scanner.py: параллельный обход в ширину, кэш листингов
+- utils/yandex_disk.py: постраничный get_folder_contents, параллельный scan_contract_files
+"""
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from server.services.yandex_scanner import (
+    FolderListingCache, path_variants, publish_files, scan_project_tree,
+)
+from server.yandex_disk_service import YandexDiskService
+
+
+def _paged_session(total, page_size):
+    """Session.get, отдающий папку из total файлов страницами"""
+    def get(url, params=None, **kwargs):
+        offset, limit = params['offset'], params['limit']
+        items = [{'name': f'{i}.jpg', 'type': 'file', 'path': f'disk:/p/{i}.jpg'}
+                 for i in range(offset, min(offset + limit, total))]
+        resp = MagicMock(status_code=200)
+        resp.json.return_value = {'path': 'disk:/p', 'modified': 'm',
+                                  '_embedded': {'items': items, 'total': total}}
+        return resp
+    return MagicMock(side_effect=get)
+
+
+class _FakeDisk:
+    """Дерево папок в памяти: path -> (modified, items)"""
+
+    def __init__(self, tree, delay=0.0):
+        self.tree = tree
+        self.delay = delay
+        self.listed = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def list_folder(self, path, fields=None):
+        with self._lock:
+            self.listed.append(path)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if path not in self.tree:
+            raise Exception('404')
+        modified, items = self.tree[path]
+        return {'path': path, 'modified': modified, 'items': items}
+
+
+def _dir(path, modified='m1'):
+    return {'name': path.rsplit('/', 1)[-1], 'type': 'dir', 'path': path, 'modified': modified}
+
+
+def _file(path, md5='x'):
+    return {'name': path.rsplit('/', 1)[-1], 'type': 'file', 'path': path, 'md5': md5}
+
+
+def _project_tree():
+    root = 'disk:/CRM/Дог'
+    s2 = f'{root}/2 стадия - Концепция дизайна'
+    return root, {
+        root: ('r1', [_dir(f'{root}/Замер'), _dir(s2), _file(f'{root}/readme.txt')]),
+        f'{root}/Замер': ('m1', [_file(f'{root}/Замер/plan.pdf')]),
+        s2: ('m1', [_dir(f'{s2}/3D визуализация'), _dir(f'{s2}/правки')]),
+        f'{s2}/правки': ('m1', [_file(f'{s2}/правки/old.jpg')]),
+        f'{s2}/3D визуализация': ('m1', [_dir(f'{s2}/3D визуализация/Вариация 1')]),
+        f'{s2}/3D визуализация/Вариация 1': ('m1', [
+            _file(f'{s2}/3D визуализация/Вариация 1/{i}.jpg') for i in range(3)]),
+    }
+
+
+def test_list_folder_follows_pagination():
+    yd = YandexDiskService.__new__(YandexDiskService)
+    yd.base_url = 'https://cloud-api.yandex.net/v1/disk'
+    yd.headers = {}
+    session = MagicMock()
+    session.get = _paged_session(total=450, page_size=200)
+
+    with patch.object(YandexDiskService, '_http_session', session):
+        items = yd.list_files('disk:/p')
+
+    assert len(items) == 450
+    assert [c.kwargs['params']['offset'] for c in session.get.call_args_list] == [0, 200, 400]
+
+
+def test_scan_project_tree_stages_and_skips_revisions():
+    root, tree = _project_tree()
+    disk = _FakeDisk(tree)
+
+    found = scan_project_tree(disk, root, cache=FolderListingCache())
+
+    stages = {f['file_name']: f['stage'] for f in found}
+    assert stages == {'plan.pdf': 'measurement', '0.jpg': 'stage2_3d',
+                      '1.jpg': 'stage2_3d', '2.jpg': 'stage2_3d'}
+    assert not any('правки' in p for p in disk.listed)
+    assert found[0]['md5'] == 'x'
+
+
+def test_scan_lists_level_concurrently_with_bound():
+    root = 'disk:/CRM/Big'
+    tree = {root: ('r', [_dir(f'{root}/Замер {i}') for i in range(12)])}
+    tree.update({f'{root}/Замер {i}': ('m', [_file(f'{root}/Замер {i}/a.pdf')]) for i in range(12)})
+    disk = _FakeDisk(tree, delay=0.03)
+
+    found = scan_project_tree(disk, root, workers=4, cache=FolderListingCache())
+
+    assert len(found) == 12
+    assert disk.max_active == 4
+
+
+def test_unchanged_folders_served_from_cache():
+    root, tree = _project_tree()
+    cache = FolderListingCache()
+    scan_project_tree(_FakeDisk(tree), root, cache=cache)
+
+    disk = _FakeDisk(tree)
+    again = scan_project_tree(disk, root, cache=cache)
+
+    # Корень листается всегда; подпапки с тем же modified — из кэша,
+    # а их подпапки (устаревшие записи из кэша) — заново
+    s2 = f'{root}/2 стадия - Концепция дизайна'
+    assert sorted(disk.listed) == sorted([root, f'{s2}/3D визуализация'])
+    assert len(again) == 4
+
+    # Изменилась папка — её листинг запрашивается снова
+    tree[root][1][0]['modified'] = 'm2'
+    tree[f'{root}/Замер'] = ('m2', [_file(f'{root}/Замер/plan.pdf'), _file(f'{root}/Замер/b.pdf')])
+    disk = _FakeDisk(tree)
+    assert len(scan_project_tree(disk, root, cache=cache)) == 5
+    assert f'{root}/Замер' in disk.listed
+
+
+def test_listing_error_skips_folder():
+    root, tree = _project_tree()
+    del tree[f'{root}/Замер']
+    found = scan_project_tree(_FakeDisk(tree), root, cache=FolderListingCache())
+    assert {f['stage'] for f in found} == {'stage2_3d'}
+
+
+def test_listing_cache_is_bounded():
+    cache = FolderListingCache(max_entries=2)
+    for i in range(3):
+        cache.put(f'/p{i}', 'm', [i])
+    assert len(cache) == 2
+    assert cache.get('/p0', 'm') is None
+    assert cache.get('/p2', 'm') == [2]
+    assert cache.get('/p2', 'other') is None
+
+
+def test_path_variants_and_publish():
+    assert path_variants('disk:/CRM/a.pdf') >= {'disk:/CRM/a.pdf', '/CRM/a.pdf', 'CRM/a.pdf'}
+    yd = MagicMock()
+    yd.get_public_link.side_effect = lambda p: (_ for _ in ()).throw(Exception()) if 'bad' in p else 'L' + p
+    assert publish_files(yd, ['/a', '/bad']) == {'/a': 'L/a', '/bad': ''}
+    assert publish_files(yd, []) == {}
+
+
+def test_client_folder_contents_paginated():
+    from utils.yandex_disk import YandexDiskManager
+    mgr = YandexDiskManager.__new__(YandexDiskManager)
+    mgr.token = 'test-token'
+    mgr.base_url = 'https://cloud-api.yandex.net/v1/disk'
+    mgr.session = MagicMock()
+    mgr.session.get = _paged_session(total=2500, page_size=YandexDiskManager.LIST_PAGE_SIZE)
+
+    items = mgr.get_folder_contents('disk:/p')
+
+    assert len(items) == 2500
+    assert mgr.session.get.call_count == 3
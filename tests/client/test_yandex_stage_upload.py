@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Параллельная загрузка файлов стадии: YandexDiskManager.upload_stage_files,
+upload_file_with_retry, кэш папок ensure_folder.
+"""
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.yandex_disk import (
+    YandexDiskManager, YandexDiskNetworkError, YandexDiskRateLimitError, YandexDiskServerError,
+    YandexDiskTokenError,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_folder_cache():
+    YandexDiskManager._folder_cache.clear()
+    yield
+    YandexDiskManager._folder_cache.clear()
+
+
+@pytest.fixture
+def manager():
+    mgr = YandexDiskManager.__new__(YandexDiskManager)
+    mgr.token = 'test-token'
+    mgr.base_url = 'https://cloud-api.yandex.net/v1/disk'
+    mgr.archive_root = '/test_root'
+    mgr.session = MagicMock()
+    mgr.create_folder = MagicMock(return_value=True)
+    return mgr
+
+
+def _files(n):
+    return [f'/tmp/render_{i:02d}.jpg' for i in range(n)]
+
+
+class _SlowUploader:
+    """upload_file с задержкой; считает одновременно активные загрузки"""
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, local_path, yandex_path):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if local_path in self.fail:
+            raise Exception('ошибка загрузки')
+        return True
+
+
+def test_uploads_run_concurrently_and_keep_order(manager):
+    uploader = _SlowUploader()
+    manager.upload_file = uploader
+    manager.get_public_link = MagicMock(side_effect=lambda p: f'https://disk.yandex.ru/i/{p[-6:]}')
+    files = _files(12)
+
+    started = time.monotonic()
+    result = manager.upload_stage_files(files, '/CRM/Договор', 'stage2_3d', variation=1)
+    elapsed = time.monotonic() - started
+
+    assert uploader.max_active == YandexDiskManager.UPLOAD_WORKERS
+    assert elapsed < 12 * uploader.delay
+    assert [r['local_path'] for r in result] == files
+    assert result[0]['yandex_path'] == \
+        '/CRM/Договор/2 стадия - Концепция дизайна/3D визуализация/Вариация 1/render_00.jpg'
+    assert result[0]['public_link'].startswith('https://disk.yandex.ru/i/')
+    assert manager.get_public_link.call_count == 12
+
+
+def test_progress_reported_in_order(manager):
+    manager.upload_file = _SlowUploader(delay=0.01, fail={'/tmp/render_03.jpg'})
+    manager.get_public_link = MagicMock(return_value='')
+    calls = []
+
+    result = manager.upload_stage_files(
+        _files(10), '/CRM/Договор', 'stage1',
+        progress_callback=lambda cur, total, name, phase: calls.append((cur, total, phase)))
+
+    assert calls[0] == (0, 10, 'preparing')
+    uploading = [c for c in calls if c[2] == 'uploading']
+    assert [c[0] for c in uploading] == list(range(10))
+    assert all(c[1] == 10 for c in uploading)
+    # Упавший файл не попадает в результат; без ссылки — путь на ЯД
+    assert len(result) == 9
+    assert result[0]['public_link'] == result[0]['yandex_path']
+
+
+def test_skip_per_file_publish(manager):
+    manager.upload_file = _SlowUploader(delay=0)
+    manager.get_public_link = MagicMock()
+
+    result = manager.upload_stage_files(_files(3), '/CRM/Договор', 'references',
+                                        skip_per_file_publish=True)
+
+    manager.get_public_link.assert_not_called()
+    assert [r['public_link'] for r in result] == [r['yandex_path'] for r in result]
+
+
+def test_folders_created_once_and_cached(manager):
+    manager.upload_file = _SlowUploader(delay=0)
+    manager.get_public_link = MagicMock(return_value='link')
+
+    manager.upload_stage_files(_files(5), '/CRM/Договор', 'stage2_concept', variation=2)
+    manager.upload_stage_files(_files(5), '/CRM/Договор', 'stage2_concept', variation=2)
+
+    created = [c.args[0] for c in manager.create_folder.call_args_list]
+    assert created == [
+        '/CRM/Договор/2 стадия - Концепция дизайна',
+        '/CRM/Договор/2 стадия - Концепция дизайна/Концепция-коллажи',
+        '/CRM/Договор/2 стадия - Концепция дизайна/Концепция-коллажи/Вариация 2',
+    ]
+
+    manager.forget_folder('/CRM/Договор/2 стадия - Концепция дизайна')
+    manager.ensure_folder('/CRM/Договор/2 стадия - Концепция дизайна/Концепция-коллажи')
+    assert manager.create_folder.call_count == 4
+
+
+def test_failed_folder_is_not_cached(manager):
+    manager.create_folder = MagicMock(side_effect=[False, True])
+    assert manager.ensure_folder('/CRM/X') is False
+    assert manager.ensure_folder('/CRM/X') is True
+    assert manager.ensure_folder('/CRM/X') is True
+    assert manager.create_folder.call_count == 2
+
+
+@patch('utils.yandex_disk.time.sleep')
+def test_retry_on_rate_limit_and_server_errors(mock_sleep, manager):
+    manager.upload_file = MagicMock(side_effect=[
+        YandexDiskRateLimitError('429'), YandexDiskServerError('503'), True])
+
+    assert manager.upload_file_with_retry('/tmp/a.jpg', '/CRM/a.jpg') is True
+    assert manager.upload_file.call_count == 3
+    delays = [c.args[0] for c in mock_sleep.call_args_list]
+    assert len(delays) == 2 and delays[1] > delays[0]
+
+
+@patch('utils.yandex_disk.time.sleep')
+def test_no_retry_on_token_error(mock_sleep, manager):
+    manager.upload_file = MagicMock(side_effect=YandexDiskTokenError('401'))
+    with pytest.raises(YandexDiskTokenError):
+        manager.upload_file_with_retry('/tmp/a.jpg', '/CRM/a.jpg')
+    assert manager.upload_file.call_count == 1
+    mock_sleep.assert_not_called()
+
+
+def test_upload_file_classifies_server_errors(manager, tmp_path):
+    path = tmp_path / 'a.jpg'
+    path.write_bytes(b'x')
+    href = MagicMock(status_code=200)
+    href.json.return_value = {'href': 'https://uploader/put'}
+    manager.session.get.return_value = href
+    manager.session.put.return_value = MagicMock(status_code=503)
+
+    with pytest.raises(YandexDiskServerError):
+        manager.upload_file(str(path), '/CRM/a.jpg')
+
+
+def test_instances_share_pooled_session():
+    with patch.object(YandexDiskManager, '_shared_session', None):
+        first = YandexDiskManager('token-a')
+        second = YandexDiskManager('token-b')
+        assert first.session is second.session
+        adapter = first.session.get_adapter('https://cloud-api.yandex.net')
+        assert adapter._pool_maxsize >= YandexDiskManager.UPLOAD_WORKERS
+
+
+@patch('utils.yandex_disk.time.sleep')
+def test_network_error_not_retried_on_top_of_upload_file(mock_sleep, manager):
+    manager.upload_file = MagicMock(side_effect=YandexDiskNetworkError('reset'))
+    with pytest.raises(YandexDiskNetworkError):
+        manager.upload_file_with_retry('/tmp/a.jpg', '/CRM/a.jpg')
+    assert manager.upload_file.call_count == 1
+
+
+def test_upload_hosts_use_adapter_without_urllib3_retries():
+    with patch.object(YandexDiskManager, '_shared_session', None):
+        manager = YandexDiskManager('token-a')
+        adapters = dict(manager.session.adapters)
+
+        upload = manager.session.get_adapter('https://uploader1j.disk.yandex.net:443/upload-target/1')
+        api = manager.session.get_adapter('https://cloud-api.yandex.net/v1/disk')
+        assert upload.max_retries.total == 0
+        assert api.max_retries.status_forcelist
+        assert upload is manager.session.get_adapter('https://uploader9g.disk.yandex.net/x')
+        # Новые хосты загрузки не добавляют адаптеров во время работы
+        assert dict(manager.session.adapters) == adapters
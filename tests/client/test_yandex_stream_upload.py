@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковая загрузка файлов на Яндекс.Диск:
+- server/yandex_disk_service.py: ChunkedUploadReader, upload_stream (пул соединений)
+- utils/api_client/files_mixin.py: multipart-тело, читаемое блоками
+"""
+import io
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from server.yandex_disk_service import (
+    ChunkedUploadReader, UploadTooLarge, YandexDiskService,
+)
+
+
+MB = 1024 * 1024
+
+
+def _service():
+    yd = YandexDiskService.__new__(YandexDiskService)
+    yd.token = "valid_token"
+    yd.base_url = "https://cloud-api.yandex.net/v1/disk"
+    yd.headers = {"Authorization": "OAuth valid_token"}
+    return yd
+
+
+def _response(status, payload=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.json.return_value = payload or {}
+    return resp
+
+
+class _ConsumingSession:
+    """Имитация requests.Session: PUT читает тело так же, как http.client"""
+
+    def __init__(self):
+        self.max_block = 0
+        self.received = 0
+        self.put_headers_len = None
+
+    def get(self, url, **kwargs):
+        return _response(200, {"href": "https://uploader.disk.yandex.net/put"})
+
+    def put(self, url, data=None, **kwargs):
+        self.put_headers_len = len(data)
+        while True:
+            block = data.read(8192)
+            if not block:
+                break
+            self.max_block = max(self.max_block, len(block))
+            self.received += len(block)
+        return _response(201)
+
+
+class TestChunkedUploadReader:
+
+    def test_reads_in_bounded_chunks_and_reports_progress(self):
+        progress = []
+        reader = ChunkedUploadReader(io.BytesIO(b'x' * (3 * MB + 10)), 3 * MB + 10,
+                                     progress=lambda sent, total: progress.append(sent))
+        blocks = []
+        while True:
+            block = reader.read()
+            if not block:
+                break
+            blocks.append(len(block))
+
+        assert max(blocks) == MB
+        assert len(reader) == 3 * MB + 10
+        # Отчёт раз на мегабайт и в конце, без повторов
+        assert progress == [MB, 2 * MB, 3 * MB, 3 * MB + 10]
+
+    def test_size_limit_enforced_while_streaming(self):
+        # Заявленный размер меньше фактического — поток обрывается по ходу чтения
+        reader = ChunkedUploadReader(io.BytesIO(b'x' * (2 * MB)), MB, max_size=MB + 100)
+        reader.read()
+        with pytest.raises(UploadTooLarge):
+            reader.read()
+
+
+class TestUploadStream:
+
+    def test_streams_file_through_pooled_session(self, tmp_path):
+        yd = _service()
+        session = _ConsumingSession()
+        path = tmp_path / 'plan.dwg'
+        path.write_bytes(os.urandom(2 * MB + 123))
+
+        with patch.object(YandexDiskService, '_http_session', session), \
+                patch.object(yd, 'get_file_info', return_value={'name': 'plan.dwg'}), \
+                patch('server.yandex_disk_service.requests.put') as bare_put:
+            info = yd.upload_file(str(path), '/CRM/plan.dwg')
+
+        assert info == {'name': 'plan.dwg'}
+        assert session.received == 2 * MB + 123
+        assert session.put_headers_len == 2 * MB + 123
+        assert session.max_block <= MB
+        bare_put.assert_not_called()
+
+    def test_too_large_rejected_before_upload(self):
+        yd = _service()
+        session = MagicMock()
+        with patch.object(YandexDiskService, '_http_session', session):
+            with pytest.raises(UploadTooLarge):
+                yd.upload_stream(io.BytesIO(b'x' * 2048), '/CRM/a.zip', max_size=1024)
+        session.get.assert_not_called()
+        session.put.assert_not_called()
+
+    def test_upload_from_bytes_creates_parent_and_reports_progress(self):
+        yd = _service()
+        session = _ConsumingSession()
+        progress = []
+        with patch.object(YandexDiskService, '_http_session', session), \
+                patch.object(yd, 'create_folder') as create_folder, \
+                patch.object(yd, 'get_file_info', return_value={}):
+            yd.upload_stream(io.BytesIO(b'abc' * 1000), '/CRM/Папка/a.txt',
+                             progress=lambda sent, total: progress.append((sent, total)))
+
+        create_folder.assert_called_once_with('/CRM/Папка')
+        assert progress[-1] == (3000, 3000)
+
+
+class TestClientMultipartStream:
+
+    def test_body_matches_requests_multipart(self):
+        from urllib3.filepost import encode_multipart_formdata
+        from utils.api_client.files_mixin import _MultipartFileStream
+
+        data = os.urandom(600 * 1024)
+        stream = _MultipartFileStream(io.BytesIO(data), 'Планировка.pdf', len(data))
+        body = b''
+        while True:
+            block = stream.read(8192)
+            if not block:
+                break
+            body += block
+
+        boundary = stream.content_type.split('boundary=')[1]
+        expected, content_type = encode_multipart_formdata(
+            {'file': ('Планировка.pdf', data, 'application/octet-stream')}, boundary=boundary)
+        assert body == expected
+        assert content_type == stream.content_type
+        assert len(stream) == len(expected)
+
+    def test_upload_local_file_streams_with_progress(self, tmp_path):
+        from utils.api_client import APIClient
+
+        api = APIClient('http://localhost:8000')
+        api.token = 'tok'
+        path = tmp_path / 'photo.jpg'
+        path.write_bytes(b'p' * (700 * 1024))
+        progress = []
+
+        def _fake_request(method, url, **kwargs):
+            body = kwargs['data']
+            while body.read(8192):
+                pass
+            resp = MagicMock()
+            resp.status_code = 200
+            resp.json.return_value = {'status': 'success'}
+            return resp
+
+        with patch.object(api, '_request', side_effect=_fake_request) as req:
+            result = api.upload_local_file_to_yandex(
+                str(path), '/CRM/photo.jpg',
+                progress_callback=lambda sent, total: progress.append((sent, total)),
+                upload_id='u1')
+
+        assert result == {'status': 'success'}
+        _, kwargs = req.call_args
+        assert kwargs['params'] == {'yandex_path': '/CRM/photo.jpg', 'upload_id': 'u1'}
+        assert kwargs['retry'] is False
+        assert kwargs['headers']['Content-Type'].startswith('multipart/form-data; boundary=')
+        assert progress[-1][0] == progress[-1][1]
+        assert len(progress) > 3
+
+    def test_upload_reopens_file_after_token_refresh(self, tmp_path):
+        from utils.api_client import APIClient
+
+        api = APIClient('http://localhost:8000')
+        api.set_token('old', refresh_token='refresh')
+        path = tmp_path / 'plan.pdf'
+        path.write_bytes(b'x' * (300 * 1024))
+        sent = []
+
+        def _fake_session_request(method, url, **kwargs):
+            body = kwargs['data']
+            data = b''
+            while True:
+                block = body.read(8192)
+                if not block:
+                    break
+                data += block
+            sent.append((kwargs['headers']['Authorization'], len(data)))
+            resp = MagicMock()
+            resp.status_code = 401 if len(sent) == 1 else 200
+            resp.json.return_value = {'status': 'success'}
+            return resp
+
+        def _refresh():
+            api.set_token('new')
+            return True
+
+        with patch.object(api.session, 'request', side_effect=_fake_session_request), \
+                patch.object(api, 'refresh_access_token', side_effect=_refresh):
+            result = api.upload_local_file_to_yandex(str(path), '/CRM/plan.pdf')
+
+        assert result == {'status': 'success'}
+        # Второй запрос — заново открытый файл целиком, с новым токеном
+        assert sent == [('Bearer old', sent[0][1]), ('Bearer new', sent[0][1])]
+        assert sent[0][1] > 300 * 1024
+
+
+class TestRetryAfterRefresh:
+
+    def _client(self):
+        from utils.api_client import APIClient
+        api = APIClient('http://localhost:8000')
+        api.set_token('old', refresh_token='refresh')
+        return api
+
+    def _refresh(self, api):
+        def _do():
+            api.set_token('new')
+            return True
+        return _do
+
+    def _response(self, status):
+        resp = MagicMock()
+        resp.status_code = status
+        return resp
+
+    def test_stream_body_is_not_replayed(self):
+        api = self._client()
+        body = io.BytesIO(b'data')
+        with patch.object(api.session, 'request', return_value=self._response(401)) as req, \
+                patch.object(api, 'refresh_access_token', side_effect=self._refresh(api)):
+            response = api._request('POST', 'http://localhost:8000/api/v1/files/upload',
+                                    data=body, retry=False)
+
+        assert response.status_code == 401
+        assert req.call_count == 1
+
+    def test_retry_keeps_original_headers(self):
+        api = self._client()
+        headers = {'Content-Type': 'text/csv', 'X-Upload': '1', 'Authorization': 'Bearer old'}
+        with patch.object(api.session, 'request',
+                          side_effect=[self._response(401), self._response(200)]) as req, \
+                patch.object(api, 'refresh_access_token', side_effect=self._refresh(api)):
+            response = api._request('POST', 'http://localhost:8000/api/v1/import',
+                                    data=b'a;b', headers=headers, retry=False)
+
+        assert response.status_code == 200
+        _, kwargs = req.call_args
+        assert kwargs['headers'] == {
+            'Content-Type': 'text/csv', 'X-Upload': '1', 'Authorization': 'Bearer new'}
@@ -3,6 +3,7 @@
 Test proizvoditelnosti zagruzki UI komponentov.
 
 Zameryaet vremya:
+- Zapuska do okna vkhoda (main.py --profile-startup, otdelnyj process)
 - Avtorizacii cherez API
 - Sozdaniya MainWindow (init_ui bez vkladok)
 - setup_tabs() - sozdanie vsekh vkladok
@@ -10,13 +11,21 @@ Zameryaet vremya:
 - ensure_data_loaded() dlya kazhdoj vkladki (zagruzka dannykh)
 - Sozdaniya dashbordov
 - Otkrytiya CRM CardEditDialog
+- Kehsha ikonok pri postroenii doski CRM (IconLoader s kehshem i bez)
+- Pereschyota platezhej po tarifam na servere (repricing_service, SQLite v pamyati)
 
 Zapusk:
     .venv/Scripts/python.exe tests/test_performance.py
+    .venv/Scripts/python.exe tests/test_performance.py --startup-only
+    .venv/Scripts/python.exe tests/test_performance.py --icons-only
+    .venv/Scripts/python.exe tests/test_performance.py --repricing-only
 """
 import sys
 import os
 import io
+import json
+import subprocess
+import tempfile
 import time
 from contextlib import contextmanager
 from collections import OrderedDict
@@ -62,6 +71,193 @@ def bar_str(ms):
     return '#' * n
 
 
+# ========== STARTUP PROFILE ==========
+
+HEAVY_STARTUP_MODULES = ('matplotlib', 'reportlab', 'fitz', 'openpyxl', 'ui.main_window')
+
+
+def run_startup_profile(timeout=120):
+    """Zapustit main.py --profile-startup v chistom processe.
+
+    Vozvrashchaet dict iz ImportProfiler.to_dict() (marks + modules +
+    heavy_modules_before_login) ili None pri oshibke.
+    """
+    fd, out_path = tempfile.mkstemp(suffix='.json', prefix='startup_profile_')
+    os.close(fd)
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    try:
+        subprocess.run(
+            [sys.executable, os.path.join(BASE_DIR, 'main.py'), f'--profile-startup={out_path}'],
+            cwd=BASE_DIR, env=env, timeout=timeout,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        with open(out_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        print(f'  [ERROR] Startup profile failed: {e}')
+        return None
+    finally:
+        try:
+            os.remove(out_path)
+        except OSError:
+            pass
+
+
+def print_startup_profile(profile, limit=15):
+    print('-' * 70)
+    print('  STARTUP IMPORTS (top by total time)')
+    print('-' * 70)
+    modules = sorted(profile['modules'].items(), key=lambda kv: kv[1]['total_ms'], reverse=True)
+    for name, rec in modules[:limit]:
+        print(f'  {name[:45]:45s}  self {rec["self_ms"]:7.1f} ms  total {rec["total_ms"]:7.1f} ms')
+    heavy = profile.get('heavy_modules_before_login') or []
+    if heavy:
+        print(f'  [WARN] loaded before login window: {", ".join(heavy)}')
+    print()
+
+
+# ========== ICON CACHE ==========
+
+# Ikonki odnoj kartochki CRM (ui/crm_tab.py CRMCard): (imya, razmer) dlya
+# create_icon_button/load i (imya, cvet, razmer) dlya load_colored
+CRM_CARD_ICONS = [
+    ('box', 12), ('map-pin', 12), ('tag', 10), ('deadline', 10), ('edit', 12),
+    ('folder', 12), ('calendar-plus', 12), ('plus-circle', 12), ('team', 10),
+    ('chevron-right', 10),
+]
+CRM_CARD_COLORED_ICONS = [('calendar-plus', '#FFFFFF', 12), ('plus-circle', '#FFFFFF', 12)]
+
+
+def _build_board_icons(cards):
+    """Zaprosit i otrisovat ikonki dlya `cards` kartochek kak pri postroenii doski"""
+    from utils.icon_loader import IconLoader
+    for _ in range(cards):
+        for name, size in CRM_CARD_ICONS:
+            IconLoader.load(name).pixmap(size, size)
+        for name, color, size in CRM_CARD_COLORED_ICONS:
+            IconLoader.load_colored(name, color, size).pixmap(size, size)
+
+
+def run_icon_cache_benchmark(cards=150):
+    """Vremya ikonok doski CRM bez kehsha i s kehshem.
+
+    Vozvrashchaet dict {'no_cache_ms', 'cache_ms', 'stats'}.
+    QApplication dolzhen byt sozdan vyzyvayushchim.
+    """
+    from utils.icon_loader import IconLoader
+
+    IconLoader.clear_cache()
+    IconLoader.cache_enabled = False
+    try:
+        start = time.perf_counter()
+        _build_board_icons(cards)
+        no_cache_ms = (time.perf_counter() - start) * 1000
+    finally:
+        IconLoader.cache_enabled = True
+
+    IconLoader.preload()
+    start = time.perf_counter()
+    _build_board_icons(cards)
+    cache_ms = (time.perf_counter() - start) * 1000
+    return {'no_cache_ms': no_cache_ms, 'cache_ms': cache_ms,
+            'stats': IconLoader.cache_stats()}
+
+
+def print_icon_cache_benchmark(bench, cards=150):
+    saved = bench['no_cache_ms'] - bench['cache_ms']
+    stats = bench['stats']
+    print('-' * 70)
+    print(f'  ICON CACHE: CRM board, {cards} cards')
+    print('-' * 70)
+    print(f'  without cache:  {bench["no_cache_ms"]:8.1f} ms')
+    print(f'  with cache:     {bench["cache_ms"]:8.1f} ms  (saved {saved:.1f} ms)')
+    print(f'  cached icons: {stats["icons"]}, hits: {stats["hits"]}, misses: {stats["misses"]}')
+    print()
+
+
+REPRICING_ROLES = ['Дизайнер', 'Чертёжник', 'ДАН', 'Старший менеджер проектов', 'Замерщик']
+REPRICING_PROJECT_TYPES = ['Индивидуальный', 'Шаблонный', 'Авторский надзор']
+
+
+def _seed_repricing(db, server_db, payments, contracts):
+    """Tarify kak v tests/backend/test_repricing_service.py, platezhi vstavlyayutsya pachkoj"""
+    import random
+    from sqlalchemy import insert
+
+    rnd = random.Random(43)
+    Rate = server_db.Rate
+    db.add_all([
+        Rate(project_type='Индивидуальный', role='Дизайнер', rate_per_m2=100),
+        Rate(project_type='Индивидуальный', role='Дизайнер', stage_name='Стадия 2', rate_per_m2=150),
+        Rate(project_type='Индивидуальный', role='Чертёжник', stage_name='Стадия 1', rate_per_m2=40),
+        Rate(project_type='Шаблонный', role='Дизайнер', area_from=0, area_to=90, fixed_price=30000),
+        Rate(project_type='Шаблонный', role='Дизайнер', area_from=90, area_to=None, fixed_price=45000),
+        Rate(project_type='Авторский надзор', role='ДАН', stage_name='Стадия 1', rate_per_m2=20),
+        Rate(project_type='Авторский надзор', role='ДАН', rate_per_m2=10),
+        Rate(role='Замерщик', city='СПБ', surveyor_price=3000),
+        Rate(role='Замерщик', city='МСК', surveyor_price=4500),
+    ])
+    db.execute(insert(server_db.Contract), [
+        {'id': i + 1, 'client_id': 1, 'contract_number': f'N{i}',
+         'project_type': rnd.choice(REPRICING_PROJECT_TYPES), 'area': rnd.randint(20, 400) / 2,
+         'city': rnd.choice(['СПБ', 'МСК'])}
+        for i in range(contracts)
+    ])
+    db.execute(insert(server_db.Payment), [
+        {'contract_id': rnd.randint(1, contracts), 'role': rnd.choice(REPRICING_ROLES),
+         'stage_name': rnd.choice([None, 'Стадия 1', 'Стадия 2']),
+         'supervision_card_id': 1 if rnd.random() < 0.2 else None,
+         'calculated_amount': 0.0, 'final_amount': 0.0, 'is_manual': rnd.random() < 0.05}
+        for _ in range(payments)
+    ])
+    db.commit()
+
+
+def run_repricing_benchmark(payments=50000, contracts=5000):
+    """Vremya reprice() na SQLite v pamyati: dry-run i zapis odnim UPDATE.
+
+    Vozvrashchaet dict {'dry_run_ms', 'apply_ms', 'total', 'updated'}.
+    """
+    from sqlalchemy.orm import sessionmaker
+    from tests.backend.conftest import load_server_modules, memory_engine
+
+    modules = load_server_modules('services.repricing_service')
+    server_db = modules['database']
+    rs = modules['services.repricing_service']
+
+    engine = memory_engine(server_db.Base.metadata)
+    db = sessionmaker(bind=engine)()
+    try:
+        _seed_repricing(db, server_db, payments, contracts)
+
+        start = time.perf_counter()
+        preview = rs.reprice(db, dry_run=True)
+        dry_run_ms = (time.perf_counter() - start) * 1000
+        db.rollback()
+
+        start = time.perf_counter()
+        result = rs.reprice(db)
+        db.commit()
+        apply_ms = (time.perf_counter() - start) * 1000
+    finally:
+        db.close()
+        engine.dispose()
+
+    assert preview.updated == result.updated
+    return {'dry_run_ms': dry_run_ms, 'apply_ms': apply_ms,
+            'total': result.total, 'updated': result.updated}
+
+
+def print_repricing_benchmark(bench, contracts=5000):
+    print('-' * 70)
+    print(f'  REPRICING: {bench["total"]} payments, {contracts} contracts (SQLite)')
+    print('-' * 70)
+    print(f'  dry-run:        {bench["dry_run_ms"]:8.1f} ms')
+    print(f'  apply (UPDATE): {bench["apply_ms"]:8.1f} ms  (updated {bench["updated"]})')
+    print()
+
+
 # ========== MAIN TEST ==========
 
 def run_performance_test():
@@ -84,6 +280,13 @@ def run_performance_test():
     api_client = None
     employee_data = None
 
+    # --- 0. Startup (fresh process) ---
+    startup_profile = run_startup_profile()
+    if startup_profile:
+        results['0. Startup: time to login window'] = \
+            startup_profile['marks'].get('time_to_login_window', -1)
+        print_startup_profile(startup_profile)
+
     # --- 1. Auth ---
     with measure('1. Auth (API login)', results):
         try:
@@ -280,6 +483,15 @@ def run_performance_test():
         except Exception as e:
             errors['Full cycle'] = str(e)
 
+    # --- 9. Icon cache (CRM board icons) ---
+    try:
+        icon_bench = run_icon_cache_benchmark()
+        results['9a. Icons: CRM board x150 (no cache)'] = icon_bench['no_cache_ms']
+        results['9b. Icons: CRM board x150 (cache)'] = icon_bench['cache_ms']
+        print_icon_cache_benchmark(icon_bench)
+    except Exception as e:
+        errors['Icon cache'] = str(e)
+
     # ========== REPORT ==========
     print()
     print('=' * 70)
@@ -375,4 +587,16 @@ def run_performance_test():
 
 
 if __name__ == '__main__':
-    run_performance_test()
+    if '--startup-only' in sys.argv:
+        profile = run_startup_profile()
+        if profile:
+            ms = profile['marks'].get('time_to_login_window', -1)
+            print(f'  Time to login window: {ms:.0f} ms  [{rating(ms)}]')
+            print_startup_profile(profile)
+    elif '--icons-only' in sys.argv:
+        app = QApplication.instance() or QApplication(sys.argv)
+        print_icon_cache_benchmark(run_icon_cache_benchmark())
+    elif '--repricing-only' in sys.argv:
+        print_repricing_benchmark(run_repricing_benchmark())
+    else:
+        run_performance_test()
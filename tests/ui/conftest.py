@@ -33,6 +33,17 @@ def _clear_debounce():
     _last_click_time.clear()
 
 
+# ========== Сброс кэша иконок между тестами ==========
+
+@pytest.fixture(autouse=True)
+def _clear_icon_cache():
+    """Кэш IconLoader живёт на весь процесс — не переносим иконки между тестами."""
+    from utils.icon_loader import IconLoader
+    IconLoader.clear_cache()
+    yield
+    IconLoader.clear_cache()
+
+
 # ========== SAFETY NET: запрет доступа к production БД ==========
 
 @pytest.fixture(autouse=True)
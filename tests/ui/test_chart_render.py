@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Переиспользование Figure/Axes в ui/chart_widget.py и рендер графиков
+вне GUI-потока (utils/chart_render.py).
+"""
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from ui.chart_widget import (
+    FunnelBarChart, LineChartWidget, StackedBarChartWidget, MATPLOTLIB_AVAILABLE
+)
+from utils.chart_render import RenderCoalescer, get_chart_renderer, render_figure_png
+from utils.pdf_utils import chart_to_png
+
+pytestmark = pytest.mark.skipif(not MATPLOTLIB_AVAILABLE, reason="matplotlib не установлен")
+
+
+def _series(a, b):
+    return [{"label": "Индив.", "values": a}, {"label": "Шаблон.", "values": b}]
+
+
+def test_stacked_bars_updated_in_place(qtbot):
+    chart = StackedBarChartWidget("Договоры")
+    qtbot.addWidget(chart)
+    chart.set_data(["Янв", "Фев", "Мар"], _series([1, 2, 0], [3, 0, 1]))
+    ax = chart._ax
+    bars = list(ax.patches)
+
+    chart.set_data(["Янв", "Фев", "Мар"], _series([5, 2, 1], [3, 7, 1]))
+
+    assert chart._ax is ax
+    assert list(ax.patches) == bars          # те же Rectangle, новые высоты
+    assert [b.get_height() for b in bars] == [5, 2, 1, 3, 7, 1]
+    assert bars[4].get_y() == 2              # стопка поверх первой серии
+    assert [t.get_text() for t in ax.texts if t.get_visible()] == ['5', '2', '1', '3', '7', '1']
+    assert ax.get_ylim()[1] >= 9
+
+
+def test_structure_change_rebuilds_on_same_axes(qtbot):
+    chart = FunnelBarChart()
+    qtbot.addWidget(chart)
+    chart.set_data({"Новый заказ": 1, "В работе": 4})
+    ax = chart._ax
+    old_bars = list(ax.patches)
+
+    chart.set_data({"Новый заказ": 3, "В работе": 2})   # порядок подписей изменился
+
+    assert chart._ax is ax
+    assert chart.figure.axes == [ax]
+    assert not set(ax.patches) & set(old_bars)
+    assert [t.get_text() for t in ax.texts] == ['2', '3']
+
+
+def test_line_chart_updates_ydata(qtbot):
+    chart = LineChartWidget("Клиенты")
+    qtbot.addWidget(chart)
+    chart.set_data([{"label": "Новые", "x": ["1", "2", "3"], "y": [1, 2, 3]}])
+    line = chart._ax.lines[0]
+
+    chart.set_data([{"label": "Новые", "x": ["1", "2", "3"], "y": [10, 20, 30]}])
+
+    assert list(chart._ax.lines) == [line]
+    assert list(line.get_ydata()) == [10, 20, 30]
+    assert len(chart._ax.collections) == 1
+    assert chart._ax.get_ylim()[1] > 30
+
+
+def test_export_renders_snapshot_in_worker(qtbot):
+    chart = StackedBarChartWidget("Договоры")
+    qtbot.addWidget(chart)
+    chart.set_data(["Янв", "Фев"], _series([1, 2], [3, 4]))
+    size_before = tuple(chart.figure.get_size_inches())
+    threads = []
+
+    def _spy(figure, **kwargs):
+        threads.append(threading.current_thread())
+        assert figure is not chart.figure
+        return render_figure_png(figure, **kwargs)
+
+    with patch('utils.chart_render.render_figure_png', side_effect=_spy):
+        result = get_chart_renderer().submit(
+            chart, dpi=100, size_inches=(8, 2), tight_pad=0.8).result()
+
+    buf, w_px, h_px = result
+    assert buf.read(8) == b'\x89PNG\r\n\x1a\n'
+    assert w_px > h_px
+    assert threads and threads[0] is not threading.main_thread()
+    # Живой figure не ресайзился
+    assert tuple(chart.figure.get_size_inches()) == size_before
+
+
+def test_chart_to_png_empty_chart(qtbot):
+    chart = FunnelBarChart()
+    qtbot.addWidget(chart)
+    assert chart_to_png(chart) is None
+    chart.set_data({"В работе": 2})
+    assert chart_to_png(chart, dpi=72) is not None
+
+
+def test_coalescer_fires_once_for_last_change(qtbot):
+    calls = []
+    coalescer = RenderCoalescer(lambda: calls.append(coalescer.generation), delay_ms=20)
+    for _ in range(5):
+        coalescer.trigger('2025')
+    assert coalescer.is_pending()
+
+    qtbot.waitUntil(lambda: bool(calls), timeout=1000)
+    qtbot.wait(50)
+
+    assert calls == [5]
+    assert coalescer.is_current(5)
+    assert not coalescer.is_current(4)
+
+
+def test_reports_reload_during_loading_is_deferred(qtbot):
+    with patch('ui.reports_tab.DataAccess') as MockDA:
+        MockDA.return_value = MagicMock()
+        from ui.reports_tab import ReportsTab
+        tab = ReportsTab(employee=MagicMock(role="admin"), api_client=None)
+    qtbot.addWidget(tab)
+    tab._loading = True
+
+    with patch('threading.Thread') as mock_thread:
+        tab.reload_all_sections()
+        mock_thread.assert_not_called()
+        assert tab._reload_pending
+
+        # Устаревший результат не рисуется — сразу новая загрузка
+        with patch.object(tab, '_update_crm_section') as mock_crm:
+            tab._update_all_ui()
+        mock_crm.assert_not_called()
+        mock_thread.assert_called_once()
+    assert not tab._reload_pending
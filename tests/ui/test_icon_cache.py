@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты кэша иконок IconLoader и create_colored_icon (реальный Qt, offscreen).
+"""
+from unittest.mock import patch
+
+from utils.icon_loader import IconLoader, COMMON_ICONS
+import ui.dashboard_widget as dashboard_widget
+
+
+def test_load_returns_same_icon_from_cache(qapp):
+    first = IconLoader.load('edit')
+    second = IconLoader.load('edit.svg')
+
+    assert first is second
+    assert IconLoader.cache_stats()['hits'] == 1
+
+
+def test_load_colored_reads_svg_once(qapp):
+    with patch('builtins.open', wraps=open) as mock_open_:
+        a = IconLoader.load_colored('refresh', '#FF0000', 16)
+        b = IconLoader.load_colored('refresh', '#FF0000', 16)
+        c = IconLoader.load_colored('refresh', '#00FF00', 16)
+
+    assert a is b
+    assert c is not a
+    assert not c.isNull()
+    # Исходный SVG читается один раз для всех цветов
+    assert mock_open_.call_count == 1
+
+
+def test_load_colored_key_includes_size_and_dpr(qapp):
+    small = IconLoader.load_colored('tag', '#123456', 12)
+    big = IconLoader.load_colored('tag', '#123456', 24)
+    assert small is not big
+
+    with patch.object(IconLoader, '_device_pixel_ratio', return_value=2.0):
+        hidpi = IconLoader.load_colored('tag', '#123456', 12)
+    assert hidpi is not small
+    pixmap = hidpi.pixmap(12, 12)
+    assert not pixmap.isNull()
+
+
+def test_missing_icon_is_not_cached(qapp):
+    IconLoader.load('no-such-icon-xyz')
+    assert IconLoader.cache_stats()['icons'] == 0
+
+
+def test_cache_can_be_disabled(qapp):
+    with patch.object(IconLoader, 'cache_enabled', False):
+        assert IconLoader.load('edit') is not IconLoader.load('edit')
+    assert IconLoader.cache_stats()['icons'] == 0
+
+
+def test_preload_fills_cache(qapp):
+    count = IconLoader.preload()
+    assert count >= len(COMMON_ICONS)
+    IconLoader.load('arrow-left-circle')
+    assert IconLoader.cache_stats()['hits'] == 1
+
+
+def test_create_colored_icon_cached(qapp):
+    dashboard_widget._colored_svg_cache.clear()
+    first = dashboard_widget.create_colored_icon('resources/icons/user.svg', '#F57C00')
+    with patch('builtins.open', side_effect=AssertionError('повторное чтение')):
+        second = dashboard_widget.create_colored_icon('resources/icons/user.svg', '#F57C00')
+    assert first is second
+    assert b'#F57C00' in first
+    dashboard_widget._colored_svg_cache.clear()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Тесты reconcile_kanban_board (ui/base_kanban_tab.py):
+инкрементальное обновление колонок Kanban по ID карточки.
+"""
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from PyQt5.QtWidgets import QLabel, QListWidget, QVBoxLayout
+
+from ui.base_kanban_tab import BaseKanbanColumn, reconcile_kanban_board
+
+
+class _Column(BaseKanbanColumn):
+    """Минимальная колонка: карточка — QLabel, счётчик созданных виджетов."""
+
+    def __init__(self, name):
+        super().__init__()
+        self.column_name = name
+        self.created = []
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        self.header_label = QLabel(self.column_name)
+        self.cards_list = QListWidget()
+        layout.addWidget(self.header_label)
+        layout.addWidget(self.cards_list)
+
+    def _make_vertical_label(self):
+        return QLabel()
+
+    def _create_card_widget(self, card_data):
+        self.created.append(card_data['id'])
+        return QLabel(card_data.get('title', ''))
+
+
+def _card(card_id, column, title=None):
+    return {'id': card_id, 'column_name': column, 'title': title or f'Карточка {card_id}'}
+
+
+@pytest.fixture
+def board(qtbot):
+    columns = {name: _Column(name) for name in ('A', 'B', 'C')}
+    for column in columns.values():
+        qtbot.addWidget(column)
+    return columns
+
+
+def _reset_created(board):
+    for column in board.values():
+        column.created.clear()
+
+
+def _texts(column):
+    return [column.cards_list.itemWidget(column.cards_list.item(row)).text()
+            for row in range(column.cards_list.count())]
+
+
+def test_initial_load_adds_all_cards_in_order(board):
+    stats = reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A'), _card(3, 'B')])
+    assert board['A'].card_ids() == [1, 2]
+    assert board['B'].card_ids() == [3]
+    assert stats['added'] == 3
+    assert '(2)' in board['A'].header_label.text()
+
+
+def test_unchanged_cards_are_not_rebuilt(board):
+    cards = [_card(1, 'A'), _card(2, 'A'), _card(3, 'B')]
+    reconcile_kanban_board(board, cards)
+    _reset_created(board)
+
+    stats = reconcile_kanban_board(board, [dict(c) for c in cards])
+
+    assert stats['unchanged'] == 3
+    assert all(not column.created for column in board.values())
+
+
+def test_changed_card_is_replaced_in_place(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A'), _card(3, 'A')])
+    _reset_created(board)
+
+    stats = reconcile_kanban_board(
+        board, [_card(1, 'A'), _card(2, 'A', 'Новое имя'), _card(3, 'A')])
+
+    assert stats['updated'] == 1
+    assert board['A'].created == [2]
+    assert board['A'].card_ids() == [1, 2, 3]
+    assert _texts(board['A'])[1] == 'Новое имя'
+
+
+def test_moved_card_changes_column_only(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A'), _card(3, 'B')])
+    _reset_created(board)
+
+    stats = reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'B'), _card(3, 'B')])
+
+    assert stats['moved'] == 1
+    assert board['A'].card_ids() == [1]
+    assert board['B'].card_ids() == [2, 3]
+    assert board['B'].created == [2]
+    assert not board['A'].created
+    assert '(2)' in board['B'].header_label.text()
+
+
+def test_full_reconcile_removes_missing_cards(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A'), _card(3, 'B')])
+
+    stats = reconcile_kanban_board(board, [_card(1, 'A')])
+
+    assert stats['removed'] == 2
+    assert board['A'].card_ids() == [1]
+    assert board['B'].card_ids() == []
+
+
+def test_card_with_unknown_column_is_removed(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A')])
+
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'Архив')])
+
+    assert board['A'].card_ids() == [1]
+
+
+def test_cards_redrawn_on_next_day(board):
+    """Срок «осталось N раб.дн.» зависит от дня: после смены даты виджеты пересоздаются"""
+    cards = [_card(1, 'A'), _card(2, 'B')]
+    with patch('ui.base_kanban_tab.date') as fake_date:
+        fake_date.today.return_value = date(2026, 10, 19)
+        reconcile_kanban_board(board, cards)
+        _reset_created(board)
+
+        fake_date.today.return_value = date(2026, 10, 20)
+        stats = reconcile_kanban_board(board, [dict(c) for c in cards])
+        assert stats['updated'] == 2
+        assert board['A'].created == [1] and board['B'].created == [2]
+
+        stats = reconcile_kanban_board(board, [dict(c) for c in cards])
+        assert stats['unchanged'] == 2
+
+
+def test_reordered_column_is_rebuilt(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A')])
+
+    stats = reconcile_kanban_board(board, [_card(2, 'A'), _card(1, 'A')])
+
+    assert stats['rebuilt'] == 1
+    assert board['A'].card_ids() == [2, 1]
+
+
+def test_selection_is_preserved(board):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A'), _card(3, 'A')])
+    item, _row = board['A'].find_card_item_by_id(2)
+    board['A'].cards_list.setCurrentItem(item)
+
+    reconcile_kanban_board(board, [_card(1, 'A', 'изменено'), _card(2, 'A'), _card(3, 'A'),
+                                   _card(4, 'A')])
+
+    current = board['A'].cards_list.currentItem()
+    assert current is not None and current.data(0x0100) == 2
+
+
+def test_failed_replace_leaves_error_widget(board, monkeypatch):
+    reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A')])
+
+    def _broken(card_data):
+        raise ValueError('битые данные')
+
+    monkeypatch.setattr(board['A'], '_create_card_widget', _broken)
+    stats = reconcile_kanban_board(board, [_card(1, 'A'), _card(2, 'A', 'изменено')])
+
+    assert stats['updated'] == 1
+    assert board['A'].card_ids() == [1, 2]
+    assert 'ID=2' in _texts(board['A'])[1]
+    # Снимка нет — следующий reconcile попробует создать карточку снова
+    assert 2 not in board['A']._card_snapshots
@@ -107,7 +107,7 @@ class TestProjectTimelineWidget:
 
     def test_create_widget_no_entries(self, qapp):
         """Виджет ProjectTimelineWidget создаётся без ошибок при пустых данных."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -121,7 +121,7 @@ class TestProjectTimelineWidget:
 
     def test_widget_has_table(self, qapp):
         """Виджет содержит QTableWidget."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -136,7 +136,7 @@ class TestProjectTimelineWidget:
 
     def test_table_column_count(self, qapp):
         """Таблица содержит 7 столбцов."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -150,7 +150,7 @@ class TestProjectTimelineWidget:
 
     def test_table_headers(self, qapp):
         """Заголовки таблицы соответствуют COLUMNS."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -168,7 +168,7 @@ class TestProjectTimelineWidget:
 
     def test_export_buttons_present(self, qapp):
         """Кнопки экспорта Excel и PDF присутствуют."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -204,12 +204,11 @@ class TestProjectTimelineWidget:
 
     def test_networkdays_basic(self, qapp):
         """networkdays возвращает корректное количество рабочих дней."""
-        # is_working_day импортируется внутри функции из utils.date_utils
-        with patch('utils.date_utils.is_working_day', side_effect=lambda d: d.weekday() < 5):
-            from ui.timeline_widget import networkdays
-            # Пн–Пт = 4 рабочих дня (с Пн по Пт не включая Пт)
-            result = networkdays('2026-01-05', '2026-01-09')
-            assert result == 4
+        from ui.timeline_widget import networkdays
+        # Пн–Пт = 4 рабочих дня (с Пн по Пт не включая Пт), неделя без праздников
+        assert networkdays('2026-07-06', '2026-07-10') == 4
+        # 5–9 января — новогодние праздники
+        assert networkdays('2026-01-05', '2026-01-09') == 0
 
     def test_networkdays_empty_returns_zero(self, qapp):
         """networkdays возвращает 0 для пустых или None дат."""
@@ -219,7 +218,7 @@ class TestProjectTimelineWidget:
 
     def test_recalculate_days_no_crash(self, qapp):
         """_recalculate_days не падает при пустых entries."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
@@ -234,7 +233,7 @@ class TestProjectTimelineWidget:
 
     def test_get_fio_returns_name_from_card(self, qapp):
         """_get_fio возвращает ФИО из card_data по роли."""
-        with patch('ui.timeline_widget.IconLoader'), \
+        with patch('ui.timeline_cells.IconLoader'), \
              patch('utils.calendar_helpers.add_today_button_to_dateedit', return_value=MagicMock()), \
              patch('utils.calendar_helpers.add_working_days', return_value=None):
             from ui.timeline_widget import ProjectTimelineWidget
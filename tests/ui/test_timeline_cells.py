@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Таблицы сроков без виджета на ячейку: ячейки — QTableWidgetItem + Cell,
+рисует TimelineCellDelegate; изменение даты обновляет только затронутые ячейки.
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from PyQt5.QtCore import QDate
+
+from ui.timeline_cells import Cell, TimelineCellDelegate, apply_cell, cell_at
+from utils.timeline_calc import calc_planned_dates
+
+
+def _entry(code, name, role='Дизайнер', group='STAGE1', actual='', norm=5):
+    return {
+        'stage_code': code, 'stage_name': name, 'executor_role': role,
+        'stage_group': group, 'substage_group': '', 'is_in_contract_scope': True,
+        'actual_date': actual, 'actual_days': 0, 'norm_days': norm, 'status': '',
+    }
+
+
+def _entries():
+    return [
+        _entry('START', 'Дата начала', role='Менеджер', group='START',
+               actual='2026-03-02', norm=0),
+        _entry('STAGE1', 'Этап 1', role='header'),
+        _entry('S1_A', 'Подэтап A'),
+        _entry('S1_B', 'Подэтап B'),
+        _entry('STAGE2', 'Этап 2', role='header', group='STAGE2'),
+        _entry('S2_A', 'Подэтап C', group='STAGE2'),
+        _entry('S2_B', 'Подэтап D', group='STAGE2'),
+    ]
+
+
+@pytest.fixture
+def project_timeline(qtbot):
+    from ui.timeline_widget import ProjectTimelineWidget
+    data = MagicMock()
+    data.get_contract.return_value = None
+    widget = ProjectTimelineWidget(card_data={'id': 1}, data=data)
+    qtbot.addWidget(widget)
+    widget._contract_term = 0
+    widget.entries = _entries()
+    widget._recalculate_days()
+    widget._populate_table()
+    return widget
+
+
+def test_apply_cell_reports_changes_only(qtbot):
+    from PyQt5.QtWidgets import QTableWidget
+    table = QTableWidget(1, 1)
+    qtbot.addWidget(table)
+
+    assert apply_cell(table, 0, 0, Cell('a', '#FFFFFF'))
+    assert not apply_cell(table, 0, 0, Cell('a', '#FFFFFF'))
+    assert apply_cell(table, 0, 0, Cell('a', '#FFEBEE', tooltip='x'))
+    assert cell_at(table, 0, 0).bg == '#FFEBEE'
+    assert table.item(0, 0).toolTip() == 'x'
+
+
+def test_project_timeline_has_no_cell_widgets(project_timeline):
+    table = project_timeline.table
+    assert isinstance(table.itemDelegate(), TimelineCellDelegate)
+    for row in range(table.rowCount()):
+        for col in range(table.columnCount()):
+            assert table.cellWidget(row, col) is None
+    # Заголовок этапа объединён на всю ширину
+    header_row = project_timeline._row_of_entry(1)
+    assert table.columnSpan(header_row, 0) == len(project_timeline.COLUMNS)
+    assert cell_at(table, header_row, 0).bg == '#2F5496'
+    # Таблица отрисовывается делегатом без ошибок
+    table.resize(900, 400)
+    assert not table.grab().isNull()
+
+
+def test_date_cell_click_opens_single_editor(project_timeline):
+    table = project_timeline.table
+    row = project_timeline._row_of_entry(2)
+    project_timeline._on_cell_clicked(row, 1)
+    editors = [(r, c) for r in range(table.rowCount()) for c in range(table.columnCount())
+               if table.cellWidget(r, c) is not None]
+    assert editors == [(row, 1)]
+
+
+def test_date_change_updates_only_affected_cells(project_timeline):
+    widget = project_timeline
+    table = widget.table
+    rows_before = table.rowCount()
+    before = {(r, c): cell_at(table, r, c)
+              for r in range(rows_before) for c in range(table.columnCount())}
+
+    widget._enable_date_edit(widget._row_of_entry(5), 5, 'S2_A', '')
+    widget._on_date_changed(5, 'S2_A', QDate(2026, 3, 13))
+
+    assert table.rowCount() == rows_before
+    assert widget.entries[5]['actual_days'] > 0
+    changed_rows = {r for (r, c), cell in before.items() if cell_at(table, r, c) != cell}
+    # Строки выше изменённой записи (START, этап 1 и его итог) не перерисованы
+    assert min(changed_rows) >= widget._row_of_entry(5)
+    assert table.cellWidget(widget._row_of_entry(5), 1) is None
+    assert cell_at(table, widget._row_of_entry(5), 1).text == '13.03.2026'
+    widget.data.add_action_history.assert_called_once()
+
+
+def test_supervision_timeline_cells(qtbot):
+    from ui.supervision_timeline_widget import SupervisionTimelineWidget
+    data = MagicMock()
+    data.get_contract.return_value = {}
+    data.get_supervision_timeline.return_value = {'entries': [
+        {'stage_code': 'STAGE_1_CERAMIC', 'stage_name': 'Стадия 1', 'status': 'В работе',
+         'plan_date': '2026-03-02', 'actual_date': '2026-03-05', 'budget_planned': 1000,
+         'budget_actual': 800, 'budget_savings': 200, 'commission': 0, 'notes': ''},
+        {'stage_code': 'STAGE_2_PLUMBING', 'stage_name': 'Стадия 2', 'status': 'Не начато'},
+    ], 'totals': {}}
+    data.get_supervision_files.return_value = []
+    widget = SupervisionTimelineWidget(card_data={'id': 5, 'start_date': '2026-03-01'}, data=data)
+    qtbot.addWidget(widget)
+    table = widget.table
+
+    assert table.rowCount() == 3
+    assert all(table.cellWidget(r, c) is None
+               for r in range(3) for c in range(table.columnCount()))
+    assert cell_at(table, 0, 5).text == '3'
+    assert cell_at(table, 0, 5).color == '#F44336'
+    assert cell_at(table, 0, 11).editable == 'combo'
+    assert cell_at(table, 2, 6).text == '1,000'
+
+    widget._on_status_changed(1, 'STAGE_2_PLUMBING', 'Доставлено')
+    assert cell_at(table, 1, 0).bg == '#E8F5E9'
+    assert cell_at(table, 0, 0).bg == '#FFF8E1'
+    data.update_supervision_timeline_entry.assert_called_with(
+        5, 'STAGE_2_PLUMBING', {'status': 'Доставлено'})
+
+
+def test_calc_planned_dates_from_index_matches_full():
+    entries = _entries()
+    entries[3]['actual_date'] = '2026-03-10'
+    full = [dict(e) for e in entries]
+    calc_planned_dates(full)
+
+    calc_planned_dates(entries)
+    entries[5]['actual_date'] = '2026-03-20'
+    full[5]['actual_date'] = '2026-03-20'
+    calc_planned_dates(entries, start_index=5)
+    calc_planned_dates(full)
+
+    assert [e.get('_planned_date') for e in entries] == \
+        [e.get('_planned_date') for e in full]
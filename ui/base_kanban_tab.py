@@ -7,10 +7,14 @@
   - ui/crm_supervision_tab.py (CRMSupervisionTab)
 
 ВАЖНО: этот файл — заготовка для будущего рефакторинга.
-crm_tab.py и crm_supervision_tab.py на данном этапе не изменяются.
+Обе вкладки уже используют reconcile_kanban_board() для инкрементального
+обновления колонок; остальная логика пока живёт в crm_tab.py и
+crm_supervision_tab.py.
 """
 
+import copy
 from abc import abstractmethod
+from datetime import date
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QScrollArea,
@@ -92,6 +96,7 @@ class BaseKanbanColumn(QFrame):
       - методы toggle_collapse, _collapse_column, _expand_column
       - update_header_count
       - add_card (шаблонный метод, создание card_widget — абстрактно)
+      - replace_card / remove_card (точечные изменения для reconcile_kanban_board)
       - clear_cards
 
     Различия, остающиеся в наследниках:
@@ -123,6 +128,10 @@ class BaseKanbanColumn(QFrame):
         self._settings = TableSettings()
         self._board_name = ''
 
+        # Снимки данных карточек {card_id: (дата отрисовки, card_data)} — по ним
+        # reconcile_kanban_board решает, нужно ли пересоздавать виджет
+        self._card_snapshots = {}
+
     # ------------------------------------------------------------------
     # Абстрактные методы — должны быть реализованы в наследнике
     # ------------------------------------------------------------------
@@ -223,7 +232,7 @@ class BaseKanbanColumn(QFrame):
             short_name = self.column_name.split(':')[0].strip() if ':' in self.column_name else self.column_name
             self.vertical_label.setText(f"{short_name} ({count})")
 
-    def add_card(self, card_data, bulk=False):
+    def add_card(self, card_data, bulk=False, row=None):
         """
         Добавление карточки в колонку.
 
@@ -231,6 +240,7 @@ class BaseKanbanColumn(QFrame):
             card_data -- словарь с данными карточки (обязателен ключ 'id')
             bulk      -- True означает режим массовой загрузки:
                          пропускает update_header_count для скорости
+            row       -- позиция вставки (None — в конец списка)
         """
         card_widget = self._create_card_widget(card_data)
 
@@ -242,15 +252,94 @@ class BaseKanbanColumn(QFrame):
         item.setData(Qt.UserRole, card_data.get('id'))
         item.setSizeHint(QSize(200, exact_height + 10))
 
-        self.cards_list.addItem(item)
+        if row is None:
+            self.cards_list.addItem(item)
+        else:
+            self.cards_list.insertItem(row, item)
         self.cards_list.setItemWidget(item, card_widget)
+        self._remember_card(card_data)
 
         if not bulk:
             self.update_header_count()
 
+    def replace_card(self, card_data):
+        """
+        Пересоздать виджет существующей карточки на том же месте.
+
+        QListWidgetItem (и позиция/выделение) сохраняются, старый виджет
+        удаляется Qt при setItemWidget. Возвращает False, если карточки нет.
+        """
+        card_id = card_data.get('id')
+        item, _row = self.find_card_item_by_id(card_id)
+        if item is None:
+            return False
+        try:
+            card_widget = self._create_card_widget(card_data)
+        except Exception as e:
+            try:
+                print(f"ОШИБКА создания карточки ID={card_id}: {e}")
+                import traceback
+                traceback.print_exc()
+            except (UnicodeEncodeError, OSError):
+                pass
+            item.setSizeHint(QSize(200, 90))
+            self.cards_list.setItemWidget(item, self._create_error_widget(card_id))
+            # Снимок убираем: при следующем reconcile виджет пересоздастся
+            self._card_snapshots.pop(card_id, None)
+            return True
+        exact_height = card_widget.sizeHint().height()
+        card_widget.setMinimumHeight(exact_height)
+        item.setSizeHint(QSize(200, exact_height + 10))
+        self.cards_list.setItemWidget(item, card_widget)
+        self._remember_card(card_data)
+        return True
+
+    def _create_error_widget(self, card_id):
+        """Заглушка на месте карточки, виджет которой не удалось создать."""
+        error_widget = QLabel(f" Ошибка загрузки\nкарточки ID={card_id}")
+        error_widget.setStyleSheet('''
+            background-color: #FADBD8;
+            border: 2px solid #E74C3C;
+            border-radius: 4px;
+            padding: 10px;
+            font-size: 10px;
+            color: #C0392B;
+        ''')
+        error_widget.setFixedHeight(80)
+        return error_widget
+
+    def remove_card(self, card_id, bulk=False):
+        """Удалить карточку из колонки. Возвращает False, если карточки нет."""
+        _item, row = self.find_card_item_by_id(card_id)
+        if row < 0:
+            return False
+        self.cards_list.takeItem(row)
+        self._card_snapshots.pop(card_id, None)
+        if not bulk:
+            self.update_header_count()
+        return True
+
+    def _remember_card(self, card_data):
+        """Сохранить копию данных карточки для сравнения при следующем reconcile.
+
+        Дата отрисовки входит в снимок: текст «осталось N раб.дн.» зависит от
+        текущего дня, поэтому на следующий день виджет пересоздаётся.
+        """
+        try:
+            snapshot = copy.deepcopy(card_data)
+        except Exception:
+            snapshot = dict(card_data)
+        self._card_snapshots[card_data.get('id')] = (date.today(), snapshot)
+
+    def card_ids(self):
+        """ID карточек колонки в порядке отображения."""
+        return [self.cards_list.item(row).data(Qt.UserRole)
+                for row in range(self.cards_list.count())]
+
     def clear_cards(self):
         """Очистить все карточки из колонки и обновить счётчик."""
         self.cards_list.clear()
+        self._card_snapshots.clear()
         self.update_header_count()
 
     def find_card_item_by_id(self, card_id):
@@ -266,6 +355,138 @@ class BaseKanbanColumn(QFrame):
         return None, -1
 
 
+# ===========================================================================
+# Инкрементальное обновление доски (reconcile по ID карточки)
+# ===========================================================================
+
+def reconcile_kanban_board(columns_dict, cards):
+    """
+    Привести колонки доски к переданному набору карточек, пересоздавая
+    только изменившиеся виджеты (вместо clear_cards() + add_card() для всех).
+
+    Параметры:
+        columns_dict -- {column_name: BaseKanbanColumn}
+        cards        -- полный состав доски: список словарей карточек (ключи
+                        'id' и 'column_name'); отсутствующие карточки удаляются,
+                        карточки с неизвестной колонкой на доске не показываются
+
+    Для каждой карточки:
+        данные и день не изменились   -> виджет не трогаем
+        та же колонка, данные другие  -> replace_card (на том же месте)
+        другая колонка                -> remove_card + add_card в новую
+        новой карточки нет на доске   -> add_card на позицию по порядку cards
+
+    Позиция прокрутки и выделенная карточка каждой колонки сохраняются.
+    Если порядок существующих карточек в колонке поменялся,
+    колонка перестраивается целиком (как раньше).
+
+    Возвращает статистику: {'added', 'updated', 'moved', 'removed',
+    'unchanged', 'rebuilt'}.
+    """
+    stats = {'added': 0, 'updated': 0, 'moved': 0, 'removed': 0,
+             'unchanged': 0, 'rebuilt': 0}
+
+    # Где сейчас находится каждая карточка
+    location = {}
+    for name, column in columns_dict.items():
+        for card_id in column.card_ids():
+            location[card_id] = name
+
+    # Желаемый состав колонок (в порядке входного списка)
+    desired = {name: [] for name in columns_dict}
+    incoming = {}
+    for card_data in cards:
+        card_id = card_data.get('id')
+        if card_id is None:
+            continue
+        incoming[card_id] = card_data
+        column_name = card_data.get('column_name')
+        if column_name in desired:
+            desired[column_name].append(card_id)
+
+    # Состояние прокрутки/выделения — восстанавливаем после изменений
+    view_state = {}
+    for name, column in columns_dict.items():
+        current = column.cards_list.currentItem()
+        view_state[name] = (
+            column.cards_list.verticalScrollBar().value(),
+            current.data(Qt.UserRole) if current is not None else None,
+        )
+        column.cards_list.setUpdatesEnabled(False)
+
+    touched = set()
+    moved_ids = set()
+    today = date.today()
+    try:
+        # 1. Удаление: карточки, ушедшие с доски или сменившие колонку
+        for card_id, current_column in list(location.items()):
+            card_data = incoming.get(card_id)
+            if card_data is None:
+                columns_dict[current_column].remove_card(card_id, bulk=True)
+                stats['removed'] += 1
+                touched.add(current_column)
+                continue
+            target = card_data.get('column_name')
+            if target != current_column:
+                columns_dict[current_column].remove_card(card_id, bulk=True)
+                touched.add(current_column)
+                if target in columns_dict:
+                    stats['moved'] += 1
+                    moved_ids.add(card_id)
+                else:
+                    stats['removed'] += 1
+                del location[card_id]
+
+        # 2. Обновление на месте / вставка
+        for name, card_ids in desired.items():
+            column = columns_dict[name]
+
+            existing = [cid for cid in column.card_ids() if cid in incoming]
+            expected = [cid for cid in card_ids if location.get(cid) == name]
+            if existing != expected:
+                # Порядок поменялся — перестраиваем колонку целиком
+                column.cards_list.clear()
+                column._card_snapshots.clear()
+                for card_id in card_ids:
+                    column.add_card(incoming[card_id], bulk=True)
+                stats['rebuilt'] += 1
+                touched.add(name)
+                continue
+
+            placed = 0
+            for card_id in card_ids:
+                card_data = incoming[card_id]
+                if location.get(card_id) == name:
+                    if column._card_snapshots.get(card_id) == (today, card_data):
+                        stats['unchanged'] += 1
+                    else:
+                        column.replace_card(card_data)
+                        stats['updated'] += 1
+                        touched.add(name)
+                    placed += 1
+                    continue
+                column.add_card(card_data, bulk=True, row=placed)
+                if card_id not in moved_ids:
+                    stats['added'] += 1
+                placed += 1
+                touched.add(name)
+                location[card_id] = name
+    finally:
+        for name, column in columns_dict.items():
+            scroll_value, selected_id = view_state[name]
+            if name in touched:
+                column.cards_list.updateGeometry()
+                column.update_header_count()
+                if selected_id is not None:
+                    item, _row = column.find_card_item_by_id(selected_id)
+                    if item is not None:
+                        column.cards_list.setCurrentItem(item)
+                column.cards_list.verticalScrollBar().setValue(scroll_value)
+            column.cards_list.setUpdatesEnabled(True)
+
+    return stats
+
+
 # ===========================================================================
 # Базовый класс главной вкладки Kanban
 # ===========================================================================
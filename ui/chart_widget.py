@@ -2,6 +2,12 @@
 """
 Виджеты графиков для дашборда аналитики.
 Используют matplotlib для отрисовки внутри PyQt5.
+
+Figure и Axes создаются один раз на виджет. Если при новом set_data()
+структура графика не изменилась (те же подписи/серии — типичный случай при
+смене фильтра), обновляются только данные артистов (ширины/высоты баров,
+ydata линий, подписи значений) без очистки и перепостроения графика.
+Экспорт в PNG/PDF — через utils/chart_render (снимок figure, рендер в потоке).
 """
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel, QSizePolicy, QFrame, QHBoxLayout
 from PyQt5.QtCore import Qt
@@ -23,6 +29,9 @@ class ChartBase(QWidget):
     def __init__(self, title="", parent=None):
         super().__init__(parent)
         self.chart_title = title
+        self._ax = None
+        self._layout_key = None   # структура текущего графика (подписи, серии)
+        self._artists = {}        # артисты с данными для обновления на месте
         self._layout = QVBoxLayout()
         self._layout.setContentsMargins(0, 0, 0, 0)
         self._layout.setSpacing(4)
@@ -52,14 +61,65 @@ class ChartBase(QWidget):
             }
         """)
 
-    def _finalize(self):
-        """Финализация отрисовки"""
+    def _axes(self):
+        """Axes для полного построения графика.
+
+        Axes создаётся один раз и при перестроении только очищается
+        (вместо figure.clear() + add_subplot()).
+        """
+        if self._ax is None:
+            self._ax = self.figure.add_subplot(111)
+        else:
+            self._ax.cla()
+        self._ax.set_facecolor('white')
+        self._artists = {}
+        self._layout_key = None
+        return self._ax
+
+    def _can_update(self, layout_key):
+        """True если структура графика прежняя и можно обновить данные на месте"""
+        return bool(self._artists) and layout_key == self._layout_key
+
+    def _finalize(self, layout_key=None):
+        """Финализация отрисовки.
+
+        layout_key — структура построенного графика; None запрещает
+        последующее обновление на месте.
+        """
+        self._layout_key = layout_key
         if self.canvas:
             try:
                 self.figure.tight_layout(pad=2.0, h_pad=1.5, w_pad=1.5)
             except Exception:
                 pass
-            self.canvas.draw()
+            # Отрисовка схлопывается с другими запросами до ближайшего цикла событий
+            self.canvas.draw_idle()
+
+    def _finalize_update(self):
+        """Финализация после обновления данных артистов на месте"""
+        self._ax.relim()
+        self._ax.autoscale_view()
+        self._finalize(self._layout_key)
+
+    def _build_hbars(self, ax, labels, values, colors, fontsize, gap, fmt=str):
+        """Горизонтальные бары с подписями значений справа"""
+        bars = ax.barh(labels, values, color=colors, height=0.6, edgecolor='white')
+        texts = [ax.text(0, 0, '', va='center', fontsize=fontsize,
+                         fontweight='bold', color='#333') for _ in bars]
+        self._artists = {'bars': list(bars), 'texts': texts, 'gap': gap, 'fmt': fmt}
+        self._set_hbar_values(values, colors)
+
+    def _set_hbar_values(self, values, colors):
+        """Обновить длины, цвета и подписи горизонтальных баров"""
+        gap = self._artists['gap']
+        fmt = self._artists['fmt']
+        max_val = max(values) if values else 1
+        for bar, text, val, color in zip(self._artists['bars'], self._artists['texts'],
+                                         values, colors):
+            bar.set_width(val)
+            bar.set_facecolor(color)
+            text.set_position((val + max_val * gap, bar.get_y() + bar.get_height() / 2))
+            text.set_text(fmt(val))
 
     @staticmethod
     def _truncate(text, max_len=20):
@@ -86,10 +146,6 @@ class FunnelBarChart(ChartBase):
         self.figure.set_size_inches(5, fig_h)
         self.setMinimumHeight(int(fig_h * 100))
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
-
         # Сортируем по количеству (убывание сверху вниз)
         sorted_items = sorted(funnel_dict.items(), key=lambda x: x[1])
         labels = [self._truncate(item[0], 25) for item in sorted_items]
@@ -99,13 +155,15 @@ class FunnelBarChart(ChartBase):
                   '#E74C3C', '#1ABC9C', '#34495E', '#95A5A6', '#D35400']
         bar_colors = [colors[i % len(colors)] for i in range(len(labels))]
 
-        bars = ax.barh(labels, values, color=bar_colors, height=0.6, edgecolor='white')
+        layout_key = tuple(labels)
+        if self._can_update(layout_key):
+            self._set_hbar_values(values, bar_colors)
+            self._finalize_update()
+            return
 
+        ax = self._axes()
         # Значения на столбцах
-        max_val = max(values) if values else 1
-        for bar, val in zip(bars, values):
-            ax.text(bar.get_width() + max_val * 0.03, bar.get_y() + bar.get_height() / 2,
-                    str(val), va='center', fontsize=9, fontweight='bold', color='#333')
+        self._build_hbars(ax, labels, values, bar_colors, fontsize=9, gap=0.03)
 
         ax.set_title(self.chart_title, fontsize=11, fontweight='bold', color='#333', pad=8)
         ax.set_xlabel('Количество проектов', fontsize=8, color='#888')
@@ -116,7 +174,7 @@ class FunnelBarChart(ChartBase):
         ax.spines['left'].set_color('#E0E0E0')
         ax.spines['bottom'].set_color('#E0E0E0')
 
-        self._finalize()
+        self._finalize(layout_key)
 
 
 class ExecutorLoadChart(ChartBase):
@@ -130,10 +188,6 @@ class ExecutorLoadChart(ChartBase):
         if not self.canvas or not executor_list:
             return
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
-
         sorted_data = sorted(executor_list, key=lambda x: x.get("active_stages", 0))
         names = [self._truncate(d["name"], 18) for d in sorted_data]
         stages = [d.get("active_stages", 0) for d in sorted_data]
@@ -147,12 +201,15 @@ class ExecutorLoadChart(ChartBase):
                 return '#27AE60'
 
         colors = [bar_color(s) for s in stages]
-        bars = ax.barh(names, stages, color=colors, height=0.6, edgecolor='white')
 
-        max_val = max(stages) if stages else 1
-        for bar, val in zip(bars, stages):
-            ax.text(bar.get_width() + max_val * 0.03, bar.get_y() + bar.get_height() / 2,
-                    str(val), va='center', fontsize=8, fontweight='bold', color='#333')
+        layout_key = tuple(names)
+        if self._can_update(layout_key):
+            self._set_hbar_values(stages, colors)
+            self._finalize_update()
+            return
+
+        ax = self._axes()
+        self._build_hbars(ax, names, stages, colors, fontsize=8, gap=0.03)
 
         ax.set_title(self.chart_title, fontsize=11, fontweight='bold', color='#333', pad=8)
         ax.set_xlabel('Активные стадии', fontsize=8, color='#888')
@@ -163,7 +220,7 @@ class ExecutorLoadChart(ChartBase):
         ax.spines['left'].set_color('#E0E0E0')
         ax.spines['bottom'].set_color('#E0E0E0')
 
-        self._finalize()
+        self._finalize(layout_key)
 
 
 class ProjectTypePieChart(ChartBase):
@@ -177,9 +234,8 @@ class ProjectTypePieChart(ChartBase):
         if not self.canvas:
             return
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
+        # Геометрия секторов зависит от всех значений — всегда перестроение
+        ax = self._axes()
 
         labels = []
         sizes = []
@@ -304,20 +360,41 @@ class LineChartWidget(ChartBase):
         if not self.canvas or not series:
             return
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
-
+        plotted = []
         for i, s in enumerate(series):
             color = s.get("color") or self.DEFAULT_COLORS[i % len(self.DEFAULT_COLORS)]
             x_data = s.get("x", [])
             y_data = s.get("y", [])
-            label = s.get("label", "")
             if not x_data or not y_data:
                 continue
-            ax.plot(x_data, y_data, color=color, linewidth=2.5, marker='o',
-                    markersize=4, label=label, zorder=3)
-            ax.fill_between(range(len(x_data)), y_data, alpha=0.12, color=color)
+            plotted.append((s.get("label", ""), color, list(x_data), list(y_data)))
+
+        x_labels = tuple(series[0]["x"]) if series[0].get("x") else ()
+        layout_key = (x_labels, tuple((label, color, tuple(x), len(y))
+                                      for label, color, x, y in plotted))
+        if self._can_update(layout_key):
+            ax = self._ax
+            for line, (_label, _color, _x, y_data) in zip(self._artists['lines'], plotted):
+                line.set_ydata(y_data)
+            for fill in self._artists['fills']:
+                fill.remove()
+            ax.relim()
+            self._artists['fills'] = [
+                ax.fill_between(range(len(x_data)), y_data, alpha=0.12, color=color)
+                for _label, color, x_data, y_data in plotted]
+            ax.autoscale_view()
+            self._finalize(layout_key)
+            return
+
+        ax = self._axes()
+        lines = []
+        fills = []
+        for label, color, x_data, y_data in plotted:
+            line, = ax.plot(x_data, y_data, color=color, linewidth=2.5, marker='o',
+                            markersize=4, label=label, zorder=3)
+            lines.append(line)
+            fills.append(ax.fill_between(range(len(x_data)), y_data, alpha=0.12, color=color))
+        self._artists = {'lines': lines, 'fills': fills}
 
         if series and series[0].get("x"):
             x_labels = series[0]["x"]
@@ -340,7 +417,7 @@ class LineChartWidget(ChartBase):
             ax.legend(loc='upper left', fontsize=7, framealpha=0.9,
                       edgecolor='#E0E0E0', fancybox=True)
 
-        self._finalize()
+        self._finalize(layout_key)
 
 
 class StackedBarChartWidget(ChartBase):
@@ -372,10 +449,6 @@ class StackedBarChartWidget(ChartBase):
             self.figure.set_size_inches(5, fig_h)
             self.setMinimumHeight(int(fig_h * 100))
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
-
         # Определяем нужен ли поворот меток
         need_rotation = n_cat > 6 or any(len(c) > 6 for c in categories)
         # При повороте можно показывать более длинные подписи
@@ -386,38 +459,47 @@ class StackedBarChartWidget(ChartBase):
         rotation = 45 if need_rotation else 0
         ha = 'right' if need_rotation else 'center'
 
+        colors = [s.get("color") or self.DEFAULT_COLORS[i % len(self.DEFAULT_COLORS)]
+                  for i, s in enumerate(series)]
+        series_values = [s.get("values", [0] * n_categories) for s in series]
+
+        layout_key = (tuple(categories), stacked, tuple(highlight_prefixes or ()),
+                      tuple((s.get("label", ""), color, len(values))
+                            for s, color, values in zip(series, colors, series_values)))
+        if self._can_update(layout_key):
+            self._set_bar_values(series_values, stacked)
+            self._finalize_update()
+            return
+
+        ax = self._axes()
+        all_bars = []
+        all_texts = []
         if stacked:
-            bottoms = [0.0] * n_categories
-            for i, s in enumerate(series):
-                color = s.get("color") or self.DEFAULT_COLORS[i % len(self.DEFAULT_COLORS)]
-                values = s.get("values", [0] * n_categories)
-                bars = ax.bar(x, values, bottom=bottoms, color=color,
+            for s, color, values in zip(series, colors, series_values):
+                bars = ax.bar(x, values, color=color,
                               label=s.get("label", ""), edgecolor='white',
                               linewidth=0.5, width=0.7)
-                for bar, val, bot in zip(bars, values, bottoms):
-                    if val > 0:
-                        ax.text(bar.get_x() + bar.get_width() / 2,
-                                bot + val / 2, str(int(val)),
-                                ha='center', va='center', fontsize=7,
-                                fontweight='bold', color='white')
-                bottoms = [b + v for b, v in zip(bottoms, values)]
+                all_bars.append(list(bars))
+                all_texts.append([ax.text(0, 0, '', ha='center', va='center', fontsize=7,
+                                          fontweight='bold', color='white')
+                                  for _ in bars])
         else:
             n_series = len(series)
             bar_width = 0.7 / n_series
-            for i, s in enumerate(series):
-                color = s.get("color") or self.DEFAULT_COLORS[i % len(self.DEFAULT_COLORS)]
-                values = s.get("values", [0] * n_categories)
+            for i, (s, color, values) in enumerate(zip(series, colors, series_values)):
                 offset = (i - n_series / 2 + 0.5) * bar_width
                 positions = [xi + offset for xi in x]
                 bars = ax.bar(positions, values, width=bar_width * 0.9,
                               color=color, label=s.get("label", ""),
                               edgecolor='white', linewidth=0.5)
-                for bar, val in zip(bars, values):
-                    if val > 0:
-                        ax.text(bar.get_x() + bar.get_width() / 2,
-                                bar.get_height() * 1.02 + 0.1, str(int(val)),
-                                ha='center', va='bottom', fontsize=6,
-                                fontweight='bold', color='#555')
+                all_bars.append(list(bars))
+                all_texts.append([ax.text(0, 0, '', ha='center', va='bottom', fontsize=6,
+                                          fontweight='bold', color='#555')
+                                  for _ in bars])
+        self._artists = {'bars': all_bars, 'texts': all_texts}
+        self._set_bar_values(series_values, stacked)
+        ax.relim()
+        ax.autoscale_view()
 
         ax.set_xticks(list(x))
         ax.set_xticklabels(short_categories, fontsize=7, rotation=rotation, ha=ha)
@@ -452,7 +534,28 @@ class StackedBarChartWidget(ChartBase):
             ax.legend(loc='upper right', fontsize=7, framealpha=0.9,
                       edgecolor='#E0E0E0', fancybox=True)
 
-        self._finalize()
+        self._finalize(layout_key)
+
+    def _set_bar_values(self, series_values, stacked):
+        """Высоты (и основания стопок) баров и подписи значений; нулевые подписи скрыты"""
+        bottoms = None
+        for bars, texts, values in zip(self._artists['bars'], self._artists['texts'],
+                                       series_values):
+            if bottoms is None:
+                bottoms = [0.0] * len(values)
+            for bar, text, val, bot in zip(bars, texts, values, bottoms):
+                cx = bar.get_x() + bar.get_width() / 2
+                if stacked:
+                    bar.set_y(bot)
+                    bar.set_height(val)
+                    text.set_position((cx, bot + val / 2))
+                else:
+                    bar.set_height(val)
+                    text.set_position((cx, val * 1.02 + 0.1))
+                text.set_text(str(int(val)))
+                text.set_visible(val > 0)
+            if stacked:
+                bottoms = [b + v for b, v in zip(bottoms, values)]
 
 
 class HorizontalBarWidget(ChartBase):
@@ -484,10 +587,6 @@ class HorizontalBarWidget(ChartBase):
         self.figure.set_size_inches(5, fig_h)
         self.setMinimumHeight(int(fig_h * 100))
 
-        self.figure.clear()
-        ax = self.figure.add_subplot(111)
-        ax.set_facecolor('white')
-
         # Сортируем по убыванию значений
         paired = sorted(zip(values, labels), key=lambda x: x[0])
         sorted_values = [p[0] for p in paired]
@@ -500,16 +599,16 @@ class HorizontalBarWidget(ChartBase):
             bar_colors = [self.DEFAULT_COLORS[i % len(self.DEFAULT_COLORS)]
                           for i in range(len(sorted_labels))]
 
-        bars = ax.barh(sorted_labels, sorted_values, color=bar_colors,
-                       height=0.6, edgecolor='white')
+        layout_key = tuple(sorted_labels)
+        if self._can_update(layout_key):
+            self._set_hbar_values(sorted_values, bar_colors)
+            self._finalize_update()
+            return
 
+        ax = self._axes()
         # Значения на барах (справа)
-        max_val = max(sorted_values) if sorted_values else 1
-        for bar, val in zip(bars, sorted_values):
-            ax.text(bar.get_width() + max_val * 0.02,
-                    bar.get_y() + bar.get_height() / 2,
-                    str(int(val)) if isinstance(val, float) and val == int(val) else str(val),
-                    va='center', fontsize=8, fontweight='bold', color='#333')
+        self._build_hbars(ax, sorted_labels, sorted_values, bar_colors, fontsize=8, gap=0.02,
+                          fmt=self._format_value)
 
         ax.tick_params(axis='y', labelsize=7, pad=2)
         ax.tick_params(axis='x', labelsize=7)
@@ -523,4 +622,8 @@ class HorizontalBarWidget(ChartBase):
             ax.set_title(self.chart_title, fontsize=11, fontweight='bold',
                          color='#333', pad=8)
 
-        self._finalize()
+        self._finalize(layout_key)
+
+    @staticmethod
+    def _format_value(val):
+        return str(int(val)) if isinstance(val, float) and val == int(val) else str(val)
@@ -1900,7 +1900,7 @@ class CRMStatisticsDialog(QDialog):
         """Экспорт в PDF"""
         import logging
         from PyQt5.QtWidgets import QFileDialog
-        from utils.pdf_utils import build_table_pdf
+        from utils.pdf_utils import build_table_pdf_async
         _logger = logging.getLogger(__name__)
 
         default_name = f'Отчет Статистика CRM {self.project_type} от {QDate.currentDate().toString("dd.MM.yyyy")}'
@@ -1934,7 +1934,8 @@ class CRMStatisticsDialog(QDialog):
                     else:
                         in_work += 1
 
-            build_table_pdf(
+            build_table_pdf_async(
+                self,
                 output_path=filename,
                 title=f'Статистика CRM: {self.project_type} проекты',
                 headers=headers,
@@ -1959,7 +1960,7 @@ class CRMStatisticsDialog(QDialog):
         """Выполнение экспорта PDF с параметрами (обратная совместимость)"""
         import os
         import logging
-        from utils.pdf_utils import build_table_pdf
+        from utils.pdf_utils import build_table_pdf_async
         _logger = logging.getLogger(__name__)
 
         try:
@@ -1988,7 +1989,8 @@ class CRMStatisticsDialog(QDialog):
                     else:
                         in_work += 1
 
-            build_table_pdf(
+            build_table_pdf_async(
+                self,
                 output_path=full_path,
                 title=f'Статистика CRM: {self.project_type} проекты',
                 headers=headers,
@@ -21,7 +21,7 @@ from config import YANDEX_DISK_TOKEN
 from utils.dialog_helpers import create_progress_dialog
 from utils.data_access import DataAccess
 from utils.button_debounce import debounce_click
-from ui.base_kanban_tab import BaseDraggableList, BaseKanbanColumn
+from ui.base_kanban_tab import BaseDraggableList, BaseKanbanColumn, reconcile_kanban_board
 from utils.permissions import _has_perm
 import os
 import threading
@@ -71,8 +71,13 @@ class SupervisionDraggableList(BaseDraggableList):
             event.accept()
             return
         
-        source_column.card_moved.emit(card_id, source_column.column_name, target_column.column_name)
+        # CopyAction: Qt не удаляет source item сам — карточку переносит
+        # load_active_cards() (reconcile по ID). Emit откладываем до завершения DnD,
+        # иначе Qt после drop удалит выделенный элемент уже обновлённой колонки
+        event.setDropAction(Qt.CopyAction)
         event.accept()
+        QTimer.singleShot(50, lambda: source_column.card_moved.emit(
+            card_id, source_column.column_name, target_column.column_name))
 
 class CRMSupervisionTab(QWidget):
     """Вкладка CRM Авторского надзора"""
@@ -682,26 +687,19 @@ class CRMSupervisionTab(QWidget):
 
         columns_dict = self.active_widget.columns
 
-        # Отключаем отрисовку на время массовой загрузки
-        for column in columns_dict.values():
-            column.cards_list.setUpdatesEnabled(False)
-            column.clear_cards()
-
-        # Добавляем карточки с учетом прав
+        # Фильтрация с учетом прав
         is_dan = self.is_dan_role
         dan_id = self.employee['id']
+        visible_cards = []
         for card_data in cards:
             if is_dan and card_data.get('dan_id') != dan_id:
                 continue
+            if not card_data.get('column_name'):
+                card_data = dict(card_data, column_name='Новый заказ')
+            visible_cards.append(card_data)
 
-            column_name = card_data.get('column_name', 'Новый заказ')
-            if column_name in columns_dict:
-                columns_dict[column_name].add_card(card_data, bulk=True)
-
-        # Пакетное обновление после загрузки
-        for column in columns_dict.values():
-            column.update_header_count()
-            column.cards_list.setUpdatesEnabled(True)
+        # Инкрементальное обновление: пересоздаются только изменённые карточки
+        reconcile_kanban_board(columns_dict, visible_cards)
 
         self.update_tab_counters()
 
@@ -1149,7 +1147,9 @@ class CRMSupervisionTab(QWidget):
         """
         try:
             print(f"[SYNC] Получено обновление карточек надзора: {len(updated_cards)} записей")
-            # Обновляем из локальной БД (данные уже синхронизированы), не блокируя UI
+            # Обновляем из локальной БД (данные уже синхронизированы), не блокируя UI.
+            # Активная доска обновляется через reconcile — виджеты неизменённых
+            # карточек, прокрутка и выделение сохраняются
             self.data.prefer_local = True
             try:
                 self.refresh_current_tab()
@@ -23,11 +23,12 @@ from utils.calendar_helpers import CALENDAR_STYLE, add_today_button_to_dateedit,
 from utils.tab_helpers import disable_wheel_on_tabwidget
 from utils.table_settings import ProportionalResizeTable, apply_no_focus_delegate, TableSettings
 from utils.date_utils import format_date, format_month_year
+from utils.business_calendar import get_calendar
 from utils.yandex_disk import YandexDiskManager
 from config import YANDEX_DISK_TOKEN
 from utils.resource_path import resource_path
 from utils.dialog_helpers import create_progress_dialog
-from ui.base_kanban_tab import BaseDraggableList, BaseKanbanColumn
+from ui.base_kanban_tab import BaseDraggableList, BaseKanbanColumn, reconcile_kanban_board
 from functools import partial
 from utils.button_debounce import debounce_click
 import json
@@ -87,13 +88,13 @@ class DraggableListWidget(BaseDraggableList):
             return
 
         # CopyAction вместо MoveAction: запрещаем Qt автоматически удалять
-        # source item. Мы перестроим карточки полностью через load_cards_for_type().
-        # Без этого: MoveAction удаляет item → clear() пытается удалить снова → segfault
+        # source item. Карточку переносит load_cards_for_type() (reconcile по ID).
+        # Без этого: MoveAction удаляет item → takeItem() пытается удалить снова → segfault
         event.setDropAction(Qt.CopyAction)
         event.accept()
 
         # Отложенный emit: dropEvent + DnD cleanup должны полностью завершиться
-        # ПЕРЕД вызовом on_card_moved() → load_cards_for_type() → QListWidget.clear()
+        # ПЕРЕД вызовом on_card_moved() → load_cards_for_type() → QListWidget.takeItem()
         QTimer.singleShot(50, lambda: source_column.card_moved.emit(
             card_id,
             source_column.column_name,
@@ -435,36 +436,25 @@ class CRMTab(QWidget):
 
             columns_dict = board_widget.columns
 
-            # Отключаем отрисовку на время массовой загрузки
-            for column in columns_dict.values():
-                column.cards_list.setUpdatesEnabled(False)
-                column.clear_cards()
-
-            if cards:
-                for card_data in cards:
+            visible_cards = []
+            for card_data in cards or []:
+                try:
+                    if self.should_show_card_for_employee(card_data):
+                        visible_cards.append(card_data)
+                except Exception as card_error:
                     try:
-                        if not self.should_show_card_for_employee(card_data):
-                            continue
+                        print(f"ОШИБКА при обработке карточки ID={card_data.get('id')}: {card_error}")
+                    except (UnicodeEncodeError, OSError):
+                        pass
 
-                        column_name = card_data.get('column_name')
-                        if column_name and column_name in columns_dict:
-                            columns_dict[column_name].add_card(card_data, bulk=True)
-
-                    except Exception as card_error:
-                        try:
-                            print(f"ОШИБКА при обработке карточки ID={card_data.get('id')}: {card_error}")
-                        except (UnicodeEncodeError, OSError):
-                            pass
-                        continue
+            # Инкрементальное обновление: пересоздаются только изменённые,
+            # перемещённые, новые карточки; прокрутка и выделение сохраняются
+            stats = reconcile_kanban_board(columns_dict, visible_cards)
 
             _t2 = _time.perf_counter()
-            print(f"[PERF] Виджеты карточек ({project_type}): {(_t2-_t1)*1000:.0f}ms")
-
-            # Пакетное обновление после загрузки всех карточек
-            for column in columns_dict.values():
-                column.cards_list.updateGeometry()
-                column.update_header_count()
-                column.cards_list.setUpdatesEnabled(True)
+            print(f"[PERF] Виджеты карточек ({project_type}): {(_t2-_t1)*1000:.0f}ms "
+                  f"(+{stats['added']} ~{stats['updated']} >{stats['moved']} "
+                  f"-{stats['removed']} ={stats['unchanged']})")
 
             self.update_project_tab_counters()
             _t3 = _time.perf_counter()
@@ -1465,12 +1455,27 @@ class CRMTab(QWidget):
             # Сбрасываем кеш CRM карточек — данные могли измениться
             from utils.data_access import _global_cache
             _global_cache.invalidate("crm_cards")
+
+            # Перезагружаем только доски затронутых типов проектов;
+            # load_cards_for_type пересоздаст лишь изменившиеся карточки
+            changed_types = [t for t in ('Индивидуальный', 'Шаблонный')
+                             if any(isinstance(c, dict) and c.get('project_type') == t
+                                    for c in updated_cards)]
             # Обновляем из локальной БД (данные уже синхронизированы), не блокируя UI
             self.data.prefer_local = True
             try:
-                self.load_cards_for_current_tab()
+                if not changed_types:
+                    self.load_cards_for_current_tab()
+                    return
+                for project_type in changed_types:
+                    self.load_cards_for_type(project_type)
             finally:
                 self.data.prefer_local = False
+
+            # Архив (через API — локальная БД не содержит crm_cards)
+            if _has_perm(self.employee, self.api_client, 'crm_cards.move'):
+                for project_type in changed_types:
+                    self.load_archive_cards(project_type)
         except Exception as e:
             print(f"[ERROR] Ошибка синхронизации CRM карточек: {e}")
             import traceback
@@ -1654,8 +1659,9 @@ class CRMColumn(BaseKanbanColumn):
         """Создать виджет CRM-карточки."""
         return CRMCard(card_data, self.can_edit, self.db, self.employee, api_client=self.api_client)
 
-    def add_card(self, card_data, bulk=False):
-        """Добавление карточки в колонку. bulk=True пропускает updateGeometry/update_header_count."""
+    def add_card(self, card_data, bulk=False, row=None):
+        """Добавление карточки в колонку. bulk=True пропускает updateGeometry/update_header_count.
+        row — позиция вставки (None — в конец списка)."""
         card_id = card_data.get('id')
 
         try:
@@ -1670,8 +1676,12 @@ class CRMColumn(BaseKanbanColumn):
             item.setData(Qt.UserRole, card_id)
             item.setSizeHint(QSize(200, exact_height + 10))
 
-            self.cards_list.addItem(item)
+            if row is None:
+                self.cards_list.addItem(item)
+            else:
+                self.cards_list.insertItem(row, item)
             self.cards_list.setItemWidget(item, card_widget)
+            self._remember_card(card_data)
 
             if not bulk:
                 self.cards_list.updateGeometry()
@@ -1701,8 +1711,12 @@ class CRMColumn(BaseKanbanColumn):
                 item.setData(Qt.UserRole, card_id)
                 item.setSizeHint(QSize(200, 90))
 
-                self.cards_list.addItem(item)
+                if row is None:
+                    self.cards_list.addItem(item)
+                else:
+                    self.cards_list.insertItem(row, item)
                 self.cards_list.setItemWidget(item, error_widget)
+                # Снимок не сохраняем: при следующем reconcile виджет пересоздастся
             except Exception:
                 pass
             
@@ -1744,28 +1758,11 @@ class CRMCard(QFrame):
         start_date НЕ считается (сегодня уже идёт), end_date считается.
         Совпадает с логикой add_working_days: start + N раб.дней = deadline.
         """
-        if start_date > end_date:
-            return -self.calculate_working_days(end_date, start_date)
-
-        # Праздники РФ (месяц, день) — работает для любого года
-        russian_holidays = [
-            (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
-            (2, 23), (3, 8), (5, 1), (5, 9), (6, 12), (11, 4),
-        ]
-
-        working_days = 0
-        current = start_date.addDays(1)  # начинаем со следующего дня
-
-        while current <= end_date:
-            day_of_week = current.dayOfWeek()  # Пн=1 .. Вс=7
-            is_holiday = (current.month(), current.day()) in russian_holidays
-
-            if day_of_week < 6 and not is_holiday:
-                working_days += 1
-
-            current = current.addDays(1)
-
-        return working_days
+        calendar = get_calendar()
+        start, end = start_date.toPyDate(), end_date.toPyDate()
+        if start > end:
+            return -calendar.working_days_between(end, start)
+        return calendar.working_days_between(start, end)
 
     def _get_contract_yandex_folder(self, contract_id):
         """Получение пути к папке договора на Яндекс.Диске
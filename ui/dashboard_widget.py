@@ -15,8 +15,25 @@ from utils.resource_path import resource_path
 from utils.data_access import DataAccess
 
 
+# Перекрашенные SVG: (icon_path, color) -> bytes. Карточки метрик и фильтры
+# всех дашбордов используют несколько иконок в нескольких цветах.
+_colored_svg_cache = {}
+
+
 def create_colored_icon(icon_path, color):
-    """Создать цветную иконку из SVG"""
+    """Создать цветную иконку из SVG (результат кэшируется)"""
+    cached = _colored_svg_cache.get((icon_path, color))
+    if cached is not None:
+        return cached
+
+    svg_data = _build_colored_svg(icon_path, color)
+    if svg_data is not None:
+        _colored_svg_cache[(icon_path, color)] = svg_data
+    return svg_data
+
+
+def _build_colored_svg(icon_path, color):
+    """Прочитать SVG и заменить в нём цвета"""
     full_path = resource_path(icon_path)
     if not os.path.exists(full_path):
         print(f"[WARN] Icon not found: {full_path}")
@@ -69,13 +86,14 @@ class ColoredSvgWidget(QWidget):
         self.color = color
         self.icon_path = icon_path
         self.svg_data = create_colored_icon(icon_path, color)
+        # Рендерер создаётся один раз, а не на каждый paintEvent
+        self._renderer = QSvgRenderer(self.svg_data) if self.svg_data else None
 
     def paintEvent(self, event):
-        if self.svg_data:
+        if self._renderer is not None:
             painter = QPainter(self)
-            renderer = QSvgRenderer(self.svg_data)
             # Преобразуем QRect в QRectF для совместимости с PyQt5
-            renderer.render(painter, QRectF(self.rect()))
+            self._renderer.render(painter, QRectF(self.rect()))
 
 
 class FilterButton(QPushButton):
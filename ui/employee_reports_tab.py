@@ -7,7 +7,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt5.QtCore import Qt, QDate
 from ui.custom_combobox import CustomComboBox
 from database.db_manager import DatabaseManager
-from utils.pdf_utils import build_table_pdf
+from utils.pdf_utils import build_table_pdf_async
 from utils.icon_loader import IconLoader  # ← ДОБАВЛЕНО
 from utils.calendar_helpers import ICONS_PATH
 from utils.table_settings import apply_no_focus_delegate
@@ -459,7 +459,8 @@ class EmployeeReportsTab(QWidget):
                              item.get('position', ''),
                              f"{item.get('total_salary', 0):,.2f}"] for item in data]
 
-            build_table_pdf(
+            build_table_pdf_async(
+                self,
                 output_path=filename,
                 title=title,
                 headers=headers,
@@ -7,7 +7,7 @@ from PyQt5.QtCore import Qt, pyqtSignal, QThread, pyqtSlot
 from PyQt5.QtGui import QFont, QPixmap, QColor
 from PyQt5.QtWidgets import QTabWidget
 from database.db_manager import DatabaseManager
-from ui.main_window import MainWindow
+from utils.lazy_import import lazy_class
 from ui.custom_message_box import CustomMessageBox
 from utils.resource_path import resource_path
 from config import MULTI_USER_MODE, API_BASE_URL, API_VERIFY_SSL
@@ -17,6 +17,9 @@ from utils.password_utils import verify_password
 from utils.logger import log_auth_attempt, app_logger
 # =================================
 
+# Главное окно (и все вкладки) импортируется только после успешного входа
+MainWindow = lazy_class('ui.main_window', 'MainWindow')
+
 # ========== API CLIENT ==========
 if MULTI_USER_MODE:
     from utils.api_client import APIClient, APIConnectionError, APITimeoutError
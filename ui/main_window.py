@@ -10,16 +10,20 @@ from PyQt5.QtSvg import QSvgWidget
 from PyQt5.QtWidgets import QTabWidget
 from config import ROLES
 from utils.permissions import get_allowed_tabs, _has_perm
-from ui.dashboard_tab import DashboardTab
-from ui.clients_tab import ClientsTab
-from ui.contracts_tab import ContractsTab
-from ui.crm_tab import CRMTab
-from ui.crm_supervision_tab import CRMSupervisionTab
-from ui.reports_tab import ReportsTab
-from ui.employees_tab import EmployeesTab
-from ui.salaries_tab import SalariesTab
-from ui.employee_reports_tab import EmployeeReportsTab
+from utils.lazy_import import lazy_class
 from ui.global_search_widget import GlobalSearchWidget
+
+# Вкладки импортируются при первом создании (setup_tabs / lazy placeholder),
+# чтобы не тянуть matplotlib/reportlab/fitz/openpyxl до показа окна входа
+DashboardTab = lazy_class('ui.dashboard_tab', 'DashboardTab')
+ClientsTab = lazy_class('ui.clients_tab', 'ClientsTab')
+ContractsTab = lazy_class('ui.contracts_tab', 'ContractsTab')
+CRMTab = lazy_class('ui.crm_tab', 'CRMTab')
+CRMSupervisionTab = lazy_class('ui.crm_supervision_tab', 'CRMSupervisionTab')
+ReportsTab = lazy_class('ui.reports_tab', 'ReportsTab')
+EmployeesTab = lazy_class('ui.employees_tab', 'EmployeesTab')
+SalariesTab = lazy_class('ui.salaries_tab', 'SalariesTab')
+EmployeeReportsTab = lazy_class('ui.employee_reports_tab', 'EmployeeReportsTab')
 from ui.custom_message_box import CustomMessageBox
 from utils.tab_helpers import disable_wheel_on_tabwidget
 
@@ -1342,12 +1342,9 @@ class MessengerAdminDialog(QDialog):
             import os
             file_name = os.path.basename(memo_path)
             yandex_path = f"/CRM/memo/{file_name}"
-            try:
-                if self.data_access:
-                    self.data_access.upload_file(memo_path, yandex_path)
-                    memo_server_path = yandex_path
-            except Exception:
-                memo_server_path = memo_path  # fallback — сохраняем локальный путь
+            result = self.data_access.upload_file(memo_path, yandex_path) if self.data_access else None
+            # fallback — сохраняем локальный путь
+            memo_server_path = yandex_path if result else memo_path
         elif memo_path:
             memo_server_path = memo_path
 
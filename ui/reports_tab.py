@@ -9,6 +9,7 @@
 
 import logging
 import threading
+from concurrent.futures import Future
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QLabel,
     QComboBox, QPushButton, QGridLayout, QTabWidget, QFrame,
@@ -27,8 +28,9 @@ from utils.data_access import DataAccess
 from utils.resource_path import resource_path
 from utils.pdf_utils import (
     register_fonts, make_page_footer, pdf_section_header,
-    grab_widget_png, chart_to_png, fit_image, open_file,
+    grab_widget_png, chart_to_png_async, fit_image, open_file,
 )
+from utils.chart_render import RenderCoalescer, get_chart_renderer
 
 logger = logging.getLogger(__name__)
 
@@ -141,6 +143,11 @@ class ReportsTab(QWidget):
         self.data_access = DataAccess(api_client=api_client)
         self._data_loaded = False
         self._loading = False
+        # Фильтры изменились во время загрузки — перезагрузить по её окончании
+        self._reload_pending = False
+        # Серия быстрых изменений фильтров -> одна перезагрузка (последняя)
+        self._reload_coalescer = RenderCoalescer(
+            lambda: self.reload_all_sections(), delay_ms=250, parent=self)
 
         # Кеш для данных
         self._cache = {}
@@ -722,9 +729,9 @@ class ReportsTab(QWidget):
         return filters
 
     def _on_filter_changed(self, _text=None):
-        """Обработчик изменения любого фильтра"""
+        """Обработчик изменения любого фильтра (перезагрузка с задержкой)"""
         if self._data_loaded:
-            self.reload_all_sections()
+            self._reload_coalescer.trigger()
 
     def reset_filters(self):
         """Сбросить все фильтры в положение 'Все'"""
@@ -733,11 +740,14 @@ class ReportsTab(QWidget):
             combo.blockSignals(True)
             combo.setCurrentIndex(0)
             combo.blockSignals(False)
+        self._reload_coalescer.cancel()
         self.reload_all_sections()
 
     def reload_all_sections(self):
         """Перезагрузить все секции с текущими фильтрами (фоновый поток)"""
         if self._loading:
+            # Текущая загрузка уже устарела — после неё загрузим заново
+            self._reload_pending = True
             return
         self._loading = True
         filters = self._get_current_filters()
@@ -806,6 +816,13 @@ class ReportsTab(QWidget):
 
     def _update_all_ui(self):
         """Обновить все виджеты данными из кеша (вызывается в главном потоке)"""
+        if self._reload_pending:
+            # Пока шла загрузка, фильтры поменялись: устаревшие данные
+            # не рисуем, сразу грузим по актуальным фильтрам
+            self._reload_pending = False
+            self._loading = False
+            self.reload_all_sections()
+            return
         try:
             self._update_kpi_section()
             self._update_clients_section()
@@ -1300,7 +1317,7 @@ class ReportsTab(QWidget):
                            max_height_mm=None, dpi=150):
         """Рендер matplotlib-графика в ReportLab Image через BytesIO.
 
-        Если height_mm задан — figure ресайзится к целевым пропорциям,
+        Если height_mm задан — снимок figure ресайзится к целевым пропорциям,
         обеспечивая одинаковую высоту парных графиков.
 
         Args:
@@ -1312,64 +1329,56 @@ class ReportsTab(QWidget):
         Returns:
             reportlab.platypus.Image или None
         """
-        import io
+        return self._submit_chart_rl_image(
+            chart, width_mm, height_mm, max_height_mm, dpi)()
+
+    def _submit_chart_rl_image(self, chart, width_mm, height_mm=None,
+                               max_height_mm=None, dpi=150):
+        """Поставить график в очередь рендера (ChartRenderService).
+
+        Живой figure не трогается: ресайз и растеризация идут на снимке
+        в фоновом потоке. Возвращает функцию без аргументов, которая
+        дожидается рендера и отдаёт reportlab Image (или None).
+        """
         from reportlab.platypus import Image as RLImage
         from reportlab.lib.units import mm
 
         if not hasattr(chart, 'canvas') or not chart.canvas:
-            return None
+            return lambda: None
         if not hasattr(chart, 'figure') or not chart.figure.axes:
-            return None
-
-        buf = io.BytesIO()
-        fig = chart.figure
-        orig_size = fig.get_size_inches()
-        orig_dpi = fig.get_dpi()
-
-        try:
-            # Целевые размеры в дюймах
-            target_w = width_mm / 25.4
-            if height_mm:
-                target_h = height_mm / 25.4
-            else:
-                aspect = orig_size[1] / orig_size[0] if orig_size[0] > 0 else 0.6
-                target_h = target_w * aspect
-
-            # Ограничение максимальной высоты
-            if max_height_mm:
-                max_h = max_height_mm / 25.4
-                if target_h > max_h:
-                    target_h = max_h
-
-            # Временно ресайзим figure для консистентного рендера
-            fig.set_size_inches(target_w, target_h)
-            try:
-                fig.tight_layout(pad=0.8, h_pad=0.6, w_pad=0.6)
-            except Exception:
-                pass
-
-            fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight',
-                        facecolor='white', edgecolor='none', pad_inches=0.04)
-            buf.seek(0)
-
-            w = width_mm * mm
+            return lambda: None
+
+        orig_size = chart.figure.get_size_inches()
+        # Целевые размеры в дюймах
+        target_w = width_mm / 25.4
+        if height_mm:
+            target_h = height_mm / 25.4
+        else:
+            aspect = orig_size[1] / orig_size[0] if orig_size[0] > 0 else 0.6
+            target_h = target_w * aspect
+
+        # Ограничение максимальной высоты
+        if max_height_mm:
+            max_h = max_height_mm / 25.4
+            if target_h > max_h:
+                target_h = max_h
+
+        future = get_chart_renderer().submit(
+            chart, dpi=dpi, size_inches=(target_w, target_h), tight_pad=0.8,
+            pad_inches=0.04)
+
+        def _result():
+            rendered = future.result()
+            if rendered is None:
+                logger.debug("Не удалось отрендерить график в PDF")
+                return None
+            buf = rendered[0]
             h_mm = height_mm if height_mm else width_mm * (target_h / target_w)
             if max_height_mm and h_mm > max_height_mm:
                 h_mm = max_height_mm
-            h = h_mm * mm
+            return RLImage(buf, width=width_mm * mm, height=h_mm * mm)
 
-            return RLImage(buf, width=w, height=h)
-        except Exception as e:
-            logger.debug(f"Не удалось отрендерить график в PDF: {e}")
-            return None
-        finally:
-            fig.set_size_inches(orig_size)
-            fig.set_dpi(orig_dpi)
-            try:
-                fig.tight_layout(pad=1.2, h_pad=1.0, w_pad=1.0)
-            except Exception:
-                pass
-            chart.canvas.draw()
+        return _result
 
     def _is_wide_chart(self, chart):
         """Определить нужен ли график на всю ширину.
@@ -1420,12 +1429,25 @@ class ReportsTab(QWidget):
             """Динамическая высота зависит от количества данных"""
             return isinstance(c, (FunnelBarChart, HorizontalBarWidget))
 
-        elements = []
-        pending = None
-
+        # Все графики уходят в рендер сразу — растеризация идёт параллельно
+        # с раскладкой, ниже результаты забираются по порядку
+        jobs = []
         for chart in charts:
             is_wide = self._is_wide_chart(chart)
+            if is_wide:
+                # Широкие: авто-высота с ограничением сверху
+                job = self._submit_chart_rl_image(
+                    chart, width_mm=page_w_mm - 4, max_height_mm=WIDE_MAX_H)
+            else:
+                # Парные: фиксированная высота для обычных и Pie, авто для горизонтальных баров
+                h = None if _is_dynamic(chart) else HALF_H
+                job = self._submit_chart_rl_image(chart, width_mm=col_w - 2, height_mm=h)
+            jobs.append((is_wide, job))
 
+        elements = []
+        pending = None
+
+        for is_wide, job in jobs:
             if is_wide:
                 if pending is not None:
                     row = RLTable([[pending, '']], colWidths=[col_w * mm, col_w * mm])
@@ -1434,16 +1456,12 @@ class ReportsTab(QWidget):
                     elements.append(Spacer(1, 2 * mm))
                     pending = None
 
-                # Широкие: авто-высота с ограничением сверху
-                img = self._chart_to_rl_image(
-                    chart, width_mm=page_w_mm - 4, max_height_mm=WIDE_MAX_H)
+                img = job()
                 if img:
                     elements.append(img)
                     elements.append(Spacer(1, 2 * mm))
             else:
-                # Парные: фиксированная высота для обычных и Pie, авто для горизонтальных баров
-                h = None if _is_dynamic(chart) else HALF_H
-                img = self._chart_to_rl_image(chart, width_mm=col_w - 2, height_mm=h)
+                img = job()
                 if not img:
                     continue
                 if pending is None:
@@ -1549,21 +1567,24 @@ class ReportsTab(QWidget):
             # 2. Funnel chart — через figure.savefig() (лучшее качество)
             funnel = subtab.get("funnel")
             if funnel and hasattr(funnel, 'figure') and funnel.figure.axes:
-                chart_data = chart_to_png(funnel, dpi=300)
-                if chart_data:
-                    images.append(chart_data)
+                images.append(chart_to_png_async(funnel, dpi=300))
 
             # 3. Stage duration chart — через figure.savefig() (полный, без обрезки скроллом)
             stage_chart = subtab.get("stage_duration")
             if stage_chart and hasattr(stage_chart, 'figure') and stage_chart.figure.axes:
-                chart_data = chart_to_png(stage_chart, dpi=300)
-                if chart_data:
-                    images.append(chart_data)
+                images.append(chart_to_png_async(stage_chart, dpi=300))
 
-            if images:
-                results.append((label, images))
+            results.append((label, images))
         self.crm_tabs.setCurrentIndex(saved_idx)
-        return results
+
+        # Графики рендерились в фоне, пока захватывались остальные вкладки
+        resolved = []
+        for label, images in results:
+            images = [img.result() if isinstance(img, Future) else img for img in images]
+            images = [img for img in images if img]
+            if images:
+                resolved.append((label, images))
+        return resolved
 
     def export_to_pdf(self):
         """Экспорт отчёта в PDF — скриншоты секций (pixel-perfect как на экране)"""
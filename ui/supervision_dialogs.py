@@ -581,7 +581,7 @@ class SupervisionStatisticsDialog(QDialog):
         """Экспорт в PDF"""
         import logging
         from PyQt5.QtWidgets import QFileDialog
-        from utils.pdf_utils import build_table_pdf
+        from utils.pdf_utils import build_table_pdf_async
         _logger = logging.getLogger(__name__)
 
         default_name = f'Отчет Статистика авторского надзора от {QDate.currentDate().toString("dd.MM.yyyy")}'
@@ -615,7 +615,8 @@ class SupervisionStatisticsDialog(QDialog):
                     else:
                         in_work += 1
 
-            build_table_pdf(
+            build_table_pdf_async(
+                self,
                 output_path=filename,
                 title='Статистика CRM Авторского надзора',
                 headers=headers,
@@ -2,15 +2,16 @@
 """
 Виджет «Таблица сроков надзора» для карточки CRM надзора.
 Содержит 12 стадий закупки с бюджетами, статусами, экспортом.
-Все редактируемые поля: QLabel + кнопка-карандаш → inline-редактор → автосохранение.
+Все редактируемые поля: ячейка с карандашом (рисует TimelineCellDelegate) →
+inline-редактор → автосохранение.
 """
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QTableWidget,
     QPushButton, QHeaderView, QDateEdit,
-    QAbstractItemView, QFileDialog, QComboBox, QLineEdit,
+    QAbstractItemView, QFileDialog, QLineEdit,
     QTextEdit, QDialog, QDialogButtonBox, QGroupBox,
-    QTableWidgetItem
+    QTableWidgetItem, QMenu
 )
 from PyQt5.QtCore import Qt, QDate, QUrl
 from PyQt5.QtGui import QDoubleValidator, QDesktopServices
@@ -18,6 +19,7 @@ from utils.calendar_helpers import add_today_button_to_dateedit
 from utils.date_utils import networkdays
 from utils.icon_loader import IconLoader
 from utils.table_settings import apply_no_focus_delegate
+from ui.timeline_cells import Cell, TimelineCellDelegate, apply_cell, cell_at
 from datetime import datetime, timedelta
 import logging
 
@@ -94,87 +96,78 @@ class SupervisionTimelineWidget(QWidget):
         return names
 
     @staticmethod
-    def _make_cell_label(text, bg_color, align='center', bold=False, font_size=12,
-                         color='#333333'):
-        """Создать QLabel для ячейки (обход глобального stylesheet)"""
-        lbl = QLabel(text)
-        weight = 'bold' if bold else 'normal'
-        lbl.setStyleSheet(
-            f'background-color: {bg_color}; color: {color}; padding: 4px 6px; '
-            f'font-size: {font_size}px; font-weight: {weight}; border-radius: 2px;'
-        )
-        qt_align = Qt.AlignCenter if align == 'center' else (Qt.AlignLeft | Qt.AlignVCenter)
-        if align == 'right':
-            qt_align = Qt.AlignRight | Qt.AlignVCenter
-        lbl.setAlignment(qt_align)
-        return lbl
-
-    def _create_pencil_btn(self, tooltip='Редактировать'):
-        """Создать кнопку-карандаш для ячейки"""
-        pencil_btn = IconLoader.create_action_button(
-            'edit', tooltip=tooltip,
-            bg_color='transparent', hover_color='#E3F2FD',
-            icon_size=14, button_size=22, icon_color='#666666'
-        )
-        return pencil_btn
-
-    def _create_editable_cell(self, text, bg_color, row, stage_code, field_name,
-                              align='center', is_date=False, is_number=False,
-                              is_multiline=False, tooltip_text=None):
-        """Создать ячейку QLabel + кнопка-карандаш для редактирования.
-
-        При нажатии карандаша → переключается в inline-редактор.
-        При потере фокуса или Enter → автосохранение.
-        """
-        container = QWidget()
-        container.setStyleSheet('background-color: transparent;')
-        layout = QHBoxLayout(container)
-        layout.setContentsMargins(2, 0, 2, 0)
-        layout.setSpacing(2)
-        layout.setAlignment(Qt.AlignVCenter)
-
-        # QLabel с текущим значением
-        lbl = QLabel(text)
-        qt_align = Qt.AlignCenter if align == 'center' else (Qt.AlignLeft | Qt.AlignVCenter)
-        if align == 'right':
-            qt_align = Qt.AlignRight | Qt.AlignVCenter
-        lbl.setAlignment(qt_align)
-        lbl.setStyleSheet(
-            f'background-color: {bg_color}; color: #333333; padding: 2px 4px; '
-            f'font-size: 12px; border-radius: 2px; border: 1px solid #E0E0E0;'
-        )
-        lbl.setMinimumWidth(40)
-
-        # Tooltip для примечаний
+    def _editable_cell(text, bg_color, align='center', is_date=False, tooltip_text=None):
+        """Описание редактируемой ячейки (рамка + карандаш, рисует делегат).
+        Клик по ячейке → inline-редактор → автосохранение."""
         if tooltip_text:
-            lbl.setToolTip(tooltip_text)
+            tooltip = tooltip_text
         elif is_date and text:
-            lbl.setToolTip('Нажмите карандаш для изменения даты')
+            tooltip = 'Нажмите карандаш для изменения даты'
         elif not text:
-            lbl.setToolTip('Нажмите карандаш для ввода')
-
-        # Кнопка-карандаш
-        pencil_btn = self._create_pencil_btn()
-
-        if is_date:
-            pencil_btn.clicked.connect(
-                lambda checked, r=row, sc=stage_code, fn=field_name, cur=text:
-                    self._edit_date_cell(r, sc, fn, cur)
-            )
-        elif is_multiline:
-            pencil_btn.clicked.connect(
-                lambda checked, r=row, sc=stage_code, fn=field_name, cur=text:
-                    self._edit_multiline_cell(r, sc, fn, cur)
-            )
+            tooltip = 'Нажмите карандаш для ввода'
         else:
-            pencil_btn.clicked.connect(
-                lambda checked, r=row, sc=stage_code, fn=field_name, cur=text, num=is_number:
-                    self._edit_text_cell(r, sc, fn, cur, num)
-            )
-
-        layout.addWidget(lbl, 1)
-        layout.addWidget(pencil_btn, 0)
-        return container
+            tooltip = ''
+        return Cell(text, bg_color, align, tooltip=tooltip, editable='pencil')
+
+    # Колонка → (поле, тип редактора)
+    _EDITORS = {
+        1: ('executor', 'choice'),
+        2: ('plan_date', 'date'),
+        3: ('actual_date', 'date'),
+        6: ('budget_planned', 'number'),
+        7: ('budget_actual', 'number'),
+        9: ('supplier', 'text'),
+        10: ('commission', 'number'),
+        11: ('status', 'choice'),
+        12: ('notes', 'multiline'),
+    }
+
+    def _on_cell_clicked(self, row, col):
+        """Клик по редактируемой ячейке — открыть соответствующий редактор"""
+        if row >= len(self.entries) or col not in self._EDITORS:
+            return
+        field_name, kind = self._EDITORS[col]
+        stage_code = self.entries[row].get('stage_code', '')
+        cell = cell_at(self.table, row, col)
+        current_text = cell.text if cell is not None else ''
+        if kind == 'date':
+            self._edit_date_cell(row, stage_code, field_name, current_text)
+        elif kind == 'multiline':
+            self._edit_multiline_cell(row, stage_code, field_name, current_text)
+        elif kind == 'choice':
+            self._show_choice_menu(row, col, stage_code, field_name)
+        else:
+            self._edit_text_cell(row, stage_code, field_name, current_text,
+                                 is_number=(kind == 'number'))
+
+    def _show_choice_menu(self, row, col, stage_code, field_name):
+        """Выпадающий список исполнителя/статуса под ячейкой"""
+        current = self.entries[row].get(field_name, '') or ''
+        if field_name == 'executor':
+            options = [''] + list(self._executor_names)
+            # Если текущий исполнитель не в списке — добавить
+            if current and current not in options:
+                options.append(current)
+        else:
+            options = list(STATUS_OPTIONS)
+
+        menu = QMenu(self)
+        for option in options:
+            action = menu.addAction(option or '—')
+            action.setCheckable(True)
+            action.setChecked(option == current)
+            action.setData(option)
+        rect = self.table.visualRect(self.table.model().index(row, col))
+        chosen = menu.exec_(self.table.viewport().mapToGlobal(rect.bottomLeft()))
+        if chosen is None:
+            return
+        value = chosen.data() or ''
+        if value == current:
+            return
+        if field_name == 'executor':
+            self._on_executor_changed(row, stage_code, value)
+        else:
+            self._on_status_changed(row, stage_code, value)
 
     def _edit_date_cell(self, row, stage_code, field_name, current_text):
         """Переключить ячейку даты в режим редактирования (QDateEdit)"""
@@ -247,6 +240,7 @@ class SupervisionTimelineWidget(QWidget):
         )
 
         date_layout.addWidget(date_edit)
+        # Единственный виджет в таблице — активный редактор ячейки
         self.table.setCellWidget(row, col, date_container)
         date_edit.setFocus()
 
@@ -268,8 +262,9 @@ class SupervisionTimelineWidget(QWidget):
         else:
             self._save_entry(stage_code, {'plan_date': date_str})
 
-        # Перестроить таблицу
-        self._populate_table()
+        # Закрыть редактор и перерисовать изменившиеся ячейки
+        self.table.removeCellWidget(row, self._field_to_col(field_name))
+        self._refresh_rows()
         self._update_summary()
 
     def _edit_text_cell(self, row, stage_code, field_name, current_text, is_number=False):
@@ -296,6 +291,10 @@ class SupervisionTimelineWidget(QWidget):
         ''')
 
         def save_and_close():
+            # editingFinished приходит и по Enter, и по потере фокуса
+            if line_edit.property('_saved'):
+                return
+            line_edit.setProperty('_saved', True)
             text = line_edit.text().strip()
             value = None
             if is_number:
@@ -320,7 +319,8 @@ class SupervisionTimelineWidget(QWidget):
                 updates['budget_savings'] = savings
 
             self._save_entry(stage_code, updates)
-            self._populate_table()
+            self.table.removeCellWidget(row, col)
+            self._refresh_rows()
             self._update_summary()
 
         line_edit.editingFinished.connect(save_and_close)
@@ -366,7 +366,7 @@ class SupervisionTimelineWidget(QWidget):
             if row < len(self.entries):
                 self.entries[row][field_name] = text
             self._save_entry(stage_code, {field_name: text})
-            self._populate_table()
+            self._refresh_rows()
             self._update_summary()
 
     def _field_to_col(self, field_name):
@@ -420,6 +420,8 @@ class SupervisionTimelineWidget(QWidget):
         self.table.verticalHeader().setVisible(False)
         self.table.setShowGrid(True)
         self.table.setAlternatingRowColors(False)
+        self.table.setItemDelegate(TimelineCellDelegate(self.table))
+        self.table.cellClicked.connect(self._on_cell_clicked)
 
         # Все столбцы — Interactive (пользователь может растягивать)
         header = self.table.horizontalHeader()
@@ -604,196 +606,94 @@ class SupervisionTimelineWidget(QWidget):
         except (ValueError, TypeError):
             return None
 
-    def _populate_table(self):
-        """Заполнение таблицы: QLabel + карандаш для всех редактируемых полей"""
-        self._loading = True
-        self.table.setUpdatesEnabled(False)
-        try:
-            self.table.setRowCount(0)
-            # +1 строка для "Итого"
-            total_rows = len(self.entries) + 1 if self.entries else 0
-            self.table.setRowCount(total_rows)
+    def _build_row_cells(self, entry):
+        """Описание ячеек строки стадии (список Cell по колонкам)"""
+        status = entry.get('status', 'Не начато')
+        bg = STATUS_COLORS.get(status, '#FFFFFF')
+
+        # Кол 0: Стадия (только чтение)
+        cells = [Cell(entry.get('stage_name', ''), bg, 'left')]
+
+        # Кол 1: Исполнитель (выпадающий список с привязанными к карточке)
+        cells.append(Cell(entry.get('executor', '') or '', '#FFFFFF', 'left',
+                          font_size=11, editable='combo'))
+
+        # Кол 2: План. дата (карандаш → QDateEdit)
+        plan_date = entry.get('plan_date', '')
+        plan_text = ''
+        if plan_date:
+            d = QDate.fromString(plan_date, 'yyyy-MM-dd')
+            plan_text = d.toString('dd.MM.yyyy') if d.isValid() else ''
+        cells.append(self._editable_cell(plan_text, bg, is_date=True))
+
+        # Кол 3: Факт. дата (карандаш → QDateEdit)
+        fact_date = entry.get('actual_date', '')
+        fact_text = ''
+        fact_bg = bg
+        if fact_date:
+            d = QDate.fromString(fact_date, 'yyyy-MM-dd')
+            if d.isValid():
+                fact_text = d.toString('dd.MM.yyyy')
+            fact_bg = '#E8F5E9'
+        cells.append(self._editable_cell(fact_text, fact_bg, is_date=True))
+
+        # Кол 4: Дней (авто-расчёт, только чтение)
+        days_val = entry.get('actual_days', '') or ''
+        cells.append(Cell(str(days_val) if days_val else '', bg))
+
+        # Кол 5: Расхождение (авто-расчёт, цвет)
+        deviation = self._calculate_deviation(plan_date, fact_date)
+        entry['_deviation'] = deviation  # кэшируем
+        dev_text = ''
+        dev_color = '#333333'
+        if deviation is not None:
+            dev_text = str(deviation)
+            if deviation > 0:
+                dev_color = '#F44336'  # красный — опоздание
+            elif deviation < 0:
+                dev_color = '#4CAF50'  # зелёный — раньше срока
+        cells.append(Cell(dev_text, bg, color=dev_color))
+
+        # Кол 6-7: Бюджет план/факт (карандаш → число)
+        bp = entry.get('budget_planned', 0) or 0
+        cells.append(self._editable_cell(f'{bp:,.0f}' if bp else '', bg, 'right'))
+        ba = entry.get('budget_actual', 0) or 0
+        cells.append(self._editable_cell(f'{ba:,.0f}' if ba else '', bg, 'right'))
+
+        # Кол 8: Экономия (авто-расчёт, только чтение)
+        savings = entry.get('budget_savings', 0) or 0
+        savings_color = '#333333'
+        if savings > 0:
+            savings_color = '#4CAF50'
+        elif savings < 0:
+            savings_color = '#F44336'
+        cells.append(Cell(f'{savings:,.0f}' if savings else '', bg, 'right',
+                          color=savings_color))
 
-            for row, entry in enumerate(self.entries):
-                self.table.setRowHeight(row, 36)
-                stage_code = entry.get('stage_code', '')
-                status = entry.get('status', 'Не начато')
-                bg = STATUS_COLORS.get(status, '#FFFFFF')
-
-                # Кол 0: Стадия (только чтение)
-                stage_lbl = self._make_cell_label(entry.get('stage_name', ''), bg, 'left')
-                self.table.setCellWidget(row, 0, stage_lbl)
-
-                # Кол 1: Исполнитель (QComboBox с привязанными к карточке)
-                executor_combo = QComboBox()
-                executor_combo.addItem('')
-                for name in self._executor_names:
-                    executor_combo.addItem(name)
-                current_executor = entry.get('executor', '') or ''
-                # Если текущий исполнитель не в списке — добавить
-                if current_executor and current_executor not in self._executor_names:
-                    executor_combo.addItem(current_executor)
-                idx = executor_combo.findText(current_executor)
-                if idx >= 0:
-                    executor_combo.setCurrentIndex(idx)
-                executor_combo.setStyleSheet(
-                    "QComboBox { border: 1px solid #E0E0E0; padding: 2px;"
-                    " font-size: 11px; background: white; }")
-                executor_combo.currentTextChanged.connect(
-                    lambda text, r=row, sc=stage_code:
-                        self._on_executor_changed(r, sc, text))
-                self.table.setCellWidget(row, 1, executor_combo)
-
-                # Кол 2: План. дата (карандаш → QDateEdit)
-                plan_date = entry.get('plan_date', '')
-                plan_text = ''
-                if plan_date:
-                    try:
-                        d = QDate.fromString(plan_date, 'yyyy-MM-dd')
-                        plan_text = d.toString('dd.MM.yyyy') if d.isValid() else ''
-                    except Exception:
-                        pass
-                plan_cell = self._create_editable_cell(
-                    plan_text, bg, row, stage_code, 'plan_date',
-                    align='center', is_date=True)
-                self.table.setCellWidget(row, 2, plan_cell)
-
-                # Кол 3: Факт. дата (карандаш → QDateEdit)
-                fact_date = entry.get('actual_date', '')
-                fact_text = ''
-                fact_bg = bg
-                if fact_date:
-                    try:
-                        d = QDate.fromString(fact_date, 'yyyy-MM-dd')
-                        fact_text = d.toString('dd.MM.yyyy') if d.isValid() else ''
-                        fact_bg = '#E8F5E9'
-                    except Exception:
-                        pass
-                fact_cell = self._create_editable_cell(
-                    fact_text, fact_bg, row, stage_code, 'actual_date',
-                    align='center', is_date=True)
-                self.table.setCellWidget(row, 3, fact_cell)
-
-                # Кол 4: Дней (авто-расчёт, только чтение)
-                days_val = entry.get('actual_days', '') or ''
-                days_lbl = self._make_cell_label(str(days_val) if days_val else '', bg)
-                self.table.setCellWidget(row, 4, days_lbl)
-
-                # Кол 5: Расхождение (авто-расчёт, цвет)
-                deviation = self._calculate_deviation(plan_date, fact_date)
-                entry['_deviation'] = deviation  # кэшируем
-                dev_text = ''
-                dev_color = '#333333'
-                if deviation is not None:
-                    dev_text = str(deviation)
-                    if deviation > 0:
-                        dev_color = '#F44336'  # красный — опоздание
-                    elif deviation < 0:
-                        dev_color = '#4CAF50'  # зелёный — раньше срока
-                dev_lbl = self._make_cell_label(dev_text, bg, 'center', color=dev_color)
-                self.table.setCellWidget(row, 5, dev_lbl)
-
-                # Кол 6: Бюджет план (карандаш → число)
-                bp = entry.get('budget_planned', 0) or 0
-                bp_text = f'{bp:,.0f}' if bp else ''
-                bp_cell = self._create_editable_cell(
-                    bp_text, bg, row, stage_code, 'budget_planned',
-                    align='right', is_number=True)
-                self.table.setCellWidget(row, 6, bp_cell)
-
-                # Кол 7: Бюджет факт (карандаш → число)
-                ba = entry.get('budget_actual', 0) or 0
-                ba_text = f'{ba:,.0f}' if ba else ''
-                ba_cell = self._create_editable_cell(
-                    ba_text, bg, row, stage_code, 'budget_actual',
-                    align='right', is_number=True)
-                self.table.setCellWidget(row, 7, ba_cell)
-
-                # Кол 8: Экономия (авто-расчёт, только чтение)
-                savings = entry.get('budget_savings', 0) or 0
-                savings_color = '#333333'
-                if savings > 0:
-                    savings_color = '#4CAF50'
-                elif savings < 0:
-                    savings_color = '#F44336'
-                savings_text = f'{savings:,.0f}' if savings else ''
-                savings_lbl = self._make_cell_label(
-                    savings_text, bg, 'right', color=savings_color)
-                self.table.setCellWidget(row, 8, savings_lbl)
-
-                # Кол 9: Поставщик (карандаш → текст)
-                supplier = entry.get('supplier', '') or ''
-                supplier_cell = self._create_editable_cell(
-                    supplier, bg, row, stage_code, 'supplier',
-                    align='left')
-                self.table.setCellWidget(row, 9, supplier_cell)
-
-                # Кол 10: Комиссия (карандаш → число)
-                commission = entry.get('commission', 0) or 0
-                comm_text = f'{commission:,.0f}' if commission else ''
-                comm_cell = self._create_editable_cell(
-                    comm_text, bg, row, stage_code, 'commission',
-                    align='right', is_number=True)
-                self.table.setCellWidget(row, 10, comm_cell)
-
-                # Кол 11: Статус (QComboBox)
-                status_combo = QComboBox()
-                status_combo.addItems(STATUS_OPTIONS)
-                idx = STATUS_OPTIONS.index(status) if status in STATUS_OPTIONS else 0
-                status_combo.setCurrentIndex(idx)
-                status_combo.setStyleSheet(
-                    "QComboBox { border: 1px solid #E0E0E0; padding: 2px;"
-                    " font-size: 11px; background: white; }")
-                status_combo.currentTextChanged.connect(
-                    lambda text, r=row, sc=stage_code:
-                        self._on_status_changed(r, sc, text))
-                self.table.setCellWidget(row, 11, status_combo)
-
-                # Кол 12: Примечания (карандаш → многострочный диалог)
-                notes = entry.get('notes', '') or ''
-                display_notes = notes[:40] + '...' if len(notes) > 40 else notes
-                tip = notes if notes else 'Нажмите карандаш для ввода примечания'
-                notes_cell = self._create_editable_cell(
-                    display_notes, bg, row, stage_code, 'notes',
-                    align='left', is_multiline=True, tooltip_text=tip)
-                self.table.setCellWidget(row, 12, notes_cell)
-
-            # === СТРОКА "ИТОГО" ===
-            if self.entries:
-                self._add_totals_row(len(self.entries))
+        # Кол 9: Поставщик (карандаш → текст)
+        cells.append(self._editable_cell(entry.get('supplier', '') or '', bg, 'left'))
 
-            # Зафиксировать высоту таблицы — ровно под строки + заголовок + запас
-            row_count = self.table.rowCount()
-            total_h = self.table.horizontalHeader().height() + 6
-            for i in range(row_count):
-                total_h += self.table.rowHeight(i)
-            # Добавляем запас для предотвращения вертикального скроллбара
-            total_h += row_count + 2
-            self.table.setFixedHeight(total_h)
+        # Кол 10: Комиссия (карандаш → число)
+        commission = entry.get('commission', 0) or 0
+        cells.append(self._editable_cell(f'{commission:,.0f}' if commission else '', bg, 'right'))
 
-        finally:
-            self.table.setUpdatesEnabled(True)
-            self._loading = False
+        # Кол 11: Статус (выпадающий список)
+        cells.append(Cell(status if status in STATUS_OPTIONS else STATUS_OPTIONS[0],
+                          '#FFFFFF', 'left', font_size=11, editable='combo'))
 
-    def _add_totals_row(self, row):
-        """Добавить строку 'Итого' в конец таблицы (не редактируемая, жирный шрифт, серый фон)"""
-        totals_bg = '#F5F5F5'
-        self.table.setRowHeight(row, 36)
+        # Кол 12: Примечания (карандаш → многострочный диалог)
+        notes = entry.get('notes', '') or ''
+        display_notes = notes[:40] + '...' if len(notes) > 40 else notes
+        tip = notes if notes else 'Нажмите карандаш для ввода примечания'
+        cells.append(self._editable_cell(display_notes, bg, 'left', tooltip_text=tip))
+        return cells
 
-        # Кол 0: "Итого" (жирный)
-        totals_label = self._make_cell_label('Итого', totals_bg, 'left', bold=True)
-        self.table.setCellWidget(row, 0, totals_label)
-
-        # Кол 1 (Исполнитель), 2 (План), 3 (Факт): пустые
-        for col in (1, 2, 3):
-            empty_lbl = self._make_cell_label('', totals_bg)
-            self.table.setCellWidget(row, col, empty_lbl)
+    def _build_totals_cells(self):
+        """Строка 'Итого' (не редактируемая, жирный шрифт, серый фон)"""
+        totals_bg = '#F5F5F5'
 
         # Кол 4: Итого дней
         total_days = sum(e.get('actual_days', 0) or 0 for e in self.entries)
-        days_text = str(total_days) if total_days else ''
-        days_lbl = self._make_cell_label(days_text, totals_bg, 'center', bold=True)
-        self.table.setCellWidget(row, 4, days_lbl)
 
         # Кол 5: Итого расхождений (сумма положительных = опоздания)
         total_deviation = sum(
@@ -801,10 +701,6 @@ class SupervisionTimelineWidget(QWidget):
             for e in self.entries
             if e.get('_deviation') is not None and e.get('_deviation', 0) > 0
         )
-        dev_text = str(total_deviation) if total_deviation else ''
-        dev_color = '#F44336' if total_deviation > 0 else '#333333'
-        dev_lbl = self._make_cell_label(dev_text, totals_bg, 'center', bold=True, color=dev_color)
-        self.table.setCellWidget(row, 5, dev_lbl)
 
         # Суммы бюджетов
         total_bp = sum(e.get('budget_planned', 0) or 0 for e in self.entries)
@@ -812,39 +708,77 @@ class SupervisionTimelineWidget(QWidget):
         total_savings = sum(e.get('budget_savings', 0) or 0 for e in self.entries)
         total_commission = sum(e.get('commission', 0) or 0 for e in self.entries)
 
-        # Кол 6: Бюджет план
-        bp_text = f'{total_bp:,.0f}' if total_bp else ''
-        bp_lbl = self._make_cell_label(bp_text, totals_bg, 'right', bold=True)
-        self.table.setCellWidget(row, 6, bp_lbl)
-
-        # Кол 7: Бюджет факт
-        ba_text = f'{total_ba:,.0f}' if total_ba else ''
-        ba_lbl = self._make_cell_label(ba_text, totals_bg, 'right', bold=True)
-        self.table.setCellWidget(row, 7, ba_lbl)
-
-        # Кол 8: Экономия
         savings_color = '#333333'
         if total_savings > 0:
             savings_color = '#4CAF50'
         elif total_savings < 0:
             savings_color = '#F44336'
-        savings_text = f'{total_savings:,.0f}' if total_savings else ''
-        savings_lbl = self._make_cell_label(savings_text, totals_bg, 'right', bold=True, color=savings_color)
-        self.table.setCellWidget(row, 8, savings_lbl)
 
-        # Кол 9: Поставщик — пусто
-        empty_supplier = self._make_cell_label('', totals_bg)
-        self.table.setCellWidget(row, 9, empty_supplier)
+        empty = Cell('', totals_bg)
+        return [
+            Cell('Итого', totals_bg, 'left', bold=True),
+            empty, empty, empty,
+            Cell(str(total_days) if total_days else '', totals_bg, bold=True),
+            Cell(str(total_deviation) if total_deviation else '', totals_bg, bold=True,
+                 color='#F44336' if total_deviation > 0 else '#333333'),
+            Cell(f'{total_bp:,.0f}' if total_bp else '', totals_bg, 'right', bold=True),
+            Cell(f'{total_ba:,.0f}' if total_ba else '', totals_bg, 'right', bold=True),
+            Cell(f'{total_savings:,.0f}' if total_savings else '', totals_bg, 'right',
+                 bold=True, color=savings_color),
+            empty,
+            Cell(f'{total_commission:,.0f}' if total_commission else '', totals_bg,
+                 'right', bold=True),
+            empty, empty,
+        ]
+
+    def _table_rows(self):
+        """Ячейки всех строк: стадии + 'Итого' (итоги считаются после стадий)"""
+        if not self.entries:
+            return []
+        rows = [self._build_row_cells(entry) for entry in self.entries]
+        rows.append(self._build_totals_cells())
+        return rows
+
+    def _populate_table(self):
+        """Заполнение таблицы: QTableWidgetItem + делегат, без виджета на ячейку"""
+        self._loading = True
+        self.table.setUpdatesEnabled(False)
+        try:
+            self.table.setRowCount(0)
+            rows = self._table_rows()
+            self.table.setRowCount(len(rows))
+
+            for row, cells in enumerate(rows):
+                self.table.setRowHeight(row, 36)
+                for col, cell in enumerate(cells):
+                    apply_cell(self.table, row, col, cell)
 
-        # Кол 10: Комиссия
-        comm_text = f'{total_commission:,.0f}' if total_commission else ''
-        comm_lbl = self._make_cell_label(comm_text, totals_bg, 'right', bold=True)
-        self.table.setCellWidget(row, 10, comm_lbl)
+            # Зафиксировать высоту таблицы — ровно под строки + заголовок + запас
+            row_count = self.table.rowCount()
+            total_h = self.table.horizontalHeader().height() + 6
+            for i in range(row_count):
+                total_h += self.table.rowHeight(i)
+            # Добавляем запас для предотвращения вертикального скроллбара
+            total_h += row_count + 2
+            self.table.setFixedHeight(total_h)
+
+        finally:
+            self.table.setUpdatesEnabled(True)
+            self._loading = False
 
-        # Кол 11-12: пустые
-        for col in (11, 12):
-            empty_lbl = self._make_cell_label('', totals_bg)
-            self.table.setCellWidget(row, col, empty_lbl)
+    def _refresh_rows(self):
+        """Обновить только изменившиеся ячейки (после редактирования).
+        Возвращает количество изменённых ячеек."""
+        rows = self._table_rows()
+        if len(rows) != self.table.rowCount():
+            self._populate_table()
+            return -1
+        changed = 0
+        for row, cells in enumerate(rows):
+            for col, cell in enumerate(cells):
+                if apply_cell(self.table, row, col, cell):
+                    changed += 1
+        return changed
 
     def _on_executor_changed(self, row, stage_code, new_executor):
         """Изменение исполнителя"""
@@ -853,6 +787,7 @@ class SupervisionTimelineWidget(QWidget):
         if row < len(self.entries):
             self.entries[row]['executor'] = new_executor
         self._save_entry(stage_code, {'executor': new_executor})
+        self._refresh_rows()
 
     def _on_status_changed(self, row, stage_code, new_status):
         """Изменение статуса"""
@@ -861,8 +796,8 @@ class SupervisionTimelineWidget(QWidget):
         if row < len(self.entries):
             self.entries[row]['status'] = new_status
         self._save_entry(stage_code, {'status': new_status})
-        # Перестроить таблицу для обновления цветов QLabel
-        self._populate_table()
+        # Перерисовать строку с новым цветом статуса
+        self._refresh_rows()
 
     def _recalculate_all_days(self):
         """Пересчёт дней для всех стадий.
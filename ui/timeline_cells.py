@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Ячейки таблиц сроков (ProjectTimelineWidget, SupervisionTimelineWidget)
+без QLabel/QWidget на каждую ячейку.
+
+Содержимое ячейки описывается неизменяемым Cell и кладётся в
+QTableWidgetItem (роли модели), а TimelineCellDelegate рисует фон, рамку,
+жирный/цветной текст и иконку-карандаш сам — глобальный stylesheet
+(QTableWidget::item) на отрисовку не влияет.
+
+apply_cell() сравнивает новый Cell с уже лежащим в ячейке и обновляет
+данные только при отличии: перерисовываются лишь изменившиеся ячейки.
+"""
+
+from collections import namedtuple
+
+from PyQt5.QtCore import Qt, QRect
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPen
+from PyQt5.QtWidgets import QStyledItemDelegate, QTableWidgetItem
+
+from utils.icon_loader import IconLoader
+
+
+# Описание ячейки. parts — кортеж фрагментов (text, color, bold, strike)
+# для ячеек со смешанным форматированием (например, зачёркнутая норма).
+# editable: '' — только чтение, 'pencil' — карандаш, 'combo' — выпадающий список.
+Cell = namedtuple(
+    'Cell',
+    'text bg align bold font_size color tooltip editable parts',
+    defaults=('', '#FFFFFF', 'center', False, 12, '#333333', '', '', None),
+)
+
+CELL_ROLE = Qt.UserRole + 20      # сам Cell (для сравнения при обновлении)
+
+EDIT_ICON_AREA = 22               # ширина области карандаша/стрелки справа
+
+_ALIGN = {
+    'center': Qt.AlignCenter,
+    'left': Qt.AlignLeft | Qt.AlignVCenter,
+    'right': Qt.AlignRight | Qt.AlignVCenter,
+}
+
+_BORDER_COLOR = QColor('#E0E0E0')
+
+
+def apply_cell(table, row, col, cell):
+    """Положить Cell в ячейку таблицы. Возвращает True если ячейка изменилась"""
+    item = table.item(row, col)
+    if item is None:
+        item = QTableWidgetItem()
+        item.setFlags(Qt.ItemIsEnabled)
+        item.setData(CELL_ROLE, cell)
+        item.setToolTip(cell.tooltip)
+        table.setItem(row, col, item)
+        return True
+    if item.data(CELL_ROLE) == cell:
+        return False
+    # setData испускает dataChanged только для этой ячейки
+    item.setData(CELL_ROLE, cell)
+    item.setToolTip(cell.tooltip)
+    return True
+
+
+def cell_at(table, row, col):
+    """Cell ячейки или None"""
+    item = table.item(row, col)
+    return item.data(CELL_ROLE) if item is not None else None
+
+
+class TimelineCellDelegate(QStyledItemDelegate):
+    """Отрисовка Cell: фон, текст, рамка и карандаш для редактируемых ячеек"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._fonts = {}
+
+    def _font(self, base, size, bold, strike=False):
+        key = (size, bold, strike)
+        font = self._fonts.get(key)
+        if font is None:
+            font = QFont(base)
+            font.setPixelSize(size)
+            font.setBold(bold)
+            font.setStrikeOut(strike)
+            self._fonts[key] = font
+        return font
+
+    def paint(self, painter, option, index):
+        cell = index.data(CELL_ROLE)
+        if cell is None:
+            super().paint(painter, option, index)
+            return
+
+        painter.save()
+        rect = option.rect
+        if cell.editable:
+            # Рамка-поле ввода слева, иконка действия справа
+            painter.fillRect(rect, QColor('#FFFFFF'))
+            box = rect.adjusted(2, 5, -(EDIT_ICON_AREA + 2), -5)
+            painter.fillRect(box, QColor(cell.bg))
+            painter.setPen(QPen(_BORDER_COLOR))
+            painter.drawRect(box.adjusted(0, 0, -1, -1))
+            text_rect = box.adjusted(4, 0, -4, 0)
+            icon_name = 'chevron-down' if cell.editable == 'combo' else 'edit'
+            icon = IconLoader.load_colored(icon_name, '#666666', 14)
+            icon_rect = QRect(rect.right() - EDIT_ICON_AREA + 1,
+                              rect.center().y() - 7, 14, 14)
+            icon.paint(painter, icon_rect)
+        else:
+            painter.fillRect(rect, QColor(cell.bg))
+            text_rect = rect.adjusted(6, 4, -6, -4)
+
+        if cell.parts:
+            self._paint_parts(painter, option.font, text_rect, cell)
+        elif cell.text:
+            painter.setFont(self._font(option.font, cell.font_size, cell.bold))
+            painter.setPen(QColor(cell.color))
+            metrics = QFontMetrics(painter.font())
+            text = metrics.elidedText(cell.text, Qt.ElideRight, text_rect.width())
+            painter.drawText(text_rect, _ALIGN.get(cell.align, Qt.AlignCenter), text)
+        painter.restore()
+
+    def _paint_parts(self, painter, base_font, rect, cell):
+        """Нарисовать фрагменты с разным форматированием в одну строку"""
+        parts = []
+        total = 0
+        for text, color, bold, strike in cell.parts:
+            font = self._font(base_font, cell.font_size, bold, strike)
+            width = QFontMetrics(font).horizontalAdvance(text)
+            parts.append((text, color, font, width))
+            total += width
+
+        if cell.align == 'left':
+            x = rect.left()
+        elif cell.align == 'right':
+            x = rect.right() - total
+        else:
+            x = rect.left() + (rect.width() - total) // 2
+        for text, color, font, width in parts:
+            painter.setFont(font)
+            painter.setPen(QColor(color))
+            painter.drawText(QRect(x, rect.top(), width, rect.height()),
+                             Qt.AlignLeft | Qt.AlignVCenter, text)
+            x += width
@@ -14,8 +14,9 @@ from PyQt5.QtCore import Qt, QDate, pyqtSignal
 from PyQt5.QtGui import QColor, QFont, QBrush
 from utils.calendar_helpers import add_today_button_to_dateedit, add_working_days
 from utils.timeline_calc import calc_planned_dates
-from utils.icon_loader import IconLoader
-from datetime import datetime, timedelta
+from utils.business_calendar import get_calendar
+from ui.timeline_cells import Cell, TimelineCellDelegate, apply_cell, cell_at
+from datetime import datetime
 import logging
 import threading
 
@@ -47,30 +48,7 @@ def calc_area_coefficient(area: float) -> int:
 
 def networkdays(start_date, end_date):
     """Расчёт рабочих дней между двумя датами (с учётом праздников РФ)"""
-    if not start_date or not end_date:
-        return 0
-    if isinstance(start_date, str):
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        except ValueError:
-            return 0
-    if isinstance(end_date, str):
-        try:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-        except ValueError:
-            return 0
-
-    if end_date < start_date:
-        return 0
-
-    from utils.date_utils import is_working_day
-    count = 0
-    current = start_date
-    while current < end_date:
-        if is_working_day(current):
-            count += 1
-        current += timedelta(days=1)
-    return count
+    return get_calendar().networkdays(start_date, end_date)
 
 
 # Цвета
@@ -115,6 +93,7 @@ class ProjectTimelineWidget(QWidget):
         self.api_client = api_client
         self.employee = employee
         self.entries = []
+        self._display_rows = []
         self._loading = False
 
         # Получаем данные контракта из локальной БД (мгновенно, без API)
@@ -227,6 +206,8 @@ class ProjectTimelineWidget(QWidget):
         self.table.verticalHeader().setVisible(False)
         self.table.setShowGrid(True)
         self.table.setAlternatingRowColors(False)
+        self.table.setItemDelegate(TimelineCellDelegate(self.table))
+        self.table.cellClicked.connect(self._on_cell_clicked)
 
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)
@@ -505,7 +486,8 @@ class ProjectTimelineWidget(QWidget):
         try:
             self._auto_set_start_date()
             self._recalculate_days()
-            self._populate_table()
+            # Структура строк не меняется — обновляем только изменившиеся ячейки
+            self._refresh_rows()
         finally:
             self._loading = False
 
@@ -618,325 +600,262 @@ class ProjectTimelineWidget(QWidget):
 
         return display_rows
 
-    @staticmethod
-    def _make_cell_label(text, bg_color, align='center', bold=False, font_size=12,
-                         color='#333333'):
-        """Создать QLabel для ячейки таблицы (обход глобального stylesheet)"""
-        lbl = QLabel(text)
-        weight = 'bold' if bold else 'normal'
-        text_align = 'center' if align == 'center' else 'left'
-        lbl.setStyleSheet(
-            f'background-color: {bg_color}; color: {color}; padding: 4px 6px; '
-            f'font-size: {font_size}px; font-weight: {weight}; border-radius: 2px;'
+    def _calc_planned_dates(self, start_index=0):
+        """Рассчитать планируемые даты (делегирует в utils/timeline_calc.py).
+        start_index — пересчитать только записи начиная с этой (ниже по таблице)."""
+        calc_planned_dates(self.entries, start_index)
+
+    def _start_date_tooltip(self):
+        """Tooltip ячейки START: даты договора, замера, ТЗ, аванса"""
+        def _fmt(date_str):
+            if not date_str:
+                return 'не установлена'
+            qd = QDate.fromString(date_str, 'yyyy-MM-dd')
+            return qd.toString('dd.MM.yyyy') if qd.isValid() else date_str
+        cd = self.contract_data.get('contract_date', '')
+        sd = self.card_data.get('survey_date', '')
+        td = self.card_data.get('tech_task_date', '')
+        apd = self.contract_data.get('advance_payment_paid_date', '')
+        return (
+            f"Дата договора: {_fmt(cd)}\n"
+            f"Дата замера: {_fmt(sd)}\n"
+            f"Дата тех. задания: {_fmt(td)}\n"
+            f"Дата аванса: {_fmt(apd)}"
         )
-        qt_align = Qt.AlignCenter if align == 'center' else (Qt.AlignLeft | Qt.AlignVCenter)
-        lbl.setAlignment(qt_align)
-        return lbl
 
-    def _calc_planned_dates(self):
-        """Рассчитать планируемые даты (делегирует в utils/timeline_calc.py)."""
-        calc_planned_dates(self.entries)
+    def _build_row_cells(self, dr):
+        """Описание строки таблицы: (тип, высота, [Cell по колонкам]).
+        Тип 'header' — строка этапа, объединённая на всю ширину."""
+        num_cols = len(self.COLUMNS)
+        row_type = dr.get('_type', 'entry')
+
+        # --- ИТОГО ЭТАПА ---
+        if row_type == 'subtotal':
+            stage_label = dr['_stage_group'].replace('STAGE', 'Этап ')
+            bg = '#E3F2FD'
+            texts = [f'Итого {stage_label}:', '', str(dr['_actual_sum']),
+                     str(dr['_norm_sum']), '', '', '']
+            cells = [Cell(texts[col], bg, 'left' if col == 0 else 'center',
+                          bold=True, font_size=11)
+                     for col in range(num_cols)]
+            return 'subtotal', 32, cells
+
+        # --- ОБЩИЙ ИТОГ ---
+        if row_type == 'grandtotal':
+            bg = '#FFF8E1'
+            actual_sum = dr['_actual_sum']
+            norm_sum = dr['_norm_sum']
+            deviation = actual_sum - norm_sum if actual_sum > 0 else 0
+            deadline_str = dr.get('_deadline_date', '')
+            reasons = dr.get('_deviation_reasons', [])
+
+            # Колонка 0: заголовок + дата дедлайна
+            title_text = 'Итого всех этапов:'
+            if deadline_str:
+                try:
+                    dl = datetime.strptime(deadline_str, '%Y-%m-%d')
+                    title_text += f'  Дедлайн: {dl.strftime("%d.%m.%Y")}'
+                except (ValueError, TypeError):
+                    pass
+            cells = [
+                Cell(title_text, bg, 'left', bold=True),
+                Cell('', bg),
+                Cell(str(actual_sum), bg, bold=True),
+                Cell(str(norm_sum), bg, bold=True),
+            ]
+
+            # Колонка 4: отклонение с причиной
+            if deviation != 0 and actual_sum > 0:
+                sign = '+' if deviation > 0 else ''
+                dev_color = '#C62828' if deviation > 0 else '#2E7D32'
+                tooltip = ''
+                # Тултип с причинами отклонения
+                if reasons:
+                    reason_lines = []
+                    for r in sorted(reasons, key=lambda x: abs(x['diff']), reverse=True):
+                        s = '+' if r['diff'] > 0 else ''
+                        reason_lines.append(f"{r['name']}: {s}{r['diff']} дн.")
+                    tooltip = 'Причины отклонения:\n' + '\n'.join(reason_lines)
+                cells.append(Cell(f'{sign}{deviation} дн.', bg, bold=True,
+                                  color=dev_color, tooltip=tooltip))
+            else:
+                status_text = 'В срок' if actual_sum > 0 else ''
+                cells.append(Cell(status_text, bg, bold=True,
+                                  color='#2E7D32' if status_text else '#333333'))
+
+            # Колонки 5-6: пусто
+            cells.extend(Cell('', bg) for _ in range(5, num_cols))
+            return 'grandtotal', 44, cells
+
+        # --- ОБЫЧНАЯ СТРОКА (entry) ---
+        entry = self.entries[dr['_entry_idx']]
+        role = entry.get('executor_role', '')
+        stage_code = entry.get('stage_code', '')
+        substage_group = entry.get('substage_group', '')
+        is_in_scope = entry.get('is_in_contract_scope', True)
+
+        # --- ЗАГОЛОВОК ЭТАПА (синий) ---
+        if role == 'header' and not substage_group:
+            return 'header', 32, [Cell(entry.get('stage_name', ''), '#2F5496', 'left',
+                                       bold=True, font_size=11, color='#FFFFFF')]
+
+        # --- ЗАГОЛОВОК ПОДЭТАПА (голубой) ---
+        if role == 'header':
+            bg = '#D6E4F0'
+            return 'subheader', 32, [
+                Cell(entry.get('stage_name', '') if col == 0 else '', bg,
+                     'left' if col == 0 else 'center', bold=True, font_size=11)
+                for col in range(num_cols)
+            ]
+
+        # --- РАБОЧАЯ СТРОКА ---
+        actual_days = entry.get('actual_days', 0) or 0
+        norm_days_val = entry.get('norm_days', 0) or 0
+        status_text = ''
+        row_bg = '#FFFFFF'
+
+        entry_status = entry.get('status', '')
+        if not is_in_scope:
+            row_bg = '#E0E0E0'
+        elif entry_status == 'skipped':
+            row_bg = '#F5F5F5'
+            status_text = 'Пропущен'
+        elif actual_days > 0 and norm_days_val > 0:
+            if actual_days <= norm_days_val:
+                status_text = 'В срок'
+                row_bg = '#E8F5E9'
+            else:
+                status_text = 'Просрочен'
+                row_bg = '#FFEBEE'
+
+        # Кол 0: Название
+        cells = [Cell(entry.get('stage_name', ''), row_bg, 'left')]
+
+        # Кол 1: Дата
+        actual_date = entry.get('actual_date', '')
+        if stage_code == 'START':
+            # START строка — только чтение (дата заполняется автоматически)
+            date_text = ''
+            if actual_date:
+                d = QDate.fromString(actual_date, 'yyyy-MM-dd')
+                if d.isValid():
+                    date_text = d.toString('dd.MM.yyyy')
+            cells.append(Cell(date_text, '#FCE4EC', bold=True,
+                              tooltip=self._start_date_tooltip()))
+        else:
+            # Ячейка показывает ТОЛЬКО actual_date (факт)
+            # planned_date — только в tooltip (как подсказка)
+            planned = entry.get('_planned_date', '')
+            pd_q = QDate.fromString(planned, 'yyyy-MM-dd') if planned else QDate()
+            if actual_date:
+                d = QDate.fromString(actual_date, 'yyyy-MM-dd')
+                date_text = d.toString('dd.MM.yyyy') if d.isValid() else ''
+                date_bg = '#E8F5E9'  # зелёный фон — факт заполнен
+                plan_hint = f'\nПланировалось: {pd_q.toString("dd.MM.yyyy")}' if pd_q.isValid() else ''
+                tooltip = f'Фактическая дата{plan_hint}\nНажмите карандаш для изменения'
+            else:
+                # Стадия НЕ завершена — ячейка ПУСТАЯ
+                date_text = ''
+                date_bg = '#FFFFFF'
+                if planned:
+                    plan_fmt = pd_q.toString('dd.MM.yyyy') if pd_q.isValid() else ''
+                    tooltip = f'Планируемая дата: {plan_fmt}\nНажмите карандаш для ввода фактической'
+                else:
+                    tooltip = 'Нажмите карандаш для ввода даты'
+            cells.append(Cell(date_text, date_bg, tooltip=tooltip, editable='pencil'))
+
+        # Кол 2: Кол-во дней
+        cells.append(Cell(str(actual_days) if actual_days > 0 else '', row_bg))
+
+        # Кол 3: Норма дней (с отображением превышения)
+        custom_norm = entry.get('custom_norm_days')
+        norm_bg = row_bg if row_bg != '#FFFFFF' else '#F2F2F2'
+        if custom_norm and norm_days_val > 0 and custom_norm != norm_days_val:
+            # Превышение: зачёркнутая стандартная + красная кастомная
+            cells.append(Cell(
+                '', norm_bg,
+                tooltip=(f'Превышение стандартного значения нормо-дней '
+                         f'(+{custom_norm - norm_days_val} дн.).\n'
+                         f'Стандарт: {norm_days_val}, Установлено: {custom_norm}'),
+                parts=((str(norm_days_val), '#999999', False, True),
+                       (' ', '#333333', False, False),
+                       (str(custom_norm), '#C62828', True, False)),
+            ))
+        else:
+            cells.append(Cell(str(norm_days_val) if norm_days_val > 0 else '', norm_bg))
+
+        # Кол 4: Статус
+        status_color = '#333333'
+        if status_text == 'В срок':
+            status_color = '#2E7D32'
+        elif status_text == 'Просрочен':
+            status_color = '#C62828'
+        cells.append(Cell(status_text, row_bg, bold=bool(status_text), color=status_color))
+
+        # Кол 5: Исполнитель, Кол 6: ФИО
+        cells.append(Cell(role, row_bg))
+        cells.append(Cell(self._get_fio(role), row_bg))
+        return 'entry', 32, cells
 
     def _populate_table(self):
-        """Заполнение таблицы данными (QLabel для цветных ячеек — обход global stylesheet)"""
+        """Полное заполнение таблицы (строки-итоги меняют структуру).
+        Ячейки — QTableWidgetItem + TimelineCellDelegate, без QLabel на ячейку."""
         self._loading = True
         self.table.setUpdatesEnabled(False)
         try:
+            self.table.clearSpans()
             self.table.setRowCount(0)
             self._calc_planned_dates()
-            display_rows = self._build_display_rows()
-            self.table.setRowCount(len(display_rows))
+            self._display_rows = self._build_display_rows()
+            self.table.setRowCount(len(self._display_rows))
             num_cols = len(self.COLUMNS)
 
-            for row, dr in enumerate(display_rows):
-                row_type = dr.get('_type', 'entry')
-
-                # --- ИТОГО ЭТАПА ---
-                if row_type == 'subtotal':
-                    self.table.setRowHeight(row, 32)
-                    stage_label = dr['_stage_group'].replace('STAGE', 'Этап ')
-                    bg = '#E3F2FD'
-                    texts = [f'Итого {stage_label}:', '', str(dr['_actual_sum']),
-                             str(dr['_norm_sum']), '', '', '']
-                    aligns = ['left', 'center', 'center', 'center', 'center', 'center', 'center']
-                    for col in range(num_cols):
-                        lbl = self._make_cell_label(texts[col], bg, aligns[col], bold=True, font_size=11)
-                        self.table.setCellWidget(row, col, lbl)
-                    continue
-
-                # --- ОБЩИЙ ИТОГ ---
-                if row_type == 'grandtotal':
-                    self.table.setRowHeight(row, 44)
-                    bg = '#FFF8E1'
-                    actual_sum = dr['_actual_sum']
-                    norm_sum = dr['_norm_sum']
-                    deviation = actual_sum - norm_sum if actual_sum > 0 else 0
-                    deadline_str = dr.get('_deadline_date', '')
-                    reasons = dr.get('_deviation_reasons', [])
-
-                    # Колонка 0: заголовок + дата дедлайна
-                    title_text = 'Итого всех этапов:'
-                    if deadline_str:
-                        try:
-                            from datetime import datetime as _dt
-                            dl = _dt.strptime(deadline_str, '%Y-%m-%d')
-                            title_text += f'  Дедлайн: {dl.strftime("%d.%m.%Y")}'
-                        except (ValueError, TypeError):
-                            pass
-                    title_lbl = self._make_cell_label(title_text, bg, 'left', bold=True, font_size=12)
-                    self.table.setCellWidget(row, 0, title_lbl)
-
-                    # Колонка 1: пусто
-                    self.table.setCellWidget(row, 1, self._make_cell_label('', bg))
-
-                    # Колонка 2: факт дни
-                    self.table.setCellWidget(row, 2,
-                        self._make_cell_label(str(actual_sum), bg, bold=True, font_size=12))
-
-                    # Колонка 3: норма дни
-                    self.table.setCellWidget(row, 3,
-                        self._make_cell_label(str(norm_sum), bg, bold=True, font_size=12))
-
-                    # Колонка 4: отклонение с причиной
-                    if deviation != 0 and actual_sum > 0:
-                        sign = '+' if deviation > 0 else ''
-                        dev_color = '#C62828' if deviation > 0 else '#2E7D32'
-                        dev_text = f'{sign}{deviation} дн.'
-                        dev_lbl = QLabel()
-                        dev_lbl.setTextFormat(Qt.RichText)
-                        dev_lbl.setText(f'<b style="color:{dev_color}">{dev_text}</b>')
-                        dev_lbl.setAlignment(Qt.AlignCenter)
-                        dev_lbl.setStyleSheet(f'background-color: {bg}; padding: 2px 4px;')
-                        # Тултип с причинами отклонения
-                        if reasons:
-                            reason_lines = []
-                            for r in sorted(reasons, key=lambda x: abs(x['diff']), reverse=True):
-                                s = '+' if r['diff'] > 0 else ''
-                                reason_lines.append(f"{r['name']}: {s}{r['diff']} дн.")
-                            tooltip = 'Причины отклонения:\n' + '\n'.join(reason_lines)
-                            dev_lbl.setToolTip(tooltip)
-                        self.table.setCellWidget(row, 4, dev_lbl)
-                    else:
-                        status_text = 'В срок' if actual_sum > 0 else ''
-                        self.table.setCellWidget(row, 4,
-                            self._make_cell_label(status_text, bg, bold=True,
-                                                  color='#2E7D32' if status_text else '#333333'))
-
-                    # Колонки 5-6: пусто
-                    for col in range(5, num_cols):
-                        self.table.setCellWidget(row, col, self._make_cell_label('', bg))
-                    continue
-
-                # --- ОБЫЧНАЯ СТРОКА (entry) ---
-                entry = self.entries[dr['_entry_idx']]
-                role = entry.get('executor_role', '')
-                stage_code = entry.get('stage_code', '')
-                substage_group = entry.get('substage_group', '')
-                is_header = (role == 'header' and not substage_group)
-                is_subheader = (role == 'header' and bool(substage_group))
-                is_in_scope = entry.get('is_in_contract_scope', True)
-
-                self.table.setRowHeight(row, 32)
-
-                # --- ЗАГОЛОВОК ЭТАПА (синий) ---
-                if is_header:
-                    bg = '#2F5496'
-                    lbl = self._make_cell_label(
-                        entry.get('stage_name', ''), bg, 'left',
-                        bold=True, font_size=11, color='#FFFFFF'
-                    )
-                    self.table.setCellWidget(row, 0, lbl)
+            for row, dr in enumerate(self._display_rows):
+                kind, height, cells = self._build_row_cells(dr)
+                self.table.setRowHeight(row, height)
+                for col, cell in enumerate(cells):
+                    apply_cell(self.table, row, col, cell)
+                if kind == 'header':
                     self.table.setSpan(row, 0, 1, num_cols)
-                    continue
-
-                # --- ЗАГОЛОВОК ПОДЭТАПА (голубой) ---
-                if is_subheader:
-                    bg = '#D6E4F0'
-                    for col in range(num_cols):
-                        lbl = self._make_cell_label(
-                            entry.get('stage_name', '') if col == 0 else '',
-                            bg, 'left' if col == 0 else 'center',
-                            bold=True, font_size=11
-                        )
-                        self.table.setCellWidget(row, col, lbl)
-                    continue
-
-                # --- РАБОЧАЯ СТРОКА ---
-                actual_days = entry.get('actual_days', 0) or 0
-                norm_days_val = entry.get('norm_days', 0) or 0
-                status_text = ''
-                row_bg = '#FFFFFF'
-
-                entry_status = entry.get('status', '')
-                if not is_in_scope:
-                    row_bg = '#E0E0E0'
-                elif entry_status == 'skipped':
-                    row_bg = '#F5F5F5'
-                    status_text = 'Пропущен'
-                elif actual_days > 0 and norm_days_val > 0:
-                    if actual_days <= norm_days_val:
-                        status_text = 'В срок'
-                        row_bg = '#E8F5E9'
-                    else:
-                        status_text = 'Просрочен'
-                        row_bg = '#FFEBEE'
-
-                # Кол 0: Название
-                self.table.setCellWidget(row, 0,
-                    self._make_cell_label(entry.get('stage_name', ''), row_bg, 'left'))
-
-                # Кол 1: Дата
-                is_start_row = (stage_code == 'START')
-                actual_date = entry.get('actual_date', '')
-                entry_idx = dr['_entry_idx']
-
-                if is_start_row:
-                    # START строка — только QLabel (дата заполняется автоматически)
-                    date_text = ''
-                    if actual_date:
-                        try:
-                            d = QDate.fromString(actual_date, 'yyyy-MM-dd')
-                            if d.isValid():
-                                date_text = d.toString('dd.MM.yyyy')
-                        except Exception:
-                            pass
-                    start_label = self._make_cell_label(date_text, '#FCE4EC', 'center', bold=True)
-                    # Tooltip с датами: договор, замер, ТЗ
-                    def _fmt(date_str):
-                        if not date_str:
-                            return 'не установлена'
-                        qd = QDate.fromString(date_str, 'yyyy-MM-dd')
-                        return qd.toString('dd.MM.yyyy') if qd.isValid() else date_str
-                    cd = self.contract_data.get('contract_date', '')
-                    sd = self.card_data.get('survey_date', '')
-                    td = self.card_data.get('tech_task_date', '')
-                    apd = self.contract_data.get('advance_payment_paid_date', '')
-                    start_label.setToolTip(
-                        f"Дата договора: {_fmt(cd)}\n"
-                        f"Дата замера: {_fmt(sd)}\n"
-                        f"Дата тех. задания: {_fmt(td)}\n"
-                        f"Дата аванса: {_fmt(apd)}"
-                    )
-                    self.table.setCellWidget(row, 1, start_label)
-                else:
-                    # Обычная строка — QLabel (read-only) + кнопка-карандаш
-                    planned = entry.get('_planned_date', '')
-                    date_container = QWidget()
-                    date_container.setStyleSheet('background-color: transparent;')
-                    date_layout = QHBoxLayout(date_container)
-                    date_layout.setContentsMargins(2, 0, 2, 0)
-                    date_layout.setSpacing(2)
-                    date_layout.setAlignment(Qt.AlignVCenter)
-
-                    # Определяем текст и стиль
-                    # Ячейка показывает ТОЛЬКО actual_date (факт)
-                    # planned_date — только в tooltip (как подсказка)
-                    if actual_date:
-                        try:
-                            d = QDate.fromString(actual_date, 'yyyy-MM-dd')
-                            date_text = d.toString('dd.MM.yyyy') if d.isValid() else ''
-                        except Exception:
-                            date_text = ''
-                        date_bg = '#E8F5E9'  # зелёный фон — факт заполнен
-                        plan_hint = ''
-                        if planned:
-                            try:
-                                pd_q = QDate.fromString(planned, 'yyyy-MM-dd')
-                                if pd_q.isValid():
-                                    plan_hint = f'\nПланировалось: {pd_q.toString("dd.MM.yyyy")}'
-                            except Exception:
-                                pass
-                        tooltip = f'Фактическая дата{plan_hint}\nНажмите карандаш для изменения'
-                    else:
-                        # Стадия НЕ завершена — ячейка ПУСТАЯ
-                        date_text = ''
-                        date_bg = '#FFFFFF'
-                        if planned:
-                            try:
-                                pd_q = QDate.fromString(planned, 'yyyy-MM-dd')
-                                plan_fmt = pd_q.toString('dd.MM.yyyy') if pd_q.isValid() else ''
-                                tooltip = f'Планируемая дата: {plan_fmt}\nНажмите карандаш для ввода фактической'
-                            except Exception:
-                                tooltip = 'Нажмите карандаш для ввода даты'
-                        else:
-                            tooltip = 'Нажмите карандаш для ввода даты'
-
-                    date_label = QLabel(date_text)
-                    date_label.setAlignment(Qt.AlignCenter)
-                    date_label.setStyleSheet(
-                        f'background-color: {date_bg}; color: #333333; padding: 2px 4px; '
-                        f'font-size: 12px; border-radius: 2px; border: 1px solid #E0E0E0;'
-                    )
-                    date_label.setToolTip(tooltip)
-                    date_label.setMinimumWidth(80)
-
-                    # Кнопка-карандаш для перехода в режим редактирования
-                    pencil_btn = IconLoader.create_action_button(
-                        'edit', tooltip='Редактировать дату',
-                        bg_color='transparent', hover_color='#E3F2FD',
-                        icon_size=14, button_size=22, icon_color='#666666'
-                    )
-                    pencil_btn.clicked.connect(
-                        lambda checked, r=row, ei=entry_idx, sc=stage_code, ad=actual_date:
-                            self._enable_date_edit(r, ei, sc, ad)
-                    )
-
-                    date_layout.addWidget(date_label, 1)
-                    date_layout.addWidget(pencil_btn, 0)
-                    self.table.setCellWidget(row, 1, date_container)
-
-                # Кол 2: Кол-во дней
-                days_text = str(actual_days) if actual_days > 0 else ''
-                self.table.setCellWidget(row, 2,
-                    self._make_cell_label(days_text, row_bg))
-
-                # Кол 3: Норма дней (с отображением превышения)
-                custom_norm = entry.get('custom_norm_days')
-                norm_bg = row_bg if row_bg != '#FFFFFF' else '#F2F2F2'
-                if custom_norm and norm_days_val > 0 and custom_norm != norm_days_val:
-                    # Превышение: зачёркнутая стандартная + красная кастомная
-                    norm_label = QLabel()
-                    norm_label.setTextFormat(Qt.RichText)
-                    norm_label.setText(
-                        f'<s style="color:#999">{norm_days_val}</s> '
-                        f'<b style="color:#C62828">{custom_norm}</b>'
-                    )
-                    norm_label.setAlignment(Qt.AlignCenter)
-                    norm_label.setStyleSheet(f'background-color: {norm_bg}; padding: 2px 4px;')
-                    norm_label.setToolTip(
-                        f'Превышение стандартного значения нормо-дней '
-                        f'(+{custom_norm - norm_days_val} дн.).\n'
-                        f'Стандарт: {norm_days_val}, Установлено: {custom_norm}'
-                    )
-                    self.table.setCellWidget(row, 3, norm_label)
-                else:
-                    norm_text = str(norm_days_val) if norm_days_val > 0 else ''
-                    self.table.setCellWidget(row, 3,
-                        self._make_cell_label(norm_text, norm_bg))
-
-                # Кол 4: Статус
-                status_color = '#333333'
-                if status_text == 'В срок':
-                    status_color = '#2E7D32'
-                elif status_text == 'Просрочен':
-                    status_color = '#C62828'
-                self.table.setCellWidget(row, 4,
-                    self._make_cell_label(status_text, row_bg, bold=bool(status_text),
-                                          color=status_color))
-
-                # Кол 5: Исполнитель
-                self.table.setCellWidget(row, 5,
-                    self._make_cell_label(role, row_bg))
-
-                # Кол 6: ФИО
-                fio = self._get_fio(role)
-                self.table.setCellWidget(row, 6,
-                    self._make_cell_label(fio, row_bg))
-
         finally:
             self.table.setUpdatesEnabled(True)
             self._loading = False
 
+    def _refresh_rows(self, start_index=0):
+        """Обновить таблицу после изменения дат без перестройки.
+        Плановые даты пересчитываются от записи start_index вниз, в таблице
+        обновляются только ячейки, содержимое которых изменилось.
+        Возвращает количество изменённых ячеек."""
+        self._calc_planned_dates(start_index)
+        display_rows = self._build_display_rows()
+        if len(display_rows) != self.table.rowCount() or \
+                [dr['_type'] for dr in display_rows] != [dr['_type'] for dr in self._display_rows]:
+            self._populate_table()
+            return -1
+
+        self._display_rows = display_rows
+        changed = 0
+        for row, dr in enumerate(display_rows):
+            _kind, _height, cells = self._build_row_cells(dr)
+            for col, cell in enumerate(cells):
+                if apply_cell(self.table, row, col, cell):
+                    changed += 1
+        return changed
+
+    def _on_cell_clicked(self, row, col):
+        """Клик по ячейке даты (карандаш) — переход в режим редактирования"""
+        if col != 1 or row >= len(self._display_rows):
+            return
+        cell = cell_at(self.table, row, col)
+        if cell is None or not cell.editable:
+            return
+        entry_idx = self._display_rows[row].get('_entry_idx')
+        if entry_idx is None or entry_idx >= len(self.entries):
+            return
+        entry = self.entries[entry_idx]
+        self._enable_date_edit(row, entry_idx, entry.get('stage_code', ''),
+                               entry.get('actual_date', ''))
+
     def _enable_date_edit(self, row, entry_idx, stage_code, current_actual_date):
         """Переключить ячейку даты в режим редактирования (QDateEdit)"""
         date_container = QWidget()
@@ -1043,8 +962,8 @@ class ProjectTimelineWidget(QWidget):
         if entry_idx < len(self.entries):
             self.entries[entry_idx]['actual_date'] = date_str
 
-        # Пересчёт actual_days
-        self._recalculate_days()
+        # Пересчёт actual_days (записи выше изменённой не затрагиваются)
+        self._recalculate_days(entry_idx)
 
         # Сохранение на сервер
         if self.contract_id and stage_code:
@@ -1060,8 +979,18 @@ class ProjectTimelineWidget(QWidget):
         if old_date != date_str and self.card_data.get('id'):
             self._record_date_change(stage_name, old_date, date_str)
 
-        # Полная перестройка таблицы (с итогами)
-        self._populate_table()
+        # Закрываем редактор и обновляем только затронутые строки (и итоги)
+        row = self._row_of_entry(entry_idx)
+        if row >= 0:
+            self.table.removeCellWidget(row, 1)
+        self._refresh_rows(entry_idx)
+
+    def _row_of_entry(self, entry_idx):
+        """Номер строки таблицы для записи entries[entry_idx] (-1 если нет)"""
+        for row, dr in enumerate(self._display_rows):
+            if dr.get('_type') == 'entry' and dr.get('_entry_idx') == entry_idx:
+                return row
+        return -1
 
     def _record_date_change(self, stage_name, old_date, new_date):
         """Записать изменение даты в историю действий"""
@@ -1087,11 +1016,16 @@ class ProjectTimelineWidget(QWidget):
         except Exception as e:
             print(f"[HISTORY ERROR] timeline_date_changed: {e}")
 
-    def _recalculate_days(self):
+    def _recalculate_days(self, start_index=0):
         """Пересчёт кол-ва рабочих дней между последовательными датами.
-        Ищет ближайшую заполненную дату выше (любое расстояние)."""
+        Ищет ближайшую заполненную дату выше (любое расстояние).
+        start_index — пересчитать только записи начиная с этой."""
         prev_date = None
-        for entry in self.entries:
+        for entry in reversed(self.entries[:start_index]):
+            if entry.get('executor_role', '') != 'header' and entry.get('actual_date'):
+                prev_date = entry['actual_date']
+                break
+        for entry in self.entries[start_index:]:
             role = entry.get('executor_role', '')
             if role == 'header':
                 continue
@@ -186,13 +186,19 @@ class APIClientBase:
                             if not self._is_refreshing:
                                 refreshed = True
                                 break
+                    if refreshed and self.token and hasattr(kwargs.get('data'), 'read'):
+                        # Тело-поток уже прочитано: повторить нельзя, файл
+                        # заново открывает вызывающий код (upload_local_file_to_yandex)
+                        print(f"[API] 401→refresh OK, тело-поток не повторяется")
+                        return response
                     if refreshed and self.token:
                         new_token_tail = self.token[-20:]
-                        # Принудительно обновляем headers с новым токеном
+                        # Прежние заголовки запроса с новым токеном
                         retry_headers = {
-                            "Content-Type": "application/json",
-                            "Authorization": f"Bearer {self.token}"
+                            k: v for k, v in (kwargs.get('headers') or {}).items()
+                            if k.lower() != 'authorization'
                         }
+                        retry_headers["Authorization"] = f"Bearer {self.token}"
                         retry_kwargs = {k: v for k, v in kwargs.items() if k != 'headers'}
                         retry_kwargs['headers'] = retry_headers
                         print(f"[API] 401→refresh OK, retry: ...{old_token_tail} → ...{new_token_tail}")
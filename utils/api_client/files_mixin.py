@@ -1,4 +1,49 @@
-from typing import Optional, List, Dict, Any
+import io
+import os
+import uuid
+from typing import Optional, List, Dict, Any, Callable
+
+from urllib3.fields import RequestField
+
+
+class _MultipartFileStream:
+    """Тело multipart/form-data с одним файлом, читаемое блоками.
+
+    requests не собирает тело в памяти: http.client читает его через read(),
+    __len__ даёт Content-Length. Формат частей — как у requests(files=...).
+    """
+
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, fileobj, filename: str, size: int, field: str = 'file',
+                 progress: Optional[Callable[[int, int], None]] = None):
+        boundary = uuid.uuid4().hex
+        part = RequestField(name=field, data=b'', filename=filename)
+        part.make_multipart(content_type='application/octet-stream')
+        head = f"--{boundary}\r\n".encode('latin-1') + part.render_headers().encode('utf-8')
+        tail = f"\r\n--{boundary}--\r\n".encode('latin-1')
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._index = 0
+        self._length = len(head) + size + len(tail)
+        self._progress = progress
+        self.sent = 0
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0 or n > self.CHUNK_SIZE:
+            n = self.CHUNK_SIZE
+        while self._index < len(self._parts):
+            chunk = self._parts[self._index].read(n)
+            if chunk:
+                self.sent += len(chunk)
+                if self._progress:
+                    self._progress(self.sent, self._length)
+                return chunk
+            self._index += 1
+        return b''
 
 
 class FilesMixin:
@@ -79,6 +124,52 @@ class FilesMixin:
         )
         return self._handle_response(response)
 
+    def upload_local_file_to_yandex(self, local_path: str, yandex_path: str,
+                                    progress_callback: Callable[[int, int], None] = None,
+                                    upload_id: str = None) -> Dict[str, Any]:
+        """Потоковая загрузка локального файла на Яндекс.Диск через сервер.
+
+        Файл читается с диска блоками и не загружается в память целиком.
+        progress_callback(sent, total) — прогресс отправки на сервер;
+        прогресс отправки сервером на ЯД — get_upload_progress(upload_id).
+        """
+        size = os.path.getsize(local_path)
+        params = {'yandex_path': yandex_path}
+        if upload_id:
+            params['upload_id'] = upload_id
+        # Тело — поток: повторная отправка невозможна, retry в _request
+        # отключён. После 401 с обновлением токена файл открывается заново.
+        for attempt in range(2):
+            token_before = self.token
+            upload_headers = {k: v for k, v in self.headers.items() if k.lower() != 'content-type'}
+            with open(local_path, 'rb') as f:
+                body = _MultipartFileStream(f, os.path.basename(local_path), size,
+                                            progress=progress_callback)
+                upload_headers['Content-Type'] = body.content_type
+                # Таймаут как у прямой загрузки на ЯД: минимум 60 с, +2 с на МБ
+                response = self._request(
+                    'POST',
+                    f"{self.base_url}/api/v1/files/upload",
+                    data=body,
+                    params=params,
+                    headers=upload_headers,
+                    retry=False,
+                    timeout=max(60, int(size / (1024 * 1024)) * 2 + 60)
+                )
+            if response.status_code != 401 or self.token == token_before:
+                break
+        return self._handle_response(response)
+
+    def get_upload_progress(self, upload_id: str) -> Dict[str, Any]:
+        """Прогресс отправки файла сервером на Яндекс.Диск: {sent, total, phase}"""
+        response = self._request(
+            'GET',
+            f"{self.base_url}/api/v1/files/upload/progress/{upload_id}",
+            retry=False,
+            timeout=5
+        )
+        return self._handle_response(response)
+
     def create_yandex_folder(self, folder_path: str) -> Dict[str, Any]:
         """Создать папку на Яндекс.Диске"""
         response = self._request(
@@ -1,4 +1,4 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime
 
 
@@ -20,13 +20,13 @@ class MiscMixin:
             return False
 
     def get_notifications(self, unread_only: bool = False) -> List[Dict[str, Any]]:
-        """Получить уведомления"""
-        response = self._request(
-            'GET',
-            f"{self.base_url}/api/v1/notifications",
-            params={"unread_only": unread_only}
-        )
-        return self._handle_response(response)
+        """Получить все уведомления: страницы по курсору X-Next-Cursor до последней"""
+        # 200 — наибольшая страница, которую отдаёт сервер
+        items, cursor = self.get_notifications_page(unread_only, limit=200)
+        while cursor:
+            page, cursor = self.get_notifications_page(unread_only, limit=200, cursor=cursor)
+            items.extend(page)
+        return items
 
     def mark_notification_read(self, notification_id: int) -> bool:
         """Отметить уведомление как прочитанное"""
@@ -36,6 +36,44 @@ class MiscMixin:
         )
         return response.status_code == 200
 
+    def get_notifications_page(self, unread_only: bool = False, limit: int = 50,
+                               cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Страница уведомлений и курсор следующей (None — страница последняя)"""
+        params = {"unread_only": unread_only, "limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = self._request(
+            'GET',
+            f"{self.base_url}/api/v1/notifications",
+            params=params
+        )
+        return self._handle_response(response), response.headers.get("X-Next-Cursor")
+
+    def get_unread_notifications_count(self) -> int:
+        """Число непрочитанных уведомлений (бейдж)"""
+        response = self._request(
+            'GET',
+            f"{self.base_url}/api/v1/notifications/unread-count"
+        )
+        return self._handle_response(response).get("unread_count", 0)
+
+    def mark_notifications_read(self, ids: List[int]) -> Dict[str, Any]:
+        """Отметить прочитанными уведомления по списку id"""
+        response = self._request(
+            'POST',
+            f"{self.base_url}/api/v1/notifications/read",
+            json={"ids": list(ids)}
+        )
+        return self._handle_response(response)
+
+    def mark_all_notifications_read(self) -> Dict[str, Any]:
+        """Отметить прочитанными все уведомления"""
+        response = self._request(
+            'POST',
+            f"{self.base_url}/api/v1/notifications/read-all"
+        )
+        return self._handle_response(response)
+
     def sync(self, last_sync_timestamp: datetime, entity_types: List[str],
              retry: bool = True, timeout: int = None, mark_offline: bool = False) -> Dict[str, Any]:
         """
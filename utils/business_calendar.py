@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Календарь рабочих дней (пн-пт без праздников) с расчётом за O(1).
+
+Модуль общий для клиента и сервера: utils/business_calendar.py и
+server/services/business_calendar.py — один и тот же файл (сервер
+собирается отдельным образом без utils/), совпадение проверяет
+tests/client/test_business_calendar.py. Только стандартная библиотека.
+
+Для диапазона лет заранее строятся:
+- prefix[i] — число рабочих дней в [origin, origin + i);
+- workdays — порядковые номера рабочих дней по возрастанию.
+
+networkdays(a, b) = prefix[b] - prefix[a], а add_working_days(d, n) —
+это workdays[(рабочих дней по d включительно) + n - 1]: без циклов по
+дням. Даты вне диапазона расширяют его (перестроение под блокировкой).
+
+Праздники настраиваются: ежегодные (месяц, день), отдельные нерабочие
+даты (переносы) и рабочие выходные. Таблица по умолчанию — праздники РФ;
+свою можно задать JSON-файлом в переменной окружения
+BUSINESS_CALENDAR_FILE:
+
+    {"annual": [[1, 1], [2, 23]], "holidays": ["2025-05-02"],
+     "workdays": ["2025-11-01"]}
+"""
+import json
+import logging
+import math
+import os
+import threading
+from array import array
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Праздничные дни России (нерабочие): (месяц, день)
+RUSSIAN_HOLIDAYS = [
+    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),  # Новогодние праздники
+    (2, 23),  # День защитника Отечества
+    (3, 8),   # Международный женский день
+    (5, 1),   # Праздник Весны и Труда
+    (5, 9),   # День Победы
+    (6, 12),  # День России
+    (11, 4),  # День народного единства
+]
+
+WEEKEND = (5, 6)
+# Диапазон лет, который строится сразу
+DEFAULT_FIRST_YEAR = 2000
+DEFAULT_LAST_YEAR = 2060
+CALENDAR_FILE_ENV = 'BUSINESS_CALENDAR_FILE'
+
+
+def _to_date(value):
+    """date/datetime/'YYYY-MM-DD[...]' -> date; пусто или не дата -> None"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value.strip()[:10])
+        except ValueError:
+            return None
+    return None
+
+
+class BusinessCalendar:
+    """Рабочие дни по таблице праздников; расчёты — по префиксным суммам"""
+
+    def __init__(self, annual_holidays=RUSSIAN_HOLIDAYS, holidays=(), workdays=(),
+                 weekend=WEEKEND, first_year=DEFAULT_FIRST_YEAR, last_year=DEFAULT_LAST_YEAR):
+        self.annual_holidays = frozenset(tuple(md) for md in annual_holidays)
+        self.holidays = frozenset(_to_date(d) for d in holidays)
+        self.workdays = frozenset(_to_date(d) for d in workdays)
+        self.weekend = frozenset(weekend)
+        self._lock = threading.Lock()
+        self._build(first_year, last_year)
+
+    @classmethod
+    def from_table(cls, table):
+        """Календарь из таблицы {'annual': [[м, д]], 'holidays': [...], 'workdays': [...]}"""
+        return cls(
+            annual_holidays=table.get('annual', RUSSIAN_HOLIDAYS),
+            holidays=table.get('holidays', ()),
+            workdays=table.get('workdays', ()),
+            weekend=table.get('weekend', WEEKEND),
+        )
+
+    # ---------- построение ----------
+
+    def _is_working(self, d):
+        if d in self.workdays:
+            return True
+        if d in self.holidays:
+            return False
+        if d.weekday() in self.weekend:
+            return False
+        return (d.month, d.day) not in self.annual_holidays
+
+    def _build(self, first_year, last_year):
+        origin = date(first_year, 1, 1).toordinal()
+        end = date(last_year + 1, 1, 1).toordinal()
+        prefix = array('l', [0]) * (end - origin + 1)
+        workdays = array('l')
+        count = 0
+        for ordinal in range(origin, end):
+            prefix[ordinal - origin] = count
+            if self._is_working(date.fromordinal(ordinal)):
+                workdays.append(ordinal)
+                count += 1
+        prefix[end - origin] = count
+        # Публикуем одним присваиванием — читатели без блокировки видят
+        # либо старую, либо новую таблицу целиком
+        self._table = (origin, end, prefix, workdays)
+        self.first_year, self.last_year = first_year, last_year
+
+    def _snapshot(self, low, high):
+        """Таблица, покрывающая порядковые номера [low, high]"""
+        table = self._table
+        if table[0] <= low and high < table[1]:
+            return table
+        with self._lock:
+            origin, end, _, _ = self._table
+            if not (origin <= low and high < end):
+                self._build(min(self.first_year, date.fromordinal(low).year - 1),
+                            max(self.last_year, date.fromordinal(high).year + 1))
+            return self._table
+
+    def _count_range(self, low, high):
+        """Рабочих дней в [low, high) — по одной таблице"""
+        origin, _, prefix, _ = self._snapshot(low, high)
+        return prefix[high - origin] - prefix[low - origin]
+
+    def _add_ordinal(self, ordinal, days):
+        """Порядковый номер даты через days > 0 рабочих дней после ordinal"""
+        high = ordinal + days * 2 + 30
+        while True:
+            origin, _, prefix, workdays = self._snapshot(ordinal, high)
+            index = prefix[ordinal + 1 - origin] + days - 1
+            if index < len(workdays):
+                return workdays[index]
+            high += days * 2 + 366
+
+    # ---------- точечные расчёты ----------
+
+    def is_working_day(self, value):
+        d = _to_date(value)
+        if d is None:
+            return False
+        ordinal = d.toordinal()
+        return self._count_range(ordinal, ordinal + 1) == 1
+
+    def networkdays(self, start, end):
+        """Рабочие дни в [start, end); end < start или пустые даты -> 0"""
+        start, end = _to_date(start), _to_date(end)
+        if start is None or end is None or end < start:
+            return 0
+        return self._count_range(start.toordinal(), end.toordinal())
+
+    def working_days_between(self, start, end):
+        """Рабочие дни в (start, end]: не считая start, считая end"""
+        start, end = _to_date(start), _to_date(end)
+        if start is None or end is None or end <= start:
+            return 0
+        return self._count_range(start.toordinal() + 1, end.toordinal() + 1)
+
+    def working_days_elapsed(self, start, end):
+        """
+        Рабочие дни, начавшиеся в [start, end) для моментов времени:
+        дни start.date(), start.date() + 1, ... пока start + k дней < end.
+        """
+        if not start or not end or end <= start:
+            return 0
+        delta = end - start
+        steps = delta.days + (1 if delta.seconds or delta.microseconds else 0)
+        first = start.date() if isinstance(start, datetime) else start
+        return self.networkdays(first, first + timedelta(days=steps))
+
+    def add_working_days(self, value, days):
+        """
+        Дата через days рабочих дней после value (первый — следующий за value).
+        Тип результата совпадает с value: date, datetime (время сохраняется)
+        или строка 'YYYY-MM-DD'. days <= 0 — value без изменений; дробное
+        days округляется вверх.
+        """
+        d = _to_date(value)
+        if d is None or not days or days <= 0:
+            return value
+        result = date.fromordinal(self._add_ordinal(d.toordinal(), math.ceil(days)))
+        if isinstance(value, datetime):
+            return value + timedelta(days=result.toordinal() - d.toordinal())
+        if isinstance(value, str):
+            return result.isoformat()
+        return result
+
+
+def load_calendar_table(path):
+    """Прочитать таблицу праздников из JSON-файла"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_calendar():
+    """Календарь процесса (из BUSINESS_CALENDAR_FILE или праздники РФ)"""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                path = os.environ.get(CALENDAR_FILE_ENV)
+                calendar = None
+                if path:
+                    try:
+                        calendar = BusinessCalendar.from_table(load_calendar_table(path))
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Календарь {path} не загружен, используются праздники РФ: {e}")
+                _calendar = calendar or BusinessCalendar()
+    return _calendar
+
+
+def set_calendar(calendar):
+    """Заменить календарь процесса (None — построить заново при обращении)"""
+    global _calendar
+    _calendar = calendar
+
+
+def is_working_day(value):
+    return get_calendar().is_working_day(value)
+
+
+def networkdays(start, end):
+    return get_calendar().networkdays(start, end)
+
+
+def working_days_between(start, end):
+    return get_calendar().working_days_between(start, end)
+
+
+def working_days_elapsed(start, end):
+    return get_calendar().working_days_elapsed(start, end)
+
+
+def add_working_days(value, days):
+    return get_calendar().add_working_days(value, days)
@@ -2,11 +2,11 @@
 """
 Вспомогательные функции и классы для работы с календарем
 """
-from datetime import datetime, timedelta
 from PyQt5.QtWidgets import QDateEdit, QPushButton, QVBoxLayout, QWidget, QCalendarWidget
 from PyQt5.QtCore import QDate, Qt, QRectF
 from PyQt5.QtGui import QPalette, QColor, QPainter, QFont
 from utils.resource_path import resource_path
+from utils.business_calendar import get_calendar
 
 # ========== ОПРЕДЕЛЯЕМ ПУТЬ К ИКОНКАМ ==========
 ICONS_PATH = resource_path('resources/icons').replace('\\', '/')
@@ -168,40 +168,17 @@ def add_working_days(start_date_str, working_days):
     """
     if not start_date_str or working_days <= 0:
         return start_date_str or ''
-    try:
-        current = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-    except (ValueError, TypeError):
+    if not isinstance(start_date_str, str) or len(start_date_str) != 10:
         return start_date_str or ''
-    from utils.date_utils import is_working_day
-    added = 0
-    while added < working_days:
-        current += timedelta(days=1)
-        if is_working_day(current):
-            added += 1
-    return current.strftime('%Y-%m-%d')
+    return get_calendar().add_working_days(start_date_str, working_days)
 
 
 def working_days_between(start_date_str, end_date_str):
-    """Подсчитывает количество рабочих дней (Пн-Пт) между двумя датами.
+    """Подсчитывает количество рабочих дней (с учётом праздников РФ) между двумя датами.
     start_date_str, end_date_str: 'YYYY-MM-DD'
     Возвращает: int (количество рабочих дней, не считая start, считая end)
     """
-    if not start_date_str or not end_date_str:
-        return 0
-    try:
-        start = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        end = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-    except (ValueError, TypeError):
-        return 0
-    if end <= start:
-        return 0
-    count = 0
-    current = start
-    while current < end:
-        current += timedelta(days=1)
-        if current.weekday() < 5:
-            count += 1
-    return count
+    return get_calendar().working_days_between(start_date_str, end_date_str)
 
 
 def add_today_button_to_dateedit(date_edit):
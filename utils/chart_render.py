@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Рендер matplotlib-графиков (ui/chart_widget.py) вне GUI-потока.
+
+Живой Figure графика принадлежит FigureCanvasQTAgg и рисуется только в
+главном потоке. Для экспорта (PDF, 150-300 dpi) берётся снимок Figure
+(pickle-копия без Qt canvas, ~10 мс), а растеризация снимка через Agg
+выполняется в пуле потоков — окно не замирает, а несколько графиков
+рендерятся параллельно. Живой Figure при этом не ресайзится и не
+перерисовывается.
+
+RenderCoalescer схлопывает серию быстрых изменений фильтров в один
+вызов: срабатывает только последнее изменение после паузы.
+
+Использование:
+    future = get_chart_renderer().submit(chart, dpi=300)
+    ...                                  # GUI-поток свободен
+    result = future.result()             # (BytesIO, width_px, height_px) или None
+
+    self._reload_coalescer = RenderCoalescer(self.reload_all_sections, delay_ms=250)
+    combo.currentTextChanged.connect(self._reload_coalescer.trigger)
+"""
+
+import io
+import logging
+import pickle
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PyQt5.QtCore import QObject, QTimer
+
+logger = logging.getLogger(__name__)
+
+# Потоков растеризации: Agg рисует в C++, больше двух-трёх не даёт выигрыша
+RENDER_WORKERS = 2
+
+
+def snapshot_figure(figure):
+    """Независимая копия Figure с Agg canvas (вызывать в GUI-потоке)"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    clone = pickle.loads(pickle.dumps(figure))
+    FigureCanvasAgg(clone)
+    return clone
+
+
+def render_figure_png(figure, dpi=300, size_inches=None, tight_pad=None,
+                      pad_inches=0.08):
+    """
+    Растеризовать Figure в PNG через Agg (потокобезопасно для снимка).
+
+    Args:
+        figure: снимок Figure (snapshot_figure), не живой Figure виджета
+        dpi: разрешение PNG
+        size_inches: (w, h) — ресайз перед рендером (None = как есть)
+        tight_pad: pad для tight_layout после ресайза (None = без перекладки)
+        pad_inches: поля вокруг bbox_inches='tight'
+    Returns:
+        (BytesIO buf, width_px, height_px)
+    """
+    if size_inches is not None:
+        figure.set_size_inches(*size_inches)
+    if tight_pad is not None:
+        try:
+            figure.tight_layout(pad=tight_pad, h_pad=tight_pad * 0.75,
+                                w_pad=tight_pad * 0.75)
+        except Exception:
+            pass
+
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png', dpi=dpi, bbox_inches='tight',
+                   facecolor='white', edgecolor='none', pad_inches=pad_inches)
+    buf.seek(0)
+    try:
+        from PIL import Image as PILImage
+        w_px, h_px = PILImage.open(buf).size
+    except ImportError:
+        size_in = figure.get_size_inches()
+        w_px, h_px = int(size_in[0] * dpi), int(size_in[1] * dpi)
+    buf.seek(0)
+    return buf, w_px, h_px
+
+
+class ChartRenderService:
+    """Пул потоков для растеризации снимков графиков"""
+
+    def __init__(self, max_workers=RENDER_WORKERS):
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix='chart-render')
+            return self._executor
+
+    def submit(self, chart_widget, dpi=300, size_inches=None, tight_pad=None,
+               pad_inches=0.08):
+        """
+        Поставить график в очередь рендера.
+
+        Снимок Figure делается сразу (в вызывающем, т.е. GUI-потоке),
+        растеризация — в пуле. Пустой график или ошибка снимка/рендера
+        дают Future с результатом None.
+
+        Returns:
+            Future[(BytesIO, width_px, height_px) | None]
+        """
+        figure = getattr(chart_widget, 'figure', None) if chart_widget else None
+        if figure is None or not figure.axes:
+            return _done(None)
+        try:
+            clone = snapshot_figure(figure)
+        except Exception as e:
+            logger.warning(f"chart snapshot error: {e}")
+            return _done(None)
+
+        def _render():
+            try:
+                return render_figure_png(clone, dpi=dpi, size_inches=size_inches,
+                                         tight_pad=tight_pad, pad_inches=pad_inches)
+            except Exception as e:
+                logger.warning(f"chart render error: {e}")
+                return None
+
+        return self._get_executor().submit(_render)
+
+    def render(self, chart_widget, dpi=300, **kwargs):
+        """Синхронный вариант submit(): дождаться результата"""
+        return self.submit(chart_widget, dpi=dpi, **kwargs).result()
+
+    def shutdown(self):
+        """Остановить пул (при выходе из приложения)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_chart_renderer():
+    """Общий на процесс ChartRenderService"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderService()
+        return _renderer
+
+
+class RenderCoalescer(QObject):
+    """
+    Схлопывание частых запросов перерисовки (trailing debounce).
+
+    trigger() перезапускает таймер; callback вызывается один раз через
+    delay_ms после последнего trigger(). generation растёт при каждом
+    trigger() — фоновая загрузка может сравнить свой номер с текущим и
+    не применять устаревший результат.
+    """
+
+    def __init__(self, callback, delay_ms=250, parent=None):
+        super().__init__(parent)
+        self._callback = callback
+        self.generation = 0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self._fire)
+
+    def trigger(self, *_args):
+        """Запросить перерисовку (аргументы сигнала игнорируются)"""
+        self.generation += 1
+        self._timer.start()
+
+    def is_current(self, generation):
+        """True если после generation новых запросов не было"""
+        return generation == self.generation and not self._timer.isActive()
+
+    def is_pending(self):
+        return self._timer.isActive()
+
+    def flush(self):
+        """Выполнить отложенный вызов немедленно"""
+        if self._timer.isActive():
+            self._timer.stop()
+            self._fire()
+
+    def cancel(self):
+        self._timer.stop()
+
+    def _fire(self):
+        self._callback()
@@ -2437,6 +2437,19 @@ class DataAccess(QObject):
 
         return True
 
+    def upload_file(self, local_path: str, yandex_path: str,
+                    progress_callback=None) -> Optional[Dict]:
+        """Загрузить локальный файл на Яндекс.Диск через сервер потоком (только API)"""
+        if not self.api_client:
+            _safe_log("[DataAccess] upload_file: API недоступен")
+            return None
+        try:
+            return self.api_client.upload_local_file_to_yandex(
+                local_path, yandex_path, progress_callback=progress_callback)
+        except Exception as e:
+            _safe_log(f"[DataAccess] Ошибка API upload_file: {e}")
+            return None
+
     def get_project_files(self, contract_id: int, stage: str = None) -> List[Dict]:
         """Получить файлы проекта"""
         if self._should_use_api():
@@ -4,7 +4,7 @@
 Единое форматирование дат в формате ДД.ММ.ГГГГ
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from PyQt5.QtCore import QDate, QDateTime
 
 # Словарь для месяцев прописью
@@ -193,17 +193,9 @@ def format_month_year(month_value, default='—'):
         return default
 
 
-# Список праздничных дней России (нерабочие дни)
-# Формат: (месяц, день)
-RUSSIAN_HOLIDAYS = [
-    (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),  # Новогодние праздники
-    (2, 23),  # День защитника Отечества
-    (3, 8),   # Международный женский день
-    (5, 1),   # Праздник Весны и Труда
-    (5, 9),   # День Победы
-    (6, 12),  # День России
-    (11, 4),  # День народного единства
-]
+# Рабочие дни считает общий календарь (utils/business_calendar.py);
+# RUSSIAN_HOLIDAYS оставлен здесь для обратной совместимости импортов
+from utils.business_calendar import RUSSIAN_HOLIDAYS, get_calendar  # noqa: E402
 
 
 def is_working_day(date):
@@ -216,45 +208,13 @@ def is_working_day(date):
     Returns:
         bool: True если рабочий день, False если выходной или праздник
     """
-    # Проверяем выходные (суббота=5, воскресенье=6)
-    if date.weekday() in [5, 6]:
-        return False
-
-    # Проверяем праздники
-    if (date.month, date.day) in RUSSIAN_HOLIDAYS:
-        return False
-
-    return True
+    return get_calendar().is_working_day(date)
 
 
 def networkdays(start_date, end_date):
     """Расчёт рабочих дней между двумя датами (с учётом праздников РФ).
     Чистый Python, без PyQt5 — можно использовать и на сервере."""
-    if not start_date or not end_date:
-        return 0
-    if isinstance(start_date, str):
-        try:
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-        except ValueError:
-            return 0
-    if isinstance(end_date, str):
-        try:
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-        except ValueError:
-            return 0
-    if hasattr(start_date, 'date'):
-        start_date = start_date.date()
-    if hasattr(end_date, 'date'):
-        end_date = end_date.date()
-    if end_date < start_date:
-        return 0
-    count = 0
-    current = start_date
-    while current < end_date:
-        if is_working_day(current):
-            count += 1
-        current += timedelta(days=1)
-    return count
+    return get_calendar().networkdays(start_date, end_date)
 
 
 def add_working_days(start_date, working_days):
@@ -278,14 +238,7 @@ def add_working_days(start_date, working_days):
     else:
         raise ValueError(f"Неподдерживаемый тип даты: {type(start_date)}")
 
-    # Добавляем рабочие дни
-    days_added = 0
-    while days_added < working_days:
-        current_date += timedelta(days=1)
-        if is_working_day(current_date):
-            days_added += 1
-
-    return current_date
+    return get_calendar().add_working_days(current_date, working_days)
 
 
 def calculate_deadline(contract_date, survey_date, tech_task_date, contract_period):
@@ -1,5 +1,10 @@
 """
 Утилита для загрузки SVG иконок
+
+Готовые иконки кэшируются на весь процесс по ключу
+(имя, цвет, размер, devicePixelRatio): карточки Kanban, кнопки действий
+в таблицах и карточки метрик используют один и тот же небольшой набор
+SVG, поэтому каждая иконка читается с диска и рендерится один раз.
 """
 
 from PyQt5.QtGui import QIcon
@@ -7,11 +12,111 @@ from PyQt5.QtCore import QSize, Qt
 from utils.resource_path import resource_path
 import os
 
+# Иконки, которые нужны почти сразу после входа (карточки CRM, колонки,
+# кнопки действий). Прогреваются в main.py через IconLoader.preload().
+COMMON_ICONS = [
+    'arrow-left-circle', 'arrow-right-circle', 'arrow-down-circle', 'arrow-up-circle',
+    'box', 'map-pin', 'tag', 'deadline', 'accept', 'submit', 'edit', 'folder',
+    'calendar-plus', 'plus-circle', 'team', 'chevron-right', 'chevron-down',
+    'refresh', 'check-square', 'stats',
+]
+COMMON_COLORED_ICONS = [
+    ('calendar-plus', '#FFFFFF', 12),
+    ('plus-circle', '#FFFFFF', 12),
+    ('refresh', '#808080', 20),
+    ('stats', '#808080', 20),
+]
+
+
 class IconLoader:
     """Загрузчик SVG иконок"""
 
     ICONS_DIR = 'resources/icons'
 
+    # Кэш на весь процесс: (имя, цвет, размер, dpr) -> QIcon
+    _icon_cache = {}
+    # Исходный текст SVG: путь -> str (для перекраски в разные цвета)
+    _svg_cache = {}
+    cache_enabled = True
+    cache_hits = 0
+    cache_misses = 0
+
+    @staticmethod
+    def _device_pixel_ratio():
+        """devicePixelRatio приложения (1.0 если QApplication ещё не создан)"""
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication.instance()
+        if app is None:
+            return 1.0
+        try:
+            return float(app.devicePixelRatio())
+        except Exception:
+            return 1.0
+
+    @staticmethod
+    def _cache_get(key):
+        if not IconLoader.cache_enabled:
+            return None
+        icon = IconLoader._icon_cache.get(key)
+        if icon is None:
+            IconLoader.cache_misses += 1
+        else:
+            IconLoader.cache_hits += 1
+        return icon
+
+    @staticmethod
+    def _cache_put(key, icon):
+        if IconLoader.cache_enabled:
+            IconLoader._icon_cache[key] = icon
+
+    @staticmethod
+    def _read_svg(icon_path):
+        """Текст SVG файла (читается с диска один раз)"""
+        content = IconLoader._svg_cache.get(icon_path) if IconLoader.cache_enabled else None
+        if content is None:
+            with open(icon_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            if IconLoader.cache_enabled:
+                IconLoader._svg_cache[icon_path] = content
+        return content
+
+    @staticmethod
+    def clear_cache():
+        """Очистить кэш иконок и счётчики (например, после смены темы)"""
+        IconLoader._icon_cache.clear()
+        IconLoader._svg_cache.clear()
+        IconLoader.cache_hits = 0
+        IconLoader.cache_misses = 0
+
+    @staticmethod
+    def cache_stats():
+        """Статистика кэша: {'icons', 'svg_sources', 'hits', 'misses'}"""
+        return {
+            'icons': len(IconLoader._icon_cache),
+            'svg_sources': len(IconLoader._svg_cache),
+            'hits': IconLoader.cache_hits,
+            'misses': IconLoader.cache_misses,
+        }
+
+    @staticmethod
+    def preload(icons=None, colored=None):
+        """
+        Прогрев кэша часто используемыми иконками
+
+        Args:
+            icons: Имена иконок для load() (по умолчанию COMMON_ICONS)
+            colored: Кортежи (имя, цвет, размер) для load_colored()
+                     (по умолчанию COMMON_COLORED_ICONS)
+
+        Returns:
+            Количество иконок в кэше после прогрева
+        """
+        for name in (COMMON_ICONS if icons is None else icons):
+            IconLoader.load(name)
+        for name, color, size in (COMMON_COLORED_ICONS if colored is None else colored):
+            IconLoader.load_colored(name, color, size)
+        return len(IconLoader._icon_cache)
+
     @staticmethod
     def load(icon_name, size=18):
         """
@@ -28,10 +133,18 @@ class IconLoader:
         if not icon_name.endswith('.svg'):
             icon_name += '.svg'
 
+        # QIcon из файла сам рендерит нужный размер при отрисовке и хранит
+        # результат внутри, поэтому один экземпляр разделяется всеми кнопками
+        key = (icon_name, None, None, None)
+        cached = IconLoader._cache_get(key)
+        if cached is not None:
+            return cached
+
         icon_path = resource_path(os.path.join(IconLoader.ICONS_DIR, icon_name))
 
         if os.path.exists(icon_path):
             icon = QIcon(icon_path)
+            IconLoader._cache_put(key, icon)
             return icon
         else:
             print(f"[WARN] Иконка не найдена: {icon_path}")
@@ -53,6 +166,12 @@ class IconLoader:
         if not icon_name.endswith('.svg'):
             icon_name += '.svg'
 
+        dpr = IconLoader._device_pixel_ratio()
+        key = (icon_name, color, size, dpr)
+        cached = IconLoader._cache_get(key)
+        if cached is not None:
+            return cached
+
         icon_path = resource_path(os.path.join(IconLoader.ICONS_DIR, icon_name))
 
         if not os.path.exists(icon_path):
@@ -60,8 +179,7 @@ class IconLoader:
             return QIcon()
 
         try:
-            with open(icon_path, 'r', encoding='utf-8') as f:
-                svg_content = f.read()
+            svg_content = IconLoader._read_svg(icon_path)
 
             # Заменяем цвета в SVG
             svg_content = svg_content.replace('currentColor', color)
@@ -76,14 +194,19 @@ class IconLoader:
             from PyQt5.QtGui import QPixmap, QPainter
             from PyQt5.QtCore import QByteArray
 
+            # Рендерим в физических пикселях, чтобы на HiDPI не было размытия
+            physical = max(1, int(round(size * dpr)))
             renderer = QSvgRenderer(QByteArray(svg_content.encode('utf-8')))
-            pixmap = QPixmap(size, size)
+            pixmap = QPixmap(physical, physical)
+            pixmap.setDevicePixelRatio(dpr)
             pixmap.fill(Qt.transparent)
             painter = QPainter(pixmap)
             renderer.render(painter)
             painter.end()
 
-            return QIcon(pixmap)
+            icon = QIcon(pixmap)
+            IconLoader._cache_put(key, icon)
+            return icon
         except Exception:
             return IconLoader.load(icon_name, size)
 
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Отложенный импорт тяжёлых модулей и профилировщик времени импорта.
+
+Главное окно и вкладки (crm_tab, reports_tab, salaries_tab ...) транзитивно
+тянут matplotlib, reportlab, fitz и openpyxl. Чтобы окно входа появлялось
+до загрузки этих модулей, имена классов объявляются через lazy_class():
+модуль импортируется только при первом вызове/обращении к атрибуту.
+
+Использование:
+    CRMTab = lazy_class('ui.crm_tab', 'CRMTab')
+    tab = CRMTab(employee, True, api_client=api)   # импорт ui.crm_tab здесь
+
+    with ImportProfiler() as profiler:
+        import ui.main_window
+    profiler.print_report()
+"""
+import builtins
+import importlib
+import sys
+import threading
+import time
+
+
+class LazyAttr:
+    """Прокси для атрибута модуля (обычно класса), импортируемого по требованию.
+
+    Вызов прокси создаёт экземпляр реального класса, остальные атрибуты
+    (staticmethod, константы) проксируются через __getattr__.
+    """
+
+    __slots__ = ('_module_name', '_attr_name', '_target', '__weakref__')
+
+    def __init__(self, module_name, attr_name):
+        object.__setattr__(self, '_module_name', module_name)
+        object.__setattr__(self, '_attr_name', attr_name)
+        object.__setattr__(self, '_target', None)
+
+    def resolve(self):
+        """Импортировать модуль и вернуть реальный объект"""
+        target = self._target
+        if target is None:
+            module = importlib.import_module(self._module_name)
+            target = getattr(module, self._attr_name)
+            object.__setattr__(self, '_target', target)
+        return target
+
+    @property
+    def is_loaded(self):
+        """True если модуль уже импортирован (этим прокси или кем-то ещё)"""
+        return self._target is not None or self._module_name in sys.modules
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.resolve(), name, value)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self.resolve())
+
+    def __repr__(self):
+        state = 'loaded' if self._target is not None else 'deferred'
+        return f"<lazy {self._module_name}.{self._attr_name} ({state})>"
+
+
+def lazy_class(module_name, attr_name):
+    """Отложенная ссылка на класс/функцию attr_name из модуля module_name"""
+    return LazyAttr(module_name, attr_name)
+
+
+class ImportProfiler:
+    """Замер времени импорта каждого модуля (аналог python -X importtime).
+
+    Перехватывает builtins.__import__ и для каждого впервые загружаемого
+    модуля считает self-время (без вложенных импортов) и общее время.
+    Учитываются только импорты из главного потока.
+    """
+
+    def __init__(self):
+        self.records = {}          # module -> {'self_ms', 'total_ms', 'order'}
+        self.started_at = None
+        self.marks = {}            # метка -> мс с момента start()
+        self._orig_import = None
+        self._stack = []
+        self._thread_id = None
+
+    # ---------- установка ----------
+
+    def start(self):
+        if self._orig_import is not None:
+            return self
+        self.started_at = time.perf_counter()
+        self._thread_id = threading.get_ident()
+        self._orig_import = builtins.__import__
+        builtins.__import__ = self._import
+        return self
+
+    def stop(self):
+        if self._orig_import is not None:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def mark(self, label):
+        """Запомнить момент (мс с начала профилирования), например 'login_window_shown'"""
+        if self.started_at is not None:
+            self.marks[label] = (time.perf_counter() - self.started_at) * 1000
+
+    # ---------- перехват ----------
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        orig = self._orig_import
+        if (level != 0 or name in sys.modules
+                or threading.get_ident() != self._thread_id):
+            return orig(name, globals, locals, fromlist, level)
+
+        frame = [0.0]  # время вложенных импортов
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            return orig(name, globals, locals, fromlist, level)
+        finally:
+            total = time.perf_counter() - start
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][0] += total
+            if name not in self.records:
+                self.records[name] = {
+                    'self_ms': (total - frame[0]) * 1000,
+                    'total_ms': total * 1000,
+                    'order': len(self.records),
+                }
+
+    # ---------- отчёт ----------
+
+    def top(self, limit=25, key='total_ms'):
+        """Список (module, record) отсортированный по убыванию key"""
+        items = sorted(self.records.items(), key=lambda kv: kv[1][key], reverse=True)
+        return items[:limit] if limit else items
+
+    def to_dict(self):
+        return {
+            'marks': dict(self.marks),
+            'modules': {name: {'self_ms': round(r['self_ms'], 2),
+                               'total_ms': round(r['total_ms'], 2)}
+                        for name, r in self.records.items()},
+        }
+
+    def format_report(self, limit=25):
+        lines = ['=' * 70, '  STARTUP IMPORT PROFILE', '=' * 70]
+        lines.append(f"  {'module':45s} {'self ms':>10s} {'total ms':>10s}")
+        for name, rec in self.top(limit):
+            lines.append(f"  {name[:45]:45s} {rec['self_ms']:10.1f} {rec['total_ms']:10.1f}")
+        if self.marks:
+            lines.append('-' * 70)
+            for label, ms in self.marks.items():
+                lines.append(f"  {label:45s} {ms:10.0f} ms")
+        lines.append('=' * 70)
+        return '\n'.join(lines)
+
+    def print_report(self, limit=25):
+        print(self.format_report(limit))
@@ -285,33 +285,19 @@ def chart_to_png(chart_widget, dpi=300):
     """
     Получить PNG из matplotlib chart через figure.savefig().
 
+    Рендерится снимок Figure в потоке ChartRenderService (utils/chart_render):
+    живой график не перерисовывается. Для нескольких графиков выгоднее
+    chart_to_png_async() — растеризация идёт параллельно.
+
     Returns: (BytesIO buf, width_px, height_px) или None
     """
-    if not chart_widget or not hasattr(chart_widget, 'figure'):
-        return None
-    fig = chart_widget.figure
-    if not fig.axes:
-        return None
-    buf = io.BytesIO()
-    try:
-        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight',
-                    facecolor='white', edgecolor='none', pad_inches=0.08)
-        buf.seek(0)
-        try:
-            from PIL import Image as PILImage
-            img = PILImage.open(buf)
-            w_px, h_px = img.size
-            buf.seek(0)
-            return buf, w_px, h_px
-        except ImportError:
-            buf.seek(0)
-            size_in = fig.get_size_inches()
-            w_px = int(size_in[0] * dpi)
-            h_px = int(size_in[1] * dpi)
-            return buf, w_px, h_px
-    except Exception as e:
-        logger.warning(f"chart_to_png error: {e}")
-        return None
+    return chart_to_png_async(chart_widget, dpi).result()
+
+
+def chart_to_png_async(chart_widget, dpi=300):
+    """Как chart_to_png, но возвращает Future с тем же результатом"""
+    from utils.chart_render import get_chart_renderer
+    return get_chart_renderer().submit(chart_widget, dpi=dpi)
 
 
 # =====================================================================
@@ -503,3 +489,71 @@ def build_table_pdf(
 
     if auto_open:
         open_file(output_path)
+
+
+# =====================================================================
+# 8. Фоновая генерация табличных PDF
+# =====================================================================
+
+_pdf_executor = None
+_pdf_error_relay = None
+
+
+def _get_pdf_executor():
+    """Один поток: reportlab не рассчитан на параллельную сборку документов"""
+    global _pdf_executor
+    if _pdf_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pdf-export')
+    return _pdf_executor
+
+
+def _get_pdf_error_relay():
+    """QObject в GUI-потоке: сигнал переносит ошибку фоновой сборки в главный поток"""
+    global _pdf_error_relay
+    from PyQt5 import sip
+    if _pdf_error_relay is None or sip.isdeleted(_pdf_error_relay):
+        from PyQt5.QtCore import QObject, pyqtSignal
+
+        class _PdfErrorRelay(QObject):
+            failed = pyqtSignal(object, str)
+
+            def __init__(self):
+                super().__init__()
+                self.failed.connect(self._show)
+
+            def _show(self, parent, message):
+                from ui.custom_message_box import CustomMessageBox
+                try:
+                    CustomMessageBox(parent, 'Ошибка', f'Не удалось создать PDF:\n{message}', 'error').exec_()
+                except RuntimeError:
+                    # Окно-родитель уже закрыто
+                    CustomMessageBox(None, 'Ошибка', f'Не удалось создать PDF:\n{message}', 'error').exec_()
+
+        _pdf_error_relay = _PdfErrorRelay()
+    return _pdf_error_relay
+
+
+def build_table_pdf_async(parent, **kwargs):
+    """
+    build_table_pdf в фоновом потоке — окно не замирает на больших таблицах.
+
+    Вызывать из GUI-потока: данные (headers, rows) собираются заранее из
+    виджетов, в поток уходят только списки строк. Ошибка сборки показывается
+    через CustomMessageBox поверх parent.
+
+    Returns: Future (результат — None или исключение)
+    """
+    # Шрифты регистрируются в GUI-потоке, до первой фоновой сборки
+    register_fonts()
+    relay = _get_pdf_error_relay()
+
+    def _build():
+        try:
+            build_table_pdf(**kwargs)
+        except Exception as e:
+            logger.error(f"Ошибка экспорта PDF: {e}", exc_info=True)
+            relay.failed.emit(parent, str(e))
+            raise
+
+    return _get_pdf_executor().submit(_build)
@@ -201,6 +201,20 @@ class SyncManager(QObject):
                 self.employees_updated.emit(employees)
                 self.data_updated.emit('employees', employees)
 
+            # Карточки CRM/надзора (если сервер их вернул) — вкладки обновляют
+            # доску инкрементально по ID карточки
+            crm_cards = result.get('crm_cards', [])
+            if crm_cards:
+                _global_cache.invalidate("crm_cards")
+                self.crm_cards_updated.emit(crm_cards)
+                self.data_updated.emit('crm_cards', crm_cards)
+
+            supervision_cards = result.get('supervision_cards', [])
+            if supervision_cards:
+                _global_cache.invalidate("supervision")
+                self.supervision_cards_updated.emit(supervision_cards)
+                self.data_updated.emit('supervision_cards', supervision_cards)
+
             # Синхронизация файлов (отдельный endpoint) — тоже в фоне
             def _sync_files():
                 try:
@@ -273,6 +287,8 @@ class SyncManager(QObject):
             # чтобы не засорять лог при нестабильной сети
             pass
 
+        self._renew_locks()
+
     # ==========================================
     # CONCURRENT EDITING (Блокировки записей)
     # ==========================================
@@ -383,6 +399,30 @@ class SyncManager(QObject):
 
         return (False, None)
 
+    def _renew_locks(self):
+        """Продлить все свои блокировки одним запросом (вызывается с heartbeat)"""
+        keys = [{'entity_type': entity_type, 'entity_id': entity_id}
+                for entity_type, records in self._locked_records.items()
+                for entity_id in records]
+        if not keys:
+            return
+
+        try:
+            response = self.api_client._request(
+                'POST',
+                f"{self.api_client.base_url}/api/v1/locks/renew",
+                json={'keys': keys},
+                retry=False,
+                timeout=5,
+                mark_offline=False
+            )
+            if response.status_code == 200:
+                # Истёкшие или снятые блокировки убираем из кэша
+                for item in response.json().get('lost', []):
+                    self._locked_records.get(item['entity_type'], {}).pop(item['entity_id'], None)
+        except Exception:
+            pass
+
     def _release_all_locks(self):
         """Освободить все блокировки текущего пользователя"""
         if not self.api_client:
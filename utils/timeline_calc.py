@@ -6,21 +6,32 @@
 from utils.calendar_helpers import add_working_days
 
 
-def calc_planned_dates(entries):
+def calc_planned_dates(entries, start_index=0):
     """Рассчитать планируемые даты для каждого подэтапа.
     Логика: planned[START] = START.actual_date
             planned[N] = prev_date + norm_days[N]
     prev_date = actual_date (если заполнена) или planned_date предыдущего.
     Результат сохраняется в entry['_planned_date'] (строка 'YYYY-MM-DD').
+
+    start_index > 0 — пересчитать только записи с этого индекса (после
+    изменения даты у entries[start_index]); записи выше должны быть уже
+    рассчитаны, prev_date берётся из ближайшей из них.
     """
-    # Инициализация prev_date из START.actual_date (если есть)
     prev_date = ''
-    for entry in entries:
-        if entry.get('stage_code') == 'START' and entry.get('actual_date'):
-            prev_date = entry['actual_date']
+    if start_index > 0:
+        for entry in reversed(entries[:start_index]):
+            if entry.get('executor_role', '') == 'header':
+                continue
+            prev_date = entry.get('actual_date', '') or entry.get('_planned_date', '') or ''
             break
+    else:
+        # Инициализация prev_date из START.actual_date (если есть)
+        for entry in entries:
+            if entry.get('stage_code') == 'START' and entry.get('actual_date'):
+                prev_date = entry['actual_date']
+                break
 
-    for entry in entries:
+    for entry in entries[start_index:]:
         role = entry.get('executor_role', '')
         if role == 'header':
             continue
@@ -1,8 +1,11 @@
 import requests
 import json
 import os
+import random
+import threading
 import urllib.parse
 import time
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
@@ -27,11 +30,34 @@ class YandexDiskNetworkError(YandexDiskError):
     pass
 
 
+class YandexDiskServerError(YandexDiskError):
+    """Временная ошибка на стороне Яндекс.Диска (5xx)"""
+    pass
+
+
 class YandexDiskManager:
     _instances = {}
 
     MAX_FILE_SIZE_MB = 200  # Maximum allowed file size
 
+    # Параллельная загрузка файлов стадии (upload_stage_files)
+    UPLOAD_WORKERS = 4          # одновременных загрузок
+    PUBLISH_WORKERS = 4         # одновременных публикаций (вторая фаза)
+    UPLOAD_RETRIES = 3          # попыток на файл при 429/5xx загрузки
+    UPLOAD_BACKOFF = 1.0        # базовая задержка между попытками, сек (растёт x2)
+    FOLDER_CACHE_TTL = 600      # сек: папка считается существующей после создания
+    SCAN_WORKERS = 4            # одновременных листингов при сканировании папки договора
+    LIST_PAGE_SIZE = 1000       # элементов на страницу листинга (offset-пагинация)
+
+    # Общая на процесс HTTP-сессия с пулом соединений под параллельные загрузки
+    _shared_session = None
+    _shared_session_lock = threading.Lock()
+    # Хосты загрузки (href из /resources/upload: uploader*.disk.yandex.net)
+    UPLOAD_HOST_PREFIX = 'https://uploader'
+    # Кэш созданных/существующих папок: (token, path) -> время подтверждения
+    _folder_cache = {}
+    _folder_cache_lock = threading.Lock()
+
     @classmethod
     def get_instance(cls, token=None):
         """Get or create a singleton instance for the given token"""
@@ -49,20 +75,39 @@ class YandexDiskManager:
         from config import YANDEX_DISK_PROJECTS
         self.archive_root = YANDEX_DISK_PROJECTS
 
-        # Создаем сессию с повторными попытками
-        self.session = requests.Session()
-
-        # Настраиваем стратегию повторных попыток
-        retry_strategy = Retry(
-            total=3,  # Максимум 3 попытки
-            backoff_factor=1,  # Задержка между попытками: 1, 2, 4 секунды
-            status_forcelist=[429, 500, 502, 503, 504],  # Повторять при этих HTTP кодах
-            allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE", "POST"]
-        )
+        # Сессия с повторными попытками — общая для всех экземпляров
+        self.session = self._get_shared_session()
 
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("https://", adapter)
-        self.session.mount("http://", adapter)
+    @classmethod
+    def _get_shared_session(cls):
+        """requests.Session с пулом соединений (создаётся один раз на процесс)"""
+        with cls._shared_session_lock:
+            if cls._shared_session is None:
+                session = requests.Session()
+
+                # Настраиваем стратегию повторных попыток
+                retry_strategy = Retry(
+                    total=3,  # Максимум 3 попытки
+                    backoff_factor=1,  # Задержка между попытками: 1, 2, 4 секунды
+                    status_forcelist=[429, 500, 502, 503, 504],  # Повторять при этих HTTP кодах
+                    allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE", "POST"]
+                )
+
+                # Пул рассчитан на параллельные загрузки и публикации
+                pool_size = cls.UPLOAD_WORKERS + cls.PUBLISH_WORKERS
+                adapter = HTTPAdapter(max_retries=retry_strategy,
+                                      pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # PUT на сервер загрузки — без повторов urllib3: 429/5xx повторяет
+                # upload_file_with_retry с новой ссылкой, сетевые ошибки — цикл
+                # в upload_file, иначе попытки перемножаются. Монтируется только
+                # здесь: mount() во время загрузок гонится с get_adapter() потоков
+                session.mount(cls.UPLOAD_HOST_PREFIX,
+                              HTTPAdapter(max_retries=0, pool_connections=pool_size,
+                                          pool_maxsize=pool_size))
+                cls._shared_session = session
+            return cls._shared_session
 
     def _check_response(self, response, operation_name="operation"):
         """Check API response status and raise appropriate errors"""
@@ -93,6 +138,8 @@ class YandexDiskManager:
         response = self.session.get(url, params=params, headers=headers, timeout=10)
         self._check_response(response, "get_upload_link")
 
+        if response.status_code >= 500:
+            raise YandexDiskServerError(f"Ошибка получения ссылки для загрузки: {response.status_code}")
         if response.status_code != 200:
             raise Exception(f"Ошибка получения ссылки для загрузки: {response.status_code} - {response.text}")
 
@@ -116,11 +163,31 @@ class YandexDiskManager:
                     else:
                         raise YandexDiskNetworkError(f"Сетевая ошибка после 3 попыток: {e}")
 
+        if upload_response.status_code == 429:
+            raise YandexDiskRateLimitError("Yandex Disk: rate limit (upload_file)")
+        if upload_response.status_code >= 500:
+            raise YandexDiskServerError(f"Ошибка загрузки файла: {upload_response.status_code}")
         if upload_response.status_code not in [200, 201, 202]:
             raise Exception(f"Ошибка загрузки файла: {upload_response.status_code}")
 
         return True
 
+    def upload_file_with_retry(self, local_path, yandex_path):
+        """
+        upload_file с повтором при 429/5xx загрузки (экспоненциальная задержка).
+        Сетевые ошибки PUT повторяет сам upload_file, запрос ссылки — urllib3.
+        """
+        retryable = (YandexDiskRateLimitError, YandexDiskServerError)
+        for attempt in range(self.UPLOAD_RETRIES):
+            try:
+                return self.upload_file(local_path, yandex_path)
+            except retryable as e:
+                if attempt == self.UPLOAD_RETRIES - 1:
+                    raise
+                delay = self.UPLOAD_BACKOFF * (2 ** attempt) * random.uniform(0.75, 1.25)
+                print(f"[WARN] {os.path.basename(local_path)}: {e} — повтор через {delay:.1f} с")
+                time.sleep(delay)
+
     def download_file(self, yandex_path, local_path):
         """Скачивание файла с Яндекс.Диска"""
         url = f'{self.base_url}/resources/download'
@@ -240,7 +307,7 @@ class YandexDiskManager:
 
             # Создаем подпапку
             subfolder_path = f"{contract_folder_path}/{subfolder_name}"
-            self.create_folder(subfolder_path)
+            self.ensure_folder(subfolder_path)
 
             # Формируем полный путь к файлу на Яндекс.Диске
             yandex_file_path = f"{subfolder_path}/{file_name}"
@@ -279,6 +346,28 @@ class YandexDiskManager:
             print(f"[ERROR] Ошибка загрузки файла: {e}")
             return None
 
+    def ensure_folder(self, folder_path):
+        """create_folder с кэшем: уже созданная/существующая папка не запрашивается повторно"""
+        key = (self.token, folder_path)
+        now = time.monotonic()
+        with self._folder_cache_lock:
+            confirmed = self._folder_cache.get(key)
+            if confirmed is not None and now - confirmed < self.FOLDER_CACHE_TTL:
+                return True
+        if not self.create_folder(folder_path):
+            return False
+        with self._folder_cache_lock:
+            self._folder_cache[key] = now
+        return True
+
+    def forget_folder(self, folder_path):
+        """Убрать папку и её подпапки из кэша (после удаления/перемещения)"""
+        prefix = folder_path.rstrip('/') + '/'
+        with self._folder_cache_lock:
+            for key in [k for k in self._folder_cache
+                        if k[0] == self.token and (k[1] == folder_path or k[1].startswith(prefix))]:
+                del self._folder_cache[key]
+
     def create_folder(self, folder_path):
         """Создание папки на Яндекс.Диске"""
         if not self.token:
@@ -327,6 +416,7 @@ class YandexDiskManager:
             'overwrite': 'false'
         }
         headers = {'Authorization': f'OAuth {self.token}'}
+        self.forget_folder(from_path)
 
         try:
             response = self.session.post(url, params=params, headers=headers, timeout=10)
@@ -350,6 +440,7 @@ class YandexDiskManager:
         url = f'{self.base_url}/resources'
         params = {'path': folder_path, 'permanently': 'true'}
         headers = {'Authorization': f'OAuth {self.token}'}
+        self.forget_folder(folder_path)
 
         try:
             response = self.session.delete(url, params=params, headers=headers, timeout=10)
@@ -434,24 +525,31 @@ class YandexDiskManager:
             return False
 
     def get_folder_contents(self, folder_path):
-        """Получение списка содержимого папки"""
+        """Получение списка содержимого папки (все страницы)"""
         if not self.token:
             return []
 
         url = f'{self.base_url}/resources'
-        params = {'path': folder_path, 'limit': 1000}
         headers = {'Authorization': f'OAuth {self.token}'}
+        items = []
 
         try:
-            response = self.session.get(url, params=params, headers=headers, timeout=10)
-            self._check_response(response, "get_folder_contents")
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('_embedded', {}).get('items', [])
-            return []
+            while True:
+                params = {'path': folder_path, 'limit': self.LIST_PAGE_SIZE, 'offset': len(items)}
+                response = self.session.get(url, params=params, headers=headers, timeout=10)
+                self._check_response(response, "get_folder_contents")
+                if response.status_code != 200:
+                    break
+                embedded = response.json().get('_embedded', {})
+                page = embedded.get('items', [])
+                items.extend(page)
+                total = embedded.get('total')
+                if len(page) < self.LIST_PAGE_SIZE or (total is not None and len(items) >= total):
+                    break
+            return items
         except Exception as e:
             print(f"[ERROR] Ошибка получения содержимого папки: {e}")
-            return []
+            return items
 
     def copy_file(self, from_path, to_path):
         """Копирование файла на Яндекс.Диске"""
@@ -712,6 +810,12 @@ class YandexDiskManager:
     def upload_stage_files(self, local_files, contract_folder_path, stage, variation=None, progress_callback=None, skip_per_file_publish=False):
         """Загрузка множественных файлов для стадии
 
+        Файлы загружаются параллельно (UPLOAD_WORKERS потоков, общий пул
+        соединений, повтор с задержкой при 429/5xx), затем публичные ссылки
+        получаются второй параллельной фазой. Папки создаются один раз
+        (ensure_folder). progress_callback вызывается по мере завершения
+        загрузок, current растёт строго по порядку 0..total-1.
+
         Args:
             local_files: список путей к локальным файлам
             contract_folder_path: путь к папке договора
@@ -721,15 +825,13 @@ class YandexDiskManager:
             skip_per_file_publish: если True, не получать публичную ссылку для каждого файла (используется для references/photo_documentation, где нужна только ссылка на папку)
 
         Returns:
-            list of dict с данными загруженных файлов
+            list of dict с данными загруженных файлов (в порядке local_files)
         """
         if not self.token:
             print("[ERROR] Токен не установлен")
             return []
 
         try:
-            import os
-
             # Получаем путь к папке стадии (с учетом вариации)
             stage_folder = self.get_stage_folder_path(contract_folder_path, stage, variation=variation)
 
@@ -750,52 +852,59 @@ class YandexDiskManager:
                     clean_contract_folder = clean_contract_folder[5:]
 
                 parent_folder = f"{clean_contract_folder}/2 стадия - Концепция дизайна"
-                print(f"[INFO] Создание родительской папки: {parent_folder}")
-                self.create_folder(parent_folder)
+                self.ensure_folder(parent_folder)
 
                 # Создаем папку подсекции (Концепция-коллажи или 3D визуализация)
                 subsection_folder = self.get_stage_folder_path(contract_folder_path, stage, variation=None)
                 if subsection_folder:
-                    print(f"[INFO] Создание папки подсекции: {subsection_folder}")
-                    self.create_folder(subsection_folder)
+                    self.ensure_folder(subsection_folder)
 
-            print(f"[INFO] Создание папки стадии: {stage_folder}")
-            self.create_folder(stage_folder)
+            print(f"[INFO] Папка стадии: {stage_folder}")
+            self.ensure_folder(stage_folder)
 
-            uploaded_files = []
             total_files = len(local_files)
-
-            for index, local_file in enumerate(local_files):
+            jobs = [(local_file, f"{stage_folder}/{os.path.basename(local_file)}")
+                    for local_file in local_files]
+            progress_lock = threading.Lock()
+            completed = [0]
+
+            def _upload(job):
+                local_file, yandex_path = job
+                file_name = os.path.basename(local_file)
                 try:
-                    file_name = os.path.basename(local_file)
-                    yandex_path = f"{stage_folder}/{file_name}"
-
-                    print(f"[INFO] Загрузка {file_name}...")
-
-                    # Вызываем callback для обновления прогресса (загрузка на Яндекс.Диск)
-                    if progress_callback:
-                        progress_callback(index, total_files, file_name, 'uploading')
-
-                    # Загружаем файл
-                    self.upload_file(local_file, yandex_path)
-
-                    # Получаем публичную ссылку (пропускаем для references/photo_doc — там нужна только ссылка на папку)
-                    if skip_per_file_publish:
-                        public_link = yandex_path
-                    else:
-                        public_link = self.get_public_link(yandex_path)
-
-                    uploaded_files.append({
-                        'file_name': file_name,
-                        'yandex_path': yandex_path,
-                        'public_link': public_link if public_link else yandex_path,
-                        'local_path': local_file
-                    })
-
-                    print(f"[OK] {file_name} загружен")
-
+                    self.upload_file_with_retry(local_file, yandex_path)
+                    ok = True
                 except Exception as e:
                     print(f"[ERROR] Ошибка загрузки {local_file}: {e}")
+                    ok = False
+                # Прогресс — по завершении, под блокировкой: значения не перемешиваются
+                with progress_lock:
+                    if progress_callback:
+                        progress_callback(completed[0], total_files, file_name, 'uploading')
+                    completed[0] += 1
+                return ok
+
+            # Фаза 1: параллельная загрузка
+            workers = max(1, min(self.UPLOAD_WORKERS, total_files))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yd-upload') as pool:
+                upload_ok = list(pool.map(_upload, jobs))
+            done_jobs = [job for job, ok in zip(jobs, upload_ok) if ok]
+
+            # Фаза 2: публикация (пропускаем для references/photo_doc — там нужна только ссылка на папку)
+            if skip_per_file_publish or not done_jobs:
+                links = [yandex_path for _local, yandex_path in done_jobs]
+            else:
+                workers = max(1, min(self.PUBLISH_WORKERS, len(done_jobs)))
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='yd-publish') as pool:
+                    links = list(pool.map(self.get_public_link,
+                                          [yandex_path for _local, yandex_path in done_jobs]))
+
+            uploaded_files = [{
+                'file_name': os.path.basename(local_file),
+                'yandex_path': yandex_path,
+                'public_link': public_link if public_link else yandex_path,
+                'local_path': local_file
+            } for (local_file, yandex_path), public_link in zip(done_jobs, links)]
 
             print(f"[OK] Загружено файлов для {stage}: {len(uploaded_files)}")
             return uploaded_files
@@ -843,7 +952,8 @@ class YandexDiskManager:
     def scan_contract_files(self, contract_folder_path):
         """Сканирование всех файлов в папке договора на Яндекс.Диске
 
-        Рекурсивно обходит папки стадий и возвращает список найденных файлов.
+        Обходит папки стадий в ширину (уровень — параллельно, SCAN_WORKERS
+        потоков) и возвращает список найденных файлов.
 
         Args:
             contract_folder_path: путь к папке договора
@@ -939,35 +1049,43 @@ class YandexDiskManager:
 
         found_files = []
 
-        def scan_folder(folder_path, stage=None):
-            """Рекурсивно сканирует папку"""
+        def list_folder(folder_path):
             try:
-                items = self.get_folder_contents(folder_path)
-                for item in items:
-                    item_name = item.get('name', '')
-                    item_path = item.get('path', '')
-                    item_type = item.get('type', '')
-
-                    if item_type == 'dir':
-                        child_stage = match_folder_to_stage(item_name)
-                        if child_stage is None:
-                            child_stage = stage  # наследуем от родителя
-                        if stage == 'supervision' and item_name.startswith('Стадия'):
-                            child_stage = 'supervision'
-                        if item_name.startswith('Вариация') or item_name.startswith('вариация'):
-                            child_stage = stage
-                        scan_folder(item_path, child_stage)
-                    elif item_type == 'file' and stage:
-                        found_files.append({
-                            'yandex_path': item_path,
-                            'file_name': item_name,
-                            'stage': stage,
-                            'file_type': detect_file_type(item_name),
-                        })
+                return self.get_folder_contents(folder_path)
             except Exception as e:
                 print(f"[YD-SCAN] Ошибка сканирования {folder_path}: {e}")
+                return []
 
         print(f"[YD-SCAN] Сканирование папки договора: {contract_folder_path}")
-        scan_folder(contract_folder_path)
+        # Обход в ширину: папки одного уровня листаются параллельно
+        frontier = [(contract_folder_path, None)]
+        with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS) as pool:
+            while frontier:
+                next_frontier = []
+                listings = pool.map(list_folder, [path for path, _ in frontier])
+                for (_, stage), items in zip(frontier, listings):
+                    for item in items:
+                        item_name = item.get('name', '')
+                        item_path = item.get('path', '')
+                        item_type = item.get('type', '')
+
+                        if item_type == 'dir':
+                            child_stage = match_folder_to_stage(item_name)
+                            if child_stage is None:
+                                child_stage = stage  # наследуем от родителя
+                            if stage == 'supervision' and item_name.startswith('Стадия'):
+                                child_stage = 'supervision'
+                            if item_name.startswith('Вариация') or item_name.startswith('вариация'):
+                                child_stage = stage
+                            next_frontier.append((item_path, child_stage))
+                        elif item_type == 'file' and stage:
+                            found_files.append({
+                                'yandex_path': item_path,
+                                'file_name': item_name,
+                                'stage': stage,
+                                'file_type': detect_file_type(item_name),
+                            })
+                frontier = next_frontier
+
         print(f"[YD-SCAN] Найдено {len(found_files)} файлов")
         return found_files